@@ -5,8 +5,10 @@ Memory 缓存模块
 """
 from .interest_memory import InterestMemoryCache
 from .activity_stats_cache import ActivityStatsCache
+from .memory_counters import MemoryCounterCache
 
 __all__ = [
     "InterestMemoryCache",
     "ActivityStatsCache",
+    "MemoryCounterCache",
 ]
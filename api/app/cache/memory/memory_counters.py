@@ -0,0 +1,176 @@
+"""
+Memory Counters Cache
+
+记忆计数器模块（写时物化）
+由写入流水线、遗忘引擎、去重合并在写入 Neo4j 后增量维护，仪表盘直接读取，
+避免每次加载都对 Neo4j 做全标签扫描的聚合查询。定时对账任务负责修正漂移。
+
+存储结构（Redis Hash，不设过期）：
+    cache:memory:counters:by_user:{end_user_id}
+字段：total（该用户全部节点数）、dialogue、chunk、statement、entity、summary、
+edge（起点属于该用户的全部关系数）
+
+只维护用户级计数：工作空间级的读取接口按用户批量读取，不单独维护工作空间计数，
+写入路径因此无需查询用户所属工作空间。
+用户计数不存在时不做增量（基线未知），只记入待对账集合，由读取回源或对账任务播种。
+"""
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional
+
+from app.aioRedis import get_thread_safe_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ("total", "dialogue", "chunk", "statement", "entity", "summary", "edge")
+
+# 仅当 hash 已存在时才累加，避免在未播种的计数上从 0 开始累计
+_INCR_IF_EXISTS = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 1, #ARGV, 2 do
+    redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+return 1
+"""
+
+
+def empty_counters() -> Dict[str, int]:
+    return {field: 0 for field in COUNTER_FIELDS}
+
+
+def counter_deltas(write_counters: Mapping[str, int], field: Optional[str] = None) -> Dict[str, int]:
+    """将 Neo4j 写入计数换算为计数器增量
+
+    Args:
+        write_counters: neo4j_connector.summary_counters 的结果
+        field: 该查询写入/删除的节点类型字段（如 "statement"），为空时只更新 total/edge
+    """
+    nodes = write_counters.get("nodes_created", 0) - write_counters.get("nodes_deleted", 0)
+    deltas = {
+        "total": nodes,
+        "edge": write_counters.get("relationships_created", 0) - write_counters.get("relationships_deleted", 0),
+    }
+    if field:
+        deltas[field] = nodes
+    return deltas
+
+
+def merge_deltas(*parts: Mapping[str, int]) -> Dict[str, int]:
+    """累加多组计数器增量"""
+    merged = empty_counters()
+    for part in parts:
+        for field, value in part.items():
+            merged[field] = merged.get(field, 0) + int(value or 0)
+    return merged
+
+
+def _normalize(values: Mapping[str, int]) -> Dict[str, int]:
+    return {field: int(values.get(field) or 0) for field in COUNTER_FIELDS}
+
+
+class MemoryCounterCache:
+    """记忆计数器缓存类"""
+
+    PREFIX = "cache:memory:counters"
+
+    @classmethod
+    def _user_key(cls, end_user_id: str) -> str:
+        return f"{cls.PREFIX}:by_user:{end_user_id}"
+
+    @classmethod
+    def _dirty_key(cls) -> str:
+        """待对账的用户集合"""
+        return f"{cls.PREFIX}:dirty"
+
+    @classmethod
+    async def apply_deltas(cls, end_user_id: str, deltas: Mapping[str, int]) -> bool:
+        """增量更新用户计数
+
+        在 Neo4j 写事务提交后调用。用户计数尚未播种时不累加，
+        而是记入待对账集合。失败只记录日志，不影响写入主流程。
+
+        Args:
+            end_user_id: 终端用户ID
+            deltas: 各字段增量，如 {"total": 3, "statement": 2, "edge": 5}
+
+        Returns:
+            用户计数是否已更新
+        """
+        if not end_user_id:
+            return False
+        args: List = []
+        for field in COUNTER_FIELDS:
+            value = int(deltas.get(field) or 0)
+            if value:
+                args.extend([field, value])
+        if not args:
+            return True
+
+        try:
+            redis_client = get_thread_safe_redis()
+            updated = await redis_client.eval(_INCR_IF_EXISTS, 1, cls._user_key(end_user_id), *args)
+            if not updated:
+                await redis_client.sadd(cls._dirty_key(), str(end_user_id))
+                return False
+            return True
+        except Exception as e:
+            logger.error(f"更新记忆计数失败: end_user_id={end_user_id}, deltas={dict(deltas)}, {e}", exc_info=True)
+            return False
+
+    @classmethod
+    async def mark_dirty(cls, end_user_ids: Iterable[str]) -> None:
+        """标记用户计数待对账（无法精确计算增量的写入路径使用）"""
+        ids = [str(uid) for uid in end_user_ids if uid]
+        if not ids:
+            return
+        try:
+            await get_thread_safe_redis().sadd(cls._dirty_key(), *ids)
+        except Exception as e:
+            logger.error(f"标记记忆计数待对账失败: {e}", exc_info=True)
+
+    @classmethod
+    async def pop_dirty(cls, count: int) -> List[str]:
+        """取出一批待对账用户"""
+        members = await get_thread_safe_redis().spop(cls._dirty_key(), count)
+        return list(members or [])
+
+    @classmethod
+    async def get_end_user_counters_batch(cls, end_user_ids: List[str]) -> Dict[str, Optional[Dict[str, int]]]:
+        """批量读取用户计数
+
+        Returns:
+            {end_user_id: 计数字典}，计数不存在（未播种）的用户值为 None
+        """
+        if not end_user_ids:
+            return {}
+        redis_client = get_thread_safe_redis()
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for uid in end_user_ids:
+                pipe.hgetall(cls._user_key(uid))
+            rows = await pipe.execute()
+        return {
+            uid: (_normalize(row) if row else None)
+            for uid, row in zip(end_user_ids, rows)
+        }
+
+    @classmethod
+    async def get_end_user_counters(cls, end_user_id: str) -> Optional[Dict[str, int]]:
+        """读取单个用户计数，未播种时返回 None"""
+        result = await cls.get_end_user_counters_batch([end_user_id])
+        return result.get(end_user_id)
+
+    @classmethod
+    async def replace_end_user_counters(cls, end_user_id: str, counters: Mapping[str, int]) -> None:
+        """用权威值（Neo4j 聚合结果）覆盖用户计数"""
+        await get_thread_safe_redis().hset(cls._user_key(end_user_id), mapping=_normalize(counters))
+
+    @classmethod
+    async def clear_end_user_counters(cls, end_user_id: str) -> None:
+        """删除用户计数（用户数据被整体删除时调用）"""
+        try:
+            redis_client = get_thread_safe_redis()
+            await redis_client.delete(cls._user_key(end_user_id))
+            await redis_client.srem(cls._dirty_key(), str(end_user_id))
+        except Exception as e:
+            logger.error(f"清除记忆计数失败: end_user_id={end_user_id}, {e}", exc_info=True)
@@ -0,0 +1,10 @@
+"""
+Multimodal 缓存模块
+
+提供多模态附件处理结果的缓存功能
+"""
+from .attachment_cache import AttachmentCache
+
+__all__ = [
+    "AttachmentCache",
+]
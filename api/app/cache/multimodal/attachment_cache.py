@@ -0,0 +1,72 @@
+"""
+Attachment Cache
+
+多模态附件处理结果缓存，按文件内容的 SHA-256 存储：
+- 文档提取文本：cache:multimodal:attachment:text:{digest}
+- 文档内嵌图片（已保存到存储的 URL，按工作空间隔离）：cache:multimodal:attachment:doc_images:{digest}:{workspace_id}
+- 已上传文件的内容哈希（上传文件不可变，命中后无需读取文件）：cache:multimodal:attachment:digest:{file_id}
+
+缓存不可用时按未命中处理，不影响主流程。
+"""
+import json
+import logging
+from typing import Any, Dict, List, Optional
+
+from app.aioRedis import get_thread_safe_redis
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AttachmentCache:
+    """多模态附件处理结果缓存类"""
+
+    PREFIX = "cache:multimodal:attachment"
+
+    @classmethod
+    async def _get(cls, key: str) -> Optional[str]:
+        try:
+            return await get_thread_safe_redis().get(f"{cls.PREFIX}:{key}")
+        except Exception as e:
+            logger.warning(f"读取附件缓存失败: {key}, {e}")
+            return None
+
+    @classmethod
+    async def _set(cls, key: str, value: str) -> None:
+        try:
+            await get_thread_safe_redis().set(
+                f"{cls.PREFIX}:{key}", value, ex=settings.MULTIMODAL_ATTACHMENT_CACHE_TTL
+            )
+        except Exception as e:
+            logger.warning(f"写入附件缓存失败: {key}, {e}")
+
+    @classmethod
+    async def get_text(cls, digest: str) -> Optional[str]:
+        """获取文档提取文本"""
+        return await cls._get(f"text:{digest}")
+
+    @classmethod
+    async def set_text(cls, digest: str, text: str) -> None:
+        """缓存文档提取文本"""
+        await cls._set(f"text:{digest}", text)
+
+    @classmethod
+    async def get_document_images(cls, digest: str, workspace_id: Any) -> Optional[List[Dict[str, Any]]]:
+        """获取文档内嵌图片列表（page / index / url）"""
+        value = await cls._get(f"doc_images:{digest}:{workspace_id}")
+        return json.loads(value) if value is not None else None
+
+    @classmethod
+    async def set_document_images(cls, digest: str, workspace_id: Any, images: List[Dict[str, Any]]) -> None:
+        """缓存文档内嵌图片列表"""
+        await cls._set(f"doc_images:{digest}:{workspace_id}", json.dumps(images))
+
+    @classmethod
+    async def get_file_digest(cls, file_id: Any) -> Optional[str]:
+        """获取已上传文件的内容哈希"""
+        return await cls._get(f"digest:{file_id}")
+
+    @classmethod
+    async def set_file_digest(cls, file_id: Any, digest: str) -> None:
+        """缓存已上传文件的内容哈希"""
+        await cls._set(f"digest:{file_id}", digest)
@@ -1,12 +1,15 @@
 import os
 import platform
 import re
+import time
 from datetime import timedelta
 from urllib.parse import quote
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import before_task_publish, task_postrun, task_prerun
 
+from app.core import metrics
 from app.core.config import settings
 from app.core.logging_config import get_logger
 
@@ -102,6 +105,7 @@ celery_app.conf.update(
         'app.core.memory.agent.read_message_priority': {'queue': 'memory_tasks'},
         'app.core.memory.agent.read_message': {'queue': 'memory_tasks'},
         'app.core.memory.agent.write_message': {'queue': 'memory_tasks'},
+        'app.tasks.drain_memory_write_queue': {'queue': 'memory_tasks'},
 
         # Long-term storage tasks → memory_tasks queue (batched write strategies)
         'app.core.memory.agent.long_term_storage.window': {'queue': 'memory_tasks'},
@@ -132,7 +136,11 @@ celery_app.conf.update(
         'app.tasks.workspace_reflection_task': {'queue': 'periodic_tasks'},
         'app.tasks.layer2_reflection_task': {'queue': 'periodic_tasks'},
         'app.tasks.layer2_dedup_full_scan_task': {'queue': 'periodic_tasks'},
+        'app.tasks.reconcile_memory_counters_task': {'queue': 'periodic_tasks'},
+        'app.tasks.sweep_memory_write_queues': {'queue': 'periodic_tasks'},
+        'app.tasks.rebuild_app_daily_stats_task': {'queue': 'periodic_tasks'},
         'app.tasks.regenerate_memory_cache': {'queue': 'periodic_tasks'},
+        'app.tasks.run_memory_maintenance_shard': {'queue': 'periodic_tasks'},
         'app.tasks.run_forgetting_cycle_task': {'queue': 'periodic_tasks'},
         'app.tasks.write_all_workspaces_memory_task': {'queue': 'periodic_tasks'},
         'app.tasks.update_implicit_emotions_storage': {'queue': 'periodic_tasks'},
@@ -147,6 +155,7 @@ celery_app.conf.update(
         # Sliding window idle scan → periodic_tasks queue (Beat scheduler)
         'app.tasks.scan_idle_conversations': {'queue': 'periodic_tasks'},
         'app.tasks.scan_workflow_schedule_triggers': {'queue': 'periodic_tasks'},
+        'app.tasks.flush_workflow_node_records': {'queue': 'periodic_tasks'},
         'app.tasks.run_workflow_schedule_trigger': {'queue': 'workflow_trigger_tasks'},
     },
 )
@@ -184,6 +193,11 @@ implicit_emotions_update_schedule = crontab(
 )
 layer2_reflection_schedule = timedelta(minutes=settings.LAYER2_REFLECTION_INTERVAL_MINUTES)
 layer2_dedup_full_scan_schedule = crontab(hour=settings.LAYER2_DEDUP_FULL_SCAN_HOUR, minute=0)
+memory_counter_reconcile_schedule = timedelta(minutes=settings.MEMORY_COUNTER_RECONCILE_INTERVAL_MINUTES)
+memory_counter_full_reconcile_schedule = crontab(hour=settings.MEMORY_COUNTER_FULL_RECONCILE_HOUR, minute=30)
+app_daily_stats_rebuild_schedule = crontab(hour=settings.APP_DAILY_STATS_REBUILD_HOUR, minute=15)
+workflow_node_record_flush_schedule = timedelta(seconds=settings.WORKFLOW_NODE_RECORD_FLUSH_INTERVAL_SECONDS)
+memory_write_queue_sweep_schedule = timedelta(seconds=settings.MEMORY_WRITE_QUEUE_SWEEP_INTERVAL_SECONDS)
 # 构建定时任务配置
 beat_schedule_config = {
     # "run-workspace-reflection": {
@@ -199,9 +213,7 @@ beat_schedule_config = {
     "run-forgetting-cycle": {
         "task": "app.tasks.run_forgetting_cycle_task",
         "schedule": forgetting_cycle_schedule,
-        "kwargs": {
-            "config_id": None,  # 使用默认配置，可以通过环境变量配置
-        },
+        "args": (),
     },
     "write-all-workspaces-memory": {
         "task": "app.tasks.write_all_workspaces_memory_task",
@@ -223,6 +235,26 @@ beat_schedule_config = {
         "schedule": layer2_dedup_full_scan_schedule,
         "args": (),
     },
+    "reconcile-memory-counters": {
+        "task": "app.tasks.reconcile_memory_counters_task",
+        "schedule": memory_counter_reconcile_schedule,
+        "kwargs": {"full": False},
+    },
+    "full-reconcile-memory-counters": {
+        "task": "app.tasks.reconcile_memory_counters_task",
+        "schedule": memory_counter_full_reconcile_schedule,
+        "kwargs": {"full": True},
+    },
+    "sweep-memory-write-queues": {
+        "task": "app.tasks.sweep_memory_write_queues",
+        "schedule": memory_write_queue_sweep_schedule,
+        "args": (),
+    },
+    "rebuild-app-daily-stats": {
+        "task": "app.tasks.rebuild_app_daily_stats_task",
+        "schedule": app_daily_stats_rebuild_schedule,
+        "kwargs": {"days": settings.APP_DAILY_STATS_REBUILD_DAYS},
+    },
     # "scan-idle-conversations": {
     #     "task": "app.tasks.scan_idle_conversations",
     #     "schedule": 3600.0,
@@ -235,6 +267,11 @@ beat_schedule_config = {
         "schedule": 60.0,
         "options": {"queue": "periodic_tasks"},
     },
+    "flush-workflow-node-records": {
+        "task": "app.tasks.flush_workflow_node_records",
+        "schedule": workflow_node_record_flush_schedule,
+        "options": {"queue": "periodic_tasks"},
+    },
 }
 
 celery_app.conf.beat_schedule = beat_schedule_config
@@ -274,3 +311,28 @@ if _HAS_SUBSCRIPTION_TASKS:
             "options": {"queue": "subscription_email_tasks", "expires": 3600},
         },
     })
+
+
+# 任务指标：发布时打上时间戳，worker 据此统计排队延迟和执行耗时（见 app.core.metrics）
+@before_task_publish.connect
+def _stamp_published_at(headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+
+
+def _task_queue(task) -> str:
+    delivery_info = getattr(task.request, "delivery_info", None) or {}
+    return delivery_info.get("routing_key") or celery_app.conf.task_default_queue
+
+
+@task_prerun.connect
+def _record_task_started(task_id=None, task=None, **kwargs):
+    metrics.task_started(
+        task_id, task.name, _task_queue(task),
+        published_at=task.request.get("published_at"), eta=task.request.eta,
+    )
+
+
+@task_postrun.connect
+def _record_task_finished(task_id=None, task=None, state=None, **kwargs):
+    metrics.task_finished(task_id, task.name, _task_queue(task), state)
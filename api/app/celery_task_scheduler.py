@@ -7,6 +7,7 @@ import time
 import uuid
 
 import redis
+from celery.signals import task_postrun
 
 from app.core.config import settings
 from app.core.logging_config import get_named_logger
@@ -24,10 +25,20 @@ READY_SET = "scheduler:ready_users"
 PENDING_HASH = "scheduler:pending_tasks"
 # Dynamic Sharding: Instance Registry
 REGISTRY_KEY = "scheduler:instances"
+# Completion events written by the workers (see _signal_completion), read by a consumer group
+COMPLETION_STREAM = "scheduler:completions"
+COMPLETION_GROUP = "scheduler"
+COMPLETION_STREAM_MAXLEN = 100000
+# Header carried by dispatched tasks so that the worker knows to signal their completion
+SCHEDULER_HEADER = "scheduler_msg_id"
+FINISHED_STATES = ("SUCCESS", "FAILURE", "REVOKED")
 
 TASK_TIMEOUT = 7800  # Task timeout (seconds), considered lost if exceeded
 HEARTBEAT_INTERVAL = 10  # Heartbeat interval (seconds)
 INSTANCE_TTL = 30  # Instance timeout (seconds)
+IDLE_BLOCK_MS = 500  # How long an idle tick waits for a completion event
+COMPLETION_BATCH = 1000  # Completion events consumed per tick
+SWEEP_INTERVAL = 30.0  # Fallback sweep of pending tasks (missed events, revoked or lost tasks)
 
 LUA_ATOMIC_LOCK = """
 local dispatch_lock = KEYS[1]
@@ -56,6 +67,18 @@ end
 return 0
 """
 
+# Pop the dispatched message (only if it is still the queue head) and mark the
+# user ready again when more messages are queued
+LUA_POP_DISPATCHED = """
+if redis.call('LINDEX', KEYS[1], 0) == ARGV[1] then
+    redis.call('LPOP', KEYS[1])
+end
+if redis.call('LLEN', KEYS[1]) > 0 then
+    redis.call('SADD', KEYS[2], ARGV[2])
+end
+return 1
+"""
+
 
 def stable_hash(value: str) -> int:
     return int.from_bytes(
@@ -89,6 +112,14 @@ def health_check_server(scheduler_ref):
 
 
 class RedisTaskScheduler:
+    # Redis keys, overridable per instance (e.g. to isolate tests)
+    USER_QUEUE_PREFIX = USER_QUEUE_PREFIX
+    ACTIVE_USERS = ACTIVE_USERS
+    READY_SET = READY_SET
+    PENDING_HASH = PENDING_HASH
+    REGISTRY_KEY = REGISTRY_KEY
+    COMPLETION_STREAM = COMPLETION_STREAM
+
     def __init__(self):
         self.redis = redis.Redis(
             host=settings.REDIS_HOST,
@@ -105,6 +136,7 @@ class RedisTaskScheduler:
         self._shard_index = 0
         self._shard_count = 1
         self._last_heartbeat = 0.0
+        self._group_ready = False
 
     def push_task(self, task_name, user_id, params):
         try:
@@ -117,11 +149,11 @@ class RedisTaskScheduler:
             })
 
             lock_key = f"{task_name}:{user_id}"
-            queue_key = f"{USER_QUEUE_PREFIX}{user_id}"
+            queue_key = f"{self.USER_QUEUE_PREFIX}{user_id}"
 
             pipe = self.redis.pipeline()
             pipe.rpush(queue_key, msg)
-            pipe.sadd(ACTIVE_USERS, user_id)
+            pipe.sadd(self.ACTIVE_USERS, user_id)
             pipe.set(
                 f"task_tracker:{msg_id}",
                 json.dumps({"status": "QUEUED", "task_id": None}),
@@ -130,7 +162,7 @@ class RedisTaskScheduler:
             pipe.execute()
 
             if not self.redis.exists(lock_key):
-                self.redis.sadd(READY_SET, user_id)
+                self.redis.sadd(self.READY_SET, user_id)
 
             logger.info("Task pushed: msg_id=%s task=%s user=%s", msg_id, task_name, user_id)
             return msg_id
@@ -157,11 +189,127 @@ class RedisTaskScheduler:
 
         return {"status": status, "task_id": task_id, "result": result_content}
 
+    # ==================== Completion tracking ====================
+
+    def signal_completion(self, task_id: str, status: str):
+        """Called by the worker when a dispatched task finishes (see _signal_completion)"""
+        self.redis.xadd(
+            self.COMPLETION_STREAM,
+            {"task_id": task_id, "status": status},
+            maxlen=COMPLETION_STREAM_MAXLEN,
+            approximate=True,
+        )
+
+    def _ensure_completion_group(self):
+        if self._group_ready:
+            return
+        try:
+            self.redis.xgroup_create(self.COMPLETION_STREAM, COMPLETION_GROUP, id="$", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    def _consume_completions(self, block_ms=None) -> int:
+        """
+        Read completion events (blocking up to block_ms when given) and release the
+        finished tasks. Returns the number of tasks released.
+        """
+        self._ensure_completion_group()
+        try:
+            response = self.redis.xreadgroup(
+                COMPLETION_GROUP, self.instance_id,
+                {self.COMPLETION_STREAM: ">"},
+                count=COMPLETION_BATCH, block=block_ms,
+            )
+        except redis.ResponseError as e:
+            if "NOGROUP" not in str(e):
+                raise
+            # Stream deleted (e.g. Redis flushed): recreate the group on the next tick
+            self._group_ready = False
+            return 0
+        if not response:
+            return 0
+
+        entries = response[0][1]
+        statuses = {}
+        for _, fields in entries:
+            if fields.get("task_id"):
+                statuses[fields["task_id"]] = fields.get("status") or "UNKNOWN"
+        task_ids = list(statuses)
+
+        pipe = self.redis.pipeline()
+        for task_id in task_ids:
+            pipe.hget(self.PENDING_HASH, task_id)
+            pipe.get(f"celery-task-meta-{task_id}")
+        rows = pipe.execute()
+
+        finished = []
+        for i, task_id in enumerate(task_ids):
+            raw_meta, raw_result = rows[2 * i], rows[2 * i + 1]
+            if raw_meta is None:
+                # Already released (e.g. by the fallback sweep)
+                continue
+            try:
+                result_data = json.loads(raw_result) if raw_result else {"status": statuses[task_id]}
+                finished.append((task_id, json.loads(raw_meta), result_data))
+            except Exception as e:
+                logger.error("Completion error for %s: %s", task_id, e, exc_info=True)
+                self.errors += 1
+
+        self._release_finished(finished, ack_ids=[entry_id for entry_id, _ in entries])
+        return len(finished)
+
+    def _release_finished(self, finished, ack_ids=()):
+        """
+        Release the locks of finished tasks, record their final status and mark their
+        users ready, in one round trip. finished: [(task_id, pending_meta, result_data)]
+        """
+        if not finished and not ack_ids:
+            return
+
+        pipe = self.redis.pipeline()
+        ready_user_ids = set()
+        for task_id, meta, result_data in finished:
+            lock_key = meta["lock_key"]
+            final_status = result_data.get("status", "UNKNOWN") if result_data else "EXPIRED"
+            logger.info("Task finished: %s state=%s", task_id, final_status)
+
+            pipe.eval(LUA_SAFE_DELETE, 1, lock_key, task_id)
+            pipe.hdel(self.PENDING_HASH, task_id)
+
+            tracker_msg_id = meta.get("msg_id")
+            if tracker_msg_id:
+                pipe.set(
+                    f"task_tracker:{tracker_msg_id}",
+                    json.dumps({
+                        "status": final_status,
+                        "task_id": task_id,
+                        "result": result_data.get("result") or {},
+                    }),
+                    ex=86400,
+                )
+
+            parts = lock_key.split(":", 1)
+            if len(parts) == 2:
+                ready_user_ids.add(parts[1])
+
+        if ready_user_ids:
+            pipe.sadd(self.READY_SET, *ready_user_ids)
+        if ack_ids:
+            pipe.xack(self.COMPLETION_STREAM, COMPLETION_GROUP, *ack_ids)
+        pipe.execute()
+
     def _cleanup_finished(self):
+        """
+        Fallback sweep over all pending tasks: releases tasks whose completion event was
+        missed (revoked before running, worker crash, dispatched before an upgrade) and
+        tasks lost beyond TASK_TIMEOUT. Runs every SWEEP_INTERVAL, not on every tick.
+        """
         cursor = 0
         all_pending = {}
         while True:
-            cursor, batch = self.redis.hscan(PENDING_HASH, cursor=cursor, count=100)
+            cursor, batch = self.redis.hscan(self.PENDING_HASH, cursor=cursor, count=100)
             all_pending.update(batch)
             if cursor == 0:
                 break
@@ -177,70 +325,28 @@ class RedisTaskScheduler:
             pipe.get(f"celery-task-meta-{task_id}")
         results = pipe.execute()
 
-        cleanup_pipe = self.redis.pipeline()
-        has_cleanup = False
-        ready_user_ids = set()
-
+        finished = []
         for task_id, raw_result in zip(task_ids, results):
             try:
                 meta = json.loads(all_pending[task_id])
-                lock_key = meta["lock_key"]
-                dispatched_at = meta.get("dispatched_at", 0)
-                age = now - dispatched_at
-
-                should_cleanup = False
-                result_data = {}
+                age = now - meta.get("dispatched_at", 0)
 
                 if raw_result is not None:
                     result_data = json.loads(raw_result)
-                    if result_data.get("status") in ("SUCCESS", "FAILURE", "REVOKED"):
-                        should_cleanup = True
-                        logger.info(
-                            "Task finished: %s state=%s", task_id,
-                            result_data.get("status"),
-                        )
+                    if result_data.get("status") in FINISHED_STATES:
+                        finished.append((task_id, meta, result_data))
                 elif age > TASK_TIMEOUT:
-                    should_cleanup = True
                     logger.warning(
                         "Task expired or lost: %s age=%.0fs, force cleanup",
                         task_id, age,
                     )
-
-                if should_cleanup:
-                    final_status = (
-                        result_data.get("status", "UNKNOWN") if result_data else "EXPIRED"
-                    )
-
-                    self.redis.eval(LUA_SAFE_DELETE, 1, lock_key, task_id)
-
-                    cleanup_pipe.hdel(PENDING_HASH, task_id)
-
-                    tracker_msg_id = meta.get("msg_id")
-                    if tracker_msg_id:
-                        cleanup_pipe.set(
-                            f"task_tracker:{tracker_msg_id}",
-                            json.dumps({
-                                "status": final_status,
-                                "task_id": task_id,
-                                "result": result_data.get("result") or {},
-                            }),
-                            ex=86400,
-                        )
-                    has_cleanup = True
-
-                    parts = lock_key.split(":", 1)
-                    if len(parts) == 2:
-                        ready_user_ids.add(parts[1])
+                    finished.append((task_id, meta, {}))
 
             except Exception as e:
                 logger.error("Cleanup error for %s: %s", task_id, e, exc_info=True)
                 self.errors += 1
 
-        if has_cleanup:
-            cleanup_pipe.execute()
-
-        if ready_user_ids:
-            self.redis.sadd(READY_SET, *ready_user_ids)
+        self._release_finished(finished)
 
     def _heartbeat(self):
         now = time.time()
@@ -248,9 +354,9 @@ class RedisTaskScheduler:
             return
         self._last_heartbeat = now
 
-        self.redis.hset(REGISTRY_KEY, self.instance_id, str(now))
+        self.redis.hset(self.REGISTRY_KEY, self.instance_id, str(now))
 
-        all_instances = self.redis.hgetall(REGISTRY_KEY)
+        all_instances = self.redis.hgetall(self.REGISTRY_KEY)
 
         alive = []
         dead = []
@@ -263,8 +369,10 @@ class RedisTaskScheduler:
         if dead:
             pipe = self.redis.pipeline()
             for iid in dead:
-                pipe.hdel(REGISTRY_KEY, iid)
-            pipe.execute()
+                pipe.hdel(self.REGISTRY_KEY, iid)
+                # Events the dead instance read but never acked are covered by the sweep
+                pipe.xgroup_delconsumer(self.COMPLETION_STREAM, COMPLETION_GROUP, iid)
+            pipe.execute(raise_on_error=False)
             logger.info("Cleaned dead instances: %s", dead)
 
         alive.sort()
@@ -283,136 +391,176 @@ class RedisTaskScheduler:
             return True
         return stable_hash(user_id) % self._shard_count == self._shard_index
 
-    def _commit_post_dispatch(self, lock_key, task, msg_id, dispatch_lock):
+    # ==================== Dispatch ====================
+
+    def _send_tasks(self, batch):
+        """
+        Publish the locked messages through one broker producer.
+        batch: [(user_id, raw_head, msg, task_id)]; returns [(item, task or exception)]
+        """
+        sent = []
+        with celery_app.producer_or_acquire() as producer:
+            for item in batch:
+                msg, task_id = item[2], item[3]
+                try:
+                    task = celery_app.send_task(
+                        msg["task_name"],
+                        kwargs=json.loads(msg.get("params", "{}")),
+                        task_id=task_id,
+                        headers={SCHEDULER_HEADER: msg["msg_id"]},
+                        producer=producer,
+                    )
+                    sent.append((item, task))
+                except Exception as e:
+                    sent.append((item, e))
+        return sent
+
+    def _prepare_dispatch(self, locked):
+        """
+        Assign task ids and record the pending entries before publishing, so a task that
+        finishes immediately is always found by whichever instance reads its completion
+        event. locked: [(user_id, raw_head, msg)]; returns [(user_id, raw_head, msg, task_id)]
+        """
+        now = time.time()
+        batch = []
         pipe = self.redis.pipeline()
-        pipe.set(lock_key, task.id, ex=3600)
-        pipe.hset(PENDING_HASH, task.id, json.dumps({
-            "lock_key": lock_key,
-            "dispatched_at": time.time(),
-            "msg_id": msg_id,
-        }))
-        pipe.delete(dispatch_lock)
-        pipe.set(
-            f"task_tracker:{msg_id}",
-            json.dumps({"status": "DISPATCHED", "task_id": task.id}),
-            ex=86400,
-        )
+        for uid, raw_head, msg in locked:
+            task_id = str(uuid.uuid4())
+            lock_key = f"{msg['task_name']}:{uid}"
+            pipe.set(lock_key, task_id, ex=3600)
+            pipe.hset(self.PENDING_HASH, task_id, json.dumps({
+                "lock_key": lock_key,
+                "dispatched_at": now,
+                "msg_id": msg["msg_id"],
+            }))
+            pipe.set(
+                f"task_tracker:{msg['msg_id']}",
+                json.dumps({"status": "DISPATCHED", "task_id": task_id}),
+                ex=86400,
+            )
+            batch.append((uid, raw_head, msg, task_id))
         pipe.execute()
+        return batch
 
-    def _dispatch(self, msg_id, msg_data) -> bool:
-        user_id = msg_data["user_id"]
-        task_name = msg_data["task_name"]
-        params = json.loads(msg_data.get("params", "{}"))
-
-        lock_key = f"{task_name}:{user_id}"
-        dispatch_lock = f"dispatch:{msg_id}"
-
-        result = self.redis.eval(
-            LUA_ATOMIC_LOCK, 2,
-            dispatch_lock, lock_key,
-            self.instance_id, str(300), str(3600),
-        )
-
-        if result == 0:
-            return False
-        if result == -1:
-            return False
-
-        try:
-            task = celery_app.send_task(task_name, kwargs=params)
-        except Exception as e:
-            pipe = self.redis.pipeline()
-            pipe.delete(dispatch_lock)
-            pipe.delete(lock_key)
-            pipe.execute()
-            self.errors += 1
-            logger.error(
-                "send_task failed for %s:%s msg=%s: %s",
-                task_name, user_id, msg_id, e, exc_info=True,
-            )
-            return False
+    def _commit_dispatched(self, sent):
+        """Pop dispatched messages from the user queues and roll back failed sends"""
         for attempt in range(2):
             try:
-                self._commit_post_dispatch(lock_key, task, msg_id, dispatch_lock)
+                pipe = self.redis.pipeline()
+                for (uid, raw_head, msg, task_id), task in sent:
+                    msg_id = msg["msg_id"]
+                    dispatch_lock = f"dispatch:{msg_id}"
+                    if isinstance(task, Exception):
+                        pipe.hdel(self.PENDING_HASH, task_id)
+                        pipe.eval(LUA_SAFE_DELETE, 1, f"{msg['task_name']}:{uid}", task_id)
+                        pipe.set(
+                            f"task_tracker:{msg_id}",
+                            json.dumps({"status": "QUEUED", "task_id": None}),
+                            ex=86400,
+                        )
+                        pipe.delete(dispatch_lock)
+                        continue
+                    pipe.delete(dispatch_lock)
+                    pipe.eval(LUA_POP_DISPATCHED, 2, f"{self.USER_QUEUE_PREFIX}{uid}", self.READY_SET, raw_head, uid)
+                pipe.execute()
                 break
             except Exception as e:
-                logger.error(
-                    "Post-dispatch state update failed for %s: %s",
-                    task.id, e, exc_info=True,
-                )
+                logger.error("Post-dispatch state update failed: %s", e, exc_info=True)
                 time.sleep(0.1)
                 self.errors += 1
 
-        self.dispatched += 1
-        logger.info("Task dispatched: %s (msg=%s)", task.id, msg_id)
-        return True
-
     def _process_batch(self, user_ids):
+        """Dispatch the queue heads of the given users: one round trip each to lock, record, send and commit"""
         if not user_ids:
             return
 
         pipe = self.redis.pipeline()
         for uid in user_ids:
-            pipe.lindex(f"{USER_QUEUE_PREFIX}{uid}", 0)
+            pipe.lindex(f"{self.USER_QUEUE_PREFIX}{uid}", 0)
         heads = pipe.execute()
 
-        candidates = []  # (user_id, msg_dict)
+        candidates = []  # (user_id, raw_head, msg_dict)
         empty_users = []
+        bad_users = []
 
         for uid, head in zip(user_ids, heads):
             if head is None:
                 empty_users.append(uid)
             else:
                 try:
-                    candidates.append((uid, json.loads(head)))
+                    candidates.append((uid, head, json.loads(head)))
                 except (json.JSONDecodeError, TypeError) as e:
                     logger.error("Bad message in queue for user %s: %s", uid, e)
-                    self.redis.lpop(f"{USER_QUEUE_PREFIX}{uid}")
+                    bad_users.append(uid)
 
-        if empty_users:
+        if empty_users or bad_users:
             pipe = self.redis.pipeline()
             for uid in empty_users:
-                pipe.srem(ACTIVE_USERS, uid)
+                pipe.srem(self.ACTIVE_USERS, uid)
+            for uid in bad_users:
+                pipe.lpop(f"{self.USER_QUEUE_PREFIX}{uid}")
             pipe.execute()
 
         if not candidates:
             return
 
-        for uid, msg in candidates:
-            queue_key = f"{USER_QUEUE_PREFIX}{uid}"
-            if self._dispatch(msg["msg_id"], msg):
-                self.redis.lpop(queue_key)
-                if self.redis.llen(queue_key) > 0:
-                    self.redis.sadd(READY_SET, uid)
+        pipe = self.redis.pipeline()
+        for uid, _, msg in candidates:
+            pipe.eval(
+                LUA_ATOMIC_LOCK, 2,
+                f"dispatch:{msg['msg_id']}", f"{msg['task_name']}:{uid}",
+                self.instance_id, str(300), str(3600),
+            )
+        # 0: another instance is dispatching this message, -1: the user's task is still running
+        locked = [c for c, result in zip(candidates, pipe.execute()) if result == 1]
+        if not locked:
+            return
 
-    def schedule_loop(self):
-        self._heartbeat()
-        self._cleanup_finished()
+        sent = self._send_tasks(self._prepare_dispatch(locked))
+        self._commit_dispatched(sent)
 
-        ready_users = self.redis.smembers(READY_SET) or set()
+        for (uid, _, msg, _), task in sent:
+            if isinstance(task, Exception):
+                self.errors += 1
+                logger.error(
+                    "send_task failed for %s:%s msg=%s: %s",
+                    msg["task_name"], uid, msg["msg_id"], task,
+                )
+            else:
+                self.dispatched += 1
+                logger.info("Task dispatched: %s (msg=%s)", task.id, msg["msg_id"])
+
+    def _take_ready_users(self):
+        ready_users = self.redis.smembers(self.READY_SET) or set()
         my_users = [uid for uid in ready_users if self._is_mine(uid)]
         if my_users:
-            self.redis.srem(READY_SET, *my_users)
-        else:
-            time.sleep(0.5)
-            return
+            self.redis.srem(self.READY_SET, *my_users)
+        return my_users
+
+    def schedule_loop(self):
+        self._heartbeat()
+
+        # Idle ticks block on the completion stream instead of sleeping, so the next
+        # queued task of a user is dispatched as soon as the previous one finishes
+        my_users = self._take_ready_users()
+        if self._consume_completions(block_ms=None if my_users else IDLE_BLOCK_MS):
+            my_users = list(set(my_users) | set(self._take_ready_users()))
 
         self._process_batch(my_users)
-        time.sleep(0.1)
 
     def _full_scan(self):
         cursor = 0
         ready_batch = []
         while True:
             cursor, user_ids = self.redis.sscan(
-                ACTIVE_USERS, cursor=cursor, count=1000,
+                self.ACTIVE_USERS, cursor=cursor, count=1000,
             )
             if user_ids:
                 my_users = [uid for uid in user_ids if self._is_mine(uid)]
                 if my_users:
                     pipe = self.redis.pipeline()
                     for uid in my_users:
-                        pipe.lindex(f"{USER_QUEUE_PREFIX}{uid}", 0)
+                        pipe.lindex(f"{self.USER_QUEUE_PREFIX}{uid}", 0)
                     heads = pipe.execute()
 
                     for uid, head in zip(my_users, heads):
@@ -442,7 +590,7 @@ class RedisTaskScheduler:
         ]
 
         if ready_uids:
-            self.redis.sadd(READY_SET, *ready_uids)
+            self.redis.sadd(self.READY_SET, *ready_uids)
             logger.info("Full scan found %d ready users", len(ready_uids))
 
     def run_server(self):
@@ -450,7 +598,6 @@ class RedisTaskScheduler:
         self.running = True
 
         last_full_scan = 0.0
-        full_scan_interval = 30.0
 
         logger.info(
             "Scheduler started: instance=%s", self.instance_id,
@@ -461,7 +608,8 @@ class RedisTaskScheduler:
                 self.schedule_loop()
 
                 now = time.time()
-                if now - last_full_scan > full_scan_interval:
+                if now - last_full_scan > SWEEP_INTERVAL:
+                    self._cleanup_finished()
                     self._full_scan()
                     last_full_scan = now
 
@@ -473,9 +621,9 @@ class RedisTaskScheduler:
     def health(self) -> dict:
         return {
             "running": self.running,
-            "active_users": self.redis.scard(ACTIVE_USERS),
-            "ready_users": self.redis.scard(READY_SET),
-            "pending_tasks": self.redis.hlen(PENDING_HASH),
+            "active_users": self.redis.scard(self.ACTIVE_USERS),
+            "ready_users": self.redis.scard(self.READY_SET),
+            "pending_tasks": self.redis.hlen(self.PENDING_HASH),
             "dispatched": self.dispatched,
             "errors": self.errors,
             "shard": f"{self._shard_index}/{self._shard_count}",
@@ -486,13 +634,26 @@ class RedisTaskScheduler:
         logger.info("Scheduler shutting down: instance=%s", self.instance_id)
         self.running = False
         try:
-            self.redis.hdel(REGISTRY_KEY, self.instance_id)
+            self.redis.hdel(self.REGISTRY_KEY, self.instance_id)
         except Exception as e:
             logger.error("Shutdown cleanup error: %s", e)
 
 
 scheduler = RedisTaskScheduler()
 
+
+@task_postrun.connect
+def _signal_completion(task_id=None, task=None, state=None, **kwargs):
+    """Worker side: report the completion of tasks dispatched by the scheduler"""
+    if state not in FINISHED_STATES or not task.request.get(SCHEDULER_HEADER):
+        return
+    try:
+        scheduler.signal_completion(task_id, state)
+    except Exception as e:
+        # The scheduler's fallback sweep still picks the task up from its result
+        logger.warning("Failed to signal completion of %s: %s", task_id, e)
+
+
 if __name__ == "__main__":
     import signal
     import sys
@@ -4,7 +4,7 @@ Celery Worker 入口点
 """
 # 必须在导入任何使用 DashScope SDK 的模块之前应用补丁
 import app.utils.dashscope_patch  # noqa: F401
-from celery.signals import worker_process_init
+from celery.signals import worker_process_init, worker_ready
 from app.celery_app import celery_app
 from app.core.logging_config import LoggingConfig, get_logger
 
@@ -15,6 +15,8 @@ logger.info("Celery worker logging initialized")
 
 # 导入任务模块以注册任务
 import app.tasks
+# 注册任务完成信号：由调度器派发的任务结束时通知 RedisTaskScheduler
+import app.celery_task_scheduler  # noqa: F401
 
 # 导入企业版订阅任务（仅在企业版环境下可用）
 try:
@@ -61,4 +63,25 @@ def _reinit_db_pool(**kwargs):
         logger.warning(f"Failed to recreate libre_office.executor: {e}")
 
 
+
+def _start_metrics_server():
+    from app.core.config import settings
+    if settings.METRICS_ENABLED and settings.METRICS_WORKER_PORT:
+        from app.core.metrics import start_metrics_server
+        start_metrics_server(settings.METRICS_WORKER_PORT, settings.METRICS_WORKER_PORT_RANGE,
+                             host=settings.METRICS_WORKER_HOST)
+
+
+@worker_process_init.connect
+def _start_child_metrics_server(**kwargs):
+    """prefork 子进程各自导出本进程的指标"""
+    _start_metrics_server()
+
+
+@worker_ready.connect
+def _start_main_metrics_server(**kwargs):
+    """threads/solo 池的任务在主进程执行，由主进程导出指标"""
+    _start_metrics_server()
+
+
 __all__ = ['celery_app']
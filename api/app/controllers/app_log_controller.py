@@ -10,7 +10,7 @@ from app.core.response_utils import success
 from app.db import get_db
 from app.dependencies import get_current_user, cur_workspace_access_guard
 from app.schemas.app_log_schema import AppLogConversation, AppLogConversationDetail, AppLogMessage, LogFileInfo
-from app.schemas.response_schema import PageData, PageMeta
+from app.schemas.response_schema import CursorPageData, CursorPageMeta
 from app.services.app_service import AppService
 from app.services.app_log_service import AppLogService
 
@@ -26,6 +26,7 @@ def list_app_logs(
         pagesize: int = Query(20, ge=1, le=100),
         is_draft: Optional[bool] = Query(None, description="是否草稿会话（不传则返回全部）"),
         keyword: Optional[str] = Query(None, description="搜索关键词（匹配消息内容）"),
+        cursor: Optional[str] = Query(None, description="分页游标（上一页返回的 next_cursor，传入时忽略 page）"),
         db: Session = Depends(get_db),
         current_user=Depends(get_current_user),
 ):
@@ -36,6 +37,7 @@ def list_app_logs(
     - is_draft=False 只返回发布会话
     - 支持按 keyword 搜索（匹配消息内容）
     - 按最新更新时间倒序排列
+    - 翻页建议使用 cursor（游标分页，深翻页不变慢）；total 有统计上限，超过时 total_capped=True
     """
     workspace_id = current_user.current_workspace_id
 
@@ -45,19 +47,27 @@ def list_app_logs(
 
     # 使用 Service 层查询
     log_service = AppLogService(db)
-    conversations, total = log_service.list_conversations(
+    result = log_service.list_conversations(
         app_id=app_id,
         workspace_id=workspace_id,
         page=page,
         pagesize=pagesize,
         is_draft=is_draft,
         keyword=keyword,
+        cursor=cursor,
     )
 
-    items = [AppLogConversation.model_validate(c) for c in conversations]
-    meta = PageMeta(page=page, pagesize=pagesize, total=total, hasnext=(page * pagesize) < total)
+    items = [AppLogConversation.model_validate(c) for c in result.items]
+    meta = CursorPageMeta(
+        page=page,
+        pagesize=pagesize,
+        total=result.total,
+        hasnext=result.has_next,
+        next_cursor=result.next_cursor,
+        total_capped=result.total_capped,
+    )
 
-    return success(data=PageData(page=meta, items=items))
+    return success(data=CursorPageData(page=meta, items=items))
 
 
 @router.get("/{app_id}/logs/{conversation_id}", summary="应用日志 - 会话消息详情")
@@ -12,6 +12,10 @@ Intercepts requests to /v1/mcp/* and:
 All identity and configuration is determined server-side from headers —
 the client never passes end_user_id, config_id, or storage_type as tool
 parameters.
+
+Implemented as a pure ASGI middleware: other paths are passed straight
+through, and MCP responses (SSE streams) are not wrapped. The database
+lookups run in the threadpool.
 """
 
 import logging
@@ -20,7 +24,8 @@ from contextvars import ContextVar
 
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from app.core.api_key_auth import extract_api_key_from_request
 from app.core.error_codes import BizCode
@@ -46,7 +51,7 @@ mcp_storage_type: ContextVar[str | None] = ContextVar(
 )
 
 
-class MCPAuthMiddleware(BaseHTTPMiddleware):
+class MCPAuthMiddleware:
     """Middleware that authenticates and resolves context for MCP requests.
 
     Header requirements for /v1/mcp/* requests:
@@ -60,10 +65,31 @@ class MCPAuthMiddleware(BaseHTTPMiddleware):
       - storage_type: from workspace configuration (defaults to "neo4j")
     """
 
-    async def dispatch(self, request: Request, call_next):
-        if not request.url.path.startswith(MCP_PATH_PREFIX):
-            return await call_next(request)
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not scope["path"].startswith(MCP_PATH_PREFIX):
+            await self.app(scope, receive, send)
+            return
+
+        # Synchronous database lookups run off the event loop
+        result = await run_in_threadpool(self._authenticate, Request(scope))
+        if isinstance(result, JSONResponse):
+            await result(scope, receive, send)
+            return
+
+        # ContextVars are set here, not in the worker thread, so the MCP tools see them
+        workspace_id, end_user_id, config_id, storage_type = result
+        mcp_workspace_id.set(workspace_id)
+        mcp_end_user_id.set(end_user_id)
+        mcp_config_id.set(config_id)
+        mcp_storage_type.set(storage_type)
+
+        await self.app(scope, receive, send)
 
+    def _authenticate(self, request: Request):
+        """Resolve the MCP context, or return the error response."""
         # 1. Validate API key
         api_key = extract_api_key_from_request(request)
         if not api_key:
@@ -114,12 +140,7 @@ class MCPAuthMiddleware(BaseHTTPMiddleware):
             # 5. Resolve storage_type from workspace
             storage_type = self._resolve_storage_type(db, workspace_id)
 
-        mcp_workspace_id.set(workspace_id)
-        mcp_end_user_id.set(end_user_id)
-        mcp_config_id.set(config_id)
-        mcp_storage_type.set(storage_type)
-
-        return await call_next(request)
+        return workspace_id, end_user_id, config_id, storage_type
 
     @staticmethod
     def _find_end_user(db, other_id: str, workspace_id: uuid.UUID):
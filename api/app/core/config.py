@@ -101,6 +101,10 @@ class Settings:
     MAX_CHUNK_BATCH_SIZE: int = int(os.getenv("MAX_CHUNK_BATCH_SIZE", "8"))
     FILE_PATH: str = os.getenv("FILE_PATH", "/files")
     FILE_URL_EXPIRES: int = int(os.getenv("FILE_URL_EXPIRES", "3600"))
+    # 多模态附件处理：并发处理的附件数、处理结果缓存时间、进程内编码结果缓存上限
+    MULTIMODAL_FILE_CONCURRENCY: int = int(os.getenv("MULTIMODAL_FILE_CONCURRENCY", "4"))
+    MULTIMODAL_ATTACHMENT_CACHE_TTL: int = int(os.getenv("MULTIMODAL_ATTACHMENT_CACHE_TTL", str(7 * 86400)))
+    MULTIMODAL_ENCODED_CACHE_MB: int = int(os.getenv("MULTIMODAL_ENCODED_CACHE_MB", "64"))
 
     # Storage Configuration
     STORAGE_TYPE: str = os.getenv("STORAGE_TYPE", "local")
@@ -275,6 +279,46 @@ class Settings:
     LAYER2_DEDUP_FULL_SCAN_HOUR: int = TypeAdapter(
         Annotated[int, Field(ge=0, le=23, description="Layer 2 dedup full scan hour, must be 0-23")]
     ).validate_python(int(os.getenv("LAYER2_DEDUP_FULL_SCAN_HOUR", "3")))
+    # 记忆计数器对账：高频处理待对账用户，每天一次全量对账
+    MEMORY_COUNTER_RECONCILE_INTERVAL_MINUTES: int = TypeAdapter(
+        Annotated[int, Field(ge=1, description="memory counter reconcile interval in minutes, must be >= 1")]
+    ).validate_python(int(os.getenv("MEMORY_COUNTER_RECONCILE_INTERVAL_MINUTES", "10")))
+    MEMORY_COUNTER_FULL_RECONCILE_HOUR: int = TypeAdapter(
+        Annotated[int, Field(ge=0, le=23, description="memory counter full reconcile hour, must be 0-23")]
+    ).validate_python(int(os.getenv("MEMORY_COUNTER_FULL_RECONCILE_HOUR", "4")))
+    # 记忆写入队列兜底扫描：为 drainer 失效后遗留的写入派发 drain 任务
+    MEMORY_WRITE_QUEUE_SWEEP_INTERVAL_SECONDS: int = int(os.getenv("MEMORY_WRITE_QUEUE_SWEEP_INTERVAL_SECONDS", "60"))
+    # 应用日志列表总数统计上限（超过时只返回上限值）
+    APP_LOG_COUNT_LIMIT: int = int(os.getenv("APP_LOG_COUNT_LIMIT", "1000"))
+    # 应用统计日汇总：每天重建最近几天（截至昨天），修正批量删除等造成的漂移
+    APP_DAILY_STATS_REBUILD_HOUR: int = TypeAdapter(
+        Annotated[int, Field(ge=0, le=23, description="app daily stats rebuild hour, must be 0-23")]
+    ).validate_python(int(os.getenv("APP_DAILY_STATS_REBUILD_HOUR", "2")))
+    APP_DAILY_STATS_REBUILD_DAYS: int = int(os.getenv("APP_DAILY_STATS_REBUILD_DAYS", "2"))
+    # 记忆维护任务：只处理有变更的用户，按分片并行执行
+    MEMORY_MAINTENANCE_SHARDS: int = int(os.getenv("MEMORY_MAINTENANCE_SHARDS", "8"))
+    MEMORY_MAINTENANCE_BATCH_SIZE: int = int(os.getenv("MEMORY_MAINTENANCE_BATCH_SIZE", "20"))
+    # 遗忘周期依赖时间衰减，超过该天数未处理的用户即使没有新写入也会执行
+    FORGETTING_REVISIT_DAYS: int = int(os.getenv("FORGETTING_REVISIT_DAYS", "7"))
+    # 遗忘周期：并发生成摘要的节点对数量，以及每个写事务融合的节点对数量
+    FORGETTING_SUMMARY_CONCURRENCY: int = int(os.getenv("FORGETTING_SUMMARY_CONCURRENCY", "16"))
+    FORGETTING_MERGE_TX_BATCH_SIZE: int = int(os.getenv("FORGETTING_MERGE_TX_BATCH_SIZE", "200"))
+    # 进程内指标：API 进程仅在配置 METRICS_TOKEN 时注册 /metrics（Bearer 鉴权），
+    # Celery worker 进程在 METRICS_WORKER_HOST 上从 METRICS_WORKER_PORT 起依次占用端口（0 表示不启动），
+    # 默认只监听本机；监听其他地址时必须配置 METRICS_TOKEN
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    METRICS_WORKER_HOST: str = os.getenv("METRICS_WORKER_HOST", "127.0.0.1")
+    METRICS_MAX_SERIES: int = int(os.getenv("METRICS_MAX_SERIES", "500"))
+    METRICS_WORKER_PORT: int = int(os.getenv("METRICS_WORKER_PORT", "0"))
+    METRICS_WORKER_PORT_RANGE: int = int(os.getenv("METRICS_WORKER_PORT_RANGE", "32"))
+    # Memory extraction LLM scheduler (per-model budgets shared by all extraction stages)
+    MEMORY_LLM_MAX_CONCURRENCY: int = int(os.getenv("MEMORY_LLM_MAX_CONCURRENCY", "8"))
+    MEMORY_LLM_TOKENS_PER_MINUTE: int = int(os.getenv("MEMORY_LLM_TOKENS_PER_MINUTE", "0"))
+    MEMORY_LLM_INTERACTIVE_RESERVE: int = int(os.getenv("MEMORY_LLM_INTERACTIVE_RESERVE", "1"))
+    # JSON: {"<model_name>": {"max_concurrency": 4, "tokens_per_minute": 200000}}
+    MEMORY_LLM_MODEL_BUDGETS: str = os.getenv("MEMORY_LLM_MODEL_BUDGETS", "{}")
+
     # Memory Module Configuration (internal)
     
     MEMORY_OUTPUT_DIR: str = os.getenv("MEMORY_OUTPUT_DIR", "logs/memory-output")
@@ -286,6 +330,13 @@ class Settings:
     TOOL_MAX_CONCURRENCY: int = int(os.getenv("TOOL_MAX_CONCURRENCY", "10"))
     ENABLE_TOOL_MANAGEMENT: bool = os.getenv("ENABLE_TOOL_MANAGEMENT", "true").lower() == "true"
 
+    # MCP Session Pool Configuration
+    MCP_POOL_MAX_SESSIONS_PER_SERVER: int = int(os.getenv("MCP_POOL_MAX_SESSIONS_PER_SERVER", "4"))
+    MCP_POOL_MAX_CONCURRENT_PER_SESSION: int = int(os.getenv("MCP_POOL_MAX_CONCURRENT_PER_SESSION", "8"))
+    MCP_POOL_IDLE_TIMEOUT: float = float(os.getenv("MCP_POOL_IDLE_TIMEOUT", "300"))
+    MCP_POOL_HEALTH_CHECK_INTERVAL: float = float(os.getenv("MCP_POOL_HEALTH_CHECK_INTERVAL", "30"))
+    MCP_TOOLS_CACHE_TTL: float = float(os.getenv("MCP_TOOLS_CACHE_TTL", "300"))
+
     # official environment system version
     SYSTEM_VERSION: str = os.getenv("SYSTEM_VERSION", "v0.2.1")
 
@@ -295,6 +346,15 @@ class Settings:
     # workflow config
     WORKFLOW_IMPORT_CACHE_TIMEOUT: int = int(os.getenv("WORKFLOW_IMPORT_CACHE_TIMEOUT", 1800))
     WORKFLOW_NODE_TIMEOUT: int = int(os.getenv("WORKFLOW_NODE_TIMEOUT", 600))
+    # 节点执行记录 write-behind：请求路径只写 Redis，由 Celery 任务批量落库
+    WORKFLOW_NODE_RECORD_WRITE_BEHIND: bool = os.getenv("WORKFLOW_NODE_RECORD_WRITE_BEHIND", "true").lower() == "true"
+    # 单个落库事务包含的执行数
+    WORKFLOW_NODE_RECORD_BATCH_SIZE: int = int(os.getenv("WORKFLOW_NODE_RECORD_BATCH_SIZE", "50"))
+    # input/output 序列化后超过该字节数时上传对象存储，行内只保留引用和预览（0 表示不转存）
+    WORKFLOW_NODE_RECORD_PAYLOAD_LIMIT: int = int(os.getenv("WORKFLOW_NODE_RECORD_PAYLOAD_LIMIT", str(64 * 1024)))
+    WORKFLOW_NODE_RECORD_PREVIEW_CHARS: int = int(os.getenv("WORKFLOW_NODE_RECORD_PREVIEW_CHARS", "1024"))
+    # 兜底落库任务间隔（秒）
+    WORKFLOW_NODE_RECORD_FLUSH_INTERVAL_SECONDS: int = int(os.getenv("WORKFLOW_NODE_RECORD_FLUSH_INTERVAL_SECONDS", "30"))
 
     # ========================================================================
     # General Ontology Type Configuration
@@ -1,30 +1,34 @@
-
 import time
 import json
-from collections import defaultdict
-from typing import Dict, List
+from collections import deque
+from typing import Dict
 from app.core.logging_config import get_agent_logger
+from app.core.metrics import PROBLEM_EXTENSION_DURATION, PROBLEM_EXTENSION_QUESTIONS
 
 logger = get_agent_logger(__name__)
 
+# 慢查询阈值（秒）
+SLOW_QUERY_SECONDS = 10.0
+
+
 class ProblemExtensionMonitor:
-    """Problem_Extension性能监控器"""
+    """Problem_Extension性能监控器
+
+    耗时与问题数记入进程内指标注册表，随 /metrics 导出；这里只保留最近的慢查询明细
+    """
     
     def __init__(self):
-        self.metrics = defaultdict(list)
-        self.slow_queries = []
-        self.error_count = 0
+        self.slow_queries = deque(maxlen=5)
+        self.slow_query_count = 0
         
     def record_execution(self, duration: float, question_count: int, success: bool):
         """记录执行指标"""
-        self.metrics['durations'].append(duration)
-        self.metrics['question_counts'].append(question_count)
-        
-        if not success:
-            self.error_count += 1
+        PROBLEM_EXTENSION_DURATION.observe(duration, "ok" if success else "error")
+        PROBLEM_EXTENSION_QUESTIONS.inc(amount=question_count)
             
         # 记录慢查询（超过10秒）
-        if duration > 10.0:
+        if duration > SLOW_QUERY_SECONDS:
+            self.slow_query_count += 1
             self.slow_queries.append({
                 'duration': duration,
                 'question_count': question_count,
@@ -33,18 +37,19 @@ class ProblemExtensionMonitor:
             
     def get_stats(self) -> Dict:
         """获取统计信息"""
-        durations = self.metrics['durations']
-        if not durations:
+        success_count = PROBLEM_EXTENSION_DURATION.count("ok")
+        error_count = PROBLEM_EXTENSION_DURATION.count("error")
+        total = success_count + error_count
+        if not total:
             return {"message": "暂无数据"}
             
+        total_duration = PROBLEM_EXTENSION_DURATION.sum("ok") + PROBLEM_EXTENSION_DURATION.sum("error")
         return {
-            "total_executions": len(durations),
-            "avg_duration": sum(durations) / len(durations),
-            "max_duration": max(durations),
-            "min_duration": min(durations),
-            "slow_queries_count": len(self.slow_queries),
-            "error_rate": self.error_count / len(durations) if durations else 0,
-            "recent_slow_queries": self.slow_queries[-5:]  # 最近5个慢查询
+            "total_executions": total,
+            "avg_duration": total_duration / total,
+            "slow_queries_count": self.slow_query_count,
+            "error_rate": error_count / total,
+            "recent_slow_queries": list(self.slow_queries)  # 最近5个慢查询
         }
         
     def log_stats(self):
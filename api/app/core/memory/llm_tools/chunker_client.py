@@ -1,7 +1,9 @@
 import asyncio
+import inspect
 import json
 import logging
 import os
+import threading
 from typing import Any, List
 
 import numpy as np
@@ -114,6 +116,114 @@ class HybridChunker:
         return self.semantic_chunker(combined_text)
 
 
+def _build_chunker(chunker_config: ChunkerConfig):
+    """按配置创建分块器（LLMChunker 依赖 LLM 客户端，不在此创建）"""
+    strategy = chunker_config.chunker_strategy
+    chunk_size = chunker_config.chunk_size
+    chunk_overlap = getattr(chunker_config, 'chunk_overlap', 0)
+    if strategy == "TokenChunker":
+        return TokenChunker(
+            tokenizer=getattr(chunker_config, 'tokenizer_or_token_counter', "character"),
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+        )
+    elif strategy == "SemanticChunker":
+        return SemanticChunker(
+            embedding_model=chunker_config.embedding_model,
+            threshold=chunker_config.threshold,
+            chunk_size=chunk_size,
+            min_sentences=chunker_config.min_sentences,
+        )
+    elif strategy == "RecursiveChunker":
+        return RecursiveChunker(
+            rules=RecursiveRules(),
+            min_characters_per_chunk=chunker_config.min_characters_per_chunk or 50,
+            chunk_size=chunk_size,
+        )
+    elif strategy == "LateChunker":
+        return LateChunker(
+            embedding_model=chunker_config.embedding_model,
+            chunk_size=chunk_size,
+            rules=RecursiveRules(),
+            min_characters_per_chunk=chunker_config.min_characters_per_chunk,
+        )
+    elif strategy == "NeuralChunker":
+        return NeuralChunker(
+            model=chunker_config.embedding_model,
+            min_characters_per_chunk=chunker_config.min_characters_per_chunk,
+        )
+    elif strategy == "HybridChunker":
+        return HybridChunker(
+            semantic_threshold=chunker_config.threshold,
+            base_chunk_size=chunk_size,
+        )
+    elif strategy == "SentenceChunker":
+        return SentenceChunker(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            min_sentences_per_chunk=getattr(chunker_config, 'min_sentences_per_chunk', 1),
+            min_characters_per_sentence=getattr(chunker_config, 'min_characters_per_sentence', 12),
+            delim=getattr(chunker_config, 'delim', [".", "!", "?", "\n"]),
+            include_delim=getattr(chunker_config, 'include_delim', "prev"),
+        )
+    raise ValueError(f"Unknown chunker strategy: {strategy}")
+
+
+class SharedChunker:
+    """进程内共享的分块器
+
+    分块器及其嵌入/分段模型只加载一次；chonkie 分块器不保证线程安全，调用在锁内串行执行。
+    """
+
+    def __init__(self, chunker):
+        self.chunker = chunker
+        self._lock = threading.Lock()
+
+    def __call__(self, text: str) -> List[Any]:
+        with self._lock:
+            return self.chunker(text)
+
+    def chunk_batch(self, texts: List[str]) -> List[List[Any]]:
+        """一次锁内完成多段文本的分块"""
+        with self._lock:
+            # chonkie 对支持多进程的分块器每次批量调用都会新建进程池，这里逐段调用
+            if isinstance(self.chunker, TokenChunker):
+                return self.chunker.chunk_batch(texts, batch_size=len(texts), show_progress_bar=False)
+            if not getattr(self.chunker, "chunk_batch", None) or getattr(self.chunker, "_use_multiprocessing", True):
+                return [self.chunker(text) for text in texts]
+            return self.chunker.chunk_batch(texts, show_progress=False)
+
+
+_shared_chunkers: dict[str, SharedChunker] = {}
+_shared_chunkers_lock = threading.Lock()
+_build_locks: dict[str, threading.Lock] = {}
+
+
+def get_shared_chunker(chunker_config: ChunkerConfig) -> SharedChunker:
+    """按分块配置获取进程内共享的分块器，首次使用时创建"""
+    key = chunker_config.model_dump_json()
+    shared = _shared_chunkers.get(key)
+    if shared is not None:
+        return shared
+    with _shared_chunkers_lock:
+        build_lock = _build_locks.setdefault(key, threading.Lock())
+    # 模型加载较慢，按配置加锁，不阻塞其他配置的获取
+    with build_lock:
+        shared = _shared_chunkers.get(key)
+        if shared is None:
+            logger.info(f"Loading shared chunker: {chunker_config.chunker_strategy}")
+            shared = SharedChunker(_build_chunker(chunker_config))
+            _shared_chunkers[key] = shared
+    return shared
+
+
+def clear_shared_chunkers() -> None:
+    """释放共享分块器（测试或重新加载模型时使用）"""
+    with _shared_chunkers_lock:
+        _shared_chunkers.clear()
+        _build_locks.clear()
+
+
 class ChunkerClient:
     def __init__(self, chunker_config: ChunkerConfig, llm_client: OpenAIClient = None):
         self.chunker_config = chunker_config
@@ -126,66 +236,25 @@ class ChunkerClient:
         self.min_characters_per_chunk = chunker_config.min_characters_per_chunk
         self.llm_client = llm_client
 
-        # 可选参数（从配置中安全获取，提供默认值）
-        self.chunk_overlap = getattr(chunker_config, 'chunk_overlap', 0)
-        self.min_sentences_per_chunk = getattr(chunker_config, 'min_sentences_per_chunk', 1)
-        self.min_characters_per_sentence = getattr(chunker_config, 'min_characters_per_sentence', 12)
-        self.delim = getattr(chunker_config, 'delim', [".", "!", "?", "\n"])
-        self.include_delim = getattr(chunker_config, 'include_delim', "prev")
-        self.tokenizer_or_token_counter = getattr(chunker_config, 'tokenizer_or_token_counter', "character")
-
-        # 初始化具体分块器策略
-        if chunker_config.chunker_strategy == "TokenChunker":
-            self.chunker = TokenChunker(
-                tokenizer=self.tokenizer_or_token_counter,
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-            )
-        elif chunker_config.chunker_strategy == "SemanticChunker":
-            self.chunker = SemanticChunker(
-                embedding_model=self.embedding_model,
-                threshold=self.threshold,
-                chunk_size=self.chunk_size,
-                min_sentences=self.min_sentences,
-            )
-        elif chunker_config.chunker_strategy == "RecursiveChunker":
-            self.chunker = RecursiveChunker(
-                rules=RecursiveRules(),
-                min_characters_per_chunk=self.min_characters_per_chunk or 50,
-                chunk_size=self.chunk_size,
-            )
-        elif chunker_config.chunker_strategy == "LateChunker":
-            self.chunker = LateChunker(
-                embedding_model=self.embedding_model,
-                chunk_size=self.chunk_size,
-                rules=RecursiveRules(),
-                min_characters_per_chunk=self.min_characters_per_chunk,
-            )
-        elif chunker_config.chunker_strategy == "NeuralChunker":
-            self.chunker = NeuralChunker(
-                model=self.embedding_model,
-                min_characters_per_chunk=self.min_characters_per_chunk,
-            )
-        elif chunker_config.chunker_strategy == "LLMChunker":
+        # 初始化具体分块器策略：LLMChunker 绑定调用方的 LLM 客户端，其余策略使用进程内共享的分块器
+        if chunker_config.chunker_strategy == "LLMChunker":
             if not llm_client:
                 raise ValueError("LLMChunker requires an LLM client")
             self.chunker = LLMChunker(llm_client, self.chunk_size)
-        elif chunker_config.chunker_strategy == "HybridChunker":
-            self.chunker = HybridChunker(
-                semantic_threshold=self.threshold,
-                base_chunk_size=self.chunk_size,
-            )
-        elif chunker_config.chunker_strategy == "SentenceChunker":
-            self.chunker = SentenceChunker(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap,
-                min_sentences_per_chunk=self.min_sentences_per_chunk,
-                min_characters_per_sentence=self.min_characters_per_sentence,
-                delim=self.delim,
-                include_delim=self.include_delim,
-            )
         else:
-            raise ValueError(f"Unknown chunker strategy: {chunker_config.chunker_strategy}")
+            self.chunker = get_shared_chunker(chunker_config)
+
+    async def _split_texts(self, texts: List[str]) -> List[List[Any]]:
+        """对多段长消息分块，本地模型在线程中执行，不阻塞事件循环"""
+        if not texts:
+            return []
+        if isinstance(self.chunker, SharedChunker):
+            return await asyncio.to_thread(self.chunker.chunk_batch, texts)
+        results = []
+        for text in texts:
+            result = self.chunker(text)
+            results.append(await result if inspect.isawaitable(result) else result)
+        return results
 
     async def generate_chunks(self, dialogue: DialogData):
         """
@@ -198,85 +267,110 @@ class ChunkerClient:
         Raises:
             ValueError: If dialogue has no messages or chunking fails
         """
-        # Validate dialogue has messages
-        if not dialogue.context or not dialogue.context.msgs:
-            raise ValueError(
-                f"Dialogue {dialogue.ref_id} has no messages. "
-                f"Cannot generate chunks from empty dialogue."
-            )
-
-        dialogue.chunks = []
-
-        # 按消息分块：每个消息创建一个或多个 chunk，直接继承角色
-        for msg_idx, msg in enumerate(dialogue.context.msgs):
-            # Validate message has required attributes
-            if not hasattr(msg, 'role') or not hasattr(msg, 'msg'):
-                raise ValueError(
-                    f"Message {msg_idx} in dialogue {dialogue.ref_id} "
-                    f"missing 'role' or 'msg' attribute"
-                )
+        return (await self.generate_chunks_batch([dialogue]))[0]
 
-            msg_content = msg.msg.strip()
+    async def generate_chunks_batch(self, dialogues: List[DialogData]) -> List[DialogData]:
+        """
+        Generate chunks for several dialogues, splitting all long messages in one call.
 
-            # Skip empty messages
-            if not msg_content:
-                continue
+        Raises:
+            ValueError: If a dialogue has no messages or chunking fails
+        """
+        long_messages = []  # (dialogue, msg_idx, content)
+        for dialogue in dialogues:
+            # Validate dialogue has messages
+            if not dialogue.context or not dialogue.context.msgs:
+                raise ValueError(
+                    f"Dialogue {dialogue.ref_id} has no messages. "
+                    f"Cannot generate chunks from empty dialogue."
+                )
+            for msg_idx, msg in enumerate(dialogue.context.msgs):
+                # Validate message has required attributes
+                if not hasattr(msg, 'role') or not hasattr(msg, 'msg'):
+                    raise ValueError(
+                        f"Message {msg_idx} in dialogue {dialogue.ref_id} "
+                        f"missing 'role' or 'msg' attribute"
+                    )
+                msg_content = msg.msg.strip()
+                if len(msg_content) > self.chunk_size:
+                    long_messages.append((dialogue, msg_idx, msg_content))
 
-            # 如果消息太长，可以进一步分块
-            if len(msg_content) > self.chunk_size:
-                # 对单个消息的内容进行分块
+        # 所有对话的长消息一次分块
+        try:
+            split_results = await self._split_texts([content for _, _, content in long_messages])
+        except Exception:
+            split_results = []
+            for dialogue, msg_idx, content in long_messages:
                 try:
-                    sub_chunks = self.chunker(msg_content)
+                    split_results.extend(await self._split_texts([content]))
                 except Exception as e:
                     raise ValueError(
                         f"Failed to chunk long message {msg_idx} in dialogue {dialogue.ref_id}: {e}"
                     )
+        sub_chunks_by_message = {
+            (id(dialogue), msg_idx): sub_chunks
+            for (dialogue, msg_idx, _), sub_chunks in zip(long_messages, split_results)
+        }
 
-                for idx, sub_chunk in enumerate(sub_chunks):
-                    sub_chunk_text = sub_chunk.text if hasattr(sub_chunk, 'text') else str(sub_chunk)
-                    sub_chunk_text = sub_chunk_text.strip()
-
-                    if len(sub_chunk_text) < (self.min_characters_per_chunk or 50):
-                        continue
-
+        for dialogue in dialogues:
+            dialogue.chunks = []
+
+            # 按消息分块：每个消息创建一个或多个 chunk，直接继承角色
+            for msg_idx, msg in enumerate(dialogue.context.msgs):
+                msg_content = msg.msg.strip()
+
+                # Skip empty messages
+                if not msg_content:
+                    continue
+
+                # 如果消息太长，可以进一步分块
+                if len(msg_content) > self.chunk_size:
+                    sub_chunks = sub_chunks_by_message[id(dialogue), msg_idx]
+                    for idx, sub_chunk in enumerate(sub_chunks):
+                        sub_chunk_text = sub_chunk.text if hasattr(sub_chunk, 'text') else str(sub_chunk)
+                        sub_chunk_text = sub_chunk_text.strip()
+
+                        if len(sub_chunk_text) < (self.min_characters_per_chunk or 50):
+                            continue
+
+                        chunk = Chunk(
+                            content=f"{msg.role}: {sub_chunk_text}",
+                            speaker=msg.role,  # 直接继承角色
+                            dialog_at=getattr(msg, "dialog_at", None),
+                            metadata={
+                                "message_index": msg_idx,
+                                "message_role": msg.role,
+                                "sub_chunk_index": idx,
+                                "total_sub_chunks": len(sub_chunks),
+                                "chunker_strategy": self.chunker_config.chunker_strategy,
+                            },
+                            files=msg.files
+                        )
+                        dialogue.chunks.append(chunk)
+                else:
+                    # 消息不长，直接作为一个 chunk
                     chunk = Chunk(
-                        content=f"{msg.role}: {sub_chunk_text}",
+                        content=f"{msg.role}: {msg_content}",
                         speaker=msg.role,  # 直接继承角色
                         dialog_at=getattr(msg, "dialog_at", None),
                         metadata={
                             "message_index": msg_idx,
                             "message_role": msg.role,
-                            "sub_chunk_index": idx,
-                            "total_sub_chunks": len(sub_chunks),
                             "chunker_strategy": self.chunker_config.chunker_strategy,
                         },
                         files=msg.files
                     )
                     dialogue.chunks.append(chunk)
-            else:
-                # 消息不长，直接作为一个 chunk
-                chunk = Chunk(
-                    content=f"{msg.role}: {msg_content}",
-                    speaker=msg.role,  # 直接继承角色
-                    dialog_at=getattr(msg, "dialog_at", None),
-                    metadata={
-                        "message_index": msg_idx,
-                        "message_role": msg.role,
-                        "chunker_strategy": self.chunker_config.chunker_strategy,
-                    },
-                    files=msg.files
-                )
-                dialogue.chunks.append(chunk)
 
-        # Validate we generated at least one chunk
-        if not dialogue.chunks:
-            raise ValueError(
-                f"No valid chunks generated for dialogue {dialogue.ref_id}. "
-                f"All messages were either empty or too short. "
-                f"Messages count: {len(dialogue.context.msgs)}"
-            )
+            # Validate we generated at least one chunk
+            if not dialogue.chunks:
+                raise ValueError(
+                    f"No valid chunks generated for dialogue {dialogue.ref_id}. "
+                    f"All messages were either empty or too short. "
+                    f"Messages count: {len(dialogue.context.msgs)}"
+                )
 
-        return dialogue
+        return dialogues
 
     def evaluate_chunking(self, dialogue: DialogData) -> dict:
         """Evaluate chunking quality."""
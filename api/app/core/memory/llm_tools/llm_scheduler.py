@@ -0,0 +1,472 @@
+"""
+LLM 调用调度器
+
+记忆萃取的各阶段（statement / triplet / sidecar / embedding）都会对每个 chunk
+或 statement 并发发起模型调用。长对话导入时一次性发出上百个请求，既容易触发
+provider 限流，也会挤占共用同一 key 的交互式对话流量。
+
+调度器为每个模型维护：
+- 并发上限（自适应：遇到 429 减半，连续成功后逐步恢复）
+- 每分钟 token 预算（令牌桶）
+- 优先级队列：INTERACTIVE 请求优先放行，且为其预留并发槽位
+- 429 后的冷却期与指数退避重试
+
+调度器在进程内全局共享（见 get_llm_scheduler），与事件循环无关：API 进程的事件循环、
+Celery threads 池中各自 asyncio.run 的任务都使用同一份并发与 token 预算，
+INTERACTIVE 请求可以越过其他循环中排队的 BACKGROUND 请求。调度状态由线程锁保护，
+放行排队请求时通过 call_soon_threadsafe 唤醒其所在的事件循环。
+预算不跨进程共享，多个 worker 进程时需按进程数折算。
+
+用法::
+
+    scheduler = get_llm_scheduler()
+    result = await scheduler.submit(
+        model_key_for(llm_client),
+        lambda: llm_client.chat(messages),
+        priority=LLMPriority.BACKGROUND,
+        estimated_tokens=estimate_tokens(messages),
+    )
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+_RATE_LIMIT_PATTERN = re.compile(r"\b429\b|rate[ _-]?limit|too many requests", re.IGNORECASE)
+
+# 排队请求的兜底轮询间隔（秒）：负责唤醒的事件循环已退出时，由等待方自行重新调度
+_POLL_INTERVAL = 1.0
+
+
+class LLMPriority(IntEnum):
+    """调用优先级，数值越小越优先"""
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+
+@dataclass
+class ModelBudget:
+    """单个模型的调用预算
+
+    Attributes:
+        max_concurrency: 最大并发请求数
+        tokens_per_minute: 每分钟 token 预算，0 表示不限制
+        interactive_reserve: 为 INTERACTIVE 请求预留的并发槽位数
+    """
+    max_concurrency: int = 8
+    tokens_per_minute: int = 0
+    interactive_reserve: int = 1
+
+
+def model_key_for(client: Any) -> str:
+    """根据 LLM / Embedder 客户端生成调度键
+
+    限流通常按 provider + 模型 + API Key 计算，因此三者共同构成键；
+    API Key 只取摘要，避免出现在日志中。
+    """
+    config = getattr(client, "config", None)
+    provider = getattr(client, "provider", None) or getattr(config, "provider", "") or ""
+    model_name = getattr(client, "model_name", None) or getattr(config, "model_name", "") or ""
+    api_key = getattr(client, "api_key", None) or getattr(config, "api_key", "") or ""
+    if not model_name:
+        return f"client:{type(client).__name__}:{id(client)}"
+    key_digest = hashlib.md5(str(api_key).encode()).hexdigest()[:8] if api_key else "-"
+    return f"{provider}:{model_name}:{key_digest}"
+
+
+def estimate_tokens(payload: Any) -> int:
+    """粗略估算请求的 token 数（中英混合文本按约 2 字符/token 计）"""
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        text = payload
+    elif isinstance(payload, (list, tuple)):
+        return sum(estimate_tokens(item) for item in payload)
+    elif isinstance(payload, dict):
+        text = str(payload.get("content", "")) if "content" in payload else json.dumps(payload, ensure_ascii=False, default=str)
+    else:
+        text = str(payload)
+    return max(1, len(text) // 2)
+
+
+def is_rate_limit_error(exc: BaseException) -> bool:
+    """判断异常是否为 provider 限流（HTTP 429）"""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        status = getattr(exc, "status_code", None) or getattr(exc, "status", None)
+        if status is None:
+            response = getattr(exc, "response", None)
+            status = getattr(response, "status_code", None)
+        if status == 429:
+            return True
+        if _RATE_LIMIT_PATTERN.search(str(exc)):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class _TokenBucket:
+    """每分钟 token 预算的令牌桶"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: int) -> float:
+        """返回获得 amount 个 token 需要等待的秒数（0 表示立即可用）"""
+        self._refill()
+        amount = min(float(amount), self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.rate
+
+    def consume(self, amount: int) -> None:
+        self._refill()
+        self.tokens -= min(float(amount), self.capacity)
+
+
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    future: asyncio.Future = field(compare=False)
+    estimated_tokens: int = field(compare=False, default=0)
+    loop: Optional[asyncio.AbstractEventLoop] = field(compare=False, default=None)
+    granted: bool = field(compare=False, default=False)
+    abandoned: bool = field(compare=False, default=False)
+
+
+def _deliver(future: asyncio.Future) -> None:
+    """在等待方的事件循环中完成 future（等待方已取消时由其归还许可）"""
+    if not future.done():
+        future.set_result(None)
+
+
+class _ModelState:
+    """单个模型的调度状态（所有字段的读写都需持有 lock）"""
+
+    def __init__(self, key: str, budget: ModelBudget):
+        self.key = key
+        self.budget = budget
+        self.lock = threading.Lock()
+        self.limit = float(max(1, budget.max_concurrency))
+        self.in_flight = 0
+        self.waiters: List[_Waiter] = []
+        self.bucket = _TokenBucket(budget.tokens_per_minute) if budget.tokens_per_minute > 0 else None
+        self.cooldown_until = 0.0
+        self.consecutive_rate_limits = 0
+        self.successes_since_throttle = 0
+        # 已安排的定时唤醒时间（time.monotonic()），0 表示没有
+        self.wake_at = 0.0
+        # 统计信息
+        self.peak_in_flight = 0
+        self.completed = 0
+        self.rate_limited = 0
+
+    def capacity_for(self, priority: int) -> int:
+        """当前优先级可使用的并发上限"""
+        limit = max(1, int(self.limit))
+        if priority > LLMPriority.INTERACTIVE:
+            return max(1, limit - self.budget.interactive_reserve)
+        return limit
+
+
+class LLMCallScheduler:
+    """按模型限制并发与 token 速率、按优先级排队的调用调度器
+
+    进程内全局共享、可跨事件循环和线程使用，通过 get_llm_scheduler() 获取。
+    """
+
+    def __init__(
+        self,
+        default_budget: Optional[ModelBudget] = None,
+        model_budgets: Optional[Dict[str, ModelBudget]] = None,
+        max_rate_limit_retries: int = 4,
+        backoff_base: float = 1.0,
+        backoff_max: float = 60.0,
+        recovery_successes: int = 5,
+    ):
+        self.default_budget = default_budget or ModelBudget()
+        self.model_budgets = model_budgets or {}
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.recovery_successes = recovery_successes
+        self._states: Dict[str, _ModelState] = {}
+        self._states_lock = threading.Lock()
+        self._seq = itertools.count()
+
+    # ── 状态管理 ──
+
+    def _budget_for(self, key: str) -> ModelBudget:
+        """按完整键或模型名匹配预算配置"""
+        if key in self.model_budgets:
+            return self.model_budgets[key]
+        parts = key.split(":")
+        if len(parts) >= 2 and parts[1] in self.model_budgets:
+            return self.model_budgets[parts[1]]
+        return self.default_budget
+
+    def _state(self, key: str) -> _ModelState:
+        state = self._states.get(key)
+        if state is None:
+            with self._states_lock:
+                state = self._states.get(key)
+                if state is None:
+                    state = _ModelState(key, self._budget_for(key))
+                    self._states[key] = state
+        return state
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """各模型的调度统计（调试/监控用）"""
+        stats = {}
+        for key, state in list(self._states.items()):
+            with state.lock:
+                stats[key] = {
+                    "limit": int(state.limit),
+                    "in_flight": state.in_flight,
+                    "queued": sum(1 for w in state.waiters if not w.abandoned),
+                    "peak_in_flight": state.peak_in_flight,
+                    "completed": state.completed,
+                    "rate_limited": state.rate_limited,
+                }
+        return stats
+
+    # ── 许可获取与释放 ──
+
+    def _dispatch(self, state: _ModelState) -> None:
+        """按优先级放行排队请求，直到并发、token 或冷却期限制（需持有 state.lock）"""
+        now = time.monotonic()
+        if state.cooldown_until > now:
+            self._schedule_wakeup(state, state.cooldown_until - now)
+            return
+
+        while state.waiters:
+            waiter = state.waiters[0]
+            if waiter.abandoned:
+                heapq.heappop(state.waiters)
+                continue
+            if state.in_flight >= state.capacity_for(waiter.priority):
+                return
+            if state.bucket is not None:
+                delay = state.bucket.wait_time(waiter.estimated_tokens)
+                if delay > 0:
+                    self._schedule_wakeup(state, delay)
+                    return
+            heapq.heappop(state.waiters)
+            try:
+                waiter.loop.call_soon_threadsafe(_deliver, waiter.future)
+            except RuntimeError:
+                # 等待方的事件循环已关闭，不再放行
+                continue
+            if state.bucket is not None:
+                state.bucket.consume(waiter.estimated_tokens)
+            waiter.granted = True
+            state.in_flight += 1
+            state.peak_in_flight = max(state.peak_in_flight, state.in_flight)
+
+    def _schedule_wakeup(self, state: _ModelState, delay: float) -> None:
+        """冷却期或 token 预算到期后重新调度：在队首等待方的事件循环上设置定时器（需持有 state.lock）"""
+        wake_at = time.monotonic() + delay
+        if state.wake_at and time.monotonic() < state.wake_at <= wake_at:
+            return
+        state.wake_at = wake_at
+        loop = state.waiters[0].loop if state.waiters else None
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(loop.call_later, max(delay, 0.001), self._wake, state)
+        except RuntimeError:
+            # 事件循环已关闭：由等待方的兜底轮询重新调度
+            state.wake_at = 0.0
+
+    def _wake(self, state: _ModelState) -> None:
+        with state.lock:
+            if state.wake_at <= time.monotonic():
+                state.wake_at = 0.0
+            self._dispatch(state)
+
+    async def _acquire(self, state: _ModelState, priority: int, estimated_tokens: int) -> None:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = _Waiter(int(priority), next(self._seq), future, estimated_tokens, loop)
+        with state.lock:
+            heapq.heappush(state.waiters, waiter)
+            self._dispatch(state)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(asyncio.shield(future), timeout=_POLL_INTERVAL)
+                    return
+                except asyncio.TimeoutError:
+                    with state.lock:
+                        if waiter.granted:
+                            # 许可已放行，完成通知还在路上
+                            continue
+                        self._dispatch(state)
+        except asyncio.CancelledError:
+            with state.lock:
+                waiter.abandoned = True
+                granted = waiter.granted
+            if granted:
+                # 已获得许可但调用方被取消，归还许可
+                self._release(state)
+            raise
+
+    def _release(self, state: _ModelState) -> None:
+        with state.lock:
+            state.in_flight -= 1
+            self._dispatch(state)
+
+    # ── 自适应限流 ──
+
+    def _on_success(self, state: _ModelState) -> None:
+        """需持有 state.lock"""
+        state.completed += 1
+        state.consecutive_rate_limits = 0
+        target = float(max(1, state.budget.max_concurrency))
+        if state.limit < target:
+            state.successes_since_throttle += 1
+            if state.successes_since_throttle >= self.recovery_successes:
+                state.limit = min(target, state.limit + 1)
+                state.successes_since_throttle = 0
+
+    def _on_rate_limited(self, state: _ModelState) -> float:
+        """记录 429：并发减半并进入冷却期，返回退避秒数（需持有 state.lock）"""
+        state.rate_limited += 1
+        state.consecutive_rate_limits += 1
+        state.limit = max(1.0, state.limit / 2)
+        state.successes_since_throttle = 0
+        backoff = min(self.backoff_max, self.backoff_base * (2 ** (state.consecutive_rate_limits - 1)))
+        state.cooldown_until = max(state.cooldown_until, time.monotonic() + backoff)
+        logger.warning(
+            "LLM 调用被限流: model=%s, 并发上限降至 %d, 冷却 %.1fs",
+            state.key, int(state.limit), backoff,
+        )
+        return backoff
+
+    # ── 对外接口 ──
+
+    async def submit(
+        self,
+        model_key: str,
+        call: Callable[[], Awaitable[T]],
+        priority: LLMPriority = LLMPriority.BACKGROUND,
+        estimated_tokens: int = 0,
+    ) -> T:
+        """在模型预算内执行一次调用
+
+        Args:
+            model_key: 调度键，通常由 model_key_for(client) 生成
+            call: 无参协程工厂，每次（重试）执行都会重新调用
+            priority: 调用优先级
+            estimated_tokens: 预估 token 数，用于每分钟 token 预算
+
+        Returns:
+            call() 的返回值
+
+        Raises:
+            call() 抛出的异常；限流重试次数耗尽时抛出最后一次的限流异常
+        """
+        state = self._state(model_key)
+        attempt = 0
+        while True:
+            await self._acquire(state, priority, estimated_tokens)
+            try:
+                result = await call()
+            except Exception as exc:
+                if not is_rate_limit_error(exc):
+                    self._release(state)
+                    raise
+                # 先进入冷却期再归还许可，避免归还时立即放行排队请求再次撞上限流
+                with state.lock:
+                    backoff = self._on_rate_limited(state)
+                self._release(state)
+                if attempt >= self.max_rate_limit_retries:
+                    raise
+                attempt += 1
+                await asyncio.sleep(backoff)
+                continue
+            except BaseException:
+                self._release(state)
+                raise
+            with state.lock:
+                self._on_success(state)
+            self._release(state)
+            return result
+
+
+def _load_model_budgets() -> Dict[str, ModelBudget]:
+    """解析 MEMORY_LLM_MODEL_BUDGETS（JSON：{模型名或调度键: {max_concurrency, tokens_per_minute}}）"""
+    try:
+        raw = json.loads(settings.MEMORY_LLM_MODEL_BUDGETS or "{}")
+    except json.JSONDecodeError as e:
+        logger.error(f"MEMORY_LLM_MODEL_BUDGETS 解析失败: {e}")
+        return {}
+    budgets = {}
+    for name, cfg in raw.items():
+        budgets[name] = ModelBudget(
+            max_concurrency=int(cfg.get("max_concurrency", settings.MEMORY_LLM_MAX_CONCURRENCY)),
+            tokens_per_minute=int(cfg.get("tokens_per_minute", settings.MEMORY_LLM_TOKENS_PER_MINUTE)),
+            interactive_reserve=int(cfg.get("interactive_reserve", settings.MEMORY_LLM_INTERACTIVE_RESERVE)),
+        )
+    return budgets
+
+
+_scheduler: Optional[LLMCallScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_llm_scheduler() -> LLMCallScheduler:
+    """获取进程内共享的 LLM 调用调度器
+
+    所有事件循环和线程共用同一调度器；预算不跨进程协调。
+    """
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = LLMCallScheduler(
+                    default_budget=ModelBudget(
+                        max_concurrency=settings.MEMORY_LLM_MAX_CONCURRENCY,
+                        tokens_per_minute=settings.MEMORY_LLM_TOKENS_PER_MINUTE,
+                        interactive_reserve=settings.MEMORY_LLM_INTERACTIVE_RESERVE,
+                    ),
+                    model_budgets=_load_model_budgets(),
+                )
+    return _scheduler
+
+
+def _after_fork_in_child() -> None:
+    # 子进程不继承父进程的在途计数与排队请求；锁可能在 fork 时被持有，一并重建
+    global _scheduler, _scheduler_lock
+    _scheduler = None
+    _scheduler_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
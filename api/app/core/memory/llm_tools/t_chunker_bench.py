@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import random
+import time
+
+from app.core.memory.llm_tools.chunker_client import ChunkerClient, _build_chunker, clear_shared_chunkers
+from app.core.memory.models.config_models import ChunkerConfig
+from app.core.memory.models.message_models import ConversationContext, ConversationMessage, DialogData
+
+# 对话分块的持续写入吞吐：每个对话新建分块器（原 get_dialogs / PilotRunService 的做法）
+# 对比进程内共享分块器逐个处理、以及一次批量处理多个对话。无法加载模型的策略会被跳过，例如
+#   python -m app.core.memory.llm_tools.t_chunker_bench --dialogs 500 --strategies RecursiveChunker SemanticChunker
+
+SENTENCES = [
+    "我上周去了杭州出差，顺便见了几个老同学。",
+    "会议定在周三下午三点，记得提前准备材料。",
+    "The quarterly report is due next Friday and still needs two more reviews.",
+    "最近在学游泳，每周去两次，感觉体力好多了。",
+    "We moved the deployment to Monday because the staging cluster was down.",
+    "女儿下个月过生日，想给她买一套画画用的工具。",
+]
+
+
+def build_dialogs(count, seed=0):
+    """每个对话若干条消息，其中一部分超过 chunk_size 需要再分块"""
+    rng = random.Random(seed)
+    dialogs = []
+    for i in range(count):
+        msgs = []
+        for j in range(rng.randint(2, 6)):
+            n = rng.choice([1, 2, 40])
+            msgs.append(ConversationMessage(
+                role="user" if j % 2 == 0 else "assistant",
+                msg="".join(rng.choice(SENTENCES) for _ in range(n)),
+            ))
+        dialogs.append(DialogData(context=ConversationContext(msgs=msgs), ref_id=f"dialog-{i}", end_user_id="bench"))
+    return dialogs
+
+
+async def per_dialog_new_chunker(config, dialogs):
+    # 每个对话都重新创建分块器并加载模型
+    for dialog in dialogs:
+        client = ChunkerClient(config)
+        client.chunker = _build_chunker(config)
+        await client.generate_chunks(dialog)
+
+
+async def per_dialog_shared(config, dialogs):
+    for dialog in dialogs:
+        await ChunkerClient(config).generate_chunks(dialog)
+
+
+async def batch_shared(config, dialogs, batch_size):
+    client = ChunkerClient(config)
+    for i in range(0, len(dialogs), batch_size):
+        await client.generate_chunks_batch(dialogs[i:i + batch_size])
+
+
+async def concurrent_shared(config, dialogs, workers):
+    # 多个写入任务并发使用同一个共享分块器
+    async def worker(part):
+        await ChunkerClient(config).generate_chunks_batch(part)
+    await asyncio.gather(*(worker(dialogs[i::workers]) for i in range(workers)))
+
+
+async def main(args):
+    for strategy in args.strategies:
+        config = ChunkerConfig(chunker_strategy=strategy, embedding_model=args.embedding_model,
+                               chunk_size=args.chunk_size, min_characters_per_chunk=50)
+        clear_shared_chunkers()
+        try:
+            start = time.time()
+            ChunkerClient(config)
+            load = time.time() - start
+        except Exception as e:
+            print(f"{strategy}: skipped, {e}")
+            continue
+        print(f"{strategy}: loaded in {load:.2f}s")
+        runs = [
+            ("shared, batch", lambda d: batch_shared(config, d, args.batch_size)),
+            (f"shared, {args.workers} concurrent writers", lambda d: concurrent_shared(config, d, args.workers)),
+            ("shared, per dialog", lambda d: per_dialog_shared(config, d)),
+            ("new chunker per dialog", lambda d: per_dialog_new_chunker(config, d)),
+        ]
+        for name, run in runs:
+            dialogs = build_dialogs(args.dialogs)
+            start = time.time()
+            await run(dialogs)
+            elapsed = time.time() - start
+            print("  {}: {} dialogs in {:.2f}s, {:.1f} dialogs/s, {} chunks".format(
+                name, len(dialogs), elapsed, len(dialogs) / elapsed, sum(len(d.chunks) for d in dialogs)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--dialogs', type=int, default=500, help="Dialogues written per run")
+    parser.add_argument('--batch-size', type=int, default=50, help="Dialogues per batch chunking call")
+    parser.add_argument('--workers', type=int, default=8, help="Concurrent writers sharing one chunker")
+    parser.add_argument('--chunk-size', type=int, default=512)
+    parser.add_argument('--embedding-model', type=str, default="BAAI/bge-m3")
+    parser.add_argument('--strategies', nargs='+', default=[
+        "RecursiveChunker", "SentenceChunker", "TokenChunker", "SemanticChunker", "LateChunker", "NeuralChunker",
+    ])
+    args = parser.parse_args()
+    asyncio.run(main(args))
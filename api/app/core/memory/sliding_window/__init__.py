@@ -17,10 +17,15 @@ def __getattr__(name):
         from app.core.memory.sliding_window.flush_task import FlushTask
 
         return FlushTask
+    if name == "MemoryWriteQueue":
+        from app.core.memory.sliding_window.write_queue import MemoryWriteQueue
+
+        return MemoryWriteQueue
     raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 __all__ = [
     "SlidingWindowScheduler",
     "FlushTask",
+    "MemoryWriteQueue",
 ]
@@ -0,0 +1,491 @@
+"""
+MemoryWriteQueue — per-end_user 写入合并队列
+
+替代原先的 RedisFairLock("memory_write:{end_user_id}") 轮询加锁：
+
+- 写入方把写入任务追加到该用户的 Redis 队列，然后尝试认领 drainer 身份
+- 认领成功者一次取出队列中的全部待写入任务，合并为一次批处理执行
+  （同一对话只跑一次 Layer 2），直到队列为空才释放 drainer
+- 认领失败说明已有 drainer 在处理该用户，任务会被它取走，写入方立即返回
+  （或异步等待完成信号），不占用 worker 槽位轮询，也不会因超时丢弃写入
+- 不同用户的队列互不影响，可并行处理
+
+可靠性：
+- drainer 释放与"队列为空"检查在同一 Lua 脚本中原子完成，
+  写入方先入队后认领，不存在入队后无人处理的窗口
+- 取出的任务先移入 processing 列表，批处理完成后才删除；
+  drainer 进程异常退出时 drainer key 过期，下一个 drainer 先重放 processing
+- drainer 被强杀后若该用户不再写入，由定时任务 sweep_stranded 发现
+  "有待处理任务但无 drainer" 的用户并派发 drain 任务
+- 重放是幂等的：写入候选池（Layer 1）按 job_id 记录，已写入的任务不会重复追加；
+  Layer 2 按 write_cursor 推进，已处理的消息不会再次写入 Neo4j
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 写入任务类型
+JOB_WRITE = "write"  # 追加消息到候选池并执行 Layer 2（API 写入路径）
+JOB_POOL = "pool"  # 仅消费候选池（Agent 对话 / 工作流路径）
+JOB_FLUSH = "flush"  # 兜底写入（FlushTask）
+
+# 原子弹出一批任务到 processing 列表
+_POP_BATCH = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+# 队列为空时才释放 drainer，否则返回 0 由当前 drainer 继续处理
+_RELEASE_IF_EMPTY = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return -1
+end
+if redis.call('LLEN', KEYS[1]) > 0 then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+# 无条件释放（仅持有者可释放），返回剩余队列长度
+_RELEASE = """
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    redis.call('DEL', KEYS[2])
+end
+return redis.call('LLEN', KEYS[1])
+"""
+
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+@dataclass
+class MemoryWriteJob:
+    """单个写入任务"""
+    end_user_id: str
+    conversation_id: str
+    kind: str = JOB_WRITE
+    messages: List[Dict[str, Any]] = field(default_factory=list)
+    config_id: str = ""
+    workspace_id: str = ""
+    language: str = "zh"
+    enforce_window: bool = False
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    enqueued_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps(asdict(self), ensure_ascii=False, default=str)
+
+    @classmethod
+    def from_json(cls, raw: str) -> "MemoryWriteJob":
+        return cls(**json.loads(raw))
+
+
+def to_job_message(message: Any) -> Dict[str, Any]:
+    """提取写入候选池所需的消息字段（MessageItem 或 dict），保证可 JSON 序列化"""
+    if not isinstance(message, dict):
+        message = message.model_dump(exclude_none=True)
+    return {
+        "role": message.get("role", "user"),
+        "content": message.get("content", ""),
+        "dialog_at": message.get("dialog_at"),
+        "files": message.get("files"),
+    }
+
+
+@dataclass
+class WriteOutcome:
+    """submit 的返回结果
+
+    status: done（已写入）/ failed（写入失败）/ queued（已入队，由其他 drainer 处理）
+    """
+    job_id: str
+    status: str
+    error: Optional[str] = None
+    drained: bool = False
+
+
+# 批处理函数：接收同一用户的一批任务，返回 {job_id: 错误信息}（成功的任务不出现）
+BatchProcessor = Callable[[str, List[MemoryWriteJob]], Awaitable[Dict[str, str]]]
+# 队列非空但无 drainer 时的兜底调度（默认派发 Celery drain 任务）
+DrainScheduler = Callable[[str], Awaitable[None]]
+
+
+class MemoryWriteQueue:
+    """per-end_user 写入合并队列（绑定单个事件循环，通过 get_memory_write_queue 获取）"""
+
+    PREFIX = "memory_write"
+
+    def __init__(
+        self,
+        redis_client: aioredis.StrictRedis,
+        processor: Optional[BatchProcessor] = None,
+        schedule_drain: Optional[DrainScheduler] = None,
+        drainer_ttl: int = 600,
+        batch_size: int = 50,
+        done_ttl: int = 3600,
+    ):
+        self.redis = redis_client
+        self.processor = processor or run_memory_write_batch
+        self.schedule_drain = schedule_drain or _dispatch_drain_task
+        self.drainer_ttl = drainer_ttl
+        self.batch_size = max(1, batch_size)
+        self.done_ttl = done_ttl
+
+    def _queue_key(self, end_user_id: str) -> str:
+        return f"{self.PREFIX}:queue:{end_user_id}"
+
+    def _processing_key(self, end_user_id: str) -> str:
+        return f"{self.PREFIX}:processing:{end_user_id}"
+
+    def _drainer_key(self, end_user_id: str) -> str:
+        return f"{self.PREFIX}:drainer:{end_user_id}"
+
+    def _done_key(self, job_id: str) -> str:
+        return f"{self.PREFIX}:done:{job_id}"
+
+    def _applied_key(self, job_id: str) -> str:
+        return f"{self.PREFIX}:applied:{job_id}"
+
+    # ──────────────────────────────────────────────
+    # 公开接口
+    # ──────────────────────────────────────────────
+
+    async def submit(
+        self,
+        job: MemoryWriteJob,
+        wait: bool = False,
+        wait_timeout: float = 120,
+    ) -> WriteOutcome:
+        """提交写入任务
+
+        先入队再尝试认领 drainer：认领成功则就地合并处理该用户的全部待写入任务；
+        否则由当前 drainer 处理。
+
+        Args:
+            job: 写入任务
+            wait: 未认领到 drainer 时是否异步等待本任务完成（API 同步写入路径使用）
+            wait_timeout: 等待超时（秒），超时后任务仍在队列中，不会丢失
+        """
+        end_user_id = job.end_user_id
+        await self.redis.rpush(self._queue_key(end_user_id), job.to_json())
+
+        token = await self._claim(end_user_id)
+        if token is not None:
+            await self._drain_claimed(end_user_id, token)
+
+        if token is None and not wait:
+            return WriteOutcome(job_id=job.job_id, status="queued")
+
+        # 自己 drain 时结果已写入 done key；否则异步等待 drainer 的完成信号
+        timeout = 1 if token is not None else wait_timeout
+        item = await self.redis.blpop([self._done_key(job.job_id)], timeout=max(1, int(timeout)))
+        if item is None:
+            return WriteOutcome(job_id=job.job_id, status="queued", drained=token is not None)
+        result = json.loads(item[1])
+        return WriteOutcome(
+            job_id=job.job_id,
+            status=result["status"],
+            error=result.get("error"),
+            drained=token is not None,
+        )
+
+    async def drain(self, end_user_id: str) -> bool:
+        """尝试认领并处理该用户的队列（Celery drain 任务入口）
+
+        Returns:
+            是否认领到 drainer
+        """
+        token = await self._claim(end_user_id)
+        if token is None:
+            return False
+        await self._drain_claimed(end_user_id, token)
+        return True
+
+    @asynccontextmanager
+    async def exclusive(self, end_user_id: str) -> AsyncIterator[bool]:
+        """非阻塞地独占该用户的写入（反思等维护任务与写入互斥）
+
+        yield 是否独占成功；未成功时调用方应跳过该用户。
+        退出时若期间有写入入队，派发 drain 任务处理，保证写入不丢失。
+        """
+        token = await self._claim(end_user_id)
+        try:
+            yield token is not None
+        finally:
+            if token is not None:
+                remaining = await self.redis.eval(
+                    _RELEASE, 2, self._queue_key(end_user_id), self._drainer_key(end_user_id), token
+                )
+                if remaining:
+                    await self.schedule_drain(end_user_id)
+
+    async def pending_count(self, end_user_id: str) -> int:
+        return await self.redis.llen(self._queue_key(end_user_id))
+
+    async def applied_jobs(self, job_ids: List[str]) -> set:
+        """返回已写入候选池的 job_id（重放时跳过，避免重复追加消息）"""
+        if not job_ids:
+            return set()
+        flags = await self.redis.mget([self._applied_key(job_id) for job_id in job_ids])
+        return {job_id for job_id, flag in zip(job_ids, flags) if flag}
+
+    async def mark_applied(self, job_id: str) -> None:
+        await self.redis.set(self._applied_key(job_id), "1", ex=self.done_ttl)
+
+    async def sweep_stranded(self) -> List[str]:
+        """为有待处理任务但没有 drainer 的用户派发 drain 任务
+
+        drainer 被强杀（SIGKILL、OOM、worker 重启）时只会让 drainer key 过期，
+        queue / processing 中的任务需要由定时任务兜底调度。
+
+        Returns:
+            派发了 drain 任务的 end_user_id 列表
+        """
+        end_user_ids = set()
+        for kind in ("queue", "processing"):
+            prefix = f"{self.PREFIX}:{kind}:"
+            async for key in self.redis.scan_iter(match=f"{prefix}*", count=500):
+                end_user_ids.add(key[len(prefix):])
+        if not end_user_ids:
+            return []
+
+        candidates = sorted(end_user_ids)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for end_user_id in candidates:
+                pipe.exists(self._drainer_key(end_user_id))
+            alive = await pipe.execute()
+
+        stranded = [uid for uid, has_drainer in zip(candidates, alive) if not has_drainer]
+        for end_user_id in stranded:
+            await self.schedule_drain(end_user_id)
+        if stranded:
+            logger.warning(f"[WriteQueue] 派发遗留写入队列的 drain 任务: count={len(stranded)}")
+        return stranded
+
+    # ──────────────────────────────────────────────
+    # 内部实现
+    # ──────────────────────────────────────────────
+
+    async def _claim(self, end_user_id: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        claimed = await self.redis.set(self._drainer_key(end_user_id), token, nx=True, ex=self.drainer_ttl)
+        return token if claimed else None
+
+    async def _renew_loop(self, end_user_id: str, token: str) -> None:
+        """处理期间定期续期 drainer key（进程退出后自然过期）"""
+        interval = self.drainer_ttl / 3
+        while True:
+            await asyncio.sleep(interval)
+            await self.redis.eval(_RENEW, 1, self._drainer_key(end_user_id), token, int(self.drainer_ttl * 1000))
+
+    async def _drain_claimed(self, end_user_id: str, token: str) -> None:
+        """持有 drainer 期间循环处理，直到队列为空并原子释放"""
+        renewal = asyncio.create_task(self._renew_loop(end_user_id, token))
+        try:
+            # 上一个 drainer 异常退出时遗留的任务优先重放
+            leftover = await self.redis.lrange(self._processing_key(end_user_id), 0, -1)
+            if leftover:
+                logger.warning(f"[WriteQueue] 重放未完成的写入任务: end_user_id={end_user_id}, count={len(leftover)}")
+                await self._process(end_user_id, leftover)
+
+            while True:
+                raw_jobs = await self.redis.eval(
+                    _POP_BATCH, 2,
+                    self._queue_key(end_user_id), self._processing_key(end_user_id),
+                    self.batch_size,
+                )
+                if raw_jobs:
+                    await self._process(end_user_id, raw_jobs)
+                    continue
+                released = await self.redis.eval(
+                    _RELEASE_IF_EMPTY, 2, self._queue_key(end_user_id), self._drainer_key(end_user_id), token
+                )
+                if released:
+                    # 1：已释放；-1：drainer key 已过期被他人认领，由新 drainer 接手
+                    return
+        except BaseException:
+            # 异常退出时释放 drainer，剩余任务交给 drain 任务处理
+            remaining = await self.redis.eval(
+                _RELEASE, 2, self._queue_key(end_user_id), self._drainer_key(end_user_id), token
+            )
+            if remaining:
+                await self.schedule_drain(end_user_id)
+            raise
+        finally:
+            renewal.cancel()
+
+    async def _process(self, end_user_id: str, raw_jobs: List[str]) -> None:
+        """执行一批任务，完成信号与清空 processing 列表在同一事务中提交"""
+        jobs = [MemoryWriteJob.from_json(raw) for raw in raw_jobs]
+        logger.info(f"[WriteQueue] 合并处理写入任务: end_user_id={end_user_id}, count={len(jobs)}")
+        try:
+            errors = await self.processor(end_user_id, jobs)
+        except Exception as e:
+            logger.error(f"[WriteQueue] 批处理失败: end_user_id={end_user_id}, err={e}", exc_info=True)
+            errors = {job.job_id: str(e) for job in jobs}
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for job in jobs:
+                error = errors.get(job.job_id)
+                payload = {"status": "failed", "error": error} if error else {"status": "done"}
+                done_key = self._done_key(job.job_id)
+                pipe.rpush(done_key, json.dumps(payload, ensure_ascii=False))
+                pipe.expire(done_key, self.done_ttl)
+            pipe.delete(self._processing_key(end_user_id))
+            await pipe.execute()
+
+
+# ──────────────────────────────────────────────
+# 默认批处理与兜底调度
+# ──────────────────────────────────────────────
+
+
+async def run_memory_write_batch(end_user_id: str, jobs: List[MemoryWriteJob]) -> Dict[str, str]:
+    """合并执行同一用户的一批写入任务
+
+    1. 按入队顺序把各任务的消息追加到候选池（Layer 1）
+    2. 每个对话只执行一次 Layer 2：有 flush 任务时走 FlushTask，
+       否则所有任务都要求窗口约束时才启用 enforce_window
+    3. 整批完成后失效兴趣缓存、同步一次 memory_count
+
+    重放（drainer 崩溃后）时已写入候选池的任务不再追加；flush 任务执行后
+    （无论成功或失败）删除 flush_lock，允许空闲扫描再次派发。
+    """
+    from app.core.memory.sliding_window.flush_task import FlushTask
+    from app.core.memory.sliding_window.window_utils import (
+        ensure_conversation_exists,
+        execute_pending_from_pool,
+        write_batch_to_memory_messages,
+    )
+
+    queue = get_memory_write_queue()
+    errors: Dict[str, str] = {}
+    by_conversation: "OrderedDict[str, List[MemoryWriteJob]]" = OrderedDict()
+    applied = await queue.applied_jobs([job.job_id for job in jobs if job.messages])
+
+    for job in jobs:
+        try:
+            if job.messages and job.job_id not in applied:
+                await ensure_conversation_exists(
+                    conversation_id=job.conversation_id,
+                    workspace_id=job.workspace_id,
+                )
+                await write_batch_to_memory_messages(
+                    conversation_id=job.conversation_id,
+                    messages=job.messages,
+                )
+                await queue.mark_applied(job.job_id)
+            by_conversation.setdefault(job.conversation_id, []).append(job)
+        except Exception as e:
+            logger.error(f"[WriteQueue] 写入候选池失败: job={job.job_id}, conv={job.conversation_id}, err={e}",
+                         exc_info=True)
+            errors[job.job_id] = str(e)
+
+    for conversation_id, conv_jobs in by_conversation.items():
+        latest = conv_jobs[-1]
+        is_flush = any(job.kind == JOB_FLUSH for job in conv_jobs)
+        try:
+            if is_flush:
+                await FlushTask().run(conversation_id)
+            else:
+                await execute_pending_from_pool(
+                    conversation_id=conversation_id,
+                    end_user_id=end_user_id,
+                    config_id=latest.config_id,
+                    workspace_id=latest.workspace_id,
+                    language=latest.language,
+                    enforce_window=all(job.enforce_window for job in conv_jobs),
+                )
+        except Exception as e:
+            logger.error(f"[WriteQueue] 执行 Layer 2 失败: conv={conversation_id}, err={e}", exc_info=True)
+            for job in conv_jobs:
+                errors[job.job_id] = str(e)
+        finally:
+            if is_flush:
+                await _release_flush_lock(queue, conversation_id)
+
+    if by_conversation:
+        await _after_batch(end_user_id)
+    return errors
+
+
+async def _after_batch(end_user_id: str) -> None:
+    """整批写入后的收尾：失效兴趣缓存、同步 memory_count（失败不影响写入结果）"""
+    from app.cache.memory.interest_memory import InterestMemoryCache
+    from app.core.memory.utils.memory_count_utils import sync_end_user_memory_count_from_neo4j
+    from app.repositories.neo4j.neo4j_connector import Neo4jConnector
+
+    for lang in ("zh", "en"):
+        try:
+            await InterestMemoryCache.delete_interest_distribution(end_user_id, lang)
+        except Exception as e:
+            logger.warning(f"[WriteQueue] 失效兴趣缓存失败: end_user_id={end_user_id}, err={e}")
+
+    connector = Neo4jConnector()
+    try:
+        await sync_end_user_memory_count_from_neo4j(end_user_id, connector)
+    except Exception as e:
+        logger.warning(f"[MEMORY_COUNT_SYNC] 同步失败（不影响主流程）: end_user_id={end_user_id}, error={e}")
+    finally:
+        await connector.close()
+
+
+async def _release_flush_lock(queue: MemoryWriteQueue, conversation_id: str) -> None:
+    from app.tasks import FLUSH_LOCK_KEY_PREFIX
+
+    try:
+        await queue.redis.delete(f"{FLUSH_LOCK_KEY_PREFIX}{conversation_id}")
+    except Exception as e:
+        logger.warning(f"[WriteQueue] 删除 flush_lock 失败: conv={conversation_id}, err={e}")
+
+
+async def _dispatch_drain_task(end_user_id: str) -> None:
+    from app.celery_app import celery_app
+
+    celery_app.send_task("app.tasks.drain_memory_write_queue", args=[end_user_id])
+
+
+# 客户端连接绑定事件循环（Celery 任务中的 asyncio.run 会创建新循环），因此每个循环一个队列实例
+_queues: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MemoryWriteQueue]" = weakref.WeakKeyDictionary()
+
+
+def get_memory_write_queue() -> MemoryWriteQueue:
+    """获取当前事件循环的写入队列（与原写入锁一致，使用 CELERY_BACKEND DB）"""
+    loop = asyncio.get_running_loop()
+    queue = _queues.get(loop)
+    if queue is None:
+        redis_client = aioredis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB_CELERY_BACKEND,
+            password=settings.REDIS_PASSWORD or None,
+            decode_responses=True,
+        )
+        queue = MemoryWriteQueue(redis_client)
+        _queues[loop] = queue
+    return queue
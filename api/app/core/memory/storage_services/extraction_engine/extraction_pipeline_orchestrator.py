@@ -20,6 +20,7 @@ import asyncio
 import logging
 from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
+from app.core.memory.llm_tools.llm_scheduler import LLMPriority
 from app.core.memory.models.message_models import DialogData
 from app.core.memory.models.variate_config import ExtractionPipelineConfig
 
@@ -79,6 +80,10 @@ class NewExtractionOrchestrator:
         # 在此初始化避免下游依赖 ``getattr`` 兜底。
         self._last_statement_inputs: Dict[str, Dict[str, "StatementStepInput"]] = {}
 
+        # Pilot runs are previews a user is waiting on; full writes are
+        # background work and yield to interactive calls in the LLM scheduler.
+        priority = LLMPriority.INTERACTIVE if is_pilot_run else LLMPriority.BACKGROUND
+
         # Build shared context for all LLM-based steps
         self.context = StepContext(
             llm_client=llm_client,
@@ -86,6 +91,7 @@ class NewExtractionOrchestrator:
             config=self.config,
             is_pilot_run=is_pilot_run,
             progress_callback=progress_callback,
+            priority=priority,
         )
 
         # ── Critical (main-line) steps ──
@@ -98,6 +104,7 @@ class NewExtractionOrchestrator:
         self.embedding_step = EmbeddingStep(
             embedder_client=embedder_client,
             is_pilot_run=is_pilot_run,
+            priority=priority,
         )
 
         # ── Sidecar steps (auto-discovered via @register decorator) ──
@@ -501,6 +508,9 @@ class NewExtractionOrchestrator:
     ) -> Dict[str, Dict[str, List[StatementStepOutput]]]:
         """Extract statements from all chunks across all dialogs (chunk-level parallel).
 
+        All chunks are submitted at once; the number of in-flight LLM requests
+        is bounded by the shared ``LLMCallScheduler`` inside ``ExtractionStep.run``.
+
         Returns:
             Nested dict: ``{dialog_id: {chunk_id: [StatementStepOutput, ...]}}``
         """
@@ -77,6 +77,29 @@ class DialogueChunker:
             logger.error(f"Failed to initialize DialogueChunker: {e}", exc_info=True)
             raise
 
+    @staticmethod
+    def _validate_dialogue(dialogue: DialogData) -> None:
+        """Raise ValueError if the dialogue has no messages to chunk."""
+        if not dialogue:
+            raise ValueError("dialogue cannot be None")
+
+        if not dialogue.context or not dialogue.context.msgs:
+            raise ValueError(
+                f"Dialogue {dialogue.ref_id} has no messages to chunk. "
+                f"Context: {dialogue.context is not None}, "
+                f"Messages: {len(dialogue.context.msgs) if dialogue.context else 0}"
+            )
+
+    def _validate_chunks(self, dialogue: DialogData, chunks: List[Chunk]) -> None:
+        """Raise ValueError if chunking produced nothing for the dialogue."""
+        if not chunks:
+            raise ValueError(
+                f"Chunking failed: No chunks generated for dialogue {dialogue.ref_id}. "
+                f"Messages: {len(dialogue.context.msgs)}, "
+                f"Content length: {len(dialogue.content) if dialogue.content else 0}, "
+                f"Strategy: {self.chunker_config.chunker_strategy}"
+            )
+
     async def process_dialogue(self, dialogue: DialogData) -> List[Chunk]:
         """Process a dialogue by generating chunks and adding them to the DialogData object.
 
@@ -91,16 +114,8 @@ class DialogueChunker:
             Exception: If chunking process encounters an error
         """
         # Validate input
-        if not dialogue:
-            raise ValueError("dialogue cannot be None")
-        
-        if not dialogue.context or not dialogue.context.msgs:
-            raise ValueError(
-                f"Dialogue {dialogue.ref_id} has no messages to chunk. "
-                f"Context: {dialogue.context is not None}, "
-                f"Messages: {len(dialogue.context.msgs) if dialogue.context else 0}"
-            )
-        
+        self._validate_dialogue(dialogue)
+
         logger.debug(
             f"Processing dialogue {dialogue.ref_id} with {len(dialogue.context.msgs)} messages "
             f"using strategy: {self.chunker_strategy}"
@@ -112,13 +127,7 @@ class DialogueChunker:
             chunks = result_dialogue.chunks
 
             # Validate results
-            if not chunks or len(chunks) == 0:
-                raise ValueError(
-                    f"Chunking failed: No chunks generated for dialogue {dialogue.ref_id}. "
-                    f"Messages: {len(dialogue.context.msgs)}, "
-                    f"Content length: {len(dialogue.content) if dialogue.content else 0}, "
-                    f"Strategy: {self.chunker_config.chunker_strategy}"
-                )
+            self._validate_chunks(dialogue, chunks)
 
             logger.info(
                 f"Successfully generated {len(chunks)} chunks for dialogue_id: {dialogue.ref_id}. "
@@ -137,6 +146,49 @@ class DialogueChunker:
             )
             raise
 
+    async def process_dialogues(self, dialogues: List[DialogData]) -> List[List[Chunk]]:
+        """Process several dialogues in one chunking call.
+
+        Long messages of all dialogues are split in a single batch on the shared chunker.
+
+        Args:
+            dialogues: The DialogData objects to process
+
+        Returns:
+            A list of Chunk lists, one per dialogue
+
+        Raises:
+            ValueError: If a dialogue is invalid or chunking fails
+        """
+        if not dialogues:
+            return []
+        for dialogue in dialogues:
+            self._validate_dialogue(dialogue)
+
+        logger.debug(
+            f"Processing {len(dialogues)} dialogues using strategy: {self.chunker_strategy}"
+        )
+
+        try:
+            result_dialogues = await self.chunker_client.generate_chunks_batch(dialogues)
+        except ValueError:
+            raise
+        except Exception as e:
+            logger.error(
+                f"Error processing {len(dialogues)} dialogues with strategy {self.chunker_strategy}: {e}",
+                exc_info=True
+            )
+            raise
+
+        for dialogue in result_dialogues:
+            self._validate_chunks(dialogue, dialogue.chunks)
+
+        logger.info(
+            f"Successfully generated {sum(len(d.chunks) for d in result_dialogues)} chunks "
+            f"for {len(result_dialogues)} dialogues"
+        )
+        return [d.chunks for d in result_dialogues]
+
     def save_chunking_results(
         self, 
         chunks: List[Chunk], 
@@ -5,6 +5,10 @@ Provides the unified paradigm for all LLM extraction stages:
 
 Critical steps retry on failure with exponential backoff.
 Sidecar (non-critical) steps return a default output on failure without retry.
+
+Every ``call_llm`` goes through the shared ``LLMCallScheduler`` so that the
+per-chunk fan-out of all stages stays within per-model concurrency and
+token budgets (and backs off on provider 429s).
 """
 
 import asyncio
@@ -13,6 +17,13 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Any, Generic, Optional, TypeVar
 
+from app.core.memory.llm_tools.llm_scheduler import (
+    LLMPriority,
+    estimate_tokens,
+    get_llm_scheduler,
+    model_key_for,
+)
+
 logger = logging.getLogger(__name__)
 
 InputT = TypeVar("InputT")
@@ -63,6 +74,7 @@ class StepContext:
         config: Pipeline configuration object (ExtractionPipelineConfig).
         is_pilot_run: When True, run in lightweight preview mode.
         progress_callback: Optional callable for reporting progress.
+        priority: Scheduling priority for LLM calls made by the steps.
     """
 
     llm_client: Any
@@ -70,6 +82,7 @@ class StepContext:
     config: Any
     is_pilot_run: bool = False
     progress_callback: Optional[Any] = None
+    priority: LLMPriority = LLMPriority.BACKGROUND
 
 
 class ExtractionStep(ABC, Generic[InputT, OutputT]):
@@ -188,7 +201,7 @@ class ExtractionStep(ABC, Generic[InputT, OutputT]):
         for attempt in range(attempts):
             try:
                 prompt = await self.render_prompt(input_data)
-                raw_response = await self.call_llm(prompt)
+                raw_response = await self._scheduled_call_llm(prompt)
                 parsed = await self.parse_response(raw_response, input_data)
                 result = await self.post_process(parsed, input_data)
                 return result
@@ -211,6 +224,15 @@ class ExtractionStep(ABC, Generic[InputT, OutputT]):
         # All attempts exhausted — delegate to failure handler
         return self.on_failure(last_error)  # type: ignore[arg-type]
 
+    async def _scheduled_call_llm(self, prompt: Any) -> Any:
+        """Run ``call_llm`` within the shared per-model LLM budget."""
+        return await get_llm_scheduler().submit(
+            model_key_for(self.llm_client),
+            lambda: self.call_llm(prompt),
+            priority=self.context.priority,
+            estimated_tokens=estimate_tokens(prompt),
+        )
+
     def on_failure(self, error: Exception) -> OutputT:
         """Handle step failure.
 
@@ -12,6 +12,12 @@ import asyncio
 import logging
 from typing import Any, Dict, List
 
+from app.core.memory.llm_tools.llm_scheduler import (
+    LLMPriority,
+    get_llm_scheduler,
+    model_key_for,
+)
+
 from .schema import EmbeddingStepInput, EmbeddingStepOutput
 
 logger = logging.getLogger(__name__)
@@ -33,10 +39,12 @@ class EmbeddingStep:
         embedder_client: Any,
         is_pilot_run: bool = False,
         batch_size: int = 100,
+        priority: LLMPriority = LLMPriority.BACKGROUND,
     ) -> None:
         self.embedder_client = embedder_client
         self.is_pilot_run = is_pilot_run
         self.batch_size = batch_size
+        self.priority = priority
 
     @property
     def name(self) -> str:
@@ -106,17 +114,25 @@ class EmbeddingStep:
             return []
         return await self._batch_embed(texts)
 
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a single batch within the shared per-model budget."""
+        return await get_llm_scheduler().submit(
+            model_key_for(self.embedder_client),
+            lambda: self.embedder_client.response(texts),
+            priority=self.priority,
+        )
+
     async def _batch_embed(self, texts: List[str]) -> List[List[float]]:
         """Call the embedder in batches of ``self.batch_size``."""
         if len(texts) <= self.batch_size:
-            return await self.embedder_client.response(texts)
+            return await self._embed_batch(texts)
 
         batches = [
             texts[i : i + self.batch_size]
             for i in range(0, len(texts), self.batch_size)
         ]
         batch_results = await asyncio.gather(
-            *(self.embedder_client.response(b) for b in batches)
+            *(self._embed_batch(b) for b in batches)
         )
         embeddings: List[List[float]] = []
         for result in batch_results:
@@ -14,10 +14,12 @@ Classes:
     ForgettingScheduler: 遗忘调度器，提供遗忘周期管理功能
 """
 
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from uuid import UUID
 
+from app.core.config import settings
 from app.core.utils.datetime_utils import to_iso_z, utcnow_naive
 from app.core.memory.storage_services.forgetting_engine.forgetting_strategy import ForgettingStrategy
 from app.core.memory.utils.memory_count_utils import sync_end_user_memory_count_from_neo4j
@@ -37,21 +39,27 @@ class ForgettingScheduler:
     1. 运行遗忘周期：识别可遗忘节点并批量融合
     2. 优先级排序：优先处理激活值最低的节点对
     3. 批量限制：限制单次处理的节点对数量
-    4. 进度跟踪：每完成 10% 记录一次日志
-    5. 遗忘报告：生成详细的执行报告
+    4. 并发摘要与批量写入：LLM 客户端每个周期只获取一次，摘要有界并发生成，
+       融合按批次在一个写事务内完成
+    5. 进度跟踪：每完成一个写入批次记录一次日志
+    6. 遗忘报告：生成详细的执行报告
     
     注意：定期调度功能已迁移到 Celery Beat 定时任务
     
     Attributes:
         forgetting_strategy: 遗忘策略执行器实例
         connector: Neo4j 连接器实例
+        summary_concurrency: 并发生成摘要的节点对数量
+        merge_tx_batch_size: 每个写事务融合的节点对数量
         is_running: 是否正在运行遗忘周期
     """
     
     def __init__(
         self,
         forgetting_strategy: ForgettingStrategy,
-        connector: Neo4jConnector
+        connector: Neo4jConnector,
+        summary_concurrency: Optional[int] = None,
+        merge_tx_batch_size: Optional[int] = None
     ):
         """
         初始化遗忘调度器
@@ -59,9 +67,13 @@ class ForgettingScheduler:
         Args:
             forgetting_strategy: 遗忘策略执行器实例
             connector: Neo4j 连接器实例
+            summary_concurrency: 并发生成摘要的节点对数量（默认 settings.FORGETTING_SUMMARY_CONCURRENCY）
+            merge_tx_batch_size: 每个写事务融合的节点对数量（默认 settings.FORGETTING_MERGE_TX_BATCH_SIZE）
         """
         self.forgetting_strategy = forgetting_strategy
         self.connector = connector
+        self.summary_concurrency = max(1, summary_concurrency or settings.FORGETTING_SUMMARY_CONCURRENCY)
+        self.merge_tx_batch_size = max(1, merge_tx_batch_size or settings.FORGETTING_MERGE_TX_BATCH_SIZE)
         self.is_running = False
         
         logger.info("初始化遗忘调度器")
@@ -181,11 +193,8 @@ class ForgettingScheduler:
                 f"(限制: {max_merge_batch_size})"
             )
             
-            # 步骤5：批量融合节点，每 10% 记录进度
-            merged_count = 0
-            failed_count = 0
+            # 步骤5：批量融合节点，每个写入批次记录进度
             skipped_count = 0  # 跳过的节点对数量（节点已被处理）
-            progress_interval = max(1, actual_batch_size // 10)  # 每 10% 记录一次
             
             # 跟踪已处理的节点 ID，避免重复处理
             processed_statement_ids = set()
@@ -217,66 +226,13 @@ class ForgettingScheduler:
             
             # 更新实际处理的批次大小
             actual_batch_size = len(unique_pairs)
-            progress_interval = max(1, actual_batch_size // 10)  # 重新计算进度间隔
             
-            for idx, pair in enumerate(unique_pairs, start=1):
-                statement_id = pair['statement_id']
-                entity_id = pair['entity_id']
-                
-                try:
-                    # 准备节点数据
-                    statement_node = {
-                        'statement_id': statement_id,
-                        'statement_text': pair['statement_text'],
-                        'statement_activation': pair['statement_activation'],
-                        'statement_importance': pair['statement_importance'],
-                        'end_user_id': end_user_id
-                    }
-                    
-                    entity_node = {
-                        'entity_id': entity_id,
-                        'entity_name': pair['entity_name'],
-                        'entity_type': pair['entity_type'],
-                        'entity_activation': pair['entity_activation'],
-                        'entity_importance': pair['entity_importance'],
-                        'end_user_id': end_user_id
-                    }
-                    
-                    # 融合节点
-                    await self.forgetting_strategy.merge_nodes_to_summary(
-                        statement_node=statement_node,
-                        entity_node=entity_node,
-                        config_id=config_id,
-                        db=db
-                    )
-                    
-                    merged_count += 1
-                    
-                    # 进度跟踪：每 10% 记录一次
-                    if actual_batch_size > 0 and (idx % progress_interval == 0 or idx == actual_batch_size):
-                        progress_pct = (idx / actual_batch_size) * 100
-                        logger.info(
-                            f"遗忘进度: {idx}/{actual_batch_size} "
-                            f"({progress_pct:.1f}%), "
-                            f"已融合: {merged_count}, 失败: {failed_count}"
-                        )
-                
-                except Exception as e:
-                    failed_count += 1
-                    # 检查是否是节点不存在的错误
-                    if "nodes may not exist" in str(e):
-                        logger.warning(
-                            f"节点对 ({idx}/{actual_batch_size}) 的节点不存在（可能已被其他操作删除）: "
-                            f"Statement[{statement_id}] + Entity[{entity_id}]"
-                        )
-                    else:
-                        logger.error(
-                            f"融合节点对失败 ({idx}/{actual_batch_size}): "
-                            f"Statement[{statement_id}] + Entity[{entity_id}], "
-                            f"错误: {str(e)}"
-                        )
-                    # 继续处理剩余节点
-                    continue
+            merged_count, failed_count = await self._merge_pairs(
+                unique_pairs,
+                end_user_id=end_user_id,
+                config_id=config_id,
+                db=db
+            )
             
             # 步骤6：统计遗忘后的节点数量
             nodes_after = await self._count_knowledge_nodes(end_user_id)
@@ -345,6 +301,101 @@ class ForgettingScheduler:
     
     # ==================== 私有辅助方法 ====================
     
+    async def _merge_pairs(
+        self,
+        pairs: List[Dict[str, Any]],
+        end_user_id: Optional[str] = None,
+        config_id: Optional[UUID] = None,
+        db = None
+    ) -> tuple[int, int]:
+        """
+        融合去重后的节点对
+        
+        LLM 客户端只获取一次；每批节点对并发生成摘要（受 summary_concurrency 限制），
+        再按原顺序在一个写事务内融合。单个节点对失败只计入失败数。
+        
+        Args:
+            pairs: 去重后的可遗忘节点对（按激活值升序）
+            end_user_id: 组 ID
+            config_id: 配置ID（可选，用于获取 llm_id）
+            db: 数据库会话（可选，用于获取 llm_id）
+        
+        Returns:
+            tuple[int, int]: (融合成功数, 失败数)
+        """
+        total = len(pairs)
+        merged_count = 0
+        failed_count = 0
+        if total == 0:
+            return merged_count, failed_count
+        
+        llm_client = await self.forgetting_strategy.resolve_llm_client(config_id, db)
+        semaphore = asyncio.Semaphore(self.summary_concurrency)
+        
+        async def prepare(pair):
+            statement_node = {
+                'statement_id': pair['statement_id'],
+                'statement_text': pair['statement_text'],
+                'statement_activation': pair['statement_activation'],
+                'statement_importance': pair['statement_importance'],
+                'end_user_id': end_user_id
+            }
+            entity_node = {
+                'entity_id': pair['entity_id'],
+                'entity_name': pair['entity_name'],
+                'entity_type': pair['entity_type'],
+                'entity_activation': pair['entity_activation'],
+                'entity_importance': pair['entity_importance'],
+                'end_user_id': end_user_id
+            }
+            async with semaphore:
+                return await self.forgetting_strategy.prepare_merge(statement_node, entity_node, llm_client)
+        
+        for start in range(0, total, self.merge_tx_batch_size):
+            batch = pairs[start:start + self.merge_tx_batch_size]
+            prepared = await asyncio.gather(*(prepare(pair) for pair in batch), return_exceptions=True)
+            
+            merges = []
+            for pair, merge in zip(batch, prepared):
+                if isinstance(merge, Exception):
+                    failed_count += 1
+                    logger.error(
+                        f"准备融合节点对失败: "
+                        f"Statement[{pair['statement_id']}] + Entity[{pair['entity_id']}], "
+                        f"错误: {str(merge)}"
+                    )
+                else:
+                    merges.append(merge)
+            
+            results = await self.forgetting_strategy.apply_merges(merges) if merges else {}
+            for merge in merges:
+                error = results.get(merge['summary_id'])
+                if error is None:
+                    merged_count += 1
+                    continue
+                failed_count += 1
+                # 检查是否是节点不存在的错误
+                if "nodes may not exist" in str(error):
+                    logger.warning(
+                        f"节点对的节点不存在（可能已被其他操作删除）: "
+                        f"Statement[{merge['statement_id']}] + Entity[{merge['entity_id']}]"
+                    )
+                else:
+                    logger.error(
+                        f"融合节点对失败: "
+                        f"Statement[{merge['statement_id']}] + Entity[{merge['entity_id']}], "
+                        f"错误: {str(error)}"
+                    )
+            
+            done = min(start + self.merge_tx_batch_size, total)
+            logger.info(
+                f"遗忘进度: {done}/{total} "
+                f"({done / total * 100:.1f}%), "
+                f"已融合: {merged_count}, 失败: {failed_count}"
+            )
+        
+        return merged_count, failed_count
+    
     async def _count_knowledge_nodes(
         self,
         end_user_id: Optional[str] = None
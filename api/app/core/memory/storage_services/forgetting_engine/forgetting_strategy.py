@@ -16,13 +16,126 @@ from typing import List, Dict, Any, Optional
 from uuid import UUID
 from datetime import datetime, timedelta
 
+from app.cache.memory.memory_counters import MemoryCounterCache, counter_deltas, merge_deltas
 from app.core.utils.datetime_utils import to_iso_z, utcnow_naive
-from app.repositories.neo4j.neo4j_connector import Neo4jConnector
+from app.repositories.neo4j.neo4j_connector import Neo4jConnector, summary_counters
 from app.core.memory.storage_services.forgetting_engine.actr_calculator import ACTRCalculator
 
 
 logger = logging.getLogger(__name__)
 
+# 调用方未传入 LLM 客户端时按 config_id 查询（None 表示明确不使用 LLM）
+_UNRESOLVED = object()
+
+# 按顺序执行每个节点对的融合：CALL 子查询逐行执行，后面的节点对能看到前面的写入，
+# 节点不存在的节点对不返回结果
+_MERGE_QUERY = """
+UNWIND $merges AS m
+CALL (m) {
+    // 首先检查节点是否存在
+    OPTIONAL MATCH (s:Statement {id: m.statement_id})
+    OPTIONAL MATCH (e:ExtractedEntity {id: m.entity_id})
+
+    // 如果任一节点不存在，直接返回 null（不执行后续操作）
+    WITH m, s, e
+    WHERE s IS NOT NULL AND e IS NOT NULL
+
+    // 创建 MemorySummary 节点
+    CREATE (ms:MemorySummary {
+        id: m.summary_id,
+        summary: m.summary_text,
+        name: m.title,
+        memory_type: m.episodic_type,
+        original_statement_id: m.statement_id,
+        original_entity_id: m.entity_id,
+        activation_value: m.inherited_activation,
+        importance_score: m.inherited_importance,
+        access_history: [m.current_time],
+        last_access_time: m.current_time,
+        access_count: 1,
+        version: 1,
+        end_user_id: m.end_user_id,
+        created_at: datetime(m.current_time),
+        merged_at: datetime(m.current_time)
+    })
+
+    // 转移 Statement 的出边到 MemorySummary（只转移目标节点仍存在的边）
+    WITH ms, s, e
+    CALL (ms, s, e) {
+        OPTIONAL MATCH (s)-[r_out]->(target)
+        WHERE target <> e AND r_out IS NOT NULL AND target IS NOT NULL
+        FOREACH (_ IN CASE WHEN target IS NOT NULL THEN [1] ELSE [] END |
+            MERGE (ms)-[new_rel:DERIVED_FROM]->(target)
+            ON CREATE SET 
+                new_rel = properties(r_out),
+                new_rel.original_relationship_type = type(r_out),
+                new_rel.merged_from_statement = true,
+                new_rel.merge_count = 1
+            ON MATCH SET
+                new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
+        )
+    }
+
+    // 转移 Statement 的入边到 MemorySummary（只转移源节点仍存在的边）
+    WITH ms, s, e
+    CALL (ms, s, e) {
+        OPTIONAL MATCH (source)-[r_in]->(s)
+        WHERE r_in IS NOT NULL AND source IS NOT NULL
+        FOREACH (_ IN CASE WHEN source IS NOT NULL THEN [1] ELSE [] END |
+            MERGE (source)-[new_rel:DERIVED_FROM]->(ms)
+            ON CREATE SET 
+                new_rel = properties(r_in),
+                new_rel.original_relationship_type = type(r_in),
+                new_rel.merged_from_statement = true,
+                new_rel.merge_count = 1
+            ON MATCH SET
+                new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
+        )
+    }
+
+    // 转移 Entity 的出边到 MemorySummary（只转移目标节点仍存在的边）
+    WITH ms, s, e
+    CALL (ms, s, e) {
+        OPTIONAL MATCH (e)-[r_out]->(target)
+        WHERE target <> s AND r_out IS NOT NULL AND target IS NOT NULL
+        FOREACH (_ IN CASE WHEN target IS NOT NULL THEN [1] ELSE [] END |
+            MERGE (ms)-[new_rel:DERIVED_FROM]->(target)
+            ON CREATE SET 
+                new_rel = properties(r_out),
+                new_rel.original_relationship_type = type(r_out),
+                new_rel.merged_from_entity = true,
+                new_rel.merge_count = 1
+            ON MATCH SET
+                new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
+        )
+    }
+
+    // 转移 Entity 的入边到 MemorySummary（只转移源节点仍存在的边）
+    WITH ms, s, e
+    CALL (ms, s, e) {
+        OPTIONAL MATCH (source)-[r_in]->(e)
+        WHERE source <> s AND r_in IS NOT NULL AND source IS NOT NULL
+        FOREACH (_ IN CASE WHEN source IS NOT NULL THEN [1] ELSE [] END |
+            MERGE (source)-[new_rel:DERIVED_FROM]->(ms)
+            ON CREATE SET 
+                new_rel = properties(r_in),
+                new_rel.original_relationship_type = type(r_in),
+                new_rel.merged_from_entity = true,
+                new_rel.merge_count = 1
+            ON MATCH SET
+                new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
+        )
+    }
+
+    // 删除原始节点
+    WITH ms, s, e
+    DETACH DELETE s, e
+
+    RETURN ms.id AS summary_id
+}
+RETURN summary_id
+"""
+
 
 class ForgettingStrategy:
     """
@@ -179,17 +292,18 @@ class ForgettingStrategy:
         statement_node: Dict[str, Any],
         entity_node: Dict[str, Any],
         config_id: Optional[UUID] = None,
-        db = None
+        db = None,
+        llm_client: Any = _UNRESOLVED
     ) -> str:
         """
         将 Statement 和 Entity 节点融合为 MemorySummary 节点
-        
+
         融合过程：
         1. 生成摘要内容（使用 LLM 或简单拼接）
         2. 创建 MemorySummary 节点，继承较高的激活值和重要性分数
         3. 删除原始 Statement 和 Entity 节点
         4. 保留溯源信息（original_statement_id, original_entity_id）
-        
+
         Args:
             statement_node: Statement 节点数据，必须包含：
                 - statement_id: 节点 ID
@@ -204,14 +318,59 @@ class ForgettingStrategy:
                 - entity_importance: 重要性分数
             config_id: 配置ID（可选，用于获取 llm_id）
             db: 数据库会话（可选，用于获取 llm_id）
-        
+            llm_client: 已获取的 LLM 客户端（可选，传入时不再按 config_id 查询，None 表示不使用 LLM）
+
         Returns:
             str: 创建的 MemorySummary 节点 ID
-        
+
         Raises:
             ValueError: 如果节点数据不完整
             RuntimeError: 如果融合操作失败
         """
+        if llm_client is _UNRESOLVED:
+            llm_client = await self.resolve_llm_client(config_id, db)
+
+        merge = await self.prepare_merge(statement_node, entity_node, llm_client)
+        error = (await self.apply_merges([merge]))[merge['summary_id']]
+        if error is not None:
+            raise error
+        return merge['summary_id']
+
+    async def resolve_llm_client(self, config_id: Optional[UUID] = None, db = None):
+        """
+        按配置获取 LLM 客户端，遗忘周期开始时调用一次，供所有节点对共用
+
+        Returns:
+            LLM 客户端实例，未配置或获取失败时返回 None
+        """
+        if config_id is None or db is None:
+            return None
+        try:
+            return await self._get_llm_client(db, config_id)
+        except Exception as e:
+            logger.warning(f"获取 LLM 客户端失败: {str(e)}")
+            return None
+
+    async def prepare_merge(
+        self,
+        statement_node: Dict[str, Any],
+        entity_node: Dict[str, Any],
+        llm_client = None
+    ) -> Dict[str, Any]:
+        """
+        生成一个节点对融合所需的数据（摘要、标题、类型、继承的激活值），不写入图
+
+        Args:
+            statement_node: Statement 节点数据，字段同 merge_nodes_to_summary
+            entity_node: Entity 节点数据，字段同 merge_nodes_to_summary
+            llm_client: LLM 客户端（None 时摘要降级为简单拼接，标题和类型使用默认值）
+
+        Returns:
+            Dict[str, Any]: apply_merges 使用的融合参数
+
+        Raises:
+            ValueError: 如果节点数据不完整或实体为 Person 类型
+        """
         # 验证输入数据
         required_statement_keys = [
             'statement_id', 'statement_text', 
@@ -257,31 +416,21 @@ class ForgettingStrategy:
             statement_text=statement_text,
             entity_name=entity_name,
             entity_type=entity_type,
-            config_id=config_id,
-            db=db
+            llm_client=llm_client
         )
         
         # 生成标题和类型（使用LLM）
         from app.core.memory.storage_services.extraction_engine.knowledge_extraction.memory_summary import generate_title_and_type_for_summary
         
-        # 获取 LLM 客户端
-        llm_client = None
-        if config_id is not None and db is not None:
-            try:
-                llm_client = await self._get_llm_client(db, config_id)
-            except Exception as e:
-                logger.warning(f"获取 LLM 客户端失败: {str(e)}")
-        
-        # 生成标题和类型
         try:
             if llm_client is not None:
                 title, episodic_type = await generate_title_and_type_for_summary(
                     content=summary_text,
                     llm_client=llm_client
                 )
-                logger.info(f"成功为MemorySummary生成标题和类型: title={title}, type={episodic_type}")
+                logger.debug(f"成功为MemorySummary生成标题和类型: title={title}, type={episodic_type}")
             else:
-                logger.warning("LLM 客户端不可用，使用默认标题和类型")
+                logger.debug("LLM 客户端不可用，使用默认标题和类型")
                 title = "未命名"
                 episodic_type = "conversation"
         except Exception as e:
@@ -289,173 +438,122 @@ class ForgettingStrategy:
             title = "未命名"
             episodic_type = "conversation"
         
-        # 计算继承的激活值和重要性（取较高值）
-        inherited_activation = max(statement_activation, entity_activation)
-        inherited_importance = max(statement_importance, entity_importance)
-        
-        # 创建 MemorySummary 节点
-        current_time = utcnow_naive()
-        current_time_iso = to_iso_z(current_time)
-        
         # 生成新的 MemorySummary ID
         import uuid
-        summary_id = f"summary_{uuid.uuid4().hex[:16]}"
-        
-        # 使用事务创建 MemorySummary 并删除原节点
-        async def merge_transaction(tx, **params):
-            """事务函数：创建摘要节点并删除原节点"""
-            query = """
-            // 首先检查节点是否存在
-            OPTIONAL MATCH (s:Statement {id: $statement_id})
-            OPTIONAL MATCH (e:ExtractedEntity {id: $entity_id})
-            
-            // 如果任一节点不存在，直接返回 null（不执行后续操作）
-            WITH s, e
-            WHERE s IS NOT NULL AND e IS NOT NULL
-            
-            // 创建 MemorySummary 节点
-            CREATE (ms:MemorySummary {
-                id: $summary_id,
-                summary: $summary_text,
-                name: $title,
-                memory_type: $episodic_type,
-                original_statement_id: $statement_id,
-                original_entity_id: $entity_id,
-                activation_value: $inherited_activation,
-                importance_score: $inherited_importance,
-                access_history: [$current_time],
-                last_access_time: $current_time,
-                access_count: 1,
-                version: 1,
-                end_user_id: $end_user_id,
-                created_at: datetime($current_time),
-                merged_at: datetime($current_time)
-            })
-            
-            // 转移 Statement 的出边到 MemorySummary（只转移目标节点仍存在的边）
-            WITH ms, s, e
-            CALL (ms, s, e) {
-                OPTIONAL MATCH (s)-[r_out]->(target)
-                WHERE target <> e AND r_out IS NOT NULL AND target IS NOT NULL
-                FOREACH (_ IN CASE WHEN target IS NOT NULL THEN [1] ELSE [] END |
-                    MERGE (ms)-[new_rel:DERIVED_FROM]->(target)
-                    ON CREATE SET 
-                        new_rel = properties(r_out),
-                        new_rel.original_relationship_type = type(r_out),
-                        new_rel.merged_from_statement = true,
-                        new_rel.merge_count = 1
-                    ON MATCH SET
-                        new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
-                )
-            }
-            
-            // 转移 Statement 的入边到 MemorySummary（只转移源节点仍存在的边）
-            WITH ms, s, e
-            CALL (ms, s, e) {
-                OPTIONAL MATCH (source)-[r_in]->(s)
-                WHERE r_in IS NOT NULL AND source IS NOT NULL
-                FOREACH (_ IN CASE WHEN source IS NOT NULL THEN [1] ELSE [] END |
-                    MERGE (source)-[new_rel:DERIVED_FROM]->(ms)
-                    ON CREATE SET 
-                        new_rel = properties(r_in),
-                        new_rel.original_relationship_type = type(r_in),
-                        new_rel.merged_from_statement = true,
-                        new_rel.merge_count = 1
-                    ON MATCH SET
-                        new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
-                )
-            }
-            
-            // 转移 Entity 的出边到 MemorySummary（只转移目标节点仍存在的边）
-            WITH ms, s, e
-            CALL (ms, s, e) {
-                OPTIONAL MATCH (e)-[r_out]->(target)
-                WHERE target <> s AND r_out IS NOT NULL AND target IS NOT NULL
-                FOREACH (_ IN CASE WHEN target IS NOT NULL THEN [1] ELSE [] END |
-                    MERGE (ms)-[new_rel:DERIVED_FROM]->(target)
-                    ON CREATE SET 
-                        new_rel = properties(r_out),
-                        new_rel.original_relationship_type = type(r_out),
-                        new_rel.merged_from_entity = true,
-                        new_rel.merge_count = 1
-                    ON MATCH SET
-                        new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
-                )
-            }
-            
-            // 转移 Entity 的入边到 MemorySummary（只转移源节点仍存在的边）
-            WITH ms, s, e
-            CALL (ms, s, e) {
-                OPTIONAL MATCH (source)-[r_in]->(e)
-                WHERE source <> s AND r_in IS NOT NULL AND source IS NOT NULL
-                FOREACH (_ IN CASE WHEN source IS NOT NULL THEN [1] ELSE [] END |
-                    MERGE (source)-[new_rel:DERIVED_FROM]->(ms)
-                    ON CREATE SET 
-                        new_rel = properties(r_in),
-                        new_rel.original_relationship_type = type(r_in),
-                        new_rel.merged_from_entity = true,
-                        new_rel.merge_count = 1
-                    ON MATCH SET
-                        new_rel.merge_count = coalesce(new_rel.merge_count, 0) + 1
-                )
-            }
-            
-            // 删除原始节点
-            WITH ms, s, e
-            DETACH DELETE s, e
-            
-            RETURN ms.id as summary_id
-            """
-            
-            result = await tx.run(query, **params)
-            record = await result.single()
-            
-            if not record:
-                raise RuntimeError("Failed to create MemorySummary node - nodes may not exist")
-            
-            return record['summary_id']
-        
-        params = {
-            'summary_id': summary_id,
+
+        # 计算继承的激活值和重要性（取较高值）
+        return {
+            'summary_id': f"summary_{uuid.uuid4().hex[:16]}",
             'summary_text': summary_text,
             'title': title,
             'episodic_type': episodic_type,
             'statement_id': statement_id,
             'entity_id': entity_id,
-            'inherited_activation': inherited_activation,
-            'inherited_importance': inherited_importance,
-            'current_time': current_time_iso,
+            'inherited_activation': max(statement_activation, entity_activation),
+            'inherited_importance': max(statement_importance, entity_importance),
+            'current_time': to_iso_z(utcnow_naive()),
             'end_user_id': end_user_id
         }
-        
-        try:
-            created_summary_id = await self.connector.execute_write_transaction(
-                merge_transaction,
-                **params
-            )
-            
-            logger.info(
-                f"成功融合节点: Statement[{statement_id}] + Entity[{entity_id}] "
-                f"-> MemorySummary[{created_summary_id}], "
-                f"activation={inherited_activation:.4f}, "
-                f"importance={inherited_importance:.4f}"
-            )
-            
-            return created_summary_id
-            
-        except Exception as e:
-            # 记录详细的错误信息，包括异常类型和堆栈
-            import traceback
-            error_details = traceback.format_exc()
-            logger.error(
-                f"融合节点失败: Statement[{statement_id}] + Entity[{entity_id}], "
-                f"错误类型: {type(e).__name__}, "
-                f"错误信息: {str(e)}, "
-                f"详细堆栈:\n{error_details}"
+
+    async def apply_merges(
+        self,
+        merges: List[Dict[str, Any]]
+    ) -> Dict[str, Optional[Exception]]:
+        """
+        批量写入节点对融合：创建 MemorySummary、转移边并删除原节点
+
+        同一 end_user_id 的融合在一个 UNWIND 事务内按顺序执行，每个节点对都能看到
+        前面节点对的写入，结果与逐个融合相同。事务失败时逐个重试，单个节点对的失败
+        不影响同批次的其他节点对。
+
+        Args:
+            merges: prepare_merge 生成的融合参数列表
+
+        Returns:
+            Dict[str, Optional[Exception]]: summary_id -> None（成功）或失败原因
+        """
+        results: Dict[str, Optional[Exception]] = {}
+        groups: Dict[Optional[str], List[Dict[str, Any]]] = {}
+        for merge in merges:
+            groups.setdefault(merge['end_user_id'], []).append(merge)
+
+        for end_user_id, group in groups.items():
+            try:
+                results.update(await self._write_merges(end_user_id, group))
+            except Exception as e:
+                if len(group) == 1:
+                    results[group[0]['summary_id']] = self._merge_error(group[0], e)
+                    continue
+                logger.warning(f"批量融合事务失败，逐个重试 {len(group)} 个节点对: {str(e)}")
+                for merge in group:
+                    try:
+                        results.update(await self._write_merges(end_user_id, [merge]))
+                    except Exception as item_error:
+                        results[merge['summary_id']] = self._merge_error(merge, item_error)
+        return results
+
+    async def _write_merges(
+        self,
+        end_user_id: Optional[str],
+        merges: List[Dict[str, Any]]
+    ) -> Dict[str, Optional[Exception]]:
+        """在一个写事务内执行一组融合，返回每个节点对的结果"""
+        # 事务内的写入计数，提交后用于更新记忆计数器
+        write_counters: Dict[str, int] = {}
+
+        async def merge_transaction(tx, **params):
+            """事务函数：逐个创建摘要节点并删除原节点"""
+            result = await tx.run(_MERGE_QUERY, **params)
+            created = [record['summary_id'] async for record in result]
+            write_counters.update(summary_counters(await result.consume()))
+            return created
+
+        created = set(await self.connector.execute_write_transaction(merge_transaction, merges=merges))
+
+        if created:
+            # 每个节点对删除一个 Statement 与一个 Entity，新增一个 MemorySummary
+            await MemoryCounterCache.apply_deltas(
+                end_user_id,
+                merge_deltas(
+                    counter_deltas(write_counters),
+                    {
+                        "statement": -len(created),
+                        "entity": -len(created),
+                        "summary": write_counters.get("nodes_created", 0),
+                    },
+                ),
             )
-            raise RuntimeError(
-                f"融合节点失败: {str(e)}"
-            ) from e
+
+        results: Dict[str, Optional[Exception]] = {}
+        for merge in merges:
+            if merge['summary_id'] in created:
+                results[merge['summary_id']] = None
+                logger.debug(
+                    f"成功融合节点: Statement[{merge['statement_id']}] + Entity[{merge['entity_id']}] "
+                    f"-> MemorySummary[{merge['summary_id']}], "
+                    f"activation={merge['inherited_activation']:.4f}, "
+                    f"importance={merge['inherited_importance']:.4f}"
+                )
+            else:
+                # 节点可能已被其他操作删除
+                results[merge['summary_id']] = RuntimeError(
+                    "Failed to create MemorySummary node - nodes may not exist"
+                )
+        logger.info(f"融合写入完成: {len(created)}/{len(merges)} 个节点对")
+        return results
+
+    @staticmethod
+    def _merge_error(merge: Dict[str, Any], error: Exception) -> RuntimeError:
+        """记录融合失败的详细信息，返回统一的 RuntimeError"""
+        logger.error(
+            f"融合节点失败: Statement[{merge['statement_id']}] + Entity[{merge['entity_id']}], "
+            f"错误类型: {type(error).__name__}, "
+            f"错误信息: {str(error)}",
+            exc_info=error
+        )
+        merge_error = RuntimeError(f"融合节点失败: {str(error)}")
+        merge_error.__cause__ = error
+        return merge_error
     
     # ==================== 私有辅助方法 ====================
     
@@ -465,7 +563,8 @@ class ForgettingStrategy:
         entity_name: str,
         entity_type: str,
         config_id: Optional[UUID] = None,
-        db = None
+        db = None,
+        llm_client: Any = _UNRESOLVED
     ) -> str:
         """
         生成摘要内容
@@ -479,28 +578,25 @@ class ForgettingStrategy:
             entity_type: Entity 类型
             config_id: 配置ID（可选，用于获取 llm_id）
             db: 数据库会话（可选，用于获取 llm_id）
+            llm_client: 已获取的 LLM 客户端（可选，传入时忽略 config_id 与 db）
         
         Returns:
             str: 生成的摘要文本（最多 200 个字符）
         """
         # 如果配置禁用 LLM 摘要，直接使用简单拼接
         if not self.enable_llm_summary:
-            logger.info("LLM 摘要生成已禁用，使用简单拼接")
+            logger.debug("LLM 摘要生成已禁用，使用简单拼接")
             return self._simple_concatenation(
                 statement_text, entity_name, entity_type
             )
         
         # 尝试获取 LLM 客户端
-        llm_client = None
-        if config_id is not None and db is not None:
-            try:
-                llm_client = await self._get_llm_client(db, config_id)
-            except Exception as e:
-                logger.warning(f"获取 LLM 客户端失败: {str(e)}")
+        if llm_client is _UNRESOLVED:
+            llm_client = await self.resolve_llm_client(config_id, db)
         
         # 如果没有 LLM 客户端，直接使用简单拼接
         if llm_client is None:
-            logger.info("未能获取 LLM 客户端，使用简单拼接")
+            logger.debug("未能获取 LLM 客户端，使用简单拼接")
             return self._simple_concatenation(
                 statement_text, entity_name, entity_type
             )
@@ -518,7 +614,7 @@ class ForgettingStrategy:
             if len(summary) > 200:
                 summary = f"{summary[:197]}..."
             
-            logger.info(f"使用 LLM 生成摘要: {summary}")
+            logger.debug(f"使用 LLM 生成摘要: {summary}")
             return summary
             
         except Exception as e:
@@ -11,6 +11,7 @@ import asyncio
 import logging
 from typing import Any, Dict, List
 
+from app.cache.memory.memory_counters import MemoryCounterCache, counter_deltas
 from app.repositories.neo4j.neo4j_connector import Neo4jConnector
 from app.repositories.neo4j.cypher_queries import (
     MERGE_ALIAS_BELONGS_TO,
@@ -68,10 +69,11 @@ async def merge_alias_belongs_to(
 
     # ── 2. 边重定向（别名节点其它边 → 规范实体） ──
     try:
-        redirect_records = await connector.execute_query(
+        redirect_records, write_counters = await connector.execute_query_with_counters(
             REDIRECT_ALIAS_EDGES,
             end_user_id=end_user_id,
         )
+        await MemoryCounterCache.apply_deltas(end_user_id, counter_deltas(write_counters))
         if redirect_records:
             row = redirect_records[0]
             result["edges_redirected"] = (
@@ -89,10 +91,11 @@ async def merge_alias_belongs_to(
 
     # ── 3. 删除别名节点（DETACH DELETE） ──
     try:
-        delete_records = await connector.execute_query(
+        delete_records, write_counters = await connector.execute_query_with_counters(
             DELETE_ALIAS_NODES,
             end_user_id=end_user_id,
         )
+        await MemoryCounterCache.apply_deltas(end_user_id, counter_deltas(write_counters, "entity"))
         result["alias_nodes_deleted"] = (
             delete_records[0].get("deleted_count", 0) if delete_records else 0
         )
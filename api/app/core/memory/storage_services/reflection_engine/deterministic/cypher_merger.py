@@ -2,6 +2,7 @@
 import logging
 from typing import Dict, List, Optional
 
+from app.cache.memory.memory_counters import MemoryCounterCache, counter_deltas
 from app.repositories.neo4j.neo4j_connector import Neo4jConnector
 
 logger = logging.getLogger(__name__)
@@ -50,7 +51,7 @@ async def execute_merge(
     from app.repositories.neo4j.cypher_queries import DEDUP_MERGE_ENTITIES
 
     try:
-        result = await connector.execute_query(
+        result, write_counters = await connector.execute_query_with_counters(
             DEDUP_MERGE_ENTITIES,
             end_user_id=end_user_id,
             keeper_id=keeper_id,
@@ -58,11 +59,14 @@ async def execute_merge(
             merged_name=merged_name,
             merged_aliases=merged_aliases,
         )
-        return bool(result)
     except Exception as e:
         logger.error(f"合并事务失败 keeper={keeper_id} loser={loser_id}: {e}")
         return False
 
+    if result:
+        await MemoryCounterCache.apply_deltas(end_user_id, counter_deltas(write_counters, "entity"))
+    return bool(result)
+
 
 def build_merged_aliases(keeper: Dict, loser: Dict, merged_name: str) -> List[str]:
     """构建合并后的 aliases 列表
@@ -0,0 +1,344 @@
+"""
+MemoryMaintenanceScheduler — 按变更驱动的 per-end_user 记忆维护调度
+
+定时维护任务（记忆洞察/用户摘要、隐性记忆/情绪建议、遗忘周期、反思）原先每次遍历全部工作空间的
+全部用户，无论用户记忆是否变化都调用 LLM。现改为：
+
+- 记忆写入路径在 Neo4j 写事务提交后把 end_user_id 记入各维护任务的待处理集合（dirty set）
+- 定时任务只负责分发：把待处理集合按 end_user_id 哈希拆分到固定数量的分片，
+  每个分片由独立的子任务处理，工作量与有变更的用户数成正比
+- 分片子任务分批认领用户，每批处理完成后才从分片中移除（检查点），
+  子任务超时或异常退出时未完成的用户保留在分片中，下一次执行从断点继续
+- 处理失败的用户放回待处理集合，下一轮重试
+- 遗忘周期依赖时间衰减，即使没有新写入也需要定期执行：
+  对其记录每个用户的上次处理时间，超过 revisit_after 的用户同样会被分发
+- 不分片的维护任务（反思）通过 take_changed 认领全部待处理用户，complete_changed 确认后才删除，
+  执行中断时下次 take_changed 重新取回
+
+存储结构（Redis，CELERY_BACKEND DB）：
+    memory_maintenance:dirty:{job}            ZSET end_user_id -> 变更时间
+    memory_maintenance:staging:{job}          ZSET 分发中的用户（分发中断时下次继续）
+    memory_maintenance:pending:{job}:{shard}  ZSET 分片待处理用户
+    memory_maintenance:last_run:{job}         ZSET end_user_id -> 上次处理时间
+    memory_maintenance:progress:{job}         HASH 各分片处理进度
+    memory_maintenance:lock:{job}:{shard}     分片执行锁
+    memory_maintenance:claimed:{job}          ZSET 不分片任务已认领、尚未确认的用户
+    memory_maintenance:claim_lock:{job}       不分片任务执行锁
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+import uuid
+import weakref
+import zlib
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 维护任务类型
+JOB_INSIGHT_SUMMARY = "insight_summary"  # 记忆洞察 + 用户摘要缓存
+JOB_IMPLICIT_EMOTIONS = "implicit_emotions"  # 隐性记忆画像 + 情绪建议
+JOB_FORGETTING = "forgetting"  # 遗忘周期
+JOB_REFLECTION = "reflection"  # 工作空间反思
+
+MAINTENANCE_JOBS = (JOB_INSIGHT_SUMMARY, JOB_IMPLICIT_EMOTIONS, JOB_FORGETTING, JOB_REFLECTION)
+
+# 原子地把待处理集合并入分发暂存集合
+_STAGE_DIRTY = """
+local members = redis.call('ZRANGE', KEYS[1], 0, -1, 'WITHSCORES')
+for i = 1, #members, 2 do
+    redis.call('ZADD', KEYS[2], members[i + 1], members[i])
+end
+redis.call('DEL', KEYS[1])
+return redis.call('ZRANGE', KEYS[2], 0, -1, 'WITHSCORES')
+"""
+
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+UserHandler = Callable[[str], Awaitable[bool]]
+
+
+@dataclass
+class ShardRunResult:
+    """分片子任务的执行结果"""
+    job: str
+    shard: int
+    processed: int = 0
+    failed: int = 0
+    remaining: int = 0
+    skipped: bool = False  # 分片正被其他子任务处理
+    failed_users: List[str] = field(default_factory=list)
+
+    @property
+    def finished(self) -> bool:
+        return not self.skipped and self.remaining == 0
+
+
+class MemoryMaintenanceScheduler:
+    """变更驱动的记忆维护调度器（绑定单个事件循环，通过 get_maintenance_scheduler 获取）"""
+
+    PREFIX = "memory_maintenance"
+
+    def __init__(
+        self,
+        redis_client: aioredis.StrictRedis,
+        shards: int = 8,
+        batch_size: int = 20,
+        lock_ttl: int = 900,
+    ):
+        self.redis = redis_client
+        self.shards = max(1, shards)
+        self.batch_size = max(1, batch_size)
+        self.lock_ttl = lock_ttl
+
+    def _dirty_key(self, job: str) -> str:
+        return f"{self.PREFIX}:dirty:{job}"
+
+    def _staging_key(self, job: str) -> str:
+        return f"{self.PREFIX}:staging:{job}"
+
+    def _pending_key(self, job: str, shard: int) -> str:
+        return f"{self.PREFIX}:pending:{job}:{shard}"
+
+    def _last_run_key(self, job: str) -> str:
+        return f"{self.PREFIX}:last_run:{job}"
+
+    def _progress_key(self, job: str) -> str:
+        return f"{self.PREFIX}:progress:{job}"
+
+    def _lock_key(self, job: str, shard: int) -> str:
+        return f"{self.PREFIX}:lock:{job}:{shard}"
+
+    def _claimed_key(self, job: str) -> str:
+        return f"{self.PREFIX}:claimed:{job}"
+
+    def _claim_lock_key(self, job: str) -> str:
+        return f"{self.PREFIX}:claim_lock:{job}"
+
+    def shard_of(self, end_user_id: str) -> int:
+        return zlib.crc32(str(end_user_id).encode("utf-8")) % self.shards
+
+    # ──────────────────────────────────────────────
+    # 写入路径
+    # ──────────────────────────────────────────────
+
+    async def mark_changed(self, end_user_ids: Iterable[str], jobs: Iterable[str] = MAINTENANCE_JOBS) -> None:
+        """记录用户记忆发生变化，相关维护任务下次执行时处理这些用户"""
+        now = time.time()
+        mapping = {str(uid): now for uid in end_user_ids if uid}
+        if not mapping:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for job in jobs:
+                pipe.zadd(self._dirty_key(job), mapping)
+            await pipe.execute()
+
+    # ──────────────────────────────────────────────
+    # 分发
+    # ──────────────────────────────────────────────
+
+    async def dispatch(self, job: str, revisit_after: Optional[float] = None) -> Dict[int, int]:
+        """把待处理用户分发到各分片
+
+        Args:
+            job: 维护任务类型
+            revisit_after: 距上次处理超过该秒数的用户也会被分发（None 表示只处理有变更的用户）
+
+        Returns:
+            {shard: 该分片待处理用户数}，只包含非空分片（含此前未处理完的用户）
+        """
+        staging_key = self._staging_key(job)
+        raw = await self.redis.eval(_STAGE_DIRTY, 2, self._dirty_key(job), staging_key)
+        staged = {raw[i]: float(raw[i + 1]) for i in range(0, len(raw), 2)}
+
+        if revisit_after is not None:
+            stale = await self.redis.zrangebyscore(
+                self._last_run_key(job), "-inf", time.time() - revisit_after, withscores=True
+            )
+            for uid, score in stale:
+                staged.setdefault(uid, score)
+
+        by_shard: Dict[int, Dict[str, float]] = {}
+        for uid, score in staged.items():
+            by_shard.setdefault(self.shard_of(uid), {})[uid] = score
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for shard, mapping in by_shard.items():
+                # 已在分片中的用户保留原分数（更早的变更时间），先进先出
+                pipe.zadd(self._pending_key(job, shard), mapping, nx=True)
+            pipe.delete(staging_key)
+            pipe.hset(self._progress_key(job), mapping={"dispatched_at": time.time(), "dispatched": len(staged)})
+            await pipe.execute()
+
+        counts = await self.pending_counts(job)
+        logger.info(f"[MAINTENANCE] 分发完成: job={job}, 新分发={len(staged)}, 分片待处理={counts}")
+        return counts
+
+    async def pending_counts(self, job: str) -> Dict[int, int]:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for shard in range(self.shards):
+                pipe.zcard(self._pending_key(job, shard))
+            sizes = await pipe.execute()
+        return {shard: size for shard, size in enumerate(sizes) if size}
+
+    # ──────────────────────────────────────────────
+    # 分片执行
+    # ──────────────────────────────────────────────
+
+    async def run_shard(
+        self,
+        job: str,
+        shard: int,
+        handler: UserHandler,
+        deadline: Optional[float] = None,
+        track_last_run: bool = False,
+    ) -> ShardRunResult:
+        """分批处理一个分片，每批完成后记录检查点
+
+        Args:
+            job: 维护任务类型
+            shard: 分片编号
+            handler: 处理单个用户的协程函数，返回是否成功
+            deadline: time.monotonic() 截止时间，到期后停止认领新批次，剩余用户留给下次执行
+            track_last_run: 是否记录用户的处理时间（供 revisit_after 使用）
+        """
+        result = ShardRunResult(job=job, shard=shard)
+        lock_key = self._lock_key(job, shard)
+        token = uuid.uuid4().hex
+        if not await self.redis.set(lock_key, token, nx=True, ex=self.lock_ttl):
+            result.skipped = True
+            result.remaining = await self.redis.zcard(self._pending_key(job, shard))
+            return result
+
+        pending_key = self._pending_key(job, shard)
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                batch = await self.redis.zrange(pending_key, 0, self.batch_size - 1)
+                if not batch:
+                    break
+                done, failed = [], []
+                for end_user_id in batch:
+                    try:
+                        ok = await handler(end_user_id)
+                    except Exception as e:
+                        logger.error(f"[MAINTENANCE] 处理用户失败: job={job}, end_user_id={end_user_id}, {e}")
+                        ok = False
+                    (done if ok else failed).append(end_user_id)
+                await self._checkpoint(job, shard, done, failed, track_last_run)
+                result.processed += len(done)
+                result.failed += len(failed)
+                result.failed_users.extend(failed)
+                await self.redis.eval(_RENEW, 1, lock_key, token, self.lock_ttl * 1000)
+            result.remaining = await self.redis.zcard(pending_key)
+        finally:
+            await self.redis.eval(_RELEASE, 1, lock_key, token)
+        return result
+
+    async def _checkpoint(
+        self,
+        job: str,
+        shard: int,
+        done: List[str],
+        failed: List[str],
+        track_last_run: bool,
+    ) -> None:
+        now = time.time()
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zrem(self._pending_key(job, shard), *done, *failed)
+            if done and track_last_run:
+                pipe.zadd(self._last_run_key(job), {uid: now for uid in done})
+            if failed:
+                # 失败用户放回待处理集合，下一轮重试
+                pipe.zadd(self._dirty_key(job), {uid: now for uid in failed})
+            progress_key = self._progress_key(job)
+            pipe.hincrby(progress_key, f"{shard}:processed", len(done))
+            pipe.hincrby(progress_key, f"{shard}:failed", len(failed))
+            pipe.hset(progress_key, f"{shard}:checkpoint_at", now)
+            await pipe.execute()
+
+    # ──────────────────────────────────────────────
+    # 不分片的维护任务
+    # ──────────────────────────────────────────────
+
+    async def take_changed(self, job: str) -> Optional[Tuple[str, List[str]]]:
+        """认领全部有变更的用户（不分片的维护任务使用）
+
+        用户并入已认领集合，调用 complete_changed 确认后才删除；执行中断（进程被杀）时
+        已认领集合保留，执行锁过期后由下次 take_changed 连同新变更一起取回。
+
+        Returns:
+            (token, 用户ID列表)；其他执行者持有执行锁时返回 None
+        """
+        token = uuid.uuid4().hex
+        if not await self.redis.set(self._claim_lock_key(job), token, nx=True, ex=self.lock_ttl):
+            return None
+        raw = await self.redis.eval(_STAGE_DIRTY, 2, self._dirty_key(job), self._claimed_key(job))
+        return token, list(raw[::2])
+
+    async def complete_changed(self, job: str, token: str, retry_user_ids: Iterable[str] = ()) -> None:
+        """确认 take_changed 认领的用户已处理，失败的用户放回待处理集合，并释放执行锁"""
+        now = time.time()
+        retry = {str(uid): now for uid in retry_user_ids if uid}
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self._claimed_key(job))
+            if retry:
+                pipe.zadd(self._dirty_key(job), retry)
+            await pipe.execute()
+        await self.redis.eval(_RELEASE, 1, self._claim_lock_key(job), token)
+
+    async def progress(self, job: str) -> Dict[str, str]:
+        return await self.redis.hgetall(self._progress_key(job))
+
+
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MemoryMaintenanceScheduler]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_maintenance_scheduler() -> MemoryMaintenanceScheduler:
+    """获取当前事件循环的维护调度器（使用 CELERY_BACKEND DB）"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        redis_client = aioredis.StrictRedis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB_CELERY_BACKEND,
+            password=settings.REDIS_PASSWORD or None,
+            decode_responses=True,
+        )
+        scheduler = MemoryMaintenanceScheduler(
+            redis_client,
+            shards=settings.MEMORY_MAINTENANCE_SHARDS,
+            batch_size=settings.MEMORY_MAINTENANCE_BATCH_SIZE,
+        )
+        _schedulers[loop] = scheduler
+    return scheduler
+
+
+async def mark_memory_changed(end_user_ids: Iterable[str]) -> None:
+    """记忆写入后调用：标记用户待维护，失败只记录日志，不影响写入主流程"""
+    try:
+        await get_maintenance_scheduler().mark_changed(end_user_ids)
+    except Exception as e:
+        logger.error(f"[MAINTENANCE] 标记用户待维护失败: {e}", exc_info=True)
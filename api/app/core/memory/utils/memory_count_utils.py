@@ -1,7 +1,9 @@
 import asyncio
 import logging
+from typing import Dict, List
 from uuid import UUID
 
+from app.cache.memory.memory_counters import COUNTER_FIELDS, MemoryCounterCache, empty_counters
 from app.db import get_db_context
 from app.models.end_user_model import EndUser
 from app.repositories.memory_config_repository import MemoryConfigRepository
@@ -18,16 +20,14 @@ async def sync_end_user_memory_count_from_neo4j(
     """
     Sync one end user's Neo4j memory node count to PostgreSQL.
 
-    The caller owns the Neo4j connector lifecycle.
+    Reads the write-time memory counters, falling back to Neo4j when
+    they have not been seeded yet. The caller owns the Neo4j connector lifecycle.
     """
     if not end_user_id:
         return 0
 
-    result = await connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_ALL_BATCH,
-        end_user_ids=[end_user_id],
-    )
-    node_count = int(result[0]["total"]) if result else 0
+    counters = await get_memory_counters_batch([end_user_id], connector)
+    node_count = counters[end_user_id]["total"]
 
     with get_db_context() as db:
         db.query(EndUser).filter(
@@ -42,6 +42,97 @@ async def sync_end_user_memory_count_from_neo4j(
     return node_count
 
 
+async def count_memory_from_neo4j(
+    end_user_ids: List[str],
+    connector: Neo4jConnector,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Aggregate the authoritative memory counters for a batch of end users from Neo4j.
+    """
+    if not end_user_ids:
+        return {}
+    rows = await connector.execute_query(
+        MemoryConfigRepository.SEARCH_FOR_COUNTERS_BATCH,
+        end_user_ids=end_user_ids,
+    )
+    counts = {uid: empty_counters() for uid in end_user_ids}
+    for row in rows:
+        counts[row["user_id"]] = {field: int(row.get(field) or 0) for field in COUNTER_FIELDS}
+    return counts
+
+
+async def reconcile_memory_counters(
+    end_user_ids: List[str],
+    connector: Neo4jConnector,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Overwrite the cached counters of the given end users with Neo4j aggregates.
+
+    Also used to seed counters on first read. Returns the authoritative counters.
+    """
+    counts = await count_memory_from_neo4j(end_user_ids, connector)
+    for uid, values in counts.items():
+        await MemoryCounterCache.replace_end_user_counters(uid, values)
+    return counts
+
+
+async def reconcile_workspace_memory_counters(
+    workspace_id: str,
+    end_user_ids: List[str],
+    connector: Neo4jConnector,
+    batch_size: int = 200,
+) -> Dict[str, int]:
+    """
+    Reconcile every end user of a workspace. Returns the workspace totals
+    (the sum of its end users' counters) for logging.
+    """
+    totals = empty_counters()
+    drifted = 0
+    for start in range(0, len(end_user_ids), batch_size):
+        batch = end_user_ids[start:start + batch_size]
+        cached = await MemoryCounterCache.get_end_user_counters_batch(batch)
+        counts = await reconcile_memory_counters(batch, connector)
+        for uid, values in counts.items():
+            if cached.get(uid) is not None and cached[uid] != values:
+                drifted += 1
+                _logger.info(f"{_LOG_PREFIX} 计数漂移已修正: end_user_id={uid}, cached={cached[uid]}, actual={values}")
+            for field in COUNTER_FIELDS:
+                totals[field] += values[field]
+    _logger.info(
+        f"{_LOG_PREFIX} 工作空间计数对账完成: workspace_id={workspace_id}, "
+        f"users={len(end_user_ids)}, drifted={drifted}, totals={totals}"
+    )
+    return totals
+
+
+async def get_memory_counters_batch(
+    end_user_ids: List[str],
+    connector: Neo4jConnector,
+) -> Dict[str, Dict[str, int]]:
+    """
+    Read memory counters for dashboard/API use.
+
+    Counters that have not been seeded are computed from Neo4j once and cached;
+    if Redis is unavailable the Neo4j aggregates are returned directly.
+    """
+    if not end_user_ids:
+        return {}
+    try:
+        cached = await MemoryCounterCache.get_end_user_counters_batch(end_user_ids)
+    except Exception as exc:
+        _logger.warning(f"{_LOG_PREFIX} 读取记忆计数失败，回退 Neo4j 聚合查询: {exc}")
+        return await count_memory_from_neo4j(end_user_ids, connector)
+
+    missing = [uid for uid, values in cached.items() if values is None]
+    if missing:
+        try:
+            cached.update(await reconcile_memory_counters(missing, connector))
+        except Exception as exc:
+            _logger.warning(f"{_LOG_PREFIX} 记忆计数播种失败，回退 Neo4j 聚合查询: {exc}")
+            cached.update(await count_memory_from_neo4j(missing, connector))
+    return cached
+
+
 def sync_memory_count_neo4j(end_user_id: str) -> None:
     """
     Synchronous wrapper for use in Celery tasks and other sync contexts.
@@ -0,0 +1,412 @@
+# app/core/metrics.py
+"""
+进程内指标注册表
+
+统一记录热点路径的延迟与吞吐：工作流节点执行、LLM/Embedding/Rerank 调用与 token、
+Neo4j 与 Elasticsearch 查询、数据库连接池等待、Celery 任务耗时与排队延迟。
+
+- 指标在本模块集中定义，标签名固定；每个指标的标签组合数有上限，
+  超出上限的新组合计入标签值全部为 "other" 的序列，避免标签基数失控
+- 直方图使用固定桶，记录一次观测只做一次二分查找和一次加锁累加
+- 以 Prometheus 文本格式导出：API 进程通过 /metrics 暴露（须配置 METRICS_TOKEN），
+  Celery worker 进程通过 start_metrics_server 启动的 HTTP 端口暴露（默认只监听本机）
+- 指标按进程统计，fork 出的子进程从零开始计数
+"""
+
+import hmac
+import ipaddress
+import os
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.core.config import settings
+from app.core.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OTHER = "other"
+
+# 常规查询延迟（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 模型调用：从几十毫秒的 embedding 到数分钟的长文本生成
+MODEL_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+# 连接池等待：正常情况下远小于 1 毫秒
+POOL_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+# Celery 任务耗时与排队延迟
+TASK_BUCKETS = (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_label(value) -> str:
+    # 枚举取其值（str 枚举与其值作为字典键时等价）
+    value = str(getattr(value, "value", value))
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_format_label(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    """指标基类：按标签值元组保存序列，序列数达到上限后新组合计入 other 序列"""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), max_series: int = 0):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.max_series = max_series or settings.METRICS_MAX_SERIES
+        self._overflow = (OTHER,) * len(self.labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple, List[float]] = {}
+
+    def _new_series(self, labels: Tuple) -> List[float]:
+        """在锁内调用：创建序列，超出上限时返回 other 序列"""
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labels}")
+        if len(self._series) >= self.max_series:
+            labels = self._overflow
+            series = self._series.get(labels)
+            if series is not None:
+                return series
+        series = self._series[labels] = self._empty()
+        return series
+
+    def _empty(self) -> List[float]:
+        raise NotImplementedError
+
+    def _samples(self, labels: Tuple, series: List[float]) -> List[str]:
+        raise NotImplementedError
+
+    def reset(self) -> None:
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            snapshot = [(labels, list(series)) for labels, series in self._series.items()]
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        for labels, series in sorted(snapshot, key=lambda item: tuple(map(str, item[0]))):
+            lines.extend(self._samples(labels, series))
+        return lines
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def _empty(self) -> List[float]:
+        return [0.0]
+
+    def inc(self, *labels, amount: float = 1.0) -> None:
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._new_series(labels)
+            series[0] += amount
+
+    def value(self, *labels) -> float:
+        series = self._series.get(labels)
+        return series[0] if series else 0.0
+
+    def _samples(self, labels: Tuple, series: List[float]) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(series[0])}"]
+
+
+class Histogram(_Metric):
+    """固定桶直方图：序列为各桶计数（最后一个为 +Inf 桶）加观测值总和"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS, max_series: int = 0):
+        super().__init__(name, documentation, labelnames, max_series)
+        self.buckets = tuple(sorted(buckets))
+        self._size = len(self.buckets) + 1
+
+    def _empty(self) -> List[float]:
+        return [0] * self._size + [0.0]
+
+    def observe(self, value: float, *labels) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._new_series(labels)
+            series[index] += 1
+            series[-1] += value
+
+    def time(self, *labels) -> "_Timer":
+        """计时上下文：最后一个标签名为 status 时由退出方式补上 ok/error"""
+        return _Timer(self, labels)
+
+    def count(self, *labels) -> int:
+        series = self._series.get(labels)
+        return sum(series[:-1]) if series else 0
+
+    def sum(self, *labels) -> float:
+        series = self._series.get(labels)
+        return series[-1] if series else 0.0
+
+    def _samples(self, labels: Tuple, series: List[float]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), series):
+            cumulative += count
+            le = 'le="{}"'.format(_format_value(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+        lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class _Timer:
+    __slots__ = ("_histogram", "_labels", "_start")
+
+    def __init__(self, histogram: Histogram, labels: Tuple):
+        self._histogram = histogram
+        self._labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        elapsed = time.perf_counter() - self._start
+        labels = self._labels
+        if len(labels) < len(self._histogram.labelnames):
+            labels = labels + ("ok" if exc_type is None else "error",)
+        self._histogram.observe(elapsed, *labels)
+
+
+class MetricsRegistry:
+    """指标注册表：按注册顺序导出 Prometheus 文本"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Counter:
+        return self._register(Counter(name, documentation, labelnames, **kwargs))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), **kwargs) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        for metric in self._metrics.values():
+            metric.reset()
+
+
+REGISTRY = MetricsRegistry()
+
+WORKFLOW_NODE_DURATION = REGISTRY.histogram(
+    "workflow_node_duration_seconds", "工作流节点执行耗时", ("node_type", "status"),
+)
+MODEL_REQUEST_DURATION = REGISTRY.histogram(
+    "model_request_duration_seconds", "LLM/Embedding/Rerank 调用耗时（流式调用计到最后一个分块）",
+    ("kind", "provider", "model", "status"), buckets=MODEL_BUCKETS,
+)
+MODEL_TOKENS = REGISTRY.counter(
+    "model_tokens_total", "LLM 调用消耗的 token 数（模型返回用量时）", ("provider", "model", "direction"),
+)
+MODEL_INPUTS = REGISTRY.counter(
+    "model_inputs_total", "Embedding 的文本数与 Rerank 的文档数", ("kind", "provider", "model"),
+)
+NEO4J_QUERY_DURATION = REGISTRY.histogram(
+    "neo4j_query_duration_seconds", "Neo4j 查询与事务耗时", ("operation", "status"),
+)
+ES_REQUEST_DURATION = REGISTRY.histogram(
+    "elasticsearch_request_duration_seconds", "Elasticsearch 请求耗时", ("endpoint", "status"),
+)
+DB_POOL_WAIT = REGISTRY.histogram(
+    "db_pool_wait_seconds", "从数据库连接池获取连接的等待时间（含新建连接）", buckets=POOL_BUCKETS,
+)
+CELERY_TASK_DURATION = REGISTRY.histogram(
+    "celery_task_duration_seconds", "Celery 任务执行耗时", ("task", "queue", "status"), buckets=TASK_BUCKETS,
+)
+CELERY_QUEUE_LAG = REGISTRY.histogram(
+    "celery_task_queue_lag_seconds", "Celery 任务从发布（或 ETA）到开始执行的等待时间", ("task", "queue"),
+    buckets=TASK_BUCKETS,
+)
+DB_TRANSACTION_DURATION = REGISTRY.histogram(
+    "db_transaction_duration_seconds", "TransactionMonitor 监控的事务耗时", ("transaction", "status"),
+)
+PROBLEM_EXTENSION_DURATION = REGISTRY.histogram(
+    "problem_extension_duration_seconds", "问题扩展执行耗时", ("status",), buckets=MODEL_BUCKETS,
+)
+PROBLEM_EXTENSION_QUESTIONS = REGISTRY.counter(
+    "problem_extension_questions_total", "问题扩展生成的问题数",
+)
+
+
+def record_llm_usage(provider, model, result) -> None:
+    """记录 LLM 返回的 token 用量（AIMessage.usage_metadata），没有用量时忽略"""
+    usage = getattr(result, "usage_metadata", None)
+    if not usage:
+        return
+    input_tokens = usage.get("input_tokens") or 0
+    output_tokens = usage.get("output_tokens") or 0
+    if input_tokens:
+        MODEL_TOKENS.inc(provider, model, "input", amount=input_tokens)
+    if output_tokens:
+        MODEL_TOKENS.inc(provider, model, "output", amount=output_tokens)
+
+
+# ==================== Celery 任务 ====================
+
+_task_started: Dict[str, float] = {}
+
+
+def task_started(task_id: str, task_name: str, queue: str, published_at: Optional[float] = None,
+                 eta=None) -> None:
+    """任务开始执行：记录排队延迟（发布时间与 ETA 取较晚者）"""
+    now = time.time()
+    _task_started[task_id] = time.perf_counter()
+    if published_at is None:
+        return
+    ready_at = float(published_at)
+    if eta:
+        try:
+            if isinstance(eta, str):
+                eta = datetime.fromisoformat(eta)
+            ready_at = max(ready_at, eta.timestamp())
+        except (AttributeError, ValueError):
+            pass
+    CELERY_QUEUE_LAG.observe(max(now - ready_at, 0.0), task_name, queue)
+
+
+def task_finished(task_id: str, task_name: str, queue: str, state: Optional[str]) -> None:
+    """任务执行结束：按最终状态（success/failure/retry 等）记录耗时"""
+    started = _task_started.pop(task_id, None)
+    if started is None:
+        return
+    CELERY_TASK_DURATION.observe(time.perf_counter() - started, task_name, queue, (state or "unknown").lower())
+
+
+# ==================== 导出 ====================
+
+def is_authorized(authorization: Optional[str]) -> bool:
+    """校验 Authorization 头是否为 Bearer METRICS_TOKEN，未配置 token 时一律拒绝"""
+    token = settings.METRICS_TOKEN
+    if not token or not authorization:
+        return False
+    return hmac.compare_digest(authorization.encode("utf-8"), f"Bearer {token}".encode("utf-8"))
+
+
+def _is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        # 只监听本机且未配置 token 时允许匿名抓取
+        if settings.METRICS_TOKEN and not is_authorized(self.headers.get("Authorization")):
+            self.send_error(401)
+            return
+        body = REGISTRY.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port: int, port_range: int = 1, host: str = "127.0.0.1") -> Optional[int]:
+    """
+    在后台线程中启动指标 HTTP 服务（供 Celery worker 进程使用）
+
+    prefork 的多个子进程依次尝试 port 起的 port_range 个端口，各自占用一个；
+    port 为 0 时使用系统分配的端口。每个进程只启动一次。
+    监听非本机地址时必须配置 METRICS_TOKEN，否则不启动。
+
+    Returns:
+        实际监听的端口，没有可用端口或未配置 token 时返回 None
+    """
+    global _server
+    if not settings.METRICS_TOKEN and not _is_loopback(host):
+        logger.warning(f"Metrics server on {host} requires METRICS_TOKEN, not starting (pid={os.getpid()})")
+        return None
+    with _server_lock:
+        if _server is not None:
+            return _server.server_address[1]
+        candidates = [0] if port == 0 else range(port, port + max(port_range, 1))
+        for candidate in candidates:
+            try:
+                server = ThreadingHTTPServer((host, candidate), _MetricsHandler)
+            except OSError:
+                continue
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+            _server = server
+            logger.info(f"Metrics server listening on {host}:{server.server_address[1]} (pid={os.getpid()})")
+            return server.server_address[1]
+    logger.warning(f"No free metrics port in {port}-{port + port_range - 1} (pid={os.getpid()})")
+    return None
+
+
+def stop_metrics_server() -> None:
+    global _server
+    with _server_lock:
+        if _server is not None:
+            _server.shutdown()
+            _server.server_close()
+            _server = None
+
+
+def _after_fork_in_child() -> None:
+    # 子进程不继承父进程的计数和监听端口；锁可能在 fork 时被持有，一并重建
+    global _server, _server_lock
+    REGISTRY.reset()
+    _task_started.clear()
+    _server_lock = threading.Lock()
+    if _server is not None:
+        _server.socket.close()
+        _server = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
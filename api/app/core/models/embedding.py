@@ -2,6 +2,7 @@
 from typing import Any, Dict, List, Union
 from langchain_core.embeddings import Embeddings
 
+from app.core.metrics import MODEL_INPUTS, MODEL_REQUEST_DURATION
 from app.core.models.base import RedBearModelConfig, get_provider_embedding_class, RedBearModelFactory
 from app.models.models_model import ModelProvider
 
@@ -64,18 +65,20 @@ class RedBearEmbeddings(Embeddings):
     
     def embed_documents(self, texts: list[str]) -> list[list[float]]:
         """批量文本向量化（LangChain 标准接口）"""
-        if self._is_volcano:
-            # 火山引擎多模态 Embedding
-            contents = [{"type": "text", "text": text} for text in texts]
-            response = self._client.multimodal_embeddings.create(
-                model=self._config.model_name,
-                input=contents,
-                encoding_format="float"
-            )
-            return [response.data.embedding]
-        else:
-            # 其他 provider
-            return self._model.embed_documents(texts)
+        MODEL_INPUTS.inc("embedding", self._config.provider, self._config.model_name, amount=len(texts))
+        with MODEL_REQUEST_DURATION.time("embedding", self._config.provider, self._config.model_name):
+            if self._is_volcano:
+                # 火山引擎多模态 Embedding
+                contents = [{"type": "text", "text": text} for text in texts]
+                response = self._client.multimodal_embeddings.create(
+                    model=self._config.model_name,
+                    input=contents,
+                    encoding_format="float"
+                )
+                return [response.data.embedding]
+            else:
+                # 其他 provider
+                return self._model.embed_documents(texts)
 
     def embed_query(self, text: str) -> List[float]:
         """单个文本向量化（LangChain 标准接口）"""
@@ -85,7 +88,9 @@ class RedBearEmbeddings(Embeddings):
             return result[0] if result else []
         else:
             # 其他 provider
-            return self._model.embed_query(text)
+            MODEL_INPUTS.inc("embedding", self._config.provider, self._config.model_name)
+            with MODEL_REQUEST_DURATION.time("embedding", self._config.provider, self._config.model_name):
+                return self._model.embed_query(text)
     
     # ==================== 多模态扩展方法 ====================
     
@@ -112,11 +117,13 @@ class RedBearEmbeddings(Embeddings):
                 f"多模态 Embedding 仅支持火山引擎，当前 provider: {self._config.provider}"
             )
         
-        response = self._client.multimodal_embeddings.create(
-            model=self._config.model_name,
-            input=contents,
-            **kwargs
-        )
+        MODEL_INPUTS.inc("embedding", self._config.provider, self._config.model_name, amount=len(contents))
+        with MODEL_REQUEST_DURATION.time("embedding", self._config.provider, self._config.model_name):
+            response = self._client.multimodal_embeddings.create(
+                model=self._config.model_name,
+                input=contents,
+                **kwargs
+            )
         return [response.data.embedding]
     
     async def aembed_multimodal(
@@ -1,9 +1,11 @@
 from __future__ import annotations
+import time
 from typing import Any, Iterator, AsyncIterator, List, Optional
 from langchain_core.callbacks import CallbackManagerForLLMRun, AsyncCallbackManagerForLLMRun
 from langchain_core.language_models import BaseLLM
 from langchain_core.outputs import LLMResult, GenerationChunk
 
+from app.core.metrics import MODEL_REQUEST_DURATION, record_llm_usage
 from app.core.models import RedBearModelConfig, RedBearModelFactory, get_provider_llm_class
 from app.models.models_model import ModelType
 
@@ -76,16 +78,19 @@ class RedBearLLM(BaseLLM):
         Returns:
             Model response
         """
-        try:
-            return self._model.invoke(input, config=config, **kwargs)
-        except AttributeError as e:
-            if 'invoke' in str(e):
-                # Underlying model doesn't support invoke, fallback to parent implementation
-                return super().invoke(input, config=config, **kwargs)
-            raise
-        except Exception:
-            # Other exceptions are raised directly
-            raise
+        with MODEL_REQUEST_DURATION.time("llm", self._config.provider, self._config.model_name):
+            try:
+                result = self._model.invoke(input, config=config, **kwargs)
+            except AttributeError as e:
+                if 'invoke' in str(e):
+                    # Underlying model doesn't support invoke, fallback to parent implementation
+                    return super().invoke(input, config=config, **kwargs)
+                raise
+            except Exception:
+                # Other exceptions are raised directly
+                raise
+        record_llm_usage(self._config.provider, self._config.model_name, result)
+        return result
 
     async def ainvoke(self, input: Any, config: Optional[dict] = None, **kwargs: Any) -> Any:
         """Asynchronous model invocation
@@ -101,16 +106,19 @@ class RedBearLLM(BaseLLM):
         Returns:
             Model response
         """
-        try:
-            return await self._model.ainvoke(input, config=config, **kwargs)
-        except AttributeError as e:
-            if 'ainvoke' in str(e):
-                # Underlying model doesn't support ainvoke, fallback to parent implementation
-                return await super().ainvoke(input, config=config, **kwargs)
-            raise
-        except Exception:
-            # Other exceptions are raised directly
-            raise
+        with MODEL_REQUEST_DURATION.time("llm", self._config.provider, self._config.model_name):
+            try:
+                result = await self._model.ainvoke(input, config=config, **kwargs)
+            except AttributeError as e:
+                if 'ainvoke' in str(e):
+                    # Underlying model doesn't support ainvoke, fallback to parent implementation
+                    return await super().ainvoke(input, config=config, **kwargs)
+                raise
+            except Exception:
+                # Other exceptions are raised directly
+                raise
+        record_llm_usage(self._config.provider, self._config.model_name, result)
+        return result
 
     # ==================== Streaming Methods (Critical) ====================
     
@@ -133,16 +141,27 @@ class RedBearLLM(BaseLLM):
         Yields:
             GenerationChunk: Generated text chunks
         """
+        start = time.perf_counter()
+        status = "cancelled"
         try:
-            yield from self._model.stream(input, config=config, stop=stop, **kwargs)
+            for chunk in self._model.stream(input, config=config, stop=stop, **kwargs):
+                # Usage is reported on the last chunk when the provider supports it
+                record_llm_usage(self._config.provider, self._config.model_name, chunk)
+                yield chunk
+            status = "ok"
         except AttributeError as e:
             if 'stream' in str(e):
                 # Underlying model doesn't support stream, fallback to parent implementation
                 yield from super().stream(input, config=config, stop=stop, **kwargs)
+                status = "ok"
             else:
+                status = "error"
                 raise
         except Exception:
+            status = "error"
             raise
+        finally:
+            self._observe_stream(start, status)
     
     async def astream(
         self,
@@ -167,18 +186,34 @@ class RedBearLLM(BaseLLM):
         Yields:
             GenerationChunk: Generated text chunks
         """
+        start = time.perf_counter()
+        status = "cancelled"
         try:
             async for chunk in self._model.astream(input, config=config, stop=stop, **kwargs):
+                # Usage is reported on the last chunk when the provider supports it
+                record_llm_usage(self._config.provider, self._config.model_name, chunk)
                 yield chunk
+            status = "ok"
         except AttributeError as e:
             if 'astream' in str(e):
                 # Underlying model doesn't support astream, fallback to parent implementation
                 async for chunk in super().astream(input, config=config, stop=stop, **kwargs):
                     yield chunk
+                status = "ok"
             else:
+                status = "error"
                 raise
         except Exception:
+            status = "error"
             raise
+        finally:
+            self._observe_stream(start, status)
+
+    def _observe_stream(self, start: float, status: str) -> None:
+        """Record a streaming call, from the request to the last chunk (or the failure)"""
+        MODEL_REQUEST_DURATION.observe(
+            time.perf_counter() - start, "llm", self._config.provider, self._config.model_name, status
+        )
 
     # ==================== Dynamic Proxy ====================
     
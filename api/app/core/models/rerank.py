@@ -4,6 +4,7 @@ from urllib.parse import urlparse
 from langchain_core.documents import BaseDocumentCompressor, Document
 from langchain_core.runnables import RunnableSerializable
 from langchain_core.callbacks import Callbacks
+from app.core.metrics import MODEL_INPUTS, MODEL_REQUEST_DURATION
 from app.core.models.base import RedBearModelConfig, get_provider_rerank_class, RedBearModelFactory
 from app.models import ModelProvider
 
@@ -60,6 +61,17 @@ class RedBearRerank(BaseDocumentCompressor):
             query: str,
             *,
             top_n: Optional[int] = -1,
+    ) -> List[Dict[str, Any]]:
+        MODEL_INPUTS.inc("rerank", self._config.provider, self._config.model_name, amount=len(documents))
+        with MODEL_REQUEST_DURATION.time("rerank", self._config.provider, self._config.model_name):
+            return self._rerank(documents, query, top_n=top_n)
+
+    def _rerank(
+            self,
+            documents: Sequence[Union[str, Document, dict]],
+            query: str,
+            *,
+            top_n: Optional[int] = -1,
     ) -> List[Dict[str, Any]]:
         provider = self._config.provider.lower()
         if provider in [ModelProvider.XINFERENCE, ModelProvider.GPUSTACK]:
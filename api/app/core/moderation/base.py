@@ -48,6 +48,10 @@ class ModerationBase(ABC):
     def moderation_for_outputs(self, text: str) -> ModerationOutputsResult:
         raise NotImplementedError
 
+    def create_output_scanner(self) -> "ModerationOutputScanner":
+        """流式输出审查状态，支持增量扫描的实现可覆盖"""
+        return ModerationOutputScanner(self)
+
     @classmethod
     def _validate_inputs_outputs_config(cls, config: dict[str, Any], is_preset_response_required: bool) -> None:
         inputs_config = config.get("inputs_config")
@@ -71,3 +75,17 @@ class ModerationBase(ABC):
             raise ValueError("inputs_config preset_response is required when enabled")
         if outputs_enabled and not outputs_config.get("preset_response"):
             raise ValueError("outputs_config preset_response is required when enabled")
+
+
+class ModerationOutputScanner:
+    """默认实现：每次对累积全文调用 moderation_for_outputs"""
+
+    def __init__(self, moderation: ModerationBase):
+        self._moderation = moderation
+        self._text = ""
+
+    def feed(self, chunk: str) -> ModerationOutputsResult:
+        text = self._text + chunk
+        result = self._moderation.moderation_for_outputs(text)
+        self._text = text
+        return result
@@ -4,8 +4,11 @@ from app.core.moderation.base import (
     ModerationAction,
     ModerationBase,
     ModerationInputsResult,
+    ModerationOutputScanner,
     ModerationOutputsResult,
 )
+from app.core.moderation.keywords.matcher import get_keyword_matcher
+from app.core.utils.keyword_matcher import KeywordMatcher
 
 
 class KeywordsModeration(ModerationBase):
@@ -37,8 +40,7 @@ class KeywordsModeration(ModerationBase):
         if query:
             check_inputs["query__"] = query
 
-        keywords_list = self._parse_keywords()
-        flagged = self._is_violated(check_inputs, keywords_list)
+        flagged = self._is_violated(check_inputs, self._matcher())
 
         return ModerationInputsResult(
             flagged=flagged,
@@ -51,8 +53,7 @@ class KeywordsModeration(ModerationBase):
             return ModerationOutputsResult(flagged=False)
 
         preset_response = self.config["outputs_config"]["preset_response"]
-        keywords_list = self._parse_keywords()
-        flagged = self._is_violated({"text": text}, keywords_list)
+        flagged = self._is_violated({"text": text}, self._matcher())
 
         return ModerationOutputsResult(
             flagged=flagged,
@@ -60,14 +61,31 @@ class KeywordsModeration(ModerationBase):
             preset_response=preset_response,
         )
 
-    def _parse_keywords(self) -> list[str]:
-        keywords = self.config.get("keywords", "")
-        return [kw.strip() for kw in keywords.split("\n") if kw.strip()]
-
-    def _is_violated(self, data: dict[str, Any], keywords_list: list[str]) -> bool:
-        for value in data.values():
-            value_str = str(value).lower()
-            for keyword in keywords_list:
-                if keyword.lower() in value_str:
-                    return True
-        return False
+    def create_output_scanner(self) -> ModerationOutputScanner:
+        return KeywordsOutputScanner(self)
+
+    def _matcher(self) -> KeywordMatcher:
+        return get_keyword_matcher(self.config.get("keywords", ""))
+
+    def _is_violated(self, data: dict[str, Any], matcher: KeywordMatcher) -> bool:
+        return any(matcher.search(str(value)) for value in data.values())
+
+
+class KeywordsOutputScanner(ModerationOutputScanner):
+    """增量扫描：只扫描新增文本，关键词自动机状态跨块保留"""
+
+    def __init__(self, moderation: KeywordsModeration):
+        super().__init__(moderation)
+        outputs_config = moderation.config.get("outputs_config", {})
+        self._enabled = bool(outputs_config.get("enabled"))
+        self._preset_response = outputs_config["preset_response"] if self._enabled else ""
+        self._stream = moderation._matcher().stream()
+
+    def feed(self, chunk: str) -> ModerationOutputsResult:
+        if not self._enabled:
+            return ModerationOutputsResult(flagged=False)
+        return ModerationOutputsResult(
+            flagged=self._stream.feed(chunk),
+            action=ModerationAction.DIRECT_OUTPUT,
+            preset_response=self._preset_response,
+        )
@@ -0,0 +1,9 @@
+from functools import lru_cache
+
+from app.core.utils.keyword_matcher import KeywordMatcher
+
+
+@lru_cache(maxsize=256)
+def get_keyword_matcher(keywords: str) -> KeywordMatcher:
+    """按关键词配置（换行分隔）缓存自动机，同一配置只构建一次"""
+    return KeywordMatcher([kw.strip() for kw in keywords.split("\n") if kw.strip()])
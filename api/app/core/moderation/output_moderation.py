@@ -1,6 +1,7 @@
 import logging
 from typing import Any
 
+from app.core.moderation.base import ModerationOutputScanner
 from app.core.moderation.factory import ModerationFactory
 
 logger = logging.getLogger(__name__)
@@ -24,6 +25,7 @@ class OutputModeration:
         self._last_checked_length: int = 0
         self._flagged = False
         self._preset_response = ""
+        self._scanner: ModerationOutputScanner | None = None
 
     @property
     def enabled(self) -> bool:
@@ -60,13 +62,16 @@ class OutputModeration:
             return False
 
         try:
-            moderation = ModerationFactory.create(
-                moderation_type=self._moderation_type,
-                app_id=self._app_id,
-                tenant_id=self._tenant_id,
-                config=self._config.get("config", {}),
-            )
-            result = moderation.moderation_for_outputs(self._accumulated_text)
+            if self._scanner is None:
+                moderation = ModerationFactory.create(
+                    moderation_type=self._moderation_type,
+                    app_id=self._app_id,
+                    tenant_id=self._tenant_id,
+                    config=self._config.get("config", {}),
+                )
+                self._scanner = moderation.create_output_scanner()
+            # 只提交上次检查后的新增文本，由 scanner 保留跨块状态
+            result = self._scanner.feed(text_to_check)
             self._last_checked_length = len(self._accumulated_text)
 
             if result.flagged:
@@ -20,7 +20,7 @@ from pypdf import PdfReader as pdf2_read
 
 from app.core.rag.common.file_utils import get_project_base_directory
 from app.core.rag.common.misc_utils import pip_install_torch
-from app.core.rag.deepdoc.vision import OCR, AscendLayoutRecognizer, LayoutRecognizer, Recognizer, TableStructureRecognizer
+from app.core.rag.deepdoc.vision import AscendLayoutRecognizer, LayoutRecognizer, Recognizer, TableStructureRecognizer, get_ocr
 from app.core.rag.app.picture import vision_llm_chunk as picture_vision_llm_chunk
 from app.core.rag.nlp import rag_tokenizer
 from app.core.rag.prompts.generator import vision_llm_describe_prompt
@@ -45,7 +45,7 @@ class RAGPdfParser:
 
         """
 
-        self.ocr = OCR()
+        self.ocr = get_ocr()
         self.parallel_limiter = None
         if settings.PARALLEL_DEVICES > 1:
             self.parallel_limiter = [trio.CapacityLimiter(1) for _ in range(settings.PARALLEL_DEVICES)]
@@ -268,7 +268,7 @@ class RAGPdfParser:
 
         start = timer()
         if not bxs:
-            self.boxes.append([])
+            self.boxes[pagenum - 1] = []
             return
         bxs = [(line[0], line[1][0]) for line in bxs]
         bxs = Recognizer.sort_Y_firstly(
@@ -324,7 +324,7 @@ class RAGPdfParser:
         bxs = [b for b in bxs if b["text"]]
         if self.mean_height[pagenum - 1] == 0:
             self.mean_height[pagenum - 1] = np.median([b["bottom"] - b["top"] for b in bxs])
-        self.boxes.append(bxs)
+        self.boxes[pagenum - 1] = bxs
 
     def _layouts_rec(self, ZM, drop=True):
         assert len(self.page_images) == len(self.boxes)
@@ -1092,6 +1092,9 @@ class RAGPdfParser:
                 self.page_cum_height.append(img.size[1] / zoomin)
                 return chars
 
+            # Pages may finish out of order; each one fills its own slot
+            self.boxes = [[] for _ in self.page_images]
+            page_concurrency = getattr(self.ocr, "page_concurrency", 1)
             if self.parallel_limiter:
                 async with trio.open_nursery() as nursery:
                     for i, img in enumerate(self.page_images):
@@ -1099,6 +1102,13 @@ class RAGPdfParser:
 
                         nursery.start_soon(__img_ocr, i, i % settings.PARALLEL_DEVICES, img, chars, self.parallel_limiter[i % settings.PARALLEL_DEVICES])
                         await trio.sleep(0.1)
+            elif page_concurrency > 1:
+                # Hand several pages to the OCR executor at once so it can batch across them
+                limiter = trio.CapacityLimiter(page_concurrency)
+                async with trio.open_nursery() as nursery:
+                    for i, img in enumerate(self.page_images):
+                        chars = __ocr_preprocess()
+                        nursery.start_soon(__img_ocr, i, 0, img, chars, limiter)
             else:
                 for i, img in enumerate(self.page_images):
                     chars = __ocr_preprocess()
@@ -5,6 +5,7 @@ import threading
 import pdfplumber
 
 from .ocr import OCR
+from .ocr_service import get_ocr
 from .recognizer import Recognizer
 from .layout_recognizer import AscendLayoutRecognizer
 from .layout_recognizer import LayoutRecognizer4YOLOv10 as LayoutRecognizer
@@ -67,6 +68,7 @@ def init_in_out(args):
 
 __all__ = [
     "OCR",
+    "get_ocr",
     "Recognizer",
     "LayoutRecognizer",
     "AscendLayoutRecognizer",
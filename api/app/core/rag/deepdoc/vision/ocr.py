@@ -3,6 +3,7 @@ import logging
 import copy
 import time
 import os
+from collections import defaultdict
 
 from huggingface_hub import snapshot_download
 
@@ -81,8 +82,10 @@ def load_model(model_dir, nm, device_id: int | None = None):
     options = ort.SessionOptions()
     options.enable_cpu_mem_arena = False
     options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
-    options.intra_op_num_threads = 2
-    options.inter_op_num_threads = 2
+    # Sessions loaded inside parse workers keep 2 threads each; the shared
+    # OCR service (ocr_service.py) sizes them to the cores of the host.
+    options.intra_op_num_threads = int(os.environ.get("OCR_INTRA_OP_NUM_THREADS", "2"))
+    options.inter_op_num_threads = int(os.environ.get("OCR_INTER_OP_NUM_THREADS", "2"))
 
     # https://github.com/microsoft/onnxruntime/issues/9509#issuecomment-951546580
     # Shrink GPU memory after execution
@@ -119,7 +122,7 @@ def load_model(model_dir, nm, device_id: int | None = None):
 class TextRecognizer:
     def __init__(self, model_dir, device_id: int | None = None):
         self.rec_image_shape = [int(v) for v in "3, 48, 320".split(",")]
-        self.rec_batch_num = 16
+        self.rec_batch_num = int(os.environ.get("OCR_REC_BATCH_NUM", "16"))
         postprocess_params = {
             'name': 'CTCLabelDecode',
             "character_dict_path": os.path.join(model_dir, "ocr.res"),
@@ -422,6 +425,7 @@ class TextDetector:
                               "unclip_ratio": 1.5, "use_dilation": False, "score_mode": "fast", "box_type": "quad"}
 
         self.postprocess_op = build_post_process(postprocess_params)
+        self.det_batch_num = int(os.environ.get("OCR_DET_BATCH_NUM", "8"))
         self.predictor, self.run_options = load_model(model_dir, 'det', device_id)
         self.input_tensor = self.predictor.get_inputs()[0]
 
@@ -487,33 +491,46 @@ class TextDetector:
         gc.collect()
 
     def __call__(self, img):
-        ori_im = img.copy()
-        data = {'image': img}
-
-        st = time.time()
-        data = transform(data, self.preprocess_op)
-        img, shape_list = data
-        if img is None:
-            return None, 0
-        img = np.expand_dims(img, axis=0)
-        shape_list = np.expand_dims(shape_list, axis=0)
-        img = img.copy()
-        input_dict = {}
-        input_dict[self.input_tensor.name] = img
-        for i in range(100000):
-            try:
-                outputs = self.predictor.run(None, input_dict, self.run_options)
-                break
-            except Exception as e:
-                if i >= 3:
-                    raise e
-                time.sleep(5)
+        dt_boxes, elapse = self.detect_batch([img])
+        return dt_boxes[0], elapse
 
-        post_result = self.postprocess_op({"maps": outputs[0]}, shape_list)
-        dt_boxes = post_result[0]['points']
-        dt_boxes = self.filter_tag_det_res(dt_boxes, ori_im.shape)
+    def detect_batch(self, img_list):
+        """Detect text boxes in several images, stacking images whose
+        preprocessed tensors share a shape into one inference batch.
 
-        return dt_boxes, time.time() - st
+        Returns a list aligned with img_list (None where preprocessing
+        dropped the image) and the elapsed time.
+        """
+        st = time.time()
+        dt_boxes_list = [None] * len(img_list)
+        groups = defaultdict(list)
+        for idx, img in enumerate(img_list):
+            data = transform({'image': img}, self.preprocess_op)
+            if data is None or data[0] is None:
+                continue
+            norm_img, shape = data
+            groups[norm_img.shape].append((idx, norm_img, shape))
+
+        for items in groups.values():
+            for beg in range(0, len(items), self.det_batch_num):
+                chunk = items[beg:beg + self.det_batch_num]
+                input_dict = {}
+                input_dict[self.input_tensor.name] = np.stack([norm_img for _, norm_img, _ in chunk])
+                for i in range(100000):
+                    try:
+                        outputs = self.predictor.run(None, input_dict, self.run_options)
+                        break
+                    except Exception as e:
+                        if i >= 3:
+                            raise e
+                        time.sleep(5)
+
+                shape_list = np.stack([shape for _, _, shape in chunk])
+                post_result = self.postprocess_op({"maps": outputs[0]}, shape_list)
+                for (idx, _, _), result in zip(chunk, post_result):
+                    dt_boxes_list[idx] = self.filter_tag_det_res(result['points'], img_list[idx].shape)
+
+        return dt_boxes_list, time.time() - st
 
     def __del__(self):
         self.close()
@@ -568,6 +585,11 @@ class OCR:
         self.crop_image_res_index = 0
 
     def get_rotate_crop_image(self, img, points):
+        dst_img = self.warp_crop_image(img, points)
+        return self.orient_crop_image(dst_img, self.recognize_scores)
+
+    @staticmethod
+    def warp_crop_image(img, points):
         '''
         img_height, img_width = img.shape[0:2]
         left = int(np.min(points[:, 0]))
@@ -596,26 +618,32 @@ class OCR:
             M, (img_crop_width, img_crop_height),
             borderMode=cv2.BORDER_REPLICATE,
             flags=cv2.INTER_CUBIC)
+        return dst_img
+
+    @staticmethod
+    def orient_crop_image(dst_img, recognize_scores):
+        """Pick the orientation of a tall crop that recognizes best.
+
+        recognize_scores maps a list of images to [(text, score), ...], so a
+        remote or batched recognizer can be plugged in.
+        """
         dst_img_height, dst_img_width = dst_img.shape[0:2]
         if dst_img_height * 1.0 / dst_img_width >= 1.5:
             # Try original orientation
-            rec_result = self.text_recognizer[0]([dst_img])
-            text, score = rec_result[0][0]
+            text, score = recognize_scores([dst_img])[0]
             best_score = score
             best_img = dst_img
 
             # Try clockwise 90° rotation
             rotated_cw = np.rot90(dst_img, k=3)
-            rec_result = self.text_recognizer[0]([rotated_cw])
-            rotated_cw_text, rotated_cw_score = rec_result[0][0]
+            rotated_cw_text, rotated_cw_score = recognize_scores([rotated_cw])[0]
             if rotated_cw_score > best_score:
                 best_score = rotated_cw_score
                 best_img = rotated_cw
 
             # Try counter-clockwise 90° rotation
             rotated_ccw = np.rot90(dst_img, k=1)
-            rec_result = self.text_recognizer[0]([rotated_ccw])
-            rotated_ccw_text, rotated_ccw_score = rec_result[0][0]
+            rotated_ccw_text, rotated_ccw_score = recognize_scores([rotated_ccw])[0]
             if rotated_ccw_score > best_score:
                 best_img = rotated_ccw
 
@@ -679,10 +707,27 @@ class OCR:
             return ""
         return text
 
-    def recognize_batch(self, img_list, device_id: int | None = None):
+    def detect_batch(self, img_list, device_id: int | None = None):
+        """Batched counterpart of detect: one result per image, in order."""
+        if device_id is None:
+            device_id = 0
+        dt_boxes_list, elapse = self.text_detector[device_id].detect_batch(img_list)
+        results = []
+        for dt_boxes in dt_boxes_list:
+            if dt_boxes is None:
+                results.append([])
+                continue
+            results.append([(box, ("", 0)) for box in self.sorted_boxes(dt_boxes)])
+        return results
+
+    def recognize_scores(self, img_list, device_id: int | None = None):
         if device_id is None:
             device_id = 0
         rec_res, elapse = self.text_recognizer[device_id](img_list)
+        return rec_res
+
+    def recognize_batch(self, img_list, device_id: int | None = None):
+        rec_res = self.recognize_scores(img_list, device_id)
         texts = []
         for i in range(len(rec_res)):
             text, score = rec_res[i]
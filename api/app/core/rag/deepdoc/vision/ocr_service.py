@@ -0,0 +1,301 @@
+"""
+Shared, batched OCR execution.
+
+Parsers used to run detection one page at a time and recognition one page of
+crops at a time, and every worker process loaded its own copy of the models.
+This module adds:
+
+- BatchedOCR: a process-wide executor. Concurrent callers (pages of one
+  document, or pages of several documents) submit detect / recognize requests;
+  a single inference thread gathers whatever arrives within OCR_BATCH_WAIT_MS
+  and runs it as one detection batch and one recognition batch.
+- An OCR service: one process per host owns the models, sizes the onnxruntime
+  sessions to the host's cores and serves BatchedOCR over a Unix socket:
+
+      OCR_SERVICE_ADDRESS=/run/ocr.sock OCR_SERVICE_AUTHKEY=... python -m app.core.rag.deepdoc.vision.ocr_service
+
+  Requests are pickled, so the service and its clients refuse to run without
+  OCR_SERVICE_AUTHKEY, and the socket is created owner/group-only.
+
+- RemoteOCR: the client used by parse workers when OCR_SERVICE_ADDRESS is set.
+
+get_ocr() picks the right one for the current process.
+"""
+import argparse
+import logging
+from abc import ABC, abstractmethod
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing.connection import Client, Listener
+
+from app.core.rag.common import settings
+from .ocr import OCR
+
+
+def _available_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _authkey() -> bytes:
+    # multiprocessing.connection unpickles what peers send; never serve it unauthenticated
+    authkey = os.environ.get("OCR_SERVICE_AUTHKEY")
+    if not authkey:
+        raise RuntimeError("OCR_SERVICE_AUTHKEY must be set to use the OCR service")
+    return authkey.encode()
+
+
+class OCRProxy(ABC):
+    """Parser-facing OCR interface built on detect and recognize_scores."""
+
+    drop_score = 0.5
+
+    def __init__(self):
+        # How many pages a parser should hand over at once so batches can form
+        self.page_concurrency = max(int(os.environ.get("OCR_PAGE_CONCURRENCY", "4")), 1)
+
+    @abstractmethod
+    def detect(self, img, device_id: int | None = None):
+        """Text boxes of one image: [(box, (text, score)), ...]"""
+
+    @abstractmethod
+    def recognize_scores(self, img_list, device_id: int | None = None):
+        """(text, score) for each crop in img_list"""
+
+    def get_rotate_crop_image(self, img, points):
+        dst_img = OCR.warp_crop_image(img, points)
+        return OCR.orient_crop_image(dst_img, self.recognize_scores)
+
+    def recognize_batch(self, img_list, device_id: int | None = None):
+        if not img_list:
+            return []
+        return [text if score >= self.drop_score else "" for text, score in self.recognize_scores(img_list)]
+
+
+class BatchedOCR(OCRProxy):
+    """Micro-batching executor around an OCR instance."""
+
+    def __init__(self, ocr: OCR | None = None, max_wait: float | None = None, max_requests: int | None = None):
+        super().__init__()
+        self._ocr = ocr
+        self.drop_score = ocr.drop_score if ocr is not None else OCRProxy.drop_score
+        if max_wait is None:
+            max_wait = float(os.environ.get("OCR_BATCH_WAIT_MS", "5")) / 1000
+        self.max_wait = max_wait
+        self.max_requests = max_requests or int(os.environ.get("OCR_BATCH_MAX_REQUESTS", "64"))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+
+    @property
+    def ocr(self) -> OCR:
+        if self._ocr is None:
+            with self._lock:
+                if self._ocr is None:
+                    self._ocr = OCR()
+        return self._ocr
+
+    def _submit(self, op: str, payload) -> Future:
+        # The inference thread does not survive a fork; start one per process
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue()
+                    threading.Thread(target=self._run, args=(self._queue,), name="ocr-batcher", daemon=True).start()
+                    self._pid = os.getpid()
+        future = Future()
+        self._queue.put((op, payload, future))
+        return future
+
+    def detect(self, img, device_id: int | None = None):
+        if img is None:
+            return []
+        return self._submit("detect", img).result()
+
+    def recognize_scores(self, img_list, device_id: int | None = None):
+        if not img_list:
+            return []
+        return self._submit("recognize", list(img_list)).result()
+
+    def _run(self, requests: queue.Queue):
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_requests:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+
+            self._execute([r for r in batch if r[0] == "detect"], self._detect)
+            self._execute([r for r in batch if r[0] == "recognize"], self._recognize)
+
+    @staticmethod
+    def _execute(requests, run):
+        if not requests:
+            return
+        try:
+            results = run([payload for _, payload, _ in requests])
+        except Exception as e:
+            for _, _, future in requests:
+                future.set_exception(e)
+            return
+        for (_, _, future), result in zip(requests, results):
+            future.set_result(result)
+
+    def _detect(self, images):
+        start = time.time()
+        results = self.ocr.detect_batch(images)
+        logging.debug(f"BatchedOCR detected {len(images)} images in {time.time() - start}s")
+        return results
+
+    def _recognize(self, crop_lists):
+        start = time.time()
+        scores = self.ocr.recognize_scores([crop for crops in crop_lists for crop in crops])
+        results, offset = [], 0
+        for crops in crop_lists:
+            results.append(scores[offset:offset + len(crops)])
+            offset += len(crops)
+        logging.debug(f"BatchedOCR recognized {offset} crops from {len(crop_lists)} requests in {time.time() - start}s")
+        return results
+
+
+class RemoteOCR(OCRProxy):
+    """Client of the host OCR service; one connection per calling thread."""
+
+    def __init__(self, address: str, authkey: bytes | None = None):
+        super().__init__()
+        self.address = address
+        self.authkey = authkey or _authkey()
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or getattr(self._local, "pid", None) != os.getpid():
+            conn = Client(self.address, authkey=self.authkey)
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def _call(self, op: str, payload):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((op, payload))
+                status, result = conn.recv()
+                break
+            except (EOFError, OSError):
+                # Service restarted: reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise
+        if status != "ok":
+            raise RuntimeError(f"OCR service {op} failed: {result}")
+        return result
+
+    def detect(self, img, device_id: int | None = None):
+        if img is None:
+            return []
+        return self._call("detect", img)
+
+    def recognize_scores(self, img_list, device_id: int | None = None):
+        if not img_list:
+            return []
+        return self._call("recognize", list(img_list))
+
+
+_shared_ocr = None
+_shared_ocr_lock = threading.Lock()
+
+
+def get_ocr():
+    """OCR for parsers in this process.
+
+    Uses the host OCR service when OCR_SERVICE_ADDRESS is set, otherwise a
+    process-wide BatchedOCR. Multi-device setups (PARALLEL_DEVICES > 0) keep
+    the plain per-device OCR.
+    """
+    global _shared_ocr
+    with _shared_ocr_lock:
+        if _shared_ocr is None:
+            address = os.environ.get("OCR_SERVICE_ADDRESS")
+            if address:
+                _shared_ocr = RemoteOCR(address)
+            elif settings.PARALLEL_DEVICES > 0:
+                _shared_ocr = OCR()
+            else:
+                _shared_ocr = BatchedOCR()
+        return _shared_ocr
+
+
+def _serve_connection(batcher: BatchedOCR, conn):
+    with conn:
+        while True:
+            try:
+                op, payload = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if op == "detect":
+                    result = batcher.detect(payload)
+                elif op == "recognize":
+                    result = batcher.recognize_scores(payload)
+                else:
+                    raise ValueError(f"unknown OCR op: {op}")
+                conn.send(("ok", result))
+            except Exception as e:
+                logging.exception(f"OCR service {op} failed")
+                conn.send(("error", repr(e)))
+
+
+def listen(address: str, authkey: bytes | None = None) -> Listener:
+    """Authenticated Unix socket listener for the OCR service."""
+    authkey = authkey or _authkey()
+    if os.path.exists(address):
+        # Stale socket from a previous run
+        os.unlink(address)
+    # Create the socket owner/group-only so it is never briefly world-accessible
+    umask = os.umask(0o117)
+    try:
+        return Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(umask)
+
+
+def serve(address: str, ocr: OCR | None = None):
+    batcher = BatchedOCR(ocr or OCR())
+    listener = listen(address)
+    logging.info(f"OCR service listening on {address}")
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                logging.warning(f"OCR service rejected a connection: {e}")
+                continue
+            threading.Thread(target=_serve_connection, args=(batcher, conn), daemon=True).start()
+    finally:
+        listener.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--address', help="Unix socket path. Default: $OCR_SERVICE_ADDRESS",
+                        default=os.environ.get("OCR_SERVICE_ADDRESS"))
+    args = parser.parse_args()
+    if not args.address:
+        parser.error("--address or OCR_SERVICE_ADDRESS is required")
+    if not os.environ.get("OCR_SERVICE_AUTHKEY"):
+        parser.error("OCR_SERVICE_AUTHKEY is required")
+
+    # This process owns the models for the whole host
+    os.environ.setdefault("OCR_INTRA_OP_NUM_THREADS", str(_available_cpus()))
+    logging.basicConfig(level=logging.INFO)
+    serve(args.address)
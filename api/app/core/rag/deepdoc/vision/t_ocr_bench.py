@@ -0,0 +1,64 @@
+import os
+import sys
+sys.path.insert(
+    0,
+    os.path.abspath(
+        os.path.join(
+            os.path.dirname(
+                os.path.abspath(__file__)),
+            '../../')))
+
+from . import OCR, init_in_out
+from .ocr_service import get_ocr
+import argparse
+import numpy as np
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# CPU throughput benchmark, e.g.
+#   python -m ...t_ocr_bench --inputs ./fixtures --mode local
+#   python -m ...t_ocr_bench --inputs ./fixtures --mode batched --concurrency 8
+#   OCR_SERVICE_ADDRESS=/run/ocr.sock python -m ...t_ocr_bench --inputs ./fixtures --mode batched
+os.environ.setdefault('CUDA_VISIBLE_DEVICES', '')
+
+
+def ocr_page(ocr, img):
+    # Same calls as RAGPdfParser.__ocr: detect, crop every box, recognize the crops
+    bxs = ocr.detect(img)
+    crops = [ocr.get_rotate_crop_image(img, np.array(box, dtype=np.float32)) for box, _ in bxs]
+    return [t for t in ocr.recognize_batch(crops) if t]
+
+
+def main(args):
+    images, _ = init_in_out(args)
+    pages = [np.array(img) for img in images]
+    if args.mode == "local":
+        # The current path: one page at a time on a per-process OCR
+        ocr, concurrency = OCR(), 1
+    else:
+        ocr = get_ocr()
+        concurrency = args.concurrency or getattr(ocr, "page_concurrency", 1)
+    # Warm up sessions before timing
+    ocr_page(ocr, pages[0])
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        texts = list(executor.map(lambda img: ocr_page(ocr, img), pages))
+    elapsed = time.time() - start
+    print("{} mode: {} pages, {} text lines, {:.2f}s, {:.2f} pages/s".format(
+        args.mode, len(pages), sum(len(t) for t in texts), elapsed, len(pages) / elapsed))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inputs',
+                        help="Directory where to store images or PDFs, or a file path to a single image or PDF",
+                        required=True)
+    parser.add_argument('--output_dir', help="Directory where to store the output images. Default: './ocr_outputs'",
+                        default="./ocr_outputs")
+    parser.add_argument('--mode', choices=["local", "batched"], default="batched",
+                        help="local: the per-process OCR, one page at a time; batched: get_ocr() with concurrent pages")
+    parser.add_argument('--concurrency', type=int, default=0,
+                        help="Pages in flight for batched mode. Default: OCR_PAGE_CONCURRENCY")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,183 @@
+"""
+Candidate pairs for entity resolution.
+
+EntityResolution only asks the LLM about pairs that pass is_similarity. Testing
+every pair of an entity type is quadratic, so candidate_pairs indexes the
+conditions is_similarity implies and verifies only the pairs that survive:
+
+- similar names have identical digit 2-grams, so names are partitioned by them
+- two English names need edit distance <= min(len) // 2, so they share at least
+  max(len) - min(len) // 2 characters (as multisets)
+- other names need a character-set overlap of 2 (fewer than 4 distinct
+  characters) or 80% of the larger set
+
+Both overlap conditions are indexed with prefix filtering, which never drops a
+pair that reaches the overlap, so the result equals the exhaustive comparison.
+"""
+from collections import Counter, defaultdict
+from itertools import chain
+
+import editdistance
+
+from app.core.rag.nlp import is_english
+
+
+def _has_digit(s):
+    return any(c.isdigit() for c in s)
+
+
+def _digit_2grams(s):
+    return frozenset(s[i:i + 2] for i in range(len(s) - 1) if _has_digit(s[i:i + 2]))
+
+
+def has_digit_in_2gram_diff(a, b):
+    def to_2gram_set(s):
+        return {s[i:i+2] for i in range(len(s) - 1)}
+
+    set_a = to_2gram_set(a)
+    set_b = to_2gram_set(b)
+    diff = set_a ^ set_b
+
+    return any(any(c.isdigit() for c in pair) for pair in diff)
+
+
+def is_similarity(a, b):
+    if has_digit_in_2gram_diff(a, b):
+        return False
+
+    if is_english(a) and is_english(b):
+        if editdistance.eval(a, b) <= min(len(a), len(b)) // 2:
+            return True
+        return False
+
+    a, b = set(a), set(b)
+    max_l = max(len(a), len(b))
+    if max_l < 4:
+        return len(a & b) > 1
+
+    return len(a & b)*1./max_l >= 0.8
+
+
+def _char_occurrences(s):
+    # A multiset of characters as a set: ('a', 1), ('a', 2), ...
+    seen = Counter()
+    tokens = []
+    for c in s:
+        seen[c] += 1
+        tokens.append((c, seen[c]))
+    return tokens
+
+
+def _char_set(s):
+    return list(set(s))
+
+
+def _edit_distance_min_overlap(n):
+    return n - n // 2
+
+
+def _edit_distance_length_ok(la, lb):
+    return abs(la - lb) <= min(la, lb) // 2
+
+
+def _edit_distance_similar(a, b):
+    return editdistance.eval(a, b) <= min(len(a), len(b)) // 2
+
+
+def _char_set_min_overlap(n):
+    return 2 if n < 4 else int(n * 0.8)
+
+
+def _char_set_length_ok(la, lb):
+    max_l = max(la, lb)
+    return max_l < 4 or min(la, lb) * 1. / max_l >= 0.8
+
+
+def _char_set_similar(a, b):
+    a, b = set(a), set(b)
+    max_l = max(len(a), len(b))
+    if max_l < 4:
+        return len(a & b) > 1
+
+    return len(a & b)*1./max_l >= 0.8
+
+
+def _prefix_filter_pairs(names, probes, tokenize, min_overlap, length_ok, similar, targets=None):
+    """Pairs (a, b) with a < b, a in probes, b in targets and similar(a, b).
+
+    With tokens in one global order, two token sets overlapping in at least t
+    tokens share a token among the first len - t + 1 tokens of each, so only
+    names sharing a prefix token are compared. min_overlap(n) must not exceed
+    the overlap any similar pair involving a record of n tokens needs.
+    """
+    tokens = {name: tokenize(name) for name in names}
+    freq = Counter(chain.from_iterable(tokens.values()))
+    prefixes = {}
+    for name, toks in tokens.items():
+        prefix_len = len(toks) - min_overlap(len(toks)) + 1
+        if prefix_len > 0:
+            # Rarest tokens first keeps the inverted lists short
+            prefixes[name] = sorted(toks, key=lambda tok: (freq[tok], tok))[:prefix_len]
+    # Inverted lists per (token, record size) so the length filter skips whole lists
+    index = defaultdict(list)
+    for name in names if targets is None else targets:
+        for tok in prefixes.get(name, ()):
+            index[tok, len(tokens[name])].append(name)
+    sizes = sorted({len(toks) for toks in tokens.values()})
+    allowed = {la: [lb for lb in sizes if length_ok(la, lb)] for la in sizes}
+
+    pairs, done = [], set()
+    for a in probes:
+        prefix = prefixes.get(a)
+        if not prefix:
+            continue
+        lists = [index[key] for lb in allowed[len(tokens[a])] for key in ((tok, lb) for tok in prefix) if key in index]
+        for b in set(chain.from_iterable(lists)):
+            # A pair of two probes is compared once
+            if b != a and b not in done and similar(a, b):
+                pairs.append((a, b) if a < b else (b, a))
+        done.add(a)
+    return pairs
+
+
+def candidate_pairs(names, subgraph_nodes):
+    """Similar pairs of names with at least one side in subgraph_nodes.
+
+    Same result and order as
+    [(a, b) for a, b in itertools.combinations(sorted(names), 2)
+     if (a in subgraph_nodes or b in subgraph_nodes) and is_similarity(a, b)]
+    """
+    names = sorted(set(names))
+    if not subgraph_nodes or len(names) < 2:
+        return []
+    blocks = defaultdict(list)
+    for name in names:
+        blocks[_digit_2grams(name)].append(name)
+
+    # Names in a block have the same digit 2-grams, the rest of is_similarity
+    # is split by is_english, computed once per name
+    english = {name for name in names if is_english(name)}
+    pairs = set()
+    for block in blocks.values():
+        probes = [name for name in block if name in subgraph_nodes]
+        if not probes or len(block) < 2:
+            continue
+        english_probes = [name for name in probes if name in english]
+        other_probes = [name for name in probes if name not in english]
+        others = [name for name in block if name not in english]
+        if english_probes:
+            # Both English: edit distance
+            pairs.update(_prefix_filter_pairs(
+                [name for name in block if name in english], english_probes, _char_occurrences,
+                _edit_distance_min_overlap, _edit_distance_length_ok, _edit_distance_similar,
+            ))
+        if others:
+            # At least one side not English: character-set overlap
+            pairs.update(_prefix_filter_pairs(
+                block, other_probes, _char_set, _char_set_min_overlap, _char_set_length_ok, _char_set_similar,
+            ))
+            pairs.update(_prefix_filter_pairs(
+                block, english_probes, _char_set, _char_set_min_overlap, _char_set_length_ok, _char_set_similar,
+                targets=others,
+            ))
+    return sorted(pairs)
@@ -1,5 +1,4 @@
 import logging
-import itertools
 import os
 import re
 from dataclasses import dataclass
@@ -9,8 +8,7 @@ import networkx as nx
 import trio
 
 from app.core.rag.graphrag.general.extractor import Extractor
-from app.core.rag.nlp import is_english
-import editdistance
+from app.core.rag.graphrag.entity_candidates import candidate_pairs, has_digit_in_2gram_diff, is_similarity
 from app.core.rag.graphrag.entity_resolution_prompt import ENTITY_RESOLUTION_PROMPT
 from app.core.rag.llm.chat_model import Base as CompletionLLM
 from app.core.rag.graphrag.utils import perform_variable_replacements, chat_limiter, GraphChange, has_canceled
@@ -79,7 +77,7 @@ class EntityResolution(Extractor):
 
         candidate_resolution = {entity_type: [] for entity_type in entity_types}
         for k, v in node_clusters.items():
-            candidate_resolution[k] = [(a, b) for a, b in itertools.combinations(v, 2) if (a in subgraph_nodes or b in subgraph_nodes) and self.is_similarity(a, b)]
+            candidate_resolution[k] = candidate_pairs(v, subgraph_nodes)
         num_candidates = sum([len(candidates) for _, candidates in candidate_resolution.items()])
         callback(msg=f"Identified {num_candidates} candidate pairs")
         remain_candidates_to_resolve = num_candidates
@@ -213,28 +211,8 @@ class EntityResolution(Extractor):
         return ans_list
 
     def _has_digit_in_2gram_diff(self, a, b):
-        def to_2gram_set(s):
-            return {s[i:i+2] for i in range(len(s) - 1)}
-
-        set_a = to_2gram_set(a)
-        set_b = to_2gram_set(b)
-        diff = set_a ^ set_b
-
-        return any(any(c.isdigit() for c in pair) for pair in diff)
+        return has_digit_in_2gram_diff(a, b)
 
     def is_similarity(self, a, b):
-        if self._has_digit_in_2gram_diff(a, b):
-            return False
-
-        if is_english(a) and is_english(b):
-            if editdistance.eval(a, b) <= min(len(a), len(b)) // 2:
-                return True
-            return False
-
-        a, b = set(a), set(b)
-        max_l = max(len(a), len(b))
-        if max_l < 4:
-            return len(a & b) > 1
-
-        return len(a & b)*1./max_l >= 0.8
+        return is_similarity(a, b)
 
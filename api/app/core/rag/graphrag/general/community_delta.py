@@ -0,0 +1,122 @@
+"""
+Incremental community reports.
+
+Leiden community ids are not stable between runs, so a community is identified
+by what it contains: a signature made of one hash per member entity (name and
+description) and one per edge inside the community (endpoints and
+description). A new community takes over the previous report it shares the
+most signature with; the report is regenerated only when the signature changed
+by more than a threshold. A kept report stores both the signature it was
+generated from and its current members' signature; the change is always
+measured against the former so small drifts can't add up across runs.
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+import networkx as nx
+
+DEFAULT_CHANGE_THRESHOLD = 0.2
+
+
+def _digest(*parts) -> str:
+    return hashlib.md5("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:16]
+
+
+def community_signature(graph: nx.Graph, nodes: list[str]) -> list[str]:
+    """Sorted hashes of the members and the edges between them."""
+    signature = {_digest("node", n, graph.nodes[n].get("description", "")) for n in nodes}
+    for u, v, data in graph.subgraph(nodes).edges(data=True):
+        u, v = sorted((u, v))
+        signature.add(_digest("edge", u, v, data.get("description", "")))
+    return sorted(signature)
+
+
+def change_ratio(old: list[str], new: list[str]) -> float:
+    """1 - Jaccard similarity of two signatures."""
+    old, new = set(old), set(new)
+    if not old and not new:
+        return 0.
+    return 1. - len(old & new) / len(old | new)
+
+
+@dataclass
+class CommunityPlan:
+    # (level, community id) -> community dict with "signature", report needed
+    regenerate: dict[tuple, dict] = field(default_factory=dict)
+    # (previous report, level, community id, community dict) kept without the LLM
+    reuse: list[tuple] = field(default_factory=list)
+    # previous report ids to delete: unmatched or replaced by a regenerated report
+    stale_ids: list[str] = field(default_factory=list)
+
+
+def plan_community_reports(
+    graph: nx.Graph,
+    communities: dict[str, dict[str, dict]],
+    previous_reports: list[dict] | None = None,
+    change_threshold: float = DEFAULT_CHANGE_THRESHOLD,
+) -> CommunityPlan:
+    """Decide which communities need a new report.
+
+    communities is leiden.run output, {level: {community id: {"weight", "nodes"}}};
+    communities with fewer than 2 members get no report. previous_reports are
+    the indexed reports, dicts with "id", "level", "entities", "signature" (the
+    one the report was generated from) and optionally "member_signature".
+    Each community gets a "signature" key.
+    """
+    plan = CommunityPlan()
+    previous_reports = previous_reports or []
+    # Reports indexed without a signature can't be matched and are replaced
+    plan.stale_ids.extend(r["id"] for r in previous_reports if not r.get("signature"))
+    previous_reports = [r for r in previous_reports if r.get("signature")]
+    by_member = {}
+    for i, report in enumerate(previous_reports):
+        for ent in report.get("entities") or []:
+            by_member.setdefault((str(report["level"]), ent), []).append(i)
+
+    # Score every (community, previous report) pair sharing a member, then
+    # match greedily from the most similar so each report is taken over once
+    keys, scored, current = [], [], {}
+    for level, comms in communities.items():
+        for cm_id, cm in comms.items():
+            if len(cm["nodes"]) < 2:
+                continue
+            cm["signature"] = community_signature(graph, cm["nodes"])
+            current[level, cm_id] = cm
+            keys.append((level, cm_id))
+            candidates = {i for ent in cm["nodes"] for i in by_member.get((str(level), ent), [])}
+            for i in candidates:
+                scored.append((change_ratio(previous_reports[i]["signature"], cm["signature"]), i, len(keys) - 1))
+    scored.sort()
+
+    matched, taken = {}, set()
+    for ratio, i, k in scored:
+        if keys[k] in matched or i in taken:
+            continue
+        matched[keys[k]] = (i, ratio)
+        taken.add(i)
+
+    for key, cm in current.items():
+        if key in matched and matched[key][1] <= change_threshold:
+            i = matched[key][0]
+            plan.reuse.append((previous_reports[i], key[0], key[1], cm))
+        else:
+            plan.regenerate[key] = cm
+            if key in matched:
+                plan.stale_ids.append(previous_reports[matched[key][0]]["id"])
+    plan.stale_ids.extend(r["id"] for i, r in enumerate(previous_reports) if i not in taken)
+    return plan
+
+
+def reindex_structure(previous: dict, level, cm: dict) -> dict | None:
+    """Structure to re-index a kept report with its current members, None when
+    they didn't change. The generation signature is carried over unchanged."""
+    if (previous.get("member_signature") or previous["signature"]) == cm["signature"]:
+        return None
+    return {
+        "weight": cm["weight"],
+        "entities": cm["nodes"],
+        "level": level,
+        "signature": previous["signature"],
+        "member_signature": cm["signature"],
+    }
+
@@ -10,13 +10,14 @@ import json
 import os
 import re
 from typing import Callable
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 import networkx as nx
 import pandas as pd
 
 from app.core.rag.common.exceptions import TaskCanceledException
 from app.core.rag.common.connection_utils import timeout
 from app.core.rag.graphrag.general import leiden
+from app.core.rag.graphrag.general.community_delta import DEFAULT_CHANGE_THRESHOLD, plan_community_reports
 from app.core.rag.graphrag.general.community_report_prompt import COMMUNITY_REPORT_PROMPT
 from app.core.rag.graphrag.general.extractor import Extractor
 from app.core.rag.graphrag.general.leiden import add_community_info2graph
@@ -32,6 +33,10 @@ class CommunityReportsResult:
 
     output: list[str]
     structured_output: list[dict]
+    # (previous report, level, community id, community) kept without a new report
+    reused: list[tuple] = field(default_factory=list)
+    # previous report ids that are no longer valid
+    stale_ids: list[str] = field(default_factory=list)
 
 
 class CommunityReportsExtractor(Extractor):
@@ -52,18 +57,28 @@ class CommunityReportsExtractor(Extractor):
         self._extraction_prompt = COMMUNITY_REPORT_PROMPT
         self._max_report_length = max_report_length or 1500
 
-    async def __call__(self, graph: nx.Graph, callback: Callable | None = None, task_id: str = ""):
+    async def __call__(self, graph: nx.Graph, callback: Callable | None = None, task_id: str = "",
+                       previous_reports: list[dict] | None = None, change_threshold: float | None = None):
+        """Reports for the communities whose signature changed beyond change_threshold
+        since previous_reports; the other previous reports are returned in reused."""
         enable_timeout_assertion = os.environ.get("ENABLE_TIMEOUT_ASSERTION")
+        if change_threshold is None:
+            change_threshold = float(os.environ.get("GRAPHRAG_COMMUNITY_CHANGE_THRESHOLD", DEFAULT_CHANGE_THRESHOLD))
         for node_degree in graph.degree:
             graph.nodes[str(node_degree[0])]["rank"] = int(node_degree[1])
 
         communities: dict[int, dict[str, dict]] = leiden.run(graph, {})
-        total = sum([len(comm.items()) for _, comm in communities.items()])
+        plan = plan_community_reports(graph, communities, previous_reports, change_threshold)
+        for previous, _, _, cm in plan.reuse:
+            add_community_info2graph(graph, cm["nodes"], previous["title"])
+        total = len(plan.regenerate)
+        if callback:
+            callback(msg=f"Communities: {total} to report, {len(plan.reuse)} reports kept")
         res_str = []
         res_dict = []
         over, token_count = 0, 0
         @timeout(120)
-        async def extract_community_report(community):
+        async def extract_community_report(level, community):
             nonlocal res_str, res_dict, over, token_count
             if task_id:
                 if has_canceled(task_id):
@@ -133,6 +148,8 @@ class CommunityReportsExtractor(Extractor):
                 return
             response["weight"] = weight
             response["entities"] = ents
+            response["level"] = level
+            response["signature"] = cm["signature"]
             add_community_info2graph(graph, ents, response["title"])
             res_str.append(self._get_text_output(response))
             res_dict.append(response)
@@ -144,17 +161,19 @@ class CommunityReportsExtractor(Extractor):
         async with trio.open_nursery() as nursery:
             for level, comm in communities.items():
                 logging.info(f"Level {level}: Community: {len(comm.keys())}")
-                for community in comm.items():
-                    if task_id and has_canceled(task_id):
-                        logging.info(f"Task {task_id} cancelled before community processing.")
-                        raise TaskCanceledException(f"Task {task_id} was cancelled")
-                    nursery.start_soon(extract_community_report, community)
+            for (level, cm_id), cm in plan.regenerate.items():
+                if task_id and has_canceled(task_id):
+                    logging.info(f"Task {task_id} cancelled before community processing.")
+                    raise TaskCanceledException(f"Task {task_id} was cancelled")
+                nursery.start_soon(extract_community_report, level, (cm_id, cm))
         if callback:
             callback(msg=f"Community reports done in {trio.current_time() - st:.2f}s, used tokens: {token_count}")
 
         return CommunityReportsResult(
             structured_output=res_dict,
             output=res_str,
+            reused=plan.reuse,
+            stale_ids=plan.stale_ids,
         )
 
     def _get_text_output(self, parsed_output: dict) -> str:
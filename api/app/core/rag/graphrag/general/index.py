@@ -11,6 +11,7 @@ from app.core.rag.common.misc_utils import get_uuid
 from app.core.rag.common.connection_utils import timeout
 from app.core.rag.graphrag.entity_resolution import EntityResolution
 from app.core.rag.graphrag.general.community_reports_extractor import CommunityReportsExtractor
+from app.core.rag.graphrag.general.community_delta import reindex_structure
 from app.core.rag.graphrag.general.extractor import Extractor
 from app.core.rag.graphrag.general.graph_extractor import GraphExtractor as GeneralKGExt
 from app.core.rag.graphrag.light.graph_extractor import GraphExtractor as LightKGExt
@@ -18,8 +19,9 @@ from app.core.rag.graphrag.utils import (
     GraphChange,
     chunk_id,
     does_graph_contains,
+    get_community_reports,
     get_graph,
-    graph_merge,
+    graphs_merge,
     set_graph,
     tidy_graph,
     has_canceled,
@@ -256,23 +258,13 @@ async def run_graphrag_for_kb(
         raise TaskCanceledException(f"Task {row['id']} was cancelled")
 
     try:
-        union_nodes: set = set()
-        final_graph = None
-
-        for document_id in ok_documents:
-            sg = subgraphs[document_id]
-            union_nodes.update(set(sg.nodes()))
-
-            new_graph = await merge_subgraph(
-                workspace_id,
-                kb_id,
-                document_id,
-                sg,
-                embedding_model,
-                callback,
-            )
-            if new_graph is not None:
-                final_graph = new_graph
+        final_graph = await merge_subgraphs(
+            workspace_id,
+            kb_id,
+            {document_id: subgraphs[document_id] for document_id in ok_documents},
+            embedding_model,
+            callback,
+        )
 
         if final_graph is None:
             callback(msg=f"[GraphRAG] kb:{kb_id} merge finished (no in-memory graph returned).")
@@ -421,24 +413,41 @@ async def merge_subgraph(
     embedding_model,
     callback,
 ):
+    return await merge_subgraphs(workspace_id, kb_id, {document_id: subgraph}, embedding_model, callback)
+
+
+async def merge_subgraphs(
+    workspace_id: str,
+    kb_id: str,
+    subgraphs: dict[str, nx.Graph],
+    embedding_model,
+    callback,
+):
+    """Merge the subgraphs of several documents into the KB graph.
+
+    The graph is loaded, ranked and persisted once for the whole batch.
+    """
     start = trio.current_time()
     change = GraphChange()
-    old_graph = await get_graph(workspace_id, kb_id, subgraph.graph["source_id"])
+    exclude_rebuild = [source for sg in subgraphs.values() for source in sg.graph["source_id"]]
+    old_graph = await get_graph(workspace_id, kb_id, exclude_rebuild)
+    graphs = list(subgraphs.values())
     if old_graph is not None:
         logging.info("Merge with an exiting graph...................")
         tidy_graph(old_graph, callback)
-        new_graph = graph_merge(old_graph, subgraph, change)
+        new_graph = graphs_merge(old_graph, graphs, change)
     else:
-        new_graph = subgraph
+        new_graph = graphs[0]
         change.added_updated_nodes = set(new_graph.nodes())
         change.added_updated_edges = set(new_graph.edges())
+        graphs_merge(new_graph, graphs[1:], change)
     pr = nx.pagerank(new_graph)
     for node_name, pagerank in pr.items():
         new_graph.nodes[node_name]["pagerank"] = pagerank
 
     await set_graph(workspace_id, kb_id, embedding_model, new_graph, change, callback)
     now = trio.current_time()
-    callback(msg=f"merging subgraph for document {document_id} into the global graph done in {now - start:.2f} seconds.")
+    callback(msg=f"merging subgraphs for {len(subgraphs)} documents into the global graph done in {now - start:.2f} seconds.")
     return new_graph
 
 
@@ -494,10 +503,11 @@ async def extract_community(
         raise TaskCanceledException(f"Task {task_id} was cancelled")
 
     start = trio.current_time()
+    previous_reports = await get_community_reports(workspace_id, kb_id)
     ext = CommunityReportsExtractor(
         llm_bdl,
     )
-    cr = await ext(graph, callback=callback, task_id=task_id)
+    cr = await ext(graph, callback=callback, task_id=task_id, previous_reports=previous_reports)
 
     if task_id and has_canceled(task_id):
         callback(msg=f"Task {task_id} cancelled during community extraction.")
@@ -508,7 +518,7 @@ async def extract_community(
     document_ids = graph.graph["source_id"]
 
     now = trio.current_time()
-    callback(msg=f"Graph extracted {len(cr.structured_output)} communities in {now - start:.2f}s.")
+    callback(msg=f"Graph extracted {len(cr.structured_output)} communities in {now - start:.2f}s, kept {len(cr.reused)} reports.")
     start = now
     if task_id and has_canceled(task_id):
         callback(msg=f"Task {task_id} cancelled during community indexing.")
@@ -520,41 +530,56 @@ async def extract_community(
             "report": rep,
             "evidences": "\n".join([f.get("explanation", "") for f in stru["findings"]]),
         }
-        chunk = {
-            "id": get_uuid(),
-            "docnm_kwd": stru["title"],
-            "title_tks": rag_tokenizer.tokenize(stru["title"]),
-            "page_content": json.dumps(obj, ensure_ascii=False),
-            "content_ltks": rag_tokenizer.tokenize(obj["report"] + " " + obj["evidences"]),
-            "knowledge_graph_kwd": "community_report",
-            "weight_flt": stru["weight"],
-            "entities_kwd": stru["entities"],
-            "important_kwd": stru["entities"],
-            "kb_id": kb_id,
-            "source_id": list(document_ids),
-            "available_int": 0,
-        }
-        chunk["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(chunk["content_ltks"])
-        chunks.append(chunk)
+        chunks.append(_community_report_chunk(get_uuid(), stru["title"], obj, stru, kb_id, document_ids))
+    # Kept reports whose community changed within the threshold are re-indexed
+    # under the same id with the new members, without a new report
+    for previous, level, _, cm in cr.reused:
+        stru = reindex_structure(previous, level, cm)
+        if stru is None:
+            continue
+        chunks.append(_community_report_chunk(previous["id"], previous["title"], json.loads(previous["page_content"]), stru, kb_id, document_ids))
 
-    await trio.to_thread.run_sync(
-        lambda: settings.docStoreConn.delete(
-            {"knowledge_graph_kwd": "community_report", "kb_id": kb_id},
-            search.index_name(workspace_id),
-            kb_id,
-        )
-    )
     es_bulk_size = 4
     for b in range(0, len(chunks), es_bulk_size):
         document_store_result = await trio.to_thread.run_sync(lambda: settings.docStoreConn.insert(chunks[b : b + es_bulk_size], search.index_name(workspace_id), kb_id))
         if document_store_result:
             error_message = f"Insert chunk error: {document_store_result}, please check log file and Elasticsearch status!"
             raise Exception(error_message)
+    if cr.stale_ids:
+        await trio.to_thread.run_sync(
+            lambda: settings.docStoreConn.delete(
+                {"id": cr.stale_ids},
+                search.index_name(workspace_id),
+                kb_id,
+            )
+        )
 
     if task_id and has_canceled(task_id):
         callback(msg=f"Task {task_id} cancelled after community indexing.")
         raise TaskCanceledException(f"Task {task_id} was cancelled")
 
     now = trio.current_time()
-    callback(msg=f"Graph indexed {len(cr.structured_output)} communities in {now - start:.2f}s.")
+    callback(msg=f"Graph indexed {len(chunks)} communities, removed {len(cr.stale_ids)} in {now - start:.2f}s.")
     return community_structure, community_reports
+
+
+def _community_report_chunk(id, title, obj, stru, kb_id, document_ids):
+    chunk = {
+        "id": id,
+        "docnm_kwd": title,
+        "title_tks": rag_tokenizer.tokenize(title),
+        "page_content": json.dumps(obj, ensure_ascii=False),
+        "content_ltks": rag_tokenizer.tokenize(obj["report"] + " " + obj["evidences"]),
+        "knowledge_graph_kwd": "community_report",
+        "weight_flt": stru["weight"],
+        "entities_kwd": stru["entities"],
+        "important_kwd": stru["entities"],
+        "community_level_int": int(stru["level"]),
+        "community_signature_list": stru["signature"],
+        "community_member_signature_list": stru.get("member_signature", stru["signature"]),
+        "kb_id": kb_id,
+        "source_id": list(document_ids),
+        "available_int": 0,
+    }
+    chunk["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(chunk["content_ltks"])
+    return chunk
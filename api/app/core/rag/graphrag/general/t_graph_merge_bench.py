@@ -0,0 +1,154 @@
+import argparse
+import json
+import random
+import time
+
+import networkx as nx
+from networkx.readwrite import json_graph
+
+from app.core.rag.graphrag.utils import (
+    GRAPH_FIELD_SEP,
+    GraphChange,
+    get_from_to,
+    graph_to_chunks,
+    graphs_merge,
+    tidy_graph,
+)
+
+# Merging a batch of document subgraphs into an existing KB graph: one
+# load/rank/save cycle per document versus one for the whole batch. Storage and
+# embeddings are left out; the graph is round-tripped through the same JSON
+# chunks get_graph/set_graph read and write, e.g.
+#   python -m app.core.rag.graphrag.general.t_graph_merge_bench --nodes 10000 --docs 200
+
+
+def legacy_graph_merge(g1, g2, change):
+    """The previous graph_merge: one subgraph at a time, ranks updated after each one."""
+    for node_name, attr in g2.nodes(data=True):
+        change.added_updated_nodes.add(node_name)
+        if not g1.has_node(node_name):
+            g1.add_node(node_name, **attr)
+            continue
+        node = g1.nodes[node_name]
+        node["description"] += GRAPH_FIELD_SEP + attr["description"]
+        node["source_id"] += attr["source_id"]
+
+    for source, target, attr in g2.edges(data=True):
+        change.added_updated_edges.add(get_from_to(source, target))
+        edge = g1.get_edge_data(source, target)
+        if edge is None:
+            g1.add_edge(source, target, **attr)
+            continue
+        edge["weight"] += attr.get("weight", 0)
+        edge["description"] += GRAPH_FIELD_SEP + attr["description"]
+        edge["keywords"] += attr["keywords"]
+        edge["source_id"] += attr["source_id"]
+
+    for node_degree in g1.degree:
+        g1.nodes[str(node_degree[0])]["rank"] = int(node_degree[1])
+    if "source_id" not in g1.graph:
+        g1.graph["source_id"] = []
+    g1.graph["source_id"] += g2.graph.get("source_id", [])
+    return g1
+
+
+def legacy_subgraph_contents(graph):
+    """The previous set_graph subgraph chunks: one full node scan per source document."""
+    contents = []
+    for source in graph.graph["source_id"]:
+        subgraph = graph.subgraph([n for n in graph.nodes if source in graph.nodes[n]["source_id"]]).copy()
+        subgraph.graph["source_id"] = [source]
+        for n in subgraph.nodes:
+            subgraph.nodes[n]["source_id"] = [source]
+        contents.append(json.dumps(nx.node_link_data(subgraph, edges="edges"), ensure_ascii=False))
+    return contents
+
+
+def graph_state(graph, digits=9):
+    """Nodes, edges and graph attributes in a comparable form (pagerank rounded)."""
+    def attrs(data):
+        return {k: round(v, digits) if k == "pagerank" else v for k, v in data.items()}
+
+    return (
+        {n: attrs(d) for n, d in graph.nodes(data=True)},
+        {get_from_to(a, b): attrs(d) for a, b, d in graph.edges(data=True)},
+        dict(graph.graph),
+    )
+
+
+def _subgraph(rng, doc_id, entities, size):
+    graph = nx.Graph(source_id=[doc_id])
+    nodes = rng.sample(entities, size)
+    for n in nodes:
+        graph.add_node(n, entity_type="ORGANIZATION", description=f"{n} in {doc_id}", source_id=[doc_id])
+    for _ in range(size * 2):
+        a, b = rng.sample(nodes, 2)
+        graph.add_edge(a, b, description=f"{a} - {b} in {doc_id}", keywords=[], weight=1.0, source_id=[doc_id])
+    return graph
+
+
+def build(nodes, docs, doc_size, seed=0):
+    """An existing graph made of `nodes // doc_size` documents and `docs` new document subgraphs."""
+    rng = random.Random(seed)
+    entities = [f"ENTITY {i}" for i in range(nodes)]
+    graph = nx.Graph()
+    graphs_merge(graph, [_subgraph(rng, f"old-{i}", entities, doc_size) for i in range(nodes // doc_size)], GraphChange())
+    payload = json.dumps(json_graph.node_link_data(graph, edges="edges"), ensure_ascii=False)
+    return payload, {f"new-{i}": _subgraph(rng, f"new-{i}", entities, doc_size) for i in range(docs)}
+
+
+def _load(payload):
+    return json_graph.node_link_graph(json.loads(payload), edges="edges")
+
+
+def _rank_and_save(graph):
+    for node_name, pagerank in nx.pagerank(graph).items():
+        graph.nodes[node_name]["pagerank"] = pagerank
+    return graph_to_chunks("kb", graph)[0]["page_content"]
+
+
+def per_document(payload, subgraphs):
+    # The previous run_graphrag_for_kb loop: merge_subgraph once per document
+    changed = 0
+    for sg in subgraphs.values():
+        change = GraphChange()
+        graph = _load(payload)
+        tidy_graph(graph, None)
+        legacy_graph_merge(graph, sg, change)
+        payload = _rank_and_save(graph)
+        changed += len(change.added_updated_nodes)
+    return payload, changed
+
+
+def batch(payload, subgraphs):
+    change = GraphChange()
+    graph = _load(payload)
+    tidy_graph(graph, None)
+    graphs_merge(graph, list(subgraphs.values()), change)
+    return _rank_and_save(graph), len(change.added_updated_nodes)
+
+
+def main(args):
+    states = {}
+    for name, merge in [("batch", batch), ("per document", per_document)]:
+        payload, subgraphs = build(args.nodes, args.docs, args.doc_size)
+        start = time.time()
+        result, changed = merge(payload, subgraphs)
+        graph = _load(result)
+        print("{}: {} documents into {} nodes in {:.2f}s, {} node embeddings, result {} nodes / {} edges".format(
+            name, args.docs, args.nodes, time.time() - start, changed, graph.number_of_nodes(), graph.number_of_edges()))
+        states[name] = graph_state(graph)
+        if name == "batch":
+            subgraph_chunks = [c["page_content"] for c in graph_to_chunks("kb", graph)[1:]]
+            assert subgraph_chunks == legacy_subgraph_contents(graph), "subgraph chunks differ"
+    assert states["batch"] == states["per document"], "batch and per-document merges differ"
+    print("batch and per-document results are identical")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--nodes', type=int, default=10000, help="Entities in the existing graph")
+    parser.add_argument('--docs', type=int, default=200, help="New document subgraphs to merge")
+    parser.add_argument('--doc-size', type=int, default=30, help="Entities per document subgraph")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,80 @@
+import argparse
+import itertools
+import random
+import time
+
+from app.core.rag.graphrag.entity_candidates import candidate_pairs, is_similarity
+
+# Candidate generation for entity resolution on synthetic entity names, e.g.
+#   python -m app.core.rag.graphrag.t_entity_resolution_bench --size 100000 --new 500
+#   python -m app.core.rag.graphrag.t_entity_resolution_bench --size 5000 --check
+
+SYLLABLES = [c + v + e for c in ["", "b", "ch", "d", "f", "g", "h", "k", "l", "m", "n", "p", "r", "s", "t", "v", "w", "z"]
+             for v in ["a", "e", "i", "o", "u", "ai", "ou"] for e in ["", "n", "r", "s"]]
+SUFFIXES = ["", "", "", " INC", " LTD", " GROUP", " UNIVERSITY", " BANK", " 2024", " V2"]
+HANZI = "张王李赵刘陈杨黄周吴徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈姚卢姜崔钟谭陆汪范金石廖贾夏韦付方白邹孟熊秦邱江尹薛闫段雷侯龙史陶黎贺顾毛郝龚邵万钱严覃武戴莫孔向汤"
+CN_SUFFIXES = ["", "", "公司", "集团", "大学", "银行", "研究院"]
+
+
+def _typo(name, rng):
+    i = rng.randrange(len(name))
+    op = rng.randrange(3)
+    if op == 0:
+        return name[:i] + name[i + 1:]
+    c = rng.choice("abcdefghijklmnopqrstuvwxyz").upper()
+    if op == 1:
+        return name[:i] + c + name[i + 1:]
+    return name[:i] + c + name[i:]
+
+
+def build_names(size, seed=0):
+    """English and Chinese entity names; about 10% are near-duplicates of earlier names."""
+    rng = random.Random(seed)
+    names, ordered = set(), []
+    while len(names) < size:
+        if ordered and rng.random() < 0.1:
+            base = rng.choice(ordered)
+            name = base + rng.choice(HANZI) if base[0] in HANZI else _typo(base, rng)
+        elif rng.random() < 0.7:
+            words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(rng.randint(1, 3))]
+            name = " ".join(words).upper() + rng.choice(SUFFIXES)
+        else:
+            name = "".join(rng.choice(HANZI) for _ in range(rng.randint(2, 6))) + rng.choice(CN_SUFFIXES)
+        name = name.strip()
+        if name and name not in names:
+            names.add(name)
+            ordered.append(name)
+    return sorted(names)
+
+
+def exhaustive_pairs(names, subgraph_nodes):
+    # The previous candidate generation in EntityResolution.__call__
+    return [(a, b) for a, b in itertools.combinations(sorted(names), 2)
+            if (a in subgraph_nodes or b in subgraph_nodes) and is_similarity(a, b)]
+
+
+def main(args):
+    names = build_names(args.size)
+    rng = random.Random(1)
+    subgraph_nodes = set(names) if args.new <= 0 else set(rng.sample(names, min(args.new, len(names))))
+
+    start = time.time()
+    pairs = candidate_pairs(names, subgraph_nodes)
+    elapsed = time.time() - start
+    print("{} names, {} new: {} candidate pairs in {:.2f}s".format(len(names), len(subgraph_nodes), len(pairs), elapsed))
+
+    if args.check:
+        start = time.time()
+        expected = exhaustive_pairs(names, subgraph_nodes)
+        print("exhaustive: {} pairs in {:.2f}s".format(len(expected), time.time() - start))
+        assert pairs == expected, "candidate pairs differ from the exhaustive comparison"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=10000, help="Number of entity names")
+    parser.add_argument('--new', type=int, default=0,
+                        help="Names treated as newly added subgraph nodes. Default: all (initial build)")
+    parser.add_argument('--check', action="store_true", help="Compare with the exhaustive pairwise comparison")
+    args = parser.parse_args()
+    main(args)
@@ -198,34 +198,41 @@ def get_from_to(node1, node2):
 
 def graph_merge(g1: nx.Graph, g2: nx.Graph, change: GraphChange):
     """Merge graph g2 into g1 in place."""
-    for node_name, attr in g2.nodes(data=True):
-        change.added_updated_nodes.add(node_name)
-        if not g1.has_node(node_name):
-            g1.add_node(node_name, **attr)
-            continue
-        node = g1.nodes[node_name]
-        node["description"] += GRAPH_FIELD_SEP + attr["description"]
-        # A node's source_id indicates which chunks it came from.
-        node["source_id"] += attr["source_id"]
-
-    for source, target, attr in g2.edges(data=True):
-        change.added_updated_edges.add(get_from_to(source, target))
-        edge = g1.get_edge_data(source, target)
-        if edge is None:
-            g1.add_edge(source, target, **attr)
-            continue
-        edge["weight"] += attr.get("weight", 0)
-        edge["description"] += GRAPH_FIELD_SEP + attr["description"]
-        edge["keywords"] += attr["keywords"]
-        # A edge's source_id indicates which chunks it came from.
-        edge["source_id"] += attr["source_id"]
+    return graphs_merge(g1, [g2], change)
+
+
+def graphs_merge(g1: nx.Graph, graphs: list[nx.Graph], change: GraphChange):
+    """Merge graphs into g1 in place, updating node ranks once at the end."""
+    for g2 in graphs:
+        for node_name, attr in g2.nodes(data=True):
+            change.added_updated_nodes.add(node_name)
+            if not g1.has_node(node_name):
+                g1.add_node(node_name, **attr)
+                continue
+            node = g1.nodes[node_name]
+            node["description"] += GRAPH_FIELD_SEP + attr["description"]
+            # A node's source_id indicates which chunks it came from.
+            node["source_id"] += attr["source_id"]
+
+        for source, target, attr in g2.edges(data=True):
+            change.added_updated_edges.add(get_from_to(source, target))
+            edge = g1.get_edge_data(source, target)
+            if edge is None:
+                g1.add_edge(source, target, **attr)
+                continue
+            edge["weight"] += attr.get("weight", 0)
+            edge["description"] += GRAPH_FIELD_SEP + attr["description"]
+            edge["keywords"] += attr["keywords"]
+            # A edge's source_id indicates which chunks it came from.
+            edge["source_id"] += attr["source_id"]
+
+        # A graph's source_id indicates which documents it came from.
+        if "source_id" not in g1.graph:
+            g1.graph["source_id"] = []
+        g1.graph["source_id"] += g2.graph.get("source_id", [])
 
     for node_degree in g1.degree:
         g1.nodes[str(node_degree[0])]["rank"] = int(node_degree[1])
-    # A graph's source_id indicates which documents it came from.
-    if "source_id" not in g1.graph:
-        g1.graph["source_id"] = []
-    g1.graph["source_id"] += g2.graph.get("source_id", [])
     return g1
 
 
@@ -423,32 +430,38 @@ async def get_graph(workspace_id, kb_id, exclude_rebuild=None):
     return result
 
 
-async def set_graph(workspace_id: str, kb_id: str, embd_mdl, graph: nx.Graph, change: GraphChange, callback):
-    global chat_limiter
-    start = trio.current_time()
-
-    await trio.to_thread.run_sync(settings.docStoreConn.delete, {"knowledge_graph_kwd": ["graph", "subgraph"]}, search.index_name(workspace_id), kb_id)
-
-    if change.removed_nodes:
-        await trio.to_thread.run_sync(settings.docStoreConn.delete, {"knowledge_graph_kwd": ["entity"], "entity_kwd": sorted(change.removed_nodes)}, search.index_name(workspace_id), kb_id)
-
-    if change.removed_edges:
-
-        async def del_edges(from_node, to_node):
-            async with chat_limiter:
-                await trio.to_thread.run_sync(
-                    settings.docStoreConn.delete, {"knowledge_graph_kwd": ["relation"], "from_entity_kwd": from_node, "to_entity_kwd": to_node}, search.index_name(workspace_id), kb_id
-                )
-
-        async with trio.open_nursery() as nursery:
-            for from_node, to_node in change.removed_edges:
-                nursery.start_soon(del_edges, from_node, to_node)
+async def get_community_reports(workspace_id, kb_id) -> list[dict]:
+    """Indexed community reports with what incremental regeneration needs."""
+    flds = ["docnm_kwd", "page_content", "entities_kwd", "community_level_int", "community_signature_list", "community_member_signature_list"]
+    reports = []
+    bs = 256
+    for i in range(0, 1024 * bs, bs):
+        es_res = await trio.to_thread.run_sync(
+            lambda: settings.docStoreConn.search(flds, [], {"kb_id": kb_id, "knowledge_graph_kwd": ["community_report"]}, [], OrderByExpr(), i, bs, search.index_name(workspace_id), [kb_id])
+        )
+        es_res = settings.docStoreConn.getFields(es_res, flds)
+        if len(es_res) == 0:
+            break
+        for id, d in es_res.items():
+            entities = d.get("entities_kwd") or []
+            signature = d.get("community_signature_list") or []
+            member_signature = d.get("community_member_signature_list") or []
+            reports.append({
+                "id": id,
+                "title": d.get("docnm_kwd", ""),
+                "page_content": d.get("page_content", "{}"),
+                "entities": [entities] if isinstance(entities, str) else entities,
+                "level": d.get("community_level_int", ""),
+                "signature": [signature] if isinstance(signature, str) else signature,
+                "member_signature": [member_signature] if isinstance(member_signature, str) else member_signature,
+            })
+        if len(es_res) < bs:
+            break
+    return reports
 
-    now = trio.current_time()
-    if callback:
-        callback(msg=f"set_graph removed {len(change.removed_nodes)} nodes and {len(change.removed_edges)} edges from index in {now - start:.2f}s.")
-    start = now
 
+def graph_to_chunks(kb_id: str, graph: nx.Graph) -> list[dict]:
+    """The graph chunk and one subgraph chunk per source document."""
     chunks = [
         {
             "id": get_uuid(),
@@ -461,9 +474,13 @@ async def set_graph(workspace_id: str, kb_id: str, embd_mdl, graph: nx.Graph, ch
         }
     ]
 
-    # generate updated subgraphs
+    # generate updated subgraphs, grouping nodes by source in one pass
+    nodes_by_source = defaultdict(list)
+    for n, attrs in graph.nodes(data=True):
+        for source in set(attrs["source_id"]):
+            nodes_by_source[source].append(n)
     for source in graph.graph["source_id"]:
-        subgraph = graph.subgraph([n for n in graph.nodes if source in graph.nodes[n]["source_id"]]).copy()
+        subgraph = graph.subgraph(nodes_by_source.get(source, [])).copy()
         subgraph.graph["source_id"] = [source]
         for n in subgraph.nodes:
             subgraph.nodes[n]["source_id"] = [source]
@@ -478,6 +495,36 @@ async def set_graph(workspace_id: str, kb_id: str, embd_mdl, graph: nx.Graph, ch
                 "removed_kwd": "N",
             }
         )
+    return chunks
+
+
+async def set_graph(workspace_id: str, kb_id: str, embd_mdl, graph: nx.Graph, change: GraphChange, callback):
+    global chat_limiter
+    start = trio.current_time()
+
+    await trio.to_thread.run_sync(settings.docStoreConn.delete, {"knowledge_graph_kwd": ["graph", "subgraph"]}, search.index_name(workspace_id), kb_id)
+
+    if change.removed_nodes:
+        await trio.to_thread.run_sync(settings.docStoreConn.delete, {"knowledge_graph_kwd": ["entity"], "entity_kwd": sorted(change.removed_nodes)}, search.index_name(workspace_id), kb_id)
+
+    if change.removed_edges:
+
+        async def del_edges(from_node, to_node):
+            async with chat_limiter:
+                await trio.to_thread.run_sync(
+                    settings.docStoreConn.delete, {"knowledge_graph_kwd": ["relation"], "from_entity_kwd": from_node, "to_entity_kwd": to_node}, search.index_name(workspace_id), kb_id
+                )
+
+        async with trio.open_nursery() as nursery:
+            for from_node, to_node in change.removed_edges:
+                nursery.start_soon(del_edges, from_node, to_node)
+
+    now = trio.current_time()
+    if callback:
+        callback(msg=f"set_graph removed {len(change.removed_nodes)} nodes and {len(change.removed_edges)} edges from index in {now - start:.2f}s.")
+    start = now
+
+    chunks = graph_to_chunks(kb_id, graph)
 
     async with trio.open_nursery() as nursery:
         for ii, node in enumerate(change.added_updated_nodes):
@@ -255,8 +255,20 @@ def tokenize(d, t, eng):
     d["content_sm_ltks"] = rag_tokenizer.fine_grained_tokenize(d["content_ltks"])
 
 
+def tokenize_docs(docs, texts):
+    """Batch version of tokenize(d, t, eng) for many chunks"""
+    stripped = []
+    for d, t in zip(docs, texts):
+        d["content_with_weight"] = t
+        stripped.append(re.sub(r"</?(table|td|caption|tr|th)( [^<>]{0,12})?>", " ", t))
+    for d, (ltks, sm_ltks) in zip(docs, rag_tokenizer.tokenize_batch(stripped, fine_grained=True)):
+        d["content_ltks"] = ltks
+        d["content_sm_ltks"] = sm_ltks
+
+
 def tokenize_chunks(chunks, doc, eng, pdf_parser=None):
     res = []
+    texts = []
     # wrap up as es documents
     for ii, ck in enumerate(chunks):
         if len(ck.strip()) == 0:
@@ -272,13 +284,15 @@ def tokenize_chunks(chunks, doc, eng, pdf_parser=None):
                 pass
         else:
             add_positions(d, [[ii]*5])
-        tokenize(d, ck, eng)
         res.append(d)
+        texts.append(ck)
+    tokenize_docs(res, texts)
     return res
 
 
 def tokenize_chunks_with_images(chunks, doc, eng, images):
     res = []
+    texts = []
     # wrap up as es documents
     for ii, (ck, image) in enumerate(zip(chunks, images)):
         if len(ck.strip()) == 0:
@@ -287,8 +301,9 @@ def tokenize_chunks_with_images(chunks, doc, eng, images):
         d = copy.deepcopy(doc)
         d["image"] = image
         add_positions(d, [[ii]*5])
-        tokenize(d, ck, eng)
         res.append(d)
+        texts.append(ck)
+    tokenize_docs(res, texts)
     return res
 
 
@@ -6,6 +6,9 @@ import os
 import re
 import string
 import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from hanziconv import HanziConv
 from nltk import word_tokenize
 from nltk.stem import PorterStemmer, WordNetLemmatizer
@@ -42,7 +45,7 @@ class RagTokenizer:
         except Exception:
             logging.exception(f"[HUQIE]:Build trie {fnm} failed")
 
-    def __init__(self, debug=False):
+    def __init__(self, debug=False, cache_size=None):
         self.DEBUG = debug
         self.DENOMINATOR = 1000000
 
@@ -51,6 +54,14 @@ class RagTokenizer:
 
         self.SPLIT_CHAR = r"([ ,\.<>/?;:'\[\]\\`!@#$%^&*\(\)\{\}\|_+=《》，。？、；‘’：“”【】~！￥%……（）——-]+|[a-zA-Z0-9,\.-]+)"
 
+        # Bounded caches for repeated inputs; results only depend on the input and the trie
+        if cache_size is None:
+            cache_size = int(os.environ.get("RAG_TOKENIZER_CACHE_SIZE", "65536"))
+        self._tokenize_line = lru_cache(maxsize=cache_size)(self._tokenize_line_)
+        self._tokenize_segment = lru_cache(maxsize=cache_size)(self._tokenize_segment_)
+        self._fine_grained_token = lru_cache(maxsize=cache_size)(self._fine_grained_token_)
+        self._english_normalize_token = lru_cache(maxsize=cache_size)(self._english_normalize_token_)
+
         trie_file_name = os.path.join(get_project_base_directory(), "res", "huqie") + ".txt.trie"
         # check if trie file existence
         if os.path.exists(trie_file_name):
@@ -71,6 +82,7 @@ class RagTokenizer:
         self.loadDict_(os.path.join(get_project_base_directory(), "app/core/rag/res", "huqie") + ".txt")
 
     def loadUserDict(self, fnm):
+        self.cache_clear()
         try:
             self.trie_ = datrie.Trie.load(fnm + ".trie")
             return
@@ -79,8 +91,14 @@ class RagTokenizer:
         self.loadDict_(fnm)
 
     def addUserDict(self, fnm):
+        self.cache_clear()
         self.loadDict_(fnm)
 
+    def cache_clear(self):
+        for cached in (self._tokenize_line, self._tokenize_segment, self._fine_grained_token,
+                       self._english_normalize_token):
+            cached.cache_clear()
+
     def _strQ2B(self, ustring):
         """Convert full-width characters to half-width characters"""
         rstring = ""
@@ -277,7 +295,10 @@ class RagTokenizer:
         return self.score_(res[::-1])
 
     def english_normalize_(self, tks):
-        return [self.stemmer.stem(self.lemmatizer.lemmatize(t)) if re.match(r"[a-zA-Z_-]+$", t) else t for t in tks]
+        return [self._english_normalize_token(t) for t in tks]
+
+    def _english_normalize_token_(self, t):
+        return self.stemmer.stem(self.lemmatizer.lemmatize(t)) if re.match(r"[a-zA-Z_-]+$", t) else t
 
     def _split_by_lang(self, line):
         txt_lang_pairs = []
@@ -303,6 +324,12 @@ class RagTokenizer:
         return txt_lang_pairs
 
     def tokenize(self, line):
+        # Long lines (chunks) rarely repeat as a whole; their segments do
+        if len(line) <= 256:
+            return self._tokenize_line(line)
+        return self._tokenize_line_(line)
+
+    def _tokenize_line_(self, line):
         line = re.sub(r"\W+", " ", line)
         line = self._strQ2B(line).lower()
         line = self._tradi2simp(line)
@@ -310,69 +337,76 @@ class RagTokenizer:
         arr = self._split_by_lang(line)
         res = []
         for L,lang in arr:
-            if not lang:
-                res.extend([self.stemmer.stem(self.lemmatizer.lemmatize(t)) for t in word_tokenize(L)])
-                continue
-            if len(L) < 2 or re.match(
-                    r"[a-z\.-]+$", L) or re.match(r"[0-9\.-]+$", L):
-                res.append(L)
+            res.extend(self._tokenize_segment(L, lang))
+
+        res = " ".join(res)
+        logging.debug("[TKS] {}".format(self.merge_(res)))
+        return self.merge_(res)
+
+    def _tokenize_segment_(self, L, lang):
+        """Tokens of one single-language segment; segments are independent of each other."""
+        res = []
+        if not lang:
+            res.extend([self.stemmer.stem(self.lemmatizer.lemmatize(t)) for t in word_tokenize(L)])
+            return tuple(res)
+        if len(L) < 2 or re.match(
+                r"[a-z\.-]+$", L) or re.match(r"[0-9\.-]+$", L):
+            res.append(L)
+            return tuple(res)
+
+        # use maxforward for the first time
+        tks, s = self.maxForward_(L)
+        tks1, s1 = self.maxBackward_(L)
+        if self.DEBUG:
+            logging.debug("[FW] {} {}".format(tks, s))
+            logging.debug("[BW] {} {}".format(tks1, s1))
+
+        i, j, _i, _j = 0, 0, 0, 0
+        same = 0
+        while i + same < len(tks1) and j + same < len(tks) and tks1[i + same] == tks[j + same]:
+            same += 1
+        if same > 0:
+            res.append(" ".join(tks[j: j + same]))
+        _i = i + same
+        _j = j + same
+        j = _j + 1
+        i = _i + 1
+
+        while i < len(tks1) and j < len(tks):
+            tk1, tk = "".join(tks1[_i:i]), "".join(tks[_j:j])
+            if tk1 != tk:
+                if len(tk1) > len(tk):
+                    j += 1
+                else:
+                    i += 1
                 continue
 
-            # use maxforward for the first time
-            tks, s = self.maxForward_(L)
-            tks1, s1 = self.maxBackward_(L)
-            if self.DEBUG:
-                logging.debug("[FW] {} {}".format(tks, s))
-                logging.debug("[BW] {} {}".format(tks1, s1))
+            if tks1[i] != tks[j]:
+                i += 1
+                j += 1
+                continue
+            # backward tokens from_i to i are different from forward tokens from _j to j.
+            tkslist = []
+            self.dfs_("".join(tks[_j:j]), 0, [], tkslist)
+            res.append(" ".join(self.sortTks_(tkslist)[0][0]))
 
-            i, j, _i, _j = 0, 0, 0, 0
-            same = 0
+            same = 1
             while i + same < len(tks1) and j + same < len(tks) and tks1[i + same] == tks[j + same]:
                 same += 1
-            if same > 0:
-                res.append(" ".join(tks[j: j + same]))
+            res.append(" ".join(tks[j: j + same]))
             _i = i + same
             _j = j + same
             j = _j + 1
             i = _i + 1
 
-            while i < len(tks1) and j < len(tks):
-                tk1, tk = "".join(tks1[_i:i]), "".join(tks[_j:j])
-                if tk1 != tk:
-                    if len(tk1) > len(tk):
-                        j += 1
-                    else:
-                        i += 1
-                    continue
-
-                if tks1[i] != tks[j]:
-                    i += 1
-                    j += 1
-                    continue
-                # backward tokens from_i to i are different from forward tokens from _j to j.
-                tkslist = []
-                self.dfs_("".join(tks[_j:j]), 0, [], tkslist)
-                res.append(" ".join(self.sortTks_(tkslist)[0][0]))
-
-                same = 1
-                while i + same < len(tks1) and j + same < len(tks) and tks1[i + same] == tks[j + same]:
-                    same += 1
-                res.append(" ".join(tks[j: j + same]))
-                _i = i + same
-                _j = j + same
-                j = _j + 1
-                i = _i + 1
-
-            if _i < len(tks1):
-                assert _j < len(tks)
-                assert "".join(tks1[_i:]) == "".join(tks[_j:])
-                tkslist = []
-                self.dfs_("".join(tks[_j:]), 0, [], tkslist)
-                res.append(" ".join(self.sortTks_(tkslist)[0][0]))
+        if _i < len(tks1):
+            assert _j < len(tks)
+            assert "".join(tks1[_i:]) == "".join(tks[_j:])
+            tkslist = []
+            self.dfs_("".join(tks[_j:]), 0, [], tkslist)
+            res.append(" ".join(self.sortTks_(tkslist)[0][0]))
 
-        res = " ".join(res)
-        logging.debug("[TKS] {}".format(self.merge_(res)))
-        return self.merge_(res)
+        return tuple(res)
 
     def fine_grained_tokenize(self, tks):
         tks = tks.split()
@@ -388,32 +422,33 @@ class RagTokenizer:
             if len(tk) < 3 or re.match(r"[0-9,\.-]+$", tk):
                 res.append(tk)
                 continue
-            tkslist = []
-            if len(tk) > 10:
-                tkslist.append(tk)
-            else:
-                self.dfs_(tk, 0, [], tkslist)
-            if len(tkslist) < 2:
-                res.append(tk)
-                continue
-            stk = self.sortTks_(tkslist)[1][0]
-            if len(stk) == len(tk):
-                stk = tk
-            else:
-                if re.match(r"[a-z\.-]+$", tk):
-                    for t in stk:
-                        if len(t) < 3:
-                            stk = tk
-                            break
-                    else:
-                        stk = " ".join(stk)
-                else:
-                    stk = " ".join(stk)
-
-            res.append(stk)
+            res.append(self._fine_grained_token(tk))
 
         return " ".join(self.english_normalize_(res))
 
+    def _fine_grained_token_(self, tk):
+        tkslist = []
+        if len(tk) > 10:
+            tkslist.append(tk)
+        else:
+            self.dfs_(tk, 0, [], tkslist)
+        if len(tkslist) < 2:
+            return tk
+        stk = self.sortTks_(tkslist)[1][0]
+        if len(stk) == len(tk):
+            stk = tk
+        else:
+            if re.match(r"[a-z\.-]+$", tk):
+                for t in stk:
+                    if len(t) < 3:
+                        stk = tk
+                        break
+                else:
+                    stk = " ".join(stk)
+            else:
+                stk = " ".join(stk)
+        return stk
+
 
 def is_chinese(s):
     if s >= u'\u4e00' and s <= u'\u9fa5':
@@ -452,11 +487,114 @@ tokenize = tokenizer.tokenize
 fine_grained_tokenize = tokenizer.fine_grained_tokenize
 tag = tokenizer.tag
 freq = tokenizer.freq
-loadUserDict = tokenizer.loadUserDict
-addUserDict = tokenizer.addUserDict
 tradi2simp = tokenizer._tradi2simp
 strQ2B = tokenizer._strQ2B
 
+# Batches smaller than this are tokenized in-process
+TOKENIZE_BATCH_PARALLEL_MIN = int(os.environ.get("RAG_TOKENIZE_BATCH_PARALLEL_MIN", "64"))
+
+_pool = None
+_pool_workers = 0
+_pool_pid = None
+# pid of a process where the pool is unusable; checked once, then tokenize serially
+_pool_disabled_pid = None
+_pool_lock = threading.Lock()
+
+
+def _tokenize(line):
+    return tokenizer.tokenize(line)
+
+
+def _tokenize_with_fine_grained(line):
+    tks = tokenizer.tokenize(line)
+    return tks, tokenizer.fine_grained_tokenize(tks)
+
+
+def _fork_unsafe_reason():
+    """Why worker processes must not be forked from here, or None when it is safe."""
+    import multiprocessing
+    # Celery prefork children are daemonic and may not have children of their own
+    if multiprocessing.current_process().daemon:
+        return "daemonic process"
+    # Forking a process that already runs threads (OCR batching, trio workers, thread pools)
+    # can copy a lock held by another thread and deadlock the worker
+    if threading.active_count() > 1:
+        return f"{threading.active_count()} threads running"
+    return None
+
+
+def _disable_pool(reason):
+    """Called with _pool_lock held: tokenize serially in this process from now on."""
+    global _pool, _pool_disabled_pid
+    _pool_disabled_pid = os.getpid()
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+    logging.warning(f"[HUQIE]:Parallel tokenization disabled in pid {os.getpid()} ({reason})")
+
+
+def _get_pool():
+    global _pool, _pool_workers, _pool_pid
+    workers = int(os.environ.get("RAG_TOKENIZE_WORKERS", str(min(4, os.cpu_count() or 1))))
+    if workers <= 1 or _pool_disabled_pid == os.getpid():
+        return None, 0
+    with _pool_lock:
+        if _pool_disabled_pid == os.getpid():
+            return None, 0
+        if _pool is None or _pool_pid != os.getpid():
+            reason = _fork_unsafe_reason()
+            if reason:
+                _disable_pool(reason)
+                return None, 0
+            import multiprocessing
+            # Forked workers inherit the loaded trie instead of rebuilding it.
+            # With the fork context all workers start on the first submit, before
+            # the executor's own management thread exists
+            context = multiprocessing.get_context("fork") if sys.platform != "win32" else None
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+            _pool_workers, _pool_pid = workers, os.getpid()
+        return _pool, _pool_workers
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def tokenize_batch(lines, fine_grained=False):
+    """Tokenize many lines, spreading large batches over worker processes.
+
+    Returns tokenize(line) for every line, or (tokenize(line),
+    fine_grained_tokenize(tokenize(line))) pairs when fine_grained is set.
+    """
+    lines = list(lines)
+    func = _tokenize_with_fine_grained if fine_grained else _tokenize
+    pool, workers = _get_pool() if len(lines) >= TOKENIZE_BATCH_PARALLEL_MIN else (None, 0)
+    if pool is None:
+        return [func(line) for line in lines]
+    try:
+        return list(pool.map(func, lines, chunksize=max(1, len(lines) // (workers * 4))))
+    except Exception as e:
+        # Starting or running the workers failed; don't retry on every batch
+        with _pool_lock:
+            _disable_pool(f"{type(e).__name__}: {e}")
+        return [func(line) for line in lines]
+
+
+def loadUserDict(fnm):
+    tokenizer.loadUserDict(fnm)
+    # Worker processes were forked with the old dictionary
+    _reset_pool()
+
+
+def addUserDict(fnm):
+    tokenizer.addUserDict(fnm)
+    _reset_pool()
+
+
 if __name__ == '__main__':
     tknzr = RagTokenizer(debug=True)
     # huqie.addUserDict("/tmp/tmp.new.tks.dict")
@@ -0,0 +1,69 @@
+import argparse
+import random
+import time
+
+from app.core.rag.nlp import rag_tokenizer
+
+# Tokenization throughput on a mixed Chinese/English corpus, e.g.
+#   python -m app.core.rag.nlp.t_tokenizer_bench
+#   python -m app.core.rag.nlp.t_tokenizer_bench --inputs chunks.txt --repeat 3
+
+SAMPLES = [
+    "公开征求意见稿提出，境外投资者可使用自有人民币或外汇投资。使用外汇投资的，可通过债券持有人在香港人民币业务清算行办理外汇资金兑换。",
+    "多校划片就是一个小区对应多个小学初中，让买了学区房的家庭也不确定到底能上哪个学校。南京市长江大桥",
+    "实际上当时他们已经将业务中心偏移到安全部门和针对政府企业的部门 Scripts are compiled and cached aaaaaaaaa",
+    "Unity3D开发经验 测试开发工程师 c++双11双11 985 211 数据分析项目经理|数据分析挖掘|搜索数据分析 sql python hive tableau",
+    "The retrieval pipeline splits documents into chunks, tokenizes every chunk and indexes both coarse and fine-grained tokens.",
+    "涡轮增压发动机num最大功率,不像别的共享买车锁电子化的手段,我们接过来是否有意义,黄黄爱美食,今天阿奇要讲到的这家农贸市场",
+]
+
+
+def build_corpus(size, seed=0):
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        parts = rng.sample(SAMPLES, k=rng.randint(1, 3))
+        corpus.append(" ".join(parts) + " 第{}条".format(rng.randint(1, 500)))
+    return corpus
+
+
+def run(name, func, corpus):
+    start = time.time()
+    result = func(corpus)
+    elapsed = time.time() - start
+    print("{:<22} {:>6} lines {:>8.2f}s {:>10.1f} lines/s".format(name, len(corpus), elapsed, len(corpus) / elapsed))
+    return result
+
+
+def main(args):
+    if args.inputs:
+        with open(args.inputs, encoding="utf-8") as f:
+            corpus = [line.strip() for line in f if line.strip()]
+    else:
+        corpus = build_corpus(args.size)
+    corpus = corpus * args.repeat
+
+    uncached = rag_tokenizer.RagTokenizer(cache_size=0)
+
+    def tokenize_all(tknzr):
+        def _run(lines):
+            res = []
+            for line in lines:
+                tks = tknzr.tokenize(line)
+                res.append((tks, tknzr.fine_grained_tokenize(tks)))
+            return res
+        return _run
+
+    baseline = run("uncached", tokenize_all(uncached), corpus)
+    cached = run("cached", tokenize_all(rag_tokenizer.tokenizer), corpus)
+    batched = run("tokenize_batch", lambda lines: rag_tokenizer.tokenize_batch(lines, fine_grained=True), corpus)
+    assert baseline == cached == batched, "tokenization differs from the uncached tokenizer"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--inputs', help="Text file with one chunk per line. Default: a generated mixed corpus")
+    parser.add_argument('--size', type=int, default=2000, help="Lines of the generated corpus")
+    parser.add_argument('--repeat', type=int, default=1, help="Repeat the corpus to simulate re-indexing")
+    args = parser.parse_args()
+    main(args)
@@ -0,0 +1,16 @@
+from elasticsearch import Elasticsearch
+
+from app.core.metrics import ES_REQUEST_DURATION
+
+
+class MeteredElasticsearch(Elasticsearch):
+    """Elasticsearch client that records the latency of every API request.
+
+    All client APIs, including namespaced ones such as ``indices.*``, go through
+    ``perform_request``; the ``endpoint_id`` (``search``, ``bulk``,
+    ``indices.exists`` ...) is a fixed set, which keeps the label bounded.
+    """
+
+    def perform_request(self, method, path, *, endpoint_id=None, **kwargs):
+        with ES_REQUEST_DURATION.time(endpoint_id or method):
+            return super().perform_request(method, path, endpoint_id=endpoint_id, **kwargs)
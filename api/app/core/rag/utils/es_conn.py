@@ -6,10 +6,11 @@ import os
 from urllib.parse import urlparse
 
 import copy
-from elasticsearch import Elasticsearch, NotFoundError
+from elasticsearch import NotFoundError
 from elasticsearch_dsl import UpdateByQuery, Q, Search, Index
 from elastic_transport import ConnectionTimeout
 from app.core.rag.common.decorator import singleton
+from app.core.rag.utils.es_client import MeteredElasticsearch
 from app.core.rag.common.file_utils import get_project_base_directory
 from app.core.rag.common.misc_utils import convert_bytes
 from app.core.rag.utils.doc_store_conn import DocStoreConnection, MatchExpr, OrderByExpr, MatchTextExpr, MatchDenseExpr, \
@@ -79,7 +80,7 @@ class ESConnection(DocStoreConnection):
             if os.getenv("ELASTICSEARCH_CA_CERTS"):
                 client_config["ca_certs"] = str(os.getenv("ELASTICSEARCH_CA_CERTS"))
 
-        self.es = Elasticsearch(**client_config)
+        self.es = MeteredElasticsearch(**client_config)
         if self.es:
             self.info = self.es.info()
             return True
@@ -19,6 +19,7 @@ from app.core.models.embedding import RedBearEmbeddings
 from app.models.models_model import ModelApiKey
 
 from app.models.knowledge_model import Knowledge
+from app.core.rag.utils.es_client import MeteredElasticsearch
 from app.core.rag.vdb.field import Field
 from app.core.rag.vdb.vector_base import BaseVector
 from app.core.rag.models.chunk import DocumentChunk
@@ -1024,7 +1025,7 @@ class ElasticSearchVectorFactory:
                     if ca_certs:
                         client_config["ca_certs"] = str(ca_certs)
 
-                client = Elasticsearch(**client_config)
+                client = MeteredElasticsearch(**client_config)
 
                 if not client.ping():
                     raise ConnectionError("Failed to connect to Elasticsearch")
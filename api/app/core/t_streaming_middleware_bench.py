@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import time
+import tracemalloc
+
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.controllers.service.mcp_auth_middleware import MCP_PATH_PREFIX, MCPAuthMiddleware
+from app.i18n.middleware import LanguageMiddleware
+
+# SSE 流经过全局中间件的开销：BaseHTTPMiddleware 实现（改造前）与纯 ASGI 实现对比。
+# 直接驱动 ASGI 应用，不经过网络与服务器，测量单流每秒分块数和并发流的每流内存，例如
+#   python -m app.core.t_streaming_middleware_bench --chunks 20000 --streams 200
+
+
+class BaseHTTPLanguageMiddleware(BaseHTTPMiddleware):
+    """改造前的 LanguageMiddleware：语言识别逻辑相同，响应经过 call_next 转发"""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.language = LanguageMiddleware(app)
+
+    async def dispatch(self, request, call_next):
+        language = await self.language._determine_language(request)
+        request.state.language = language
+        response = await call_next(request)
+        response.headers["Content-Language"] = language
+        return response
+
+
+class BaseHTTPMCPAuthMiddleware(BaseHTTPMiddleware):
+    """改造前的 MCPAuthMiddleware：非 MCP 路径直接 call_next"""
+
+    async def dispatch(self, request, call_next):
+        if not request.url.path.startswith(MCP_PATH_PREFIX):
+            return await call_next(request)
+        raise NotImplementedError
+
+
+def build_app(middlewares, chunk_size, release=None):
+    app = FastAPI()
+
+    @app.get("/v1/chat/stream")
+    async def stream(chunks: int):
+        async def events():
+            payload = "x" * chunk_size
+            for i in range(chunks):
+                yield f"id: {i}\ndata: {payload}\n\n"
+                if release is not None and i == 0 and chunks > 1:
+                    # 并发测试：首个分块后挂起，保持所有流同时在途
+                    await release.wait()
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    for middleware in middlewares:
+        app.add_middleware(middleware)
+    return app
+
+
+async def run_stream(app, chunks, started=None):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": "/v1/chat/stream", "raw_path": b"/v1/chat/stream", "root_path": "",
+        "query_string": f"chunks={chunks}".encode(), "headers": [(b"accept-language", b"en-US,en;q=0.9")],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    disconnect = asyncio.Event()
+    received = 0
+
+    async def receive():
+        if not hasattr(receive, "sent"):
+            receive.sent = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await disconnect.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal received
+        if message["type"] == "http.response.body":
+            if message.get("body"):
+                received += 1
+                if received == 1 and started is not None:
+                    started()
+            if not message.get("more_body", False):
+                disconnect.set()
+
+    await app(scope, receive, send)
+    return received
+
+
+async def throughput(app, chunks):
+    start = time.perf_counter()
+    received = await run_stream(app, chunks)
+    return received / (time.perf_counter() - start)
+
+
+async def memory_per_stream(middlewares, streams, chunk_size):
+    release = asyncio.Event()
+    app = build_app(middlewares, chunk_size, release)
+    all_started = asyncio.Event()
+    started = 0
+
+    def on_start():
+        nonlocal started
+        started += 1
+        if started == streams:
+            all_started.set()
+
+    await run_stream(app, 1)  # 预热：构建中间件栈
+    tracemalloc.start()
+    baseline = tracemalloc.take_snapshot()
+    tasks = [asyncio.create_task(run_stream(app, 2, on_start)) for _ in range(streams)]
+    await all_started.wait()
+    in_flight = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    release.set()
+    await asyncio.gather(*tasks)
+    grown = sum(stat.size_diff for stat in in_flight.compare_to(baseline, "filename"))
+    return grown / streams
+
+
+async def main(args):
+    stacks = [
+        ("BaseHTTPMiddleware", [BaseHTTPMCPAuthMiddleware, BaseHTTPLanguageMiddleware]),
+        ("pure ASGI", [MCPAuthMiddleware, LanguageMiddleware]),
+        ("no middleware", []),
+    ]
+    for name, middlewares in stacks:
+        app = build_app(middlewares, args.chunk_size)
+        await run_stream(app, 10)
+        rate = await throughput(app, args.chunks)
+        memory = await memory_per_stream(middlewares, args.streams, args.chunk_size)
+        print("{}: {:.0f} SSE chunks/s over {} chunks, {:.1f} KiB per in-flight stream ({} streams)".format(
+            name, rate, args.chunks, memory / 1024, args.streams))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chunks', type=int, default=20000, help="SSE chunks in the throughput stream")
+    parser.add_argument('--streams', type=int, default=200, help="Concurrent streams for the memory measurement")
+    parser.add_argument('--chunk-size', type=int, default=64, help="Payload characters per SSE chunk")
+    args = parser.parse_args()
+    asyncio.run(main(args))
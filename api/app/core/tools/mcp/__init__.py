@@ -2,7 +2,8 @@
 
 # 主要类导出
 from .base import MCPTool, MCPToolManager, MCPError
-from .client import SimpleMCPClient, MCPConnectionError
+from .client import SimpleMCPClient, MCPConnectionError, MCPToolCallError
+from .pool import MCPSessionPool, get_mcp_session_pool, close_mcp_session_pool
 from .service_manager import MCPServiceManager
 
 __all__ = [
@@ -14,6 +15,12 @@ __all__ = [
     # 客户端类
     "SimpleMCPClient",
     "MCPConnectionError",
+    "MCPToolCallError",
+    
+    # 会话池
+    "MCPSessionPool",
+    "get_mcp_session_pool",
+    "close_mcp_session_pool",
     
     # 服务管理（简化版）
     "MCPServiceManager"
@@ -125,18 +125,18 @@ class MCPTool(BaseTool):
             tool_name = kwargs.pop("tool_name", None) or self.name
             arguments = kwargs.pop("arguments", kwargs)  # 剩余参数作为工具参数
             
-            from .client import SimpleMCPClient
+            from .pool import get_mcp_session_pool
             
-            client = SimpleMCPClient(self.server_url, self.connection_config)
+            # 复用池中已初始化的会话，避免每次调用重复建连和握手
+            result = await get_mcp_session_pool().call_tool(
+                self.server_url, self.connection_config, tool_name, arguments
+            )
             
-            async with client:
-                result = await client.call_tool(tool_name, arguments)
-                
-                execution_time = time.time() - start_time
-                return ToolResult.success_result(
-                    data=result,
-                    execution_time=execution_time
-                )
+            execution_time = time.time() - start_time
+            return ToolResult.success_result(
+                data=result,
+                execution_time=execution_time
+            )
                 
         except Exception as e:
             execution_time = time.time() - start_time
@@ -163,26 +163,29 @@ class MCPToolManager:
     async def discover_tools(
         self, 
         server_url: str, 
-        connection_config: Dict[str, Any] = None
+        connection_config: Dict[str, Any] = None,
+        force_refresh: bool = False
     ) -> tuple[bool, List[Dict[str, Any]], str | None]:
-        """发现 MCP 服务器上的工具"""
+        """发现 MCP 服务器上的工具
+        
+        工具列表由会话池按 TTL 缓存，force_refresh=True 时强制重新拉取。
+        """
         try:
-            from .client import SimpleMCPClient
+            from .pool import get_mcp_session_pool
             
-            client = SimpleMCPClient(server_url, connection_config)
+            tools = await get_mcp_session_pool().list_tools(
+                server_url, connection_config, force_refresh=force_refresh
+            )
             
-            async with client:
-                tools = await client.list_tools()
-                
-                # 缓存工具信息
-                self._tool_cache[server_url] = {
-                    "tools": tools,
-                    "connection_config": connection_config,
-                    "last_updated": time.time()
-                }
-                
-                logger.info(f"发现 {len(tools)} 个MCP工具: {server_url}")
-                return True, tools, None
+            # 缓存工具信息
+            self._tool_cache[server_url] = {
+                "tools": tools,
+                "connection_config": connection_config,
+                "last_updated": time.time()
+            }
+            
+            logger.info(f"发现 {len(tools)} 个MCP工具: {server_url}")
+            return True, tools, None
                 
         except Exception as e:
             error_msg = f"发现工具失败: {e}"
@@ -17,6 +17,11 @@ class MCPConnectionError(Exception):
     pass
 
 
+class MCPToolCallError(MCPConnectionError):
+    """服务端返回的工具调用错误（连接本身仍可用）"""
+    pass
+
+
 class SimpleMCPClient:
     """简化的 MCP 客户端"""
     
@@ -36,7 +41,7 @@ class SimpleMCPClient:
         self._pending_requests = {}
         self._server_capabilities = {}
         self._endpoint_url = None  # SSE endpoint URL
-        self._sse_task = None
+        self._reader_task = None  # SSE / WebSocket 后台读取任务
     
     async def __aenter__(self):
         await self.connect()
@@ -60,8 +65,13 @@ class SimpleMCPClient:
     async def disconnect(self):
         """断开连接"""
         try:
-            if self._sse_task:
-                self._sse_task.cancel()
+            if self._reader_task:
+                self._reader_task.cancel()
+                self._reader_task = None
+            for future in self._pending_requests.values():
+                if not future.done():
+                    future.cancel()
+            self._pending_requests.clear()
             if self._websocket:
                 await self._websocket.close()
                 self._websocket = None
@@ -70,6 +80,11 @@ class SimpleMCPClient:
                 self._session = None
         except Exception as e:
             logger.error(f"断开连接失败: {e}")
+        finally:
+            # 握手协商的状态只对本次连接有效，重连时重新获取 SSE endpoint 与服务端能力
+            # （Streamable HTTP 的 Mcp-Session-Id 保存在已关闭的 aiohttp 会话上）
+            self._endpoint_url = None
+            self._server_capabilities = {}
     
     async def _connect_websocket(self):
         """WebSocket 连接"""
@@ -79,7 +94,7 @@ class SimpleMCPClient:
             extra_headers=headers,
             timeout=self.timeout
         )
-        asyncio.create_task(self._handle_websocket_messages())
+        self._reader_task = asyncio.create_task(self._handle_websocket_messages())
         await self._send_initialize()
     
     async def _connect_http(self):
@@ -104,7 +119,7 @@ class SimpleMCPClient:
                 raise MCPConnectionError(f"SSE 连接失败 {response.status}: {error_text}")
             
             # 启动 SSE 读取任务
-            self._sse_task = asyncio.create_task(self._read_sse_stream(response))
+            self._reader_task = asyncio.create_task(self._read_sse_stream(response))
             
             # 等待获取 endpoint URL
             for _ in range(10):
@@ -295,9 +310,7 @@ class SimpleMCPClient:
             }
         }
         
-        await self._websocket.send(json.dumps(init_message))
-        response = await self._websocket.recv()
-        response_data = json.loads(response)
+        response_data = await self._send_websocket_request(init_message)
         
         if "error" in response_data:
             raise MCPConnectionError(f"初始化失败: {response_data['error']}")
@@ -325,6 +338,59 @@ class SimpleMCPClient:
         else:
             return await response.json()
 
+    @property
+    def is_connected(self) -> bool:
+        """连接是否仍然可用（不发起网络请求）"""
+        if self.is_websocket:
+            return self._websocket is not None and self._reader_alive()
+        if self._session is None or self._session.closed:
+            return False
+        if self.is_sse:
+            return self._endpoint_url is not None and self._reader_alive()
+        return True
+
+    def _reader_alive(self) -> bool:
+        """后台读取任务（SSE/WebSocket）是否仍在运行"""
+        return self._reader_task is not None and not self._reader_task.done()
+
+    async def _send_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """按连接类型发送 JSON-RPC 请求，并发安全（按请求 ID 匹配响应）"""
+        if self.is_websocket:
+            return await self._send_websocket_request(request)
+        if self.is_sse:
+            return await self._send_sse_request(request)
+        async with self._session.post(self.server_url, json=request) as response:
+            return await self._parse_streamable_response(response)
+
+    async def _send_websocket_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """通过 WebSocket 发送请求，由 _handle_websocket_messages 分发响应"""
+        request_id = request["id"]
+        future = asyncio.get_running_loop().create_future()
+        self._pending_requests[request_id] = future
+
+        try:
+            await self._websocket.send(json.dumps(request))
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self._pending_requests.pop(request_id, None)
+            raise MCPConnectionError("请求超时")
+
+    async def ping(self) -> bool:
+        """发送 MCP ping 检查会话健康状态"""
+        if not self.is_connected:
+            return False
+        request = {
+            "jsonrpc": "2.0",
+            "id": self._get_request_id(),
+            "method": "ping"
+        }
+        try:
+            response_data = await self._send_request(request)
+        except Exception as e:
+            logger.warning(f"MCP ping 失败: {self.server_url}, 错误: {e}")
+            return False
+        return "error" not in response_data
+
     async def list_tools(self) -> List[Dict[str, Any]]:
         """获取工具列表"""
         request = {
@@ -333,15 +399,7 @@ class SimpleMCPClient:
             "method": "tools/list"
         }
         
-        if self.is_websocket:
-            await self._websocket.send(json.dumps(request))
-            response = await self._websocket.recv()
-            response_data = json.loads(response)
-        elif self.is_sse:
-            response_data = await self._send_sse_request(request)
-        else:
-            async with self._session.post(self.server_url, json=request) as response:
-                response_data = await self._parse_streamable_response(response)
+        response_data = await self._send_request(request)
         
         if "error" in response_data:
             raise MCPConnectionError(f"获取工具列表失败: {response_data['error']}")
@@ -358,19 +416,11 @@ class SimpleMCPClient:
             "params": {"name": tool_name, "arguments": arguments}
         }
         
-        if self.is_websocket:
-            await self._websocket.send(json.dumps(request))
-            response = await self._websocket.recv()
-            response_data = json.loads(response)
-        elif self.is_sse:
-            response_data = await self._send_sse_request(request)
-        else:
-            async with self._session.post(self.server_url, json=request) as response:
-                response_data = await self._parse_streamable_response(response)
+        response_data = await self._send_request(request)
         
         if "error" in response_data:
             error = response_data["error"]
-            raise MCPConnectionError(f"工具调用失败: {error.get('message', '未知错误')}")
+            raise MCPToolCallError(f"工具调用失败: {error.get('message', '未知错误')}")
         
         return response_data.get("result", {})
     
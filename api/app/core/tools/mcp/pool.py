@@ -0,0 +1,313 @@
+"""MCP 会话池 - 复用已初始化的 MCP 连接
+
+每次工具调用都新建 SimpleMCPClient 需要重复建连 + initialize 握手，
+Agent 循环中反复调用 MCP 工具时开销明显。会话池按服务器配置
+（server_url + connection_config）维护已初始化的会话：
+
+- 复用空闲会话，并允许同一会话上多路并发调用
+- 空闲超过阈值的会话在复用前做 ping 健康检查，失败则重连
+- 每个服务器的会话数有上限，超出时等待已有会话释放
+- tools/list 结果按 TTL 缓存
+"""
+import asyncio
+import json
+import time
+import weakref
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging_config import get_business_logger
+
+from .client import MCPConnectionError, MCPToolCallError, SimpleMCPClient
+
+logger = get_business_logger()
+
+
+def _make_server_key(server_url: str, connection_config: Optional[Dict[str, Any]]) -> str:
+    """生成服务器配置键（配置不同的同一 URL 视为不同服务器）"""
+    config_str = json.dumps(connection_config or {}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{server_url}|{config_str}"
+
+
+@dataclass
+class _PooledSession:
+    """池中的单个会话"""
+    client: SimpleMCPClient
+    in_flight: int = 0
+    last_used: float = field(default_factory=time.monotonic)
+    broken: bool = False
+
+
+@dataclass
+class _ServerSlot:
+    """单个服务器配置下的会话集合"""
+    server_url: str
+    connection_config: Dict[str, Any]
+    sessions: List[_PooledSession] = field(default_factory=list)
+    connecting: int = 0
+    condition: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+class MCPSessionPool:
+    """MCP 会话池（绑定单个事件循环，通过 get_mcp_session_pool 获取）"""
+
+    def __init__(
+        self,
+        max_sessions_per_server: int = settings.MCP_POOL_MAX_SESSIONS_PER_SERVER,
+        max_concurrent_per_session: int = settings.MCP_POOL_MAX_CONCURRENT_PER_SESSION,
+        idle_timeout: float = settings.MCP_POOL_IDLE_TIMEOUT,
+        health_check_interval: float = settings.MCP_POOL_HEALTH_CHECK_INTERVAL,
+        tools_cache_ttl: float = settings.MCP_TOOLS_CACHE_TTL,
+    ):
+        self.max_sessions_per_server = max(1, max_sessions_per_server)
+        self.max_concurrent_per_session = max(1, max_concurrent_per_session)
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.tools_cache_ttl = tools_cache_ttl
+
+        self._slots: Dict[str, _ServerSlot] = {}
+        self._tools_cache: Dict[str, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._closed = False
+
+    def _get_slot(self, server_url: str, connection_config: Optional[Dict[str, Any]]) -> _ServerSlot:
+        key = _make_server_key(server_url, connection_config)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = _ServerSlot(server_url=server_url, connection_config=connection_config or {})
+            self._slots[key] = slot
+        return slot
+
+    async def _discard(self, slot: _ServerSlot, session: _PooledSession) -> None:
+        """从池中移除会话并断开连接"""
+        if session in slot.sessions:
+            slot.sessions.remove(session)
+        await session.client.disconnect()
+
+    async def _evict_idle(self, slot: _ServerSlot) -> None:
+        """关闭空闲超时或已断开的会话"""
+        now = time.monotonic()
+        for session in list(slot.sessions):
+            if session.in_flight:
+                continue
+            if session.broken or not session.client.is_connected or now - session.last_used > self.idle_timeout:
+                await self._discard(slot, session)
+
+    async def _checkout(self, slot: _ServerSlot) -> _PooledSession:
+        """取出一个可用会话：优先复用负载最低的会话，其次新建，否则等待"""
+        async with slot.condition:
+            while True:
+                if self._closed:
+                    raise MCPConnectionError("MCP 会话池已关闭")
+
+                await self._evict_idle(slot)
+                candidates = [
+                    s for s in slot.sessions
+                    if not s.broken and s.in_flight < self.max_concurrent_per_session and s.client.is_connected
+                ]
+                if candidates:
+                    session = min(candidates, key=lambda s: s.in_flight)
+                    session.in_flight += 1
+                    break
+
+                if len(slot.sessions) + slot.connecting < self.max_sessions_per_server:
+                    slot.connecting += 1
+                    session = None
+                    break
+
+                await slot.condition.wait()
+
+        if session is not None:
+            return await self._ensure_healthy(slot, session)
+
+        # 在锁外建连，避免阻塞同一服务器上的其他调用
+        try:
+            client = SimpleMCPClient(slot.server_url, slot.connection_config)
+            await client.connect()
+        finally:
+            async with slot.condition:
+                slot.connecting -= 1
+                slot.condition.notify_all()
+
+        session = _PooledSession(client=client, in_flight=1)
+        async with slot.condition:
+            slot.sessions.append(session)
+        logger.info(f"MCP 会话已建立: {slot.server_url} (当前 {len(slot.sessions)} 个)")
+        return session
+
+    async def _ensure_healthy(self, slot: _ServerSlot, session: _PooledSession) -> _PooledSession:
+        """空闲较久的会话在复用前 ping 一次，失败则重连
+
+        会话上还有其他进行中的调用时说明连接正在使用，跳过检查。
+        """
+        if session.in_flight > 1 or time.monotonic() - session.last_used < self.health_check_interval:
+            return session
+        if await session.client.ping():
+            session.last_used = time.monotonic()
+            return session
+
+        logger.warning(f"MCP 会话健康检查失败，重新连接: {slot.server_url}")
+        await session.client.disconnect()
+        try:
+            await session.client.connect()
+        except Exception:
+            async with slot.condition:
+                session.in_flight -= 1
+                if session in slot.sessions:
+                    slot.sessions.remove(session)
+                slot.condition.notify_all()
+            raise
+        session.last_used = time.monotonic()
+        return session
+
+    async def _release(self, slot: _ServerSlot, session: _PooledSession, broken: bool) -> None:
+        async with slot.condition:
+            session.in_flight -= 1
+            session.last_used = time.monotonic()
+            session.broken = session.broken or broken
+            if session.broken and session.in_flight == 0:
+                await self._discard(slot, session)
+            slot.condition.notify_all()
+
+    @asynccontextmanager
+    async def session(
+        self,
+        server_url: str,
+        connection_config: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[SimpleMCPClient]:
+        """借出一个已初始化的客户端，退出上下文时归还
+
+        上下文内抛出异常（工具自身返回的错误除外）时，
+        会话被标记为损坏，不再借出，并在进行中的调用结束后丢弃。
+        """
+        slot = self._get_slot(server_url, connection_config)
+        session = await self._checkout(slot)
+        broken = False
+        try:
+            yield session.client
+        except MCPToolCallError:
+            raise
+        except Exception:
+            broken = True
+            raise
+        finally:
+            if not session.client.is_connected:
+                broken = True
+            await self._release(slot, session, broken)
+
+    async def call_tool(
+        self,
+        server_url: str,
+        connection_config: Optional[Dict[str, Any]],
+        tool_name: str,
+        arguments: Dict[str, Any]
+    ) -> Any:
+        """通过池化会话调用工具
+
+        仅当复用的连接已断开（请求未必送达）时换新会话重试一次，
+        超时等情况不重试，避免非幂等工具被重复执行。
+        """
+        for attempt in range(2):
+            async with self.session(server_url, connection_config) as client:
+                try:
+                    return await client.call_tool(tool_name, arguments)
+                except MCPToolCallError:
+                    raise
+                except MCPConnectionError as e:
+                    if attempt or client.is_connected:
+                        raise
+                    logger.warning(f"MCP 会话已断开，使用新会话重试: {tool_name}, 错误: {e}")
+
+    async def list_tools(
+        self,
+        server_url: str,
+        connection_config: Optional[Dict[str, Any]] = None,
+        force_refresh: bool = False
+    ) -> List[Dict[str, Any]]:
+        """获取工具列表，结果按 TTL 缓存"""
+        key = _make_server_key(server_url, connection_config)
+        cached = self._tools_cache.get(key)
+        if not force_refresh and cached and time.monotonic() - cached[0] < self.tools_cache_ttl:
+            return cached[1]
+
+        async with self.session(server_url, connection_config) as client:
+            tools = await client.list_tools()
+
+        self._tools_cache[key] = (time.monotonic(), tools)
+        return tools
+
+    def invalidate_tools_cache(
+        self,
+        server_url: str,
+        connection_config: Optional[Dict[str, Any]] = None
+    ) -> None:
+        """清除指定服务器的工具列表缓存"""
+        self._tools_cache.pop(_make_server_key(server_url, connection_config), None)
+
+    def stats(self) -> Dict[str, Any]:
+        """池状态（调试/监控用）"""
+        return {
+            slot.server_url: {
+                "sessions": len(slot.sessions),
+                "in_flight": sum(s.in_flight for s in slot.sessions),
+                "connecting": slot.connecting,
+            }
+            for slot in self._slots.values()
+        }
+
+    async def close(self) -> None:
+        """关闭池中所有会话"""
+        self._closed = True
+        for slot in list(self._slots.values()):
+            async with slot.condition:
+                for session in list(slot.sessions):
+                    await self._discard(slot, session)
+                slot.condition.notify_all()
+        self._slots.clear()
+        self._tools_cache.clear()
+
+
+# 会话持有的连接和后台任务属于创建它的事件循环，
+# 因此每个事件循环一个池（Celery 任务中的 asyncio.run 会创建新循环）
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, MCPSessionPool]" = weakref.WeakKeyDictionary()
+# 每个池对应的关闭钩子（见 _close_on_loop_shutdown），持有引用避免被回收
+_shutdown_hooks: "weakref.WeakKeyDictionary[MCPSessionPool, Any]" = weakref.WeakKeyDictionary()
+
+
+async def _close_on_loop_shutdown(loop: asyncio.AbstractEventLoop, pool: MCPSessionPool):
+    """挂起在 yield 处的异步生成器，循环关闭时随 loop.shutdown_asyncgens() 关闭会话池
+
+    asyncio.run 在关闭循环前会调用 shutdown_asyncgens()，Celery 任务中临时创建的循环
+    因此也能断开会话、回收 stdio 子进程，不依赖 FastAPI lifespan。
+    """
+    try:
+        yield
+    finally:
+        if _pools.get(loop) is pool:
+            del _pools[loop]
+        try:
+            await pool.close()
+        except Exception as e:
+            logger.warning(f"事件循环关闭时关闭 MCP 会话池失败: {e}")
+
+
+def get_mcp_session_pool() -> MCPSessionPool:
+    """获取当前事件循环的 MCP 会话池（循环关闭时自动关闭）"""
+    loop = asyncio.get_running_loop()
+    pool = _pools.get(loop)
+    if pool is None:
+        pool = MCPSessionPool()
+        _pools[loop] = pool
+        hook = _close_on_loop_shutdown(loop, pool)
+        _shutdown_hooks[pool] = hook
+        # 运行到 yield 处挂起，生成器由循环登记，关闭循环时执行 finally
+        loop.create_task(hook.__anext__())
+    return pool
+
+
+async def close_mcp_session_pool() -> None:
+    """关闭当前事件循环的 MCP 会话池"""
+    pool = _pools.pop(asyncio.get_running_loop(), None)
+    if pool is not None:
+        await pool.close()
@@ -3,13 +3,15 @@
 事务监控模块
 
 提供事务持续时间监控、长事务检测和告警功能。
+事务耗时记入进程内指标注册表（db_transaction_duration_seconds），随 /metrics 导出。
 """
 
 import time
 import threading
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Dict, Any
 from contextlib import contextmanager
 from app.core.logging_config import get_logger
+from app.core.metrics import DB_TRANSACTION_DURATION
 
 logger = get_logger(__name__)
 
@@ -21,7 +23,7 @@ class TransactionMonitor:
     功能:
     - 监控事务持续时间
     - 检测长事务
-    - 记录事务统计信息
+    - 按事务名与结果记录耗时指标
     - 发出长事务告警
     """
     
@@ -49,16 +51,6 @@ class TransactionMonitor:
         self.warning_threshold = warning_threshold
         self.enable_monitoring = enable_monitoring
         
-        # 事务统计
-        self._stats = {
-            "total_transactions": 0,
-            "long_transactions": 0,
-            "warning_transactions": 0,
-            "total_duration": 0.0,
-            "max_duration": 0.0,
-            "min_duration": float('inf')
-        }
-        
         # 线程本地存储，用于跟踪当前事务
         self._local = threading.local()
     
@@ -77,15 +69,15 @@ class TransactionMonitor:
                 pass
         
         Args:
-            transaction_name: 事务名称，用于日志记录
-            context: 事务上下文信息（如 user_id, tenant_id 等）
+            transaction_name: 事务名称，作为指标标签与日志字段
+            context: 事务上下文信息（如 user_id, tenant_id 等），只写入日志
         """
         if not self.enable_monitoring:
             yield
             return
         
         # 记录开始时间
-        start_time = time.time()
+        start_time = time.perf_counter()
         context = context or {}
         
         # 存储到线程本地
@@ -93,20 +85,16 @@ class TransactionMonitor:
         self._local.start_time = start_time
         self._local.context = context
         
-        logger.debug(
-            "transaction_started",
-            transaction_name=transaction_name,
-            **context
-        )
+        logger.debug(f"transaction_started: {transaction_name} context={context}")
         
+        status = "error"
         try:
             yield
+            status = "ok"
         finally:
             # 计算持续时间
-            duration = time.time() - start_time
-            
-            # 更新统计
-            self._update_stats(duration)
+            duration = time.perf_counter() - start_time
+            DB_TRANSACTION_DURATION.observe(duration, transaction_name, status)
             
             # 检查是否为长事务
             self._check_transaction_duration(
@@ -116,24 +104,10 @@ class TransactionMonitor:
             )
             
             logger.debug(
-                "transaction_completed",
-                transaction_name=transaction_name,
-                duration_seconds=round(duration, 3),
-                **context
+                f"transaction_completed: {transaction_name} status={status} "
+                f"duration_seconds={round(duration, 3)} context={context}"
             )
     
-    def _update_stats(self, duration: float):
-        """更新事务统计信息"""
-        self._stats["total_transactions"] += 1
-        self._stats["total_duration"] += duration
-        self._stats["max_duration"] = max(self._stats["max_duration"], duration)
-        self._stats["min_duration"] = min(self._stats["min_duration"], duration)
-        
-        if duration >= self.long_transaction_threshold:
-            self._stats["long_transactions"] += 1
-        elif duration >= self.warning_threshold:
-            self._stats["warning_transactions"] += 1
-    
     def _check_transaction_duration(
         self,
         transaction_name: str,
@@ -164,57 +138,6 @@ class TransactionMonitor:
                 f"Monitor this transaction for potential optimization. "
                 f"Context: {context}"
             )
-    
-    def get_stats(self) -> Dict[str, Any]:
-        """
-        获取事务统计信息
-        
-        Returns:
-            包含统计信息的字典
-        """
-        if self._stats["total_transactions"] == 0:
-            avg_duration = 0.0
-        else:
-            avg_duration = self._stats["total_duration"] / self._stats["total_transactions"]
-        
-        return {
-            **self._stats,
-            "avg_duration": round(avg_duration, 3),
-            "long_transaction_rate": (
-                self._stats["long_transactions"] / self._stats["total_transactions"]
-                if self._stats["total_transactions"] > 0 else 0.0
-            ),
-            "warning_transaction_rate": (
-                self._stats["warning_transactions"] / self._stats["total_transactions"]
-                if self._stats["total_transactions"] > 0 else 0.0
-            )
-        }
-    
-    def reset_stats(self):
-        """重置统计信息"""
-        self._stats = {
-            "total_transactions": 0,
-            "long_transactions": 0,
-            "warning_transactions": 0,
-            "total_duration": 0.0,
-            "max_duration": 0.0,
-            "min_duration": float('inf')
-        }
-        logger.info("transaction_stats_reset")
-    
-    def print_stats(self):
-        """打印统计信息（用于调试）"""
-        stats = self.get_stats()
-        print("\n" + "=" * 60)
-        print("Transaction Statistics")
-        print("=" * 60)
-        print(f"Total Transactions:     {stats['total_transactions']}")
-        print(f"Long Transactions:      {stats['long_transactions']} ({stats['long_transaction_rate']:.1%})")
-        print(f"Warning Transactions:   {stats['warning_transactions']} ({stats['warning_transaction_rate']:.1%})")
-        print(f"Average Duration:       {stats['avg_duration']:.3f}s")
-        print(f"Max Duration:           {stats['max_duration']:.3f}s")
-        print(f"Min Duration:           {stats['min_duration']:.3f}s")
-        print("=" * 60 + "\n")
 
 
 # 全局事务监控器实例
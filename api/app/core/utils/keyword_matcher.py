@@ -0,0 +1,126 @@
+"""多关键词匹配自动机，供内容审核与路由等模块共用"""
+from collections import deque
+
+# 希腊大写 Sigma 的小写形式取决于上下文（词尾为 ς，否则为 σ），
+# 分块小写时需要结合前后字符，才能与整段文本 lower() 的结果一致
+_CAPITAL_SIGMA = "Σ"
+
+
+class KeywordMatcher:
+    """多关键词匹配自动机（Aho-Corasick），按小写匹配，与 `keyword.lower() in text.lower()` 等价
+
+    自动机由关键词配置构建一次，之后对任意长度文本的扫描代价与文本长度成线性关系。
+    """
+
+    def __init__(self, keywords: list[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._output: list[bool] = [False]
+        self._matches: list[tuple[str, ...]] = [()]  # 每个状态命中的关键词（含 fail 链）
+        self.max_keyword_length = 0
+
+        for keyword in keywords:
+            keyword = keyword.lower()
+            if not keyword:
+                continue
+            self.max_keyword_length = max(self.max_keyword_length, len(keyword))
+            state = 0
+            for ch in keyword:
+                nxt = self._goto[state].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(False)
+                    self._matches.append(())
+                    self._goto[state][ch] = nxt
+                state = nxt
+            self._output[state] = True
+            if keyword not in self._matches[state]:
+                self._matches[state] += (keyword,)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._output[nxt] = self._output[nxt] or self._output[self._fail[nxt]]
+                self._matches[nxt] += self._matches[self._fail[nxt]]
+
+    @property
+    def empty(self) -> bool:
+        return self.max_keyword_length == 0
+
+    def advance(self, state: int, lowered_text: str) -> tuple[int, bool]:
+        """从 state 开始继续扫描已小写的文本，返回 (新状态, 是否命中)"""
+        goto, fail, output = self._goto, self._fail, self._output
+        for ch in lowered_text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                return state, True
+        return state, False
+
+    def search(self, text: str) -> bool:
+        if self.empty:
+            return False
+        return self.advance(0, text.lower())[1]
+
+    def find_all(self, text: str) -> set[str]:
+        """一次扫描返回文本中出现的全部关键词（小写形式）"""
+        found: set[str] = set()
+        if self.empty:
+            return found
+        goto, fail, matches = self._goto, self._fail, self._matches
+        state = 0
+        for ch in text.lower():
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if matches[state]:
+                found.update(matches[state])
+        return found
+
+    def stream(self) -> "KeywordStream":
+        return KeywordStream(self)
+
+
+class KeywordStream:
+    """流式扫描状态：每次只扫描新增文本，自动机状态跨块保留，命中结果与整段重扫一致"""
+
+    def __init__(self, matcher: KeywordMatcher):
+        self._matcher = matcher
+        self._state = 0
+        self._prev = ""  # 已扫描的最后一个原始字符，作为小写上下文
+        self._held = ""  # 末尾暂缓扫描的大写 Sigma，小写形式取决于下一个字符
+        self.matched = False
+
+    def feed(self, chunk: str) -> bool:
+        if self.matched or self._matcher.empty:
+            return self.matched
+        raw = self._held + chunk
+        self._held = ""
+        if raw.endswith(_CAPITAL_SIGMA):
+            raw, self._held = raw[:-1], _CAPITAL_SIGMA
+        if raw:
+            # 暂缓的 Sigma 作为后文参与小写，但不在本次扫描
+            self._state, self.matched = self._matcher.advance(self._state, self._lower(raw, self._held))
+            self._prev = raw[-1]
+        if self._held and not self.matched:
+            # 按文本在此结束试探暂缓字符（与整段重扫此刻的结果一致），不推进状态
+            self.matched = self._matcher.advance(self._state, self._lower(self._held, ""))[1]
+        return self.matched
+
+    def _lower(self, raw: str, following: str) -> str:
+        """结合前一个字符和后文小写 raw，只返回 raw 对应的部分"""
+        lowered = (self._prev + raw + following).lower()
+        # 单个字符的小写与上下文无关（Sigma 除外，其小写总是一个字符）
+        start = 1 if self._prev == _CAPITAL_SIGMA else len(self._prev.lower())
+        end = len(lowered) - len(following)
+        return lowered[start:end]
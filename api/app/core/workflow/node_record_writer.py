@@ -0,0 +1,543 @@
+"""
+WorkflowNodeRecordWriter — 工作流节点执行记录的 write-behind 批量写入
+
+整图运行结束后，原先在请求路径中同步 delete + 逐行 insert 全部 WorkflowNodeExecution，
+50+ 节点的工作流每次运行都要多一个大事务。现在改为：
+
+- 请求路径：节点记录序列化后写入 Redis（pending:{execution_id}），执行 ID 入队，
+  派发 Celery 落库任务，立即返回；读接口先查 pending 再查数据库，刚完成的运行读取一致
+- 落库任务：持有全局 drainer 后按批弹出执行 ID，超过阈值的 input/output 先上传对象存储，
+  行内只保留引用和预览（上传失败时仍行内保存），再把整批执行的 delete + insert 合并为一个事务提交
+- 读接口通过 resolve_payload_refs 从对象存储还原被卸载的 input/output
+- 同一执行被重复提交时以最新版本（rev）为准，落库后仅在 rev 未变化时删除 pending
+
+可靠性：
+- 提交在 MULTI 事务中写 pending、索引与队列，不存在有数据无队列的窗口
+- 弹出的执行 ID 先移入 processing 列表，落库提交后才删除；drainer 异常退出时
+  drainer key 过期，下一次落库先重放 processing（delete + insert 幂等）
+- 派发落库任务失败时由 Celery Beat 定时兜底
+"""
+
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import datetime
+import json
+import logging
+import uuid
+from typing import Any, Callable, ContextManager, Dict, List, Optional
+
+import redis
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+
+from app.core.config import settings
+from app.core.utils.datetime_utils import utcnow_naive
+from app.models.workflow_model import WorkflowNodeExecution
+
+logger = logging.getLogger(__name__)
+
+PAYLOAD_REF_KEY = "__payload_ref__"
+
+_DATETIME_FIELDS = ("started_at", "completed_at", "created_at")
+_UUID_FIELDS = ("id", "execution_id", "app_id", "workflow_config_id")
+_OFFLOAD_FIELDS = ("input_data", "output_data")
+
+# 原子弹出一批执行 ID 到 processing 列表
+_POP_BATCH = """
+local items = redis.call('LRANGE', KEYS[1], 0, tonumber(ARGV[1]) - 1)
+if #items > 0 then
+    redis.call('LTRIM', KEYS[1], #items, -1)
+    redis.call('RPUSH', KEYS[2], unpack(items))
+end
+return items
+"""
+
+# 队列为空时才释放 drainer，否则返回 0 由当前 drainer 继续处理
+_RELEASE_IF_EMPTY = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return -1
+end
+if redis.call('LLEN', KEYS[1]) > 0 then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+_RENEW = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# 落库后仅在版本未变化时删除 pending（期间被重新提交则保留，由下一批写入新版本）
+_COMPLETE = """
+if redis.call('HGET', KEYS[1], 'rev') == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    redis.call('SREM', KEYS[2], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+
+def _dump_item(item: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(item)
+    for name in _DATETIME_FIELDS:
+        if isinstance(data.get(name), datetime.datetime):
+            data[name] = data[name].isoformat()
+    for name in _UUID_FIELDS:
+        if data.get(name) is not None:
+            data[name] = str(data[name])
+    return data
+
+
+def _load_item(data: Dict[str, Any]) -> Dict[str, Any]:
+    item = dict(data)
+    for name in _DATETIME_FIELDS:
+        if item.get(name):
+            item[name] = datetime.datetime.fromisoformat(item[name])
+    for name in _UUID_FIELDS:
+        if item.get(name):
+            item[name] = uuid.UUID(item[name])
+    return item
+
+
+def _record_sort_key(record: WorkflowNodeExecution) -> tuple:
+    # 与 WorkflowNodeExecutionRepository.get_latest_by_app_node 的排序一致
+    return (
+        record.completed_at is not None,
+        record.completed_at or datetime.datetime.min,
+        record.created_at or datetime.datetime.min,
+        record.started_at or datetime.datetime.min,
+    )
+
+
+def is_newer_record(candidate: WorkflowNodeExecution, current: Optional[WorkflowNodeExecution]) -> bool:
+    return current is None or _record_sort_key(candidate) > _record_sort_key(current)
+
+
+# 上传函数：[(file_key, content)]，整批上传（默认写入 StorageFactory 的存储后端）
+PayloadUploader = Callable[[List[tuple]], None]
+# 下载函数：[file_key] -> [content，失败为 None]，整批下载（默认读取 StorageFactory 的存储后端）
+PayloadDownloader = Callable[[List[str]], List[Optional[bytes]]]
+# 兜底调度：派发落库任务
+FlushScheduler = Callable[[], None]
+
+
+class WorkflowNodeRecordWriter:
+    """节点执行记录 write-behind 写入器（同步 Redis 客户端，通过 get_workflow_node_record_writer 获取）"""
+
+    PREFIX = "workflow_node_records"
+
+    def __init__(
+        self,
+        redis_client: redis.StrictRedis,
+        session_factory: Optional[Callable[[], ContextManager[Session]]] = None,
+        upload_payloads: Optional[PayloadUploader] = None,
+        schedule_flush: Optional[FlushScheduler] = None,
+        batch_size: int = 50,
+        drainer_ttl: int = 300,
+        payload_limit: int = 64 * 1024,
+        preview_chars: int = 1024,
+        max_attempts: int = 3,
+    ):
+        self.redis = redis_client
+        self.session_factory = session_factory or _default_session_factory
+        self.upload_payloads = upload_payloads or _upload_to_storage
+        self.schedule_flush = schedule_flush or _dispatch_flush_task
+        self.batch_size = max(1, batch_size)
+        self.drainer_ttl = drainer_ttl
+        self.payload_limit = payload_limit
+        self.preview_chars = preview_chars
+        self.max_attempts = max(1, max_attempts)
+
+    def _queue_key(self) -> str:
+        return f"{self.PREFIX}:queue"
+
+    def _processing_key(self) -> str:
+        return f"{self.PREFIX}:processing"
+
+    def _drainer_key(self) -> str:
+        return f"{self.PREFIX}:drainer"
+
+    def _scheduled_key(self) -> str:
+        return f"{self.PREFIX}:scheduled"
+
+    def _pending_key(self, execution_id: str) -> str:
+        return f"{self.PREFIX}:pending:{execution_id}"
+
+    def _app_key(self, app_id: str) -> str:
+        return f"{self.PREFIX}:app:{app_id}"
+
+    # ──────────────────────────────────────────────
+    # 请求路径
+    # ──────────────────────────────────────────────
+
+    def submit(
+        self,
+        execution_id: uuid.UUID,
+        app_id: uuid.UUID,
+        items: List[Dict[str, Any]],
+    ) -> List[WorkflowNodeExecution]:
+        """提交一次执行的全部节点记录（覆盖该执行此前未落库的版本）
+
+        Returns:
+            未绑定 Session 的节点记录，供调用方在落库前直接使用
+        """
+        now = utcnow_naive()
+        prepared = []
+        for item in items:
+            item = dict(item)
+            # 提前分配主键与创建时间，pending 与落库后的记录一致
+            item.setdefault("id", uuid.uuid4())
+            item.setdefault("created_at", now)
+            prepared.append(item)
+
+        execution_key = str(execution_id)
+        payload = json.dumps(
+            {"app_id": str(app_id), "items": [_dump_item(item) for item in prepared]},
+            ensure_ascii=False,
+            default=str,
+        )
+        with self.redis.pipeline(transaction=True) as pipe:
+            pipe.hset(self._pending_key(execution_key), mapping={
+                "rev": uuid.uuid4().hex,
+                "payload": payload,
+                "attempts": 0,
+            })
+            pipe.sadd(self._app_key(str(app_id)), execution_key)
+            pipe.rpush(self._queue_key(), execution_key)
+            pipe.execute()
+        self._request_flush()
+        return self._to_records(prepared)
+
+    def get_pending(self, execution_id: uuid.UUID) -> Optional[List[WorkflowNodeExecution]]:
+        """尚未落库的节点记录（按执行顺序）；已落库或不存在时返回 None"""
+        payload = self.redis.hget(self._pending_key(str(execution_id)), "payload")
+        if payload is None:
+            return None
+        records = self._to_records([_load_item(item) for item in json.loads(payload)["items"]])
+        return sorted(records, key=lambda record: record.execution_order)
+
+    def get_latest_pending(
+        self,
+        app_id: uuid.UUID,
+        node_id: str,
+        source: Optional[str] = None,
+    ) -> Optional[WorkflowNodeExecution]:
+        """该应用尚未落库的执行中，指定节点最新的一条记录"""
+        execution_ids = list(self.redis.smembers(self._app_key(str(app_id))))
+        if not execution_ids:
+            return None
+        with self.redis.pipeline(transaction=False) as pipe:
+            for execution_id in execution_ids:
+                pipe.hget(self._pending_key(execution_id), "payload")
+            payloads = pipe.execute()
+
+        latest = None
+        for payload in payloads:
+            if payload is None:
+                continue
+            for data in json.loads(payload)["items"]:
+                if data.get("node_id") != node_id:
+                    continue
+                if source is not None and (data.get("meta_data") or {}).get("source") != source:
+                    continue
+                record = self._to_records([_load_item(data)])[0]
+                if is_newer_record(record, latest):
+                    latest = record
+        return latest
+
+    def _request_flush(self) -> None:
+        """派发落库任务（同一时间只保留一个待执行任务，失败由 Beat 兜底）"""
+        try:
+            if self.redis.set(self._scheduled_key(), 1, nx=True, ex=max(60, self.drainer_ttl)):
+                self.schedule_flush()
+        except Exception as e:
+            logger.warning(f"[NodeRecordWriter] 派发落库任务失败，等待定时任务处理: {e}")
+
+    @staticmethod
+    def _to_records(items: List[Dict[str, Any]]) -> List[WorkflowNodeExecution]:
+        return [WorkflowNodeExecution(**item) for item in items]
+
+    # ──────────────────────────────────────────────
+    # 落库
+    # ──────────────────────────────────────────────
+
+    def pending_count(self) -> int:
+        return self.redis.llen(self._queue_key())
+
+    def drain(self) -> Optional[int]:
+        """落库队列中的全部执行（Celery 任务入口）
+
+        Returns:
+            落库的执行数；已有 drainer 在处理时返回 None
+        """
+        # 先清除调度标记，落库期间的新提交会再派发一次任务
+        self.redis.delete(self._scheduled_key())
+        token = uuid.uuid4().hex
+        if not self.redis.set(self._drainer_key(), token, nx=True, ex=self.drainer_ttl):
+            return None
+
+        written = 0
+        failed: List[str] = []
+        try:
+            leftover = self.redis.lrange(self._processing_key(), 0, -1)
+            if leftover:
+                logger.warning(f"[NodeRecordWriter] 重放未完成的落库批次: count={len(leftover)}")
+                written += self._process(leftover, failed)
+
+            while True:
+                execution_ids = self.redis.eval(
+                    _POP_BATCH, 2, self._queue_key(), self._processing_key(), self.batch_size
+                )
+                if execution_ids:
+                    written += self._process(execution_ids, failed)
+                    self.redis.eval(_RENEW, 1, self._drainer_key(), token, int(self.drainer_ttl * 1000))
+                    continue
+                if self.redis.eval(_RELEASE_IF_EMPTY, 2, self._queue_key(), self._drainer_key(), token):
+                    break
+        except BaseException:
+            self.redis.eval(_RELEASE, 1, self._drainer_key(), token)
+            raise
+        finally:
+            if failed:
+                # 失败的执行放回队列，由下一次落库任务重试
+                self.redis.rpush(self._queue_key(), *failed)
+        return written
+
+    def _process(self, execution_ids: List[str], failed: List[str]) -> int:
+        """落库一批执行，完成后删除未被重新提交的 pending，最后清空 processing 列表"""
+        unique_ids = list(dict.fromkeys(execution_ids))
+        with self.redis.pipeline(transaction=False) as pipe:
+            for execution_id in unique_ids:
+                pipe.hmget(self._pending_key(execution_id), "rev", "payload")
+            entries = pipe.execute()
+
+        jobs = []
+        for execution_id, (rev, payload) in zip(unique_ids, entries):
+            # 重复入队的执行已在之前的批次落库
+            if payload is None:
+                continue
+            data = json.loads(payload)
+            jobs.append({
+                "execution_id": execution_id,
+                "app_id": data["app_id"],
+                "rev": rev,
+                "items": [_load_item(item) for item in data["items"]],
+            })
+
+        done = []
+        if jobs:
+            try:
+                self._offload_payloads(jobs)
+            except Exception as e:
+                # 上传失败不阻塞落库：载荷保留在行内，下一次写入同一执行时再尝试卸载
+                logger.warning(f"[NodeRecordWriter] 上传超大载荷失败，改为行内保存: count={len(jobs)}, err={e}")
+            try:
+                self._write(jobs)
+                done = jobs
+            except Exception as e:
+                logger.warning(f"[NodeRecordWriter] 批量落库失败，逐个执行重试: count={len(jobs)}, err={e}")
+                for job in jobs:
+                    try:
+                        self._write([job])
+                        done.append(job)
+                    except Exception as job_error:
+                        self._record_failure(job, job_error, failed)
+
+        with self.redis.pipeline(transaction=False) as pipe:
+            for job in done:
+                pipe.eval(
+                    _COMPLETE, 2,
+                    self._pending_key(job["execution_id"]), self._app_key(job["app_id"]),
+                    job["rev"], job["execution_id"],
+                )
+            pipe.delete(self._processing_key())
+            pipe.execute()
+        if done:
+            logger.info(
+                f"[NodeRecordWriter] 落库完成: executions={len(done)}, "
+                f"nodes={sum(len(job['items']) for job in done)}"
+            )
+        return len(done)
+
+    def _write(self, jobs: List[Dict[str, Any]]) -> None:
+        from app.repositories.workflow_repository import WorkflowNodeExecutionRepository
+
+        with self.session_factory() as db:
+            repo = WorkflowNodeExecutionRepository(db)
+            try:
+                for job in jobs:
+                    repo.delete_by_execution_id(uuid.UUID(job["execution_id"]))
+                repo.bulk_create([item for job in jobs for item in job["items"]])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+
+    def _record_failure(self, job: Dict[str, Any], error: Exception, failed: List[str]) -> None:
+        pending_key = self._pending_key(job["execution_id"])
+        attempts = self.redis.hincrby(pending_key, "attempts", 1)
+        if attempts < self.max_attempts:
+            logger.warning(
+                f"[NodeRecordWriter] 落库失败，稍后重试: execution_id={job['execution_id']}, "
+                f"attempts={attempts}, err={error}"
+            )
+            failed.append(job["execution_id"])
+            return
+        # 多次失败（如执行记录已被删除）时放弃，避免阻塞队列
+        logger.error(
+            f"[NodeRecordWriter] 落库多次失败，放弃写入: execution_id={job['execution_id']}, err={error}",
+            exc_info=error,
+        )
+        self.redis.eval(
+            _COMPLETE, 2, pending_key, self._app_key(job["app_id"]), job["rev"], job["execution_id"]
+        )
+
+    def _offload_payloads(self, jobs: List[Dict[str, Any]]) -> None:
+        """超过 payload_limit 的 input/output 上传到对象存储，上传成功后行内替换为引用与预览"""
+        if self.payload_limit <= 0:
+            return
+        uploads = []
+        replacements = []
+        for job in jobs:
+            for item in job["items"]:
+                for name in _OFFLOAD_FIELDS:
+                    value = item.get(name)
+                    if value is None or (isinstance(value, dict) and PAYLOAD_REF_KEY in value):
+                        continue
+                    text = json.dumps(value, ensure_ascii=False, default=str)
+                    content = text.encode("utf-8")
+                    if len(content) <= self.payload_limit:
+                        continue
+                    file_key = f"workflow/{job['app_id']}/{job['execution_id']}/{item['id']}/{name}.json"
+                    uploads.append((file_key, content))
+                    replacements.append((item, name, {
+                        PAYLOAD_REF_KEY: file_key,
+                        "size": len(content),
+                        "preview": text[:self.preview_chars],
+                    }))
+        if not uploads:
+            return
+        self.upload_payloads(uploads)
+        for item, name, ref in replacements:
+            item[name] = ref
+
+
+def resolve_payload_refs(
+    records: List[WorkflowNodeExecution],
+    download: Optional[PayloadDownloader] = None,
+) -> List[WorkflowNodeExecution]:
+    """还原落库时卸载到对象存储的 input/output（读接口使用）
+
+    以已提交值设置到记录上，不会被标记为待写回数据库；下载失败时保留引用与预览。
+    """
+    refs = []
+    for record in records:
+        for name in _OFFLOAD_FIELDS:
+            value = getattr(record, name, None)
+            if isinstance(value, dict) and PAYLOAD_REF_KEY in value:
+                refs.append((record, name, value[PAYLOAD_REF_KEY]))
+    if not refs:
+        return records
+
+    try:
+        contents = (download or _download_from_storage)([file_key for _, _, file_key in refs])
+    except Exception as e:
+        logger.warning(f"[NodeRecordWriter] 读取超大载荷失败，返回预览: count={len(refs)}, err={e}")
+        return records
+    for (record, name, file_key), content in zip(refs, contents):
+        if content is None:
+            continue
+        try:
+            set_committed_value(record, name, json.loads(content))
+        except ValueError as e:
+            logger.warning(f"[NodeRecordWriter] 超大载荷格式错误，返回预览: file_key={file_key}, err={e}")
+    return records
+
+
+# ──────────────────────────────────────────────
+# 默认依赖
+# ──────────────────────────────────────────────
+
+
+def _default_session_factory() -> ContextManager[Session]:
+    from app.db import get_db_context
+
+    return get_db_context()
+
+
+def _run_async(factory: Callable[[], Any]) -> Any:
+    """在同步代码中执行协程；当前线程已有事件循环（异步接口调用同步 service）时放到独立线程执行"""
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(factory())
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(lambda: asyncio.run(factory())).result()
+
+
+def _upload_to_storage(uploads: List[tuple]) -> None:
+    from app.core.storage import StorageFactory
+
+    storage = StorageFactory.get_storage()
+
+    async def _run():
+        await asyncio.gather(*[
+            storage.upload(file_key, content, content_type="application/json")
+            for file_key, content in uploads
+        ])
+
+    _run_async(_run)
+
+
+def _download_from_storage(file_keys: List[str]) -> List[Optional[bytes]]:
+    from app.core.storage import StorageFactory
+
+    storage = StorageFactory.get_storage()
+
+    async def _run():
+        return await asyncio.gather(*[storage.download(file_key) for file_key in file_keys], return_exceptions=True)
+
+    contents = []
+    for file_key, result in zip(file_keys, _run_async(_run)):
+        if isinstance(result, BaseException):
+            logger.warning(f"[NodeRecordWriter] 下载超大载荷失败: file_key={file_key}, err={result}")
+            result = None
+        contents.append(result)
+    return contents
+
+
+def _dispatch_flush_task() -> None:
+    from app.celery_app import celery_app
+
+    celery_app.send_task("app.tasks.flush_workflow_node_records")
+
+
+def get_workflow_node_record_writer() -> Optional[WorkflowNodeRecordWriter]:
+    """获取写入器；未启用 write-behind 或 Redis 不可用时返回 None（调用方同步写入）"""
+    if not settings.WORKFLOW_NODE_RECORD_WRITE_BEHIND:
+        return None
+    from app.tasks import get_sync_redis_client
+
+    client = get_sync_redis_client()
+    if client is None:
+        return None
+    return WorkflowNodeRecordWriter(
+        client,
+        batch_size=settings.WORKFLOW_NODE_RECORD_BATCH_SIZE,
+        payload_limit=settings.WORKFLOW_NODE_RECORD_PAYLOAD_LIMIT,
+        preview_chars=settings.WORKFLOW_NODE_RECORD_PREVIEW_CHARS,
+    )
@@ -13,6 +13,7 @@ from langgraph.config import get_stream_writer
 from langgraph.errors import GraphInterrupt
 
 from app.core.config import settings
+from app.core.metrics import WORKFLOW_NODE_DURATION
 from app.core.workflow.node_cache import DEFAULT_CACHEABLE_NODE_TYPES, WorkflowNodeCacheManager
 from app.core.workflow.engine.state_manager import WorkflowState
 from app.core.workflow.engine.variable_pool import VariablePool
@@ -282,6 +283,7 @@ class BaseNode(ABC):
         cached_result["status"] = "completed"
         cached_result["error"] = None
         cached_result["elapsed_time"] = (time.time() - lookup_started_at) * 1000
+        WORKFLOW_NODE_DURATION.observe(cached_result["elapsed_time"] / 1000, self.node_type, "cached")
         cached_result["execution_order"] = _next_execution_order()
         cached_result["cache_hit"] = True
         cached_result["cache_key"] = cache_entry.get("cache_key")
@@ -574,6 +576,8 @@ class BaseNode(ABC):
             A dictionary representing the standardized state update for this node,
             including node outputs, input, output, elapsed time, token usage, and status.
         """
+        WORKFLOW_NODE_DURATION.observe(elapsed_time / 1000, self.node_type, "completed")
+
         # Extract input data (for logging or audit purposes)
         input_data = self._extract_input(state, variable_pool)
 
@@ -628,6 +632,8 @@ class BaseNode(ABC):
             when an error edge exists. If no error edge exists, this method
             raises an exception to stop the workflow.
         """
+        WORKFLOW_NODE_DURATION.observe(elapsed_time / 1000, self.node_type, "failed")
+
         # # Check if the node has an error edge defined
         # error_edge = self._find_error_edge()
 
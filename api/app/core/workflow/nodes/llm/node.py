@@ -19,6 +19,7 @@ from app.core.workflow.engine.variable_pool import VariablePool
 from app.core.workflow.nodes.base_node import BaseNode
 from app.core.workflow.nodes.enums import HttpErrorHandle
 from app.core.workflow.nodes.llm.config import LLMNodeConfig, validate_llm_param_constraints, strip_unsupported_llm_params, _MULTIMODAL_COMPATIBLE_PROVIDERS
+from app.core.workflow.nodes.llm.stop_sequence import StopSequenceMatcher, apply_stop_sequences
 from app.core.workflow.variable.base_variable import VariableType
 from app.db import get_db_context
 from app.models import ModelType
@@ -103,32 +104,10 @@ class LLMNode(BaseNode):
         cleaned_content = re.sub(pattern, '', content, flags=re.DOTALL).strip()
         return cleaned_content, reasoning_content
 
-    def _is_inside_reasoning_block(self, text: str, pos: int) -> bool:
-        import re
-        think_ranges = [(m.start(), m.end()) for m in re.finditer(r' thinking(.*?) response', text, re.DOTALL)]
-        for start, end in think_ranges:
-            if start <= pos < end:
-                return True
-        last_open = text.rfind(' thinking')
-        last_close = text.rfind(' response')
-        if last_open != -1 and (last_close == -1 or last_open > last_close) and pos >= last_open:
-            return True
-        return False
-
     def _apply_stop_sequences(self, text: str) -> tuple[str, bool]:
         if not (self.typed_config.stop.enable and self.typed_config.stop.value):
             return text, False
-        stop_sequences = self.typed_config.stop.value[:4]
-        for seq in stop_sequences:
-            idx = 0
-            while True:
-                pos = text.find(seq, idx)
-                if pos == -1:
-                    break
-                if not self._is_inside_reasoning_block(text, pos):
-                    return text[:pos], True
-                idx = pos + len(seq)
-        return text, False
+        return apply_stop_sequences(text, self.typed_config.stop.value[:4])
 
     async def _prepare_llm(
             self,
@@ -594,8 +573,8 @@ class LLMNode(BaseNode):
                 chunk_count = 0
                 full_reasoning_content = ""
                 stop_sequences = self.typed_config.stop.value[:4] if (self.typed_config.stop.enable and self.typed_config.stop.value) else None
-                need_buffer = bool(stop_sequences)
-                buffered_chunks = [] if need_buffer else None
+                # 停止序列增量匹配：只暂存可能构成停止序列的尾部，其余内容照常流式输出
+                stop_matcher = StopSequenceMatcher(stop_sequences) if stop_sequences else None
                 reasoning_done_sent = False
 
                 last_meta_data = {}
@@ -630,31 +609,15 @@ class LLMNode(BaseNode):
                             yield {"__final__": False, "chunk": "", "done": True, "field": "reasoning_content"}
 
                         full_response += content
+                        chunk_count += 1
 
-                        if stop_sequences:
-                            truncated = False
-                            truncated_pos = -1
-                            for seq in stop_sequences:
-                                idx = 0
-                                while True:
-                                    pos = full_response.find(seq, idx)
-                                    if pos == -1:
-                                        break
-                                    if not self._is_inside_reasoning_block(full_response, pos):
-                                        truncated_pos = pos
-                                        truncated = True
-                                        break
-                                    idx = pos + len(seq)
-                                if truncated:
-                                    break
-                            if truncated:
-                                full_response = full_response[:truncated_pos]
-                                chunk_count += 1
+                        if stop_matcher:
+                            output, stopped = stop_matcher.feed(content)
+                            if output:
+                                yield {"__final__": False, "chunk": output, "field": "output"}
+                            if stopped:
+                                full_response = stop_matcher.text
                                 break
-
-                        chunk_count += 1
-                        if need_buffer:
-                            buffered_chunks.append(content)
                         else:
                             yield {"__final__": False, "chunk": content, "field": "output"}
 
@@ -664,9 +627,11 @@ class LLMNode(BaseNode):
                 if self.typed_config.enable_reasoning_content_extraction and not reasoning_done_sent:
                     yield {"__final__": False, "chunk": "", "done": True, "field": "reasoning_content"}
 
-                if need_buffer:
-                    for c in buffered_chunks:
-                        yield {"__final__": False, "chunk": c, "field": "output"}
+                if stop_matcher and not stop_matcher.stopped:
+                    output, _ = stop_matcher.finish()
+                    if output:
+                        yield {"__final__": False, "chunk": output, "field": "output"}
+                    full_response = stop_matcher.text
 
                 yield {
                     "__final__": False,
@@ -0,0 +1,133 @@
+"""
+LLM 节点停止序列的增量匹配
+
+流式输出时逐块输入文本：
+- 只保留最长停止序列长度 - 1 的尾部窗口等待后续内容，窗口之前的文本立即输出
+- 命中较短的停止序列时，若更早的位置还可能补全出较长的停止序列，则等待后续内容再确认，
+  保证分块输入与一次性输入的截断位置一致
+- 推理块（<think>...</think>）的开闭状态随输入推进，块内出现的停止序列不截断
+- 每个字符只被扫描常数次，长输出不再随长度平方增长
+"""
+
+REASONING_OPEN = "<think>"
+REASONING_CLOSE = "</think>"
+
+
+class StopSequenceMatcher:
+    """停止序列增量匹配器
+
+    feed 返回可以立即输出的文本与是否命中停止序列；输入结束后调用 finish 取出剩余文本。
+    命中时在最早出现的停止序列处截断，text 为截断后的完整输出。
+    """
+
+    def __init__(self, stop_sequences: list[str]):
+        self.stop_sequences = [seq for seq in stop_sequences if seq]
+        self.window = max((len(seq) for seq in self.stop_sequences), default=1) - 1
+        self.stopped = False
+        self._outputs: list[str] = []
+        # 未确定的尾部文本，_base 为其在完整输出中的起始位置
+        self._buffer = ""
+        self._base = 0
+        self._emitted = 0
+        self._scan_from = 0
+        self._inside_reasoning = False
+
+    @property
+    def text(self) -> str:
+        return "".join(self._outputs)
+
+    def feed(self, chunk: str) -> tuple[str, bool]:
+        if self.stopped or not chunk:
+            return "", self.stopped
+        self._buffer += chunk
+        return self._scan(final=False), self.stopped
+
+    def finish(self) -> tuple[str, bool]:
+        if self.stopped:
+            return "", True
+        return self._scan(final=True), self.stopped
+
+    def _find_stop(self, start: int, end: int) -> int:
+        """[start, end) 内最早出现的停止序列位置（相对 _buffer），没有时返回 -1"""
+        earliest = -1
+        for seq in self.stop_sequences:
+            pos = self._buffer.find(seq, start, end + len(seq) - 1)
+            if pos != -1 and (earliest == -1 or pos < earliest):
+                earliest = pos
+        return earliest
+
+    def _find_partial(self, start: int, end: int) -> int:
+        """[start, end) 内最早的、延伸到 _buffer 末尾且仍可能补全为停止序列的位置，没有时返回 -1"""
+        size = len(self._buffer)
+        for pos in range(max(start, size - self.window), end):
+            tail = self._buffer[pos:]
+            if any(len(seq) > len(tail) and seq.startswith(tail) for seq in self.stop_sequences):
+                return pos
+        return -1
+
+    def _scan(self, final: bool) -> str:
+        buffer = self._buffer
+        size = len(buffer)
+        pos = self._scan_from - self._base
+        pending_stop = -1
+
+        while True:
+            if self._inside_reasoning:
+                close = buffer.find(REASONING_CLOSE, pos)
+                if close == -1:
+                    pos = max(pos, size - len(REASONING_CLOSE) + 1)
+                    # 推理块内不截断，已收到的文本都可以输出
+                    emit_to = size
+                    break
+                self._inside_reasoning = False
+                pos = close + len(REASONING_CLOSE)
+                continue
+
+            open_pos = buffer.find(REASONING_OPEN, pos)
+            limit = open_pos if open_pos != -1 else size
+            stop = self._find_stop(pos, limit)
+            # 更早的位置可能补全出较长的停止序列，从该位置起等待后续内容
+            partial = self._find_partial(pos, stop) if stop != -1 and not final else -1
+            # 停止序列之前可能有尚未收全的推理块开始标签，收全后才能确认
+            if stop != -1 and partial == -1 and (final or open_pos != -1 or stop + len(REASONING_OPEN) <= size):
+                self.stopped = True
+                return self._emit(buffer[self._emitted - self._base:stop])
+            if stop != -1:
+                pending_stop = stop if partial == -1 else partial
+                pos = pending_stop
+                emit_to = pending_stop
+                break
+            if open_pos != -1:
+                self._inside_reasoning = True
+                pos = open_pos + len(REASONING_OPEN)
+                continue
+            pos = max(pos, min(size - self.window, size - len(REASONING_OPEN) + 1))
+            emit_to = size if final else max(size - self.window, 0)
+            break
+
+        if final:
+            emit_to = size
+        elif pending_stop == -1:
+            emit_to = max(emit_to, self._emitted - self._base)
+        output = self._emit(buffer[self._emitted - self._base:emit_to]) if emit_to > self._emitted - self._base else ""
+
+        self._scan_from = self._base + pos
+        keep_from = min(pos, self._emitted - self._base)
+        if keep_from > 0:
+            self._buffer = buffer[keep_from:]
+            self._base += keep_from
+        return output
+
+    def _emit(self, text: str) -> str:
+        if text:
+            self._outputs.append(text)
+            self._emitted += len(text)
+        return text
+
+
+def apply_stop_sequences(text: str, stop_sequences: list[str]) -> tuple[str, bool]:
+    """在完整文本上应用停止序列，返回截断后的文本与是否命中"""
+    matcher = StopSequenceMatcher(stop_sequences)
+    matcher.feed(text)
+    matcher.finish()
+    return matcher.text, matcher.stopped
@@ -1,15 +1,32 @@
+import asyncio
 import os
+import time
 from contextlib import contextmanager
-from typing import Generator
+from typing import Any, Callable, Generator, TypeVar
 from sqlalchemy import create_engine
 from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.pool import QueuePool
 from app.core.config import settings
+from app.core.metrics import DB_POOL_WAIT
 
 SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.DB_USER}:{settings.DB_PASSWORD}@{settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}"
 
+
+class TimedQueuePool(QueuePool):
+    """记录从连接池获取连接的等待时间（池满时的排队时间与新建连接的时间）"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
+    poolclass=TimedQueuePool,
     pool_size=settings.DB_POOL_SIZE,
     max_overflow=settings.DB_MAX_OVERFLOW,
     pool_pre_ping=settings.DB_POOL_PRE_PING,
@@ -20,6 +37,10 @@ engine = create_engine(
     },
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# 短会话（run_in_session 专用）：提交后不过期已加载对象，会话关闭后仍可读取列属性
+ShortSessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+T = TypeVar("T")
 
 Base = declarative_base()
 
@@ -68,6 +89,45 @@ def get_db_read() -> Generator[Session, None, None]:
             db.close()
 
 
+async def run_in_session(fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    异步路径的数据库访问：在工作线程中以独立短会话执行 fn(db, *args, **kwargs)。
+    连接只在 fn 执行期间占用，执行完即归还连接池，不阻塞事件循环。
+    需要持久化的写入由 fn 自行 commit；返回的 ORM 对象已与会话分离，只能读取已加载的列。
+    用法：
+        messages = await run_in_session(
+            lambda db: MessageRepository(db).get_message_by_conversation_id(conversation_id)
+        )
+    """
+    def _call() -> T:
+        db: Session = ShortSessionLocal()
+        try:
+            return fn(db, *args, **kwargs)
+        finally:
+            # 先分离对象再回滚，避免只读查询的结果被回滚过期
+            db.expunge_all()
+            if db.in_transaction():
+                db.rollback()
+            db.close()
+
+    return await asyncio.to_thread(_call)
+
+
+def release_connection(db: Session) -> None:
+    """
+    结束会话上的只读事务并把连接还回连接池（流式响应等长耗时操作前调用）。
+    已加载的对象保持可用，不会因提交而过期；有未提交的修改时不做处理。
+    """
+    if not db.in_transaction() or db.new or db.dirty or db.deleted:
+        return
+    expire_on_commit = db.expire_on_commit
+    db.expire_on_commit = False
+    try:
+        db.commit()
+    finally:
+        db.expire_on_commit = expire_on_commit
+
+
 def get_pool_status():
     """获取连接池状态（用于监控）"""
     pool = engine.pool
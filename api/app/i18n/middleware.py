@@ -10,6 +10,10 @@ This middleware determines the language to use for each request based on:
 
 The detected language is injected into request.state.language and
 added to the response Content-Language header.
+
+Implemented as a pure ASGI middleware: response bodies (including long SSE
+streams) are passed through untouched, only the response start message is
+amended.
 """
 
 import logging
@@ -17,12 +21,13 @@ import re
 from typing import Optional
 
 from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger(__name__)
 
 
-class LanguageMiddleware(BaseHTTPMiddleware):
+class LanguageMiddleware:
     """
     Language detection middleware.
     
@@ -31,17 +36,24 @@ class LanguageMiddleware(BaseHTTPMiddleware):
     and injects it into the request context.
     """
 
-    async def dispatch(self, request: Request, call_next):
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         """
-        Process the request and determine the language.
+        Determine the language and add the Content-Language header to the response.
         
         Args:
-            request: The incoming request
-            call_next: The next middleware/handler in the chain
-            
-        Returns:
-            Response with Content-Language header added
+            scope: ASGI connection scope
+            receive: ASGI receive channel
+            send: ASGI send channel
         """
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = Request(scope)
+
         # Determine the language for this request
         language = await self._determine_language(request)
         
@@ -62,14 +74,15 @@ class LanguageMiddleware(BaseHTTPMiddleware):
         set_current_locale(language)
         
         logger.debug(f"Request language set to: {language}")
-        
+
+        async def send_with_language(message: Message):
+            # Add Content-Language header to response
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["Content-Language"] = language
+            await send(message)
+
         # Process the request
-        response = await call_next(request)
-        
-        # Add Content-Language header to response
-        response.headers["Content-Language"] = language
-        
-        return response
+        await self.app(scope, receive, send_with_language)
 
     async def _determine_language(self, request: Request) -> str:
         """
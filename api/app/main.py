@@ -89,6 +89,8 @@ async def lifespan(app: FastAPI):
     # 应用关闭事件
     from app.services.intervention_timeout_scheduler import stop as stop_timeout_scanner
     stop_timeout_scanner()
+    from app.core.tools.mcp import close_mcp_session_pool
+    await close_mcp_session_pool()
     logger.info("应用程序正在关闭")
 
 
@@ -136,6 +138,22 @@ def read_root():
     return {"message": "FastAPI is running"}
 
 
+if settings.METRICS_ENABLED and settings.METRICS_TOKEN:
+    from fastapi.responses import PlainTextResponse
+    from app.core.metrics import CONTENT_TYPE, REGISTRY, is_authorized
+
+    @app.get("/metrics", tags=["General"], include_in_schema=False)
+    def metrics(request: Request):
+        """
+        当前 API 进程的指标（Prometheus 文本格式）
+        """
+        if not is_authorized(request.headers.get("Authorization")):
+            return PlainTextResponse("Unauthorized", status_code=401)
+        return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
+elif settings.METRICS_ENABLED:
+    logger.info("未配置 METRICS_TOKEN，API 进程不暴露 /metrics")
+
+
 # 生命周期事件由 lifespan 管理，无需 on_event
 
 
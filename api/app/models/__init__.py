@@ -22,6 +22,7 @@ from .appshare_model import AppShare
 from .release_share_model import ReleaseShare
 from .conversation_model import Conversation, Message
 from .api_key_model import ApiKey, ApiKeyLog, ApiKeyType
+from .app_daily_stats_model import AppDailyStats, WorkspaceDailyStats
 from .memory_config_model import MemoryConfig
 from .multi_agent_model import MultiAgentConfig, AgentInvocation
 from .workflow_model import WorkflowConfig, WorkflowExecution, WorkflowNodeExecution, WorkflowNodeCache
@@ -75,6 +76,8 @@ __all__ = [
     "ReleaseShare",
     "Conversation",
     "Message",
+    "AppDailyStats",
+    "WorkspaceDailyStats",
     "MessageFeedback",
     "MessageReport",
     "ConversationShare",
@@ -0,0 +1,260 @@
+"""
+应用统计日汇总模型
+
+统计页面只读汇总表，不再扫描 conversations / messages / end_users / api_key_logs 原始表：
+- app_daily_stats：按 (日期, 应用, 记录所属工作空间) 汇总会话数、新增用户数、API 调用数、Token 消耗
+- workspace_daily_stats：按 (日期, 工作空间) 汇总，API 调用按 Key 类型拆分
+
+汇总行在写入时增量维护：Session flush 后收集新增/删除的会话、消息、终端用户、API 调用日志
+（以及 meta_data 变化的消息），在同一事务内累加到汇总行。
+批量 SQL（query.delete() 等）绕过 ORM 的写入不会被统计，由回填任务按原始表重建修正。
+"""
+import datetime
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import BigInteger, Column, Date, DateTime, Integer, UniqueConstraint, event, inspect, select
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import Session
+
+from app.db import Base
+from app.core.utils.datetime_utils import utcnow_naive
+from app.models.api_key_model import ApiKey, ApiKeyLog, ApiKeyType
+from app.models.conversation_model import Conversation, Message
+from app.models.end_user_model import EndUser
+
+# 工作空间 API 统计中计为"应用调用"的 Key 类型
+APP_API_KEY_TYPES = (ApiKeyType.AGENT, ApiKeyType.CLUSTER, ApiKeyType.WORKFLOW)
+
+
+class AppDailyStats(Base):
+    """应用每日统计汇总表"""
+    __tablename__ = "app_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("app_id", "stat_date", "workspace_id", name="uq_app_daily_stats"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    stat_date = Column(Date, nullable=False, comment="统计日期")
+    app_id = Column(UUID(as_uuid=True), nullable=False, comment="应用ID")
+    workspace_id = Column(UUID(as_uuid=True), nullable=False, comment="记录所属工作空间ID")
+    conversation_count = Column(Integer, nullable=False, default=0, server_default="0", comment="新建会话数")
+    new_user_count = Column(Integer, nullable=False, default=0, server_default="0", comment="新增终端用户数")
+    api_call_count = Column(Integer, nullable=False, default=0, server_default="0", comment="API调用次数")
+    token_count = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Token消耗")
+    updated_at = Column(DateTime, default=utcnow_naive, onupdate=utcnow_naive, comment="更新时间")
+
+
+class WorkspaceDailyStats(Base):
+    """工作空间每日统计汇总表"""
+    __tablename__ = "workspace_daily_stats"
+    __table_args__ = (
+        UniqueConstraint("workspace_id", "stat_date", name="uq_workspace_daily_stats"),
+    )
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    stat_date = Column(Date, nullable=False, comment="统计日期")
+    workspace_id = Column(UUID(as_uuid=True), nullable=False, comment="工作空间ID")
+    conversation_count = Column(Integer, nullable=False, default=0, server_default="0", comment="新建会话数")
+    new_user_count = Column(Integer, nullable=False, default=0, server_default="0", comment="新增终端用户数")
+    api_call_count = Column(Integer, nullable=False, default=0, server_default="0", comment="API调用次数（全部类型）")
+    app_api_call_count = Column(Integer, nullable=False, default=0, server_default="0", comment="应用类型Key调用次数")
+    service_api_call_count = Column(Integer, nullable=False, default=0, server_default="0", comment="服务类型Key调用次数")
+    token_count = Column(BigInteger, nullable=False, default=0, server_default="0", comment="Token消耗")
+    updated_at = Column(DateTime, default=utcnow_naive, onupdate=utcnow_naive, comment="更新时间")
+
+
+def extract_message_tokens(meta: Any) -> int:
+    """从消息 meta_data 中提取 Token 数量（支持多种格式）"""
+    tokens = 0
+    if isinstance(meta, dict):
+        # 格式1: {"usage": {"total_tokens": 100}}
+        if "usage" in meta and isinstance(meta["usage"], dict):
+            tokens = meta["usage"].get("total_tokens", 0)
+        # 格式2: {"tokens": 100}
+        elif "tokens" in meta:
+            tokens = meta.get("tokens", 0)
+        # 格式3: {"total_tokens": 100}
+        elif "total_tokens" in meta:
+            tokens = meta.get("total_tokens", 0)
+    return int(tokens or 0)
+
+
+# ──────────────────────────────────────────────
+# 写入时增量汇总
+# ──────────────────────────────────────────────
+
+AppKey = Tuple[datetime.date, uuid.UUID, uuid.UUID]
+WorkspaceKey = Tuple[datetime.date, uuid.UUID]
+
+
+class DailyStatsDeltas:
+    """一次 flush 中各汇总行的增量"""
+
+    def __init__(self):
+        self.apps: Dict[AppKey, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.workspaces: Dict[WorkspaceKey, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def add(
+        self,
+        stat_date: datetime.date,
+        app_id: Optional[uuid.UUID],
+        workspace_id: Optional[uuid.UUID],
+        **counts: int,
+    ) -> None:
+        if workspace_id is None:
+            return
+        if app_id is not None:
+            row = self.apps[(stat_date, app_id, workspace_id)]
+            for column in ("conversation_count", "new_user_count", "api_call_count", "token_count"):
+                row[column] += counts.get(column, 0)
+        row = self.workspaces[(stat_date, workspace_id)]
+        for column, value in counts.items():
+            row[column] += value
+
+    def __bool__(self) -> bool:
+        return any(any(r.values()) for r in self.apps.values()) or any(
+            any(r.values()) for r in self.workspaces.values()
+        )
+
+
+def _stat_date(created_at: Optional[datetime.datetime]) -> datetime.date:
+    return (created_at or utcnow_naive()).date()
+
+
+def _dialect_insert(connection):
+    if connection.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy.dialects.postgresql import insert
+    return insert
+
+
+def apply_daily_stats_deltas(connection, deltas: DailyStatsDeltas) -> None:
+    """把增量累加到汇总行（行不存在时插入）"""
+    insert = _dialect_insert(connection)
+    now = utcnow_naive()
+    for table, rows, key_columns in (
+        (AppDailyStats.__table__, deltas.apps, ("stat_date", "app_id", "workspace_id")),
+        (WorkspaceDailyStats.__table__, deltas.workspaces, ("stat_date", "workspace_id")),
+    ):
+        for key, counts in rows.items():
+            counts = {column: value for column, value in counts.items() if value}
+            if not counts:
+                continue
+            stmt = insert(table).values(id=uuid.uuid4(), updated_at=now, **dict(zip(key_columns, key)), **counts)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=list(key_columns),
+                set_={
+                    **{column: table.c[column] + stmt.excluded[column] for column in counts},
+                    "updated_at": now,
+                },
+            )
+            connection.execute(stmt)
+
+
+# 会话 / API Key 的归属不会变化，缓存查询结果
+_OWNER_CACHE_SIZE = 4096
+_conversation_owners: "OrderedDict[uuid.UUID, Tuple[uuid.UUID, uuid.UUID]]" = OrderedDict()
+_api_key_owners: "OrderedDict[uuid.UUID, Tuple[Optional[uuid.UUID], uuid.UUID, str]]" = OrderedDict()
+_owner_lock = threading.Lock()
+
+
+def _remember(cache: OrderedDict, key, value) -> None:
+    with _owner_lock:
+        cache[key] = value
+        cache.move_to_end(key)
+        while len(cache) > _OWNER_CACHE_SIZE:
+            cache.popitem(last=False)
+
+
+def _resolve_owners(session: Session, model, ids: Iterable[uuid.UUID], cache: OrderedDict, columns) -> Dict:
+    owners, missing = {}, []
+    for obj_id in set(ids):
+        if obj_id is None:
+            continue
+        cached = cache.get(obj_id)
+        if cached is not None:
+            owners[obj_id] = cached
+            continue
+        # 同一事务中新建的对象在 identity map 中
+        obj = session.identity_map.get(inspect(model).identity_key_from_primary_key((obj_id,)))
+        if obj is not None:
+            owners[obj_id] = tuple(getattr(obj, c.key) for c in columns)
+            _remember(cache, obj_id, owners[obj_id])
+        else:
+            missing.append(obj_id)
+    if missing:
+        rows = session.connection().execute(select(model.id, *columns).where(model.id.in_(missing)))
+        for row in rows:
+            owners[row[0]] = tuple(row[1:])
+            _remember(cache, row[0], owners[row[0]])
+    return owners
+
+
+def collect_daily_stats_deltas(session: Session) -> DailyStatsDeltas:
+    """收集本次 flush 中新增、删除、meta_data 变化的记录对应的汇总增量"""
+    deltas = DailyStatsDeltas()
+    changes = [(obj, 1) for obj in session.new] + [(obj, -1) for obj in session.deleted]
+
+    messages = []
+    api_logs = []
+    for obj, sign in changes:
+        if isinstance(obj, Conversation):
+            deltas.add(_stat_date(obj.created_at), obj.app_id, obj.workspace_id, conversation_count=sign)
+        elif isinstance(obj, EndUser):
+            deltas.add(_stat_date(obj.created_at), obj.app_id, obj.workspace_id, new_user_count=sign)
+        elif isinstance(obj, Message):
+            tokens = extract_message_tokens(obj.meta_data)
+            if tokens:
+                messages.append((obj, sign * tokens))
+        elif isinstance(obj, ApiKeyLog):
+            api_logs.append((obj, sign))
+
+    for obj in session.dirty:
+        if isinstance(obj, Message) and obj not in session.deleted:
+            history = inspect(obj).attrs.meta_data.history
+            if history.has_changes():
+                old = extract_message_tokens(history.deleted[0]) if history.deleted else 0
+                new = extract_message_tokens(obj.meta_data)
+                if new != old:
+                    messages.append((obj, new - old))
+
+    if messages:
+        owners = _resolve_owners(
+            session, Conversation, (m.conversation_id for m, _ in messages), _conversation_owners,
+            (Conversation.app_id, Conversation.workspace_id),
+        )
+        for message, tokens in messages:
+            app_id, workspace_id = owners.get(message.conversation_id, (None, None))
+            deltas.add(_stat_date(message.created_at), app_id, workspace_id, token_count=tokens)
+
+    if api_logs:
+        owners = _resolve_owners(
+            session, ApiKey, (log.api_key_id for log, _ in api_logs), _api_key_owners,
+            (ApiKey.resource_id, ApiKey.workspace_id, ApiKey.type),
+        )
+        for log, sign in api_logs:
+            resource_id, workspace_id, key_type = owners.get(log.api_key_id, (None, None, None))
+            deltas.add(
+                _stat_date(log.created_at), resource_id, workspace_id,
+                api_call_count=sign,
+                app_api_call_count=sign if key_type in APP_API_KEY_TYPES else 0,
+                service_api_call_count=sign if key_type == ApiKeyType.SERVICE else 0,
+            )
+    return deltas
+
+
+@event.listens_for(Message.meta_data, "set", active_history=True)
+def _load_previous_meta_data(target, value, oldvalue, initiator) -> None:
+    """赋值时加载旧的 meta_data（对象已过期时也能在 flush 后计算 Token 差值）"""
+
+
+@event.listens_for(Session, "after_flush")
+def _rollup_daily_stats(session: Session, flush_context) -> None:
+    """flush 后在同一事务内累加统计汇总"""
+    deltas = collect_daily_stats_deltas(session)
+    if deltas:
+        apply_daily_stats_deltas(session.connection(), deltas)
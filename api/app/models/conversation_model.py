@@ -4,7 +4,7 @@
 import uuid
 import datetime
 
-from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Integer, Text, JSON
+from sqlalchemy import Column, String, DateTime, ForeignKey, Boolean, Index, Integer, Text, JSON, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
@@ -25,6 +25,17 @@ class Conversation(Base):
     - 支持应用分享后的会话隔离
     """
     __tablename__ = "conversations"
+    __table_args__ = (
+        # 应用日志列表：按更新时间倒序的游标分页（updated_at 为空时取 created_at）
+        Index(
+            "ix_conversations_app_log_sort",
+            "app_id",
+            "workspace_id",
+            text("coalesce(updated_at, created_at)"),
+            "id",
+            postgresql_where="is_active",
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
 
@@ -79,6 +90,16 @@ class ConversationDetail(Base):
 class Message(Base):
     """消息表"""
     __tablename__ = "messages"
+    __table_args__ = (
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+        # 应用日志关键词搜索（pg_trgm 三元组索引，支持 ILIKE '%kw%' 与中文内容）
+        Index(
+            "ix_messages_content_trgm",
+            "content",
+            postgresql_using="gin",
+            postgresql_ops={"content": "gin_trgm_ops"},
+        ),
+    )
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4, index=True)
 
@@ -0,0 +1,178 @@
+"""应用统计日汇总数据访问层"""
+import datetime
+import uuid
+from typing import Any, Dict, List, Union
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from app.core.logging_config import get_db_logger
+from app.models.api_key_model import ApiKey, ApiKeyLog, ApiKeyType
+from app.models.app_daily_stats_model import (
+    APP_API_KEY_TYPES,
+    AppDailyStats,
+    DailyStatsDeltas,
+    WorkspaceDailyStats,
+    apply_daily_stats_deltas,
+    extract_message_tokens,
+)
+from app.models.conversation_model import Conversation, Message
+from app.models.end_user_model import EndUser
+
+# 获取数据库专用日志器
+db_logger = get_db_logger()
+
+
+def _as_date(value: Union[str, datetime.date, datetime.datetime]) -> datetime.date:
+    """统一 func.date() 在不同数据库中的返回类型"""
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.date.fromisoformat(str(value))
+
+
+class AppDailyStatsRepository:
+    """应用 / 工作空间每日统计汇总"""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_app_daily(
+        self,
+        app_id: uuid.UUID,
+        workspace_id: uuid.UUID,
+        start_date: datetime.date,
+        end_date: datetime.date,
+    ) -> List[Dict[str, Any]]:
+        """按日期查询应用统计（含首尾日期）
+
+        会话数只统计属于 workspace_id 的会话，其余指标统计该应用的全部记录。
+        """
+        rows = self.db.query(
+            AppDailyStats.stat_date,
+            func.sum(case(
+                (AppDailyStats.workspace_id == workspace_id, AppDailyStats.conversation_count), else_=0
+            )).label("conversations"),
+            func.sum(AppDailyStats.new_user_count).label("new_users"),
+            func.sum(AppDailyStats.api_call_count).label("api_calls"),
+            func.sum(AppDailyStats.token_count).label("tokens"),
+        ).filter(
+            and_(
+                AppDailyStats.app_id == app_id,
+                AppDailyStats.stat_date >= start_date,
+                AppDailyStats.stat_date <= end_date,
+            )
+        ).group_by(AppDailyStats.stat_date).order_by(AppDailyStats.stat_date).all()
+
+        return [
+            {
+                "date": str(row.stat_date),
+                "conversations": int(row.conversations or 0),
+                "new_users": int(row.new_users or 0),
+                "api_calls": int(row.api_calls or 0),
+                "tokens": int(row.tokens or 0),
+            }
+            for row in rows
+        ]
+
+    def get_workspace_daily(
+        self,
+        workspace_id: uuid.UUID,
+        start_date: datetime.date,
+        end_date: datetime.date,
+    ) -> List[WorkspaceDailyStats]:
+        """按日期查询工作空间统计（含首尾日期）"""
+        return self.db.query(WorkspaceDailyStats).filter(
+            and_(
+                WorkspaceDailyStats.workspace_id == workspace_id,
+                WorkspaceDailyStats.stat_date >= start_date,
+                WorkspaceDailyStats.stat_date <= end_date,
+            )
+        ).order_by(WorkspaceDailyStats.stat_date).all()
+
+    def rebuild(self, start_date: datetime.date, end_date: datetime.date, batch_size: int = 1000) -> int:
+        """按原始表重建日期范围内（含首尾）的汇总行，用于历史回填和漂移修正
+
+        Returns:
+            重建的应用汇总行数
+        """
+        start_dt = datetime.datetime.combine(start_date, datetime.time.min)
+        end_dt = datetime.datetime.combine(end_date + datetime.timedelta(days=1), datetime.time.min)
+        deltas = DailyStatsDeltas()
+
+        conversation_rows = self.db.query(
+            func.date(Conversation.created_at).label("date"),
+            Conversation.app_id,
+            Conversation.workspace_id,
+            func.count(Conversation.id).label("count"),
+        ).filter(
+            and_(Conversation.created_at >= start_dt, Conversation.created_at < end_dt)
+        ).group_by(func.date(Conversation.created_at), Conversation.app_id, Conversation.workspace_id).all()
+        for row in conversation_rows:
+            deltas.add(_as_date(row.date), row.app_id, row.workspace_id, conversation_count=row.count)
+
+        user_rows = self.db.query(
+            func.date(EndUser.created_at).label("date"),
+            EndUser.app_id,
+            EndUser.workspace_id,
+            func.count(EndUser.id).label("count"),
+        ).filter(
+            and_(EndUser.created_at >= start_dt, EndUser.created_at < end_dt)
+        ).group_by(func.date(EndUser.created_at), EndUser.app_id, EndUser.workspace_id).all()
+        for row in user_rows:
+            deltas.add(_as_date(row.date), row.app_id, row.workspace_id, new_user_count=row.count)
+
+        api_rows = self.db.query(
+            func.date(ApiKeyLog.created_at).label("date"),
+            ApiKey.resource_id,
+            ApiKey.workspace_id,
+            ApiKey.type,
+            func.count(ApiKeyLog.id).label("count"),
+        ).join(
+            ApiKey, ApiKeyLog.api_key_id == ApiKey.id
+        ).filter(
+            and_(ApiKeyLog.created_at >= start_dt, ApiKeyLog.created_at < end_dt)
+        ).group_by(
+            func.date(ApiKeyLog.created_at), ApiKey.resource_id, ApiKey.workspace_id, ApiKey.type
+        ).all()
+        for row in api_rows:
+            deltas.add(
+                _as_date(row.date), row.resource_id, row.workspace_id,
+                api_call_count=row.count,
+                app_api_call_count=row.count if row.type in APP_API_KEY_TYPES else 0,
+                service_api_call_count=row.count if row.type == ApiKeyType.SERVICE else 0,
+            )
+
+        # meta_data 有多种格式，按消息逐条提取（流式读取，不一次性加载）
+        message_rows = self.db.query(
+            Message.created_at,
+            Message.meta_data,
+            Conversation.app_id,
+            Conversation.workspace_id,
+        ).join(
+            Conversation, Message.conversation_id == Conversation.id
+        ).filter(
+            and_(
+                Message.created_at >= start_dt,
+                Message.created_at < end_dt,
+                Message.meta_data.isnot(None),
+            )
+        ).yield_per(batch_size)
+        for row in message_rows:
+            tokens = extract_message_tokens(row.meta_data)
+            if tokens:
+                deltas.add(row.created_at.date(), row.app_id, row.workspace_id, token_count=tokens)
+
+        for model in (AppDailyStats, WorkspaceDailyStats):
+            self.db.query(model).filter(
+                and_(model.stat_date >= start_date, model.stat_date <= end_date)
+            ).delete(synchronize_session=False)
+        apply_daily_stats_deltas(self.db.connection(), deltas)
+        self.db.commit()
+
+        db_logger.info(
+            f"统计汇总重建完成: {start_date} ~ {end_date}, "
+            f"应用汇总 {len(deltas.apps)} 行, 工作空间汇总 {len(deltas.workspaces)} 行"
+        )
+        return len(deltas.apps)
@@ -1,10 +1,13 @@
+import base64
+import datetime
+import json
 import uuid
-from typing import Optional
+from typing import NamedTuple, Optional
 
-from sqlalchemy import select, desc, func
+from sqlalchemy import select, desc, func, tuple_
 from sqlalchemy.orm import Session
 
-from app.core.exceptions import ResourceNotFoundException
+from app.core.exceptions import ResourceNotFoundException, ValidationException
 from app.core.logging_config import get_db_logger
 from app.models import Conversation, Message
 from app.models.conversation_model import ConversationDetail
@@ -12,6 +15,34 @@ from app.models.conversation_model import ConversationDetail
 logger = get_db_logger()
 
 
+class AppConversationPage(NamedTuple):
+    """应用日志会话分页结果"""
+    items: list[Conversation]
+    total: int
+    total_capped: bool
+    has_next: bool
+    next_cursor: Optional[str]
+
+
+# 应用日志排序键：历史数据 updated_at 可能为空，回退到 created_at（与 ix_conversations_app_log_sort 一致）
+_APP_LOG_SORT_KEY = func.coalesce(Conversation.updated_at, Conversation.created_at)
+
+
+def _encode_app_log_cursor(conversation: Conversation) -> str:
+    sort_key = conversation.updated_at or conversation.created_at
+    payload = json.dumps([sort_key.isoformat(), str(conversation.id)])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_app_log_cursor(cursor: str) -> tuple[datetime.datetime, uuid.UUID]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, conversation_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.datetime.fromisoformat(updated_at), uuid.UUID(conversation_id)
+    except (ValueError, TypeError) as e:
+        raise ValidationException("无效的分页游标", field="cursor", cause=e)
+
+
 class ConversationRepository:
     """Repository for Conversation entity, encapsulating CRUD operations."""
 
@@ -207,10 +238,18 @@ class ConversationRepository:
             keyword: Optional[str] = None,
             page: int = 1,
             pagesize: int = 20,
-    ) -> tuple[list[Conversation], int]:
+            cursor: Optional[str] = None,
+            count_limit: int = 1000,
+    ) -> AppConversationPage:
         """
         查询应用日志会话列表（带分页和过滤）
 
+        按 (coalesce(updated_at, created_at), id) 倒序排列。传入 cursor 时使用游标（keyset）分页，忽略 page；
+        关键词匹配由 messages.content 的 pg_trgm 索引支持。pg_trgm 只能为不少于 3 个字符的关键词
+        提取三元组，1～2 个字符的关键词（常见于中文）用不上该索引，退化为按候选会话
+        逐个扫描其消息（ix_messages_conversation_created），开销随应用会话数增长，由 count_limit 限制计数部分。
+        总数最多统计到 count_limit 条，超过时 total_capped 为 True。
+
         Args:
             app_id: 应用 ID
             workspace_id: 工作空间 ID
@@ -218,9 +257,14 @@ class ConversationRepository:
             keyword: 搜索关键词（匹配 messages 表的消息内容）
             page: 页码（从 1 开始）
             pagesize: 每页数量
+            cursor: 上一页返回的 next_cursor
+            count_limit: 总数统计上限
 
         Returns:
-            Tuple[List[Conversation], int]: (会话列表，总数)
+            AppConversationPage: 会话列表、总数、是否有下一页及下一页游标
+
+        Raises:
+            ValidationException: 游标格式不正确时
         """
         base_conditions = [
             Conversation.app_id == app_id,
@@ -230,31 +274,37 @@ class ConversationRepository:
         if is_draft is not None:
             base_conditions.append(Conversation.is_draft == is_draft)
 
-        base_stmt = select(Conversation).where(*base_conditions)
-
         if keyword:
-            kw_pattern = f"%{keyword}%"
-            app_conversation_ids = select(Conversation.id).where(*base_conditions)
-            keyword_stmt = (
-                select(Message.conversation_id)
-                .where(
-                    Message.conversation_id.in_(app_conversation_ids),
-                    Message.content.ilike(kw_pattern),
-                )
-                .distinct()
+            # 转义 LIKE 通配符，关键词按字面匹配
+            escaped = keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            base_conditions.append(
+                select(Message.id).where(
+                    Message.conversation_id == Conversation.id,
+                    Message.content.ilike(f"%{escaped}%", escape="\\"),
+                ).exists()
             )
-            base_stmt = base_stmt.where(Conversation.id.in_(keyword_stmt))
 
-        # Calculate total number of records
-        total = int(self.db.execute(
-            select(func.count()).select_from(base_stmt.subquery())
+        # 统计总数（上限 count_limit，避免关键词搜索时全量计数）
+        counted = int(self.db.execute(
+            select(func.count()).select_from(
+                select(Conversation.id).where(*base_conditions).limit(count_limit + 1).subquery()
+            )
         ).scalar_one())
+        total_capped = counted > count_limit
+        total = min(counted, count_limit)
 
-        # Apply pagination
-        stmt = base_stmt.order_by(desc(Conversation.updated_at))
-        stmt = stmt.offset((page - 1) * pagesize).limit(pagesize)
+        stmt = select(Conversation).where(*base_conditions)
+        if cursor:
+            updated_at, last_id = _decode_app_log_cursor(cursor)
+            stmt = stmt.where(tuple_(_APP_LOG_SORT_KEY, Conversation.id) < tuple_(updated_at, last_id))
+        else:
+            stmt = stmt.offset((page - 1) * pagesize)
+        stmt = stmt.order_by(desc(_APP_LOG_SORT_KEY), desc(Conversation.id)).limit(pagesize + 1)
 
         conversations = list(self.db.scalars(stmt).all())
+        has_next = len(conversations) > pagesize
+        conversations = conversations[:pagesize]
+        next_cursor = _encode_app_log_cursor(conversations[-1]) if has_next else None
 
         logger.info(
             "Listed app conversations successfully",
@@ -263,10 +313,11 @@ class ConversationRepository:
                 "workspace_id": str(workspace_id),
                 "keyword": keyword,
                 "returned": len(conversations),
-                "total": total
+                "total": total,
+                "total_capped": total_capped,
             }
         )
-        return conversations, total
+        return AppConversationPage(conversations, total, total_capped, has_next, next_cursor)
 
     def get_conversation_for_app_log(
             self,
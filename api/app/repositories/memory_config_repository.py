@@ -87,6 +87,26 @@ class MemoryConfigRepository:
     ORDER BY user_id
     """
 
+    # 批量统计多个用户的记忆计数器（对账任务使用，与 MemoryCounterCache 字段一一对应）
+    # edge 为起点属于该用户的全部关系数
+    SEARCH_FOR_COUNTERS_BATCH = """
+    UNWIND $end_user_ids AS uid
+    CALL (uid) {
+        MATCH (n) WHERE n.end_user_id = uid
+        RETURN count(n) AS total,
+            count(CASE WHEN n:Dialogue THEN 1 END) AS dialogue,
+            count(CASE WHEN n:Chunk THEN 1 END) AS chunk,
+            count(CASE WHEN n:Statement THEN 1 END) AS statement,
+            count(CASE WHEN n:ExtractedEntity THEN 1 END) AS entity,
+            count(CASE WHEN n:MemorySummary THEN 1 END) AS summary
+    }
+    CALL (uid) {
+        MATCH (n)-[r]->() WHERE n.end_user_id = uid
+        RETURN count(r) AS edge
+    }
+    RETURN uid AS user_id, total, dialogue, chunk, statement, entity, summary, edge
+    """
+
     # Extracted entity details within group/app/user
     SEARCH_FOR_DETIALS = """
     MATCH (n:ExtractedEntity)
@@ -1,6 +1,7 @@
 import logging
 from typing import List, Optional
 
+from app.cache.memory.memory_counters import MemoryCounterCache, counter_deltas
 from app.core.utils.datetime_utils import to_iso_z
 from app.core.memory.models.graph_models import DialogueNode, StatementNode, ChunkNode, MemorySummaryNode
 from app.repositories.neo4j.cypher_queries import DIALOGUE_NODE_SAVE, STATEMENT_NODE_SAVE, CHUNK_NODE_SAVE, \
@@ -14,6 +15,7 @@ logger = logging.getLogger(__name__)
 async def delete_all_nodes(end_user_id: str, connector: Neo4jConnector):
     """Delete all nodes in the database."""
     result = await connector.execute_query(f"MATCH (n {{end_user_id: '{end_user_id}'}}) DETACH DELETE n")
+    await MemoryCounterCache.clear_end_user_counters(end_user_id)
     logger.warning(f"All end_user_id: {end_user_id} node and edge deleted successfully")
     return result
 
@@ -219,11 +221,16 @@ async def add_memory_summary_nodes(
                 "config_id": s.config_id,  # 添加 config_id
             })
 
-        result = await connector.execute_query(
+        result, write_counters = await connector.execute_query_with_counters(
             MEMORY_SUMMARY_NODE_SAVE,
             summaries=flattened
         )
         created_ids = [record.get("uuid") for record in result]
+        end_user_ids = {s.end_user_id for s in summaries if s.end_user_id}
+        if len(end_user_ids) == 1:
+            await MemoryCounterCache.apply_deltas(end_user_ids.pop(), counter_deltas(write_counters, "summary"))
+        else:
+            await MemoryCounterCache.mark_dirty(end_user_ids)
         logger.info(f"Successfully saved {len(created_ids)} MemorySummary nodes to Neo4j")
         return created_ids
     except Exception as e:
@@ -2,8 +2,10 @@ import asyncio
 import os
 from typing import List, Optional
 
+from app.cache.memory.memory_counters import MemoryCounterCache, counter_deltas, merge_deltas
+from app.core.memory.utils.maintenance_scheduler import mark_memory_changed
 # 使用新的仓储层
-from app.repositories.neo4j.neo4j_connector import Neo4jConnector
+from app.repositories.neo4j.neo4j_connector import Neo4jConnector, summary_counters
 from app.repositories.neo4j.add_nodes import add_dialogue_nodes, add_statement_nodes, add_chunk_nodes
 from app.repositories.neo4j.cypher_queries import (
     STATEMENT_ENTITY_EDGE_SAVE,
@@ -248,10 +250,19 @@ async def save_dialog_and_statements_to_neo4j(
             except Exception as e:
                 logger.warning(f"特殊实体 ID 复用查询失败（不影响写入）: {e}")
 
+    # 每条写入语句的计数增量，事务提交后用于更新记忆计数器
+    counter_parts: List[dict] = []
+
+    async def _track_counters(result, field: Optional[str] = None) -> None:
+        summary = await result.consume()
+        counter_parts.append(counter_deltas(summary_counters(summary), field))
+
     # 定义事务函数，将所有写操作放在一个事务中
     async def _save_all_in_transaction(tx):
         """在单个事务中执行所有保存操作，避免死锁"""
         results = {}
+        # 事务函数可能被驱动重试，每次重新统计
+        counter_parts.clear()
 
         # 1. Save all dialogue nodes in batch
         if dialogue_nodes:
@@ -259,6 +270,7 @@ async def save_dialog_and_statements_to_neo4j(
             dialogue_data = [node.model_dump() for node in dialogue_nodes]
             result = await tx.run(DIALOGUE_NODE_SAVE, dialogues=dialogue_data)
             dialogue_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result, "dialogue")
             results['dialogues'] = dialogue_uuids
             logger.debug(f"Dialogues saved to Neo4j with UUIDs: {dialogue_uuids}")
 
@@ -268,6 +280,7 @@ async def save_dialog_and_statements_to_neo4j(
             chunk_data = [node.model_dump() for node in chunk_nodes]
             result = await tx.run(CHUNK_NODE_SAVE, chunks=chunk_data)
             chunk_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result, "chunk")
             results['chunks'] = chunk_uuids
             logger.debug(f"Successfully saved {len(chunk_uuids)} chunk nodes to Neo4j")
 
@@ -276,6 +289,7 @@ async def save_dialog_and_statements_to_neo4j(
             perceptual_data = [node.model_dump() for node in perceptual_nodes]
             result = await tx.run(PERCEPTUAL_NODE_SAVE, perceptuals=perceptual_data)
             perceptual_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results["perceptuals"] = perceptual_uuids
             logger.debug(f"Successfully saved {len(perceptual_uuids)} perceptual nodes to Neo4j")
 
@@ -285,6 +299,7 @@ async def save_dialog_and_statements_to_neo4j(
             statement_data = [node.model_dump() for node in statement_nodes]
             result = await tx.run(STATEMENT_NODE_SAVE, statements=statement_data)
             statement_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result, "statement")
             results['statements'] = statement_uuids
             logger.debug(f"Successfully saved {len(statement_uuids)} statement nodes to Neo4j")
 
@@ -294,6 +309,7 @@ async def save_dialog_and_statements_to_neo4j(
             entity_data = [entity.model_dump() for entity in entity_nodes]
             result = await tx.run(EXTRACTED_ENTITY_NODE_SAVE, entities=entity_data)
             entity_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result, "entity")
             results['entities'] = entity_uuids
             logger.debug(f"Successfully saved {len(entity_uuids)} entity nodes to Neo4j")
 
@@ -320,6 +336,7 @@ async def save_dialog_and_statements_to_neo4j(
                 })
             result = await tx.run(ENTITY_RELATIONSHIP_SAVE, relationships=relationship_data)
             rel_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['entity_relationships'] = rel_uuids
             logger.debug(f"Successfully saved {len(rel_uuids)} entity relationships to Neo4j")
 
@@ -338,6 +355,7 @@ async def save_dialog_and_statements_to_neo4j(
                 })
             result = await tx.run(CHUNK_STATEMENT_EDGE_SAVE, chunk_statement_edges=sc_edge_data)
             sc_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['statement_chunk_edges'] = sc_uuids
             logger.debug(f"Successfully saved {len(sc_uuids)} statement-chunk edges to Neo4j")
 
@@ -356,6 +374,7 @@ async def save_dialog_and_statements_to_neo4j(
                 })
             result = await tx.run(STATEMENT_ENTITY_EDGE_SAVE, relationships=se_edge_data)
             se_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['statement_entity_edges'] = se_uuids
             logger.debug(f"Successfully saved {len(se_uuids)} statement-entity edges to Neo4j")
 
@@ -372,6 +391,7 @@ async def save_dialog_and_statements_to_neo4j(
                 })
             result = await tx.run(PERCEPTUAL_CHUNK_EDGE_SAVE, edges=perceptual_edge_data)
             perceptual_edges_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['perceptual_chunk_edges'] = perceptual_edges_uuids
             logger.debug(f"Successfully saved {len(perceptual_edges_uuids)} perceptual-chunk edges to Neo4j")
 
@@ -381,6 +401,7 @@ async def save_dialog_and_statements_to_neo4j(
             original_data = [node.model_dump() for node in assistant_original_nodes]
             result = await tx.run(ASSISTANT_ORIGINAL_NODE_SAVE, originals=original_data)
             original_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['assistant_originals'] = original_uuids
             logger.debug(f"Successfully saved {len(original_uuids)} assistant original nodes to Neo4j")
 
@@ -390,6 +411,7 @@ async def save_dialog_and_statements_to_neo4j(
             pruned_data = [node.model_dump() for node in assistant_pruned_nodes]
             result = await tx.run(ASSISTANT_PRUNED_NODE_SAVE, pruneds=pruned_data)
             pruned_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['assistant_pruneds'] = pruned_uuids
             logger.debug(f"Successfully saved {len(pruned_uuids)} assistant pruned nodes to Neo4j")
 
@@ -406,6 +428,7 @@ async def save_dialog_and_statements_to_neo4j(
             } for edge in assistant_pruned_edges]
             result = await tx.run(ASSISTANT_PRUNED_EDGE_SAVE, edges=edge_data)
             pruned_edge_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['assistant_pruned_edges'] = pruned_edge_uuids
             logger.debug(f"Successfully saved {len(pruned_edge_uuids)} PRUNED_TO edges to Neo4j")
 
@@ -421,6 +444,7 @@ async def save_dialog_and_statements_to_neo4j(
             } for edge in assistant_dialog_edges]
             result = await tx.run(ASSISTANT_DIALOG_EDGE_SAVE, edges=edge_data)
             dialog_edge_uuids = [record["uuid"] async for record in result]
+            await _track_counters(result)
             results['assistant_dialog_edges'] = dialog_edge_uuids
             logger.debug(f"Successfully saved {len(dialog_edge_uuids)} BELONGS_TO_DIALOG edges to Neo4j")
 
@@ -437,6 +461,10 @@ async def save_dialog_and_statements_to_neo4j(
         logger.info("Transaction completed. Summary: %s", summary)
         logger.debug("Full transaction results: %r", results)
 
+        await _update_memory_counters(
+            [*dialogue_nodes, *chunk_nodes, *statement_nodes, *entity_nodes, *perceptual_nodes],
+            merge_deltas(*counter_parts),
+        )
         return True
 
     except Exception as e:
@@ -446,6 +474,22 @@ async def save_dialog_and_statements_to_neo4j(
         return False
 
 
+async def _update_memory_counters(nodes: List, deltas: dict) -> None:
+    """写事务提交后增量更新记忆计数器
+
+    一次写入只涉及单个 end_user_id 时直接累加增量；
+    涉及多个用户时无法拆分增量，标记为待对账。
+    同时标记这些用户待维护，定时维护任务只处理有变更的用户。
+    """
+    end_user_ids = {node.end_user_id for node in nodes if getattr(node, "end_user_id", None)}
+    if end_user_ids:
+        await mark_memory_changed(end_user_ids)
+    if len(end_user_ids) == 1:
+        await MemoryCounterCache.apply_deltas(end_user_ids.pop(), deltas)
+    elif end_user_ids:
+        await MemoryCounterCache.mark_dirty(end_user_ids)
+
+
 async def _trigger_clustering_sync(
         entity_nodes: List,
         llm_model_id: Optional[str] = None,
@@ -485,6 +529,8 @@ async def _trigger_clustering(
         connector = Neo4jConnector()
         engine = LabelPropagationEngine(connector, llm_model_id=llm_model_id, embedding_model_id=embedding_model_id)
         await engine.run(end_user_id=end_user_id, new_entity_ids=new_entity_ids)
+        # 聚类会增删 Community 节点及其关系，增量难以逐条统计，交由对账任务修正
+        await MemoryCounterCache.mark_dirty([end_user_id])
         logger.info(f"[Clustering] 聚类完成，end_user_id={end_user_id}")
     except Exception as e:
         logger.error(f"[Clustering] 聚类触发失败: {e}", exc_info=True)
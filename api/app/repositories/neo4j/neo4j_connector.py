@@ -8,12 +8,13 @@ Classes:
     Neo4jConnector: Neo4j数据库连接器，提供异步查询接口
 """
 
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Tuple
 
 from neo4j import AsyncGraphDatabase, basic_auth
 from neo4j.time import DateTime as Neo4jDateTime, Date as Neo4jDate, Time as Neo4jTime, Duration as Neo4jDuration
 
 from app.core.config import settings
+from app.core.metrics import NEO4J_QUERY_DURATION
 from app.core.utils.datetime_utils import to_iso_z
 
 
@@ -34,6 +35,17 @@ def _convert_neo4j_types(value: Any) -> Any:
     return value
 
 
+def summary_counters(summary: Any) -> Dict[str, int]:
+    """提取查询结果摘要中的写入计数（节点/关系的创建与删除数）"""
+    counters = summary.counters
+    return {
+        "nodes_created": counters.nodes_created,
+        "nodes_deleted": counters.nodes_deleted,
+        "relationships_created": counters.relationships_created,
+        "relationships_deleted": counters.relationships_deleted,
+    }
+
+
 class Neo4jConnector:
     """Neo4j数据库连接器
     
@@ -46,6 +58,7 @@ class Neo4jConnector:
     Methods:
         close: 关闭数据库连接
         execute_query: 执行Cypher查询
+        execute_query_with_counters: 执行Cypher查询并返回写入计数
         delete_group: 删除指定组的所有数据
     """
     
@@ -98,16 +111,39 @@ class Neo4jConnector:
         Example:
 
         """
-        result = await self.driver.execute_query(
-            cypher,
-            database="neo4j",
-            **kwargs
-        )
+        with NEO4J_QUERY_DURATION.time("query"):
+            result = await self.driver.execute_query(
+                cypher,
+                database="neo4j",
+                **kwargs
+            )
         records, summary, keys = result
         if json_format:
             return [_convert_neo4j_types(record.data()) for record in records]
         else:
             return [record.data() for record in records]
+
+    async def execute_query_with_counters(
+            self, cypher: str, **kwargs: Any
+    ) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+        """执行Cypher写查询，同时返回结果摘要中的写入计数
+
+        供需要维护记忆计数器的写路径使用（去重合并、别名删除等）。
+
+        Args:
+            cypher: Cypher查询语句
+            **kwargs: 查询参数
+
+        Returns:
+            (查询结果列表, 写入计数字典)
+        """
+        with NEO4J_QUERY_DURATION.time("query_with_counters"):
+            records, summary, keys = await self.driver.execute_query(
+                cypher,
+                database="neo4j",
+                **kwargs
+            )
+        return [record.data() for record in records], summary_counters(summary)
     
     async def execute_write_transaction(self, transaction_func, **kwargs: Any) -> Any:
         """在写事务中执行操作
@@ -125,8 +161,9 @@ class Neo4jConnector:
         Example:
 
         """
-        async with self.driver.session(database="neo4j") as session:
-            return await session.execute_write(transaction_func, **kwargs)
+        with NEO4J_QUERY_DURATION.time("write_transaction"):
+            async with self.driver.session(database="neo4j") as session:
+                return await session.execute_write(transaction_func, **kwargs)
     
     async def execute_read_transaction(self, transaction_func, **kwargs: Any) -> Any:
         """在读事务中执行操作
@@ -143,8 +180,9 @@ class Neo4jConnector:
         Example:
 
         """
-        async with self.driver.session(database="neo4j") as session:
-            return await session.execute_read(transaction_func, **kwargs)
+        with NEO4J_QUERY_DURATION.time("read_transaction"):
+            async with self.driver.session(database="neo4j") as session:
+                return await session.execute_read(transaction_func, **kwargs)
     
     async def delete_group(self, end_user_id: str):
         """删除指定组的所有数据
@@ -170,4 +208,7 @@ class Neo4jConnector:
             database="neo4j",
             end_user_id=end_user_id
         )
+        # 数据已整体删除，同步清除该用户的记忆计数
+        from app.cache.memory.memory_counters import MemoryCounterCache
+        await MemoryCounterCache.clear_end_user_counters(end_user_id)
         print(f"Group {end_user_id} deleted.")
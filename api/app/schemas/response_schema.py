@@ -9,10 +9,17 @@ class PageMeta(BaseModel):
     total: int = Field(..., description="总条数")
     hasnext: bool = Field(..., description="是否有下一页")
 
+class CursorPageMeta(PageMeta):
+    next_cursor: Optional[str] = Field(None, description="下一页游标，没有下一页时为空")
+    total_capped: bool = Field(False, description="总条数是否达到统计上限（实际数量可能更多）")
+
 class PageData(BaseModel):
     page: PageMeta = Field(..., description="分页元数据")
     items: list = Field(..., description="分页数据列表")
 
+class CursorPageData(PageData):
+    page: CursorPageMeta = Field(..., description="分页元数据（含下一页游标）")
+
 
 class ApiResponse(BaseModel):
     code: int = Field(0, description="业务状态码，0=成功，非0=各类业务异常")
@@ -13,7 +13,7 @@ from app.core.utils.datetime_utils import parse_timestamp_to_utc_naive
 from app.core.logging_config import get_business_logger
 from app.core.exceptions import BusinessException
 from app.core.error_codes import BizCode
-from app.db import get_db
+from app.db import get_db, release_connection, run_in_session
 from app.models import (
     MultiAgentConfig, AgentConfig, ModelType, WorkflowConfig,
     ModelCapability, AgentExecution, Message, Conversation)
@@ -44,20 +44,28 @@ class AppChatService:
         self.agent_service = AgentRunService(db)
         self.workflow_service = WorkflowService(db)
 
-    def _check_annotation_match(self, app_id: uuid.UUID, message: str, source: str = "") -> Optional[dict]:
+    def _check_annotation_match(
+            self,
+            app_id: uuid.UUID,
+            message: str,
+            source: str = "",
+            db: Optional[Session] = None,
+    ) -> Optional[dict]:
         """检查是否命中标注
 
         Args:
             app_id: 应用ID
             message: 用户消息
             source: 来源（用于记录命中来源）
+            db: 数据库会话（默认使用请求会话，异步路径传入短会话）
 
         Returns:
             命中返回标注结果字典，未命中返回None
         """
+        db = db or self.db
         try:
             from app.services.annotation_service import AnnotationService
-            service = AnnotationService(self.db)
+            service = AnnotationService(db)
             setting = service.get_setting(app_id)
             if not setting or not setting.enabled:
                 return None
@@ -69,13 +77,13 @@ class AppChatService:
                 return None
 
             from app.models.models_model import ModelConfig
-            model_cfg = self.db.query(ModelConfig).filter(
+            model_cfg = db.query(ModelConfig).filter(
                 ModelConfig.id == setting.model_config_id
             ).first()
             if not model_cfg:
                 return None
 
-            api_key_obj = ModelApiKeyService.get_available_api_key(self.db, setting.model_config_id)
+            api_key_obj = ModelApiKeyService.get_available_api_key(db, setting.model_config_id)
             if not api_key_obj:
                 return None
 
@@ -272,9 +280,16 @@ class AppChatService:
                     "必须将 src 属性的值原封不动复制到 Markdown 的括号中，不得增删任何字符。"
                 )
 
-        # 弱模型：用 ReAct prompt 驱动多轮工具调用，将轨迹注入 system_prompt
+        # 为需要运行时上下文的工具注入上下文
+        for t in tools:
+            if hasattr(t, 'tool_instance') and hasattr(t.tool_instance, 'set_runtime_context'):
+                t.tool_instance.set_runtime_context(
+                    user_id=user_id or "anonymous",
+                    conversation_id=str(conversation_id) if conversation_id else None,
+                    uploaded_files=processed_files or []
+                )
+
         capability = api_key_obj.capability or []
-        orchestrator_node_executions = []
         _api_key_config = {
             "model_name": api_key_obj.model_name,
             "api_key": api_key_obj.api_key,
@@ -283,44 +298,25 @@ class AppChatService:
             "is_omni": api_key_obj.is_omni,
             "capability": capability,
         }
-        if ModelCapability.FUNCTION_CALL not in capability and tools:
-            system_prompt, orchestrator_node_executions = await ToolOrchestrator.create_and_run(
-                tools=tools,
+        # 弱模型：用 ReAct prompt 驱动多轮工具调用，最后一轮的回答即最终答案
+        use_react = ModelCapability.FUNCTION_CALL not in capability and bool(tools)
+        if not use_react:
+            # 创建 LangChain Agent
+            agent = LangChainAgent(
+                model_name=api_key_obj.model_name,
+                api_key=api_key_obj.api_key,
+                provider=api_key_obj.provider,
+                api_base=api_key_obj.api_base,
+                is_omni=api_key_obj.is_omni,
+                temperature=model_parameters.get("temperature", 0.7),
+                max_tokens=model_parameters.get("max_tokens", 2000),
                 system_prompt=system_prompt,
-                message=message,
-                history=history,
-                api_key_config=_api_key_config,
-                model_config=model_info,
-                effective_params=model_parameters,
-                processed_files=processed_files,
+                tools=tools,
+                deep_thinking=model_parameters.get("deep_thinking", False),
+                thinking_budget_tokens=model_parameters.get("thinking_budget_tokens"),
+                json_output=model_parameters.get("json_output", False),
+                capability=capability,
             )
-            tools = []
-
-        # 创建 LangChain Agent
-        agent = LangChainAgent(
-            model_name=api_key_obj.model_name,
-            api_key=api_key_obj.api_key,
-            provider=api_key_obj.provider,
-            api_base=api_key_obj.api_base,
-            is_omni=api_key_obj.is_omni,
-            temperature=model_parameters.get("temperature", 0.7),
-            max_tokens=model_parameters.get("max_tokens", 2000),
-            system_prompt=system_prompt,
-            tools=tools,
-            deep_thinking=model_parameters.get("deep_thinking", False),
-            thinking_budget_tokens=model_parameters.get("thinking_budget_tokens"),
-            json_output=model_parameters.get("json_output", False),
-            capability=capability,
-        )
-
-        # 为需要运行时上下文的工具注入上下文
-        for t in tools:
-            if hasattr(t, 'tool_instance') and hasattr(t.tool_instance, 'set_runtime_context'):
-                t.tool_instance.set_runtime_context(
-                    user_id=user_id or "anonymous",
-                    conversation_id=str(conversation_id) if conversation_id else None,
-                    uploaded_files=processed_files or []
-                )
 
         # 创建 Agent 执行记录（pending 状态，对齐工作流行为）
         from app.models.app_model import App
@@ -345,13 +341,25 @@ class AppChatService:
         self.db.commit()
 
         try:
-            # 调用 Agent（支持多模态）
-            result = await agent.chat(
-                message=message,
-                history=history,
-                context=None,
-                files=processed_files
-            )
+            if use_react:
+                result = await ToolOrchestrator.create_and_answer(
+                    tools=tools,
+                    system_prompt=system_prompt,
+                    message=message,
+                    history=history,
+                    api_key_config=_api_key_config,
+                    model_config=model_info,
+                    effective_params=model_parameters,
+                    processed_files=processed_files,
+                )
+            else:
+                # 调用 Agent（支持多模态）
+                result = await agent.chat(
+                    message=message,
+                    history=history,
+                    context=None,
+                    files=processed_files
+                )
         except Exception as e:
             # Agent 执行失败，更新记录为 failed
             elapsed_time = time.time() - start_time
@@ -472,10 +480,9 @@ class AppChatService:
             self.db.commit()
 
         # 更新 Agent 执行记录为 completed
-        node_executions = orchestrator_node_executions + result.get("node_executions", [])
         agent_exec_repo.update_completed(
             execution_id=agent_execution.id,
-            steps=node_executions,
+            steps=result.get("node_executions", []),
             status="completed",
             elapsed_time=elapsed_time,
             token_usage=result.get("usage"),
@@ -523,22 +530,28 @@ class AppChatService:
         try:
             start_time = time.time()
             message_id = uuid.uuid4()
+            app_id = config.app_id
+            # 流式响应期间不持有请求会话的连接：之后的数据库访问均在短会话中完成
+            release_connection(self.db)
 
             # 检查标注命中
             from app.models.annotation_model import HitLogSource
-            annotation_match = self._check_annotation_match(
-                config.app_id,
-                message,
-                source=source or HitLogSource.EXTERNAL
+            annotation_match = await run_in_session(
+                lambda db: self._check_annotation_match(
+                    app_id,
+                    message,
+                    source=source or HitLogSource.EXTERNAL,
+                    db=db,
+                )
             )
             if annotation_match:
-                self.conversation_service.add_message(
+                await self.conversation_service.add_message_async(
                     conversation_id=conversation_id,
                     role="user",
                     content=message,
                     meta_data={"files": []}
                 )
-                ai_message = self.conversation_service.add_message(
+                ai_message = await self.conversation_service.add_message_async(
                     message_id=message_id,
                     conversation_id=conversation_id,
                     role="assistant",
@@ -566,7 +579,7 @@ class AppChatService:
             variables = self.agent_service.prepare_variables(variables, config.variables)
             # 获取模型配置ID
             model_config_id = config.default_model_config_id
-            api_key_obj = ModelApiKeyService.get_available_api_key(self.db, model_config_id)
+            api_key_obj = await run_in_session(ModelApiKeyService.get_available_api_key, model_config_id)
             # 处理系统提示词（支持变量替换）
             system_prompt = config.system_prompt
             if variables:
@@ -581,7 +594,7 @@ class AppChatService:
             tools = []
 
             # 获取工具服务
-            tenant_id = ToolRepository.get_tenant_id_by_workspace_id(self.db, str(workspace_id))
+            tenant_id = await run_in_session(ToolRepository.get_tenant_id_by_workspace_id, str(workspace_id))
 
             tools.extend(self.agent_service.load_tools_config(config.tools, web_search, tenant_id, user_id, workspace_id))
 
@@ -598,6 +611,8 @@ class AppChatService:
                     config.memory, user_id, storage_type, user_rag_memory_id
                 )
                 tools.extend(memory_tools)
+            # 工具加载使用了请求会话，在调用模型前归还连接
+            release_connection(self.db)
 
             # 获取模型参数
             model_parameters = config.model_parameters
@@ -627,7 +642,7 @@ class AppChatService:
             if is_new_conversation:
                 opening, suggested_questions = self.agent_service._get_opening_statement(features_config, True, variables)
                 if opening:
-                    self.conversation_service.add_message(
+                    await self.conversation_service.add_message_async(
                         conversation_id=conversation_id,
                         role="assistant",
                         content=opening,
@@ -665,9 +680,16 @@ class AppChatService:
                         "必须将 src 属性的值原封不动复制到 Markdown 的括号中，不得增删任何字符。"
                     )
 
-            # 弱模型：用 ReAct prompt 驱动多轮工具调用，将轨迹注入 system_prompt
+            # 为需要运行时上下文的工具注入上下文
+            for t in tools:
+                if hasattr(t, 'tool_instance') and hasattr(t.tool_instance, 'set_runtime_context'):
+                    t.tool_instance.set_runtime_context(
+                        user_id=user_id or "anonymous",
+                        conversation_id=str(conversation_id) if conversation_id else None,
+                        uploaded_files=processed_files or []
+                    )
+
             capability = api_key_obj.capability or []
-            orchestrator_node_executions = []
             _api_key_config = {
                 "model_name": api_key_obj.model_name,
                 "api_key": api_key_obj.api_key,
@@ -677,7 +699,8 @@ class AppChatService:
                 "capability": capability,
             }
             if ModelCapability.FUNCTION_CALL not in capability and tools:
-                system_prompt, orchestrator_node_executions = await ToolOrchestrator.create_and_run(
+                # 弱模型：用 ReAct prompt 驱动多轮工具调用，最后一轮的回答直接流式输出
+                chat_stream = ToolOrchestrator.create_and_stream(
                     tools=tools,
                     system_prompt=system_prompt,
                     message=message,
@@ -687,61 +710,57 @@ class AppChatService:
                     effective_params=model_parameters,
                     processed_files=processed_files,
                 )
-                # 把已完成的工具调用步骤作为事件补发给前端
-                for step in orchestrator_node_executions:
-                    event_type = "tool_error" if step.get("status") == "failed" else "tool_end"
-                    yield f"event: tool_start\ndata: {json.dumps({'step_id': step.get('step_id'), 'name': step.get('node_name'), 'input': step.get('input'), 'meta': step.get('meta')}, ensure_ascii=False)}\n\n"
-                    yield f"event: {event_type}\ndata: {json.dumps({'step_id': step.get('step_id'), 'name': step.get('node_name'), 'output': step.get('output'), 'error': step.get('error'), 'meta': step.get('meta')}, ensure_ascii=False)}\n\n"
-                tools = []
-
-            # 创建 LangChain Agent
-            agent = LangChainAgent(
-                model_name=api_key_obj.model_name,
-                api_key=api_key_obj.api_key,
-                provider=api_key_obj.provider,
-                api_base=api_key_obj.api_base,
-                is_omni=api_key_obj.is_omni,
-                temperature=model_parameters.get("temperature", 0.7),
-                max_tokens=model_parameters.get("max_tokens", 2000),
-                system_prompt=system_prompt,
-                tools=tools,
-                streaming=True,
-                deep_thinking=model_parameters.get("deep_thinking", False),
-                thinking_budget_tokens=model_parameters.get("thinking_budget_tokens"),
-                json_output=model_parameters.get("json_output", False),
-                capability=capability,
-            )
-
-            # 为需要运行时上下文的工具注入上下文
-            for t in tools:
-                if hasattr(t, 'tool_instance') and hasattr(t.tool_instance, 'set_runtime_context'):
-                    t.tool_instance.set_runtime_context(
-                        user_id=user_id or "anonymous",
-                        conversation_id=str(conversation_id) if conversation_id else None,
-                        uploaded_files=processed_files or []
-                    )
+            else:
+                # 创建 LangChain Agent
+                agent = LangChainAgent(
+                    model_name=api_key_obj.model_name,
+                    api_key=api_key_obj.api_key,
+                    provider=api_key_obj.provider,
+                    api_base=api_key_obj.api_base,
+                    is_omni=api_key_obj.is_omni,
+                    temperature=model_parameters.get("temperature", 0.7),
+                    max_tokens=model_parameters.get("max_tokens", 2000),
+                    system_prompt=system_prompt,
+                    tools=tools,
+                    streaming=True,
+                    deep_thinking=model_parameters.get("deep_thinking", False),
+                    thinking_budget_tokens=model_parameters.get("thinking_budget_tokens"),
+                    json_output=model_parameters.get("json_output", False),
+                    capability=capability,
+                )
+                chat_stream = agent.chat_stream(
+                    message=message,
+                    history=history,
+                    context=None,
+                    files=processed_files
+                )
 
             # 创建 Agent 执行记录（running 状态）
             from app.models.app_model import App
-            agent_exec_repo = AgentExecutionRepository(self.db)
-            app_obj = self.db.get(App, config.app_id)
-            agent_execution = AgentExecution(
-                app_id=config.app_id,
-                conversation_id=conversation_id,
-                message_id=None,
-                agent_config_id=config.id,
-                release_id=app_obj.current_release_id if app_obj else None,
-                triggered_by=None,
-                steps=[],
-                status="running",
-                started_at=parse_timestamp_to_utc_naive(start_time),
-                meta_data={
-                    "model": api_key_obj.model_name,
-                    "provider": api_key_obj.provider,
-                },
-            )
-            agent_exec_repo.create(agent_execution)
-            self.db.commit()
+            agent_config_id = config.id
+
+            def _create_execution(db: Session) -> AgentExecution:
+                app_obj = db.get(App, app_id)
+                execution = AgentExecution(
+                    app_id=app_id,
+                    conversation_id=conversation_id,
+                    message_id=None,
+                    agent_config_id=agent_config_id,
+                    release_id=app_obj.current_release_id if app_obj else None,
+                    triggered_by=None,
+                    steps=[],
+                    status="running",
+                    started_at=parse_timestamp_to_utc_naive(start_time),
+                    meta_data={
+                        "model": api_key_obj.model_name,
+                        "provider": api_key_obj.provider,
+                    },
+                )
+                AgentExecutionRepository(db).create(execution)
+                db.commit()
+                return execution
+
+            agent_execution = await run_in_session(_create_execution)
 
             # 流式调用 Agent（支持多模态），同时并行启动 TTS
             full_content = ""
@@ -762,12 +781,7 @@ class AppChatService:
                 tenant_id=tenant_id, workspace_id=workspace_id
             )
 
-            async for chunk in agent.chat_stream(
-                    message=message,
-                    history=history,
-                    context=None,
-                    files=processed_files
-            ):
+            async for chunk in chat_stream:
                 if isinstance(chunk, int):
                     total_tokens = chunk
                 elif isinstance(chunk, dict) and chunk.get("type") == "reasoning":
@@ -796,7 +810,7 @@ class AppChatService:
                 await text_queue.put(None)
 
             elapsed_time = time.time() - start_time
-            ModelApiKeyService.record_api_key_usage(self.db, api_key_obj.id)
+            await run_in_session(ModelApiKeyService.record_api_key_usage, api_key_obj.id)
 
             # 发送结束事件（包含 suggested_questions、tts、audio_status、citations）
             end_data: dict = {"elapsed_time": elapsed_time, "message_length": len(full_content), "error": None}
@@ -844,10 +858,12 @@ class AppChatService:
                              and (not f.name or not f.size)]
                 meta_map = {}
                 if local_ids:
-                    rows = self.db.query(FileMetadata).filter(
-                        FileMetadata.id.in_(local_ids),
-                        FileMetadata.status == "completed"
-                    ).all()
+                    rows = await run_in_session(
+                        lambda db: db.query(FileMetadata).filter(
+                            FileMetadata.id.in_(local_ids),
+                            FileMetadata.status == "completed"
+                        ).all()
+                    )
                     meta_map = {str(r.id): r for r in rows}
                 for f in files:
                     name, size = f.name, f.size
@@ -876,14 +892,14 @@ class AppChatService:
             # 长期记忆写入由 conversation_service.add_message → MemoryService.sync_message
             # → SlidingWindowScheduler 统一接管，这里不再触发老的 write_long_term 路径。
             if not skip_save:
-                self.conversation_service.add_message(
+                await self.conversation_service.add_message_async(
                     conversation_id=conversation_id,
                     role="user",
                     content=message,
                     meta_data=human_meta,
                     should_memorize=memory,
                 )
-                self.conversation_service.add_message(
+                await self.conversation_service.add_message_async(
                     message_id=message_id,
                     conversation_id=conversation_id,
                     role="assistant",
@@ -892,32 +908,34 @@ class AppChatService:
                     should_memorize=memory,
                 )
             else:
-                new_msg = Message(
-                    id=message_id,
-                    conversation_id=conversation_id,
-                    role="assistant",
-                    content=full_content,
-                    version=version,
-                    is_current=True,
-                    parent_message_id=parent_message_id,
-                    meta_data=assistant_meta,
-                )
-                self.db.add(new_msg)
-                conv = self.db.get(Conversation, conversation_id)
-                if conv:
-                    conv.message_count += 1
-
-                self.db.commit()
+                def _save_version(db: Session) -> None:
+                    db.add(Message(
+                        id=message_id,
+                        conversation_id=conversation_id,
+                        role="assistant",
+                        content=full_content,
+                        version=version,
+                        is_current=True,
+                        parent_message_id=parent_message_id,
+                        meta_data=assistant_meta,
+                    ))
+                    conv = db.get(Conversation, conversation_id)
+                    if conv:
+                        conv.message_count += 1
+                    db.commit()
+
+                await run_in_session(_save_version)
 
             # 更新 Agent 执行记录为 completed
-            all_node_executions = orchestrator_node_executions + node_executions
-            agent_exec_repo.update_completed(
-                execution_id=agent_execution.id,
-                steps=all_node_executions,
-                status="completed",
-                elapsed_time=elapsed_time,
-                token_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": total_tokens},
-                message_id=message_id,
+            await run_in_session(
+                lambda db: AgentExecutionRepository(db).update_completed(
+                    execution_id=agent_execution.id,
+                    steps=node_executions,
+                    status="completed",
+                    elapsed_time=elapsed_time,
+                    token_usage={"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": total_tokens},
+                    message_id=message_id,
+                )
             )
 
             yield f"event: end\ndata: {json.dumps(end_data, ensure_ascii=False)}\n\n"
@@ -939,13 +957,13 @@ class AppChatService:
             logger.error(f"流式聊天失败: {str(e)}", exc_info=True)
             # 保存失败的消息，使前端可以展示失败状态
             try:
-                self.conversation_service.add_message(
+                await self.conversation_service.add_message_async(
                     conversation_id=conversation_id,
                     role="user",
                     content=message,
                     meta_data=human_meta,
                 )
-                self.conversation_service.add_message(
+                await self.conversation_service.add_message_async(
                     message_id=message_id,
                     conversation_id=conversation_id,
                     role="assistant",
@@ -958,12 +976,17 @@ class AppChatService:
             # 更新 Agent 执行记录为 failed
             try:
                 elapsed_time = time.time() - start_time
-                agent_exec_repo.update_completed(
-                    execution_id=agent_execution.id,
-                    steps=node_executions if 'node_executions' in dir() else [],
-                    status="failed",
-                    elapsed_time=elapsed_time,
-                    error_message=str(e)[:2000],
+                failed_steps = node_executions if 'node_executions' in dir() else []
+                # except 块结束后 e 会被删除，lambda 只引用提前取出的错误信息
+                error_message = str(e)[:2000]
+                await run_in_session(
+                    lambda db: AgentExecutionRepository(db).update_completed(
+                        execution_id=agent_execution.id,
+                        steps=failed_steps,
+                        status="failed",
+                        elapsed_time=elapsed_time,
+                        error_message=error_message,
+                    )
                 )
             except Exception:
                 pass  # 保存失败不影响错误事件发送
@@ -6,13 +6,18 @@ from typing import Optional, Tuple, Dict, Any
 from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.config import settings
 from app.core.utils.datetime_utils import utcnow_naive, to_timestamp_ms, parse_iso_to_utc_naive
 from app.core.logging_config import get_business_logger
 from app.models.app_model import AppType
 from app.models.conversation_model import Conversation, Message
 from app.models.workflow_model import WorkflowExecution
 from app.repositories.agent_execution_repository import AgentExecutionRepository
-from app.repositories.conversation_repository import ConversationRepository, MessageRepository
+from app.repositories.conversation_repository import (
+    AppConversationPage,
+    ConversationRepository,
+    MessageRepository,
+)
 from app.schemas.app_log_schema import AppLogMessage, AppLogNodeExecution, LogFileInfo
 
 logger = get_business_logger()
@@ -50,20 +55,22 @@ class AppLogService:
         pagesize: int = 20,
         is_draft: Optional[bool] = None,
         keyword: Optional[str] = None,
-    ) -> Tuple[list[Conversation], int]:
+        cursor: Optional[str] = None,
+    ) -> AppConversationPage:
         """
         查询应用日志会话列表
 
         Args:
             app_id: 应用 ID
             workspace_id: 工作空间 ID
-            page: 页码（从 1 开始）
+            page: 页码（从 1 开始，传入 cursor 时忽略）
             pagesize: 每页数量
             is_draft: 是否草稿会话（None表示返回全部）
             keyword: 搜索关键词（匹配 messages 表消息内容）
+            cursor: 游标（上一页返回的 next_cursor）
 
         Returns:
-            Tuple[list[Conversation], int]: (会话列表，总数)
+            AppConversationPage: 会话列表、总数（有上限）、是否有下一页及下一页游标
         """
         logger.info(
             "查询应用日志会话列表",
@@ -74,29 +81,32 @@ class AppLogService:
                 "pagesize": pagesize,
                 "is_draft": is_draft,
                 "keyword": keyword,
+                "cursor": cursor,
             }
         )
 
         # 使用 Repository 查询
-        conversations, total = self.conversation_repository.list_app_conversations(
+        result = self.conversation_repository.list_app_conversations(
             app_id=app_id,
             workspace_id=workspace_id,
             is_draft=is_draft,
             keyword=keyword,
             page=page,
             pagesize=pagesize,
+            cursor=cursor,
+            count_limit=settings.APP_LOG_COUNT_LIMIT,
         )
 
         logger.info(
             "查询应用日志会话列表成功",
             extra={
                 "app_id": str(app_id),
-                "total": total,
-                "returned": len(conversations)
+                "total": result.total,
+                "returned": len(result.items)
             }
         )
 
-        return conversations, total
+        return result
 
     def get_conversation_detail(
         self,
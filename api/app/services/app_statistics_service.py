@@ -1,13 +1,14 @@
-"""应用统计服务"""
-from datetime import datetime, timedelta
-from typing import Dict, Any
+"""应用统计服务
+
+统计数据读取每日汇总表（app_daily_stats / workspace_daily_stats），汇总行在写入时增量维护，
+历史数据由回填任务按原始表重建。汇总粒度为天，查询范围按首尾时间所在日期（含）计算。
+"""
+from datetime import datetime
+from typing import Dict, Any, List
 import uuid
-from sqlalchemy import func, and_, cast, Date
 from sqlalchemy.orm import Session
 
-from app.models.conversation_model import Conversation, Message
-from app.models.end_user_model import EndUser
-from app.models.api_key_model import ApiKey, ApiKeyLog, ApiKeyType
+from app.repositories.app_daily_stats_repository import AppDailyStatsRepository
 
 
 class AppStatisticsService:
@@ -15,6 +16,7 @@ class AppStatisticsService:
     
     def __init__(self, db: Session):
         self.db = db
+        self.repo = AppDailyStatsRepository(db)
     
     def get_app_statistics(
         self,
@@ -34,21 +36,23 @@ class AppStatisticsService:
         Returns:
             统计数据字典
         """
-        # 将毫秒时间戳转换为 datetime
-        start_dt = datetime.fromtimestamp(start_date / 1000)
-        end_dt = datetime.fromtimestamp(end_date / 1000) + timedelta(days=1)
+        # 将毫秒时间戳转换为日期（结束日期当天包含在内）
+        start_day = datetime.fromtimestamp(start_date / 1000).date()
+        end_day = datetime.fromtimestamp(end_date / 1000).date()
+        
+        rows = self.repo.get_app_daily(app_id, workspace_id, start_day, end_day)
         
         # 1. 会话统计
-        conversations_stats = self._get_conversations_statistics(app_id, workspace_id, start_dt, end_dt)
+        conversations_stats = self._daily_series(rows, "conversations")
         
         # 2. 新增用户统计
-        users_stats = self._get_new_users_statistics(app_id, start_dt, end_dt)
+        users_stats = self._daily_series(rows, "new_users")
         
         # 3. API调用统计
-        api_stats = self._get_api_calls_statistics(app_id, start_dt, end_dt)
+        api_stats = self._daily_series(rows, "api_calls")
         
         # 4. Token消耗统计
-        token_stats = self._get_token_statistics(app_id, start_dt, end_dt)
+        token_stats = self._daily_series(rows, "tokens")
         
         return {
             "daily_conversations": conversations_stats["daily"],
@@ -61,130 +65,10 @@ class AppStatisticsService:
             "total_tokens": token_stats["total"]
         }
     
-    def _get_conversations_statistics(
-        self,
-        app_id: uuid.UUID,
-        workspace_id: uuid.UUID,
-        start_dt: datetime,
-        end_dt: datetime
-    ) -> Dict[str, Any]:
-        """获取会话统计"""
-        # 每日会话数
-        daily_query = self.db.query(
-            cast(Conversation.created_at, Date).label('date'),
-            func.count(Conversation.id).label('count')
-        ).filter(
-            and_(
-                Conversation.app_id == app_id,
-                Conversation.workspace_id == workspace_id,
-                Conversation.created_at >= start_dt,
-                Conversation.created_at < end_dt
-            )
-        ).group_by(cast(Conversation.created_at, Date)).all()
-        
-        daily_data = [{"date": str(row.date), "count": row.count} for row in daily_query]
-        total = sum(row["count"] for row in daily_data)
-        
-        return {"daily": daily_data, "total": total}
-    
-    def _get_new_users_statistics(
-        self,
-        app_id: uuid.UUID,
-        start_dt: datetime,
-        end_dt: datetime
-    ) -> Dict[str, Any]:
-        """获取新增用户统计"""
-        # 每日新增用户数
-        daily_query = self.db.query(
-            cast(EndUser.created_at, Date).label('date'),
-            func.count(EndUser.id).label('count')
-        ).filter(
-            and_(
-                EndUser.app_id == app_id,
-                EndUser.created_at >= start_dt,
-                EndUser.created_at < end_dt
-            )
-        ).group_by(cast(EndUser.created_at, Date)).all()
-        
-        daily_data = [{"date": str(row.date), "count": row.count} for row in daily_query]
-        total = sum(row["count"] for row in daily_data)
-        
-        return {"daily": daily_data, "total": total}
-    
-    def _get_api_calls_statistics(
-        self,
-        app_id: uuid.UUID,
-        start_dt: datetime,
-        end_dt: datetime
-    ) -> Dict[str, Any]:
-        """获取API调用统计"""
-        # 每日API调用次数
-        daily_query = self.db.query(
-            cast(ApiKeyLog.created_at, Date).label('date'),
-            func.count(ApiKeyLog.id).label('count')
-        ).join(
-            ApiKey, ApiKeyLog.api_key_id == ApiKey.id
-        ).filter(
-            and_(
-                ApiKey.resource_id == app_id,
-                ApiKeyLog.created_at >= start_dt,
-                ApiKeyLog.created_at < end_dt
-            )
-        ).group_by(cast(ApiKeyLog.created_at, Date)).all()
-        
-        daily_data = [{"date": str(row.date), "count": row.count} for row in daily_query]
-        total = sum(row["count"] for row in daily_data)
-        
-        return {"daily": daily_data, "total": total}
-    
-    def _get_token_statistics(
-        self,
-        app_id: uuid.UUID,
-        start_dt: datetime,
-        end_dt: datetime
-    ) -> Dict[str, Any]:
-        """获取Token消耗统计（从Message的meta_data中提取）"""
-        
-        # 查询所有相关消息的token使用情况
-        # meta_data中可能包含: {"usage": {"total_tokens": 100}} 或 {"tokens": 100}
-        daily_query = self.db.query(
-            cast(Message.created_at, Date).label('date'),
-            Message.meta_data
-        ).join(
-            Conversation, Message.conversation_id == Conversation.id
-        ).filter(
-            and_(
-                Conversation.app_id == app_id,
-                Message.created_at >= start_dt,
-                Message.created_at < end_dt,
-                Message.meta_data.isnot(None)
-            )
-        ).all()
-        
-        # 按日期聚合token
-        daily_tokens = {}
-        for row in daily_query:
-            date_str = str(row.date)
-            meta = row.meta_data or {}
-            
-            # 提取token数量（支持多种格式）
-            tokens = 0
-            if isinstance(meta, dict):
-                # 格式1: {"usage": {"total_tokens": 100}}
-                if "usage" in meta and isinstance(meta["usage"], dict):
-                    tokens = meta["usage"].get("total_tokens", 0)
-                # 格式2: {"tokens": 100}
-                elif "tokens" in meta:
-                    tokens = meta.get("tokens", 0)
-                # 格式3: {"total_tokens": 100}
-                elif "total_tokens" in meta:
-                    tokens = meta.get("total_tokens", 0)
-            
-            if date_str not in daily_tokens:
-                daily_tokens[date_str] = 0
-            daily_tokens[date_str] += int(tokens)
-        
-        daily_data = [{"date": date, "count": tokens} for date, tokens in sorted(daily_tokens.items()) if tokens != 0]
+    @staticmethod
+    def _daily_series(rows: List[Dict[str, Any]], field: str) -> Dict[str, Any]:
+        """从每日汇总中取出单项指标（只保留非零日期）"""
+        daily_data = [{"date": row["date"], "count": row[field]} for row in rows if row[field] != 0]
         total = sum(row["count"] for row in daily_data)
         
         return {"daily": daily_data, "total": total}
@@ -205,56 +89,18 @@ class AppStatisticsService:
         Returns:
             每日统计数据列表
         """
-        # 将毫秒时间戳转换为 datetime
-        start_time = datetime.fromtimestamp(start_date / 1000)
-        end_time = datetime.fromtimestamp(end_date / 1000)
-        
-        # 应用类型（agent, multi_agent, workflow）
-        app_types = [ApiKeyType.AGENT, ApiKeyType.CLUSTER, ApiKeyType.WORKFLOW]
-        
-        # 每日应用类型调用次数
-        daily_app_calls = self.db.query(
-            cast(ApiKeyLog.created_at, Date).label('date'),
-            func.count(ApiKeyLog.id).label('count')
-        ).join(
-            ApiKey, ApiKeyLog.api_key_id == ApiKey.id
-        ).filter(
-            and_(
-                ApiKey.workspace_id == workspace_id,
-                ApiKey.type.in_(app_types),
-                ApiKeyLog.created_at >= start_time,
-                ApiKeyLog.created_at <= end_time
-            )
-        ).group_by(cast(ApiKeyLog.created_at, Date)).all()
-        
-        # 每日服务类型调用次数
-        daily_service_calls = self.db.query(
-            cast(ApiKeyLog.created_at, Date).label('date'),
-            func.count(ApiKeyLog.id).label('count')
-        ).join(
-            ApiKey, ApiKeyLog.api_key_id == ApiKey.id
-        ).filter(
-            and_(
-                ApiKey.workspace_id == workspace_id,
-                ApiKey.type == ApiKeyType.SERVICE,
-                ApiKeyLog.created_at >= start_time,
-                ApiKeyLog.created_at <= end_time
-            )
-        ).group_by(cast(ApiKeyLog.created_at, Date)).all()
-        
-        # 构建每日数据
-        app_calls_dict = {str(row.date): row.count for row in daily_app_calls}
-        service_calls_dict = {str(row.date): row.count for row in daily_service_calls}
-        
-        # 合并所有日期
-        all_dates = sorted(set(app_calls_dict.keys()) | set(service_calls_dict.keys()))
+        # 将毫秒时间戳转换为日期（结束日期当天包含在内）
+        start_day = datetime.fromtimestamp(start_date / 1000).date()
+        end_day = datetime.fromtimestamp(end_date / 1000).date()
         
         daily_data = []
-        for date in all_dates:
-            app_count = app_calls_dict.get(date, 0)
-            service_count = service_calls_dict.get(date, 0)
+        for row in self.repo.get_workspace_daily(workspace_id, start_day, end_day):
+            app_count = row.app_api_call_count
+            service_count = row.service_api_call_count
+            if not app_count and not service_count:
+                continue
             daily_data.append({
-                "date": date,
+                "date": str(row.stat_date),
                 "total_calls": app_count + service_count,
                 "app_calls": app_count,
                 "service_calls": service_count
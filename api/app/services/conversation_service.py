@@ -16,7 +16,7 @@ from app.core.exceptions import BusinessException
 from app.core.exceptions import ResourceNotFoundException
 from app.core.logging_config import get_business_logger
 from app.core.models import RedBearLLM, RedBearModelConfig
-from app.db import get_db
+from app.db import get_db, run_in_session
 from app.models import Conversation, Message, User, ModelType
 from app.models.conversation_model import ConversationDetail
 from app.models.prompt_optimizer_model import RoleType
@@ -209,62 +209,124 @@ class ConversationService:
             Message: Newly created Message instance.
         """
         try:
-            conversation = self.conversation_repo.get_conversation_by_conversation_id(
-                conversation_id
+            message, conversation = self._save_message(
+                self.db, conversation_id, role, content, meta_data, message_id, status
             )
 
-            message = Message(
-                id=message_id if message_id else uuid.uuid4(),
-                conversation_id=conversation_id,
-                role=role,
-                content=content,
-                meta_data=meta_data,
-                status=status,
-            )
-
-            self.message_repo.add_message(message)
-
-            conversation.message_count += 1
-
-            if conversation.message_count <= 2 and role == "user":
-                conversation.title = (
-                        content[:50] + ("..." if len(content) > 50 else "")
-                )
-
             if sync_memory:
                 self._dispatch_memory_sync(message, conversation, should_memorize)
 
             self.db.commit()
             self.db.refresh(message)
 
-            logger.info(
-                "Message added successfully",
-                extra={
-                    "conversation_id": str(conversation_id),
-                    "message_id": str(message.id),
-                    "role": role,
-                    "content_length": len(content),
-                    "sync_memory": sync_memory,
-                    "should_memorize": should_memorize,
-                },
-            )
-
+            self._log_message_added(message, content, sync_memory, should_memorize)
             return message
         except Exception as e:
-            logger.error(
-                f"Message added error, db roll back - {str(e)}",
-                extra={
-                    "conversation_id": str(conversation_id),
-                    "role": role,
-                    "content_length": len(content),
-                },
-            )
+            self._log_message_error(e, conversation_id, role, content)
             self.db.rollback()
             raise BusinessException(
                 f"Error adding message, conversation_id={conversation_id}",
                 code=BizCode.DB_ERROR
             )
 
+    async def add_message_async(
+            self,
+            conversation_id: uuid.UUID,
+            role: str,
+            content: str,
+            meta_data: Optional[dict] = None,
+            message_id: Optional[uuid.UUID] = None,
+            status: str = "completed",
+            sync_memory: bool = True,
+            should_memorize: bool = True,
+    ) -> Message:
+        """
+        add_message 的非阻塞版本，供流式对话等异步热路径使用。
+
+        在工作线程的短会话中完成写入并提交，连接只在写入期间占用；
+        记忆同步在事件循环中派发。参数与返回值同 add_message。
+        """
+        def _save(db: Session) -> Tuple[Message, Conversation]:
+            message, conversation = self._save_message(
+                db, conversation_id, role, content, meta_data, message_id, status
+            )
+            db.commit()
+            db.refresh(message)
+            return message, conversation
+
+        try:
+            message, conversation = await run_in_session(_save)
+        except Exception as e:
+            self._log_message_error(e, conversation_id, role, content)
+            raise BusinessException(
+                f"Error adding message, conversation_id={conversation_id}",
+                code=BizCode.DB_ERROR
+            )
+
+        if sync_memory:
+            self._dispatch_memory_sync(message, conversation, should_memorize)
+        self._log_message_added(message, content, sync_memory, should_memorize)
+        return message
+
+    @staticmethod
+    def _save_message(
+            db: Session,
+            conversation_id: uuid.UUID,
+            role: str,
+            content: str,
+            meta_data: Optional[dict],
+            message_id: Optional[uuid.UUID],
+            status: str,
+    ) -> Tuple[Message, Conversation]:
+        """新增消息并更新会话计数/标题（不提交）"""
+        conversation = ConversationRepository(db).get_conversation_by_conversation_id(
+            conversation_id
+        )
+
+        message = Message(
+            id=message_id if message_id else uuid.uuid4(),
+            conversation_id=conversation_id,
+            role=role,
+            content=content,
+            meta_data=meta_data,
+            status=status,
+        )
+
+        MessageRepository(db).add_message(message)
+
+        conversation.message_count += 1
+
+        if conversation.message_count <= 2 and role == "user":
+            conversation.title = (
+                    content[:50] + ("..." if len(content) > 50 else "")
+            )
+        return message, conversation
+
+    @staticmethod
+    def _log_message_added(message: Message, content: str, sync_memory: bool, should_memorize: bool) -> None:
+        logger.info(
+            "Message added successfully",
+            extra={
+                "conversation_id": str(message.conversation_id),
+                "message_id": str(message.id),
+                "role": message.role,
+                "content_length": len(content),
+                "sync_memory": sync_memory,
+                "should_memorize": should_memorize,
+            },
+        )
+
+    @staticmethod
+    def _log_message_error(e: Exception, conversation_id: uuid.UUID, role: str, content: str) -> None:
+        logger.error(
+            f"Message added error, db roll back - {str(e)}",
+            extra={
+                "conversation_id": str(conversation_id),
+                "role": role,
+                "content_length": len(content),
+            },
+        )
+
     def update_message(
             self,
             message_id: uuid.UUID,
@@ -531,9 +593,12 @@ class ConversationService:
         Returns:
             List[dict]: List of message dictionaries with keys 'role' and 'content'.
         """
-        messages = self.message_repo.get_message_by_conversation_id(
-            conversation_id,
-            limit=max_history
+        # 短会话读取，不阻塞事件循环，也不占用请求会话的连接
+        messages = await run_in_session(
+            lambda db: MessageRepository(db).get_message_by_conversation_id(
+                conversation_id,
+                limit=max_history
+            )
         )
 
         history = []
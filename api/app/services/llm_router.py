@@ -9,6 +9,7 @@ from app.repositories.model_repository import ModelApiKeyRepository
 from app.services.conversation_state_manager import ConversationStateManager
 from app.models import ModelConfig, AgentConfig
 from app.core.logging_config import get_business_logger
+from app.services.routing_index import extract_topic, get_routing_index
 
 logger = get_business_logger()
 
@@ -18,8 +19,8 @@ class LLMRouter:
     
     混合策略：
     1. 先用关键词快速筛选（置信度 > 0.8 直接返回）
-    2. 对于模糊情况（置信度 0.3-0.8），调用 LLM 辅助
-    3. 对于完全不匹配（置信度 < 0.3），调用 LLM
+    2. 关键词不足时，用消息与各 Agent 原型向量的相似度打分（置信度达到阈值直接返回）
+    3. 相似度置信度不足时，查路由决策缓存（精确 / 近似重复），未命中再调用 LLM
     4. 缓存 LLM 结果，减少重复调用
     """
     
@@ -67,10 +68,14 @@ class LLMRouter:
         self.max_same_agent_turns = 10
         self.keyword_high_confidence_threshold = 0.8  # 关键词高置信度阈值
         self.keyword_low_confidence_threshold = 0.3   # 关键词低置信度阈值
+        self.vector_confidence_threshold = 0.75  # 向量相似度路由置信度阈值，低于该值才调用 LLM
+        
+        # 按配置版本预计算的路由索引（规则、Agent 原型向量、决策缓存）
+        self.index = get_routing_index(routing_rules, sub_agents)
         
         # 缓存配置
         self.cache_enabled = True
-        self.cache_size = 1000
+        self.cache_size = self.index.cache.max_size
     
     async def route(
         self,
@@ -201,21 +206,27 @@ class LLMRouter:
         # 1. 先用关键词匹配
         keyword_agent_id, keyword_confidence = self._route_with_keywords(message)
         
-        # 2. 判断是否需要 LLM
-        if not self.use_llm or not self.routing_model_config:
-            # 不使用 LLM，直接返回关键词结果
-            return keyword_agent_id, keyword_confidence, "keyword"
-        
         if keyword_confidence >= self.keyword_high_confidence_threshold:
             # 关键词置信度很高，直接返回
             logger.info(f"关键词置信度高 ({keyword_confidence:.2f})，跳过 LLM")
             return keyword_agent_id, keyword_confidence, "keyword"
         
-        # 3. 使用 LLM 辅助决策
+        # 2. 向量相似度打分
+        vector_agent_id, vector_confidence = self.index.route_by_similarity(message)
+        if vector_agent_id and vector_confidence >= self.vector_confidence_threshold:
+            logger.info(f"向量相似度置信度高 ({vector_confidence:.2f})，跳过 LLM")
+            return vector_agent_id, vector_confidence, "vector"
+        
+        # 3. 判断是否需要 LLM
+        if not self.use_llm or not self.routing_model_config:
+            # 不使用 LLM，直接返回关键词结果
+            return keyword_agent_id, keyword_confidence, "keyword"
+        
+        # 4. 使用 LLM 辅助决策
         logger.info(f"关键词置信度较低 ({keyword_confidence:.2f})，调用 LLM")
         llm_agent_id, llm_confidence = await self._route_with_llm(message)
         
-        # 4. 综合决策
+        # 5. 综合决策
         if llm_confidence > keyword_confidence:
             # LLM 置信度更高
             final_confidence = llm_confidence * 0.7 + keyword_confidence * 0.3
@@ -237,12 +248,10 @@ class LLMRouter:
         best_agent_id = None
         best_score = 0.0
         
-        for rule in self.routing_rules:
-            score = self._calculate_rule_score(message, rule)
-            
+        for rule, score in self.index.score_rules(message):
             if score > best_score:
                 best_score = score
-                best_agent_id = rule.get("target_agent_id")
+                best_agent_id = rule.agent_id
         
         if not best_agent_id or best_score < 0.3:
             best_agent_id = self._get_default_agent_id()
@@ -477,7 +486,7 @@ class LLMRouter:
             return self._get_default_agent_id(), 0.5
     
     def _get_cached_llm_result(self, message: str) -> Optional[Tuple[str, float]]:
-        """获取缓存的 LLM 结果
+        """获取缓存的 LLM 结果（精确匹配或近似重复的消息）
         
         Args:
             message: 用户消息
@@ -485,8 +494,7 @@ class LLMRouter:
         Returns:
             缓存的结果或 None
         """
-        # TODO: 实现真正的缓存机制（使用 Redis 或内存字典）
-        return None
+        return self.index.cache.get(message, self.index.vectorize(message))
     
     def _cache_llm_result(self, message: str, agent_id: str, confidence: float):
         """缓存 LLM 结果
@@ -496,8 +504,7 @@ class LLMRouter:
             agent_id: Agent ID
             confidence: 置信度
         """
-        # lru_cache 会自动处理缓存
-        pass
+        self.index.cache.put(message, self.index.vectorize(message), (agent_id, confidence))
     
     async def _extract_topic_with_llm(self, message: str) -> str:
         """使用 LLM 提取主题
@@ -511,6 +518,11 @@ class LLMRouter:
         if not self.routing_model_config:
             return self._extract_topic(message)
         
+        # 关键词能识别主题时不调用 LLM
+        topic = self._extract_topic(message)
+        if topic != "其他":
+            return topic
+        
         prompt = f"""请分析以下消息的主题，从这些选项中选择一个：
 数学、物理、化学、语文、英语、历史、作业、学习规划、订单、退款、账户、支付、其他
 
@@ -590,46 +602,7 @@ class LLMRouter:
         rule: Dict[str, Any]
     ) -> float:
         """计算规则匹配分数"""
-        score = 0.0
-        message_lower = message.lower()
-        
-        keywords = rule.get("keywords", [])
-        if keywords:
-            matched_keywords = sum(
-                1 for keyword in keywords
-                if keyword.lower() in message_lower
-            )
-            keyword_score = matched_keywords / len(keywords)
-            score += keyword_score * 0.6
-        
-        patterns = rule.get("patterns", [])
-        if patterns:
-            matched_patterns = sum(
-                1 for pattern in patterns
-                if re.search(pattern, message, re.IGNORECASE)
-            )
-            pattern_score = matched_patterns / len(patterns)
-            score += pattern_score * 0.3
-        
-        exclude_keywords = rule.get("exclude_keywords", [])
-        if exclude_keywords:
-            has_exclude = any(
-                keyword.lower() in message_lower
-                for keyword in exclude_keywords
-            )
-            if has_exclude:
-                score *= 0.5
-        
-        min_keyword_count = rule.get("min_keyword_count", 0)
-        if keywords and min_keyword_count > 0:
-            matched_count = sum(
-                1 for keyword in keywords
-                if keyword.lower() in message_lower
-            )
-            if matched_count < min_keyword_count:
-                score *= 0.7
-        
-        return min(score, 1.0)
+        return self.index.rule_score(message, rule)
     
     def _calculate_agent_score(
         self,
@@ -637,54 +610,11 @@ class LLMRouter:
         agent_id: str
     ) -> float:
         """计算 Agent 对消息的匹配分数"""
-        agent_rules = [
-            rule for rule in self.routing_rules
-            if rule.get("target_agent_id") == agent_id
-        ]
-        
-        if not agent_rules:
-            return 0.0
-        
-        max_score = max(
-            self._calculate_rule_score(message, rule)
-            for rule in agent_rules
-        )
-        
-        return max_score
+        return self.index.agent_score(message, agent_id)
     
     def _extract_topic(self, message: str) -> str:
         """提取消息主题（关键词方式）"""
-        topic_keywords = {
-            "数学": ["数学", "方程", "计算", "求解", "x", "y", "函数", "几何"],
-            "物理": ["物理", "力", "速度", "加速度", "能量", "功率", "电路"],
-            "化学": ["化学", "方程式", "反应", "元素", "分子", "原子", "化合物"],
-            "语文": ["语文", "古诗", "作文", "阅读", "文言文", "诗词"],
-            "英语": ["英语", "单词", "语法", "翻译", "时态", "句型"],
-            "历史": ["历史", "朝代", "事件", "人物", "战争", "革命"],
-            "作业": ["作业", "批改", "检查", "评分", "反馈"],
-            "学习规划": ["计划", "规划", "方法", "技巧", "时间", "安排"],
-            "订单": ["订单", "发货", "物流", "配送", "快递"],
-            "退款": ["退款", "退货", "售后", "换货", "维修"],
-            "账户": ["账户", "密码", "登录", "注册", "绑定"],
-            "支付": ["支付", "付款", "充值", "余额", "优惠券"]
-        }
-        
-        message_lower = message.lower()
-        
-        topic_scores = {}
-        for topic, keywords in topic_keywords.items():
-            matched = sum(
-                1 for keyword in keywords
-                if keyword in message_lower
-            )
-            if matched > 0:
-                topic_scores[topic] = matched
-        
-        if topic_scores:
-            best_topic = max(topic_scores.items(), key=lambda x: x[1])[0]
-            return best_topic
-        
-        return "其他"
+        return extract_topic(message)
     
     def _get_default_agent_id(self) -> str:
         """获取默认 Agent ID"""
@@ -1,4 +1,5 @@
 """Master Agent 路由器 - 让 Master Agent 真正成为决策中心"""
+import copy
 import json
 import re
 import uuid
@@ -7,6 +8,7 @@ from sqlalchemy.orm import Session
 
 from app.schemas.app_schema import ModelParameters
 from app.services.conversation_state_manager import ConversationStateManager
+from app.services.routing_index import get_routing_index
 from app.models import ModelConfig, AgentConfig
 from app.core.logging_config import get_business_logger
 from app.services.model_service import ModelApiKeyService
@@ -53,6 +55,11 @@ class MasterAgentRouter:
         self.sub_agents = sub_agents
         self.state_manager = state_manager
         self.enable_rule_fast_path = enable_rule_fast_path
+        # 向量相似度路由置信度阈值，低于该值才调用 Master Agent
+        self.similarity_confidence_threshold = 0.8
+
+        # 按子 Agent 配置预计算的路由索引（Agent 原型向量、决策缓存），同一配置共享
+        self.index = get_routing_index([], sub_agents)
 
         logger.info(
             "Master Agent 路由器初始化",
@@ -115,10 +122,18 @@ class MasterAgentRouter:
 
                 return rule_result
 
-        # 3. 调用 Master Agent 做决策
-        decision = await self._master_agent_decide(message, state, variables)
+        # 3. 无会话上下文时，决策只取决于消息本身：先查决策缓存，再尝试向量相似度路由
+        context_free = not (state and state.get("current_agent_id"))
+        decision = self._try_index_path(message) if context_free else None
+
+        # 4. 调用 Master Agent 做决策
+        if decision is None:
+            decision = await self._master_agent_decide(message, state, variables)
+            if context_free and decision.get("routing_method") == "master_agent" \
+                    and not decision.get("need_collaboration"):
+                self.index.cache.put(message, self.index.vectorize(message), copy.deepcopy(decision))
 
-        # 4. 更新会话状态
+        # 5. 更新会话状态
         if conversation_id:
             self.state_manager.update_state(
                 conversation_id,
@@ -139,6 +154,36 @@ class MasterAgentRouter:
 
         return decision
 
+    def _try_index_path(self, message: str) -> Optional[Dict[str, Any]]:
+        """查询路由决策缓存（精确 / 近似重复），未命中时尝试向量相似度路由
+
+        Args:
+            message: 用户消息
+
+        Returns:
+            命中时返回决策结果，否则返回 None
+        """
+        cached = self.index.cache.get(message, self.index.vectorize(message))
+        if cached is not None:
+            decision = copy.deepcopy(cached)
+            decision["routing_method"] = "cache"
+            return decision
+
+        agent_id, confidence = self.index.route_by_similarity(message)
+        if agent_id and confidence >= self.similarity_confidence_threshold:
+            agent_info = self.sub_agents.get(agent_id, {}).get("info", {}) or {}
+            return {
+                "selected_agent_id": agent_id,
+                "confidence": confidence,
+                "strategy": "similarity",
+                "reasoning": f"与 Agent 原型的相似度置信度 {confidence:.2f}",
+                "topic": agent_info.get("role") or "未知",
+                "need_collaboration": False,
+                "collaboration_agents": [],
+                "routing_method": "similarity"
+            }
+        return None
+
     def _try_rule_fast_path(
         self,
         message: str,
@@ -15,8 +15,6 @@ import json
 import os
 import time
 import uuid
-from contextlib import asynccontextmanager
-from contextvars import ContextVar
 from typing import Any, AsyncGenerator, Dict, List, Optional
 from uuid import UUID
 
@@ -26,7 +24,6 @@ from pydantic import BaseModel, Field
 from sqlalchemy import func
 from sqlalchemy.orm import Session, load_only
 
-from app.cache import InterestMemoryCache
 from app.core.config import settings
 from app.core.logging_config import get_config_logger, get_logger
 from app.core.memory.agent.langgraph_graph.read_graph import make_read_graph
@@ -39,7 +36,6 @@ from app.core.memory.agent.utils.type_classifier import status_typle
 from app.core.memory.analytics.hot_memory_tags import get_interest_distribution
 from app.core.memory.utils.llm.llm_utils import MemoryClientFactory
 from app.core.memory.utils.log.audit_logger import audit_logger
-from app.core.memory.utils.memory_count_utils import sync_end_user_memory_count_from_neo4j
 from app.db import get_db_context
 from app.models.knowledge_model import Knowledge, KnowledgeType
 from app.repositories.neo4j.neo4j_connector import Neo4jConnector
@@ -58,26 +54,6 @@ config_logger = get_config_logger()
 # Initialize Neo4j connector for analytics functions
 _neo4j_connector = Neo4jConnector()
 
-# 标记当前 task/coroutine 已持有 per-end_user 写入锁（避免重入死锁）
-# 由 flush_conversation_task 在 worker 上下文中设置，防止下游重复加锁
-_write_lock_holder: ContextVar[Optional[str]] = ContextVar("_write_lock_holder", default=None)
-
-
-def _is_holding_write_lock(end_user_id: str) -> bool:
-    """判断当前上下文是否已持有 end_user_id 的写入锁。"""
-    return _write_lock_holder.get() == end_user_id
-
-
-def _set_write_lock_holder(end_user_id: str):
-    """标记当前上下文已持有 end_user_id 的写入锁。返回原 token 供 reset 使用。"""
-    return _write_lock_holder.set(end_user_id)
-
-
-def _reset_write_lock_holder(token):
-    """恢复 _write_lock_holder 到 set 之前的值。"""
-    _write_lock_holder.reset(token)
-
-
 class MemoryAgentService:
     """Service for memory agent operations"""
 
@@ -290,13 +266,18 @@ class MemoryAgentService:
             self,
             request: WriteMemoryRequest,
             db: Session,
+            wait: bool = True,
     ) -> str:
         """
         长期记忆写入
 
+        Neo4j 写入经 per-end_user 写入队列合并执行：同一用户的并发写入依次入队，
+        由一个 drainer 合并为一次批处理，不同用户之间并行。
+
         Args:
             request: 写入请求参数（end_user_id、messages、config_id、storage_type、language 等）
             db: SQLAlchemy database session
+            wait: 写入由其他 drainer 处理时是否等待其完成（Celery 任务传 False，入队即返回）
 
         Returns:
             Write operation result status
@@ -306,111 +287,12 @@ class MemoryAgentService:
         """
         end_user_id = request.end_user_id
         messages = request.messages
-        config_id = request.config_id
         storage_type = request.storage_type
-        user_rag_memory_id = request.user_rag_memory_id
         language = request.language
-        conversation_id = request.conversation_id
         start_time = time.time()
 
-        # ── per-end_user 互斥锁 ──
-        # 防止同一 end_user_id 的 API 并发调用和 FlushTask 同时操作同一个 conversation
-        async with self._acquire_per_user_lock(end_user_id):
-            return await self._write_memory_locked(
-                end_user_id=end_user_id,
-                messages=messages,
-                config_id=config_id,
-                storage_type=storage_type,
-                user_rag_memory_id=user_rag_memory_id,
-                language=language,
-                conversation_id=conversation_id,
-                db=db,
-                start_time=start_time,
-            )
-
-    @staticmethod
-    @asynccontextmanager
-    async def _acquire_per_user_lock(end_user_id: str):
-        """获取 per-end_user 互斥锁（RedisFairLock）。
-
-        防止同一 end_user_id 的并发 API 调用和 FlushTask 同时操作同一个
-        哨兵会话的 write_cursor 和 pending 消息。
-
-        FlushTask (flush_conversation_task) 也使用同一把锁
-        memory_write:{end_user_id}，保证互斥。
-
-        失败（Redis 不可用）时不阻塞主流程，仅记录 warning 后放行。
-        """
-        if not end_user_id:
-            yield
-            return
-
-        # 重入检测：FlushTask 在 worker 中已持有锁时跳过
-        if _is_holding_write_lock(end_user_id):
-            yield
-            return
-
-        from app.utils.redis_lock import RedisFairLock
-
-        redis_client = None
-        try:
-            redis_client = redis.StrictRedis(
-                host=settings.REDIS_HOST,
-                port=settings.REDIS_PORT,
-                db=settings.REDIS_DB_CELERY_BACKEND,
-                password=settings.REDIS_PASSWORD if settings.REDIS_PASSWORD else None,
-                decode_responses=True,
-            )
-            redis_client.ping()
-        except Exception as e:
-            logger.warning(
-                f"[write_memory] Redis 不可用，跳过锁保护: end_user_id={end_user_id}, err={e}"
-            )
-            yield
-            return
-
-        lock = RedisFairLock(
-            key=f"memory_write:{end_user_id}",
-            redis_client=redis_client,
-            expire=600,
-            timeout=120,
-            auto_renewal=True,
-        )
-
-        import asyncio
-        acquired = await asyncio.to_thread(lock.acquire)
-        if not acquired:
-            logger.warning(
-                f"[write_memory] 获取锁超时，跳过本次写入: end_user_id={end_user_id}"
-            )
-            yield
-            return
-
-        try:
-            yield
-        finally:
-            try:
-                await asyncio.to_thread(lock.release)
-            except Exception as e:
-                logger.warning(
-                    f"[write_memory] 释放锁失败: end_user_id={end_user_id}, err={e}"
-                )
-
-    async def _write_memory_locked(
-            self,
-            end_user_id: str,
-            messages,
-            config_id,
-            storage_type,
-            user_rag_memory_id,
-            language,
-            conversation_id,
-            db: Session,
-            start_time: float,
-    ) -> str:
-        """write_memory 的核心实现（已持有 per-end_user 锁）。"""
         memory_config = await self._resolve_and_load_config(
-            end_user_id, config_id, db, start_time
+            end_user_id, request.config_id, db, start_time
         )
 
         # ── Step 2: 文件预处理 ── 将消息中附带的文件转换为感知记忆对象，挂载到 message["file_content"]
@@ -423,61 +305,52 @@ class MemoryAgentService:
         # ── Step 3: 写入存储 ── 根据 storage_type 分流到 RAG 或 Neo4j 流水线
         try:
             if storage_type == StorageType.RAG:
-                await write_rag(end_user_id, message_text, user_rag_memory_id)
+                await write_rag(end_user_id, message_text, request.user_rag_memory_id)
                 return "success"
-            else:
-                # ── 滑动窗口写入路径（所有 Neo4j 写入统一入口）──
-                _conversation_id = str(conversation_id) if conversation_id else None
-                if not _conversation_id:
-                    # Service API 路径：按 (workspace_id, end_user_id) 查找/创建虚拟会话
-                    from app.core.memory.sliding_window.window_utils import get_or_create_service_api_conversation
-                    _conversation_id = get_or_create_service_api_conversation(
-                        workspace_id=str(memory_config.workspace_id),
-                        end_user_id=end_user_id,
-                    )
-                await self._write_to_memory_messages_and_dispatch(
-                    conversation_id=_conversation_id,
-                    messages=messages,
-                    end_user_id=end_user_id,
-                    config_id=str(memory_config.config_id),
+
+            # ── 滑动窗口写入路径（所有 Neo4j 写入统一入口）──
+            _conversation_id = str(request.conversation_id) if request.conversation_id else None
+            if not _conversation_id:
+                # Service API 路径：按 (workspace_id, end_user_id) 查找/创建虚拟会话
+                from app.core.memory.sliding_window.window_utils import get_or_create_service_api_conversation
+                _conversation_id = get_or_create_service_api_conversation(
                     workspace_id=str(memory_config.workspace_id),
-                    language=str(language),
+                    end_user_id=end_user_id,
                 )
+            status = await self._submit_write_job(
+                conversation_id=_conversation_id,
+                messages=messages,
+                end_user_id=end_user_id,
+                config_id=str(memory_config.config_id),
+                workspace_id=str(memory_config.workspace_id),
+                language=str(language),
+                wait=wait,
+            )
 
-                # ── Step 4: 后处理 ── 失效缓存、序列化文件路径、记录审计日志并返回结果
-                await self._invalidate_interest_cache(end_user_id)
-
-                # ── Step 5: 同步 memory_count 到 PostgreSQL（仅 neo4j 模式）──
-                _connector = Neo4jConnector()
-                try:
-                    await sync_end_user_memory_count_from_neo4j(end_user_id, _connector)
-                except Exception as _sync_e:
-                    logger.warning(f"[MEMORY_COUNT_SYNC] 同步失败（不影响主流程）: end_user_id={end_user_id}, error={_sync_e}")
-                finally:
-                    await _connector.close()
-
-                for message in messages:
-                    if isinstance(message, dict):
-                        message["file_content"] = [
-                            perceptual[0].file_path for perceptual in (message["file_content"] or [])
-                        ]
-                    else:
-                        message.file_content = [
-                            perceptual[0].file_path for perceptual in (message.file_content or [])
-                        ]
-                return self.writer_messages_deal(
-                    "success",
-                    start_time,
-                    end_user_id,
-                    memory_config.config_id,
-                    message_text,
-                    {
-                        "status": "success",
-                        "data": messages,
-                        "config_id": memory_config.config_id,
-                        "config_name": memory_config.config_name
-                    }
-                )
+            # ── Step 4: 后处理 ── 序列化文件路径、记录审计日志并返回结果
+            # （兴趣缓存失效与 memory_count 同步由写入队列在整批完成后执行一次）
+            for message in messages:
+                if isinstance(message, dict):
+                    message["file_content"] = [
+                        perceptual[0].file_path for perceptual in (message["file_content"] or [])
+                    ]
+                else:
+                    message.file_content = [
+                        perceptual[0].file_path for perceptual in (message.file_content or [])
+                    ]
+            return self.writer_messages_deal(
+                "success",
+                start_time,
+                end_user_id,
+                memory_config.config_id,
+                message_text,
+                {
+                    "status": status,
+                    "data": messages,
+                    "config_id": memory_config.config_id,
+                    "config_name": memory_config.config_name
+                }
+            )
         except Exception as e:
             error_msg = f"Write operation failed: {str(e)}"
             logger.error(error_msg)
@@ -585,69 +458,56 @@ class MemoryAgentService:
         logger.info(messages)
         return messages
 
-    async def _write_to_memory_messages_and_dispatch(
-        self,
+    @staticmethod
+    async def _submit_write_job(
         conversation_id: str,
         messages: list[MessageItem] | list[dict],
         end_user_id: str,
         config_id: str,
         workspace_id: str,
         language: str,
-    ) -> None:
-        """Layer 1 + Layer 2：写入候选池 → 同步执行。
-
-        所有 Neo4j 写入任务的统一入口。
-        1. 写入 memory_messages 表（Layer 1）
-        2. 调用 execute_pending_from_pool() 同步执行（Layer 2）
-
-        Args:
-            conversation_id: 对话 ID
-            messages: MessageItem 或 dict 列表
-            end_user_id: 终端用户 ID
-            config_id: 记忆配置 ID
-            workspace_id: 工作空间 ID
-            language: 语言
-        """
-        from app.core.memory.sliding_window.window_utils import (
-            ensure_conversation_exists,
-            write_batch_to_memory_messages,
-            execute_pending_from_pool,
-        )
+        wait: bool,
+    ) -> str:
+        """Layer 1 + Layer 2：提交到 per-end_user 写入队列。
 
-        messages_dict = [
-            msg if isinstance(msg, dict) else msg.model_dump(exclude_none=True)
-            for msg in messages
-        ]
+        所有 Neo4j 写入任务的统一入口。队列 drainer 按入队顺序写入
+        memory_messages 表（Layer 1），再对每个对话执行一次
+        execute_pending_from_pool()（Layer 2，enforce_window=False，API 同步路径）。
 
-        await ensure_conversation_exists(
-            conversation_id=conversation_id,
-            workspace_id=workspace_id,
-        )
+        Redis 不可用时直接执行本次写入，不阻塞主流程。
 
-        await write_batch_to_memory_messages(
-            conversation_id=conversation_id,
-            messages=messages_dict,
+        Returns:
+            done：已写入；queued：已入队，由当前 drainer 稍后写入
+        """
+        from app.core.memory.sliding_window.write_queue import (
+            MemoryWriteJob,
+            get_memory_write_queue,
+            run_memory_write_batch,
+            to_job_message,
         )
 
-        await execute_pending_from_pool(
-            conversation_id=conversation_id,
+        job = MemoryWriteJob(
             end_user_id=end_user_id,
+            conversation_id=conversation_id,
+            messages=[to_job_message(msg) for msg in messages],
             config_id=config_id,
             workspace_id=workspace_id,
             language=language,
-            enforce_window=False,  # API 同步路径，详见 execute_pending_from_pool docstring
         )
-
-
-
-    async def _invalidate_interest_cache(self, end_user_id: str) -> None:
-        """写入完成后失效兴趣分布缓存。"""
-        for lang in ["zh", "en"]:
-            deleted = await InterestMemoryCache.delete_interest_distribution(end_user_id, lang)
-            if deleted:
-                logger.info(
-                    f"Invalidated interest distribution cache: end_user_id={end_user_id}, language={lang}"
-                )
+        try:
+            outcome = await get_memory_write_queue().submit(job, wait=wait)
+        except redis.RedisError as e:
+            logger.warning(
+                f"[write_memory] Redis 不可用，直接写入: end_user_id={end_user_id}, err={e}"
+            )
+            errors = await run_memory_write_batch(end_user_id, [job])
+            if errors:
+                raise RuntimeError(errors[job.job_id])
+            return "done"
+
+        if outcome.status == "failed":
+            raise RuntimeError(outcome.error)
+        return outcome.status
 
     async def read_memory(
             self,
@@ -20,6 +20,8 @@ from app.core.memory.analytics.hot_memory_tags import (
     get_raw_tags_batch,
 )
 from app.core.memory.analytics.recent_activity_stats import get_recent_activity_stats
+from app.cache.memory.memory_counters import empty_counters
+from app.core.memory.utils.memory_count_utils import get_memory_counters_batch
 from app.models.user_model import User
 from app.repositories.memory_config_repository import MemoryConfigRepository
 from app.repositories.neo4j.neo4j_connector import Neo4jConnector
@@ -474,39 +476,39 @@ class DataConfigService:  # 数据配置服务类（PostgreSQL）
 # Ensure env for connector (e.g., NEO4J_PASSWORD)
 
 
+async def _get_counters(end_user_id: Optional[str]) -> Dict[str, int]:
+    """读取单个用户的写时物化记忆计数（未播种时回源 Neo4j 并缓存）
+
+    未指定用户时与原聚合查询一致（end_user_id = null 匹配不到节点），直接返回全 0，
+    不读取也不创建计数。
+    """
+    if not end_user_id:
+        return empty_counters()
+    counters = await get_memory_counters_batch([end_user_id], _neo4j_connector)
+    return counters[end_user_id]
+
+
 async def search_dialogue(end_user_id: Optional[str] = None) -> Dict[str, Any]:
-    result = await _neo4j_connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_DIALOGUE,
-        end_user_id=end_user_id,
-    )
-    data = {"search_for": "dialogue", "num": result[0]["num"]}
+    counters = await _get_counters(end_user_id)
+    data = {"search_for": "dialogue", "num": counters["dialogue"]}
     return data
 
 
 async def search_chunk(end_user_id: Optional[str] = None) -> Dict[str, Any]:
-    result = await _neo4j_connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_CHUNK,
-        end_user_id=end_user_id,
-    )
-    data = {"search_for": "chunk", "num": result[0]["num"]}
+    counters = await _get_counters(end_user_id)
+    data = {"search_for": "chunk", "num": counters["chunk"]}
     return data
 
 
 async def search_statement(end_user_id: Optional[str] = None) -> Dict[str, Any]:
-    result = await _neo4j_connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_STATEMENT,
-        end_user_id=end_user_id,
-    )
-    data = {"search_for": "statement", "num": result[0]["num"]}
+    counters = await _get_counters(end_user_id)
+    data = {"search_for": "statement", "num": counters["statement"]}
     return data
 
 
 async def search_entity(end_user_id: Optional[str] = None) -> Dict[str, Any]:
-    result = await _neo4j_connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_ENTITY,
-        end_user_id=end_user_id,
-    )
-    data = {"search_for": "entity", "num": result[0]["num"]}
+    counters = await _get_counters(end_user_id)
+    data = {"search_for": "entity", "num": counters["entity"]}
     return data
 
 
@@ -514,34 +516,17 @@ async def kb_type_distribution(end_user_id: Optional[str] = None) -> Dict[str, A
     """统一知识库类型分布接口。
 
     聚合 dialogue/chunk/statement/entity 四类计数，返回统一的分布结构，便于前端一次性消费。
+    计数读取写时物化的记忆计数器，不再对 Neo4j 做聚合查询。
     """
-    result = await _neo4j_connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_ALL,
-        end_user_id=end_user_id,
-    )
-
-    # 检查结果是否为空或长度不足
-    if not result or len(result) < 4:
-        data = {
-            "total": 0,
-            "distribution": [
-                {"type": "dialogue", "count": 0},
-                {"type": "chunk", "count": 0},
-                {"type": "statement", "count": 0},
-                {"type": "entity", "count": 0},
-            ]
-        }
-        return data
-
-    total = result[-1]["Count"]
+    counters = await _get_counters(end_user_id)
     distribution = [
-        {"type": "dialogue", "count": result[0]["Count"]},
-        {"type": "chunk", "count": result[1]["Count"]},
-        {"type": "statement", "count": result[2]["Count"]},
-        {"type": "entity", "count": result[3]["Count"]},
+        {"type": "dialogue", "count": counters["dialogue"]},
+        {"type": "chunk", "count": counters["chunk"]},
+        {"type": "statement", "count": counters["statement"]},
+        {"type": "entity", "count": counters["entity"]},
     ]
 
-    data = {"total": total, "distribution": distribution}
+    data = {"total": counters["total"], "distribution": distribution}
     return data
 
 
@@ -564,6 +549,8 @@ async def search_edges(end_user_id: Optional[str] = None) -> List[Dict[str, Any]
 async def search_all_batch(end_user_ids: List[str]) -> Dict[str, int]:
     """批量查询多个用户的记忆数量（简化版本，只返回total）
 
+    读取写时物化的记忆计数器，未播种的用户回源 Neo4j 一次并缓存。
+
     Args:
         end_user_ids: 用户ID列表
 
@@ -574,22 +561,8 @@ async def search_all_batch(end_user_ids: List[str]) -> Dict[str, int]:
     if not end_user_ids:
         return {}
 
-    result = await _neo4j_connector.execute_query(
-        MemoryConfigRepository.SEARCH_FOR_ALL_BATCH,
-        end_user_ids=end_user_ids,
-    )
-
-    # 转换结果为字典格式，字典格式在查询中无需遍历结果集，直接返回
-    data = {}
-    for row in result:
-        data[row["user_id"]] = row["total"]
-
-    # 为没有数据的用户填充默认值，转换字典格式还为无数据填充默认值
-    for user_id in end_user_ids:
-        if user_id not in data:
-            data[user_id] = 0
-
-    return data
+    counters = await get_memory_counters_batch(end_user_ids, _neo4j_connector)
+    return {user_id: counters[user_id]["total"] for user_id in end_user_ids}
 
 
 async def analytics_hot_memory_tags(
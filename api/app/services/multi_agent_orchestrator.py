@@ -1,7 +1,6 @@
 """多 Agent 编排器 - Master Agent 作为决策中心"""
 import uuid
 import time
-import asyncio
 from typing import Dict, Any, List, Optional, AsyncIterator, Tuple
 from sqlalchemy.orm import Session
 
@@ -14,7 +13,9 @@ from app.services.conversation_state_manager import ConversationStateManager
 from app.core.exceptions import BusinessException, ResourceNotFoundException
 from app.core.error_codes import BizCode
 from app.core.logging_config import get_business_logger
+from app.db import get_db_context
 from app.services.model_service import ModelApiKeyService
+from app.services.sub_agent_executor import SubAgentExecutor, SubAgentJob
 
 logger = get_business_logger()
 
@@ -480,11 +481,8 @@ class MultiAgentOrchestrator:
         context = task_analysis.get("initial_context", {})
         message = task_analysis.get("message", "")
 
-        # 获取并发限制
-        parallel_limit = self.config.execution_config.get("parallel_limit", 3)
-
         # 创建任务列表
-        tasks = []
+        jobs = []
         for sub_agent_info in task_analysis["sub_agents"]:
             agent_id = sub_agent_info["agent_id"]
             agent_data = self.sub_agents.get(agent_id)
@@ -492,46 +490,49 @@ class MultiAgentOrchestrator:
             if not agent_data:
                 continue
 
-            task = self._execute_sub_agent(
-                agent_data["config"],
-                message,
-                context,
-                conversation_id,
-                user_id,
-                web_search,
-                memory,
-                storage_type,
-                user_rag_memory_id
-            )
-            tasks.append((agent_id, sub_agent_info.get("name"), task))
+            jobs.append(SubAgentJob(
+                agent_id=agent_id,
+                agent_name=sub_agent_info.get("name"),
+                run=lambda agent_config=agent_data["config"]: self._execute_sub_agent(
+                    agent_config,
+                    message,
+                    context,
+                    conversation_id,
+                    user_id,
+                    web_search,
+                    memory,
+                    storage_type,
+                    user_rag_memory_id
+                )
+            ))
 
-        # 并行执行（带限制）
+        # 并行执行（滑动窗口限制并发）
         results = []
-        for i in range(0, len(tasks), parallel_limit):
-            batch = tasks[i:i + parallel_limit]
-            batch_results = await asyncio.gather(
-                *[task for _, _, task in batch],
-                return_exceptions=True
-            )
-
-            for (agent_id, agent_name, _), result in zip(batch, batch_results, strict=False):
-                if isinstance(result, Exception):
-                    logger.error(f"子 Agent 执行失败: {agent_name}", extra={"error": str(result)})
-                    results.append({
-                        "agent_id": agent_id,
-                        "agent_name": agent_name,
-                        "error": str(result)
-                    })
-                else:
-                    results.append({
-                        "agent_id": agent_id,
-                        "agent_name": agent_name,
-                        "result": result,
-                        "conversation_id": result.get("conversation_id")  # 保存会话 ID
-                    })
+        for outcome in await self._sub_agent_executor().run_all(jobs):
+            if outcome.error is not None:
+                results.append({
+                    "agent_id": outcome.job.agent_id,
+                    "agent_name": outcome.job.agent_name,
+                    "error": outcome.error
+                })
+            else:
+                results.append({
+                    "agent_id": outcome.job.agent_id,
+                    "agent_name": outcome.job.agent_name,
+                    "result": outcome.result,
+                    "conversation_id": outcome.result.get("conversation_id")  # 保存会话 ID
+                })
 
         return results
 
+    def _sub_agent_executor(self) -> SubAgentExecutor:
+        """按执行配置创建子 Agent 执行器（并发上限 parallel_limit，单 Agent 超时 timeout）"""
+        execution_config = self.config.execution_config or {}
+        return SubAgentExecutor(
+            limit=execution_config.get("parallel_limit", 3),
+            timeout=execution_config.get("timeout")
+        )
+
     async def _execute_collaboration_stream(
         self,
         task_analysis: Dict[str, Any],
@@ -1289,31 +1290,33 @@ class MultiAgentOrchestrator:
         """
         from app.services.draft_run_service import AgentRunService
 
-        # 获取模型配置
-        model_config = self.db.get(ModelConfig, agent_config.default_model_config_id)
-        if not model_config:
-            raise BusinessException(
-                "Agent 模型配置不存在",
-                BizCode.AGENT_CONFIG_MISSING
-            )
+        # 每个子 Agent 使用独立会话，避免并发执行时共享编排器的会话
+        with get_db_context() as db:
+            # 获取模型配置
+            model_config = db.get(ModelConfig, agent_config.default_model_config_id)
+            if not model_config:
+                raise BusinessException(
+                    "Agent 模型配置不存在",
+                    BizCode.AGENT_CONFIG_MISSING
+                )
 
-        # 流式执行 Agent
-        draft_service = AgentRunService(self.db)
-        async for event in draft_service.run_stream(
-            agent_config=agent_config,
-            model_config=model_config,
-            message=message,
-            workspace_id=agent_config.app.workspace_id,
-            conversation_id=str(conversation_id) if conversation_id else None,
-            user_id=user_id,
-            variables=context,
-            storage_type=storage_type,
-            user_rag_memory_id=user_rag_memory_id,
-            web_search=web_search,
-            memory=memory,
-            sub_agent=True
-        ):
-            yield event
+            # 流式执行 Agent
+            draft_service = AgentRunService(db)
+            async for event in draft_service.run_stream(
+                agent_config=agent_config,
+                model_config=model_config,
+                message=message,
+                workspace_id=agent_config.workspace_id,
+                conversation_id=str(conversation_id) if conversation_id else None,
+                user_id=user_id,
+                variables=context,
+                storage_type=storage_type,
+                user_rag_memory_id=user_rag_memory_id,
+                web_search=web_search,
+                memory=memory,
+                sub_agent=True
+            ):
+                yield event
 
     async def _execute_sub_agent(
         self,
@@ -1342,30 +1345,32 @@ class MultiAgentOrchestrator:
         """
         from app.services.draft_run_service import AgentRunService
 
-        # 获取模型配置
-        model_config = self.db.get(ModelConfig, agent_config.default_model_config_id)
-        if not model_config:
-            raise BusinessException(
-                "Agent 模型配置不存在",
-                BizCode.AGENT_CONFIG_MISSING
-            )
+        # 每个子 Agent 使用独立会话，避免并发执行时共享编排器的会话
+        with get_db_context() as db:
+            # 获取模型配置
+            model_config = db.get(ModelConfig, agent_config.default_model_config_id)
+            if not model_config:
+                raise BusinessException(
+                    "Agent 模型配置不存在",
+                    BizCode.AGENT_CONFIG_MISSING
+                )
 
-        # 执行 Agent
-        draft_service = AgentRunService(self.db)
-        result = await draft_service.run(
-            agent_config=agent_config,
-            model_config=model_config,
-            message=message,
-            workspace_id=agent_config.app.workspace_id,
-            conversation_id=str(conversation_id) if conversation_id else None,
-            user_id=user_id,
-            variables=context,
-            web_search=web_search,
-            memory=memory,
-            storage_type=storage_type,
-            user_rag_memory_id=user_rag_memory_id,
-            sub_agent=True
-        )
+            # 执行 Agent
+            draft_service = AgentRunService(db)
+            result = await draft_service.run(
+                agent_config=agent_config,
+                model_config=model_config,
+                message=message,
+                workspace_id=agent_config.workspace_id,
+                conversation_id=str(conversation_id) if conversation_id else None,
+                user_id=user_id,
+                variables=context,
+                web_search=web_search,
+                memory=memory,
+                storage_type=storage_type,
+                user_rag_memory_id=user_rag_memory_id,
+                sub_agent=True
+            )
 
         return result
 
@@ -1645,6 +1650,8 @@ class MultiAgentOrchestrator:
                 self.id = release.id
                 self.app_id = release.app_id
                 self.app = app
+                # 加载时即取出 workspace_id：子 Agent 并发执行时不再经编排器的会话懒加载
+                self.workspace_id = app.workspace_id
                 self.name = release.name
                 self.description = release.description
                 self.system_prompt = config_data.get("system_prompt")
@@ -1893,8 +1900,7 @@ class MultiAgentOrchestrator:
                     })
         else:
             # 并行执行模式（默认）
-            tasks = []
-            agent_infos = []
+            jobs = []
 
             for sub_q in sorted(sub_questions, key=lambda x: x.get("order", 0)):
                 sub_question = sub_q.get("question", "")
@@ -1916,42 +1922,37 @@ class MultiAgentOrchestrator:
                     }
                 )
 
-                # 创建异步任务
-                task = self._execute_sub_agent(
-                    agent_data["config"],
-                    sub_question,
-                    initial_context,
-                    conversation_id,
-                    user_id
-                )
-                tasks.append(task)
-                agent_infos.append({
-                    "agent_id": agent_id,
-                    "agent_name": agent_name,
-                    "sub_question": sub_question
-                })
-
-            # 并行执行所有任务
-            logger.info(f"并行执行 {len(tasks)} 个子问题")
-            task_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理结果
-            for i, result in enumerate(task_results):
-                if isinstance(result, Exception):
-                    logger.error(f"子问题执行失败: {str(result)}")
+                jobs.append(SubAgentJob(
+                    agent_id=agent_id,
+                    agent_name=agent_name,
+                    run=lambda agent_config=agent_data["config"], question=sub_question: self._execute_sub_agent(
+                        agent_config,
+                        question,
+                        initial_context,
+                        conversation_id,
+                        user_id
+                    ),
+                    info={"sub_question": sub_question}
+                ))
+
+            # 并行执行所有任务（滑动窗口限制并发）
+            logger.info(f"并行执行 {len(jobs)} 个子问题")
+            for outcome in await self._sub_agent_executor().run_all(jobs):
+                if outcome.error is not None:
+                    logger.error(f"子问题执行失败: {outcome.error}")
                     results.append({
-                        "agent_id": agent_infos[i]["agent_id"],
-                        "agent_name": agent_infos[i]["agent_name"],
-                        "sub_question": agent_infos[i]["sub_question"],
-                        "error": str(result)
+                        "agent_id": outcome.job.agent_id,
+                        "agent_name": outcome.job.agent_name,
+                        "sub_question": outcome.job.info["sub_question"],
+                        "error": outcome.error
                     })
                 else:
                     results.append({
-                        "agent_id": agent_infos[i]["agent_id"],
-                        "agent_name": agent_infos[i]["agent_name"],
-                        "sub_question": agent_infos[i]["sub_question"],
-                        "result": result,
-                        "conversation_id": result.get("conversation_id")
+                        "agent_id": outcome.job.agent_id,
+                        "agent_name": outcome.job.agent_name,
+                        "sub_question": outcome.job.info["sub_question"],
+                        "result": outcome.result,
+                        "conversation_id": outcome.result.get("conversation_id")
                     })
 
         # 整合结果（问题拆分模式）
@@ -2084,8 +2085,7 @@ class MultiAgentOrchestrator:
 
         所有 Agent 同时执行，互不依赖
         """
-        tasks = []
-        agent_infos = []
+        jobs = []
 
         for agent_info in collaboration_agents:
             agent_id = agent_info["agent_id"]
@@ -2104,39 +2104,37 @@ class MultiAgentOrchestrator:
 请完成你的任务。"""
 
             # 创建任务
-            task = self._execute_sub_agent(
-                agent_data["config"],
-                agent_message,
-                initial_context.copy(),
-                conversation_id,
-                user_id
-            )
-            tasks.append(task)
-            agent_infos.append((agent_id, agent_data, agent_info))
-
-        # 并行执行
-        task_results = await asyncio.gather(*tasks, return_exceptions=True)
+            jobs.append(SubAgentJob(
+                agent_id=agent_id,
+                agent_name=agent_data.get("info", {}).get("name", agent_id),
+                run=lambda agent_config=agent_data["config"], agent_message=agent_message: self._execute_sub_agent(
+                    agent_config,
+                    agent_message,
+                    initial_context.copy(),
+                    conversation_id,
+                    user_id
+                ),
+                info=agent_info
+            ))
 
-        # 处理结果
+        # 并行执行（滑动窗口限制并发）
         results = []
-        for (agent_id, agent_data, agent_info), result in zip(agent_infos, task_results, strict=False):
-            agent_name = agent_data.get("info", {}).get("name", agent_id)
-
-            if isinstance(result, Exception):
-                logger.error(f"协作 Agent 执行失败: {agent_name}", extra={"error": str(result)})
+        for outcome in await self._sub_agent_executor().run_all(jobs):
+            if outcome.error is not None:
+                logger.error(f"协作 Agent 执行失败: {outcome.job.agent_name}", extra={"error": outcome.error})
                 results.append({
-                    "agent_id": agent_id,
-                    "agent_name": agent_name,
-                    "error": str(result)
+                    "agent_id": outcome.job.agent_id,
+                    "agent_name": outcome.job.agent_name,
+                    "error": outcome.error
                 })
             else:
                 results.append({
-                    "agent_id": agent_id,
-                    "agent_name": agent_name,
-                    "role": agent_info.get("role"),
-                    "task": agent_info.get("task"),
-                    "result": result,
-                    "conversation_id": result.get("conversation_id")
+                    "agent_id": outcome.job.agent_id,
+                    "agent_name": outcome.job.agent_name,
+                    "role": outcome.job.info.get("role"),
+                    "task": outcome.job.info.get("task"),
+                    "result": outcome.result,
+                    "conversation_id": outcome.result.get("conversation_id")
                 })
 
         # 整合结果
@@ -2189,8 +2187,7 @@ class MultiAgentOrchestrator:
         # 1. 先执行辅助 Agents（并行）
         secondary_results = []
         if secondary_agents:
-            tasks = []
-            agent_infos = []
+            jobs = []
 
             for agent_info in secondary_agents:
                 agent_id = agent_info["agent_id"]
@@ -2204,28 +2201,26 @@ class MultiAgentOrchestrator:
 
 请从你的专业角度提供意见：{agent_task}"""
 
-                task = self._execute_sub_agent(
-                    agent_data["config"],
-                    agent_message,
-                    initial_context.copy(),
-                    conversation_id,
-                    user_id
-                )
-                tasks.append(task)
-                agent_infos.append((agent_id, agent_data, agent_info))
-
-            # 并行执行辅助 Agents
-            task_results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            for (agent_id, agent_data, agent_info), result in zip(agent_infos, task_results, strict=False):
-                agent_name = agent_data.get("info", {}).get("name", agent_id)
+                jobs.append(SubAgentJob(
+                    agent_id=agent_id,
+                    agent_name=agent_data.get("info", {}).get("name", agent_id),
+                    run=lambda agent_config=agent_data["config"], agent_message=agent_message: self._execute_sub_agent(
+                        agent_config,
+                        agent_message,
+                        initial_context.copy(),
+                        conversation_id,
+                        user_id
+                    )
+                ))
 
-                if not isinstance(result, Exception):
+            # 并行执行辅助 Agents（滑动窗口限制并发）
+            for outcome in await self._sub_agent_executor().run_all(jobs):
+                if outcome.error is None:
                     secondary_results.append({
-                        "agent_id": agent_id,
-                        "agent_name": agent_name,
+                        "agent_id": outcome.job.agent_id,
+                        "agent_name": outcome.job.agent_name,
                         "role": "secondary",
-                        "result": result
+                        "result": outcome.result
                     })
 
         # 2. 执行主 Agent（整合辅助 Agents 的结果）
@@ -2903,72 +2898,41 @@ class MultiAgentOrchestrator:
         Yields:
             (agent_id, agent_name, event_type, content) 元组
         """
-        # 为每个 Agent 创建异步生成器
-        async def stream_single_agent(agent_id, agent_name, agent_config, message, context):
-            """单个 Agent 的流式执行包装器"""
-            try:
-                async for event in self._execute_sub_agent_stream(
+        jobs = [
+            SubAgentJob(
+                agent_id=agent_id,
+                agent_name=agent_name,
+                run=lambda agent_config=agent_config, message=message, context=context: self._execute_sub_agent_stream(
                     agent_config,
                     message,
                     context,
                     conversation_id,
                     user_id
-                ):
-                    # 解析事件
-                    if "data:" in event:
-                        try:
-                            import json
-                            data_line = event.split("data: ", 1)[1].strip()
-                            data = json.loads(data_line)
-
-                            if "content" in data:
-                                yield (agent_id, agent_name, "content", data["content"])
-                        except:
-                            pass
-
-                # 发送完成信号
-                yield (agent_id, agent_name, "done", "")
-
-            except Exception as e:
-                logger.error(f"Agent {agent_name} 流式执行失败: {str(e)}")
-                yield (agent_id, agent_name, "error", str(e))
-
-        # 创建所有 Agent 的流式任务
-        streams = []
-        for agent_id, agent_name, agent_config, message, context in agent_tasks:
-            stream = stream_single_agent(agent_id, agent_name, agent_config, message, context)
-            streams.append(stream)
-
-        # 使用队列来合并多个异步流
-        queue = asyncio.Queue()
-        active_streams = len(streams)
-
-        async def consume_stream(stream, stream_id):
-            """消费单个流并放入队列"""
-            nonlocal active_streams
-            try:
-                async for item in stream:
-                    await queue.put(item)
-            finally:
-                active_streams -= 1
-                if active_streams == 0:
-                    await queue.put(None)  # 所有流都完成了
-
-        # 启动所有流的消费任务
-        tasks = [
-            asyncio.create_task(consume_stream(stream, i))
-            for i, stream in enumerate(streams)
+                )
+            )
+            for agent_id, agent_name, agent_config, message, context in agent_tasks
         ]
 
-        # 从队列中读取并 yield
-        while True:
-            item = await queue.get()
-            if item is None:  # 所有流都完成
-                break
-            yield item
-
-        # 等待所有任务完成
-        await asyncio.gather(*tasks, return_exceptions=True)
+        # 滑动窗口并发执行，事件按到达顺序实时返回
+        async for job, event_type, data in self._sub_agent_executor().stream(jobs):
+            if event_type == "event":
+                # 解析事件
+                if "data:" in data:
+                    try:
+                        import json
+                        data_line = data.split("data: ", 1)[1].strip()
+                        payload = json.loads(data_line)
+
+                        if "content" in payload:
+                            yield (job.agent_id, job.agent_name, "content", payload["content"])
+                    except:
+                        pass
+            elif event_type == "done":
+                # 发送完成信号
+                yield (job.agent_id, job.agent_name, "done", "")
+            else:
+                logger.error(f"Agent {job.agent_name} 流式执行失败: {data}")
+                yield (job.agent_id, job.agent_name, "error", data)
 
     def _calculate_similarity(self, messages: List[str]) -> float:
         """计算消息相似度（简化版）
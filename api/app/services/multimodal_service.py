@@ -7,16 +7,24 @@
 - DashScope (通义千问): 支持 URL 格式
 - Bedrock/Anthropic: 仅支持 base64 格式
 - OpenAI: 支持 URL 和 base64 格式
+
+处理结果按文件内容哈希缓存（文档文本、文档内嵌图片、base64 编码结果），
+已上传文件直接从存储后端读取，多个附件并发处理。
 """
+import asyncio
 import base64
+import copy
 import csv
+import hashlib
 import io
 import json
 import re
+import threading
 import olefile
 import struct
 import zipfile
 from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import List, Dict, Any, Optional
 
 import PyPDF2
@@ -28,10 +36,12 @@ import uuid
 from docx import Document
 from sqlalchemy.orm import Session
 
+from app.cache.multimodal import AttachmentCache
 from app.core.config import settings
 from app.core.error_codes import BizCode
 from app.core.exceptions import BusinessException
 from app.core.logging_config import get_business_logger
+from app.db import run_in_session
 from app.models import ModelApiKey
 from app.models.file_metadata_model import FileMetadata
 from app.models.models_model import ModelCapability
@@ -58,6 +68,9 @@ JSON_MIME = ['application/json']
 class MultimodalFormatStrategy(ABC):
     """多模态格式策略基类"""
 
+    # 需要内联文件内容（base64）的文件类型
+    INLINE_FILE_TYPES: frozenset = frozenset()
+
     def __init__(self, file: FileInput):
         self.file = file
 
@@ -133,6 +146,8 @@ class DashScopeFormatStrategy(MultimodalFormatStrategy):
 class BedrockFormatStrategy(MultimodalFormatStrategy):
     """Bedrock/Anthropic 策略"""
 
+    INLINE_FILE_TYPES = frozenset({FileType.IMAGE})
+
     async def format_image(self, url: str, content: bytes | None = None) -> tuple[bool, Dict[str, Any]]:
         """
         Bedrock/Anthropic 格式: base64 编码
@@ -212,6 +227,8 @@ class BedrockFormatStrategy(MultimodalFormatStrategy):
 class OpenAIFormatStrategy(MultimodalFormatStrategy):
     """OpenAI 策略"""
 
+    INLINE_FILE_TYPES = frozenset({FileType.AUDIO})
+
     async def format_image(self, url: str, content: bytes | None = None) -> tuple[bool, Dict[str, Any]]:
         """OpenAI 格式: {"type": "image_url", "image_url": {"url": "..."}}"""
         return True, {
@@ -304,6 +321,39 @@ PROVIDER_STRATEGIES = {
 }
 
 
+class _EncodedMediaCache:
+    """进程内 LRU：缓存 provider 格式化后的内联媒体（base64 编码结果），按近似字节数限制容量"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._items: "OrderedDict[tuple, tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            self._items.move_to_end(key)
+            return copy.deepcopy(item[0])
+
+    def put(self, key: tuple, value: Dict[str, Any], size: int) -> None:
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._items:
+                self._size -= self._items.pop(key)[1]
+            self._items[key] = (copy.deepcopy(value), size)
+            self._size += size
+            while self._size > self.max_bytes:
+                _, (_, evicted) = self._items.popitem(last=False)
+                self._size -= evicted
+
+
+_encoded_media_cache = _EncodedMediaCache(settings.MULTIMODAL_ENCODED_CACHE_MB * 1024 * 1024)
+
+
 class MultimodalService:
     """
     Service for handling multimodal file processing.
@@ -352,6 +402,8 @@ class MultimodalService:
     ) -> List[Dict[str, Any]]:
         """
         处理文件列表，返回 LLM 可用的格式
+
+        多个文件并发处理（并发数由 MULTIMODAL_FILE_CONCURRENCY 限制），结果顺序与输入一致。
         
         Args:
             files: 文件输入列表
@@ -372,75 +424,133 @@ class MultimodalService:
                 logger.warning(f"未找到 provider '{self.provider}' 的策略，使用默认策略")
                 strategy_class = DashScopeFormatStrategy
 
-        result = []
-        for idx, file in enumerate(files):
-            strategy = strategy_class(file)
-            if not file.url:
-                file.url = await self.get_file_url(file)
-            try:
-                if file.type == FileType.IMAGE and ModelCapability.VISION in self.capability:
-                    is_support, content = await self._process_image(file, strategy)
-                    result.append(content)
-                elif file.type == FileType.DOCUMENT:
-                    is_support, content = await self._process_document(file, strategy)
-                    result.append(content)
-                    # 仅当开关开启且模型支持视觉时，才提取文档内嵌图片
-                    if document_image_recognition and ModelCapability.VISION in self.capability:
-                        img_infos = await self.extract_document_images(file)
-                        from app.models.workspace_model import Workspace as WorkspaceModel
-                        ws = self.db.query(WorkspaceModel).filter(WorkspaceModel.id == workspace_id).first()
-                        tenant_id = ws.tenant_id if ws else None
-                        img_result = []
-                        for img_info in img_infos:
-                            page = img_info["page"]
-                            index = img_info["index"]
-                            ext = img_info.get("ext", "png")
-                            try:
-                                _, img_url = await self._save_doc_image_to_storage(img_info["bytes"], ext, tenant_id, workspace_id)
-                                placeholder = f"第{page}页 第{index + 1}张" if page > 0 else f"第{index + 1}张"
-                                # 在文本内容中追加图片位置标记
-                                if result and result[-1].get("type") in ("text", "document"):
-                                    key = "text" if "text" in result[-1] else list(result[-1].keys())[-1]
-                                    result[-1][key] = result[-1].get(key, "") + f"\n[图片 {placeholder}]: <img src=\"{img_url}\" data-url=\"{img_url}\">"
-                                # 将图片以视觉格式追加到消息内容中
-                                img_file = FileInput(
-                                    type=FileType.IMAGE,
-                                    transfer_method=TransferMethod.REMOTE_URL,
-                                    url=img_url,
-                                    file_type="image/png",
-                                )
-                                _, img_content = await self._process_image(img_file, strategy_class(img_file))
-                                img_result.append(img_content)
-                            except Exception as img_err:
-                                logger.warning(f"文档图片处理失败: {img_err}")
-                        result.extend(img_result)
-                elif file.type == FileType.AUDIO and "audio" in self.capability:
-                    is_support, content = await self._process_audio(file, strategy)
-                    result.append(content)
-                elif file.type == FileType.VIDEO and "video" in self.capability:
-                    is_support, content = await self._process_video(file, strategy)
-                    result.append(content)
-                else:
-                    logger.warning(f"不支持的文件类型: {file.type}")
-            except Exception as e:
-                logger.error(
-                    f"处理文件失败",
-                    extra={
-                        "file_index": idx,
-                        "file_type": file.type,
-                        "error": str(e)
-                    },
-                    exc_info=True
+        semaphore = asyncio.Semaphore(settings.MULTIMODAL_FILE_CONCURRENCY)
+
+        async def _bounded(idx: int, file: FileInput) -> List[Dict[str, Any]]:
+            async with semaphore:
+                return await self._process_file(
+                    idx, file, strategy_class, workspace_id, document_image_recognition
                 )
-                # 继续处理其他文件，不中断整个流程
-                result.append({
-                    "type": "text",
-                    "text": f"[文件处理失败: {str(e)}]"
-                })
+
+        # 附件并发处理，结果按输入顺序拼接
+        parts = await asyncio.gather(*(_bounded(idx, file) for idx, file in enumerate(files)))
+        result = [content for part in parts for content in part]
 
         logger.info(f"成功处理 {len(result)}/{len(files)} 个文件，provider={self.provider}")
         return result
 
+    async def _process_file(
+            self,
+            idx: int,
+            file: FileInput,
+            strategy_class,
+            workspace_id: uuid.UUID,
+            document_image_recognition: bool,
+    ) -> List[Dict[str, Any]]:
+        """处理单个文件，返回该文件对应的内容列表（文档可能附带内嵌图片）"""
+        result = []
+        strategy = strategy_class(file)
+        try:
+            if not file.url:
+                file.url = await self.get_file_url(file)
+            if file.type == FileType.IMAGE and ModelCapability.VISION in self.capability:
+                is_support, content = await self._process_image(file, strategy)
+                result.append(content)
+            elif file.type == FileType.DOCUMENT:
+                is_support, content = await self._process_document(file, strategy)
+                result.append(content)
+                # 仅当开关开启且模型支持视觉时，才提取文档内嵌图片
+                if document_image_recognition and ModelCapability.VISION in self.capability:
+                    for img_info in await self._get_document_images(file, workspace_id):
+                        page = img_info["page"]
+                        index = img_info["index"]
+                        img_url = img_info["url"]
+                        try:
+                            placeholder = f"第{page}页 第{index + 1}张" if page > 0 else f"第{index + 1}张"
+                            # 在文本内容中追加图片位置标记
+                            if result[0].get("type") in ("text", "document"):
+                                key = "text" if "text" in result[0] else list(result[0].keys())[-1]
+                                result[0][key] = result[0].get(key, "") + f"\n[图片 {placeholder}]: <img src=\"{img_url}\" data-url=\"{img_url}\">"
+                            # 将图片以视觉格式追加到消息内容中
+                            img_file = FileInput(
+                                type=FileType.IMAGE,
+                                transfer_method=TransferMethod.REMOTE_URL,
+                                url=img_url,
+                                file_type="image/png",
+                            )
+                            if img_info.get("bytes") is not None:
+                                img_file.set_content(img_info["bytes"])
+                            _, img_content = await self._process_image(img_file, strategy_class(img_file))
+                            result.append(img_content)
+                        except Exception as img_err:
+                            logger.warning(f"文档图片处理失败: {img_err}")
+            elif file.type == FileType.AUDIO and "audio" in self.capability:
+                is_support, content = await self._process_audio(file, strategy)
+                result.append(content)
+            elif file.type == FileType.VIDEO and "video" in self.capability:
+                is_support, content = await self._process_video(file, strategy)
+                result.append(content)
+            else:
+                logger.warning(f"不支持的文件类型: {file.type}")
+        except Exception as e:
+            logger.error(
+                f"处理文件失败",
+                extra={
+                    "file_index": idx,
+                    "file_type": file.type,
+                    "error": str(e)
+                },
+                exc_info=True
+            )
+            # 继续处理其他文件，不中断整个流程
+            result.append({
+                "type": "text",
+                "text": f"[文件处理失败: {str(e)}]"
+            })
+        return result
+
+    async def _get_document_images(self, file: FileInput, workspace_id: uuid.UUID) -> list[dict]:
+        """
+        获取文档内嵌图片（已保存到存储）。
+
+        按文档内容哈希缓存图片 URL，同一文档再次引用时不再提取和上传；
+        未命中缓存时返回的条目附带图片二进制（bytes），避免格式化时重新下载。
+        """
+        digest = await self._content_digest(file)
+        cached = await AttachmentCache.get_document_images(digest, workspace_id)
+        if cached is not None:
+            return cached
+
+        img_infos = await self.extract_document_images(file)
+        if not img_infos:
+            await AttachmentCache.set_document_images(digest, workspace_id, [])
+            return []
+
+        from app.models.workspace_model import Workspace as WorkspaceModel
+        tenant_id = await run_in_session(
+            lambda db: db.query(WorkspaceModel.tenant_id).filter(
+                WorkspaceModel.id == workspace_id
+            ).scalar()
+        )
+        images = []
+        for img_info in img_infos:
+            ext = img_info.get("ext", "png")
+            try:
+                _, img_url = await self._save_doc_image_to_storage(img_info["bytes"], ext, tenant_id, workspace_id)
+            except Exception as img_err:
+                logger.warning(f"文档图片保存失败: {img_err}")
+                continue
+            images.append({
+                "page": img_info["page"],
+                "index": img_info["index"],
+                "url": img_url,
+                "bytes": img_info["bytes"],
+            })
+        await AttachmentCache.set_document_images(
+            digest, workspace_id, [{k: v for k, v in image.items() if k != "bytes"} for image in images]
+        )
+        return images
+
     async def _process_image(self, file: FileInput, strategy) -> tuple[bool, Dict[str, Any]]:
         """
         处理图片文件
@@ -453,7 +563,10 @@ class MultimodalService:
             Dict: 根据 provider 返回不同格式的图片内容
         """
         try:
-            # url = await self.get_file_url(file)
+            if file.type in strategy.INLINE_FILE_TYPES:
+                return await self._format_inline(
+                    file, strategy, lambda content: strategy.format_image(file.url, content=content)
+                )
             return await strategy.format_image(file.url, content=file.get_content())
         except Exception as e:
             logger.error(f"处理图片失败: {e}", exc_info=True)
@@ -478,10 +591,11 @@ class MultimodalService:
             server_url = settings.FILE_LOCAL_SERVER_URL
             file.url = f"{server_url}/storage/permanent/{file.upload_file_id}"
             text = await self.extract_document_text(file)
-            file_metadata = self.db.query(FileMetadata).filter(
-                FileMetadata.id == file.upload_file_id
-            ).first()
-            file_name = file_metadata.file_name if file_metadata else "unknown"
+            file_name = await run_in_session(
+                lambda db: db.query(FileMetadata.file_name).filter(
+                    FileMetadata.id == file.upload_file_id
+                ).scalar()
+            ) or "unknown"
             return await strategy.format_document(file_name, text)
 
     @staticmethod
@@ -551,6 +665,11 @@ class MultimodalService:
                 else:
                     logger.warning(f"Provider {self.provider} 不支持音频转文本")
 
+            if transcription is None and file.type in strategy.INLINE_FILE_TYPES:
+                return await self._format_inline(
+                    file, strategy,
+                    lambda content: strategy.format_audio(file.file_type, file.url, content, None),
+                )
             return await strategy.format_audio(file.file_type, file.url, file.get_content(), transcription)
         except Exception as e:
             logger.error(f"处理音频失败: {e}", exc_info=True)
@@ -580,6 +699,76 @@ class MultimodalService:
                 "text": f"[视频处理失败: {str(e)}]"
             }
 
+    async def _format_inline(self, file: FileInput, strategy, format_fn) -> tuple[bool, Dict[str, Any]]:
+        """格式化需要内联内容的媒体文件，编码结果按 (策略, 文件类型, 内容哈希) 缓存在进程内"""
+        digest = await self._content_digest(file)
+        key = (type(strategy).__name__, file.type, file.file_type, digest)
+        cached = _encoded_media_cache.get(key)
+        if cached is not None:
+            return True, cached
+        content = await self.load_file_content(file)
+        is_support, formatted = await format_fn(content)
+        if is_support:
+            # base64 编码后约为原始大小的 4/3
+            _encoded_media_cache.put(key, formatted, len(content) * 4 // 3)
+        return is_support, formatted
+
+    @staticmethod
+    def _local_file_id(file: FileInput) -> Optional[uuid.UUID]:
+        """已上传到本系统的文件 ID（本地上传文件，或指向本服务永久地址的 URL）"""
+        if file.transfer_method == TransferMethod.LOCAL_FILE and file.upload_file_id:
+            return file.upload_file_id
+        prefix = f"{settings.FILE_LOCAL_SERVER_URL}/storage/permanent/"
+        if file.url and file.url.startswith(prefix):
+            try:
+                return uuid.UUID(file.url[len(prefix):].split("?", 1)[0].strip("/"))
+            except ValueError:
+                return None
+        return None
+
+    async def load_file_content(self, file: FileInput) -> bytes:
+        """
+        获取文件内容：已上传的文件直接从存储后端读取，外部 URL 通过 HTTP 下载。
+
+        读取结果保存在 file 上，同一次处理中不会重复读取。
+        """
+        content = file.get_content()
+        if content:
+            return content
+
+        file_id = self._local_file_id(file)
+        if file_id is not None:
+            from app.services.file_storage_service import FileStorageService
+
+            file_key = await run_in_session(
+                lambda db: db.query(FileMetadata.file_key).filter(
+                    FileMetadata.id == file_id,
+                    FileMetadata.status == "completed"
+                ).scalar()
+            )
+            if not file_key:
+                raise BusinessException(f"文件不存在或已删除: {file_id}", BizCode.NOT_FOUND)
+            content = await FileStorageService().download_file(file_key)
+        else:
+            async with httpx.AsyncClient(timeout=30.0) as client:
+                response = await client.get(file.url, follow_redirects=True)
+                response.raise_for_status()
+                content = response.content
+        file.set_content(content)
+        return content
+
+    async def _content_digest(self, file: FileInput) -> str:
+        """文件内容的 SHA-256；已上传文件不可变，哈希按文件 ID 缓存，命中时无需读取文件"""
+        file_id = self._local_file_id(file)
+        if file_id is not None and file.get_content() is None:
+            digest = await AttachmentCache.get_file_digest(file_id)
+            if digest:
+                return digest
+        digest = hashlib.sha256(await self.load_file_content(file)).hexdigest()
+        if file_id is not None:
+            await AttachmentCache.set_file_digest(file_id, digest)
+        return digest
+
     async def get_file_url(self, file: FileInput) -> str:
         """
         获取文件的访问 URL
@@ -599,12 +788,14 @@ class MultimodalService:
             file_id = file.upload_file_id
 
             # 查询 FileMetadata
-            file_metadata = self.db.query(FileMetadata).filter(
-                FileMetadata.id == file_id,
-                FileMetadata.status == "completed"
-            ).first()
+            exists = await run_in_session(
+                lambda db: db.query(FileMetadata.id).filter(
+                    FileMetadata.id == file_id,
+                    FileMetadata.status == "completed"
+                ).first() is not None
+            )
 
-            if not file_metadata:
+            if not exists:
                 raise BusinessException(
                     f"文件不存在或已删除: {file_id}",
                     BizCode.NOT_FOUND
@@ -616,7 +807,7 @@ class MultimodalService:
 
     async def extract_document_text(self, file: FileInput) -> str:
         """
-        提取文档文本内容
+        提取文档文本内容（按内容哈希缓存，同一文档只提取一次）
         
         Args:
             file: 文件输入
@@ -625,32 +816,37 @@ class MultimodalService:
             str: 提取的文本内容
         """
         try:
-            file_content = file.get_content()
-            if not file_content:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(file.url, follow_redirects=True)
-                    response.raise_for_status()
-                    file_content = response.content
-                    file.set_content(file_content)
-            file_mime_type = magic.from_buffer(file_content, mime=True)
-            if file_mime_type in TEXT_MIME:
-                return self._decode_text_safe(file_content)
-            elif file_mime_type in PDF_MIME:
-                return await self._extract_pdf_text(file_content)
-            elif self._is_word_file(file_content, file_mime_type):
-                return await self._extract_word_text(file_content)
-            elif self._is_excel_file(file_content, file_mime_type):
-                return await self._extract_xlsx_text(file_content)
-            elif file_mime_type in CSV_MIME:
-                return await self._extract_csv_text(file_content)
-            elif file_mime_type in JSON_MIME:
-                return await self._extract_json_text(file_content)
-            else:
-                return f"[Unsupported file type: {file_mime_type}]"
+            digest = await self._content_digest(file)
+            text = await AttachmentCache.get_text(digest)
+            if text is not None:
+                return text
+            file_content = await self.load_file_content(file)
+            # 解析是 CPU 密集操作，放到线程中执行，不阻塞事件循环
+            text = await asyncio.to_thread(self._extract_text, file_content)
+            await AttachmentCache.set_text(digest, text)
+            return text
         except Exception as e:
             logger.error(f"Failed to load file. - {e}")
             return "[Failed to load file.]"
 
+    def _extract_text(self, file_content: bytes) -> str:
+        """按文件实际类型提取文本"""
+        file_mime_type = magic.from_buffer(file_content, mime=True)
+        if file_mime_type in TEXT_MIME:
+            return self._decode_text_safe(file_content)
+        elif file_mime_type in PDF_MIME:
+            return self._extract_pdf_text(file_content)
+        elif self._is_word_file(file_content, file_mime_type):
+            return self._extract_word_text(file_content)
+        elif self._is_excel_file(file_content, file_mime_type):
+            return self._extract_xlsx_text(file_content)
+        elif file_mime_type in CSV_MIME:
+            return self._extract_csv_text(file_content)
+        elif file_mime_type in JSON_MIME:
+            return self._extract_json_text(file_content)
+        else:
+            return f"[Unsupported file type: {file_mime_type}]"
+
     async def extract_document_images(self, file: FileInput) -> list[dict]:
         """
         提取文档中的内嵌图片（支持 PDF 和 DOCX），附带位置信息。
@@ -663,19 +859,12 @@ class MultimodalService:
                 - ext: 图片扩展名（如 png、jpeg）
         """
         try:
-            file_content = file.get_content()
-            if not file_content:
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.get(file.url, follow_redirects=True)
-                    response.raise_for_status()
-                    file_content = response.content
-                    file.set_content(file_content)
-
+            file_content = await self.load_file_content(file)
             file_mime_type = magic.from_buffer(file_content, mime=True)
             if file_mime_type in PDF_MIME:
-                return self._extract_pdf_images(file_content)
+                return await asyncio.to_thread(self._extract_pdf_images, file_content)
             elif self._is_word_file(file_content, file_mime_type):
-                return self._extract_docx_images(file_content)
+                return await asyncio.to_thread(self._extract_docx_images, file_content)
             return []
         except Exception as e:
             logger.error(f"提取文档图片失败: {e}")
@@ -730,7 +919,7 @@ class MultimodalService:
         return images
 
     @staticmethod
-    async def _extract_pdf_text(file_content: bytes) -> str:
+    def _extract_pdf_text(file_content: bytes) -> str:
         """提取 PDF 文本"""
         try:
             # 使用 BytesIO 读取 PDF
@@ -745,7 +934,7 @@ class MultimodalService:
             return f"[PDF 提取失败: {str(e)}]"
 
     @staticmethod
-    async def _extract_word_text(file_content: bytes) -> str:
+    def _extract_word_text(file_content: bytes) -> str:
         """提取 Word 文档文本（支持 .docx 和旧版 .doc）"""
         # 先尝试 docx（ZIP 格式）
         if file_content[:2] == b'PK':
@@ -826,7 +1015,7 @@ class MultimodalService:
             return f"[doc 提取失败: {str(e)}]"
 
     @staticmethod
-    async def _extract_xlsx_text(file_content: bytes) -> str:
+    def _extract_xlsx_text(file_content: bytes) -> str:
         """提取 Excel 文本（支持 .xlsx 和旧版 .xls）"""
         # xlsx（ZIP 格式）
         if file_content[:2] == b'PK':
@@ -856,7 +1045,7 @@ class MultimodalService:
             logger.error(f"提取 xls 文本失败: {e}")
             return f"[xls 提取失败: {str(e)}]"
 
-    async def _extract_csv_text(self, file_content: bytes) -> str:
+    def _extract_csv_text(self, file_content: bytes) -> str:
         """提取 CSV 文本"""
         try:
             text = self._decode_text_safe(file_content)
@@ -866,7 +1055,7 @@ class MultimodalService:
             logger.error(f"提取 CSV 文本失败: {e}")
             return f"[CSV 提取失败: {str(e)}]"
 
-    async def _extract_json_text(self, file_content: bytes) -> str:
+    def _extract_json_text(self, file_content: bytes) -> str:
         """提取 JSON 文本"""
         try:
             text = self._decode_text_safe(file_content)
@@ -198,10 +198,10 @@ async def run_pilot_extraction(
         from app.core.memory.storage_services.extraction_engine.knowledge_extraction.chunk_extraction import (
             DialogueChunker,
         )
-        chunked_dialogs = []
-        for dlg in pruned_dialogs:
-            dlg.chunks = await DialogueChunker(memory_config.chunker_strategy, llm_client=llm_client).process_dialogue(dlg)
-            chunked_dialogs.append(dlg)
+        chunker = DialogueChunker(memory_config.chunker_strategy, llm_client=llm_client)
+        chunked_dialogs = list(pruned_dialogs)
+        for dlg, chunks in zip(chunked_dialogs, await chunker.process_dialogues(chunked_dialogs)):
+            dlg.chunks = chunks
 
         if progress_callback:
             for dlg in chunked_dialogs:
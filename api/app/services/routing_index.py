@@ -0,0 +1,319 @@
+"""路由索引 - 关键词自动机、Agent 原型向量与路由决策缓存
+
+按路由配置（规则 + 子 Agent 信息）构建一次并复用：
+- 所有规则关键词、主题关键词编译进一个多关键词自动机，每条消息只扫描一遍
+- 每个 Agent 由名称、角色、擅长领域、规则关键词构成原型文本，预先向量化（字符 n-gram + IDF）
+- 消息与各 Agent 原型做一次余弦相似度打分，置信度足够时无需调用 LLM
+- 有界的精确 / 近似重复决策缓存，重复或相似的消息直接复用 LLM 的路由结果
+
+MasterAgentRouter（多 Agent 编排的线上路由）与 LLMRouter / SmartRouter 共用同一索引。
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import zlib
+from collections import Counter, OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.utils.keyword_matcher import KeywordMatcher
+
+# 主题关键词映射
+TOPIC_KEYWORDS: Dict[str, List[str]] = {
+    "数学": ["数学", "方程", "计算", "求解", "x", "y", "函数", "几何"],
+    "物理": ["物理", "力", "速度", "加速度", "能量", "功率", "电路"],
+    "化学": ["化学", "方程式", "反应", "元素", "分子", "原子", "化合物"],
+    "语文": ["语文", "古诗", "作文", "阅读", "文言文", "诗词"],
+    "英语": ["英语", "单词", "语法", "翻译", "时态", "句型"],
+    "历史": ["历史", "朝代", "事件", "人物", "战争", "革命"],
+    "作业": ["作业", "批改", "检查", "评分", "反馈"],
+    "学习规划": ["计划", "规划", "方法", "技巧", "时间", "安排"],
+    "订单": ["订单", "发货", "物流", "配送", "快递"],
+    "退款": ["退款", "退货", "售后", "换货", "维修"],
+    "账户": ["账户", "密码", "登录", "注册", "绑定"],
+    "支付": ["支付", "付款", "充值", "余额", "优惠券"]
+}
+
+_TOPIC_MATCHER = KeywordMatcher([kw for kws in TOPIC_KEYWORDS.values() for kw in kws])
+
+_CJK_PATTERN = re.compile(r"[一-鿿]+")
+_WORD_PATTERN = re.compile(r"[a-z0-9]+")
+_NORMALIZE_PATTERN = re.compile(r"[\s\W_]+", re.UNICODE)
+
+
+def extract_topic(message: str) -> str:
+    """提取消息主题（关键词方式），返回匹配关键词最多的主题"""
+    found = _TOPIC_MATCHER.find_all(message)
+    best_topic, best_matched = "其他", 0
+    for topic, keywords in TOPIC_KEYWORDS.items():
+        matched = sum(1 for keyword in keywords if keyword in found)
+        if matched > best_matched:
+            best_topic, best_matched = topic, matched
+    return best_topic
+
+
+def _tokenize(text: str) -> List[str]:
+    """中文按字符 1-2 gram，其他按单词切分"""
+    text = text.lower()
+    tokens = _WORD_PATTERN.findall(text)
+    for segment in _CJK_PATTERN.findall(text):
+        tokens.extend(segment)
+        tokens.extend(segment[i:i + 2] for i in range(len(segment) - 1))
+    return tokens
+
+
+def _normalize(vector: Dict[str, float]) -> Dict[str, float]:
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    if not norm:
+        return {}
+    return {k: v / norm for k, v in vector.items()}
+
+
+def _cosine(a: Dict[str, float], b: Dict[str, float]) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class _CompiledRule:
+    """预处理后的路由规则：关键词小写、正则预编译"""
+
+    __slots__ = ("rule", "agent_id", "keywords", "exclude_keywords", "patterns", "min_keyword_count")
+
+    def __init__(self, rule: Dict[str, Any]):
+        self.rule = rule
+        self.agent_id = rule.get("target_agent_id")
+        self.keywords = [kw.lower() for kw in rule.get("keywords", []) or []]
+        self.exclude_keywords = [kw.lower() for kw in rule.get("exclude_keywords", []) or []]
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in rule.get("patterns", []) or []]
+        self.min_keyword_count = rule.get("min_keyword_count", 0)
+
+    def score(self, message: str, found: set) -> float:
+        """计算规则匹配分数，found 为消息中出现的全部关键词"""
+        score = 0.0
+        matched_count = sum(1 for keyword in self.keywords if keyword in found)
+
+        # 1. 关键词匹配 (权重 0.6)
+        if self.keywords:
+            score += matched_count / len(self.keywords) * 0.6
+
+        # 2. 正则匹配 (权重 0.3)
+        if self.patterns:
+            matched_patterns = sum(1 for pattern in self.patterns if pattern.search(message))
+            score += matched_patterns / len(self.patterns) * 0.3
+
+        # 3. 排除关键词 (负分)
+        if self.exclude_keywords and any(keyword in found for keyword in self.exclude_keywords):
+            score *= 0.5
+
+        # 4. 最小关键词数量要求
+        if self.keywords and self.min_keyword_count > 0 and matched_count < self.min_keyword_count:
+            score *= 0.7
+
+        return min(score, 1.0)
+
+
+class RoutingDecisionCache:
+    """有界路由决策缓存：精确匹配（归一化文本）+ 近似重复匹配（向量余弦）
+
+    近似重复只在候选桶内比较（MinHash 分桶）：每条缓存按 signature_terms 个哈希函数
+    各取哈希值最小的词项分桶，查询时只与至少落入同一个桶的条目计算余弦。
+    词项重合度高的近似重复消息几乎总会共享某个桶；每个桶只保留最近的 bucket_size 条，
+    单次查询的比较次数有上限，与缓存大小无关。
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1000,
+        near_duplicate_threshold: float = 0.9,
+        signature_terms: int = 4,
+        bucket_size: int = 32,
+    ):
+        self.max_size = max_size
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.signature_terms = signature_terms
+        self.bucket_size = bucket_size
+        # key -> (向量, 决策, 分桶词项)；决策由调用方决定，如 (agent_id, 置信度) 或完整决策字典
+        self._entries: "OrderedDict[str, Tuple[Dict[str, float], Any, Tuple[str, ...]]]" = OrderedDict()
+        self._buckets: Dict[str, "OrderedDict[str, None]"] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(message: str) -> str:
+        return _NORMALIZE_PATTERN.sub("", message.lower())
+
+    def _signature(self, vector: Dict[str, float]) -> Tuple[str, ...]:
+        if not vector:
+            return ()
+        return tuple(
+            f"{i}:{min(vector, key=lambda term: zlib.crc32(f'{i}:{term}'.encode('utf-8')))}"
+            for i in range(self.signature_terms)
+        )
+
+    def _unlink(self, key: str, terms: Tuple[str, ...]) -> None:
+        for term in terms:
+            bucket = self._buckets.get(term)
+            if bucket is None:
+                continue
+            bucket.pop(key, None)
+            if not bucket:
+                del self._buckets[term]
+
+    def _nearest(self, vector: Dict[str, float]) -> Optional[str]:
+        candidates = {
+            key
+            for term in self._signature(vector)
+            for key in self._buckets.get(term, ())
+        }
+        best_key, best_score = None, self.near_duplicate_threshold
+        for key in candidates:
+            score = _cosine(vector, self._entries[key][0])
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def get(self, message: str, vector: Dict[str, float]) -> Optional[Any]:
+        key = self.normalize(message)
+        with self._lock:
+            if key not in self._entries:
+                key = self._nearest(vector) if vector else None
+                if key is None:
+                    return None
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+    def put(self, message: str, vector: Dict[str, float], decision: Any) -> None:
+        key = self.normalize(message)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._unlink(key, previous[2])
+            terms = self._signature(vector)
+            self._entries[key] = (vector, decision, terms)
+            for term in terms:
+                bucket = self._buckets.setdefault(term, OrderedDict())
+                bucket[key] = None
+                if len(bucket) > self.bucket_size:
+                    # 只移出桶，条目仍可精确命中
+                    bucket.popitem(last=False)
+            while len(self._entries) > self.max_size:
+                old_key, old_entry = self._entries.popitem(last=False)
+                self._unlink(old_key, old_entry[2])
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RoutingIndex:
+    """按路由配置预计算的路由索引"""
+
+    def __init__(self, routing_rules: List[Dict[str, Any]], sub_agents: Dict[str, Any], temperature: float = 0.05):
+        """
+        Args:
+            routing_rules: 路由规则列表
+            sub_agents: 子 Agent 配置字典
+            temperature: 相似度转置信度的 softmax 温度，越小越偏向最高分
+        """
+        self.rules = [_CompiledRule(rule) for rule in routing_rules]
+        self._rules_by_id = {id(compiled.rule): compiled for compiled in self.rules}
+        self.matcher = KeywordMatcher(
+            [kw for rule in self.rules for kw in rule.keywords + rule.exclude_keywords]
+        )
+        self.temperature = temperature
+        self.cache = RoutingDecisionCache()
+
+        # Agent 原型：名称、角色、擅长领域、规则关键词
+        prototypes: Dict[str, Counter] = {}
+        for agent_id, agent_data in sub_agents.items():
+            info = agent_data.get("info", {}) or {}
+            parts = [info.get("name", ""), info.get("role", ""), *(info.get("capabilities", []) or [])]
+            for rule in self.rules:
+                if rule.agent_id == agent_id:
+                    parts.extend(rule.keywords)
+            prototypes[agent_id] = Counter(_tokenize(" ".join(p for p in parts if p)))
+
+        document_freq = Counter(term for counts in prototypes.values() for term in counts)
+        n = max(len(prototypes), 1)
+        self.idf = {term: math.log((n + 1) / (df + 0.5)) for term, df in document_freq.items()}
+        self._default_idf = math.log(n + 2)
+        self.prototypes = {
+            agent_id: _normalize({t: (1 + math.log(c)) * self.idf[t] for t, c in counts.items()})
+            for agent_id, counts in prototypes.items()
+        }
+
+    def vectorize(self, message: str, vocabulary_only: bool = False) -> Dict[str, float]:
+        counts = Counter(_tokenize(message))
+        vector = {}
+        for term, count in counts.items():
+            idf = self.idf.get(term)
+            if idf is None:
+                if vocabulary_only:
+                    continue
+                idf = self._default_idf
+            vector[term] = (1 + math.log(count)) * idf
+        return _normalize(vector)
+
+    def find_keywords(self, message: str) -> set:
+        return self.matcher.find_all(message)
+
+    def score_rules(self, message: str, found: Optional[set] = None) -> List[Tuple[_CompiledRule, float]]:
+        """一次扫描计算全部规则的匹配分数"""
+        if found is None:
+            found = self.find_keywords(message)
+        return [(rule, rule.score(message, found)) for rule in self.rules]
+
+    def rule_score(self, message: str, rule: Dict[str, Any]) -> float:
+        compiled = self._rules_by_id.get(id(rule)) or _CompiledRule(rule)
+        lowered = message.lower()
+        found = {kw for kw in compiled.keywords + compiled.exclude_keywords if kw in lowered}
+        return compiled.score(message, found)
+
+    def agent_score(self, message: str, agent_id: str) -> float:
+        scores = [score for rule, score in self.score_rules(message) if rule.agent_id == agent_id]
+        return max(scores) if scores else 0.0
+
+    def route_by_similarity(self, message: str) -> Tuple[Optional[str], float]:
+        """向量相似度路由，返回 (agent_id, 置信度)；置信度为最高分在各 Agent 间的 softmax 概率"""
+        if not self.prototypes:
+            return None, 0.0
+        vector = self.vectorize(message, vocabulary_only=True)
+        if not vector:
+            return None, 0.0
+        similarities = {agent_id: _cosine(vector, proto) for agent_id, proto in self.prototypes.items()}
+        best_agent_id = max(similarities, key=similarities.get)
+        best = similarities[best_agent_id]
+        if best <= 0:
+            return None, 0.0
+        total = sum(math.exp((s - best) / self.temperature) for s in similarities.values())
+        return best_agent_id, 1.0 / total
+
+
+_INDEX_CACHE: "OrderedDict[str, RoutingIndex]" = OrderedDict()
+_INDEX_CACHE_SIZE = 64
+_INDEX_LOCK = threading.Lock()
+
+
+def _config_fingerprint(routing_rules: List[Dict[str, Any]], sub_agents: Dict[str, Any]) -> str:
+    payload = {
+        "rules": routing_rules,
+        "agents": {agent_id: (data.get("info", {}) or {}) for agent_id, data in sub_agents.items()},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def get_routing_index(routing_rules: List[Dict[str, Any]], sub_agents: Dict[str, Any]) -> RoutingIndex:
+    """获取路由索引，同一配置版本只构建一次（决策缓存随配置版本失效）"""
+    fingerprint = _config_fingerprint(routing_rules or [], sub_agents or {})
+    with _INDEX_LOCK:
+        index = _INDEX_CACHE.get(fingerprint)
+        if index is not None:
+            _INDEX_CACHE.move_to_end(fingerprint)
+            return index
+    index = RoutingIndex(routing_rules or [], sub_agents or {})
+    with _INDEX_LOCK:
+        _INDEX_CACHE[fingerprint] = index
+        while len(_INDEX_CACHE) > _INDEX_CACHE_SIZE:
+            _INDEX_CACHE.popitem(last=False)
+    return index
@@ -1,8 +1,8 @@
 """智能路由器 - 解决多轮对话路由错乱"""
-import re
 from typing import Dict, Any, List, Optional, Tuple
 from app.services.conversation_state_manager import ConversationStateManager
 from app.core.logging_config import get_business_logger
+from app.services.routing_index import extract_topic, get_routing_index
 
 logger = get_business_logger()
 
@@ -50,6 +50,10 @@ class SmartRouter:
         # 配置参数
         self.min_confidence_for_switch = 0.7  # 切换 Agent 的最小置信度
         self.max_same_agent_turns = 10  # 同一 Agent 最大连续轮数
+        self.vector_confidence_threshold = 0.75  # 无规则命中时采用向量相似度路由的置信度阈值
+        
+        # 按配置版本预计算的路由索引（规则、Agent 原型向量）
+        self.index = get_routing_index(routing_rules, sub_agents)
     
     async def route(
         self,
@@ -259,13 +263,17 @@ class SmartRouter:
         best_agent_id = None
         best_score = 0.0
         
-        # 遍历所有路由规则
-        for rule in self.routing_rules:
-            score = self._calculate_rule_score(message, rule)
-            
+        # 一次扫描计算所有路由规则的分数
+        for rule, score in self.index.score_rules(message):
             if score > best_score:
                 best_score = score
-                best_agent_id = rule.get("target_agent_id")
+                best_agent_id = rule.agent_id
+        
+        # 规则不足时，使用 Agent 原型向量相似度
+        if not best_agent_id or best_score < 0.3:
+            vector_agent_id, vector_confidence = self.index.route_by_similarity(message)
+            if vector_agent_id and vector_confidence >= self.vector_confidence_threshold:
+                return vector_agent_id, vector_confidence
         
         # 如果没有匹配的规则，使用默认 Agent
         if not best_agent_id or best_score < 0.3:
@@ -289,50 +297,7 @@ class SmartRouter:
         Returns:
             匹配分数 (0-1)
         """
-        score = 0.0
-        message_lower = message.lower()
-        
-        # 1. 关键词匹配 (权重 0.6)
-        keywords = rule.get("keywords", [])
-        if keywords:
-            matched_keywords = sum(
-                1 for keyword in keywords
-                if keyword.lower() in message_lower
-            )
-            keyword_score = matched_keywords / len(keywords)
-            score += keyword_score * 0.6
-        
-        # 2. 正则匹配 (权重 0.3)
-        patterns = rule.get("patterns", [])
-        if patterns:
-            matched_patterns = sum(
-                1 for pattern in patterns
-                if re.search(pattern, message, re.IGNORECASE)
-            )
-            pattern_score = matched_patterns / len(patterns)
-            score += pattern_score * 0.3
-        
-        # 3. 排除关键词 (负分)
-        exclude_keywords = rule.get("exclude_keywords", [])
-        if exclude_keywords:
-            has_exclude = any(
-                keyword.lower() in message_lower
-                for keyword in exclude_keywords
-            )
-            if has_exclude:
-                score *= 0.5  # 减半
-        
-        # 4. 最小关键词数量要求
-        min_keyword_count = rule.get("min_keyword_count", 0)
-        if keywords and min_keyword_count > 0:
-            matched_count = sum(
-                1 for keyword in keywords
-                if keyword.lower() in message_lower
-            )
-            if matched_count < min_keyword_count:
-                score *= 0.7  # 惩罚
-        
-        return min(score, 1.0)
+        return self.index.rule_score(message, rule)
     
     def _calculate_agent_score(
         self,
@@ -348,22 +313,7 @@ class SmartRouter:
         Returns:
             匹配分数 (0-1)
         """
-        # 找到该 Agent 对应的所有规则
-        agent_rules = [
-            rule for rule in self.routing_rules
-            if rule.get("target_agent_id") == agent_id
-        ]
-        
-        if not agent_rules:
-            return 0.0
-        
-        # 返回最高分数
-        max_score = max(
-            self._calculate_rule_score(message, rule)
-            for rule in agent_rules
-        )
-        
-        return max_score
+        return self.index.agent_score(message, agent_id)
     
     def _extract_topic(self, message: str) -> str:
         """提取消息主题
@@ -374,40 +324,7 @@ class SmartRouter:
         Returns:
             主题名称
         """
-        # 主题关键词映射
-        topic_keywords = {
-            "数学": ["数学", "方程", "计算", "求解", "x", "y", "函数", "几何"],
-            "物理": ["物理", "力", "速度", "加速度", "能量", "功率", "电路"],
-            "化学": ["化学", "方程式", "反应", "元素", "分子", "原子", "化合物"],
-            "语文": ["语文", "古诗", "作文", "阅读", "文言文", "诗词"],
-            "英语": ["英语", "单词", "语法", "翻译", "时态", "句型"],
-            "历史": ["历史", "朝代", "事件", "人物", "战争", "革命"],
-            "作业": ["作业", "批改", "检查", "评分", "反馈"],
-            "学习规划": ["计划", "规划", "方法", "技巧", "时间", "安排"],
-            "订单": ["订单", "发货", "物流", "配送", "快递"],
-            "退款": ["退款", "退货", "售后", "换货", "维修"],
-            "账户": ["账户", "密码", "登录", "注册", "绑定"],
-            "支付": ["支付", "付款", "充值", "余额", "优惠券"]
-        }
-        
-        message_lower = message.lower()
-        
-        # 统计每个主题的匹配度
-        topic_scores = {}
-        for topic, keywords in topic_keywords.items():
-            matched = sum(
-                1 for keyword in keywords
-                if keyword in message_lower
-            )
-            if matched > 0:
-                topic_scores[topic] = matched
-        
-        # 返回匹配度最高的主题
-        if topic_scores:
-            best_topic = max(topic_scores.items(), key=lambda x: x[1])[0]
-            return best_topic
-        
-        return "其他"
+        return extract_topic(message)
     
     def _get_default_agent_id(self) -> str:
         """获取默认 Agent ID
@@ -0,0 +1,137 @@
+"""子 Agent 执行器 - 滑动窗口并发执行多个子 Agent
+
+与按批次 asyncio.gather 不同，执行器始终保持最多 limit 个子 Agent 在运行，
+任一子 Agent 完成后立即启动下一个，并按完成顺序交付结果；慢 Agent 不会拖住同批的其他 Agent。
+"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from app.core.logging_config import get_business_logger
+
+logger = get_business_logger()
+
+
+@dataclass
+class SubAgentJob:
+    """一个待执行的子 Agent
+
+    run 为无参工厂函数：非流式任务返回结果协程，流式任务返回事件异步迭代器。
+    工厂在获得并发名额后才被调用，保证会话等资源只在执行期间占用。
+    """
+    agent_id: str
+    agent_name: Optional[str]
+    run: Callable[[], Any]
+    info: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class SubAgentOutcome:
+    """子 Agent 执行结果"""
+    index: int
+    job: SubAgentJob
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    elapsed_time: float = 0.0
+
+    @property
+    def success(self) -> bool:
+        return self.error is None
+
+
+class SubAgentExecutor:
+    """滑动窗口并发执行子 Agent，支持单 Agent 超时"""
+
+    def __init__(self, limit: int = 3, timeout: Optional[float] = None):
+        """
+        Args:
+            limit: 同时运行的子 Agent 数量上限
+            timeout: 单个子 Agent 的超时时间（秒），None 表示不限制
+        """
+        self.limit = max(1, int(limit or 1))
+        self.timeout = timeout or None
+
+    async def _run_one(self, index: int, job: SubAgentJob) -> SubAgentOutcome:
+        start = time.time()
+        try:
+            result = await asyncio.wait_for(job.run(), timeout=self.timeout)
+            return SubAgentOutcome(index, job, result=result, elapsed_time=time.time() - start)
+        except asyncio.TimeoutError:
+            logger.warning(f"子 Agent 执行超时: {job.agent_name}", extra={"timeout": self.timeout})
+            return SubAgentOutcome(index, job, error=f"执行超时（{self.timeout}秒）", elapsed_time=time.time() - start)
+        except Exception as e:
+            logger.error(f"子 Agent 执行失败: {job.agent_name}", extra={"error": str(e)})
+            return SubAgentOutcome(index, job, error=str(e), elapsed_time=time.time() - start)
+
+    async def as_completed(self, jobs: List[SubAgentJob]) -> AsyncIterator[SubAgentOutcome]:
+        """执行全部子 Agent，按完成顺序逐个交付结果"""
+        pending = iter(enumerate(jobs))
+        running: set = set()
+
+        def _fill():
+            while len(running) < self.limit:
+                item = next(pending, None)
+                if item is None:
+                    return
+                running.add(asyncio.create_task(self._run_one(*item)))
+
+        _fill()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    running.discard(task)
+                _fill()
+                for task in done:
+                    yield task.result()
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def run_all(self, jobs: List[SubAgentJob]) -> List[SubAgentOutcome]:
+        """执行全部子 Agent，结果按提交顺序返回"""
+        outcomes = [outcome async for outcome in self.as_completed(jobs)]
+        return sorted(outcomes, key=lambda o: o.index)
+
+    async def stream(self, jobs: List[SubAgentJob]) -> AsyncIterator[Tuple[SubAgentJob, str, Any]]:
+        """并发执行多个流式子 Agent，实时合并事件
+
+        Yields:
+            (job, event_type, data)：event_type 为 event（子 Agent 原始事件）、
+            done（该子 Agent 完成）或 error（失败或超时，data 为错误信息）
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.limit)
+
+        async def _consume(job: SubAgentJob):
+            async with semaphore:
+                events = None
+                try:
+                    events = job.run()
+                    async with asyncio.timeout(self.timeout):
+                        async for event in events:
+                            await queue.put((job, "event", event))
+                    await queue.put((job, "done", None))
+                except TimeoutError:
+                    logger.warning(f"子 Agent 流式执行超时: {job.agent_name}", extra={"timeout": self.timeout})
+                    await queue.put((job, "error", f"执行超时（{self.timeout}秒）"))
+                except Exception as e:
+                    logger.error(f"子 Agent 流式执行失败: {job.agent_name}", extra={"error": str(e)})
+                    await queue.put((job, "error", str(e)))
+                finally:
+                    if events is not None and hasattr(events, "aclose"):
+                        await events.aclose()
+
+        tasks = [asyncio.create_task(_consume(job)) for job in jobs]
+        remaining = len(tasks)
+        try:
+            while remaining:
+                item = await queue.get()
+                if item[1] != "event":
+                    remaining -= 1
+                yield item
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
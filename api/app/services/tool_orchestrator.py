@@ -2,12 +2,15 @@
 工具编排器 - Prompt 驱动的 ReAct 多轮工具调用
 
 弱模型场景下，通过 ReAct 格式的 system prompt 让模型自主决策工具调用，
-多轮执行直到模型给出最终答案，将完整的工具调用过程注入 system_prompt。
+多轮执行直到模型给出最终答案。流式场景下最后一轮的回答直接推送给客户端，
+不再额外调用一次模型重新生成；同一轮中相互独立的多个工具调用并发执行。
 """
 import asyncio
 import json
 import re
-from typing import Any, Dict, List, Optional, Tuple
+import time
+import uuid
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Union
 
 from app.core.logging_config import get_business_logger
 
@@ -28,6 +31,18 @@ _ACTION_PATTERN = re.compile(
     re.DOTALL,
 )
 
+# 流式输出中工具调用块的起始标记；标记可能被拆在两个 chunk 之间，
+# 放行自然语言时需保留末尾可能是标记开头的文本
+_ACTION_MARKER = re.compile(r"Thought[：:]")
+_ACTION_MARKER_PREFIX = "Thought"
+
+# 每轮开头缓冲的字符数：模型常在工具调用块前先输出一句铺垫（如"好的，我来查一下"），
+# 超过该长度仍未出现 Thought 标记才认定为最终回答并开始放行
+_ANSWER_HOLD_CHARS = 64
+
+# 清除回答中残留的 Thought/Action/Input 块
+_ACTION_BLOCK_PATTERN = re.compile(r"Thought[：:][\s\S]*?Input[：:]\s*\{[^{}]*}\s*")
+
 _REACT_SYSTEM_TEMPLATE = """\
 你是具备工具调用能力的智能助手，可根据用户问题自主判断是否使用工具、选择哪个工具、分多轮完成复杂任务。
 
@@ -41,14 +56,14 @@ _REACT_SYSTEM_TEMPLATE = """\
 
 # 基础规则
 1. 只能从上面列出的工具中选择，严禁编造不存在的工具名称。
-2. 每一轮思考**只能调用一个工具**，不允许一轮同时列出多个工具。
-3. 若任务需要多个步骤、依赖多个工具（如先查时间再查天气），必须分多轮依次调用。
+2. 相互独立的多个工具调用（如同时查询两个城市的天气）可以在同一轮中依次列出多个三段式，它们会被并发执行。
+3. 若后一步依赖前一步工具的结果（如先查时间再查天气），必须分多轮依次调用。
 4. **严格禁止重复调用同一工具获取相同信息**，如有结果不满足请换用其他工具或直接回答。
 5. 如果用户问题不需要任何工具就能回答（或历史中已有答案），直接给出最终答案，不输出工具调用格式。
 6. 工具参数缺失时，不要编造参数，正常推理是否需要继续调用。
 
 # 输出规范
-## 调用工具时，**必须严格使用以下固定三段式格式输出**，一字不差遵守排版：
+## 调用工具时，**必须严格使用以下固定三段式格式输出**，一字不差遵守排版（同一轮调用多个工具时重复该格式）：
 Thought：你的思考过程，分析用户需求、是否需要调用工具、应该选哪个工具、缺少什么信息
 Action：选中的工具名称（必须和工具列表里的名称完全一致）
 Input：JSON格式工具入参，无参数则填空对象 {{}}
@@ -130,11 +145,7 @@ def _build_tools_info(tools: Dict[str, Any]) -> str:
     return "\n".join(lines)
 
 
-def _parse_action(text: str, valid_tools: set = None) -> Optional[Tuple[str, str, dict]]:
-    """从模型输出中解析 Thought/Action/Input，返回 (thought, action, input_dict) 或 None"""
-    m = _ACTION_PATTERN.search(text)
-    if not m:
-        return None
+def _parse_match(m: re.Match, valid_tools: set = None) -> Optional[Tuple[str, str, dict]]:
     thought = m.group(1).strip()
     action = m.group(2).strip()
     input_str = m.group(3).strip()
@@ -149,12 +160,99 @@ def _parse_action(text: str, valid_tools: set = None) -> Optional[Tuple[str, str
     return thought, action, input_dict
 
 
+def _parse_action(text: str, valid_tools: set = None) -> Optional[Tuple[str, str, dict]]:
+    """从模型输出中解析 Thought/Action/Input，返回 (thought, action, input_dict) 或 None"""
+    m = _ACTION_PATTERN.search(text)
+    if not m:
+        return None
+    return _parse_match(m, valid_tools)
+
+
+def _parse_actions(text: str, valid_tools: set = None) -> List[Tuple[str, str, dict]]:
+    """解析模型一轮输出中的全部 Thought/Action/Input，忽略不在工具列表中的 action"""
+    actions = []
+    for m in _ACTION_PATTERN.finditer(text):
+        parsed = _parse_match(m, valid_tools)
+        if parsed is not None:
+            actions.append(parsed)
+    return actions
+
+
+def _strip_action_blocks(text: str) -> str:
+    """去除可能残留的 Thought/Action/Input 块，保留其后的自然语言"""
+    return _ACTION_BLOCK_PATTERN.sub("", text).strip()
+
+
+def _chunk_text(chunk: Any) -> str:
+    """提取模型流式 chunk 中的文本，兼容多模态列表格式"""
+    content = chunk.content if hasattr(chunk, "content") else chunk
+    if isinstance(content, list):
+        return "".join(
+            item.get("text", "") if isinstance(item, dict) else str(item)
+            for item in content
+        )
+    return content if isinstance(content, str) else str(content or "")
+
+
+class _AnswerGate:
+    """
+    单轮流式输出的分流器。
+
+    每轮开头先缓冲 hold_chars 个字符：期间出现 Thought 标记说明是工具调用轮，
+    整轮缓冲、不向客户端输出；超过该长度仍无标记则认定为最终回答，之后即时放行
+    （仍出现标记时停止放行，待整轮结束再解析工具调用）。
+    """
+
+    def __init__(self, hold_chars: int = _ANSWER_HOLD_CHARS):
+        self.hold_chars = hold_chars
+        self.text = ""
+        self.emitted = 0
+        self.answering = False
+        self.action_at: Optional[int] = None
+
+    def feed(self, chunk: str) -> str:
+        """追加一段输出，返回可以立即推送给客户端的文本"""
+        self.text += chunk
+        if self.action_at is not None:
+            return ""
+        if self.emitted == 0:
+            # 跳过开头的空白
+            self.emitted = len(self.text) - len(self.text.lstrip())
+        m = _ACTION_MARKER.search(self.text, self.emitted)
+        if m:
+            self.action_at = m.start()
+            return self._take(m.start()) if self.answering else ""
+        if not self.answering:
+            if len(self.text) - self.emitted < self.hold_chars:
+                return ""
+            self.answering = True
+        hold = 0
+        for k in range(min(len(_ACTION_MARKER_PREFIX), len(self.text) - self.emitted), 0, -1):
+            if self.text.endswith(_ACTION_MARKER_PREFIX[:k]):
+                hold = k
+                break
+        return self._take(len(self.text) - hold)
+
+    def flush(self) -> str:
+        """整轮结束，放行剩余的自然语言（已进入工具调用块时不放行）"""
+        if self.action_at is not None:
+            return ""
+        return self._take(len(self.text.rstrip()))
+
+    def _take(self, end: int) -> str:
+        if end <= self.emitted:
+            return ""
+        out = self.text[self.emitted:end]
+        self.emitted = end
+        return out
+
+
 class ToolOrchestrator:
     """
     Prompt 驱动的 ReAct 多轮工具调用编排器。
 
     通过 ReAct 格式 system prompt 让弱模型自主决策工具调用，
-    多轮执行直到模型输出最终答案，返回完整的工具调用轨迹供注入 system_prompt。
+    多轮执行直到模型输出最终答案。
 
     适用场景：
     - 模型不支持 function calling（capability 中无 'function_call'）
@@ -170,6 +268,60 @@ class ToolOrchestrator:
         self.tools: Dict[str, Any] = {t.name: t for t in tools}
         self.max_rounds = max_rounds
         self._single_call_counts: Dict[str, int] = {}
+        # 最近一次 stream/run 的结果
+        self.final_answer = ""
+        self.trajectory_context = ""
+        self.node_executions: List[Dict] = []
+        self.total_tokens = 0
+
+    @staticmethod
+    def _build_llm(
+        api_key_config: Dict[str, Any],
+        model_config: Any,
+        effective_params: Dict[str, Any],
+        answer_params: bool = True,
+    ):
+        """构建 ReAct 轮次使用的模型
+
+        answer_params: 最后一轮即最终回答时（流式路径），与 LangChainAgent 路径使用相同的
+        深度思考 / JSON 输出参数；只收集工具结果、由后续 Agent 生成回答时（create_and_run）不启用
+        """
+        from app.core.models import RedBearLLM, RedBearModelConfig
+
+        extra_params = {"temperature": effective_params.get("temperature", 0.7)}
+        if effective_params.get("max_tokens"):
+            extra_params["max_tokens"] = effective_params["max_tokens"]
+        if not answer_params:
+            effective_params = {}
+        return RedBearLLM(
+            RedBearModelConfig(
+                model_name=api_key_config["model_name"],
+                provider=api_key_config.get("provider", "openai"),
+                api_key=api_key_config["api_key"],
+                base_url=api_key_config.get("api_base"),
+                capability=api_key_config.get("capability", []),
+                is_omni=api_key_config.get("is_omni", False),
+                deep_thinking=effective_params.get("deep_thinking", False),
+                thinking_budget_tokens=effective_params.get("thinking_budget_tokens"),
+                json_output=effective_params.get("json_output", False),
+                extra_params=extra_params
+            ),
+            type=model_config.type if hasattr(model_config, 'type') else model_config.model_type
+        )
+
+    @staticmethod
+    def _build_system_prompt(system_prompt: str, effective_params: Dict[str, Any]) -> str:
+        # 与 LangChainAgent 一致：JSON 输出时注入 prompt 兜底
+        if effective_params.get("json_output"):
+            return (system_prompt or "") + "\n请以JSON格式输出。"
+        return system_prompt
+
+    @staticmethod
+    def _build_message(message: str, processed_files: Optional[List[Dict]]) -> str | list:
+        return (
+            [{"type": "text", "text": message}] + processed_files
+            if processed_files else message
+        )
 
     @classmethod
     async def create_and_run(
@@ -185,50 +337,25 @@ class ToolOrchestrator:
         max_rounds: int = 10,
     ) -> Tuple[str, List[Dict]]:
         """
-        创建编排器并执行 ReAct 循环。
+        创建编排器并执行 ReAct 循环，将轨迹注入 system_prompt 供后续 Agent 再次生成回答。
 
         Returns:
             (updated_system_prompt, node_executions):
             - updated_system_prompt: 包含工具调用结果的 system_prompt
             - node_executions: 工具调用步骤记录列表
         """
-        from app.core.models import RedBearLLM, RedBearModelConfig
-
         orchestrator = cls(tools, max_rounds=max_rounds)
         react_system_prompt = orchestrator.build_react_system_prompt(system_prompt)
-
-        _react_llm = RedBearLLM(
-            RedBearModelConfig(
-                model_name=api_key_config["model_name"],
-                provider=api_key_config.get("provider", "openai"),
-                api_key=api_key_config["api_key"],
-                base_url=api_key_config.get("api_base"),
-                capability=api_key_config.get("capability", []),
-                is_omni=api_key_config.get("is_omni", False),
-                extra_params={"temperature": effective_params.get("temperature", 0.7)}
-            ),
-            type=model_config.type if hasattr(model_config, 'type') else model_config.model_type
-        )
+        _react_llm = cls._build_llm(api_key_config, model_config, effective_params, answer_params=False)
 
         async def _llm_caller(msgs):
             full_msgs = [{"role": "system", "content": react_system_prompt}] + msgs
             resp = await _react_llm.ainvoke(full_msgs)
-            content = resp.content if hasattr(resp, "content") else str(resp)
-            if isinstance(content, list):
-                content = "".join(
-                    item.get("text", "") if isinstance(item, dict) else str(item)
-                    for item in content
-                )
-            return content.strip()
-
-        react_message = (
-            [{"type": "text", "text": message}] + processed_files
-            if processed_files else message
-        )
+            return _chunk_text(resp).strip()
 
         final_answer, trajectory_context, node_executions = await orchestrator.run(
             llm_caller=_llm_caller,
-            message=react_message,
+            message=cls._build_message(message, processed_files),
             history=history
         )
         logger.info("ReAct 工具调用完成", extra={"final_answer_len": len(final_answer)})
@@ -240,6 +367,80 @@ class ToolOrchestrator:
         )
         return updated_system_prompt, node_executions
 
+    @classmethod
+    async def create_and_stream(
+        cls,
+        tools: list,
+        system_prompt: str,
+        message: str,
+        history: List[Dict],
+        api_key_config: Dict[str, Any],
+        model_config: Any,
+        effective_params: Dict[str, Any],
+        processed_files: Optional[List[Dict]] = None,
+        max_rounds: int = 10,
+    ) -> AsyncIterator[Union[str, int, Dict]]:
+        """
+        创建编排器并流式执行 ReAct 循环，最后一轮的回答直接作为最终答案推送。
+
+        产出格式与 LangChainAgent.chat_stream 一致：
+        str 为回答文本片段，dict 为 reasoning/tool_start/tool_end/tool_error/node_executions 事件，
+        int 为累计 total_tokens（最后产出）。
+        """
+        from app.core.agent.langchain_agent import LangChainAgent
+
+        orchestrator = cls(tools, max_rounds=max_rounds)
+        react_system_prompt = orchestrator.build_react_system_prompt(
+            cls._build_system_prompt(system_prompt, effective_params)
+        )
+        _react_llm = cls._build_llm(api_key_config, model_config, effective_params)
+        # 以校验后的配置为准（模型不支持时已自动关闭）
+        deep_thinking = _react_llm._config.deep_thinking
+
+        async def _llm_streamer(msgs):
+            full_msgs = [{"role": "system", "content": react_system_prompt}] + msgs
+            tokens = 0
+            async for chunk in _react_llm.astream(full_msgs):
+                tokens = max(tokens, LangChainAgent._extract_tokens_from_message(chunk))
+                if deep_thinking:
+                    reasoning = LangChainAgent._extract_reasoning_content(chunk)
+                    if reasoning:
+                        yield {"type": "reasoning", "content": reasoning}
+                text = _chunk_text(chunk)
+                if text:
+                    yield text
+            if tokens:
+                yield tokens
+
+        async for item in orchestrator.stream(
+            llm_streamer=_llm_streamer,
+            message=cls._build_message(message, processed_files),
+            history=history
+        ):
+            yield item
+        logger.info("ReAct 工具调用完成", extra={"final_answer_len": len(orchestrator.final_answer)})
+
+    @classmethod
+    async def create_and_answer(cls, **kwargs) -> Dict[str, Any]:
+        """
+        非流式版本的 create_and_stream，返回与 LangChainAgent.chat 相同结构的结果。
+        """
+        content = ""
+        total_tokens = 0
+        node_executions: List[Dict] = []
+        async for item in cls.create_and_stream(**kwargs):
+            if isinstance(item, str):
+                content += item
+            elif isinstance(item, int):
+                total_tokens = item
+            elif isinstance(item, dict) and item.get("type") == "node_executions":
+                node_executions = item.get("data", [])
+        return {
+            "content": content,
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": total_tokens},
+            "node_executions": node_executions,
+        }
+
     def build_react_system_prompt(self, original_system_prompt: str) -> str:
         """
         将原始 system_prompt 与 ReAct 工具调用指令合并。
@@ -279,106 +480,162 @@ class ToolOrchestrator:
             logger.warning(f"工具 '{name}' 执行失败: {e}")
             return {"success": False, "output": "", "error": f"[工具调用失败: {e}]"}
 
-    async def run(self, llm_caller, message: str | list, history: List[Dict]) -> Tuple[str, str, List[Dict]]:
+    async def _execute_action(self, step_id: str, action: str, input_dict: dict) -> Tuple[Dict, str]:
+        """执行一个工具调用，返回 (步骤记录, observation)"""
+        step_start = time.time()
+        tool_result = await self._call_tool(action, input_dict)
+
+        success: bool = bool(tool_result.get("success", True))
+        output: str = str(tool_result.get("output") or "")
+        error: Optional[str] = tool_result.get("error")
+
+        tool = self.tools.get(action)
+        tool_meta = getattr(tool, "_tool_meta", None) if tool else None
+        node = {
+            "step_id": step_id,
+            "node_type": "tool",
+            "node_name": action,
+            "status": "completed" if success else "failed",
+            "input": json.dumps(input_dict, ensure_ascii=False)[:2000],
+            "output": output[:2000],
+            "elapsed_time": round((time.time() - step_start) * 1000, 2),
+            "error": error,
+            "meta": tool_meta if tool_meta else None,
+        }
+        # 提取知识库来源
+        if tool and hasattr(tool, "_last_sources") and tool._last_sources:
+            if not node["meta"]:
+                node["meta"] = {}
+            node["meta"]["sources"] = tool._last_sources
+            tool._last_sources = []
+        return node, f"[错误: {error}]" if error else output
+
+    async def stream(self, llm_streamer, message: str | list, history: List[Dict]) -> AsyncIterator[Union[str, int, Dict]]:
         """
-        执行 ReAct 多轮工具调用循环。
+        流式执行 ReAct 多轮工具调用循环。
+
+        每一轮模型输出在出现 Thought 标记前即按回答放行，最后一轮的回答即最终答案；
+        同一轮中的多个工具调用并发执行。结束后 final_answer、trajectory_context、
+        node_executions、total_tokens 保存在实例上。
 
         Args:
-            llm_caller: 异步函数，签名 async (messages: list) -> str，调用底层 LLM
+            llm_streamer: 异步生成器函数，签名 async (messages: list) -> AsyncIterator[str | int | dict]，
+                产出文本片段，可选地以 int 产出本轮 total_tokens、以 dict 产出 reasoning 事件（原样转发）
             message: 用户当前消息，字符串或多模态 content 列表
             history: 历史对话列表
-
-        Returns:
-            (final_answer, trajectory_context, node_executions):
-            - final_answer: 模型最终自然语言回答
-            - trajectory_context: 完整工具调用轨迹，用于注入 system_prompt
-            - node_executions: 工具调用步骤记录列表（用于 agent_executions）
         """
-        import time
-        import uuid as _uuid
-
         # 构建初始消息列表（历史 + 当前用户消息，支持多模态 content）
         messages = list(history) + [{"role": "user", "content": message}]
+        valid_tools = set(self.tools.keys())
 
         trajectory: List[str] = []  # 记录每轮 thought/action/observation
-        node_executions: List[Dict] = []  # 工具调用步骤记录
-        final_answer = ""
+        self.node_executions = []
+        self.total_tokens = 0
+        final_answer = None
         response = ""
 
         for round_idx in range(self.max_rounds):
-            response = await llm_caller(messages)
-
-            parsed = _parse_action(response, valid_tools=set(self.tools.keys()))
-
-            if parsed is None:
-                # 去除可能残留的 Thought/Action/Input 块，保留其后的自然语言
-                clean = re.sub(
-                    r"Thought[：:][\s\S]*?Input[：:]\s*\{[^{}]*}\s*",
-                    "",
-                    response,
-                ).strip()
-                final_answer = clean or response.strip()
+            gate = _AnswerGate()
+            async for piece in llm_streamer(messages):
+                if isinstance(piece, int):
+                    self.total_tokens += piece
+                    continue
+                if isinstance(piece, dict):
+                    yield piece
+                    continue
+                out = gate.feed(piece)
+                if out:
+                    yield out
+            out = gate.flush()
+            if out:
+                yield out
+            response = gate.text
+
+            actions = _parse_actions(response, valid_tools) if gate.action_at is not None else []
+            if not actions:
+                answer = response[:gate.emitted]
+                if gate.action_at is not None:
+                    # 只有无效的工具调用块，补发其后的自然语言
+                    rest = _strip_action_blocks(response[gate.emitted:])
+                    if not rest and not answer.strip():
+                        rest = response.strip()
+                    if rest:
+                        yield rest
+                    answer += rest
+                final_answer = answer.strip()
                 logger.info(f"ReAct 第 {round_idx + 1} 轮：模型给出最终答案")
                 break
 
-            thought, action, input_dict = parsed
-            logger.info(f"ReAct 第 {round_idx + 1} 轮：调用工具 '{action}'，参数={input_dict}")
-
-            # 记录工具调用开始
-            step_start = time.time()
-            step_id = str(_uuid.uuid4())
-
-            # 执行工具
-            tool_result = await self._call_tool(action, input_dict)
-
-            success: bool = bool(tool_result.get("success", True))
-            output: str = str(tool_result.get("output") or "")
-            error: Optional[str] = tool_result.get("error")
-
-            observation = f"[错误: {error}]" if error else output
-
-            # 构建步骤记录
-            tool = self.tools.get(action)
-            tool_meta = getattr(tool, "_tool_meta", None) if tool else None
-            elapsed_ms = round((time.time() - step_start) * 1000, 2)
-
-            node = {
-                "step_id": step_id,
-                "node_type": "tool",
-                "node_name": action,
-                "status": "completed" if success else "failed",
-                "input": json.dumps(input_dict, ensure_ascii=False)[:2000],
-                "output": output[:2000],
-                "elapsed_time": elapsed_ms,
-                "error": error,
-                "meta": tool_meta if tool_meta else None,
-            }
-            # 提取知识库来源
-            if tool and hasattr(tool, "_last_sources") and tool._last_sources:
-                if not node["meta"]:
-                    node["meta"] = {}
-                node["meta"]["sources"] = tool._last_sources
-                tool._last_sources = []
-            node_executions.append(node)
-
-            # 记录本轮轨迹
-            trajectory.append(
-                f"Thought：{thought}\n"
-                f"Action：{action}\n"
-                f"Input：{json.dumps(input_dict, ensure_ascii=False)}\n"
-                f"Observation：{observation}"
-            )
+            logger.info(f"ReAct 第 {round_idx + 1} 轮：调用工具 {[a for _, a, _ in actions]}")
+            step_ids = [str(uuid.uuid4()) for _ in actions]
+            for step_id, (_, action, input_dict) in zip(step_ids, actions):
+                tool = self.tools.get(action)
+                yield {
+                    "type": "tool_start", "step_id": step_id, "name": action,
+                    "input": json.dumps(input_dict, ensure_ascii=False)[:2000],
+                    "meta": getattr(tool, "_tool_meta", None) or None,
+                }
+
+            # 同一轮的工具调用相互独立，并发执行
+            results = await asyncio.gather(*[
+                self._execute_action(step_id, action, input_dict)
+                for step_id, (_, action, input_dict) in zip(step_ids, actions)
+            ])
+
+            observations = []
+            for (thought, action, input_dict), (node, observation) in zip(actions, results):
+                self.node_executions.append(node)
+                if node["error"]:
+                    yield {"type": "tool_error", "step_id": node["step_id"], "name": action, "error": node["error"]}
+                else:
+                    yield {"type": "tool_end", "step_id": node["step_id"], "name": action,
+                           "output": node["output"], "meta": node["meta"]}
+                # 记录本轮轨迹
+                trajectory.append(
+                    f"Thought：{thought}\n"
+                    f"Action：{action}\n"
+                    f"Input：{json.dumps(input_dict, ensure_ascii=False)}\n"
+                    f"Observation：{observation}"
+                )
+                label = f"（{action}）" if len(actions) > 1 else ""
+                observations.append(f"Observation{label}：{observation}")
 
             # 将本轮 ReAct 轨迹合并为一条 assistant 消息，供下一轮推理
-            messages.append({"role": "assistant", "content": f"{response}\nObservation：{observation}"})
+            messages.append({"role": "assistant", "content": response.strip() + "\n" + "\n".join(observations)})
 
-        else:
+        if final_answer is None:
             # 达到最大轮数，强制用最后一次模型输出作为答案
             logger.warning(f"ReAct 达到最大轮数 {self.max_rounds}，强制终止")
-            final_answer = response.strip() if response else "已达到最大思考轮次，无法继续"
+            final_answer = _strip_action_blocks(response) or "已达到最大思考轮次，无法继续"
+            yield final_answer
+
+        self.final_answer = final_answer
+        self.trajectory_context = self.build_trajectory_context(trajectory)
+        yield {"type": "node_executions", "data": self.node_executions}
+        if self.total_tokens:
+            yield self.total_tokens
+
+    async def run(self, llm_caller, message: str | list, history: List[Dict]) -> Tuple[str, str, List[Dict]]:
+        """
+        执行 ReAct 多轮工具调用循环（非流式）。
+
+        Args:
+            llm_caller: 异步函数，签名 async (messages: list) -> str，调用底层 LLM
+            message: 用户当前消息，字符串或多模态 content 列表
+            history: 历史对话列表
+
+        Returns:
+            (final_answer, trajectory_context, node_executions):
+            - final_answer: 模型最终自然语言回答
+            - trajectory_context: 完整工具调用轨迹，用于注入 system_prompt
+            - node_executions: 工具调用步骤记录列表（用于 agent_executions）
+        """
+        async def _as_stream(msgs):
+            yield await llm_caller(msgs)
 
-        trajectory_context = self.build_trajectory_context(trajectory)
-        return final_answer, trajectory_context, node_executions
+        async for _ in self.stream(_as_stream, message, history):
+            pass
+        return self.final_answer, self.trajectory_context, self.node_executions
 
     @staticmethod
     def build_trajectory_context(trajectory: List[str]) -> str:
@@ -11,7 +11,7 @@ from sqlalchemy.orm import Session
 from app.core.utils.datetime_utils import to_timestamp_ms, utcnow_naive
 from app.core.error_codes import BizCode
 from app.core.exceptions import BusinessException
-from app.core.tools.mcp import MCPToolManager, SimpleMCPClient
+from app.core.tools.mcp import MCPToolManager, get_mcp_session_pool
 from app.repositories.tool_repository import (
     ToolRepository, BuiltinToolRepository, CustomToolRepository,
     MCPToolRepository, WorkflowToolRepository, ToolExecutionRepository
@@ -1483,7 +1483,9 @@ class ToolService:
             test_result = await self.mcp_tool_manager.test_tool_connection(server_url, connection_config)
             if not test_result["success"]:
                 return test_result
-            success_flag, tools, error = await self.mcp_tool_manager.discover_tools(server_url, connection_config)
+            success_flag, tools, error = await self.mcp_tool_manager.discover_tools(
+                server_url, connection_config, force_refresh=True
+            )
             if not success_flag:
                 return {"success": False, "message": f"获取工具列表失败: {error}"}
             tool_list = [
@@ -1509,7 +1511,7 @@ class ToolService:
             if test_result["success"]:
                 # 连接成功，自动同步工具列表
                 success, tools, error = await self.mcp_tool_manager.discover_tools(
-                    mcp_config.server_url, mcp_config.connection_config or {}
+                    mcp_config.server_url, mcp_config.connection_config or {}, force_refresh=True
                 )
 
                 if success:
@@ -1611,44 +1613,42 @@ class ToolService:
             if not mcp_config:
                 return {"success": False, "message": "MCP配置不存在"}
             
-            # 创建MCP客户端
+            # 通过会话池强制刷新工具列表（同时更新池中的工具缓存）
             connection_config = mcp_config.connection_config or {}
-            client = SimpleMCPClient(mcp_config.server_url, connection_config)
-
-            async with client:
-                # 获取工具列表
-                tools = await client.list_tools()
-
-                # 转换为新格式
-                tool_list = []
-                tool_names = []
-                for tool in tools:
-                    if tool.get("name"):
-                        tool_names.append(tool["name"])
-                        tool_list.append({
-                            tool["name"]: {
-                                "description": tool.get("description", ""),
-                                "inputSchema": tool.get("inputSchema", {})
-                            }
-                        })
+            tools = await get_mcp_session_pool().list_tools(
+                mcp_config.server_url, connection_config, force_refresh=True
+            )
 
-                # 更新数据库
-                mcp_config.available_tools = tool_list
-                mcp_config.last_health_check = utcnow_naive()
-                mcp_config.health_status = "healthy"
-                mcp_config.error_message = None
+            # 转换为新格式
+            tool_list = []
+            tool_names = []
+            for tool in tools:
+                if tool.get("name"):
+                    tool_names.append(tool["name"])
+                    tool_list.append({
+                        tool["name"]: {
+                            "description": tool.get("description", ""),
+                            "inputSchema": tool.get("inputSchema", {})
+                        }
+                    })
 
-                # 更新工具状态
-                config.status = ToolStatus.AVAILABLE.value
+            # 更新数据库
+            mcp_config.available_tools = tool_list
+            mcp_config.last_health_check = utcnow_naive()
+            mcp_config.health_status = "healthy"
+            mcp_config.error_message = None
 
-                self.db.commit()
+            # 更新工具状态
+            config.status = ToolStatus.AVAILABLE.value
 
-                return {
-                    "success": True,
-                    "message": "工具列表同步成功",
-                    "tools_count": len(tool_names),
-                    "tools": tool_names
-                }
+            self.db.commit()
+
+            return {
+                "success": True,
+                "message": "工具列表同步成功",
+                "tools_count": len(tool_names),
+                "tools": tool_names
+            }
 
         except Exception as e:
             # 更新错误状态
@@ -21,6 +21,11 @@ from app.core.utils.datetime_utils import (
     utcnow_naive,
 )
 from app.core.workflow.node_cache import normalize_cache_value, WorkflowNodeCacheManager
+from app.core.workflow.node_record_writer import (
+    get_workflow_node_record_writer,
+    is_newer_record,
+    resolve_payload_refs,
+)
 from app.core.workflow.triggers import (
     build_schedule_now_payload,
     get_trigger_type,
@@ -1375,7 +1380,7 @@ class WorkflowService:
         }
 
     def _build_execution_snapshot_from_record(self, execution: WorkflowExecution) -> dict[str, Any]:
-        node_executions = self.node_execution_repo.get_by_execution_id(execution.id)
+        node_executions = self._get_node_executions(execution)
         output_data = self._serialize_execution_value(execution.output_data or {})
         return self._build_execution_snapshot(
             execution=execution,
@@ -1383,8 +1388,13 @@ class WorkflowService:
             output_data=output_data if isinstance(output_data, dict) else {},
         )
 
-    def _build_public_execution_snapshot_from_record(self, execution: WorkflowExecution) -> dict[str, Any]:
-        node_executions = self.node_execution_repo.get_by_execution_id(execution.id)
+    def _build_public_execution_snapshot_from_record(
+            self,
+            execution: WorkflowExecution,
+            node_executions: list[WorkflowNodeExecution] | None = None,
+    ) -> dict[str, Any]:
+        if node_executions is None:
+            node_executions = self._get_node_executions(execution)
         output_data = self._serialize_execution_value(execution.output_data or {})
         return self._build_public_execution_snapshot_record(
             execution=execution,
@@ -1687,9 +1697,13 @@ class WorkflowService:
             source=source,
         )
 
-    def _refresh_workflow_debug_state_from_execution(self, execution: WorkflowExecution) -> None:
+    def _refresh_workflow_debug_state_from_execution(
+            self,
+            execution: WorkflowExecution,
+            node_executions: list[WorkflowNodeExecution] | None = None,
+    ) -> None:
         workflow_config = execution.workflow_config or self.db.get(WorkflowConfig, execution.workflow_config_id)
-        snapshot = self._build_public_execution_snapshot_from_record(execution)
+        snapshot = self._build_public_execution_snapshot_from_record(execution, node_executions)
         self._write_workflow_debug_state(
             app_id=execution.app_id,
             workflow_config=workflow_config,
@@ -2179,12 +2193,16 @@ class WorkflowService:
             execution: WorkflowExecution,
             workflow_config: WorkflowConfig,
             result: dict[str, Any],
-    ) -> None:
+    ) -> list[WorkflowNodeExecution] | None:
+        """保存整图运行的节点记录
+
+        优先通过 write-behind 写入器提交（请求路径只写 Redis，由 Celery 任务批量落库），
+        写入器不可用时同步落库。返回本次的节点记录，供调用方在落库前直接使用。
+        """
         node_outputs = result.get("node_outputs") or {}
         if not isinstance(node_outputs, dict) or not node_outputs:
-            return
+            return None
 
-        self.node_execution_repo.delete_by_execution_id(execution.id)
         items: list[dict[str, Any]] = []
         ordered_node_outputs = sorted(node_outputs.items(), key=self._node_output_sort_key)
         for index, (node_id, node_data) in enumerate(ordered_node_outputs, start=1):
@@ -2200,8 +2218,30 @@ class WorkflowService:
                     fallback_node_name=self._get_node_name_from_config(workflow_config, node_id),
                 )
             )
-        self.node_execution_repo.bulk_create(items)
+
+        writer = get_workflow_node_record_writer()
+        if writer is not None:
+            try:
+                return writer.submit(execution.id, execution.app_id, items)
+            except Exception as e:
+                logger.warning(f"节点记录提交写入队列失败，改为同步落库: execution_id={execution.execution_id}, error={e}")
+
+        self.node_execution_repo.delete_by_execution_id(execution.id)
+        node_executions = self.node_execution_repo.bulk_create(items)
         self.db.commit()
+        return node_executions
+
+    def _get_node_executions(self, execution: WorkflowExecution) -> list[WorkflowNodeExecution]:
+        """执行的节点记录：尚未落库时读取 write-behind 队列中的版本，已落库时还原卸载的载荷"""
+        writer = get_workflow_node_record_writer()
+        if writer is not None:
+            try:
+                pending = writer.get_pending(execution.id)
+                if pending is not None:
+                    return pending
+            except Exception as e:
+                logger.warning(f"读取待落库节点记录失败: execution_id={execution.execution_id}, error={e}")
+        return resolve_payload_refs(self.node_execution_repo.get_by_execution_id(execution.id))
 
     @staticmethod
     def _build_single_node_run_id() -> str:
@@ -2438,8 +2478,17 @@ class WorkflowService:
     ) -> dict[str, Any] | None:
         config = self.get_workflow_config(app_id)
         node_execution = self.node_execution_repo.get_latest_by_app_node(app_id, node_id, source=source)
+        writer = get_workflow_node_record_writer()
+        if writer is not None:
+            try:
+                pending = writer.get_latest_pending(app_id, node_id, source=source)
+                if pending is not None and is_newer_record(pending, node_execution):
+                    node_execution = pending
+            except Exception as e:
+                logger.warning(f"读取待落库节点记录失败: app_id={app_id}, node_id={node_id}, error={e}")
         if not node_execution:
             return None
+        resolve_payload_refs([node_execution])
 
         secret_values = self._extract_secret_values_from_environment_variables(
             config.environment_variables if config else []
@@ -2818,7 +2867,7 @@ class WorkflowService:
         if app_id and execution.app_id != app_id:
             return None
 
-        node_executions = self.node_execution_repo.get_by_execution_id(execution.id)
+        node_executions = self._get_node_executions(execution)
         input_data = self._serialize_execution_value(execution.input_data or {})
         output_data = self._serialize_execution_value(execution.output_data or {})
         meta_data = self._serialize_execution_value(execution.meta_data or {})
@@ -3996,8 +4045,8 @@ class WorkflowService:
                     token_usage=token_usage.get("total_tokens", None)
                 )
                 execution = self.get_execution(execution.execution_id)
-                self._persist_workflow_node_executions(execution, config, result)
-                self._refresh_workflow_debug_state_from_execution(execution)
+                node_executions = self._persist_workflow_node_executions(execution, config, result)
+                self._refresh_workflow_debug_state_from_execution(execution, node_executions)
 
                 logger.info(f"Workflow Run Success, "
                             f"execution_id: {execution.execution_id}, message count: {len(final_messages)}")
@@ -4008,8 +4057,8 @@ class WorkflowService:
                     error_message=result.get("error")
                 )
                 execution = self.get_execution(execution.execution_id)
-                self._persist_workflow_node_executions(execution, config, result)
-                self._refresh_workflow_debug_state_from_execution(execution)
+                node_executions = self._persist_workflow_node_executions(execution, config, result)
+                self._refresh_workflow_debug_state_from_execution(execution, node_executions)
                 logger.error(f"Workflow Run Failed, execution_id: {execution.execution_id},"
                              f" error: {result.get('error')}")
                 final_messages = result.get("messages", [])[init_message_length:]
@@ -4790,8 +4839,10 @@ class WorkflowService:
                         execution.output_data = new_output_data
                         self.db.commit()
                     if status in {"completed", "failed"} and execution.output_data:
-                        self._persist_workflow_node_executions(execution, config, execution.output_data)
-                        self._refresh_workflow_debug_state_from_execution(execution)
+                        node_executions = self._persist_workflow_node_executions(
+                            execution, config, execution.output_data
+                        )
+                        self._refresh_workflow_debug_state_from_execution(execution, node_executions)
                 elif event.get("event") == "workflow_start":
                     event["data"]["message_id"] = str(message_id)
                 # 记录活跃 LLM 节点：node_start 加入，node_end 移除，合成时只为活跃节点补发
@@ -0,0 +1,272 @@
+import argparse
+import json
+import queue
+import statistics
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+
+import redis
+
+from app.celery_task_scheduler import LUA_ATOMIC_LOCK, LUA_SAFE_DELETE, TASK_TIMEOUT, RedisTaskScheduler
+from app.core.config import settings
+
+# RedisTaskScheduler 在大量待完成任务下的单轮耗时与交接延迟（上一个任务完成到同一用户下一个任务派发）。
+# 对比改造前（每轮 HSCAN 全部待完成任务并轮询结果、逐用户多次往返派发）与完成事件驱动、流水线派发。
+# 不连接 broker，派发与 worker 执行在进程内模拟；使用独立的 Redis 库并在结束时清理，例如
+#   python -m app.t_task_scheduler_bench --pending 10000 --ready 500 --redis-db 15
+
+TASK = "app.tasks.bench_task"
+
+
+class BenchScheduler(RedisTaskScheduler):
+    """不连接 broker：派发的任务交给模拟 worker"""
+
+    def __init__(self, client, prefix):
+        super().__init__()
+        self.redis = client
+        self.USER_QUEUE_PREFIX = f"{prefix}:uq:"
+        self.ACTIVE_USERS = f"{prefix}:active_users"
+        self.READY_SET = f"{prefix}:ready_users"
+        self.PENDING_HASH = f"{prefix}:pending_tasks"
+        self.REGISTRY_KEY = f"{prefix}:instances"
+        self.COMPLETION_STREAM = f"{prefix}:completions"
+        self.worker_queue = queue.Queue()
+        self.dispatched_at = {}
+
+    def _send_tasks(self, batch):
+        results = []
+        for item in batch:
+            task = SimpleNamespace(id=item[3])
+            self.dispatched_at.setdefault(item[0], []).append(time.perf_counter())
+            self.worker_queue.put((item[0], task.id))
+            results.append((item, task))
+        return results
+
+
+class LegacyScheduler(BenchScheduler):
+    """改造前的调度轮次：每轮全量清理，逐用户加锁、派发、出队"""
+
+    sleep = staticmethod(time.sleep)
+
+    def _cleanup_finished(self):
+        cursor = 0
+        all_pending = {}
+        while True:
+            cursor, batch = self.redis.hscan(self.PENDING_HASH, cursor=cursor, count=100)
+            all_pending.update(batch)
+            if cursor == 0:
+                break
+        if not all_pending:
+            return
+        now = time.time()
+        task_ids = list(all_pending.keys())
+        pipe = self.redis.pipeline()
+        for task_id in task_ids:
+            pipe.get(f"celery-task-meta-{task_id}")
+        results = pipe.execute()
+        cleanup_pipe = self.redis.pipeline()
+        has_cleanup = False
+        ready_user_ids = set()
+        for task_id, raw_result in zip(task_ids, results):
+            meta = json.loads(all_pending[task_id])
+            result_data = json.loads(raw_result) if raw_result is not None else {}
+            finished = result_data.get("status") in ("SUCCESS", "FAILURE", "REVOKED")
+            if finished or (raw_result is None and now - meta.get("dispatched_at", 0) > TASK_TIMEOUT):
+                self.redis.eval(LUA_SAFE_DELETE, 1, meta["lock_key"], task_id)
+                cleanup_pipe.hdel(self.PENDING_HASH, task_id)
+                cleanup_pipe.set(f"task_tracker:{meta['msg_id']}", json.dumps({
+                    "status": result_data.get("status", "EXPIRED"), "task_id": task_id,
+                    "result": result_data.get("result") or {},
+                }), ex=86400)
+                has_cleanup = True
+                ready_user_ids.add(meta["lock_key"].split(":", 1)[1])
+        if has_cleanup:
+            cleanup_pipe.execute()
+        if ready_user_ids:
+            self.redis.sadd(self.READY_SET, *ready_user_ids)
+
+    def _dispatch(self, uid, raw_head, msg):
+        lock_key = f"{msg['task_name']}:{uid}"
+        dispatch_lock = f"dispatch:{msg['msg_id']}"
+        result = self.redis.eval(LUA_ATOMIC_LOCK, 2, dispatch_lock, lock_key, self.instance_id, "300", "3600")
+        if result != 1:
+            return False
+        [(_, task)] = self._send_tasks([(uid, raw_head, msg, f"bench-{uuid.uuid4()}")])
+        pipe = self.redis.pipeline()
+        pipe.set(lock_key, task.id, ex=3600)
+        pipe.hset(self.PENDING_HASH, task.id, json.dumps({
+            "lock_key": lock_key, "dispatched_at": time.time(), "msg_id": msg["msg_id"],
+        }))
+        pipe.delete(dispatch_lock)
+        pipe.set(f"task_tracker:{msg['msg_id']}", json.dumps({"status": "DISPATCHED", "task_id": task.id}), ex=86400)
+        pipe.execute()
+        return True
+
+    def _process_batch(self, user_ids):
+        pipe = self.redis.pipeline()
+        for uid in user_ids:
+            pipe.lindex(f"{self.USER_QUEUE_PREFIX}{uid}", 0)
+        for uid, head in zip(user_ids, pipe.execute()):
+            if head is None:
+                self.redis.srem(self.ACTIVE_USERS, uid)
+                continue
+            queue_key = f"{self.USER_QUEUE_PREFIX}{uid}"
+            if self._dispatch(uid, head, json.loads(head)):
+                self.redis.lpop(queue_key)
+                if self.redis.llen(queue_key) > 0:
+                    self.redis.sadd(self.READY_SET, uid)
+
+    def schedule_loop(self):
+        self._heartbeat()
+        self._cleanup_finished()
+        my_users = self._take_ready_users()
+        if not my_users:
+            self.sleep(0.5)
+            return
+        self._process_batch(my_users)
+        self.sleep(0.1)
+
+
+def cleanup(client, scheduler):
+    keys = list(client.scan_iter(f"{scheduler.PENDING_HASH.rsplit(':', 1)[0]}:*"))
+    keys += list(client.scan_iter(f"{TASK}:*"))
+    keys += [f"celery-task-meta-{tid}" for tid in client.hkeys(scheduler.PENDING_HASH)]
+    for i in range(0, len(keys), 1000):
+        client.delete(*keys[i:i + 1000])
+    tracker_keys = list(client.scan_iter("task_tracker:*"))
+    pipe = client.pipeline()
+    for key in tracker_keys:
+        pipe.get(key)
+    stale = [key for key, raw in zip(tracker_keys, pipe.execute()) if raw and "bench-" in raw]
+    for i in range(0, len(stale), 1000):
+        client.delete(*stale[i:i + 1000])
+
+
+def seed_running(scheduler, count, queued_per_user=0, prefix="bench-user"):
+    """count 个用户各有一个执行中的任务，另排队 queued_per_user 个；返回 {user_id: 执行中的 task_id}"""
+    users = {f"{prefix}-{uuid.uuid4().hex}": f"bench-{uuid.uuid4()}" for _ in range(count)}
+    now = time.time()
+    pipe = scheduler.redis.pipeline(transaction=False)
+    for i, (uid, task_id) in enumerate(users.items()):
+        lock_key = f"{TASK}:{uid}"
+        pipe.set(lock_key, task_id, ex=3600)
+        pipe.hset(scheduler.PENDING_HASH, task_id, json.dumps({
+            "lock_key": lock_key, "dispatched_at": now, "msg_id": str(uuid.uuid4()),
+        }))
+        for _ in range(queued_per_user):
+            pipe.rpush(f"{scheduler.USER_QUEUE_PREFIX}{uid}", json.dumps({
+                "msg_id": str(uuid.uuid4()), "task_name": TASK, "user_id": uid, "params": "{}",
+            }))
+        if queued_per_user:
+            pipe.sadd(scheduler.ACTIVE_USERS, uid)
+        if i % 1000 == 999:
+            pipe.execute()
+    pipe.execute()
+    return users
+
+
+def finish(scheduler, task_id):
+    """模拟 worker 完成任务：写入结果并发出完成事件（改造前的调度器只读结果）"""
+    scheduler.redis.set(f"celery-task-meta-{task_id}", json.dumps({"status": "SUCCESS", "result": None}), ex=600)
+    scheduler.signal_completion(task_id, "SUCCESS")
+
+
+def bench_tick(cls, client, args):
+    """--pending 个执行中的任务，每轮其中 --ready 个完成、对应用户各有一个排队任务待派发"""
+    scheduler = cls(client, f"bench:{uuid.uuid4().hex}")
+    scheduler.sleep = lambda seconds: None  # 只计调度本身的耗时
+    try:
+        scheduler._consume_completions()  # 创建消费组
+        running = seed_running(scheduler, args.pending, queued_per_user=args.rounds)
+        user_ids = list(running)
+        durations = []
+        for r in range(args.rounds):
+            for uid in user_ids[r * args.ready:(r + 1) * args.ready]:
+                finish(scheduler, running[uid])
+            before = sum(len(v) for v in scheduler.dispatched_at.values())
+            scheduler._last_heartbeat = time.time()
+            start = time.perf_counter()
+            scheduler.schedule_loop()
+            durations.append(time.perf_counter() - start)
+            dispatched = sum(len(v) for v in scheduler.dispatched_at.values()) - before
+            assert dispatched == args.ready, f"dispatched {dispatched}, expected {args.ready}"
+        return durations
+    finally:
+        cleanup(client, scheduler)
+
+
+def bench_handoff(cls, client, args):
+    """--pending 个长时间执行的任务作为背景，--chains 个用户各有 --chain-length 个任务依次执行"""
+    scheduler = cls(client, f"bench:{uuid.uuid4().hex}")
+    finished_at = {}
+    try:
+        scheduler._consume_completions()
+        seed_running(scheduler, args.pending)
+        chains = [f"bench-user-chain-{uuid.uuid4().hex}" for _ in range(args.chains)]
+        for uid in chains:
+            for _ in range(args.chain_length):
+                scheduler.push_task(TASK, uid, {})
+        total = args.chains * args.chain_length
+
+        def worker():
+            done = 0
+            while done < total:
+                uid, task_id = scheduler.worker_queue.get()
+                time.sleep(args.task_time)
+                finished_at.setdefault(uid, []).append(time.perf_counter())
+                finish(scheduler, task_id)
+                done += 1
+
+        workers = [threading.Thread(target=worker, daemon=True)]
+        workers[0].start()
+        deadline = time.time() + args.timeout
+        while any(t.is_alive() for t in workers) and time.time() < deadline:
+            scheduler._last_heartbeat = time.time()
+            scheduler.schedule_loop()
+        handoffs = []
+        for uid in chains:
+            handoffs += [d - f for f, d in zip(finished_at.get(uid, []), scheduler.dispatched_at.get(uid, [])[1:])]
+        return handoffs
+    finally:
+        cleanup(client, scheduler)
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else float("nan")
+
+
+def main(args):
+    client = redis.Redis(
+        host=args.redis_host, port=args.redis_port, db=args.redis_db,
+        password=settings.REDIS_PASSWORD or None, decode_responses=True,
+    )
+    client.ping()
+    for name, cls in [("before (poll + per-user dispatch)", LegacyScheduler),
+                      ("completion events + pipelined dispatch", BenchScheduler)]:
+        ticks = bench_tick(cls, client, args)
+        handoffs = bench_handoff(cls, client, args)
+        print(f"{name}:")
+        print("  tick with {} pending, {} finished/dispatched: mean {:.1f} ms, max {:.1f} ms".format(
+            args.pending, args.ready, statistics.mean(ticks) * 1000, max(ticks) * 1000))
+        print("  handoff latency over {} handoffs: p50 {:.1f} ms, p99 {:.1f} ms, max {:.1f} ms".format(
+            len(handoffs), percentile(handoffs, 0.5) * 1000, percentile(handoffs, 0.99) * 1000,
+            max(handoffs, default=float("nan")) * 1000))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--pending', type=int, default=10000, help="Dispatched tasks still running")
+    parser.add_argument('--ready', type=int, default=500, help="Tasks finishing (and users to dispatch) per tick")
+    parser.add_argument('--rounds', type=int, default=5, help="Ticks measured")
+    parser.add_argument('--chains', type=int, default=20, help="Users with a chain of queued tasks")
+    parser.add_argument('--chain-length', type=int, default=10, help="Queued tasks per chain user")
+    parser.add_argument('--task-time', type=float, default=0.01, help="Simulated task run time (seconds)")
+    parser.add_argument('--timeout', type=float, default=120, help="Upper bound for the handoff run (seconds)")
+    parser.add_argument('--redis-host', type=str, default=settings.REDIS_HOST)
+    parser.add_argument('--redis-port', type=int, default=settings.REDIS_PORT)
+    parser.add_argument('--redis-db', type=int, default=15, help="Scratch database used by the benchmark")
+    args = parser.parse_args()
+    main(args)
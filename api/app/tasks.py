@@ -55,6 +55,13 @@ from app.services.memory_forget_service import MemoryForgetService
 from app.utils.config_utils import resolve_config_id
 from app.utils.redis_lock import RedisFairLock
 from app.core.memory.utils.memory_count_utils import sync_end_user_memory_count_from_neo4j
+from app.core.memory.utils.maintenance_scheduler import (
+    JOB_FORGETTING,
+    JOB_IMPLICIT_EMOTIONS,
+    JOB_INSIGHT_SUMMARY,
+    JOB_REFLECTION,
+    get_maintenance_scheduler,
+)
 
 logger = get_logger(__name__)
 
@@ -1774,21 +1781,32 @@ def write_message_task(
         """
         # 候选池消费模式（Agent 对话 / 工作流 MemoryWriteNode 路径）
         if (not message) and conversation_id:
-            from app.core.memory.sliding_window.window_utils import execute_pending_from_pool
+            from app.core.memory.sliding_window.write_queue import (
+                JOB_POOL,
+                MemoryWriteJob,
+                get_memory_write_queue,
+            )
 
             logger.info(
                 f"[CELERY WRITE] 候选池消费模式: "
                 f"conv={conversation_id}, end_user_id={end_user_id}, "
                 f"workspace_id={workspace_id}"
             )
-            processed = await execute_pending_from_pool(
-                conversation_id=conversation_id,
-                end_user_id=end_user_id,
-                config_id=str(actual_config_id) if actual_config_id else "",
-                workspace_id=workspace_id,
-                language=language,
+            # 入队后由该用户的 drainer 合并执行，同一对话的多次触发只跑一次 Layer 2
+            outcome = await get_memory_write_queue().submit(
+                MemoryWriteJob(
+                    end_user_id=end_user_id,
+                    conversation_id=conversation_id,
+                    kind=JOB_POOL,
+                    config_id=str(actual_config_id) if actual_config_id else "",
+                    workspace_id=workspace_id or "",
+                    language=language,
+                    enforce_window=True,
+                ),
             )
-            return {"status": "success", "processed": processed}
+            if outcome.status == "failed":
+                raise RuntimeError(outcome.error)
+            return {"status": outcome.status, "job_id": outcome.job_id}
 
         # 完整写入模式（API write 路径，带 messages）
         with get_db_context() as db:
@@ -1813,36 +1831,13 @@ def write_message_task(
                     conversation_id=conversation_id,
                 ),
                 db,
+                wait=False,
             )
             logger.info(f"[CELERY WRITE] Write completed successfully: {result}")
             return result
 
     redis_client = get_sync_redis_client()
-    lock = None
     loop = None
-    lock_token = None
-    if redis_client is not None:
-        lock = RedisFairLock(
-            key=f"memory_write:{end_user_id}",
-            redis_client=redis_client,
-            expire=600,
-            timeout=3600,
-            auto_renewal=True,
-        )
-        if not lock.acquire():
-            logger.warning(f"[CELERY WRITE] 获取锁超时，跳过本次写入: end_user_id={end_user_id}")
-            return {
-                "status": "SKIPPED",
-                "error": "acquire lock timeout",
-                "end_user_id": end_user_id,
-                "config_id": str(config_id),
-                "elapsed_time": time.time() - start_time,
-                "task_id": self.request.id,
-            }
-
-        # 标记当前上下文已持有锁，防止下游 MemoryAgentService.write_memory 重复加锁
-        from app.services.memory_agent_service import _set_write_lock_holder
-        lock_token = _set_write_lock_holder(end_user_id)
 
     try:
         task_start_time = int(time.time())
@@ -1867,13 +1862,6 @@ def write_message_task(
         except Exception as _e:
             logger.warning(f"[CELERY WRITE] 写入 last_done 时间戳失败（不影响主流程）: {_e}")
 
-        # 同步 end_user 记忆计数（Neo4j → PostgreSQL）
-        try:
-            from app.core.memory.utils.memory_count_utils import sync_memory_count_neo4j
-            sync_memory_count_neo4j(end_user_id)
-        except Exception as _count_e:
-            logger.warning(f"[CELERY WRITE] 同步记忆计数失败（不影响主流程）: {_count_e}")
-
         # 将 result 转为 JSON 安全结构，避免 Celery JSON 序列化 pydantic BaseModel / UUID 失败
         try:
             safe_result = jsonable_encoder(result)
@@ -1910,17 +1898,6 @@ def write_message_task(
             "task_id": self.request.id
         }
     finally:
-        if lock_token is not None:
-            try:
-                from app.services.memory_agent_service import _reset_write_lock_holder
-                _reset_write_lock_holder(lock_token)
-            except Exception as e:
-                logger.warning(f"[CELERY WRITE] 重置锁标记失败: {e}")
-        if lock is not None:
-            try:
-                lock.release()
-            except Exception as e:
-                logger.warning(f"[CELERY WRITE] 释放锁失败: {e}")
         # Gracefully shutdown the event loop to prevent
         # 'RuntimeError: Event loop is closed' from httpx.AsyncClient.__del__
         if loop:
@@ -2194,6 +2171,7 @@ def layer2_reflection_task(self) -> Dict[str, Any]:
         from app.models.workspace_model import Workspace
         from app.services.memory_reflection_service import WorkspaceAppService
         from app.core.memory.memory_service import MemoryService
+        from app.core.memory.sliding_window.write_queue import get_memory_write_queue
 
         with get_db_context() as db:
             try:
@@ -2208,7 +2186,6 @@ def layer2_reflection_task(self) -> Dict[str, Any]:
                 skipped_inactive = 0
                 total_dedup_merged = 0
                 total_desc_merged = 0
-                redis_client = get_sync_redis_client()
 
                 for workspace in workspaces:
                     service = WorkspaceAppService(db)
@@ -2234,26 +2211,17 @@ def layer2_reflection_task(self) -> Dict[str, Any]:
                                         skipped_inactive += 1
                                         continue
 
-                                    # 获取 Redis 锁，和写入 pipeline 互斥
-                                    write_lock = None
-                                    if redis_client is not None:
-                                        write_lock = RedisFairLock(
-                                            key=f"memory_write:{user['id']}",
-                                            redis_client=redis_client,
-                                            expire=600,
-                                            timeout=30,
-                                            auto_renewal=True,
-                                        )
-                                        if not await asyncio.to_thread(write_lock.acquire):
+                                    # 独占该用户的写入队列，和写入 pipeline 互斥（写入处理中则跳过，不等待）
+                                    async with get_memory_write_queue().exclusive(str(user['id'])) as owned:
+                                        if not owned:
                                             logger.warning(
-                                                f"反思引擎Layer2 获取锁超时，跳过用户 {user['id']}"
+                                                f"反思引擎Layer2 用户写入处理中，跳过用户 {user['id']}"
                                             )
-                                            # 锁超时的用户仍计入处理列表，保证与低频任务的用户口径一致
+                                            # 跳过的用户仍计入处理列表，保证与低频任务的用户口径一致
                                             processed_users += 1
                                             processed_user_ids.append(str(user['id']))
                                             continue
 
-                                    try:
                                         memory_service = MemoryService(
                                             db=db,
                                             config_id=config_id,
@@ -2282,9 +2250,6 @@ def layer2_reflection_task(self) -> Dict[str, Any]:
                                                 f"反思引擎Layer2 用户 {user['id']} 去重合并: "
                                                 f"合并 {dedup_info['merged_count']}"
                                             )
-                                    finally:
-                                        if write_lock is not None:
-                                            await asyncio.to_thread(write_lock.release)
                                 except Exception as e:
                                     logger.error(f"反思引擎Layer2 巡检失败 user={user['id']}: {e}")
                                     # 回滚失败事务，避免污染后续用户的查询
@@ -2390,6 +2355,7 @@ def layer2_dedup_full_scan_task(self) -> Dict[str, Any]:
         from app.models.workspace_model import Workspace
         from app.services.memory_reflection_service import WorkspaceAppService
         from app.core.memory.memory_service import MemoryService
+        from app.core.memory.sliding_window.write_queue import get_memory_write_queue
 
         with get_db_context() as db:
             workspaces = db.query(Workspace).all()
@@ -2401,7 +2367,6 @@ def layer2_dedup_full_scan_task(self) -> Dict[str, Any]:
             skipped_configs = 0
             skipped_inactive = 0
             total_merged = 0
-            redis_client = get_sync_redis_client()
 
             for workspace in workspaces:
                 service = WorkspaceAppService(db)
@@ -2427,26 +2392,17 @@ def layer2_dedup_full_scan_task(self) -> Dict[str, Any]:
                                     skipped_inactive += 1
                                     continue
 
-                                # 获取 Redis 锁，和写入 pipeline 互斥
-                                write_lock = None
-                                if redis_client is not None:
-                                    write_lock = RedisFairLock(
-                                        key=f"memory_write:{user['id']}",
-                                        redis_client=redis_client,
-                                        expire=600,
-                                        timeout=30,
-                                        auto_renewal=True,
-                                    )
-                                    if not await asyncio.to_thread(write_lock.acquire):
+                                # 独占该用户的写入队列，和写入 pipeline 互斥（写入处理中则跳过，不等待）
+                                async with get_memory_write_queue().exclusive(str(user['id'])) as owned:
+                                    if not owned:
                                         logger.warning(
-                                            f"方案B全量扫描 获取锁超时，跳过用户 {user['id']}"
+                                            f"方案B全量扫描 用户写入处理中，跳过用户 {user['id']}"
                                         )
-                                        # 锁超时的用户仍计入处理列表，保证与高频任务的用户口径一致
+                                        # 跳过的用户仍计入处理列表，保证与高频任务的用户口径一致
                                         processed_users += 1
                                         processed_user_ids.append(str(user['id']))
                                         continue
 
-                                try:
                                     memory_service = MemoryService(
                                         db=db,
                                         config_id=config_id,
@@ -2464,9 +2420,6 @@ def layer2_dedup_full_scan_task(self) -> Dict[str, Any]:
                                             f"扫描类型 {r.get('scanned_types', 0)}, "
                                             f"合并 {merged} 对"
                                         )
-                                finally:
-                                    if write_lock is not None:
-                                        await asyncio.to_thread(write_lock.release)
                             except Exception as e:
                                 logger.error(f"方案B全量扫描失败 user={user['id']}: {e}")
                                 # 回滚失败事务，避免污染后续用户的查询
@@ -3094,7 +3047,7 @@ def write_all_workspaces_memory_task(self) -> Dict[str, Any]:
 
 
 @celery_app.task(
-    name="app.tasks.regenerate_memory_cache",
+    name="app.tasks.reconcile_memory_counters_task",
     bind=True,
     ignore_result=True,
     max_retries=0,
@@ -3102,179 +3055,350 @@ def write_all_workspaces_memory_task(self) -> Dict[str, Any]:
     time_limit=3600,
     soft_time_limit=3300,
 )
-def regenerate_memory_cache(self) -> Dict[str, Any]:
-    """定时任务：为所有用户重新生成记忆洞察和用户摘要缓存
+def reconcile_memory_counters_task(self, full: bool = False, batch_size: int = 500) -> Dict[str, Any]:
+    """定时任务：记忆计数器对账
 
-    遍历所有活动工作空间的所有终端用户，为每个用户重新生成记忆洞察和用户摘要。
-    实现错误隔离，单个用户失败不影响其他用户的处理。
-
-    Returns:
-        包含任务执行结果的字典，包括：
-        - status: 任务状态 (SUCCESS/FAILURE)
-        - message: 执行消息
-        - workspace_count: 处理的工作空间数量
-        - total_users: 总用户数
-        - successful: 成功生成的用户数
-        - failed: 失败的用户数
-        - workspace_results: 每个工作空间的详细结果
-        - elapsed_time: 执行耗时（秒）
-        - task_id: 任务ID
+    记忆计数器由写入路径增量维护，对账任务用 Neo4j 聚合结果修正漂移：
+    - full=False：处理待对账集合中的用户（多用户写入、聚类等无法精确计增量的路径）
+    - full=True：按工作空间遍历全部用户，逐一用 Neo4j 聚合结果覆盖
     """
     start_time = time.time()
 
     async def _run() -> Dict[str, Any]:
-        from app.repositories.end_user_repository import EndUserRepository
-        from app.services.user_memory_service import UserMemoryService
+        from app.cache.memory.memory_counters import MemoryCounterCache
+        from app.core.memory.utils.memory_count_utils import (
+            reconcile_memory_counters,
+            reconcile_workspace_memory_counters,
+        )
+        from app.models.workspace_model import Workspace
+        from app.repositories.neo4j.neo4j_connector import Neo4jConnector
 
-        logger.info("开始执行记忆缓存重新生成定时任务")
+        connector = Neo4jConnector()
+        try:
+            if not full:
+                reconciled = 0
+                while True:
+                    end_user_ids = await MemoryCounterCache.pop_dirty(batch_size)
+                    if not end_user_ids:
+                        break
+                    try:
+                        await reconcile_memory_counters(end_user_ids, connector)
+                    except Exception:
+                        # 失败的用户放回待对账集合，下一轮重试
+                        await MemoryCounterCache.mark_dirty(end_user_ids)
+                        raise
+                    reconciled += len(end_user_ids)
+                return {"status": "SUCCESS", "mode": "dirty", "reconciled_users": reconciled}
 
-        service = UserMemoryService()
+            with get_db_context() as db:
+                workspace_ids = [str(ws_id) for (ws_id,) in db.query(Workspace.id).all()]
 
-        total_users = 0
-        successful = 0
-        failed = 0
-        workspace_results = []
+            reconciled = 0
+            failed_workspaces = []
+            for workspace_id in workspace_ids:
+                try:
+                    with get_db_context() as db:
+                        end_user_ids = [
+                            str(uid) for (uid,) in db.query(EndUser.id).filter(
+                                EndUser.workspace_id == workspace_id
+                            ).all()
+                        ]
+                    await reconcile_workspace_memory_counters(
+                        workspace_id, end_user_ids, connector, batch_size=batch_size
+                    )
+                    reconciled += len(end_user_ids)
+                except Exception as e:
+                    # 单个工作空间失败不影响其他工作空间
+                    logger.error(f"记忆计数对账失败: workspace_id={workspace_id}, 错误: {e}")
+                    failed_workspaces.append(workspace_id)
+            return {
+                "status": "SUCCESS",
+                "mode": "full",
+                "workspace_count": len(workspace_ids),
+                "reconciled_users": reconciled,
+                "failed_workspaces": failed_workspaces,
+            }
+        finally:
+            await connector.close()
 
+    try:
+        loop = set_asyncio_event_loop()
+        result = loop.run_until_complete(_run())
+        result["elapsed_time"] = time.time() - start_time
+        result["task_id"] = self.request.id
+        logger.info(f"记忆计数对账完成: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"记忆计数对账任务执行失败: {e}", exc_info=True)
+        return {
+            "status": "FAILURE",
+            "error": str(e),
+            "elapsed_time": time.time() - start_time,
+            "task_id": self.request.id
+        }
+
+
+@celery_app.task(
+    name="app.tasks.rebuild_app_daily_stats_task",
+    bind=True,
+    ignore_result=True,
+    max_retries=0,
+    acks_late=False,
+    time_limit=3600,
+    soft_time_limit=3300,
+)
+def rebuild_app_daily_stats_task(self, days: Optional[int] = None, chunk_days: int = 31) -> Dict[str, Any]:
+    """定时任务：按原始表重建应用统计日汇总
+
+    汇总表由写入路径增量维护，重建用于修正批量 SQL 删除等造成的漂移：
+    - days=N：重建截至昨天的最近 N 天
+    - days=None：从最早的原始记录开始回填全部历史（首次上线时手动执行）
+    当天的数据仍在写入，不参与重建。按 chunk_days 分段提交，避免长事务。
+    """
+    from sqlalchemy import func
+
+    from app.models.api_key_model import ApiKeyLog
+    from app.models.conversation_model import Conversation, Message
+    from app.repositories.app_daily_stats_repository import AppDailyStatsRepository
+
+    start_time = time.time()
+    end_date = datetime.now(timezone.utc).date() - timedelta(days=1)
+    try:
         with get_db_context() as db:
-            try:
-                # 获取所有活动工作空间
-                repo = EndUserRepository(db)
-                workspaces = repo.get_all_active_workspaces()
-                logger.info(f"找到 {len(workspaces)} 个活动工作空间")
+            if days is not None:
+                start_date = end_date - timedelta(days=days - 1)
+            else:
+                earliest = [
+                    db.query(func.min(model.created_at)).scalar()
+                    for model in (Conversation, Message, EndUser, ApiKeyLog)
+                ]
+                earliest = [value for value in earliest if value is not None]
+                start_date = min(earliest).date() if earliest else end_date
+
+            repo = AppDailyStatsRepository(db)
+            rebuilt_rows = 0
+            chunk_start = start_date
+            while chunk_start <= end_date:
+                chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end_date)
+                rebuilt_rows += repo.rebuild(chunk_start, chunk_end)
+                chunk_start = chunk_end + timedelta(days=1)
+
+        result = {
+            "status": "SUCCESS",
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "rebuilt_rows": rebuilt_rows,
+            "elapsed_time": time.time() - start_time,
+            "task_id": self.request.id,
+        }
+        logger.info(f"应用统计汇总重建完成: {result}")
+        return result
+    except Exception as e:
+        logger.error(f"应用统计汇总重建失败: {e}", exc_info=True)
+        return {
+            "status": "FAILURE",
+            "error": str(e),
+            "elapsed_time": time.time() - start_time,
+            "task_id": self.request.id
+        }
 
-                # 遍历每个工作空间
-                for workspace_id in workspaces:
-                    logger.info(f"开始处理工作空间: {workspace_id}")
-                    workspace_start_time = time.time()
 
-                    try:
-                        # 获取工作空间的所有终端用户
-                        end_users = repo.get_all_by_workspace(workspace_id)
-                        workspace_user_count = len(end_users)
-                        total_users += workspace_user_count
+# =============================================================================
+# 记忆维护任务：只处理有变更的用户，按分片并行执行
+# =============================================================================
 
-                        logger.info(f"工作空间 {workspace_id} 有 {workspace_user_count} 个终端用户")
+async def _maintain_insight_summary(end_user_id: str) -> bool:
+    """重新生成单个用户的记忆洞察和用户摘要缓存"""
+    from app.services.user_memory_service import UserMemoryService
 
-                        workspace_successful = 0
-                        workspace_failed = 0
-                        workspace_errors = []
+    service = UserMemoryService()
+    with get_db_context() as db:
+        insight_result = await service.generate_and_cache_insight(db, end_user_id)
+        summary_result = await service.generate_and_cache_summary(db, end_user_id)
+    if insight_result["success"] and summary_result["success"]:
+        return True
+    logger.warning(
+        f"终端用户 {end_user_id} 的缓存重新生成部分失败: "
+        f"insight_error={insight_result.get('error')}, summary_error={summary_result.get('error')}"
+    )
+    return False
 
-                        # 遍历每个用户并生成缓存
-                        for end_user in end_users:
-                            end_user_id = str(end_user.id)
 
-                            try:
-                                # 生成记忆洞察
-                                insight_result = await service.generate_and_cache_insight(db, end_user_id)
-
-                                # 生成用户摘要
-                                summary_result = await service.generate_and_cache_summary(db, end_user_id)
-
-                                # 检查是否都成功
-                                if insight_result["success"] and summary_result["success"]:
-                                    workspace_successful += 1
-                                    successful += 1
-                                    logger.info(f"成功为终端用户 {end_user_id} 重新生成缓存")
-                                else:
-                                    workspace_failed += 1
-                                    failed += 1
-                                    error_info = {
-                                        "end_user_id": end_user_id,
-                                        "insight_error": insight_result.get("error"),
-                                        "summary_error": summary_result.get("error")
-                                    }
-                                    workspace_errors.append(error_info)
-                                    logger.warning(f"终端用户 {end_user_id} 的缓存重新生成部分失败: {error_info}")
+async def _maintain_implicit_emotions(end_user_id: str) -> bool:
+    """更新单个用户的隐性记忆画像和情绪建议，两项都成功才视为成功（否则放回待处理集合重试）"""
+    from app.services.emotion_analytics_service import EmotionAnalyticsService
+    from app.services.implicit_memory_service import ImplicitMemoryService
 
-                            except Exception as e:
-                                # 单个用户失败不影响其他用户（错误隔离）
-                                workspace_failed += 1
-                                failed += 1
-                                error_info = {
-                                    "end_user_id": end_user_id,
-                                    "error": str(e)
-                                }
-                                workspace_errors.append(error_info)
-                                logger.error(f"为终端用户 {end_user_id} 重新生成缓存时出错: {str(e)}")
-
-                        workspace_elapsed = time.time() - workspace_start_time
-
-                        # 记录工作空间处理结果
-                        workspace_result = {
-                            "workspace_id": str(workspace_id),
-                            "total_users": workspace_user_count,
-                            "successful": workspace_successful,
-                            "failed": workspace_failed,
-                            "errors": workspace_errors[:10],  # 只保留前10个错误
-                            "elapsed_time": workspace_elapsed
-                        }
-                        workspace_results.append(workspace_result)
+    implicit_success = emotion_success = False
+    with get_db_context() as db:
+        try:
+            implicit_service = ImplicitMemoryService(db=db, end_user_id=end_user_id)
+            profile_data = await implicit_service.generate_complete_profile(user_id=end_user_id)
+            await implicit_service.save_profile_cache(end_user_id=end_user_id, profile_data=profile_data, db=db)
+            implicit_success = True
+        except Exception as e:
+            logger.error(f"用户 {end_user_id} 隐性记忆更新失败: {str(e)}")
 
-                        logger.info(
-                            f"工作空间 {workspace_id} 处理完成: "
-                            f"总数={workspace_user_count}, 成功={workspace_successful}, "
-                            f"失败={workspace_failed}, 耗时={workspace_elapsed:.2f}秒"
-                        )
+        try:
+            emotion_service = EmotionAnalyticsService()
+            suggestions_data = await emotion_service.generate_emotion_suggestions(
+                end_user_id=end_user_id, db=db, language="zh"
+            )
+            await emotion_service.save_suggestions_cache(
+                end_user_id=end_user_id, suggestions_data=suggestions_data, db=db
+            )
+            emotion_success = True
+        except Exception as e:
+            logger.error(f"用户 {end_user_id} 情绪建议更新失败: {str(e)}")
+    return implicit_success and emotion_success
 
-                    except Exception as e:
-                        # 工作空间处理失败，记录错误并继续处理下一个
-                        logger.error(f"处理工作空间 {workspace_id} 时出错: {str(e)}")
-                        workspace_results.append({
-                            "workspace_id": str(workspace_id),
-                            "error": str(e),
-                            "total_users": 0,
-                            "successful": 0,
-                            "failed": 0,
-                            "errors": []
-                        })
 
-                # 记录总体统计信息
-                logger.info(
-                    f"记忆缓存重新生成定时任务完成: "
-                    f"工作空间数={len(workspaces)}, 总用户数={total_users}, "
-                    f"成功={successful}, 失败={failed}"
-                )
+async def _maintain_forgetting(end_user_id: str) -> bool:
+    """对单个用户执行遗忘周期（使用用户配置，自动回退到工作空间默认配置）"""
+    with get_db_context() as db:
+        connected_config = get_end_user_connected_config(end_user_id, db)
+        user_config_id = resolve_config_id(connected_config.get("memory_config_id"), db)
+        if not user_config_id:
+            # 配置缺失不是暂时性错误，不放回待处理集合
+            logger.warning(f"用户 {end_user_id} 无法获取记忆配置，跳过遗忘周期")
+            return True
+        report = await MemoryForgetService().trigger_forgetting_cycle(
+            db=db, end_user_id=end_user_id, config_id=user_config_id
+        )
+    logger.info(f"用户 {end_user_id}: 融合 {report.get('merged_count', 0)} 对节点")
+    return True
 
-                return {
-                    "status": "SUCCESS",
-                    "message": f"成功处理 {len(workspaces)} 个工作空间，总共 {successful}/{total_users} 个用户缓存重新生成成功",
-                    "workspace_count": len(workspaces),
-                    "total_users": total_users,
-                    "successful": successful,
-                    "failed": failed,
-                    "workspace_results": workspace_results
-                }
 
-            except Exception as e:
-                logger.error(f"记忆缓存重新生成定时任务执行失败: {str(e)}")
-                return {
-                    "status": "FAILURE",
-                    "error": str(e),
-                    "workspace_count": len(workspace_results),
-                    "total_users": total_users,
-                    "successful": successful,
-                    "failed": failed,
-                    "workspace_results": workspace_results
-                }
+# job -> (单用户处理函数, 是否记录处理时间供定期重访)
+_MAINTENANCE_HANDLERS = {
+    JOB_INSIGHT_SUMMARY: (_maintain_insight_summary, False),
+    JOB_IMPLICIT_EMOTIONS: (_maintain_implicit_emotions, False),
+    JOB_FORGETTING: (_maintain_forgetting, True),
+}
+
+
+async def _dispatch_maintenance(
+    job: str,
+    seed_user_ids: Optional[List[str]] = None,
+    revisit_after: Optional[float] = None,
+) -> Dict[str, Any]:
+    """把有变更的用户分发到各分片，并为每个非空分片投递子任务"""
+    scheduler = get_maintenance_scheduler()
+    if seed_user_ids:
+        await scheduler.mark_changed(seed_user_ids, jobs=[job])
+    pending = await scheduler.dispatch(job, revisit_after=revisit_after)
+    for shard in pending:
+        run_memory_maintenance_shard.apply_async(args=[job, shard])
+    return {
+        "status": "SUCCESS",
+        "job": job,
+        "seeded_users": len(seed_user_ids or []),
+        "pending_users": sum(pending.values()),
+        "dispatched_shards": sorted(pending),
+    }
+
+
+def _run_dispatch(task, job: str, seed: Optional[Any] = None, revisit_after: Optional[float] = None) -> Dict[str, Any]:
+    """在 Celery 任务中执行分发；seed 为返回全量用户ID列表的协程函数（全量模式）"""
+    start_time = time.time()
+
+    async def _run() -> Dict[str, Any]:
+        seed_user_ids = await seed() if seed else None
+        return await _dispatch_maintenance(job, seed_user_ids, revisit_after)
 
     try:
-        # 尝试获取现有事件循环，如果不存在则创建新的
         loop = set_asyncio_event_loop()
-
         result = loop.run_until_complete(_run())
-        elapsed_time = time.time() - start_time
-        result["elapsed_time"] = elapsed_time
-        result["task_id"] = self.request.id
-
-        return result
+        logger.info(f"记忆维护任务分发完成: {result}")
     except Exception as e:
-        elapsed_time = time.time() - start_time
-        return {
-            "status": "FAILURE",
-            "error": str(e),
-            "elapsed_time": elapsed_time,
-            "task_id": self.request.id
+        logger.error(f"记忆维护任务分发失败: job={job}, 错误: {e}", exc_info=True)
+        result = {"status": "FAILURE", "job": job, "error": str(e)}
+    result["elapsed_time"] = time.time() - start_time
+    result["task_id"] = task.request.id
+    return result
+
+
+@celery_app.task(
+    name="app.tasks.run_memory_maintenance_shard",
+    bind=True,
+    ignore_result=True,
+    max_retries=0,
+    acks_late=False,
+    time_limit=3600,
+    soft_time_limit=3300,
+)
+def run_memory_maintenance_shard(self, job: str, shard: int) -> Dict[str, Any]:
+    """记忆维护分片子任务
+
+    分批处理分片中的用户，每批完成后记录检查点；接近超时前停止认领，
+    剩余用户由重新投递的子任务从断点继续。
+    """
+    start_time = time.time()
+    handler, track_last_run = _MAINTENANCE_HANDLERS[job]
+    # 预留时间给当前批次收尾，避免触发软超时
+    deadline = time.monotonic() + 3000
+
+    async def _run():
+        return await get_maintenance_scheduler().run_shard(
+            job, shard, handler, deadline=deadline, track_last_run=track_last_run
+        )
+
+    loop = None
+    try:
+        loop = set_asyncio_event_loop()
+        outcome = loop.run_until_complete(_run())
+        if not outcome.skipped and outcome.remaining:
+            self.apply_async(args=[job, shard], countdown=5)
+        result = {
+            "status": "SUCCESS",
+            "job": job,
+            "shard": shard,
+            "processed": outcome.processed,
+            "failed": outcome.failed,
+            "remaining": outcome.remaining,
+            "skipped": outcome.skipped,
+            "failed_users": outcome.failed_users[:10],
         }
+        logger.info(f"记忆维护分片完成: {result}")
+    except Exception as e:
+        logger.error(f"记忆维护分片执行失败: job={job}, shard={shard}, 错误: {e}", exc_info=True)
+        result = {"status": "FAILURE", "job": job, "shard": shard, "error": str(e)}
+    finally:
+        if loop:
+            _shutdown_loop_gracefully(loop)
+    result["elapsed_time"] = time.time() - start_time
+    result["task_id"] = self.request.id
+    return result
+
+
+@celery_app.task(
+    name="app.tasks.regenerate_memory_cache",
+    bind=True,
+    ignore_result=True,
+    max_retries=0,
+    acks_late=False,
+    time_limit=600,
+    soft_time_limit=540,
+)
+def regenerate_memory_cache(self, full: bool = False) -> Dict[str, Any]:
+    """定时任务：重新生成有记忆变更的用户的记忆洞察和用户摘要缓存
+
+    只分发自上次执行以来有记忆写入的用户，由分片子任务并行生成；
+    full=True 时先把所有活动工作空间的全部终端用户标记为待处理（首次上线或手动全量刷新）。
+    """
+
+    async def _all_end_users() -> List[str]:
+        from app.repositories.end_user_repository import EndUserRepository
+
+        with get_db_context() as db:
+            repo = EndUserRepository(db)
+            return [
+                str(end_user.id)
+                for workspace_id in repo.get_all_active_workspaces()
+                for end_user in repo.get_all_by_workspace(workspace_id)
+            ]
+
+    return _run_dispatch(self, JOB_INSIGHT_SUMMARY, seed=_all_end_users if full else None)
 
 
 @celery_app.task(
@@ -3294,7 +3418,7 @@ def workspace_reflection_task(self) -> Dict[str, Any]:
     """
     start_time = time.time()
 
-    async def _run() -> Dict[str, Any]:
+    async def _reflect(changed_users: set, retry_users: set) -> Dict[str, Any]:
         from app.models.workspace_model import Workspace
         from app.services.memory_reflection_service import (
             MemoryReflectionService,
@@ -3339,15 +3463,23 @@ def workspace_reflection_task(self) -> Dict[str, Any]:
                             end_users = data['end_users']
 
                             for base, config, user in zip(releases, memory_configs, end_users):
+                                if str(user['id']) not in changed_users:
+                                    continue
                                 if str(base['config']) == str(config['config_id']) and str(base['app_id']) == str(
                                         user['app_id']):
                                     # 调用反思服务
                                     logger.info(f"为用户 {user['id']} 启动反思，config_id: {config['config_id']}")
 
-                                    reflection_result = await reflection_service.start_reflection_from_data(
-                                        config_data=config,
-                                        end_user_id=user['id']
-                                    )
+                                    try:
+                                        reflection_result = await reflection_service.start_reflection_from_data(
+                                            config_data=config,
+                                            end_user_id=user['id']
+                                        )
+                                    except Exception as e:
+                                        # 失败的用户放回待处理集合，下一轮重试
+                                        logger.error(f"用户 {user['id']} 反思失败: {str(e)}")
+                                        retry_users.add(str(user['id']))
+                                        continue
 
                                     workspace_reflection_results.append({
                                         "app_id": base['app_id'],
@@ -3382,10 +3514,13 @@ def workspace_reflection_task(self) -> Dict[str, Any]:
                     "message": f"成功处理 {len(workspaces)} 个工作空间，总共 {total_reflections} 个反思任务",
                     "workspace_count": len(workspaces),
                     "total_reflections": total_reflections,
+                    "retry_users": len(retry_users),
                     "workspace_results": all_reflection_results
                 }
 
             except Exception as e:
+                # 整轮失败时全部认领的用户放回待处理集合
+                retry_users.update(changed_users)
                 logger.error(f"工作空间反思任务执行失败: {str(e)}")
                 return {
                     "status": "FAILURE",
@@ -3394,6 +3529,36 @@ def workspace_reflection_task(self) -> Dict[str, Any]:
                     "reflection_results": []
                 }
 
+    async def _run() -> Dict[str, Any]:
+        # 只为自上次执行以来有记忆写入的用户启动反思；
+        # 认领的用户在本轮结束时才确认，进程中断时下一轮重新取回
+        scheduler = get_maintenance_scheduler()
+        claim = await scheduler.take_changed(JOB_REFLECTION)
+        if claim is None:
+            return {
+                "status": "SKIPPED",
+                "message": "上一轮反思仍在执行",
+                "workspace_count": 0,
+                "reflection_results": []
+            }
+        token, claimed_users = claim
+        changed_users = set(claimed_users)
+        retry_users = set()
+        try:
+            if not changed_users:
+                return {
+                    "status": "SUCCESS",
+                    "message": "没有需要反思的用户",
+                    "workspace_count": 0,
+                    "reflection_results": []
+                }
+            return await _reflect(changed_users, retry_users)
+        except BaseException:
+            retry_users.update(changed_users)
+            raise
+        finally:
+            await scheduler.complete_changed(JOB_REFLECTION, token, retry_users)
+
     try:
         # 尝试获取现有事件循环，如果不存在则创建新的
         loop = set_asyncio_event_loop()
@@ -3420,82 +3585,27 @@ def workspace_reflection_task(self) -> Dict[str, Any]:
     ignore_result=False,  # 改为 False 以便在 Flower 中查看结果
     max_retries=0,
     acks_late=False,
-    time_limit=7200,
-    soft_time_limit=7000,
+    time_limit=600,
+    soft_time_limit=540,
 )
-def run_forgetting_cycle_task(self, config_id: Optional[uuid.UUID] = None) -> Dict[str, Any]:
+def run_forgetting_cycle_task(self, full: bool = False) -> Dict[str, Any]:
     """定时任务：运行遗忘周期
-    
-    遍历所有终端用户，执行遗忘周期。
+
+    分发自上次执行以来有记忆写入的用户，以及超过 FORGETTING_REVISIT_DAYS 未执行的用户
+    （遗忘依赖时间衰减，没有新写入也需要定期执行），由分片子任务并行处理。
+    每个用户使用自身的记忆配置；full=True 时先把全部终端用户标记为待处理。
     """
-    start_time = time.time()
 
-    async def _process_users() -> Dict[str, Any]:
+    async def _all_end_users() -> List[str]:
         with get_db_context() as db:
-            end_users = db.query(EndUser).all()
-            if not end_users:
-                logger.info("没有终端用户，跳过遗忘周期")
-                return {"status": "SUCCESS", "message": "没有终端用户",
-                        "report": {"merged_count": 0, "failed_count": 0, "processed_users": 0},
-                        "duration_seconds": time.time() - start_time}
-
-            logger.info(f"开始处理 {len(end_users)} 个终端用户的遗忘周期")
-            forget_service = MemoryForgetService()
-            total_merged = total_failed = processed_users = 0
-            failed_users = []
-
-            for end_user in end_users:
-                try:
-                    # 获取用户配置（自动回退到工作空间默认配置）
-                    connected_config = get_end_user_connected_config(str(end_user.id), db)
-                    user_config_id = resolve_config_id(connected_config.get("memory_config_id"), db)
-
-                    if not user_config_id:
-                        failed_users.append({"end_user_id": str(end_user.id), "error": "无法获取配置"})
-                        continue
-
-                    # 执行遗忘周期
-                    report = await forget_service.trigger_forgetting_cycle(
-                        db=db, end_user_id=str(end_user.id), config_id=user_config_id
-                    )
-
-                    total_merged += report.get('merged_count', 0)
-                    total_failed += report.get('failed_count', 0)
-                    processed_users += 1
-
-                    logger.info(f"用户 {end_user.id}: 融合 {report.get('merged_count', 0)} 对节点")
-
-                except Exception as e:
-                    logger.error(f"处理用户 {end_user.id} 失败: {e}", exc_info=True)
-                    failed_users.append({"end_user_id": str(end_user.id), "error": str(e)})
-
-            duration = time.time() - start_time
-            logger.info(f"遗忘周期完成: {processed_users}/{len(end_users)} 用户, "
-                       f"融合 {total_merged} 对, 耗时 {duration:.2f}s")
-
-            return {
-                "status": "SUCCESS",
-                "message": f"处理 {processed_users} 个用户",
-                "report": {
-                    "merged_count": total_merged,
-                    "failed_count": total_failed,
-                    "processed_users": processed_users,
-                    "total_users": len(end_users),
-                    "failed_users": failed_users
-                },
-                "duration_seconds": duration
-            }
+            return [str(uid) for (uid,) in db.query(EndUser.id).all()]
 
-    # 运行异步函数
-    try:
-        return asyncio.run(_process_users())
-    except Exception as e:
-        logger.error(f"遗忘周期任务失败: {e}", exc_info=True)
-        return {
-            "status": "FAILED",
-            "message": f"任务失败: {str(e)}",
-            "duration_seconds": time.time() - start_time
-        }
+    return _run_dispatch(
+        self,
+        JOB_FORGETTING,
+        seed=_all_end_users if full else None,
+        revisit_after=settings.FORGETTING_REVISIT_DAYS * 86400,
+    )
 
 
 # =============================================================================
@@ -3508,283 +3618,36 @@ def run_forgetting_cycle_task(self, config_id: Optional[uuid.UUID] = None) -> Di
     ignore_result=True,
     max_retries=0,
     acks_late=False,
-    time_limit=7200,  # 2小时硬超时
-    soft_time_limit=6900,  # 1小时55分钟软超时
+    time_limit=600,
+    soft_time_limit=540,
 )
-def update_implicit_emotions_storage(self) -> Dict[str, Any]:
-    """定时任务：更新所有用户的隐性记忆画像和情绪建议数据
-
-    遍历数据库中所有已存在数据的用户，为每个用户重新生成隐性记忆画像和情绪建议。
-    实现错误隔离，单个用户失败不影响其他用户的处理。
+def update_implicit_emotions_storage(self, full: bool = False) -> Dict[str, Any]:
+    """定时任务：更新有记忆变更的用户的隐性记忆画像和情绪建议数据
 
-    Returns:
-        包含任务执行结果的字典，包括：
-        - status: 任务状态 (SUCCESS/FAILURE)
-        - message: 执行消息
-        - total_users: 总用户数
-        - successful_implicit: 成功更新隐性记忆的用户数
-        - successful_emotion: 成功更新情绪建议的用户数
-        - failed: 失败的用户数
-        - user_results: 每个用户的详细结果
-        - elapsed_time: 执行耗时（秒）
-        - task_id: 任务ID
+    分发自上次执行以来有记忆写入的用户和当天新增、尚未初始化的用户，由分片子任务并行处理。
+    full=True 时改用存量用户的时间轴筛选（last_done > updated_at，Redis 不可用时为全量），
+    用于首次上线或手动补齐。
     """
-    start_time = time.time()
-
-    async def _run() -> Dict[str, Any]:
-        from sqlalchemy import select
 
-        from app.models.implicit_emotions_storage_model import ImplicitEmotionsStorage
+    async def _seed_users() -> List[str]:
         from app.repositories.implicit_emotions_storage_repository import (
             ImplicitEmotionsStorageRepository,
             TimeFilterUnavailableError,
         )
-        from app.services.emotion_analytics_service import EmotionAnalyticsService
-        from app.services.implicit_memory_service import ImplicitMemoryService
-
-        logger.info("开始执行隐性记忆和情绪数据更新定时任务")
-
-        total_users = 0
-        successful_implicit = 0
-        successful_emotion = 0
-        failed = 0
-        user_results = []
 
         with get_db_context() as db:
-            try:
-                repo = ImplicitEmotionsStorageRepository(db)
-
-                # 先统计总数用于日志
-                from sqlalchemy import func
-                total_users = db.execute(
-                    select(func.count()).select_from(ImplicitEmotionsStorage)
-                ).scalar() or 0
-                logger.info(f"表中存量用户总数: {total_users}，开始时间轴筛选")
-
-                # 构建 Redis 同步客户端，用于时间轴筛选
-                _redis_client = get_sync_redis_client()
-
-                # 只处理 last_done > updated_at 的用户（有新记忆写入的用户）
-                # Redis 不可用时回退到全量处理
+            repo = ImplicitEmotionsStorageRepository(db)
+            # 当天新增用户兜底初始化
+            user_ids = list(repo.get_new_user_ids_today(batch_size=100))
+            if full:
                 try:
-                    refresh_iter = repo.get_users_needing_refresh(_redis_client, batch_size=100)
+                    user_ids.extend(repo.get_users_needing_refresh(get_sync_redis_client(), batch_size=100))
                 except TimeFilterUnavailableError as e:
                     logger.warning(f"时间轴筛选不可用，回退到全量刷新: {e}")
-                    refresh_iter = repo.get_all_user_ids(batch_size=100)
-
-                for end_user_id in refresh_iter:
-                    logger.info(f"开始处理用户: {end_user_id}")
-                    user_start_time = time.time()
-
-                    implicit_success = False
-                    emotion_success = False
-                    errors = []
-
-                    try:
-                        # 更新隐性记忆画像
-                        try:
-                            implicit_service = ImplicitMemoryService(db=db, end_user_id=end_user_id)
-                            profile_data = await implicit_service.generate_complete_profile(user_id=end_user_id)
-                            await implicit_service.save_profile_cache(
-                                end_user_id=end_user_id,
-                                profile_data=profile_data,
-                                db=db
-                            )
-                            implicit_success = True
-                            logger.info(f"成功更新用户 {end_user_id} 的隐性记忆画像")
-                        except Exception as e:
-                            error_msg = f"隐性记忆更新失败: {str(e)}"
-                            errors.append(error_msg)
-                            logger.error(f"用户 {end_user_id} {error_msg}")
-
-                        # 更新情绪建议
-                        try:
-                            emotion_service = EmotionAnalyticsService()
-                            suggestions_data = await emotion_service.generate_emotion_suggestions(
-                                end_user_id=end_user_id,
-                                db=db,
-                                language="zh"
-                            )
-                            await emotion_service.save_suggestions_cache(
-                                end_user_id=end_user_id,
-                                suggestions_data=suggestions_data,
-                                db=db
-                            )
-                            emotion_success = True
-                            logger.info(f"成功更新用户 {end_user_id} 的情绪建议")
-                        except Exception as e:
-                            error_msg = f"情绪建议更新失败: {str(e)}"
-                            errors.append(error_msg)
-                            logger.error(f"用户 {end_user_id} {error_msg}")
-
-                        # 统计结果
-                        if implicit_success:
-                            successful_implicit += 1
-                        if emotion_success:
-                            successful_emotion += 1
-                        if not implicit_success and not emotion_success:
-                            failed += 1
-
-                        user_elapsed = time.time() - user_start_time
-
-                        # 记录用户处理结果
-                        user_result = {
-                            "end_user_id": end_user_id,
-                            "implicit_success": implicit_success,
-                            "emotion_success": emotion_success,
-                            "errors": errors,
-                            "elapsed_time": user_elapsed
-                        }
-                        user_results.append(user_result)
-
-                        logger.info(
-                            f"用户 {end_user_id} 处理完成: "
-                            f"隐性记忆={'成功' if implicit_success else '失败'}, "
-                            f"情绪建议={'成功' if emotion_success else '失败'}, "
-                            f"耗时={user_elapsed:.2f}秒"
-                        )
-
-                    except Exception as e:
-                        # 单个用户失败不影响其他用户（错误隔离）
-                        failed += 1
-                        user_elapsed = time.time() - user_start_time
-                        error_info = {
-                            "end_user_id": end_user_id,
-                            "implicit_success": False,
-                            "emotion_success": False,
-                            "errors": [str(e)],
-                            "elapsed_time": user_elapsed
-                        }
-                        user_results.append(error_info)
-                        logger.error(f"处理用户 {end_user_id} 时出错: {str(e)}")
+                    user_ids.extend(repo.get_all_user_ids(batch_size=100))
+        return user_ids
 
-                # ---- 当天新增用户兜底初始化 ----
-                new_users_initialized = 0
-                new_users_failed = 0
-                logger.info("开始处理当天新增用户的兜底初始化")
-
-                for end_user_id in repo.get_new_user_ids_today(batch_size=100):
-                    logger.info(f"开始初始化新用户: {end_user_id}")
-                    user_start_time = time.time()
-                    implicit_success = False
-                    emotion_success = False
-                    errors = []
-
-                    try:
-                        try:
-                            implicit_service = ImplicitMemoryService(db=db, end_user_id=end_user_id)
-                            profile_data = await implicit_service.generate_complete_profile(user_id=end_user_id)
-                            await implicit_service.save_profile_cache(
-                                end_user_id=end_user_id, profile_data=profile_data, db=db
-                            )
-                            implicit_success = True
-                            logger.info(f"成功初始化新用户 {end_user_id} 的隐性记忆画像")
-                        except Exception as e:
-                            errors.append(f"隐性记忆初始化失败: {str(e)}")
-                            logger.error(f"新用户 {end_user_id} 隐性记忆初始化失败: {e}")
-
-                        try:
-                            emotion_service = EmotionAnalyticsService()
-                            suggestions_data = await emotion_service.generate_emotion_suggestions(
-                                end_user_id=end_user_id, db=db, language="zh"
-                            )
-                            await emotion_service.save_suggestions_cache(
-                                end_user_id=end_user_id, suggestions_data=suggestions_data, db=db
-                            )
-                            emotion_success = True
-                            logger.info(f"成功初始化新用户 {end_user_id} 的情绪建议")
-                        except Exception as e:
-                            errors.append(f"情绪建议初始化失败: {str(e)}")
-                            logger.error(f"新用户 {end_user_id} 情绪建议初始化失败: {e}")
-
-                        if implicit_success or emotion_success:
-                            new_users_initialized += 1
-                        else:
-                            new_users_failed += 1
-
-                        user_elapsed = time.time() - user_start_time
-                        user_results.append({
-                            "end_user_id": end_user_id,
-                            "type": "new_user_init",
-                            "implicit_success": implicit_success,
-                            "emotion_success": emotion_success,
-                            "errors": errors,
-                            "elapsed_time": user_elapsed
-                        })
-
-                    except Exception as e:
-                        new_users_failed += 1
-                        user_elapsed = time.time() - user_start_time
-                        user_results.append({
-                            "end_user_id": end_user_id,
-                            "type": "new_user_init",
-                            "implicit_success": False,
-                            "emotion_success": False,
-                            "errors": [str(e)],
-                            "elapsed_time": user_elapsed
-                        })
-                        logger.error(f"初始化新用户 {end_user_id} 时出错: {str(e)}")
-
-                logger.info(f"当天新增用户兜底初始化完成: 成功={new_users_initialized}, 失败={new_users_failed}")
-                # ---- 新增用户兜底初始化结束 ----
-
-                logger.info(
-                    f"隐性记忆和情绪数据更新定时任务完成: "
-                    f"存量用户总数={total_users}, "
-                    f"隐性记忆成功={successful_implicit}, "
-                    f"情绪建议成功={successful_emotion}, "
-                    f"存量失败={failed}, "
-                    f"新增用户初始化成功={new_users_initialized}, "
-                    f"新增用户初始化失败={new_users_failed}"
-                )
-
-                return {
-                    "status": "SUCCESS",
-                    "message": (
-                        f"存量用户 {total_users} 个，隐性记忆 {successful_implicit} 个成功，情绪建议 {successful_emotion} 个成功；"
-                        f"当天新增用户初始化 {new_users_initialized} 个成功，{new_users_failed} 个失败"
-                    ),
-                    "total_users": total_users,
-                    "successful_implicit": successful_implicit,
-                    "successful_emotion": successful_emotion,
-                    "failed": failed,
-                    "new_users_initialized": new_users_initialized,
-                    "new_users_failed": new_users_failed,
-                    "user_results": user_results[:50]
-                }
-
-            except Exception as e:
-                logger.error(f"隐性记忆和情绪数据更新定时任务执行失败: {str(e)}")
-                return {
-                    "status": "FAILURE",
-                    "error": str(e),
-                    "total_users": total_users,
-                    "successful_implicit": successful_implicit,
-                    "successful_emotion": successful_emotion,
-                    "failed": failed,
-                    "new_users_initialized": 0,
-                    "new_users_failed": 0,
-                    "user_results": user_results[:50]
-                }
-
-    try:
-        # 尝试获取现有事件循环，如果不存在则创建新的
-        loop = set_asyncio_event_loop()
-
-        result = loop.run_until_complete(_run())
-        elapsed_time = time.time() - start_time
-        result["elapsed_time"] = elapsed_time
-        result["task_id"] = self.request.id
-
-        return result
-    except Exception as e:
-        elapsed_time = time.time() - start_time
-        return {
-            "status": "FAILURE",
-            "error": str(e),
-            "elapsed_time": elapsed_time,
-            "task_id": self.request.id
-        }
+    return _run_dispatch(self, JOB_IMPLICIT_EMOTIONS, seed=_seed_users)
 
 
 # =============================================================================
@@ -4370,11 +4233,12 @@ FLUSH_LOCK_TTL_SECONDS = 600
 def flush_conversation_task(self, conversation_id: str) -> None:
     """兜底写入任务：逐条处理 write_cursor 后的所有未写入消息。
 
-    使用 memory_write:{end_user_id} 锁与其他写入路径互斥，保证同一 user 串行。
-    完成后（无论成功或失败）删除 flush_lock:{conversation_id}。
+    经 per-end_user 写入队列与其他写入路径互斥，保证同一 user 串行。
+    任务入队后由执行它的 drainer 在完成后（无论成功或失败）删除
+    flush_lock:{conversation_id}；未能入队时由本任务删除。
     Fire-and-forget：异常时记录日志，不重试。
     """
-    # 提前查 end_user_id 用于加锁
+    # 提前查 end_user_id 用于入队
     end_user_id_for_lock: Optional[str] = None
     try:
         from sqlalchemy import select
@@ -4389,40 +4253,37 @@ def flush_conversation_task(self, conversation_id: str) -> None:
                 end_user_id_for_lock = str(row)
     except Exception as e:
         logger.warning(
-            f"[FlushTask] 查询 end_user_id 失败，将以无锁模式执行: conv={conversation_id}, err={e}"
+            f"[FlushTask] 查询 end_user_id 失败，将直接执行: conv={conversation_id}, err={e}"
         )
 
+    # 入队成功后 flush_lock 交给写入队列释放，避免任务排队期间被空闲扫描重复派发
+    submitted = False
+
     async def _run() -> None:
+        nonlocal submitted
         from app.core.memory.sliding_window.flush_task import FlushTask
-
-        await FlushTask().run(conversation_id)
-
-    redis_client = get_sync_redis_client()
-    write_lock = None
-    write_lock_token = None
-    if redis_client is not None and end_user_id_for_lock:
-        write_lock = RedisFairLock(
-            key=f"memory_write:{end_user_id_for_lock}",
-            redis_client=redis_client,
-            expire=600,
-            timeout=3600,
-            auto_renewal=True,
+        from app.core.memory.sliding_window.write_queue import (
+            JOB_FLUSH,
+            MemoryWriteJob,
+            get_memory_write_queue,
         )
-        if not write_lock.acquire():
-            logger.warning(
-                f"[FlushTask] 获取锁超时，跳过本次 flush: "
-                f"conv={conversation_id}, end_user_id={end_user_id_for_lock}"
-            )
-            # 释放幂等锁，后续 Beat 会重新派发
-            try:
-                redis_client.delete(f"{FLUSH_LOCK_KEY_PREFIX}{conversation_id}")
-            except Exception:
-                pass
-            return
 
-        from app.services.memory_agent_service import _set_write_lock_holder
-        write_lock_token = _set_write_lock_holder(end_user_id_for_lock)
+        if not end_user_id_for_lock:
+            await FlushTask().run(conversation_id)
+            return
+        # 入队后由该用户的 drainer 执行；已有 drainer 时直接返回，不占用 worker 等待
+        outcome = await get_memory_write_queue().submit(
+            MemoryWriteJob(
+                end_user_id=end_user_id_for_lock,
+                conversation_id=conversation_id,
+                kind=JOB_FLUSH,
+            ),
+        )
+        submitted = True
+        if outcome.status == "failed":
+            raise RuntimeError(outcome.error)
 
+    redis_client = get_sync_redis_client()
     try:
         asyncio.run(_run())
     except Exception as e:
@@ -4431,18 +4292,7 @@ def flush_conversation_task(self, conversation_id: str) -> None:
             exc_info=True,
         )
     finally:
-        if write_lock_token is not None:
-            try:
-                from app.services.memory_agent_service import _reset_write_lock_holder
-                _reset_write_lock_holder(write_lock_token)
-            except Exception as e:
-                logger.warning(f"[FlushTask] 重置锁标记失败: {e}")
-        if write_lock is not None:
-            try:
-                write_lock.release()
-            except Exception as e:
-                logger.warning(f"[FlushTask] 释放写入锁失败: {e}")
-        if redis_client:
+        if redis_client and not submitted:
             try:
                 redis_client.delete(f"{FLUSH_LOCK_KEY_PREFIX}{conversation_id}")
             except Exception as e:
@@ -4451,6 +4301,49 @@ def flush_conversation_task(self, conversation_id: str) -> None:
                 )
 
 
+@celery_app.task(
+    name="app.tasks.drain_memory_write_queue",
+    queue="memory_tasks",
+    max_retries=0,
+    acks_late=True,
+)
+def drain_memory_write_queue_task(end_user_id: str) -> Dict[str, Any]:
+    """处理 end_user 写入队列中的剩余任务。
+
+    在独占写入的维护任务（反思/全量扫描）结束、或 drainer 异常退出后派发，
+    保证入队的写入最终被执行。已有 drainer 在处理时直接返回。
+    """
+
+    async def _run() -> bool:
+        from app.core.memory.sliding_window.write_queue import get_memory_write_queue
+
+        return await get_memory_write_queue().drain(end_user_id)
+
+    try:
+        drained = asyncio.run(_run())
+    except Exception as e:
+        logger.error(f"[WriteQueue] drain 失败: end_user_id={end_user_id}, err={e}", exc_info=True)
+        return {"status": "FAILURE", "end_user_id": end_user_id, "error": str(e)}
+    return {"status": "SUCCESS" if drained else "SKIPPED", "end_user_id": end_user_id}
+
+
+@celery_app.task(name="app.tasks.sweep_memory_write_queues")
+def sweep_memory_write_queues_task() -> Dict[str, Any]:
+    """定时兜底：为有待处理写入但 drainer 已失效（进程被强杀）的用户派发 drain 任务"""
+
+    async def _run() -> list:
+        from app.core.memory.sliding_window.write_queue import get_memory_write_queue
+
+        return await get_memory_write_queue().sweep_stranded()
+
+    try:
+        stranded = asyncio.run(_run())
+    except Exception as e:
+        logger.error(f"[WriteQueue] 扫描遗留写入队列失败: err={e}", exc_info=True)
+        return {"status": "FAILURE", "error": str(e)}
+    return {"status": "SUCCESS", "scheduled": len(stranded)}
+
+
 @celery_app.task(
     name="app.tasks.scan_idle_conversations",
     queue="periodic_tasks",
@@ -4693,6 +4586,33 @@ def scan_workflow_schedule_triggers():
     return {"triggered": triggered, "scanned_at": to_iso_z(now)}
 
 
+@celery_app.task(
+    name="app.tasks.flush_workflow_node_records",
+    queue="periodic_tasks",
+    ignore_result=True,
+    max_retries=0,
+    acks_late=False,
+)
+def flush_workflow_node_records_task() -> Dict[str, Any]:
+    """将 write-behind 队列中的工作流节点执行记录批量落库。
+
+    由运行结束时的提交派发，Celery Beat 定时兜底；已有任务在落库时直接返回。
+    """
+    from app.core.workflow.node_record_writer import get_workflow_node_record_writer
+
+    writer = get_workflow_node_record_writer()
+    if writer is None:
+        return {"status": "SKIPPED", "reason": "writer_unavailable"}
+    try:
+        written = writer.drain()
+    except Exception as e:
+        logger.error(f"[NodeRecordWriter] 落库失败: {e}", exc_info=True)
+        return {"status": "FAILURE", "error": str(e)}
+    if written is None:
+        return {"status": "SKIPPED", "reason": "drainer_busy"}
+    return {"status": "SUCCESS", "executions": written}
+
+
 @celery_app.task(name="app.tasks.run_workflow_schedule_trigger", queue="workflow_trigger_tasks")
 def run_workflow_schedule_trigger(app_id: str, release_id: str, trigger_id: str, scheduled_at: str | None = None):
     """执行单个已发布的 schedule trigger。"""
@@ -3,6 +3,9 @@
 
 提供代码块执行时间统计功能，用于接口性能分析。
 如需再次启用性能监控，只需在 controller 中导入 from app.utils.performance_timer import timer 并添加 with timer(...) 包裹需要监控的代码块即可
+
+这里只输出单次耗时日志，用于临时排查，不累计统计；需要长期观测的耗时请在
+app.core.metrics 中定义指标并记录，随 /metrics 导出。
 """
 
 import time
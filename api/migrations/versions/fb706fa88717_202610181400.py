@@ -0,0 +1,34 @@
+"""202610181400
+
+Revision ID: fb706fa88717
+Revises: 042f08d0bcde
+Create Date: 2026-10-18 14:00:37.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'fb706fa88717'
+down_revision: Union[str, None] = '042f08d0bcde'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # messages 表数据量大，并发建索引避免长时间锁表
+    with op.get_context().autocommit_block():
+        op.create_index('ix_conversations_app_log_sort', 'conversations', ['app_id', 'workspace_id', sa.text('coalesce(updated_at, created_at)'), 'id'], unique=False, postgresql_where='is_active', postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_messages_conversation_created', 'messages', ['conversation_id', 'created_at'], unique=False, postgresql_concurrently=True, if_not_exists=True)
+        op.create_index('ix_messages_content_trgm', 'messages', ['content'], unique=False, postgresql_using='gin', postgresql_ops={'content': 'gin_trgm_ops'}, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_messages_content_trgm', table_name='messages', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_messages_conversation_created', table_name='messages', postgresql_concurrently=True, if_exists=True)
+        op.drop_index('ix_conversations_app_log_sort', table_name='conversations', postgresql_where='is_active', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,260 @@
+# -*- coding: UTF-8 -*-
+"""异步热路径的短会话数据库访问
+
+使用 SQLite 文件库模拟容量很小的连接池，验证流式输出期间不占用连接、事件循环不被查询阻塞。
+"""
+import asyncio
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, text
+from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy.pool import QueuePool
+
+from app import db as db_module
+
+POOL_SIZE = 2
+ItemBase = declarative_base()
+
+
+class Item(ItemBase):
+    __tablename__ = "items"
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+
+
+@pytest.fixture
+def small_pool(tmp_path, monkeypatch):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'chat.db'}",
+        poolclass=QueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=0,
+        pool_timeout=5,
+        connect_args={"check_same_thread": False},
+    )
+    ItemBase.metadata.create_all(engine)
+    monkeypatch.setattr(
+        db_module,
+        "ShortSessionLocal",
+        sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine),
+    )
+    yield engine
+    engine.dispose()
+
+
+async def fake_llm_stream(tokens: int = 20, latency: float = 0.01):
+    for i in range(tokens):
+        await asyncio.sleep(latency)
+        yield f"token-{i} "
+
+
+async def chat_stream(conversation_id: int) -> str:
+    """模拟流式对话：读历史 → 流式输出 → 保存消息，数据库访问均走短会话"""
+
+    def load_history(db):
+        time.sleep(0.005)  # 模拟查询耗时（阻塞调用，不应阻塞事件循环）
+        return db.execute(text("SELECT count(*) FROM items")).scalar()
+
+    def save_message(db, content):
+        db.add(Item(id=conversation_id, name=content))
+        db.commit()
+
+    await db_module.run_in_session(load_history)
+    content = ""
+    async for token in fake_llm_stream():
+        content += token
+    await db_module.run_in_session(save_message, content)
+    return content
+
+
+@pytest.mark.asyncio
+async def test_concurrent_streams_not_bounded_by_pool_size(small_pool):
+    streams = 40
+    max_lag = 0.0
+    stop = asyncio.Event()
+
+    async def monitor_loop_lag():
+        nonlocal max_lag
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.005)
+            max_lag = max(max_lag, time.perf_counter() - start - 0.005)
+
+    monitor = asyncio.create_task(monitor_loop_lag())
+    start = time.perf_counter()
+    results = await asyncio.gather(*[chat_stream(i) for i in range(streams)])
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await monitor
+
+    assert all(r.count("token-") == 20 for r in results)
+    # 流式期间若持有连接，容量受限于连接池：至少 streams / POOL_SIZE 轮 × 单次流式耗时（约 4s）
+    assert elapsed < (streams / POOL_SIZE) * 0.2 / 3
+    assert max_lag < 0.1
+    assert small_pool.pool.checkedout() == 0
+    assert db_module.ShortSessionLocal().query(Item).count() == streams
+
+
+@pytest.mark.asyncio
+async def test_run_in_session_returns_usable_objects(small_pool):
+    def create(db):
+        db.add(Item(id=1, name="hello"))
+        db.commit()
+
+    await db_module.run_in_session(create)
+    item = await db_module.run_in_session(lambda db: db.get(Item, 1))
+
+    assert item.name == "hello"
+    assert small_pool.pool.checkedout() == 0
+
+
+def test_release_connection_keeps_loaded_objects(small_pool):
+    session = db_module.ShortSessionLocal()
+    session.expire_on_commit = True
+    session.add(Item(id=2, name="world"))
+    session.commit()
+    item = session.get(Item, 2)
+    assert small_pool.pool.checkedout() == 1
+
+    db_module.release_connection(session)
+
+    assert small_pool.pool.checkedout() == 0
+    assert not session.in_transaction()
+    assert item.name == "world"
+    assert small_pool.pool.checkedout() == 0
+    assert session.expire_on_commit
+    session.close()
+
+
+class _StubAgentRunService:
+    """AgentRunService 替身：工具加载沿用请求会话（与真实实现一致），其余配置为空"""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _validate_file_upload(self, features_config, files):
+        pass
+
+    def prepare_variables(self, variables, config_variables):
+        return {}
+
+    def load_tools_config(self, *args):
+        self.db.execute(text("SELECT count(*) FROM items"))
+        return []
+
+    def load_skill_config(self, *args):
+        return [], ""
+
+    def load_knowledge_retrieval_config(self, *args):
+        return [], None
+
+    def load_memory_config(self, *args):
+        return [], None
+
+    def _get_opening_statement(self, *args):
+        return None, []
+
+    async def _generate_tts_streaming(self, *args, **kwargs):
+        return None, None
+
+    def _filter_citations(self, *args):
+        return []
+
+
+class _StubConversationService:
+    def __init__(self):
+        self.messages = []
+
+    async def add_message_async(self, **kwargs):
+        self.messages.append(kwargs)
+
+    async def get_conversation_history(self, **kwargs):
+        return []
+
+
+@pytest.mark.asyncio
+async def test_agent_chat_stream_releases_request_connection(small_pool, monkeypatch):
+    try:
+        from app.services import app_chat_service
+    except Exception as e:  # 服务依赖链在离线环境可能无法导入
+        pytest.skip(f"app_chat_service 不可用: {e}")
+
+    pool_in_use = []
+
+    class StubAgent:
+        """替身模型：记录每个分块产出时连接池中被占用的连接数"""
+
+        def __init__(self, **kwargs):
+            pass
+
+        async def chat_stream(self, **kwargs):
+            for token in ("你好", "，世界"):
+                pool_in_use.append(small_pool.pool.checkedout())
+                await asyncio.sleep(0.01)
+                yield token
+            yield 12
+
+    class StubApiKeyService:
+        @staticmethod
+        def get_available_api_key(db, model_config_id):
+            return SimpleNamespace(
+                id=uuid.uuid4(), model_name="stub-model", provider="openai", api_key="sk-test",
+                api_base="http://127.0.0.1", capability=[], is_omni=False,
+            )
+
+        @staticmethod
+        def record_api_key_usage(db, api_key_id):
+            pass
+
+    class StubExecutionRepository:
+        updates = []
+
+        def __init__(self, db):
+            pass
+
+        def create(self, execution):
+            pass
+
+        def update_completed(self, **kwargs):
+            self.updates.append(kwargs)
+
+    monkeypatch.setattr(app_chat_service, "LangChainAgent", StubAgent)
+    monkeypatch.setattr(app_chat_service, "ModelApiKeyService", StubApiKeyService)
+    monkeypatch.setattr(app_chat_service, "AgentExecutionRepository", StubExecutionRepository)
+    monkeypatch.setattr(app_chat_service.ToolRepository, "get_tenant_id_by_workspace_id",
+                        staticmethod(lambda db, workspace_id: None))
+    # App 查询改为查 items 表（不存在的行返回 None）
+    monkeypatch.setattr("app.models.app_model.App", Item)
+
+    request_db = db_module.ShortSessionLocal()
+    request_db.execute(text("SELECT 1"))
+    assert small_pool.pool.checkedout() == 1
+
+    service = app_chat_service.AppChatService.__new__(app_chat_service.AppChatService)
+    service.db = request_db
+    service.agent_service = _StubAgentRunService(request_db)
+    service.conversation_service = _StubConversationService()
+    service._check_annotation_match = lambda *args, **kwargs: None
+    config = SimpleNamespace(
+        id=uuid.uuid4(), app_id=1, features={}, variables=[], default_model_config_id=uuid.uuid4(),
+        system_prompt="你是助手", tools=[], skills=None, knowledge_retrieval=None, memory=None,
+        model_parameters={},
+    )
+
+    events = []
+    async for event in service.agent_chat_stream(
+        message="hi", conversation_id=uuid.uuid4(), config=config, files=[], workspace_id=str(uuid.uuid4()),
+    ):
+        # 每个事件产出时请求会话都不占用连接
+        assert small_pool.pool.checkedout() == 0
+        events.append(event)
+    request_db.close()
+
+    assert pool_in_use == [0, 0]
+    assert sum(e.startswith("event: message") for e in events) == 2
+    assert '"error": null' in events[-1]
+    assert [m["role"] for m in service.conversation_service.messages] == ["user", "assistant"]
+    assert StubExecutionRepository.updates[-1]["status"] == "completed"
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+"""进程内共享分块器：同一配置只创建一次，并发调用安全，批量分块与逐个分块结果一致
+
+需要 chonkie 与 Neo4j 配置（NEO4J_PASSWORD，分块提取模块导入时检查），环境不可用时跳过。
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+try:
+    from app.core.memory.llm_tools import chunker_client
+    from app.core.memory.llm_tools.chunker_client import ChunkerClient, clear_shared_chunkers, get_shared_chunker
+    from app.core.memory.storage_services.extraction_engine.knowledge_extraction.chunk_extraction import (
+        DialogueChunker,
+    )
+except Exception as e:  # 依赖缺失
+    pytest.skip(f"分块模块不可用: {e}", allow_module_level=True)
+
+from app.core.memory.llm_tools.t_chunker_bench import build_dialogs
+from app.core.memory.models.config_models import ChunkerConfig
+
+
+def _config(strategy="RecursiveChunker", chunk_size=512):
+    return ChunkerConfig(chunker_strategy=strategy, embedding_model="BAAI/bge-m3",
+                         chunk_size=chunk_size, min_characters_per_chunk=50)
+
+
+@pytest.fixture(autouse=True)
+def _clear_registry():
+    clear_shared_chunkers()
+    yield
+    clear_shared_chunkers()
+
+
+def test_one_chunker_per_config(monkeypatch):
+    built = []
+    build = chunker_client._build_chunker
+
+    def counting_build(config):
+        built.append(config.chunker_strategy)
+        return build(config)
+
+    monkeypatch.setattr(chunker_client, "_build_chunker", counting_build)
+    with ThreadPoolExecutor(8) as pool:
+        clients = list(pool.map(lambda _: ChunkerClient(_config()), range(32)))
+    assert built == ["RecursiveChunker"]
+    assert len({id(c.chunker) for c in clients}) == 1
+
+    # 配置不同则是另一个分块器
+    assert get_shared_chunker(_config(chunk_size=256)) is not clients[0].chunker
+    assert get_shared_chunker(_config("SentenceChunker")) is not clients[0].chunker
+    assert len(built) == 3
+
+
+@pytest.mark.parametrize("strategy", ["RecursiveChunker", "SentenceChunker", "TokenChunker"])
+def test_batch_matches_per_dialogue(strategy):
+    config = _config(strategy)
+    expected = build_dialogs(60, seed=1)
+    for dialog in expected:
+        asyncio.run(ChunkerClient(config).generate_chunks(dialog))
+
+    dialogs = build_dialogs(60, seed=1)
+    asyncio.run(ChunkerClient(config).generate_chunks_batch(dialogs))
+    assert [[c.content for c in d.chunks] for d in dialogs] == [[c.content for c in d.chunks] for d in expected]
+    assert any(c.metadata.get("total_sub_chunks", 0) > 1 for d in dialogs for c in d.chunks)
+
+
+def test_concurrent_writers_share_chunker():
+    config = _config()
+    expected = build_dialogs(80, seed=2)
+    asyncio.run(ChunkerClient(config).generate_chunks_batch(expected))
+
+    dialogs = build_dialogs(80, seed=2)
+
+    async def write_all():
+        await asyncio.gather(*(ChunkerClient(config).generate_chunks_batch(dialogs[i::8]) for i in range(8)))
+
+    asyncio.run(write_all())
+    assert [[c.content for c in d.chunks] for d in dialogs] == [[c.content for c in d.chunks] for d in expected]
+
+
+def test_empty_dialogue_in_batch_raises():
+    dialogs = build_dialogs(3)
+    dialogs[1].context.msgs = []
+    with pytest.raises(ValueError, match="dialog-1"):
+        asyncio.run(ChunkerClient(_config()).generate_chunks_batch(dialogs))
+
+
+def test_blank_dialogue_in_batch_raises():
+    chunker = DialogueChunker.__new__(DialogueChunker)
+    chunker.chunker_strategy = "RecursiveChunker"
+    chunker.chunker_config = _config()
+    chunker.chunker_client = ChunkerClient(chunker.chunker_config)
+
+    dialogs = build_dialogs(3)
+    for msg in dialogs[2].context.msgs:
+        msg.msg = "   "
+    # 与逐个分块一致：内容全为空白的对话没有生成分块时报错
+    with pytest.raises(ValueError, match=r"No (valid )?chunks generated"):
+        asyncio.run(chunker.process_dialogue(dialogs[2]))
+    with pytest.raises(ValueError, match=r"No (valid )?chunks generated"):
+        asyncio.run(chunker.process_dialogues(dialogs))
@@ -0,0 +1,294 @@
+# -*- coding: UTF-8 -*-
+"""遗忘周期批量融合测试
+
+- LLM 客户端每个周期只获取一次，摘要有界并发生成，写入按批次执行
+- 批量写事务失败时逐个重试，单个节点对的失败不影响其他节点对
+- 集成测试：批量融合与逐个融合得到相同的图（需要可用的 Neo4j 与 Redis，环境不可用时跳过）
+"""
+import asyncio
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+
+from app.cache.memory import memory_counters
+from app.core.memory.storage_services.forgetting_engine.actr_calculator import ACTRCalculator
+from app.core.memory.storage_services.forgetting_engine.forgetting_scheduler import ForgettingScheduler
+from app.core.memory.storage_services.forgetting_engine.forgetting_strategy import ForgettingStrategy
+
+PAIRS = 5000
+LLM_LATENCY = 0.005
+
+
+class FakeLLMClient:
+    """模拟固定延迟的 LLM，记录调用次数与最大并发数"""
+
+    def __init__(self, latency: float = LLM_LATENCY):
+        self.latency = latency
+        self.calls = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def chat(self, prompt=None, messages=None):
+        self.calls += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.in_flight -= 1
+        if messages is not None:
+            return SimpleNamespace(content=json.dumps({"title": "标题", "type": "learning"}))
+        return SimpleNamespace(content="摘要")
+
+
+class FakeCountConnector:
+    """只用于统计节点数的连接器"""
+
+    async def execute_query(self, query, **params):
+        return [{"total": 0}]
+
+
+class RecordingStrategy(ForgettingStrategy):
+    """返回固定节点对、记录写入批次的遗忘策略"""
+
+    def __init__(self, pairs, llm_client, missing=()):
+        super().__init__(FakeCountConnector(), ACTRCalculator())
+        self.pairs = pairs
+        self.llm_client = llm_client
+        self.missing = set(missing)
+        self.resolved = 0
+        self.batches = []
+
+    async def find_forgettable_nodes(self, end_user_id=None, min_days_since_access=30):
+        return self.pairs
+
+    async def _get_llm_client(self, db, config_id):
+        self.resolved += 1
+        return self.llm_client
+
+    async def apply_merges(self, merges):
+        self.batches.append([m["statement_id"] for m in merges])
+        return {
+            m["summary_id"]: RuntimeError("nodes may not exist") if m["statement_id"] in self.missing else None
+            for m in merges
+        }
+
+
+def _pairs(n):
+    return [
+        {
+            "statement_id": f"s{i}", "statement_text": f"陈述 {i}",
+            "statement_activation": 0.1, "statement_importance": 0.2,
+            "entity_id": f"e{i}", "entity_name": f"实体 {i}", "entity_type": "Concept",
+            "entity_activation": 0.2, "entity_importance": 0.1,
+            "avg_activation": i / n,
+        }
+        for i in range(n)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_cycle_summarizes_concurrently_and_writes_in_batches():
+    llm = FakeLLMClient()
+    pairs = _pairs(PAIRS)
+    # 一个重复节点对（预过滤跳过）、一个 Person 实体（准备失败）、两个已被删除的节点对（写入失败）
+    pairs.append(dict(pairs[0], avg_activation=2.0))
+    pairs[10]["entity_type"] = "Person"
+    strategy = RecordingStrategy(pairs, llm, missing={"s20", "s30"})
+    scheduler = ForgettingScheduler(strategy, strategy.connector, summary_concurrency=64, merge_tx_batch_size=500)
+
+    start = time.perf_counter()
+    report = await scheduler.run_forgetting_cycle(
+        max_merge_batch_size=len(pairs), config_id=uuid.uuid4(), db=object()
+    )
+    elapsed = time.perf_counter() - start
+
+    assert strategy.resolved == 1
+    assert report["merged_count"] == PAIRS - 3
+    assert report["failed_count"] == 3
+    # 按激活值顺序写入，每个事务最多 500 个节点对
+    written = [sid for batch in strategy.batches for sid in batch]
+    assert written == [f"s{i}" for i in range(PAIRS) if i != 10]
+    assert max(len(batch) for batch in strategy.batches) <= 500
+    # 每个节点对两次 LLM 调用（摘要 + 标题），并发不超过上限
+    assert llm.calls == 2 * (PAIRS - 1)
+    assert llm.max_in_flight <= 64
+    serial = 2 * (PAIRS - 1) * LLM_LATENCY
+    assert elapsed < serial / 5, f"{elapsed:.2f}s vs serial {serial:.2f}s"
+
+
+class FakeResult:
+    def __init__(self, ids):
+        self.ids = ids
+
+    def __aiter__(self):
+        return self._records()
+
+    async def _records(self):
+        for summary_id in self.ids:
+            yield {"summary_id": summary_id}
+
+    async def consume(self):
+        n = len(self.ids)
+        return SimpleNamespace(counters=SimpleNamespace(
+            nodes_created=n, nodes_deleted=2 * n, relationships_created=0, relationships_deleted=0,
+        ))
+
+
+class FlakyConnector:
+    """包含 poison 节点对的事务整体失败，不存在的节点对不返回结果"""
+
+    def __init__(self, poison, missing):
+        self.poison = poison
+        self.missing = missing
+        self.transactions = []
+
+    async def execute_write_transaction(self, transaction_func, **kwargs):
+        merges = kwargs["merges"]
+        self.transactions.append(len(merges))
+        if any(m["statement_id"] == self.poison for m in merges):
+            raise RuntimeError("transaction failed")
+        ids = [m["summary_id"] for m in merges if m["statement_id"] not in self.missing]
+        tx = SimpleNamespace(run=lambda query, **params: asyncio.sleep(0, FakeResult(ids)))
+        return await transaction_func(tx, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_apply_merges_isolates_failures():
+    connector = FlakyConnector(poison="s3", missing={"s5"})
+    strategy = ForgettingStrategy(connector, ACTRCalculator(), enable_llm_summary=False)
+    merges = [
+        await strategy.prepare_merge(
+            {k: v for k, v in pair.items() if k.startswith("statement")},
+            {k: v for k, v in pair.items() if k.startswith("entity")},
+        )
+        for pair in _pairs(8)
+    ]
+    results = await strategy.apply_merges(merges)
+
+    # 一次批量事务失败后逐个重试
+    assert connector.transactions == [8] + [1] * 8
+    failed = {m["statement_id"]: str(results[m["summary_id"]]) for m in merges if results[m["summary_id"]]}
+    assert set(failed) == {"s3", "s5"}
+    assert "transaction failed" in failed["s3"]
+    assert "nodes may not exist" in failed["s5"]
+
+    with pytest.raises(RuntimeError, match="nodes may not exist"):
+        await strategy.merge_nodes_to_summary(
+            {"statement_id": "s5", "statement_text": "陈述", "statement_activation": 0.1, "statement_importance": 0.1},
+            {"entity_id": "e5", "entity_name": "实体", "entity_type": "Concept",
+             "entity_activation": 0.1, "entity_importance": 0.1},
+        )
+
+
+@pytest.fixture
+async def neo4j_connector():
+    from app.aioRedis import get_thread_safe_redis
+    from app.repositories.neo4j.neo4j_connector import Neo4jConnector
+
+    try:
+        connector = Neo4jConnector()
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    try:
+        await connector.driver.verify_connectivity()
+        await get_thread_safe_redis().ping()
+    except Exception as e:
+        await connector.close()
+        pytest.skip(f"Neo4j/Redis 不可用: {e}")
+    yield connector
+    await connector.close()
+
+
+async def _seed(connector, end_user_id, n):
+    """n 条陈述各连一个实体，实体首尾相连；全部设为低激活且长期未访问"""
+    from app.repositories.neo4j.graph_saver import save_dialog_and_statements_to_neo4j
+    from tests.memory.test_memory_counters import _build_graph
+
+    graph = _build_graph(end_user_id, n_statements=n)
+    assert await save_dialog_and_statements_to_neo4j(connector=connector, **graph)
+    await connector.execute_query(
+        """
+        MATCH (n) WHERE (n:Statement OR n:ExtractedEntity) AND n.end_user_id = $end_user_id
+        SET n.activation_value = 0.1, n.importance_score = 0.2, n.last_access_time = '2000-01-01T00:00:00Z'
+        """,
+        end_user_id=end_user_id,
+    )
+    return graph
+
+
+async def _snapshot(connector, end_user_id, graph):
+    """以原始节点的序号描述图：MemorySummary 用其原 Statement 的序号表示"""
+    index = {s.id: f"S{i}" for i, s in enumerate(graph["statement_nodes"])}
+    index.update({e.id: f"E{i}" for i, e in enumerate(graph["entity_nodes"])})
+    index[graph["chunk_nodes"][0].id] = "chunk"
+    index[graph["dialogue_nodes"][0].id] = "dialogue"
+    rows = await connector.execute_query(
+        """
+        MATCH (n) WHERE n.end_user_id = $end_user_id
+        OPTIONAL MATCH (n)-[r]->(m)
+        RETURN n.id AS source, n.original_statement_id AS source_summary_of, labels(n) AS labels,
+               type(r) AS rel, r.original_relationship_type AS original_type, r.merge_count AS merge_count,
+               m.id AS target, m.original_statement_id AS target_summary_of
+        """,
+        end_user_id=end_user_id,
+    )
+
+    def name(node_id, summary_of):
+        return f"summary({index[summary_of]})" if summary_of else index.get(node_id, node_id)
+
+    return sorted(
+        (
+            name(row["source"], row["source_summary_of"]), tuple(sorted(row["labels"])),
+            row["rel"], row["original_type"], row["merge_count"],
+            name(row["target"], row["target_summary_of"]) if row["target"] else None,
+        )
+        for row in rows
+    )
+
+
+@pytest.mark.asyncio
+async def test_batched_cycle_matches_serial_merges(neo4j_connector, monkeypatch):
+    monkeypatch.setattr(memory_counters, "_lookup_workspace_id", lambda uid: str(uuid.uuid4()))
+    connector = neo4j_connector
+    serial_user, batch_user = str(uuid.uuid4()), str(uuid.uuid4())
+    try:
+        serial_graph = await _seed(connector, serial_user, 40)
+        batch_graph = await _seed(connector, batch_user, 40)
+
+        # 逐个融合（原实现）
+        strategy = ForgettingStrategy(connector, ACTRCalculator(), forgetting_threshold=0.3, enable_llm_summary=False)
+        pairs = await strategy.find_forgettable_nodes(end_user_id=serial_user)
+        done = set()
+        for pair in sorted(pairs, key=lambda p: p["statement_text"]):
+            if pair["statement_id"] in done or pair["entity_id"] in done:
+                continue
+            done.update((pair["statement_id"], pair["entity_id"]))
+            await strategy.merge_nodes_to_summary(
+                {k: v for k, v in pair.items() if k.startswith("statement")} | {"end_user_id": serial_user},
+                {k: v for k, v in pair.items() if k.startswith("entity")},
+                llm_client=None,
+            )
+
+        # 批量融合：多个写事务，节点对顺序与逐个融合相同
+        monkeypatch.setattr(
+            strategy, "find_forgettable_nodes",
+            lambda **kwargs: _sorted_pairs(ForgettingStrategy.find_forgettable_nodes(strategy, **kwargs)),
+        )
+        scheduler = ForgettingScheduler(strategy, connector, summary_concurrency=8, merge_tx_batch_size=7)
+        report = await scheduler.run_forgetting_cycle(end_user_id=batch_user, max_merge_batch_size=1000)
+        assert report["merged_count"] == len(done) // 2
+        assert report["failed_count"] == 0
+
+        assert await _snapshot(connector, batch_user, batch_graph) == await _snapshot(connector, serial_user, serial_graph)
+    finally:
+        await connector.delete_group(serial_user)
+        await connector.delete_group(batch_user)
+
+
+async def _sorted_pairs(pairs):
+    # 激活值相同，按陈述文本排序使两次运行的顺序一致
+    return [dict(p, avg_activation=0.1) for p in sorted(await pairs, key=lambda p: p["statement_text"])]
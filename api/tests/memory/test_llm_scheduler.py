@@ -0,0 +1,260 @@
+# -*- coding: UTF-8 -*-
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core.memory.llm_tools import llm_scheduler
+from app.core.memory.llm_tools.llm_scheduler import (
+    LLMCallScheduler,
+    LLMPriority,
+    ModelBudget,
+    get_llm_scheduler,
+    is_rate_limit_error,
+)
+from app.core.memory.storage_services.extraction_engine.steps.base import (
+    ExtractionStep,
+    StepContext,
+)
+
+MODEL_KEY = "fake:model:-"
+
+
+class FakeLLM:
+    """记录并发数的假 LLM，可按需模拟 429"""
+
+    def __init__(self, latency: float = 0.01, fail_first: int = 0):
+        self.latency = latency
+        self.in_flight = 0
+        self.peak = 0
+        self.calls = 0
+        self.fail_first = fail_first
+        self.model_name = "model"
+        self.provider = "fake"
+        self.api_key = ""
+
+    async def chat(self, messages):
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise RuntimeError("Error code: 429 - Too Many Requests")
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return messages[-1]["content"]
+
+
+class EchoStep(ExtractionStep[str, str]):
+    @property
+    def name(self) -> str:
+        return "echo"
+
+    async def render_prompt(self, input_data: str):
+        return [{"role": "user", "content": input_data}]
+
+    async def call_llm(self, prompt):
+        return await self.llm_client.chat(prompt)
+
+    async def parse_response(self, raw_response, input_data: str) -> str:
+        return raw_response
+
+    def get_default_output(self) -> str:
+        return ""
+
+
+@pytest.mark.asyncio
+async def test_in_flight_bounded_by_budget():
+    llm = FakeLLM()
+    scheduler = LLMCallScheduler(default_budget=ModelBudget(max_concurrency=4, interactive_reserve=0))
+
+    results = await asyncio.gather(*[
+        scheduler.submit(MODEL_KEY, lambda i=i: llm.chat([{"content": str(i)}]))
+        for i in range(200)
+    ])
+
+    assert results == [str(i) for i in range(200)]
+    assert llm.peak == 4
+    assert scheduler.stats()[MODEL_KEY]["peak_in_flight"] == 4
+
+
+@pytest.mark.asyncio
+async def test_extraction_step_fan_out_is_bounded(monkeypatch):
+    """萃取阶段对所有 chunk 一次性 gather，实际在途请求仍受调度器约束"""
+    from app.core.memory.storage_services.extraction_engine.steps import base
+
+    scheduler = LLMCallScheduler(default_budget=ModelBudget(max_concurrency=5, interactive_reserve=0))
+    monkeypatch.setattr(base, "get_llm_scheduler", lambda: scheduler)
+    llm = FakeLLM()
+    step = EchoStep(StepContext(llm_client=llm, language="zh", config=None))
+
+    results = await asyncio.gather(*[step.run(f"chunk-{i}") for i in range(300)])
+
+    assert results == [f"chunk-{i}" for i in range(300)]
+    assert llm.peak <= 5
+
+
+@pytest.mark.asyncio
+async def test_interactive_calls_preempt_background_queue():
+    llm = FakeLLM(latency=0.02)
+    scheduler = LLMCallScheduler(default_budget=ModelBudget(max_concurrency=2, interactive_reserve=1))
+    order = []
+
+    async def call(tag, priority):
+        await scheduler.submit(MODEL_KEY, lambda: llm.chat([{"content": tag}]), priority=priority)
+        order.append(tag)
+
+    background = [asyncio.create_task(call(f"bg-{i}", LLMPriority.BACKGROUND)) for i in range(20)]
+    await asyncio.sleep(0.005)
+    interactive = asyncio.create_task(call("chat", LLMPriority.INTERACTIVE))
+    await asyncio.gather(interactive, *background)
+
+    # 后台任务最多占用 1 个槽位，交互请求无需排在 20 个后台请求之后
+    assert order.index("chat") <= 1
+
+
+@pytest.mark.asyncio
+async def test_interactive_preempts_background_queued_in_another_loop(monkeypatch):
+    """后台任务在另一线程的事件循环中排队（如 Celery 任务各自 asyncio.run），交互请求仍可越过队列"""
+    monkeypatch.setattr(
+        llm_scheduler,
+        "_scheduler",
+        LLMCallScheduler(default_budget=ModelBudget(max_concurrency=2, interactive_reserve=1)),
+    )
+    llm = FakeLLM(latency=0.02)
+    order = []
+    queued = threading.Event()
+    schedulers = []
+
+    async def call(tag, priority):
+        scheduler = get_llm_scheduler()
+        schedulers.append(scheduler)
+        await scheduler.submit(MODEL_KEY, lambda: llm.chat([{"content": tag}]), priority=priority)
+        order.append(tag)
+
+    async def background_task():
+        tasks = [asyncio.create_task(call(f"bg-{i}", LLMPriority.BACKGROUND)) for i in range(20)]
+        await asyncio.sleep(0.005)
+        queued.set()
+        await asyncio.gather(*tasks)
+
+    worker = threading.Thread(target=lambda: asyncio.run(background_task()))
+    worker.start()
+    await asyncio.to_thread(queued.wait, 5)
+    await call("chat", LLMPriority.INTERACTIVE)
+    await asyncio.to_thread(worker.join, 10)
+
+    assert all(s is schedulers[0] for s in schedulers)
+    # 后台任务最多占用 1 个槽位，交互请求无需排在另一循环的 20 个后台请求之后
+    assert order.index("chat") <= 2
+    stats = get_llm_scheduler().stats()[MODEL_KEY]
+    assert stats["completed"] == 21
+    assert stats["peak_in_flight"] <= 2
+    assert stats["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_backoff_and_retry():
+    llm = FakeLLM(fail_first=2)
+    scheduler = LLMCallScheduler(
+        default_budget=ModelBudget(max_concurrency=8, interactive_reserve=0),
+        backoff_base=0.01,
+    )
+
+    result = await scheduler.submit(MODEL_KEY, lambda: llm.chat([{"content": "ok"}]))
+
+    assert result == "ok"
+    stats = scheduler.stats()[MODEL_KEY]
+    assert stats["rate_limited"] == 2
+    assert stats["limit"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limit_cooldown_holds_queued_calls():
+    """429 归还许可时已进入冷却期，排队请求不会被立即放行"""
+    llm = FakeLLM(fail_first=1)
+    scheduler = LLMCallScheduler(
+        default_budget=ModelBudget(max_concurrency=1, interactive_reserve=0),
+        backoff_base=0.2,
+        max_rate_limit_retries=0,
+    )
+    started = []
+
+    async def queued():
+        started.append(time.monotonic())
+        return await llm.chat([{"content": "queued"}])
+
+    failing = asyncio.create_task(scheduler.submit(MODEL_KEY, lambda: llm.chat([{"content": "x"}])))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(scheduler.submit(MODEL_KEY, queued))
+    with pytest.raises(RuntimeError):
+        await failing
+    failed_at = time.monotonic()
+
+    assert await waiting == "queued"
+    assert started[0] - failed_at >= 0.15
+
+
+@pytest.mark.asyncio
+async def test_non_rate_limit_errors_propagate_without_retry():
+    scheduler = LLMCallScheduler()
+    calls = 0
+
+    async def boom():
+        nonlocal calls
+        calls += 1
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        await scheduler.submit(MODEL_KEY, boom)
+    assert calls == 1
+    assert scheduler.stats()[MODEL_KEY]["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute_budget_throttles():
+    llm = FakeLLM(latency=0)
+    # 6000 tokens/min = 100 tokens/s；桶初始满，额外 20 tokens 需等待约 0.2s
+    scheduler = LLMCallScheduler(default_budget=ModelBudget(max_concurrency=8, tokens_per_minute=6000))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        scheduler.submit(MODEL_KEY, lambda: llm.chat([{"content": "x"}]), estimated_tokens=1010)
+        for _ in range(6)
+    ])
+    elapsed = time.perf_counter() - start
+
+    assert 0.1 < elapsed < 1.0
+
+
+@pytest.mark.asyncio
+async def test_total_completion_time_stable_under_bound():
+    """调度后总耗时约为 ceil(N / 并发) × 单次延迟，不随请求数突增而恶化"""
+    latency = 0.01
+    llm = FakeLLM(latency=latency)
+    scheduler = LLMCallScheduler(default_budget=ModelBudget(max_concurrency=10, interactive_reserve=0))
+
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        scheduler.submit(MODEL_KEY, lambda: llm.chat([{"content": "x"}])) for _ in range(100)
+    ])
+    elapsed = time.perf_counter() - start
+
+    assert llm.peak == 10
+    assert elapsed < 10 * latency * 3
+
+
+def test_is_rate_limit_error():
+    class HTTPError(Exception):
+        status_code = 429
+
+    assert is_rate_limit_error(HTTPError())
+    assert is_rate_limit_error(RuntimeError("Rate limit reached for requests"))
+    try:
+        try:
+            raise HTTPError()
+        except HTTPError as e:
+            raise RuntimeError("LLM 调用失败") from e
+    except RuntimeError as wrapped:
+        assert is_rate_limit_error(wrapped)
+    assert not is_rate_limit_error(ValueError("used 4290 tokens"))
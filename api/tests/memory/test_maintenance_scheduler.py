@@ -0,0 +1,171 @@
+# -*- coding: UTF-8 -*-
+"""变更驱动的记忆维护调度测试
+
+需要可用的 Redis，环境不可用时跳过。
+"""
+import asyncio
+import time
+import uuid
+from collections import Counter
+
+import pytest
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.memory.utils.maintenance_scheduler import (
+    JOB_FORGETTING,
+    JOB_INSIGHT_SUMMARY,
+    JOB_REFLECTION,
+    MemoryMaintenanceScheduler,
+)
+
+
+class CountingHandler:
+    """记录每个用户被处理次数的假维护处理函数"""
+
+    def __init__(self, failing=()):
+        self.calls = Counter()
+        self.failing = set(failing)
+
+    async def __call__(self, end_user_id):
+        self.calls[end_user_id] += 1
+        if end_user_id in self.failing:
+            raise RuntimeError("LLM 调用失败")
+        return True
+
+
+@pytest.fixture
+async def scheduler():
+    client = aioredis.StrictRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB_CELERY_BACKEND,
+        password=settings.REDIS_PASSWORD or None,
+        decode_responses=True,
+    )
+    try:
+        await client.ping()
+    except Exception as e:
+        await client.aclose()
+        pytest.skip(f"Redis 不可用: {e}")
+    scheduler = MemoryMaintenanceScheduler(client, shards=8, batch_size=10)
+    scheduler.PREFIX = f"test_maintenance:{uuid.uuid4().hex}"
+    yield scheduler
+    keys = [key async for key in client.scan_iter(f"{scheduler.PREFIX}:*")]
+    if keys:
+        await client.delete(*keys)
+    await client.aclose()
+
+
+async def _run_all_shards(scheduler, job, handler, **kwargs):
+    results = []
+    for shard in await scheduler.dispatch(job, **kwargs):
+        results.append(await scheduler.run_shard(job, shard, handler, track_last_run=job == JOB_FORGETTING))
+    return results
+
+
+@pytest.mark.asyncio
+async def test_work_proportional_to_active_users(scheduler):
+    users = [f"user-{i}" for i in range(10_000)]
+    active = users[::100]  # 1% 的用户有记忆写入
+    # 全部用户都已处理过一次，遗忘周期的重访期未到
+    await scheduler.redis.zadd(scheduler._last_run_key(JOB_FORGETTING), {uid: time.time() for uid in users})
+
+    # 写入路径：同一用户的多次写入只记一次
+    for _ in range(3):
+        await scheduler.mark_changed(active)
+
+    for job in (JOB_INSIGHT_SUMMARY, JOB_FORGETTING):
+        handler = CountingHandler()
+        results = await _run_all_shards(scheduler, job, handler, revisit_after=7 * 86400)
+        assert set(handler.calls) == set(active)
+        assert all(count == 1 for count in handler.calls.values())
+        assert sum(r.processed for r in results) == len(active)
+        assert all(r.finished for r in results)
+
+    # 没有新写入时不做任何工作
+    handler = CountingHandler()
+    assert await _run_all_shards(scheduler, JOB_INSIGHT_SUMMARY, handler) == []
+    assert not handler.calls
+
+    # 超过重访期的用户即使没有写入也会执行遗忘周期
+    stale = users[:5]
+    await scheduler.redis.zadd(scheduler._last_run_key(JOB_FORGETTING), {uid: 0 for uid in stale})
+    handler = CountingHandler()
+    await _run_all_shards(scheduler, JOB_FORGETTING, handler, revisit_after=7 * 86400)
+    assert set(handler.calls) == set(stale)
+
+
+@pytest.mark.asyncio
+async def test_shard_resumes_from_checkpoint_and_retries_failures(scheduler):
+    users = [f"user-{i}" for i in range(200)]
+    await scheduler.mark_changed(users, jobs=[JOB_INSIGHT_SUMMARY])
+    pending = await scheduler.dispatch(JOB_INSIGHT_SUMMARY)
+    assert sum(pending.values()) == len(users)
+
+    shard = max(pending, key=pending.get)
+    # 截止时间已到：不认领任何批次
+    expired = await scheduler.run_shard(JOB_INSIGHT_SUMMARY, shard, CountingHandler(), deadline=time.monotonic())
+    assert expired.processed == 0 and expired.remaining == pending[shard]
+
+    handler = CountingHandler()
+
+    async def slow_handler(end_user_id):
+        await asyncio.sleep(0.02)
+        return await handler(end_user_id)
+
+    # 一批耗时约 0.2 秒，第一批完成（检查点）后截止时间已过，停止认领
+    partial = await scheduler.run_shard(
+        JOB_INSIGHT_SUMMARY, shard, slow_handler, deadline=time.monotonic() + 0.1
+    )
+    assert partial.processed == scheduler.batch_size
+    assert partial.remaining == pending[shard] - scheduler.batch_size
+
+    # 新一轮分发不会丢失或重复分片中未完成的用户
+    failing = set(users[:3])
+    resume_handler = CountingHandler(failing=failing)
+    await scheduler.mark_changed(["late-user"], jobs=[JOB_INSIGHT_SUMMARY])
+    results = await _run_all_shards(scheduler, JOB_INSIGHT_SUMMARY, resume_handler)
+    processed = set(handler.calls) | set(resume_handler.calls)
+    assert processed == set(users) | {"late-user"}
+    assert not set(handler.calls) & set(resume_handler.calls)
+    assert all(r.remaining == 0 for r in results)
+
+    # 失败的用户放回待处理集合，下一轮重试
+    retry_handler = CountingHandler()
+    await _run_all_shards(scheduler, JOB_INSIGHT_SUMMARY, retry_handler)
+    assert set(retry_handler.calls) == failing & set(resume_handler.calls)
+
+
+@pytest.mark.asyncio
+async def test_shard_lock_prevents_concurrent_runs(scheduler):
+    await scheduler.mark_changed(["user-1"], jobs=[JOB_INSIGHT_SUMMARY])
+    (shard,) = await scheduler.dispatch(JOB_INSIGHT_SUMMARY)
+    await scheduler.redis.set(scheduler._lock_key(JOB_INSIGHT_SUMMARY, shard), "other-worker")
+
+    handler = CountingHandler()
+    result = await scheduler.run_shard(JOB_INSIGHT_SUMMARY, shard, handler)
+    assert result.skipped and result.remaining == 1
+    assert not handler.calls
+
+
+@pytest.mark.asyncio
+async def test_claimed_users_survive_interrupted_run(scheduler):
+    await scheduler.mark_changed(["user-1", "user-2"], jobs=[JOB_REFLECTION])
+    token, users = await scheduler.take_changed(JOB_REFLECTION)
+    assert sorted(users) == ["user-1", "user-2"]
+    # 上一轮仍在执行时不重复认领
+    assert await scheduler.take_changed(JOB_REFLECTION) is None
+
+    # 模拟进程被杀：没有调用 complete_changed，执行锁过期后下一轮连同新变更一起取回
+    await scheduler.mark_changed(["user-3"], jobs=[JOB_REFLECTION])
+    await scheduler.redis.delete(scheduler._claim_lock_key(JOB_REFLECTION))
+    token, users = await scheduler.take_changed(JOB_REFLECTION)
+    assert sorted(users) == ["user-1", "user-2", "user-3"]
+
+    # 确认后只有失败的用户留待下一轮
+    await scheduler.complete_changed(JOB_REFLECTION, token, retry_user_ids=["user-2"])
+    token, users = await scheduler.take_changed(JOB_REFLECTION)
+    assert users == ["user-2"]
+    await scheduler.complete_changed(JOB_REFLECTION, token)
+    assert (await scheduler.take_changed(JOB_REFLECTION))[1] == []
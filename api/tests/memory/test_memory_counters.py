@@ -0,0 +1,171 @@
+# -*- coding: UTF-8 -*-
+"""记忆计数器测试
+
+集成测试需要可用的 Neo4j（NEO4J_PASSWORD）与 Redis，环境不可用时跳过。
+"""
+import uuid
+
+import pytest
+
+from app.cache.memory.memory_counters import (
+    MemoryCounterCache,
+    counter_deltas,
+    merge_deltas,
+)
+from app.core.utils.datetime_utils import utcnow_naive
+
+
+def test_counter_deltas_from_write_summary():
+    forget = {"nodes_created": 1, "nodes_deleted": 2, "relationships_created": 3, "relationships_deleted": 5}
+    merged = merge_deltas(
+        counter_deltas(forget),
+        {"statement": -1, "entity": -1, "summary": 1},
+    )
+    assert merged == {
+        "total": -1, "dialogue": 0, "chunk": 0, "statement": -1,
+        "entity": -1, "summary": 1, "edge": -2,
+    }
+
+    dedup = {"nodes_created": 0, "nodes_deleted": 1, "relationships_created": 4, "relationships_deleted": 6}
+    assert counter_deltas(dedup, "entity") == {"total": -1, "edge": -2, "entity": -1}
+
+
+@pytest.fixture
+async def neo4j_connector():
+    from app.aioRedis import get_thread_safe_redis
+    from app.repositories.neo4j.neo4j_connector import Neo4jConnector
+
+    try:
+        connector = Neo4jConnector()
+    except RuntimeError as e:
+        pytest.skip(str(e))
+    try:
+        await connector.driver.verify_connectivity()
+        await get_thread_safe_redis().ping()
+    except Exception as e:
+        await connector.close()
+        pytest.skip(f"Neo4j/Redis 不可用: {e}")
+    yield connector
+    await connector.close()
+
+
+def _build_graph(end_user_id: str, n_statements: int, shared_entity=None):
+    """构造一次写入：1 个对话、1 个分块、n 条陈述，每条陈述一个实体，实体之间首尾相连"""
+    from app.core.memory.models.graph_models import (
+        ChunkNode,
+        DialogueNode,
+        EntityEntityEdge,
+        ExtractedEntityNode,
+        StatementChunkEdge,
+        StatementEntityEdge,
+        StatementNode,
+    )
+    from app.core.memory.utils.data.ontology import TemporalInfo
+
+    now = utcnow_naive()
+    dialogue = DialogueNode(
+        id=uuid.uuid4().hex, name="dialog", end_user_id=end_user_id, created_at=now,
+        ref_id=uuid.uuid4().hex, content="对话内容",
+    )
+    chunk = ChunkNode(
+        id=uuid.uuid4().hex, name="chunk", end_user_id=end_user_id, created_at=now,
+        dialog_id=dialogue.id, content="分块内容", sequence_number=0,
+    )
+    statements, entities = [], []
+    sc_edges, se_edges, ee_edges = [], [], []
+    for i in range(n_statements):
+        statement = StatementNode(
+            id=uuid.uuid4().hex, name=f"statement-{i}", end_user_id=end_user_id, created_at=now,
+            chunk_id=chunk.id, stmt_type="FACT", statement=f"陈述 {i}",
+            temporal_info=TemporalInfo.STATIC, connect_strength="Strong",
+        )
+        entity = shared_entity if (shared_entity and i == 0) else ExtractedEntityNode(
+            id=uuid.uuid4().hex, name=f"实体-{uuid.uuid4().hex[:6]}", end_user_id=end_user_id, created_at=now,
+            entity_idx=i, statement_id=statement.id, entity_type="Concept",
+            description="测试实体", connect_strength="Strong",
+        )
+        statements.append(statement)
+        entities.append(entity)
+        sc_edges.append(StatementChunkEdge(
+            source=statement.id, target=chunk.id, end_user_id=end_user_id, created_at=now,
+        ))
+        se_edges.append(StatementEntityEdge(
+            source=statement.id, target=entity.id, end_user_id=end_user_id, created_at=now,
+            connect_strength="Strong",
+        ))
+    for a, b in zip(entities, entities[1:]):
+        ee_edges.append(EntityEntityEdge(
+            source=a.id, target=b.id, end_user_id=end_user_id, created_at=now,
+            relation_type="RELATED_TO", relation_type_surface="相关", statement="相关",
+            source_statement_id=statements[0].id,
+        ))
+    return dict(
+        dialogue_nodes=[dialogue], chunk_nodes=[chunk], statement_nodes=statements,
+        entity_nodes=entities, perceptual_nodes=[], entity_edges=ee_edges,
+        statement_chunk_edges=sc_edges, statement_entity_edges=se_edges, perceptual_edges=[],
+    )
+
+
+@pytest.mark.asyncio
+async def test_counters_match_aggregates_after_mixed_workload(neo4j_connector):
+    from app.core.memory.storage_services.forgetting_engine.actr_calculator import ACTRCalculator
+    from app.core.memory.storage_services.forgetting_engine.forgetting_strategy import ForgettingStrategy
+    from app.core.memory.storage_services.reflection_engine.deterministic.cypher_merger import execute_merge
+    from app.core.memory.utils.memory_count_utils import count_memory_from_neo4j, reconcile_memory_counters
+    from app.repositories.neo4j.graph_saver import save_dialog_and_statements_to_neo4j
+
+    end_user_id = str(uuid.uuid4())
+    connector = neo4j_connector
+
+    try:
+        # 播种：新用户计数为 0
+        await reconcile_memory_counters([end_user_id], connector)
+
+        # 写入：两批数据，第二批复用第一批的实体（MERGE 不新增节点）
+        first = _build_graph(end_user_id, n_statements=4)
+        assert await save_dialog_and_statements_to_neo4j(connector=connector, **first)
+        second = _build_graph(end_user_id, n_statements=3, shared_entity=first["entity_nodes"][0])
+        assert await save_dialog_and_statements_to_neo4j(connector=connector, **second)
+
+        # 去重合并：两个实体合并为一个
+        keeper, loser = first["entity_nodes"][1], first["entity_nodes"][2]
+        assert await execute_merge(connector, end_user_id, keeper.id, loser.id, keeper.name, [loser.name])
+
+        # 遗忘：一对 Statement-Entity 融合为 MemorySummary
+        strategy = ForgettingStrategy(connector, ACTRCalculator(), enable_llm_summary=False)
+        statement, entity = second["statement_nodes"][2], second["entity_nodes"][2]
+        await strategy.merge_nodes_to_summary(
+            {
+                "statement_id": statement.id, "statement_text": statement.statement,
+                "statement_activation": 0.1, "statement_importance": 0.1, "end_user_id": end_user_id,
+            },
+            {
+                "entity_id": entity.id, "entity_name": entity.name, "entity_type": "Concept",
+                "entity_activation": 0.1, "entity_importance": 0.1,
+            },
+        )
+
+        actual = (await count_memory_from_neo4j([end_user_id], connector))[end_user_id]
+        assert actual["statement"] == 6 and actual["summary"] == 1
+        assert await MemoryCounterCache.get_end_user_counters(end_user_id) == actual
+
+        # 删除用户数据后计数清除
+        await connector.delete_group(end_user_id)
+        assert await MemoryCounterCache.get_end_user_counters(end_user_id) is None
+    finally:
+        await connector.delete_group(end_user_id)
+
+
+@pytest.mark.asyncio
+async def test_counters_without_end_user_are_zero(monkeypatch):
+    try:
+        from app.services import memory_storage_service
+    except RuntimeError as e:
+        pytest.skip(str(e))
+
+    async def fail(*args, **kwargs):
+        raise AssertionError("不应读取或创建 by_user:None 计数")
+
+    monkeypatch.setattr(memory_storage_service, "get_memory_counters_batch", fail)
+    assert (await memory_storage_service.search_dialogue(None))["num"] == 0
+    assert (await memory_storage_service.kb_type_distribution(None))["total"] == 0
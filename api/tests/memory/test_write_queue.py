@@ -0,0 +1,156 @@
+# -*- coding: UTF-8 -*-
+"""per-end_user 写入合并队列测试
+
+需要可用的 Redis，环境不可用时跳过。
+"""
+import asyncio
+import uuid
+from collections import Counter
+
+import pytest
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+from app.core.memory.sliding_window.write_queue import MemoryWriteJob, MemoryWriteQueue
+
+
+class FakePipeline:
+    """记录执行次数的假写入流水线，模拟单次执行耗时"""
+
+    def __init__(self, latency: float = 0.02):
+        self.latency = latency
+        self.runs = 0
+        self.in_flight = Counter()
+        self.overlapped = False
+        self.written = Counter()
+
+    async def __call__(self, end_user_id, jobs):
+        self.runs += 1
+        self.in_flight[end_user_id] += 1
+        if self.in_flight[end_user_id] > 1:
+            self.overlapped = True
+        await asyncio.sleep(self.latency)
+        for job in jobs:
+            self.written[job.job_id] += 1
+        self.in_flight[end_user_id] -= 1
+        return {}
+
+
+@pytest.fixture
+async def redis_client():
+    client = aioredis.StrictRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB_CELERY_BACKEND,
+        password=settings.REDIS_PASSWORD or None,
+        decode_responses=True,
+    )
+    try:
+        await client.ping()
+    except Exception as e:
+        await client.aclose()
+        pytest.skip(f"Redis 不可用: {e}")
+    yield client
+    await client.aclose()
+
+
+async def _cleanup(client, end_user_ids):
+    for uid in end_user_ids:
+        await client.delete(
+            f"{MemoryWriteQueue.PREFIX}:queue:{uid}",
+            f"{MemoryWriteQueue.PREFIX}:processing:{uid}",
+            f"{MemoryWriteQueue.PREFIX}:drainer:{uid}",
+        )
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writers_coalesced_without_loss(redis_client):
+    pipeline = FakePipeline()
+    scheduled = []
+
+    async def schedule_drain(end_user_id):
+        scheduled.append(end_user_id)
+
+    queue = MemoryWriteQueue(redis_client, processor=pipeline, schedule_drain=schedule_drain)
+    hot_users = [f"test-{uuid.uuid4().hex}" for _ in range(3)]
+
+    jobs = [
+        MemoryWriteJob(end_user_id=hot_users[i % 3], conversation_id=str(uuid.uuid4()),
+                       messages=[{"role": "user", "content": f"消息 {i}"}])
+        for i in range(150)
+    ]
+    try:
+        outcomes = await asyncio.gather(*[queue.submit(job, wait=True, wait_timeout=30) for job in jobs])
+    finally:
+        await _cleanup(redis_client, hot_users)
+
+    assert [o.status for o in outcomes] == ["done"] * len(jobs)
+    assert all(pipeline.written[job.job_id] == 1 for job in jobs)
+    assert not pipeline.overlapped
+    # 同一用户的并发写入被合并，执行次数远少于写入次数
+    assert pipeline.runs <= len(jobs) // 5
+    assert sum(o.drained for o in outcomes) >= len(hot_users)
+    assert scheduled == []
+
+
+@pytest.mark.asyncio
+async def test_exclusive_defers_writes_to_drain(redis_client):
+    pipeline = FakePipeline(latency=0)
+    scheduled = []
+
+    async def schedule_drain(end_user_id):
+        scheduled.append(end_user_id)
+
+    queue = MemoryWriteQueue(redis_client, processor=pipeline, schedule_drain=schedule_drain)
+    end_user_id = f"test-{uuid.uuid4().hex}"
+    job = MemoryWriteJob(end_user_id=end_user_id, conversation_id=str(uuid.uuid4()))
+    try:
+        async with queue.exclusive(end_user_id) as owned:
+            assert owned
+            # 维护任务持有期间写入只入队，不等待
+            outcome = await queue.submit(job)
+            assert outcome.status == "queued"
+            async with queue.exclusive(end_user_id) as owned_again:
+                assert not owned_again
+        assert scheduled == [end_user_id]
+        assert pipeline.runs == 0
+
+        # drain 任务接手后写入完成
+        assert await queue.drain(end_user_id)
+        assert pipeline.written[job.job_id] == 1
+        assert await queue.pending_count(end_user_id) == 0
+    finally:
+        await _cleanup(redis_client, [end_user_id])
+
+
+@pytest.mark.asyncio
+async def test_sweep_schedules_drain_for_stranded_queues(redis_client):
+    pipeline = FakePipeline(latency=0)
+    scheduled = []
+
+    async def schedule_drain(end_user_id):
+        scheduled.append(end_user_id)
+
+    queue = MemoryWriteQueue(redis_client, processor=pipeline, schedule_drain=schedule_drain)
+    stranded, crashed, busy = (f"test-{uuid.uuid4().hex}" for _ in range(3))
+    job = MemoryWriteJob(end_user_id=crashed, conversation_id=str(uuid.uuid4()))
+    try:
+        # drainer 被强杀：queue / processing 有任务，drainer key 已过期
+        await redis_client.rpush(queue._queue_key(stranded), job.to_json())
+        await redis_client.rpush(queue._processing_key(crashed), job.to_json())
+        # 仍有存活 drainer 的用户不重复派发
+        await redis_client.rpush(queue._queue_key(busy), job.to_json())
+        await redis_client.set(queue._drainer_key(busy), "token", ex=60)
+
+        swept = await queue.sweep_stranded()
+        assert sorted(swept) == sorted([stranded, crashed])
+        assert sorted(scheduled) == sorted([stranded, crashed])
+
+        # 重放 processing：已写入候选池的任务被记录，不会重复追加
+        await queue.mark_applied(job.job_id)
+        assert await queue.applied_jobs([job.job_id, "missing"]) == {job.job_id}
+        assert await queue.drain(crashed)
+        assert pipeline.written[job.job_id] == 1
+    finally:
+        await _cleanup(redis_client, [stranded, crashed, busy])
+        await redis_client.delete(queue._applied_key(job.job_id), queue._done_key(job.job_id))
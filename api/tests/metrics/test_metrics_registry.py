@@ -0,0 +1,231 @@
+# -*- coding: UTF-8 -*-
+"""进程内指标注册表测试
+
+- Prometheus 文本导出：直方图桶累计、标签转义
+- 标签组合数有上限，超出后计入 other 序列
+- 连接池等待、Elasticsearch 请求、Celery 任务的埋点
+- 导出端点的 token 校验与 worker 端口的监听地址
+- 事务监控、问题扩展监控记入注册表
+- 单次埋点开销不超过预算
+"""
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from app.core import metrics
+from app.core.metrics import MetricsRegistry
+
+# 单次埋点开销预算（微秒），取多轮中最快的一轮，避免偶发调度抖动
+OBSERVE_BUDGET_US = 5
+TIMER_BUDGET_US = 10
+
+
+@pytest.fixture(autouse=True)
+def _reset_registry():
+    metrics.REGISTRY.reset()
+    yield
+    metrics.REGISTRY.reset()
+
+
+def test_render_histogram_and_counter():
+    registry = MetricsRegistry()
+    latency = registry.histogram("query_seconds", "查询耗时", ("endpoint",), buckets=(0.1, 1.0))
+    tokens = registry.counter("tokens_total", "token 数", ("model",))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        latency.observe(value, "search")
+    tokens.inc('qwen"max\n', amount=12)
+
+    text = registry.render()
+    assert text.splitlines() == [
+        "# HELP query_seconds 查询耗时",
+        "# TYPE query_seconds histogram",
+        'query_seconds_bucket{endpoint="search",le="0.1"} 1',
+        'query_seconds_bucket{endpoint="search",le="1"} 3',
+        'query_seconds_bucket{endpoint="search",le="+Inf"} 4',
+        'query_seconds_sum{endpoint="search"} 4.05',
+        'query_seconds_count{endpoint="search"} 4',
+        "# HELP tokens_total token 数",
+        "# TYPE tokens_total counter",
+        'tokens_total{model="qwen\\"max\\n"} 12',
+    ]
+
+
+def test_label_cardinality_is_bounded():
+    registry = MetricsRegistry()
+    latency = registry.histogram("node_seconds", "节点耗时", ("node_type",), max_series=3)
+    for i in range(100):
+        latency.observe(0.01, f"type-{i}")
+
+    assert latency.count("type-0") == 1
+    assert latency.count("type-2") == 1
+    assert latency.count("type-3") == 0
+    assert latency.count("other") == 97
+    assert registry.render().count("node_seconds_count") == 4
+
+    with pytest.raises(ValueError):
+        latency.observe(0.01, "a", "b")
+
+
+def test_timer_adds_status():
+    registry = MetricsRegistry()
+    latency = registry.histogram("call_seconds", "调用耗时", ("operation", "status"))
+    with latency.time("query"):
+        pass
+    with pytest.raises(RuntimeError):
+        with latency.time("query"):
+            raise RuntimeError("boom")
+
+    assert latency.count("query", "ok") == 1
+    assert latency.count("query", "error") == 1
+
+
+def test_concurrent_observations_are_counted():
+    registry = MetricsRegistry()
+    latency = registry.histogram("call_seconds", "调用耗时", ("worker",))
+
+    def worker(i):
+        for _ in range(5000):
+            latency.observe(0.01, str(i % 2))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert latency.count("0") + latency.count("1") == 8 * 5000
+
+
+def _per_call_us(fn, calls=20000, rounds=5):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(calls):
+            fn()
+        best = min(best, time.perf_counter() - start)
+    return best / calls * 1e6
+
+
+def test_instrumentation_overhead_within_budget():
+    latency = metrics.NEO4J_QUERY_DURATION
+    tokens = metrics.MODEL_TOKENS
+
+    def timed():
+        with latency.time("query"):
+            pass
+
+    baseline = _per_call_us(lambda: None)
+    observe = _per_call_us(lambda: latency.observe(0.01, "query", "ok")) - baseline
+    inc = _per_call_us(lambda: tokens.inc("openai", "gpt-4o", "input", amount=10)) - baseline
+    timer = _per_call_us(timed) - baseline
+
+    assert observe < OBSERVE_BUDGET_US, f"observe {observe:.2f}us"
+    assert inc < OBSERVE_BUDGET_US, f"inc {inc:.2f}us"
+    assert timer < TIMER_BUDGET_US, f"timer {timer:.2f}us"
+
+
+def test_pool_wait_recorded():
+    from sqlalchemy import create_engine, text
+
+    from app.db import TimedQueuePool
+
+    engine = create_engine("sqlite://", poolclass=TimedQueuePool, pool_size=1, max_overflow=0)
+    for _ in range(3):
+        with engine.connect() as conn:
+            conn.execute(text("select 1"))
+    engine.dispose()
+    assert metrics.DB_POOL_WAIT.count() == 3
+
+
+def test_elasticsearch_requests_are_timed():
+    from elastic_transport import ConnectionError as TransportConnectionError
+
+    from app.core.rag.utils.es_client import MeteredElasticsearch
+
+    client = MeteredElasticsearch("http://127.0.0.1:1", max_retries=0, request_timeout=1)
+    with pytest.raises(TransportConnectionError):
+        client.info()
+    assert metrics.ES_REQUEST_DURATION.count("info", "error") == 1
+
+    # options() 返回的客户端同样计时；没有 endpoint_id 的请求（ping）按 HTTP 方法记录
+    assert client.options(request_timeout=1).ping() is False
+    assert metrics.ES_REQUEST_DURATION.count("HEAD", "error") == 1
+
+
+def test_celery_task_metrics():
+    now = time.time()
+    metrics.task_started("t1", "app.tasks.demo", "memory_tasks", published_at=now - 2)
+    metrics.task_finished("t1", "app.tasks.demo", "memory_tasks", "SUCCESS")
+    # 延迟执行的任务从 ETA 起算排队延迟
+    metrics.task_started("t2", "app.tasks.demo", "memory_tasks", published_at=now - 120,
+                         eta=time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime(now - 1)))
+    metrics.task_finished("t2", "app.tasks.demo", "memory_tasks", "FAILURE")
+
+    lag = metrics.CELERY_QUEUE_LAG
+    assert lag.count("app.tasks.demo", "memory_tasks") == 2
+    assert 3 <= lag.sum("app.tasks.demo", "memory_tasks") < 10
+    duration = metrics.CELERY_TASK_DURATION
+    assert duration.count("app.tasks.demo", "memory_tasks", "success") == 1
+    assert duration.count("app.tasks.demo", "memory_tasks", "failure") == 1
+
+
+def test_worker_metrics_server():
+    metrics.WORKFLOW_NODE_DURATION.observe(0.2, "llm", "completed")
+    port = metrics.start_metrics_server(0, host="127.0.0.1")
+    try:
+        assert metrics.start_metrics_server(0, host="127.0.0.1") == port
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+            assert response.headers["Content-Type"] == metrics.CONTENT_TYPE
+            body = response.read().decode()
+    finally:
+        metrics.stop_metrics_server()
+    assert 'workflow_node_duration_seconds_count{node_type="llm",status="completed"} 1' in body
+    assert "# TYPE celery_task_queue_lag_seconds histogram" in body
+
+
+def test_worker_metrics_server_requires_token(monkeypatch):
+    monkeypatch.setattr(metrics.settings, "METRICS_TOKEN", "")
+    # 未配置 token 时不监听非本机地址
+    assert metrics.start_metrics_server(0, host="0.0.0.0") is None
+    assert not metrics.is_authorized("Bearer ")
+
+    monkeypatch.setattr(metrics.settings, "METRICS_TOKEN", "s3cret")
+    assert metrics.is_authorized("Bearer s3cret")
+    assert not metrics.is_authorized("Bearer wrong") and not metrics.is_authorized(None)
+
+    port = metrics.start_metrics_server(0, host="127.0.0.1")
+    url = f"http://127.0.0.1:{port}/metrics"
+    try:
+        with pytest.raises(urllib.error.HTTPError) as exc_info:
+            urllib.request.urlopen(url, timeout=5)
+        assert exc_info.value.code == 401
+        request = urllib.request.Request(url, headers={"Authorization": "Bearer s3cret"})
+        with urllib.request.urlopen(request, timeout=5) as response:
+            assert response.status == 200
+    finally:
+        metrics.stop_metrics_server()
+
+
+def test_legacy_monitors_record_into_registry():
+    from app.core.memory.agent.utils.performance_monitor import ProblemExtensionMonitor
+    from app.core.transaction_monitor import TransactionMonitor
+
+    monitor = TransactionMonitor()
+    with monitor.monitor_transaction("create_user", {"user_id": "u1"}):
+        pass
+    with pytest.raises(RuntimeError):
+        with monitor.monitor_transaction("create_user"):
+            raise RuntimeError("boom")
+    assert metrics.DB_TRANSACTION_DURATION.count("create_user", "ok") == 1
+    assert metrics.DB_TRANSACTION_DURATION.count("create_user", "error") == 1
+
+    extension = ProblemExtensionMonitor()
+    assert extension.get_stats() == {"message": "暂无数据"}
+    extension.record_execution(2.0, 3, True)
+    extension.record_execution(12.0, 1, False)
+    stats = extension.get_stats()
+    assert stats["total_executions"] == 2 and stats["avg_duration"] == 7.0
+    assert stats["error_rate"] == 0.5 and stats["slow_queries_count"] == 1
+    assert metrics.PROBLEM_EXTENSION_QUESTIONS.value() == 4
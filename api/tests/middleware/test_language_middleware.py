@@ -0,0 +1,86 @@
+# -*- coding: UTF-8 -*-
+"""纯 ASGI 语言中间件测试：识别请求语言，SSE 响应逐块透传，只在响应头中加入 Content-Language"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from app.i18n.exceptions import get_current_locale
+from app.i18n.middleware import LanguageMiddleware
+
+
+def _app(*middlewares):
+    app = FastAPI()
+
+    @app.get("/v1/chat/stream")
+    async def stream(request: Request):
+        language = request.state.language
+        locale = get_current_locale()
+
+        async def events():
+            for i in range(5):
+                yield f"data: {i} {language} {locale}\n\n"
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    for middleware in middlewares:
+        app.add_middleware(middleware)
+    return app
+
+
+async def _body_messages(app, path, headers=()):
+    """直接驱动 ASGI 应用，返回响应头和每个响应体消息"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+        "headers": [(k.lower().encode(), v.encode()) for k, v in headers],
+        "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+    }
+    messages = []
+    requested = False
+    done = asyncio.Event()
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await done.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+        if message["type"] == "http.response.body" and not message.get("more_body", False):
+            done.set()
+
+    await app(scope, receive, send)
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    headers = {k.decode().lower(): v.decode() for k, v in start["headers"]}
+    return headers, [m["body"] for m in messages if m["type"] == "http.response.body" and m.get("body")]
+
+
+@pytest.mark.parametrize("headers, query, expected", [
+    ({"Accept-Language": "en-US,en;q=0.9"}, "", "en"),
+    ({"Accept-Language": "fr-FR,zh;q=0.5"}, "", "zh"),
+    ({"Accept-Language": "zh-CN"}, "?lang=en", "en"),
+    ({}, "?lang=xx", "zh"),
+])
+def test_language_detection(headers, query, expected, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "I18N_SUPPORTED_LANGUAGES", ["zh", "en"])
+    monkeypatch.setattr(settings, "I18N_DEFAULT_LANGUAGE", "zh")
+    with TestClient(_app(LanguageMiddleware)) as client:
+        response = client.get(f"/v1/chat/stream{query}", headers=headers)
+    assert response.headers["content-language"] == expected
+    assert response.text.splitlines()[0] == f"data: 0 {expected} {expected}"
+
+
+@pytest.mark.asyncio
+async def test_stream_chunks_pass_through():
+    # 每个 SSE 分块作为独立的响应体消息到达，与没有中间件时相同
+    headers, bodies = await _body_messages(_app(LanguageMiddleware), "/v1/chat/stream", [("Accept-Language", "en")])
+    assert headers["content-language"] == "en"
+    assert headers["content-type"].startswith("text/event-stream")
+    assert bodies == [f"data: {i} en en\n\n".encode() for i in range(5)]
@@ -0,0 +1,97 @@
+# -*- coding: UTF-8 -*-
+import random
+import time
+
+from app.core.moderation.keywords.keywords import KeywordsModeration
+from app.core.moderation.output_moderation import OutputModeration
+
+ALPHABET = "abcdeΑΒΣσςος İi "
+
+
+def _keywords_config(keywords: list[str]) -> dict:
+    return {
+        "keywords": "\n".join(keywords),
+        "inputs_config": {"enabled": True, "preset_response": "blocked"},
+        "outputs_config": {"enabled": True, "preset_response": "blocked"},
+    }
+
+
+def _full_rescan(text: str, keywords: list[str]) -> bool:
+    """原实现：每次对累积全文逐关键词做小写子串判断"""
+    lowered = text.lower()
+    return any(kw.strip().lower() in lowered for kw in keywords if kw.strip())
+
+
+def _stream(keywords: list[str], chunks: list[str]) -> OutputModeration:
+    moderation = OutputModeration(
+        app_id="app",
+        tenant_id="tenant",
+        moderation_type="keywords",
+        moderation_config={"enabled": True, "config": _keywords_config(keywords)},
+    )
+    for chunk in chunks:
+        if moderation.accumulate(chunk):
+            break
+    moderation.check_final()
+    return moderation
+
+
+def _random_chunks(rng: random.Random, length: int) -> list[str]:
+    text = "".join(rng.choice(ALPHABET) for _ in range(length))
+    chunks, i = [], 0
+    while i < len(text):
+        size = rng.randint(1, 8)
+        chunks.append(text[i:i + size])
+        i += size
+    return chunks
+
+
+def test_incremental_matches_full_rescan():
+    rng = random.Random(7)
+    for _ in range(500):
+        keywords = [
+            "".join(rng.choice(ALPHABET.strip()) for _ in range(rng.randint(1, 4)))
+            for _ in range(rng.randint(1, 5))
+        ]
+        chunks = _random_chunks(rng, rng.randint(0, 60))
+
+        # 参照：原实现在每个块之后对累积全文重扫，首次命中即停止
+        expected, accumulated = False, ""
+        for chunk in chunks:
+            accumulated += chunk
+            if accumulated.strip() and _full_rescan(accumulated, keywords):
+                expected = True
+                break
+
+        assert _stream(keywords, chunks).is_flagged == expected, (keywords, chunks)
+
+
+def test_keyword_spanning_chunks_is_flagged():
+    moderation = _stream(["Forbidden Word"], ["this is a forb", "IDDEN w", "ord!"])
+    assert moderation.is_flagged
+    assert moderation.preset_response == "blocked"
+
+
+def test_inputs_use_same_matcher():
+    moderation = KeywordsModeration("app", "tenant", _keywords_config(["secret", "机密"]))
+    assert moderation.moderation_for_inputs({"a": "no"}, query="包含机密信息").flagged
+    assert not moderation.moderation_for_inputs({"a": "nothing"}, query="hello").flagged
+
+
+def test_streaming_cost_is_linear():
+    rng = random.Random(11)
+    keywords = ["".join(rng.choice("abcdefgh") for _ in range(12)) for _ in range(100)]
+
+    def elapsed(length: int) -> float:
+        chunks = ["".join(rng.choice("abcdefgh ") for _ in range(4)) for _ in range(length // 4)]
+        best = float("inf")
+        for _ in range(3):
+            start = time.perf_counter()
+            moderation = _stream(keywords, chunks)
+            best = min(best, time.perf_counter() - start)
+        assert not moderation.is_flagged
+        return best
+
+    small, large = elapsed(20_000), elapsed(100_000)
+    # 线性：5 倍文本约 5 倍耗时；整段重扫为平方级（约 25 倍）
+    assert large < small * 12
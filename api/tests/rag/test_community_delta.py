@@ -0,0 +1,138 @@
+# -*- coding: UTF-8 -*-
+"""社区报告增量生成：新增文档只重新生成受影响社区的报告，其余报告保留"""
+import random
+
+import networkx as nx
+
+from app.core.rag.graphrag.general.community_delta import (
+    change_ratio,
+    community_signature,
+    plan_community_reports,
+    reindex_structure,
+)
+
+CLUSTERS = 300
+CLUSTER_SIZE = 8
+
+
+def _build_graph():
+    graph = nx.Graph()
+    for c in range(CLUSTERS):
+        nodes = [f"C{c}_E{i}" for i in range(CLUSTER_SIZE)]
+        for n in nodes:
+            graph.add_node(n, description=f"{n} 的描述")
+        for i in range(CLUSTER_SIZE):
+            graph.add_edge(nodes[i], nodes[(i + 1) % CLUSTER_SIZE], description=f"{nodes[i]} 关联")
+    return graph
+
+
+def _communities(graph, seed):
+    # 模拟 Leiden：社区划分稳定，但社区编号每次运行都不同
+    components = [sorted(c) for c in nx.connected_components(graph)]
+    random.Random(seed).shuffle(components)
+    return {0: {str(i): {"weight": 1.0, "nodes": nodes} for i, nodes in enumerate(components)}}
+
+
+def _index(plan, previous=()):
+    """把一次规划的结果当作已索引的报告：新生成的 + 保留的，去掉失效的"""
+    stale = set(plan.stale_ids)
+    reports = [r for r in previous if r["id"] not in stale]
+    for previous, level, _, cm in plan.reuse:
+        stru = reindex_structure(previous, level, cm)
+        if stru is not None:
+            previous["entities"], previous["signature"] = stru["entities"], stru["signature"]
+            previous["member_signature"] = stru["member_signature"]
+    for (level, cm_id), cm in plan.regenerate.items():
+        reports.append({"id": f"report-{len(reports)}-{cm_id}", "title": cm_id, "level": str(level),
+                        "entities": cm["nodes"], "signature": cm["signature"]})
+    return reports
+
+
+def test_adding_a_document_regenerates_only_affected_communities():
+    graph = _build_graph()
+    first = plan_community_reports(graph, _communities(graph, 0))
+    assert len(first.regenerate) == CLUSTERS
+    reports = _index(first)
+
+    # 新文档：三个新实体接入社区 3（超过阈值），社区 7 的一个实体描述被改写（阈值内）
+    for i in range(3):
+        graph.add_node(f"NEW{i}", description="新实体")
+        graph.add_edge(f"NEW{i}", "C3_E0", description="新关系")
+        graph.add_edge(f"NEW{i}", f"C3_E{i + 3}", description="新关系")
+    graph.nodes["C7_E2"]["description"] = "合并了新文档后的描述"
+
+    plan = plan_community_reports(graph, _communities(graph, 1), reports)
+    # LLM 调用次数与受影响的社区数成正比，而不是社区总数
+    regenerated = sorted(cm["nodes"][0] for cm in plan.regenerate.values())
+    assert regenerated == ["C3_E0"]
+    assert len(plan.reuse) == CLUSTERS - 1
+    changed = [cm["nodes"][0] for r, _, _, cm in plan.reuse if r["signature"] != cm["signature"]]
+    assert changed == ["C7_E0"]
+    # 被替换的旧报告需要删除，未变化的报告不动
+    assert len(plan.stale_ids) == 1
+    replaced = next(r for r in reports if r["id"] == plan.stale_ids[0])
+    assert replaced["entities"][0] == "C3_E0"
+
+    # 再次运行且图没有变化时不调用 LLM
+    reports = _index(plan, reports)
+    again = plan_community_reports(graph, _communities(graph, 2), reports)
+    assert not again.regenerate and not again.stale_ids
+    # 成员也没有变化，保留的报告无需重新索引
+    assert all(reindex_structure(r, level, cm) is None for r, level, _, cm in again.reuse)
+
+
+def test_small_changes_accumulate_against_generated_signature():
+    graph = _build_graph()
+    reports = _index(plan_community_reports(graph, _communities(graph, 0)))
+    generated = next(r for r in reports if "C0_E0" in r["entities"])["signature"]
+
+    # 每次只改一条关系描述，单次变化都在阈值内
+    graph.edges["C0_E0", "C0_E1"]["description"] = "第一次修改"
+    plan = plan_community_reports(graph, _communities(graph, 1), reports)
+    assert not plan.regenerate
+    reports = _index(plan, reports)
+    kept = next(r for r in reports if "C0_E0" in r["entities"])
+    # 保留的报告仍记录生成时的签名，当前成员签名单独存放
+    assert kept["signature"] == generated
+    assert kept["member_signature"] == community_signature(graph, [f"C0_E{i}" for i in range(CLUSTER_SIZE)])
+
+    # 第二次修改相对上次索引仍在阈值内，但相对生成报告时已超过阈值
+    graph.edges["C0_E2", "C0_E3"]["description"] = "第二次修改"
+    plan = plan_community_reports(graph, _communities(graph, 2), reports)
+    assert sorted(cm["nodes"][0] for cm in plan.regenerate.values()) == ["C0_E0"]
+    assert plan.stale_ids == [kept["id"]]
+
+
+def test_threshold_and_split_communities():
+    graph = _build_graph()
+    reports = _index(plan_community_reports(graph, _communities(graph, 0)))
+
+    # 社区 5 拆成两半：两个新社区都与旧报告差异很大，需要重新生成
+    graph.remove_edge("C5_E3", "C5_E4")
+    graph.remove_edge("C5_E7", "C5_E0")
+    plan = plan_community_reports(graph, _communities(graph, 1), reports)
+    assert sorted(sorted(cm["nodes"])[0] for cm in plan.regenerate.values()) == ["C5_E0", "C5_E4"]
+    assert len(plan.stale_ids) == 1
+
+    # 阈值放宽到 1 时任何有重叠的社区都沿用旧报告
+    plan = plan_community_reports(graph, _communities(graph, 1), reports, change_threshold=1.0)
+    assert len(plan.regenerate) == 1
+    assert not plan.stale_ids
+
+
+def test_reports_without_signature_are_replaced():
+    graph = _build_graph()
+    legacy = [{"id": "legacy", "title": "旧报告", "level": "0", "entities": ["C0_E0", "C0_E1"], "signature": []}]
+    plan = plan_community_reports(graph, _communities(graph, 0), legacy)
+    assert len(plan.regenerate) == CLUSTERS
+    assert plan.stale_ids == ["legacy"]
+
+
+def test_signature():
+    graph = _build_graph()
+    nodes = [f"C0_E{i}" for i in range(CLUSTER_SIZE)]
+    signature = community_signature(graph, nodes)
+    assert len(signature) == 2 * CLUSTER_SIZE
+    assert community_signature(graph, list(reversed(nodes))) == signature
+    graph.edges["C0_E0", "C0_E1"]["description"] = "变化"
+    assert change_ratio(signature, community_signature(graph, nodes)) == 1 - 15 / 17
@@ -0,0 +1,48 @@
+# -*- coding: UTF-8 -*-
+"""实体消歧候选对：索引召回的候选对必须与逐对比较的结果完全一致
+
+需要 rag.nlp 依赖，环境不可用时跳过。
+"""
+import random
+
+import pytest
+
+try:
+    from app.core.rag.graphrag.entity_candidates import candidate_pairs, is_similarity
+except Exception as e:  # 依赖缺失
+    pytest.skip(f"实体消歧模块不可用: {e}", allow_module_level=True)
+
+from app.core.rag.graphrag.t_entity_resolution_bench import build_names, exhaustive_pairs
+
+
+def test_same_pairs_as_exhaustive():
+    names = build_names(400, seed=3)
+    expected = exhaustive_pairs(names, set(names))
+    assert expected, "合成数据中应当存在相似实体"
+    assert candidate_pairs(names, set(names)) == expected
+
+
+@pytest.mark.parametrize("new", [100, 10, 1])
+def test_only_pairs_touching_subgraph_nodes(new):
+    # 增量构建：只比较涉及新增实体的候选对
+    names = build_names(400, seed=3)
+    subgraph_nodes = set(random.Random(new).sample(names, new))
+    assert candidate_pairs(names, subgraph_nodes) == exhaustive_pairs(names, subgraph_nodes)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("APPLE INC", "APPLE INC."),
+    ("GPT 4", "GPT 5"),
+    ("MODEL V2", "MODEL V3"),
+    ("张三", "张三丰"),
+    ("阿里巴巴集团", "阿里巴巴"),
+    ("北京大学", "北京"),
+    ("AB", "BA"),
+    ("苹果 APPLE", "APPLE"),
+    ("X", "Y"),
+])
+def test_edge_cases(a, b):
+    expected = [tuple(sorted((a, b)))] if is_similarity(a, b) else []
+    assert candidate_pairs([a, b], {a}) == expected
+    assert candidate_pairs([a, b], {b}) == expected
+    assert candidate_pairs([a, b], set()) == []
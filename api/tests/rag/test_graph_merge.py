@@ -0,0 +1,116 @@
+# -*- coding: UTF-8 -*-
+"""知识图谱批量合并：与逐文档合并（改造前实现）得到的节点、边、描述与 source_id 完全一致
+
+需要 rag 依赖，环境不可用时跳过。
+"""
+import copy
+import json
+
+import networkx as nx
+import pytest
+import trio
+
+try:
+    from app.core.rag.graphrag.general import index
+    from app.core.rag.graphrag.utils import GraphChange, graph_merge, graph_to_chunks, graphs_merge, tidy_graph
+except Exception as e:  # 依赖缺失
+    pytest.skip(f"GraphRAG 模块不可用: {e}", allow_module_level=True)
+
+from app.core.rag.graphrag.general.t_graph_merge_bench import (
+    batch,
+    build,
+    graph_state,
+    legacy_graph_merge,
+    legacy_subgraph_contents,
+    per_document,
+)
+
+
+def _load(payload):
+    return nx.node_link_graph(json.loads(payload), edges="edges")
+
+
+def test_graphs_merge_matches_per_document_merge():
+    payload, subgraphs = build(nodes=300, docs=20, doc_size=15, seed=5)
+    expected, expected_change = _load(payload), GraphChange()
+    for sg in copy.deepcopy(subgraphs).values():
+        legacy_graph_merge(expected, sg, expected_change)
+
+    merged, change = _load(payload), GraphChange()
+    graphs_merge(merged, list(copy.deepcopy(subgraphs).values()), change)
+
+    # 子图之间有重叠实体，描述与 source_id 需要按文档顺序拼接
+    assert any(len(set(d["source_id"])) > 2 for _, d in merged.nodes(data=True))
+    assert graph_state(merged) == graph_state(expected)
+    assert change.added_updated_nodes == expected_change.added_updated_nodes
+    assert change.added_updated_edges == expected_change.added_updated_edges
+
+    # 单个子图的 graph_merge 与改造前一致
+    single, legacy = _load(payload), _load(payload)
+    sg = next(iter(subgraphs.values()))
+    graph_merge(single, copy.deepcopy(sg), GraphChange())
+    legacy_graph_merge(legacy, copy.deepcopy(sg), GraphChange())
+    assert graph_state(single) == graph_state(legacy)
+
+
+def test_graph_to_chunks_matches_per_source_scan():
+    payload, subgraphs = build(nodes=300, docs=20, doc_size=15, seed=6)
+    graph = _load(payload)
+    graphs_merge(graph, list(subgraphs.values()), GraphChange())
+
+    chunks = graph_to_chunks("kb", graph)
+    assert chunks[0]["knowledge_graph_kwd"] == "graph"
+    assert json.loads(chunks[0]["page_content"]) == nx.node_link_data(graph, edges="edges")
+    assert [c["source_id"] for c in chunks[1:]] == [[source] for source in graph.graph["source_id"]]
+    assert [c["page_content"] for c in chunks[1:]] == legacy_subgraph_contents(graph)
+
+
+def test_bench_batch_equals_per_document():
+    payload, subgraphs = build(nodes=200, docs=10, doc_size=12, seed=7)
+    batch_result, _ = batch(payload, copy.deepcopy(subgraphs))
+    per_document_result, _ = per_document(payload, copy.deepcopy(subgraphs))
+    assert graph_state(_load(batch_result)) == graph_state(_load(per_document_result))
+
+
+@pytest.mark.parametrize("existing", [True, False])
+def test_merge_subgraphs_matches_merge_per_document(monkeypatch, existing):
+    payload, subgraphs = build(nodes=200, docs=8, doc_size=12, seed=8)
+    initial = _load(payload) if existing else None
+    store = {}
+
+    async def get_graph(workspace_id, kb_id, exclude_rebuild=None):
+        graph = store.get("graph")
+        return copy.deepcopy(graph) if graph is not None else None
+
+    async def set_graph(workspace_id, kb_id, embd_mdl, graph, change, callback):
+        store["graph"] = copy.deepcopy(graph)
+        store.setdefault("changes", []).append(change)
+
+    monkeypatch.setattr(index, "get_graph", get_graph)
+    monkeypatch.setattr(index, "set_graph", set_graph)
+
+    def callback(**kwargs):
+        pass
+
+    # 改造前：每个文档加载、整理、合并、排名、保存一次
+    store.update(graph=copy.deepcopy(initial))
+    for sg in copy.deepcopy(subgraphs).values():
+        old_graph = store["graph"] and copy.deepcopy(store["graph"])
+        if old_graph is not None:
+            tidy_graph(old_graph, None)
+            new_graph = legacy_graph_merge(old_graph, sg, GraphChange())
+        else:
+            new_graph = sg
+        for node_name, pagerank in nx.pagerank(new_graph).items():
+            new_graph.nodes[node_name]["pagerank"] = pagerank
+        store["graph"] = new_graph
+    expected = store["graph"]
+
+    store.clear()
+    store.update(graph=copy.deepcopy(initial))
+    result = trio.run(index.merge_subgraphs, "ws", "kb", copy.deepcopy(subgraphs), None, callback)
+
+    assert len(store["changes"]) == 1
+    assert graph_state(result) == graph_state(expected)
+    assert graph_state(store["graph"]) == graph_state(expected)
+    assert store["changes"][0].added_updated_nodes == {n for sg in subgraphs.values() for n in sg.nodes}
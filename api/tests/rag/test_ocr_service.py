@@ -0,0 +1,105 @@
+# -*- coding: UTF-8 -*-
+"""OCR 批量执行与主机 OCR 服务：使用替身模型验证合批与套接字往返
+
+需要 deepdoc 依赖（opencv、onnxruntime），环境不可用时跳过。
+"""
+import os
+import stat
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import AuthenticationError, Client
+
+import pytest
+
+try:
+    from app.core.rag.deepdoc.vision import ocr_service
+    from app.core.rag.deepdoc.vision.ocr_service import BatchedOCR, RemoteOCR
+except Exception as e:  # opencv / onnxruntime 缺失
+    pytest.skip(f"deepdoc OCR 不可用: {e}", allow_module_level=True)
+
+AUTHKEY = b"test-ocr-key"
+
+
+class StubOCR:
+    """替身模型：图片为字符串，每张图检测出两个框，识别结果由内容决定"""
+
+    drop_score = 0.5
+
+    def __init__(self):
+        self.detect_calls = []
+        self.recognize_calls = []
+
+    def detect_batch(self, images):
+        self.detect_calls.append(len(images))
+        if "bad" in images:
+            raise ValueError("bad image")
+        return [[([[i, 0], [i, 1]], ("", 0)) for i in range(2)] for _ in images]
+
+    def recognize_scores(self, crops):
+        self.recognize_calls.append(len(crops))
+        return [(crop.upper(), 0.1 if crop.startswith("low") else 0.9) for crop in crops]
+
+
+def test_batched_ocr_merges_concurrent_requests():
+    model = StubOCR()
+    batcher = BatchedOCR(model, max_wait=0.05)
+    pages = [f"page-{i}" for i in range(8)]
+
+    with ThreadPoolExecutor(max_workers=len(pages)) as executor:
+        boxes = list(executor.map(batcher.detect, pages))
+        texts = list(executor.map(batcher.recognize_batch, [[f"a{i}", f"low{i}"] for i in range(len(pages))]))
+
+    assert all(len(page_boxes) == 2 for page_boxes in boxes)
+    assert sum(model.detect_calls) == len(pages) and len(model.detect_calls) < len(pages)
+    # 结果按请求拆回，低分文本被丢弃
+    assert texts == [[f"A{i}", ""] for i in range(len(pages))]
+    assert len(model.recognize_calls) < len(pages)
+
+    with pytest.raises(ValueError):
+        batcher.detect("bad")
+    assert batcher.detect(None) == [] and batcher.recognize_scores([]) == []
+
+
+@pytest.fixture
+def service(tmp_path):
+    """在临时 Unix 套接字上运行 OCR 服务（替身模型）"""
+    address = str(tmp_path / "ocr.sock")
+    listener = ocr_service.listen(address, authkey=AUTHKEY)
+    batcher = BatchedOCR(StubOCR(), max_wait=0.001)
+
+    def accept():
+        while True:
+            try:
+                conn = listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                return
+            threading.Thread(target=ocr_service._serve_connection, args=(batcher, conn), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield address
+    listener.close()
+
+
+def test_remote_ocr_round_trip(service):
+    client = RemoteOCR(service, authkey=AUTHKEY)
+    assert len(client.detect("page")) == 2
+    assert client.recognize_batch(["text", "low"]) == ["TEXT", ""]
+    # 服务端异常以 RuntimeError 返回给调用方，连接仍可继续使用
+    with pytest.raises(RuntimeError, match="bad image"):
+        client.detect("bad")
+    assert client.recognize_scores(["again"]) == [("AGAIN", 0.9)]
+
+
+def test_service_requires_authkey(service, monkeypatch):
+    # 套接字只对属主和同组可见
+    assert stat.S_IMODE(os.stat(service).st_mode) & 0o007 == 0
+    with pytest.raises(AuthenticationError):
+        Client(service, authkey=b"wrong-key")
+
+    monkeypatch.delenv("OCR_SERVICE_AUTHKEY", raising=False)
+    with pytest.raises(RuntimeError):
+        RemoteOCR(service)
+    with pytest.raises(RuntimeError):
+        ocr_service.listen(service + ".2")
@@ -0,0 +1,177 @@
+# -*- coding: UTF-8 -*-
+"""分词缓存与批量分词：输出必须与原分词流程逐字一致
+
+需要分词词典和 NLTK 数据，环境不可用时跳过。
+"""
+import random
+import re
+import threading
+
+import pytest
+
+try:
+    from app.core.rag.nlp import rag_tokenizer
+    from app.core.rag.nlp.rag_tokenizer import RagTokenizer, word_tokenize
+except Exception as e:  # 词典 / 模型数据缺失
+    pytest.skip(f"分词器不可用: {e}", allow_module_level=True)
+
+from app.core.rag.nlp.t_tokenizer_bench import build_corpus
+
+
+def _reference_tokenize(tk: RagTokenizer, line):
+    """缓存改造前的 RagTokenizer.tokenize"""
+    line = re.sub(r"\W+", " ", line)
+    line = tk._strQ2B(line).lower()
+    line = tk._tradi2simp(line)
+
+    arr = tk._split_by_lang(line)
+    res = []
+    for L, lang in arr:
+        if not lang:
+            res.extend([tk.stemmer.stem(tk.lemmatizer.lemmatize(t)) for t in word_tokenize(L)])
+            continue
+        if len(L) < 2 or re.match(r"[a-z\.-]+$", L) or re.match(r"[0-9\.-]+$", L):
+            res.append(L)
+            continue
+
+        tks, s = tk.maxForward_(L)
+        tks1, s1 = tk.maxBackward_(L)
+
+        i, j, _i, _j = 0, 0, 0, 0
+        same = 0
+        while i + same < len(tks1) and j + same < len(tks) and tks1[i + same] == tks[j + same]:
+            same += 1
+        if same > 0:
+            res.append(" ".join(tks[j: j + same]))
+        _i = i + same
+        _j = j + same
+        j = _j + 1
+        i = _i + 1
+
+        while i < len(tks1) and j < len(tks):
+            tk1, tk_ = "".join(tks1[_i:i]), "".join(tks[_j:j])
+            if tk1 != tk_:
+                if len(tk1) > len(tk_):
+                    j += 1
+                else:
+                    i += 1
+                continue
+
+            if tks1[i] != tks[j]:
+                i += 1
+                j += 1
+                continue
+            tkslist = []
+            tk.dfs_("".join(tks[_j:j]), 0, [], tkslist)
+            res.append(" ".join(tk.sortTks_(tkslist)[0][0]))
+
+            same = 1
+            while i + same < len(tks1) and j + same < len(tks) and tks1[i + same] == tks[j + same]:
+                same += 1
+            res.append(" ".join(tks[j: j + same]))
+            _i = i + same
+            _j = j + same
+            j = _j + 1
+            i = _i + 1
+
+        if _i < len(tks1):
+            tkslist = []
+            tk.dfs_("".join(tks[_j:]), 0, [], tkslist)
+            res.append(" ".join(tk.sortTks_(tkslist)[0][0]))
+
+    return tk.merge_(" ".join(res))
+
+
+def _reference_fine_grained(tk: RagTokenizer, tks):
+    """缓存改造前的 RagTokenizer.fine_grained_tokenize"""
+    tks = tks.split()
+    zh_num = len([1 for c in tks if c and rag_tokenizer.is_chinese(c[0])])
+    if zh_num < len(tks) * 0.2:
+        res = []
+        for t in tks:
+            res.extend(t.split("/"))
+        return " ".join(res)
+
+    res = []
+    for t in tks:
+        if len(t) < 3 or re.match(r"[0-9,\.-]+$", t):
+            res.append(t)
+            continue
+        tkslist = []
+        if len(t) > 10:
+            tkslist.append(t)
+        else:
+            tk.dfs_(t, 0, [], tkslist)
+        if len(tkslist) < 2:
+            res.append(t)
+            continue
+        stk = tk.sortTks_(tkslist)[1][0]
+        if len(stk) == len(t):
+            stk = t
+        elif re.match(r"[a-z\.-]+$", t):
+            stk = t if any(len(s) < 3 for s in stk) else " ".join(stk)
+        else:
+            stk = " ".join(stk)
+        res.append(stk)
+
+    return " ".join(
+        tk.stemmer.stem(tk.lemmatizer.lemmatize(t)) if re.match(r"[a-zA-Z_-]+$", t) else t for t in res
+    )
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    lines = build_corpus(300, seed=11)
+    rng = random.Random(5)
+    # 全角、繁体、长段落和短查询
+    lines += ["ＡＢＣ　全角字符 測試繁體轉換", "  ", "退款", "how to reset password?"]
+    lines += [" ".join(rng.sample(lines[:50], 10))]
+    return lines
+
+
+def test_cached_tokenizer_matches_reference(corpus):
+    reference = RagTokenizer(cache_size=0)
+    cached = rag_tokenizer.tokenizer
+    cached.cache_clear()
+    # 两轮：首次填充缓存，第二轮全部命中
+    for _ in range(2):
+        for line in corpus:
+            expected = _reference_tokenize(reference, line)
+            assert cached.tokenize(line) == expected
+            assert cached.fine_grained_tokenize(expected) == _reference_fine_grained(reference, expected)
+    assert cached._tokenize_segment.cache_info().hits > 0
+
+
+def test_tokenize_batch_matches_serial(corpus, monkeypatch):
+    monkeypatch.setenv("RAG_TOKENIZE_WORKERS", "2")
+    monkeypatch.setattr(rag_tokenizer, "TOKENIZE_BATCH_PARALLEL_MIN", 1)
+    monkeypatch.setattr(rag_tokenizer, "_pool_disabled_pid", None)
+    expected = [(rag_tokenizer.tokenize(line), None) for line in corpus]
+    expected = [(tks, rag_tokenizer.fine_grained_tokenize(tks)) for tks, _ in expected]
+    try:
+        assert rag_tokenizer.tokenize_batch(corpus, fine_grained=True) == expected
+        assert rag_tokenizer.tokenize_batch(corpus) == [tks for tks, _ in expected]
+    finally:
+        rag_tokenizer._reset_pool()
+
+
+def test_tokenize_batch_skips_pool_in_threaded_process(corpus, monkeypatch, caplog):
+    monkeypatch.setenv("RAG_TOKENIZE_WORKERS", "2")
+    monkeypatch.setattr(rag_tokenizer, "TOKENIZE_BATCH_PARALLEL_MIN", 1)
+    monkeypatch.setattr(rag_tokenizer, "_pool_disabled_pid", None)
+    expected = [rag_tokenizer.tokenize(line) for line in corpus]
+
+    # 已有其他线程运行时不 fork 工作进程，只告警一次，之后直接串行分词
+    release = threading.Event()
+    thread = threading.Thread(target=release.wait)
+    thread.start()
+    try:
+        with caplog.at_level("WARNING"):
+            assert rag_tokenizer.tokenize_batch(corpus) == expected
+            assert rag_tokenizer.tokenize_batch(corpus) == expected
+    finally:
+        release.set()
+        thread.join()
+    assert rag_tokenizer._pool is None
+    assert len([r for r in caplog.records if "Parallel tokenization disabled" in r.message]) == 1
+    assert not any(r.exc_info for r in caplog.records)
@@ -0,0 +1,150 @@
+# -*- coding: UTF-8 -*-
+"""应用日志会话列表：关键词搜索、游标分页与总数上限"""
+import datetime
+import uuid
+from types import SimpleNamespace
+
+import pytest
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import sessionmaker
+
+from app.core.exceptions import ValidationException
+from app.db import Base
+from app.models.app_daily_stats_model import AppDailyStats, WorkspaceDailyStats
+from app.models.conversation_model import Conversation, Message
+from app.repositories.conversation_repository import ConversationRepository
+
+APP_ID = uuid.uuid4()
+WORKSPACE_ID = uuid.uuid4()
+
+
+@pytest.fixture
+def repo():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[
+        model.__table__ for model in (Conversation, Message, AppDailyStats, WorkspaceDailyStats)
+    ])
+    session = sessionmaker(bind=engine)()
+    base = datetime.datetime(2026, 5, 1)
+    for i in range(57):
+        conversation = Conversation(
+            app_id=APP_ID, workspace_id=WORKSPACE_ID, is_draft=i % 2 == 0,
+            # 每 3 个会话更新时间相同，验证游标在并列时不丢不重
+            updated_at=base + datetime.timedelta(minutes=i // 3),
+        )
+        session.add(conversation)
+        session.flush()
+        contents = ["你好，请问退款怎么处理", f"订单 {i} 已发货"] if i % 4 == 0 else [f"第{i}次咨询 100%_满意"]
+        for content in contents:
+            session.add(Message(conversation_id=conversation.id, role="user", content=content))
+    # 其他应用的会话不应出现
+    session.add(Conversation(app_id=uuid.uuid4(), workspace_id=WORKSPACE_ID, updated_at=base))
+    session.commit()
+    yield ConversationRepository(session)
+    session.close()
+    engine.dispose()
+
+
+def _walk(repo, **kwargs):
+    seen, cursor = [], None
+    while True:
+        page = repo.list_app_conversations(APP_ID, WORKSPACE_ID, pagesize=10, cursor=cursor, **kwargs)
+        seen.extend(page.items)
+        if not page.has_next:
+            assert page.next_cursor is None
+            return seen
+        cursor = page.next_cursor
+
+
+@pytest.mark.parametrize("kwargs", [{}, {"is_draft": True}, {"keyword": "退款"}])
+def test_cursor_pages_cover_all_rows_in_order(repo, kwargs):
+    seen = _walk(repo, **kwargs)
+    expected = repo.list_app_conversations(APP_ID, WORKSPACE_ID, pagesize=1000, **kwargs).items
+    assert [c.id for c in seen] == [c.id for c in expected]
+    assert len({c.id for c in seen}) == len(seen)
+    keys = [(c.updated_at, c.id) for c in seen]
+    assert keys == sorted(keys, reverse=True)
+
+    # 页码分页与游标分页结果一致
+    second = repo.list_app_conversations(APP_ID, WORKSPACE_ID, pagesize=10, page=2, **kwargs)
+    assert [c.id for c in second.items] == [c.id for c in seen[10:20]]
+
+
+def test_keyword_matches_literally(repo):
+    assert repo.list_app_conversations(APP_ID, WORKSPACE_ID, keyword="退款").total == 15
+    # % 和 _ 按字面匹配，不作为通配符
+    assert repo.list_app_conversations(APP_ID, WORKSPACE_ID, keyword="100%_").total == 42
+    assert repo.list_app_conversations(APP_ID, WORKSPACE_ID, keyword="0%满").total == 0
+
+
+def test_total_is_capped(repo):
+    page = repo.list_app_conversations(APP_ID, WORKSPACE_ID, pagesize=10, count_limit=20)
+    assert page.total == 20 and page.total_capped
+    page = repo.list_app_conversations(APP_ID, WORKSPACE_ID, pagesize=10, count_limit=57)
+    assert page.total == 57 and not page.total_capped
+
+
+def test_invalid_cursor_rejected(repo):
+    with pytest.raises(ValidationException):
+        repo.list_app_conversations(APP_ID, WORKSPACE_ID, cursor="not-a-cursor")
+
+
+def test_cursor_falls_back_to_created_at(repo):
+    # 历史会话 updated_at 为空时按 created_at 排序，游标不报错
+    session = repo.db
+    base = datetime.datetime(2026, 4, 1)
+    legacy = []
+    for i in range(5):
+        conversation = Conversation(
+            app_id=APP_ID, workspace_id=WORKSPACE_ID,
+            created_at=base + datetime.timedelta(minutes=i),
+        )
+        session.add(conversation)
+        legacy.append(conversation)
+    session.flush()
+    session.execute(
+        update(Conversation).where(Conversation.id.in_([c.id for c in legacy])).values(updated_at=None)
+    )
+    session.commit()
+    assert all(c.updated_at is None for c in legacy)
+
+    seen = _walk(repo)
+    assert len(seen) == 62
+    assert [c.id for c in seen[-5:]] == [c.id for c in reversed(legacy)]
+    keys = [(c.updated_at or c.created_at, c.id) for c in seen]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_list_app_logs_response_includes_cursor(repo, monkeypatch):
+    try:
+        from app.controllers import app_log_controller
+    except Exception as e:  # 控制器依赖链在离线环境可能无法导入
+        pytest.skip(f"app_log_controller 不可用: {e}")
+
+    class StubAppService:
+        def __init__(self, db):
+            pass
+
+        def get_app(self, app_id, workspace_id):
+            return SimpleNamespace(id=app_id)
+
+    monkeypatch.setattr(app_log_controller, "AppService", StubAppService)
+    # 跳过工作空间访问校验，直接调用端点函数
+    list_app_logs = app_log_controller.list_app_logs.__wrapped__
+    user = SimpleNamespace(current_workspace_id=WORKSPACE_ID)
+
+    seen, cursor = [], None
+    while True:
+        body = jsonable_encoder(list_app_logs(
+            app_id=APP_ID, page=1, pagesize=20, is_draft=None, keyword=None, cursor=cursor,
+            db=repo.db, current_user=user,
+        ))
+        meta = body["data"]["page"]
+        assert "next_cursor" in meta and "total_capped" in meta
+        seen.extend(item["id"] for item in body["data"]["items"])
+        if not meta["hasnext"]:
+            assert meta["next_cursor"] is None
+            break
+        cursor = meta["next_cursor"]
+    assert len(seen) == len(set(seen)) == 57
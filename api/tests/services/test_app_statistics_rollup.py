@@ -0,0 +1,238 @@
+# -*- coding: UTF-8 -*-
+"""应用统计日汇总测试：写入时增量维护、按原始表重建，结果与原始表聚合一致"""
+import datetime
+import random
+import uuid
+from collections import Counter
+
+import pytest
+from sqlalchemy import ARRAY, create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.db import Base
+from app.models.api_key_model import ApiKey, ApiKeyLog, ApiKeyType
+from app.models.app_daily_stats_model import (
+    APP_API_KEY_TYPES,
+    AppDailyStats,
+    WorkspaceDailyStats,
+    extract_message_tokens,
+)
+from app.models.conversation_model import Conversation, Message
+from app.models.end_user_info_model import EndUserInfo
+from app.models.end_user_model import EndUser
+from app.models.message_feedback_model import MessageFeedback
+from app.models.message_report_model import MessageReport
+from app.repositories.app_daily_stats_repository import AppDailyStatsRepository
+from app.services.app_statistics_service import AppStatisticsService
+
+
+@compiles(ARRAY, "sqlite")
+@compiles(JSONB, "sqlite")
+def _compile_json_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+FIRST_DAY = datetime.datetime(2026, 3, 1)
+DAYS = 10
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine, tables=[
+        model.__table__ for model in (
+            Conversation, Message, EndUser, ApiKey, ApiKeyLog, AppDailyStats, WorkspaceDailyStats,
+            # 级联删除涉及的表
+            MessageFeedback, MessageReport, EndUserInfo,
+        )
+    ])
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _random_time(rng: random.Random) -> datetime.datetime:
+    return FIRST_DAY + datetime.timedelta(seconds=rng.randrange(DAYS * 86400))
+
+
+def _random_meta(rng: random.Random):
+    tokens = rng.randrange(1, 500)
+    return rng.choice([
+        {"usage": {"total_tokens": tokens}},
+        {"tokens": tokens},
+        {"total_tokens": tokens},
+        {"model": "gpt"},
+        None,
+    ])
+
+
+def _populate(db, rng: random.Random):
+    workspaces = [uuid.uuid4(), uuid.uuid4()]
+    apps = [uuid.uuid4() for _ in range(3)]
+    creator = uuid.uuid4()
+
+    keys = []
+    for i, key_type in enumerate([ApiKeyType.AGENT, ApiKeyType.WORKFLOW, ApiKeyType.SERVICE, ApiKeyType.CLUSTER]):
+        keys.append(ApiKey(
+            name=f"key-{i}", api_key=f"sk-{uuid.uuid4().hex}", type=key_type,
+            workspace_id=workspaces[i % 2], resource_id=apps[i % 3], created_by=creator,
+        ))
+    db.add_all(keys)
+    db.flush()
+
+    conversations = []
+    for _ in range(40):
+        conversation = Conversation(
+            app_id=rng.choice(apps), workspace_id=rng.choice(workspaces), created_at=_random_time(rng),
+        )
+        conversations.append(conversation)
+        db.add(conversation)
+    for _ in range(30):
+        db.add(EndUser(app_id=rng.choice(apps), workspace_id=rng.choice(workspaces), created_at=_random_time(rng)))
+    db.commit()
+
+    messages = []
+    for _ in range(200):
+        message = Message(
+            conversation_id=rng.choice(conversations).id, role="assistant", content="hi",
+            meta_data=_random_meta(rng), created_at=_random_time(rng),
+        )
+        messages.append(message)
+        db.add(message)
+        # 逐步 flush，覆盖跨多次 flush 的增量累加
+        if rng.random() < 0.1:
+            db.flush()
+    for _ in range(150):
+        db.add(ApiKeyLog(
+            api_key_id=rng.choice(keys).id, endpoint="/v1/chat", method="POST", created_at=_random_time(rng),
+        ))
+    db.commit()
+
+    # 更新和删除
+    for message in rng.sample(messages, 20):
+        message.meta_data = _random_meta(rng)
+    for message in rng.sample(messages, 10):
+        db.delete(message)
+    db.delete(rng.choice(db.query(EndUser).all()))
+    db.commit()
+    return workspaces, apps, conversations
+
+
+def _raw_app_statistics(db, app_id, workspace_id, start_dt, end_dt):
+    """按原始表聚合（改造前的统计口径）"""
+
+    def in_range(created_at):
+        return start_dt <= created_at < end_dt
+
+    def series(counter):
+        daily = [{"date": str(day), "count": count} for day, count in sorted(counter.items()) if count != 0]
+        return daily, sum(row["count"] for row in daily)
+
+    conversations = Counter(
+        c.created_at.date() for c in db.query(Conversation).all()
+        if c.app_id == app_id and c.workspace_id == workspace_id and in_range(c.created_at)
+    )
+    users = Counter(
+        u.created_at.date() for u in db.query(EndUser).all() if u.app_id == app_id and in_range(u.created_at)
+    )
+    api_calls = Counter(
+        log.created_at.date() for log in db.query(ApiKeyLog).all()
+        if log.api_key.resource_id == app_id and in_range(log.created_at)
+    )
+    app_conversations = {c.id for c in db.query(Conversation).all() if c.app_id == app_id}
+    tokens = Counter()
+    for m in db.query(Message).all():
+        if m.conversation_id in app_conversations and in_range(m.created_at):
+            tokens[m.created_at.date()] += extract_message_tokens(m.meta_data)
+
+    result = {}
+    for name, counter in (("conversations", conversations), ("new_users", users),
+                          ("api_calls", api_calls), ("tokens", tokens)):
+        result[f"daily_{name}"], result[f"total_{name}"] = series(counter)
+    return result
+
+
+def _raw_workspace_api_statistics(db, workspace_id, start_dt, end_dt):
+    app_calls, service_calls = Counter(), Counter()
+    for log in db.query(ApiKeyLog).all():
+        key = log.api_key
+        if key.workspace_id != workspace_id or not start_dt <= log.created_at < end_dt:
+            continue
+        if key.type in APP_API_KEY_TYPES:
+            app_calls[log.created_at.date()] += 1
+        elif key.type == ApiKeyType.SERVICE:
+            service_calls[log.created_at.date()] += 1
+    return [
+        {
+            "date": str(day),
+            "total_calls": app_calls[day] + service_calls[day],
+            "app_calls": app_calls[day],
+            "service_calls": service_calls[day],
+        }
+        for day in sorted(set(app_calls) | set(service_calls))
+    ]
+
+
+def _ms(dt: datetime.datetime) -> int:
+    return int(dt.timestamp() * 1000)
+
+
+def _snapshot(db):
+    return {
+        "apps": sorted(
+            (r.stat_date, r.app_id, r.workspace_id, r.conversation_count, r.new_user_count,
+             r.api_call_count, r.token_count)
+            for r in db.query(AppDailyStats).all()
+            if r.conversation_count or r.new_user_count or r.api_call_count or r.token_count
+        ),
+        "workspaces": sorted(
+            (r.stat_date, r.workspace_id, r.conversation_count, r.new_user_count, r.api_call_count,
+             r.app_api_call_count, r.service_api_call_count, r.token_count)
+            for r in db.query(WorkspaceDailyStats).all()
+        ),
+    }
+
+
+def _assert_matches_raw(db, workspaces, apps):
+    service = AppStatisticsService(db)
+    # 查询范围（按天）：全部数据 / 中间几天
+    for start, end in ((FIRST_DAY, FIRST_DAY + datetime.timedelta(days=DAYS - 1)),
+                       (FIRST_DAY + datetime.timedelta(days=2), FIRST_DAY + datetime.timedelta(days=5))):
+        end_exclusive = end + datetime.timedelta(days=1)
+        for app_id in apps:
+            for workspace_id in workspaces:
+                assert service.get_app_statistics(app_id, workspace_id, _ms(start), _ms(end)) == \
+                    _raw_app_statistics(db, app_id, workspace_id, start, end_exclusive)
+        for workspace_id in workspaces:
+            assert service.get_workspace_api_statistics(workspace_id, _ms(start), _ms(end)) == \
+                _raw_workspace_api_statistics(db, workspace_id, start, end_exclusive)
+
+
+@pytest.mark.parametrize("seed", [1, 7, 42])
+def test_write_time_rollups_match_raw_aggregation(db, seed):
+    workspaces, apps, _ = _populate(db, random.Random(seed))
+    _assert_matches_raw(db, workspaces, apps)
+
+
+def test_rebuild_corrects_bulk_sql_drift(db):
+    workspaces, apps, conversations = _populate(db, random.Random(3))
+    write_time = _snapshot(db)
+
+    # 批量 SQL 删除绕过 ORM，写入时汇总不会扣减
+    db.query(Message).filter(Message.conversation_id == conversations[0].id).delete()
+    db.query(ApiKeyLog).filter(ApiKeyLog.created_at < FIRST_DAY + datetime.timedelta(days=1)).delete()
+    db.commit()
+    assert _snapshot(db) == write_time
+
+    repo = AppDailyStatsRepository(db)
+    last_day = (FIRST_DAY + datetime.timedelta(days=DAYS - 1)).date()
+    repo.rebuild(FIRST_DAY.date(), last_day)
+    _assert_matches_raw(db, workspaces, apps)
+
+    # 重建是幂等的
+    rebuilt = _snapshot(db)
+    repo.rebuild(FIRST_DAY.date(), last_day)
+    assert _snapshot(db) == rebuilt
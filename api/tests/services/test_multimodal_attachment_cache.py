@@ -0,0 +1,112 @@
+# -*- coding: UTF-8 -*-
+"""多模态附件处理：按内容哈希缓存与并发处理
+
+需要可用的 Redis，环境不可用时跳过。
+"""
+import asyncio
+import uuid
+
+import fitz
+import pytest
+
+from app.aioRedis import get_thread_safe_redis
+from app.cache.multimodal import AttachmentCache
+from app.models.models_model import ModelCapability
+from app.schemas.app_schema import FileInput, FileType, TransferMethod
+from app.schemas.model_schema import ModelInfo
+from app.services.multimodal_service import MultimodalService
+
+
+@pytest.fixture
+async def cache_prefix():
+    client = get_thread_safe_redis()
+    try:
+        await client.ping()
+    except Exception as e:
+        pytest.skip(f"Redis 不可用: {e}")
+    original = AttachmentCache.PREFIX
+    AttachmentCache.PREFIX = f"test_attachment:{uuid.uuid4().hex}"
+    yield AttachmentCache.PREFIX
+    keys = [key async for key in client.scan_iter(f"{AttachmentCache.PREFIX}:*")]
+    if keys:
+        await client.delete(*keys)
+    AttachmentCache.PREFIX = original
+
+
+def _make_pdf(pages: int, marker: str) -> bytes:
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{marker} page {i + 1}")
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def _document(content: bytes) -> FileInput:
+    # 每轮对话都会构造新的 FileInput
+    file = FileInput(
+        type=FileType.DOCUMENT, transfer_method=TransferMethod.REMOTE_URL, url="https://example.com/report.pdf"
+    )
+    file.set_content(content)
+    return file
+
+
+def _service() -> MultimodalService:
+    return MultimodalService(db=None, api_config=ModelInfo(
+        model_name="qwen-vl", provider="dashscope", api_key="sk", api_base="https://example.com",
+        model_type="chat", capability=[ModelCapability.VISION],
+    ))
+
+
+class ExtractionSpy:
+    def __init__(self, monkeypatch, delay: float = 0.0):
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+        original = MultimodalService._extract_text
+
+        def _extract(service, file_content):
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            try:
+                if delay:
+                    import time
+                    time.sleep(delay)
+                return original(service, file_content)
+            finally:
+                self.running -= 1
+
+        monkeypatch.setattr(MultimodalService, "_extract_text", _extract)
+
+
+@pytest.mark.asyncio
+async def test_second_turn_reuses_extracted_text(cache_prefix, monkeypatch):
+    spy = ExtractionSpy(monkeypatch)
+    pdf = _make_pdf(50, "quarterly")
+    service = _service()
+
+    first = await service.process_files([_document(pdf)])
+    assert spy.calls == 1
+    assert "quarterly page 50" in first[0]["text"]
+
+    second = await service.process_files([_document(pdf)])
+    assert spy.calls == 1
+    assert second == first
+
+    # 内容不同的文档重新提取
+    await service.process_files([_document(_make_pdf(2, "other"))])
+    assert spy.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_files_processed_concurrently_in_order(cache_prefix, monkeypatch):
+    from app.core.config import settings
+
+    monkeypatch.setattr(settings, "MULTIMODAL_FILE_CONCURRENCY", 2)
+    spy = ExtractionSpy(monkeypatch, delay=0.1)
+    files = [_document(_make_pdf(1, f"doc-{i}")) for i in range(5)]
+
+    result = await asyncio.wait_for(_service().process_files(files), timeout=10)
+    assert [item["text"].count(f"doc-{i} page 1") for i, item in enumerate(result)] == [1] * 5
+    assert spy.max_running == 2
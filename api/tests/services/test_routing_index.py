@@ -0,0 +1,188 @@
+# -*- coding: UTF-8 -*-
+"""路由索引测试：向量相似度路由与 LLM 路由决策缓存"""
+import re
+
+import pytest
+
+from app.services.conversation_state_manager import ConversationStateManager
+from app.services.llm_router import LLMRouter
+from app.services import routing_index
+from app.services.master_agent_router import MasterAgentRouter
+from app.services.routing_index import RoutingDecisionCache, RoutingIndex, extract_topic
+
+SUB_AGENTS = {
+    "math": {"info": {"name": "数学老师", "role": "解答数学题", "capabilities": ["方程求解", "几何证明", "函数图像", "概率统计"]}},
+    "physics": {"info": {"name": "物理老师", "role": "讲解物理问题", "capabilities": ["力学分析", "电路计算", "能量守恒", "光学现象"]}},
+    "order": {"info": {"name": "订单客服", "role": "处理订单查询", "capabilities": ["物流跟踪", "发货进度", "快递配送", "修改收货地址"]}},
+    "refund": {"info": {"name": "售后客服", "role": "处理退款退货", "capabilities": ["退款申请", "退货流程", "换货维修", "售后投诉"]}},
+}
+
+ROUTING_RULES = [
+    {"target_agent_id": "math", "keywords": ["数学", "方程", "几何", "函数"], "patterns": [r"\d+\s*[+\-*/]\s*\d+"]},
+    {"target_agent_id": "physics", "keywords": ["物理", "电路", "速度", "加速度"]},
+    {"target_agent_id": "order", "keywords": ["订单", "物流", "发货", "快递"]},
+    {"target_agent_id": "refund", "keywords": ["退款", "退货", "售后", "换货"]},
+]
+
+LABELLED = [
+    ("这道几何证明题怎么做", "math"),
+    ("帮我解一下这个方程", "math"),
+    ("函数图像怎么画", "math"),
+    ("概率统计题不会", "math"),
+    ("3 + 5 等于几", "math"),
+    ("小球下落的速度怎么算", "physics"),
+    ("电路里的电流怎么分析", "physics"),
+    ("能量守恒定律是什么意思", "physics"),
+    ("力学分析受力图", "physics"),
+    ("光学现象为什么会折射", "physics"),
+    ("我的快递到哪了", "order"),
+    ("什么时候发货", "order"),
+    ("物流一直不更新", "order"),
+    ("想修改收货地址", "order"),
+    ("订单状态查一下", "order"),
+    ("我要申请退款", "refund"),
+    ("退货流程是怎样的", "refund"),
+    ("东西坏了能换货维修吗", "refund"),
+    ("我要投诉售后", "refund"),
+    ("买错了想退钱", "refund"),
+]
+
+# 模拟 LLM 的标准答案
+ORACLE = {**dict(LABELLED), "我昨天买的东西想退钱怎么弄": "refund", "今天天气怎么样": "math"}
+
+_PROMPT_MESSAGE = re.compile(r'用户消息："(.*)"')
+
+
+@pytest.fixture
+def router(monkeypatch):
+    router = LLMRouter(
+        db=None,
+        state_manager=ConversationStateManager(),
+        routing_rules=ROUTING_RULES,
+        sub_agents=SUB_AGENTS,
+        routing_model_config=object(),
+    )
+    # 每个测试使用独立的索引，避免决策缓存跨测试共享
+    router.index = RoutingIndex(ROUTING_RULES, SUB_AGENTS)
+    calls = []
+
+    async def oracle(prompt):
+        calls.append(prompt)
+        match = _PROMPT_MESSAGE.search(prompt)
+        if not match:
+            return "其他"
+        agent_id = ORACLE.get(match.group(1), "math")
+        return f'{{"agent_id": "{agent_id}", "confidence": 0.9, "reason": "oracle"}}'
+
+    monkeypatch.setattr(router, "_call_llm", oracle)
+    router.llm_calls = calls
+    return router
+
+
+def test_extract_topic_matches_keyword_counts():
+    assert extract_topic("这个方程和函数怎么求解") == "数学"
+    assert extract_topic("快递一直没有配送") == "订单"
+    assert extract_topic("你好") == "其他"
+
+
+def test_rule_scores_match_substring_scoring():
+    index = RoutingIndex(ROUTING_RULES, SUB_AGENTS)
+    scores = {rule.agent_id: score for rule, score in index.score_rules("数学里的方程和 1+2 怎么算")}
+    assert scores["math"] == pytest.approx(2 / 4 * 0.6 + 0.3)
+    assert scores["physics"] == 0.0
+    assert index.rule_score("数学里的方程", ROUTING_RULES[0]) == pytest.approx(0.3)
+
+
+@pytest.mark.asyncio
+async def test_hybrid_routing_accurate_with_few_llm_calls(router):
+    methods = []
+    correct = 0
+    for message, label in LABELLED:
+        agent_id, _, method = await router._route_with_hybrid(message)
+        methods.append(method)
+        correct += agent_id == label
+
+    assert correct / len(LABELLED) >= 0.9
+    # 多数消息由关键词或向量相似度直接决定，只有少数需要调用 LLM
+    assert len(router.llm_calls) <= len(LABELLED) // 4
+    assert "vector" in methods
+
+
+@pytest.mark.asyncio
+async def test_llm_decisions_cached_for_repeated_and_near_duplicate_messages(router):
+    router.vector_confidence_threshold = 1.1  # 强制走 LLM 路径
+    message = "我昨天买的东西想退钱怎么弄"
+
+    assert (await router._route_with_hybrid(message))[0] == "refund"
+    assert len(router.llm_calls) == 1
+
+    # 完全相同（忽略标点与大小写）与近似重复的消息都命中缓存
+    await router._route_with_hybrid("我昨天买的东西想退钱，怎么弄？")
+    await router._route_with_hybrid("我昨天买的东西想退钱怎么弄啊")
+    assert len(router.llm_calls) == 1
+
+    # 不相关的消息仍调用 LLM
+    await router._route_with_hybrid("今天天气怎么样")
+    assert len(router.llm_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_topic_extraction_skips_llm_when_keywords_match(router):
+    assert await router._extract_topic_with_llm("这个方程怎么求解") == "数学"
+    assert router.llm_calls == []
+
+
+def test_near_duplicate_lookup_scans_bounded_candidates(monkeypatch):
+    index = RoutingIndex(ROUTING_RULES, SUB_AGENTS)
+    cache = RoutingDecisionCache(max_size=5000)
+    for i in range(5000):
+        message = f"第{i}号订单{i * 7}的物流信息{i % 13}"
+        cache.put(message, index.vectorize(message), ("order", 0.9))
+    message = "我昨天买的东西想退钱怎么弄"
+    cache.put(message, index.vectorize(message), ("refund", 0.9))
+
+    compared = []
+    cosine = routing_index._cosine
+    monkeypatch.setattr(routing_index, "_cosine", lambda a, b: compared.append(1) or cosine(a, b))
+
+    near = "我昨天买的东西想退钱怎么弄啊"
+    assert cache.get(near, index.vectorize(near)) == ("refund", 0.9)
+    assert len(compared) <= cache.signature_terms * cache.bucket_size
+    assert len(cache) == 5000
+
+
+@pytest.mark.asyncio
+async def test_master_router_reuses_cached_decisions():
+    router = MasterAgentRouter(
+        db=None,
+        master_model_config=None,
+        model_parameters=None,
+        sub_agents=SUB_AGENTS,
+        state_manager=ConversationStateManager(),
+        enable_rule_fast_path=False,
+    )
+    router.index = RoutingIndex([], SUB_AGENTS)
+    router.similarity_confidence_threshold = 1.1  # 强制走 Master Agent
+    calls = []
+
+    async def master_llm(prompt):
+        calls.append(prompt)
+        return '{"selected_agent_id": "refund", "confidence": 0.9, "topic": "退款"}'
+
+    router._call_master_agent_llm = master_llm
+    first = await router.route("我昨天买的东西想退钱怎么弄")
+    assert first["selected_agent_id"] == "refund" and first["routing_method"] == "master_agent"
+
+    repeated = await router.route("我昨天买的东西想退钱怎么弄啊", conversation_id="c1")
+    assert repeated["selected_agent_id"] == "refund" and repeated["routing_method"] == "cache"
+    assert len(calls) == 1
+
+    # 有会话上下文时决策依赖上下文，不使用缓存
+    await router.route("我昨天买的东西想退钱怎么弄", conversation_id="c1")
+    assert len(calls) == 2
+
+    # 置信度足够时由向量相似度直接决定
+    router.similarity_confidence_threshold = 0.8
+    decision = await router.route("几何证明题和方程求解")
+    assert decision["selected_agent_id"] == "math" and decision["routing_method"] == "similarity"
+    assert len(calls) == 2
@@ -0,0 +1,159 @@
+# -*- coding: UTF-8 -*-
+"""子 Agent 滑动窗口执行器测试"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.multi_agent_orchestrator import MultiAgentOrchestrator
+from app.services.sub_agent_executor import SubAgentExecutor, SubAgentJob
+
+# 每 3 个一批时，每批都有一个慢 Agent
+LATENCIES = [0.3, 0.05, 0.05] * 3
+
+
+def _fake_job(i: int, latency: float) -> SubAgentJob:
+    async def run():
+        await asyncio.sleep(latency)
+        return {"message": f"agent-{i}", "conversation_id": None}
+    return SubAgentJob(agent_id=str(i), agent_name=f"agent-{i}", run=run)
+
+
+async def _batched(latencies, limit):
+    """旧实现：按批次 gather"""
+    for i in range(0, len(latencies), limit):
+        await asyncio.gather(*[asyncio.sleep(t) for t in latencies[i:i + limit]])
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_wall_time_close_to_slowest_agent():
+    start = time.monotonic()
+    await _batched(LATENCIES, 3)
+    batched = time.monotonic() - start
+
+    executor = SubAgentExecutor(limit=3)
+    start = time.monotonic()
+    outcomes = await executor.run_all([_fake_job(i, t) for i, t in enumerate(LATENCIES)])
+    sliding = time.monotonic() - start
+
+    assert [o.result["message"] for o in outcomes] == [f"agent-{i}" for i in range(len(LATENCIES))]
+    # 批次执行约为 3 × 0.3s，滑动窗口接近单个慢 Agent 的耗时
+    assert batched >= 0.9
+    assert sliding < 0.55
+
+
+@pytest.mark.asyncio
+async def test_results_delivered_as_completed_with_timeout():
+    executor = SubAgentExecutor(limit=2, timeout=0.2)
+    jobs = [_fake_job(0, 1.0), _fake_job(1, 0.05), _fake_job(2, 0.05)]
+
+    start = time.monotonic()
+    order = []
+    async for outcome in executor.as_completed(jobs):
+        order.append((outcome.job.agent_id, time.monotonic() - start))
+        if outcome.job.agent_id == "0":
+            assert "超时" in outcome.error
+        else:
+            assert outcome.success
+    # 快 Agent 先交付，慢 Agent 在超时后交付，不会等满 1s
+    assert [agent_id for agent_id, _ in order] == ["1", "2", "0"]
+    assert order[0][1] < 0.15 and order[-1][1] < 0.35
+
+
+@pytest.mark.asyncio
+async def test_stream_respects_limit_and_reports_failures():
+    running = 0
+    peak = 0
+
+    def _stream_job(i, fail=False):
+        async def events():
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            try:
+                for n in range(3):
+                    await asyncio.sleep(0.01)
+                    yield f"{i}-{n}"
+                if fail:
+                    raise RuntimeError("boom")
+            finally:
+                running -= 1
+        return SubAgentJob(agent_id=str(i), agent_name=str(i), run=events)
+
+    items = [item async for item in SubAgentExecutor(limit=2).stream(
+        [_stream_job(0), _stream_job(1, fail=True), _stream_job(2), _stream_job(3)]
+    )]
+
+    assert peak == 2
+    assert sum(1 for _, kind, _ in items if kind == "event") == 12
+    assert {job.agent_id: data for job, kind, data in items if kind == "error"} == {"1": "boom"}
+    assert sum(1 for _, kind, _ in items if kind == "done") == 3
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_parallel_execution_uses_sliding_window():
+    orchestrator = MultiAgentOrchestrator.__new__(MultiAgentOrchestrator)
+    orchestrator.config = type("Config", (), {"execution_config": {"parallel_limit": 3, "timeout": 60}})()
+    orchestrator.sub_agents = {str(i): {"config": t} for i, t in enumerate(LATENCIES)}
+
+    async def fake_sub_agent(agent_config, message, *args):
+        await asyncio.sleep(agent_config)
+        return {"message": f"{message}:{agent_config}", "conversation_id": None}
+
+    orchestrator._execute_sub_agent = fake_sub_agent
+    task_analysis = {
+        "message": "hi",
+        "sub_agents": [{"agent_id": str(i), "name": f"agent-{i}"} for i in range(len(LATENCIES))],
+    }
+
+    start = time.monotonic()
+    results = await orchestrator._execute_parallel(task_analysis, None, None)
+    elapsed = time.monotonic() - start
+
+    assert [r["result"]["message"] for r in results] == [f"hi:{t}" for t in LATENCIES]
+    assert elapsed < 0.55
+
+
+@pytest.mark.asyncio
+async def test_sub_agent_uses_preloaded_workspace_id(monkeypatch):
+    """子 Agent 执行只使用加载时取出的 workspace_id，不经编排器会话懒加载 app"""
+    import contextlib
+    import sys
+    import types
+
+    from app.services import multi_agent_orchestrator
+
+    class Proxy:
+        workspace_id = "ws-1"
+        default_model_config_id = "model-1"
+
+        @property
+        def app(self):
+            raise AssertionError("不应在子 Agent 中访问 agent_config.app")
+
+    class FakeDB:
+        def get(self, model, pk):
+            return {"id": pk}
+
+    calls = []
+
+    class FakeRunService:
+        def __init__(self, db):
+            pass
+
+        async def run(self, **kwargs):
+            calls.append(kwargs["workspace_id"])
+            return {"message": "ok"}
+
+    monkeypatch.setattr(multi_agent_orchestrator, "get_db_context", lambda: contextlib.nullcontext(FakeDB()))
+    monkeypatch.setitem(
+        sys.modules, "app.services.draft_run_service",
+        types.SimpleNamespace(AgentRunService=FakeRunService),
+    )
+
+    orchestrator = MultiAgentOrchestrator.__new__(MultiAgentOrchestrator)
+    results = await asyncio.gather(*[
+        orchestrator._execute_sub_agent(Proxy(), "hi", {}, None, None) for _ in range(3)
+    ])
+    assert results == [{"message": "ok"}] * 3
+    assert calls == ["ws-1"] * 3
@@ -0,0 +1,207 @@
+# -*- coding: UTF-8 -*-
+"""Redis 任务调度器测试
+
+- worker 发出完成事件后，同一用户排队的下一个任务在下一轮即被派发
+- 一轮派发的 Redis 往返次数与用户数无关（加锁、提交各一次流水线）
+- 漏掉完成事件或丢失的任务由兜底扫描释放
+
+需要可用的 Redis，环境不可用时跳过（完成信号的过滤逻辑不依赖 Redis）。
+"""
+import json
+import time
+import uuid
+from types import SimpleNamespace
+
+import pytest
+import redis
+
+from app import celery_task_scheduler
+from app.celery_task_scheduler import SCHEDULER_HEADER, RedisTaskScheduler
+
+TASK = "app.tasks.demo_task"
+
+
+class RecordingScheduler(RedisTaskScheduler):
+    """不连接 broker：记录派发的任务并返回假的 AsyncResult"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = []
+
+    def _send_tasks(self, batch):
+        results = []
+        for item in batch:
+            task = SimpleNamespace(id=item[3])
+            self.sent.append((item[0], item[2]["msg_id"], task.id))
+            results.append((item, task))
+        return results
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = RecordingScheduler()
+    try:
+        scheduler.redis.ping()
+    except Exception as e:
+        pytest.skip(f"Redis 不可用: {e}")
+    prefix = f"test_scheduler:{uuid.uuid4().hex}"
+    scheduler.USER_QUEUE_PREFIX = f"{prefix}:uq:"
+    scheduler.ACTIVE_USERS = f"{prefix}:active_users"
+    scheduler.READY_SET = f"{prefix}:ready_users"
+    scheduler.PENDING_HASH = f"{prefix}:pending_tasks"
+    scheduler.REGISTRY_KEY = f"{prefix}:instances"
+    scheduler.COMPLETION_STREAM = f"{prefix}:completions"
+    yield scheduler
+    keys = list(scheduler.redis.scan_iter(f"{prefix}:*"))
+    for _, msg_id, task_id in scheduler.sent:
+        keys += [f"task_tracker:{msg_id}", f"celery-task-meta-{task_id}"]
+    keys += [f"{TASK}:{user_id}" for user_id, _, _ in scheduler.sent]
+    scheduler.redis.delete(*keys)
+    scheduler.redis.close()
+
+
+def _finish(scheduler, task_id, status="SUCCESS", result=None, signal=True):
+    """模拟 worker：写入结果并（可选）发出完成事件"""
+    scheduler.redis.set(
+        f"celery-task-meta-{task_id}",
+        json.dumps({"status": status, "result": result, "task_id": task_id}),
+        ex=600,
+    )
+    if signal:
+        scheduler.signal_completion(task_id, status)
+
+
+def _tick(scheduler):
+    scheduler._last_heartbeat = time.time()  # 单实例，跳过心跳
+    scheduler.schedule_loop()
+
+
+def test_completion_event_hands_off_next_task(scheduler):
+    user_a, user_b = str(uuid.uuid4()), str(uuid.uuid4())
+    first_a = scheduler.push_task(TASK, user_a, {"n": 1})
+    second_a = scheduler.push_task(TASK, user_a, {"n": 2})
+    first_b = scheduler.push_task(TASK, user_b, {"n": 1})
+
+    _tick(scheduler)
+    assert sorted(msg_id for _, msg_id, _ in scheduler.sent) == sorted([first_a, first_b])
+    assert scheduler.get_task_status(second_a)["status"] == "QUEUED"
+
+    # 上一个任务还在执行，不派发
+    _tick(scheduler)
+    assert len(scheduler.sent) == 2
+
+    task_a = next(task_id for _, msg_id, task_id in scheduler.sent if msg_id == first_a)
+    _finish(scheduler, task_a, result={"ok": True})
+    _tick(scheduler)
+
+    assert [msg_id for _, msg_id, _ in scheduler.sent[2:]] == [second_a]
+    assert scheduler.get_task_status(first_a) == {"status": "SUCCESS", "task_id": task_a, "result": {"ok": True}}
+    assert scheduler.get_task_status(second_a)["status"] == "DISPATCHED"
+    assert not scheduler.redis.hexists(scheduler.PENDING_HASH, task_a)
+    assert scheduler.redis.llen(f"{scheduler.USER_QUEUE_PREFIX}{user_a}") == 0
+    # 完成事件已确认
+    assert scheduler.redis.xpending(scheduler.COMPLETION_STREAM, "scheduler")["pending"] == 0
+
+
+def test_dispatch_round_trips_do_not_grow_with_users(scheduler, monkeypatch):
+    users = [str(uuid.uuid4()) for _ in range(200)]
+    for user_id in users:
+        scheduler.push_task(TASK, user_id, {})
+    scheduler._consume_completions()  # 创建消费组
+
+    round_trips = []
+    execute_command = scheduler.redis.execute_command
+    pipeline_execute = redis.client.Pipeline.execute
+
+    def count_command(*args, **kwargs):
+        round_trips.append(args[0])
+        return execute_command(*args, **kwargs)
+
+    def count_pipeline(self, *args, **kwargs):
+        round_trips.append("PIPELINE")
+        return pipeline_execute(self, *args, **kwargs)
+
+    monkeypatch.setattr(scheduler.redis, "execute_command", count_command)
+    monkeypatch.setattr(redis.client.Pipeline, "execute", count_pipeline)
+    _tick(scheduler)
+
+    assert len(scheduler.sent) == len(users)
+    # SMEMBERS、SREM、XREADGROUP + 队首、加锁、登记、提交四次流水线
+    assert len(round_trips) <= 7, round_trips
+
+
+def test_completion_before_commit_is_released(scheduler):
+    """任务在派发提交前就已完成，另一实例读到完成事件时能找到待完成记录并释放锁"""
+    user_id = str(uuid.uuid4())
+    first = scheduler.push_task(TASK, user_id, {})
+    second = scheduler.push_task(TASK, user_id, {})
+    scheduler._consume_completions()  # 创建消费组
+
+    other = RecordingScheduler()
+    for key in ("USER_QUEUE_PREFIX", "ACTIVE_USERS", "READY_SET", "PENDING_HASH", "REGISTRY_KEY", "COMPLETION_STREAM"):
+        setattr(other, key, getattr(scheduler, key))
+    send_tasks = scheduler._send_tasks
+
+    def send_and_finish(batch):
+        results = send_tasks(batch)
+        for _, task in results:
+            _finish(scheduler, task.id)
+        other._consume_completions()
+        return results
+
+    scheduler._send_tasks = send_and_finish
+    _tick(scheduler)
+    scheduler._send_tasks = send_tasks
+    other.redis.close()
+
+    task_id = scheduler.sent[0][2]
+    assert scheduler.get_task_status(first)["status"] == "SUCCESS"
+    assert not scheduler.redis.exists(f"{TASK}:{user_id}")
+    assert not scheduler.redis.hexists(scheduler.PENDING_HASH, task_id)
+
+    _tick(scheduler)
+    assert [msg_id for _, msg_id, _ in scheduler.sent] == [first, second]
+
+
+def test_sweep_releases_missed_and_lost_tasks(scheduler):
+    user_a, user_b = str(uuid.uuid4()), str(uuid.uuid4())
+    first_a = scheduler.push_task(TASK, user_a, {})
+    second_a = scheduler.push_task(TASK, user_a, {})
+    lost_b = scheduler.push_task(TASK, user_b, {})
+    _tick(scheduler)
+    tasks = {msg_id: task_id for _, msg_id, task_id in scheduler.sent}
+
+    # 完成事件丢失：只有结果，没有事件
+    _finish(scheduler, tasks[first_a], signal=False)
+    _tick(scheduler)
+    assert len(scheduler.sent) == 2
+
+    # 任务丢失：没有结果且超过超时时间
+    meta = json.loads(scheduler.redis.hget(scheduler.PENDING_HASH, tasks[lost_b]))
+    meta["dispatched_at"] -= celery_task_scheduler.TASK_TIMEOUT + 1
+    scheduler.redis.hset(scheduler.PENDING_HASH, tasks[lost_b], json.dumps(meta))
+
+    scheduler._cleanup_finished()
+    assert scheduler.get_task_status(first_a)["status"] == "SUCCESS"
+    assert scheduler.get_task_status(lost_b)["status"] == "EXPIRED"
+    assert scheduler.redis.hlen(scheduler.PENDING_HASH) == 0
+
+    _tick(scheduler)
+    assert [msg_id for _, msg_id, _ in scheduler.sent[2:]] == [second_a]
+
+
+def test_worker_signals_only_scheduled_finished_tasks(monkeypatch):
+    signalled = []
+    monkeypatch.setattr(
+        celery_task_scheduler.scheduler, "signal_completion",
+        lambda task_id, status: signalled.append((task_id, status)),
+    )
+
+    def task(headers):
+        return SimpleNamespace(request=SimpleNamespace(get=headers.get))
+
+    celery_task_scheduler._signal_completion("t1", task({SCHEDULER_HEADER: "m1"}), "SUCCESS")
+    celery_task_scheduler._signal_completion("t2", task({SCHEDULER_HEADER: "m2"}), "RETRY")
+    celery_task_scheduler._signal_completion("t3", task({}), "FAILURE")
+    celery_task_scheduler._signal_completion("t4", task({SCHEDULER_HEADER: "m4"}), "FAILURE")
+    assert signalled == [("t1", "SUCCESS"), ("t4", "FAILURE")]
@@ -0,0 +1,150 @@
+# -*- coding: UTF-8 -*-
+"""ReAct 工具编排器测试：流式输出最终回答、同轮工具并发执行"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from langchain_core.tools import tool
+
+from app.services.tool_orchestrator import ToolOrchestrator
+
+
+@tool
+def get_weather(city: str) -> str:
+    """查询城市天气"""
+    time.sleep(0.3)
+    return f"{city}：晴"
+
+
+class ScriptedLLM:
+    """按脚本逐轮返回输出的假模型，逐字符流式产出，记录调用次数与收到的消息"""
+
+    def __init__(self, responses, chunk_delay: float = 0.01):
+        self.responses = list(responses)
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.received = []
+
+    async def stream(self, messages):
+        self.received.append(list(messages))
+        response = self.responses[self.calls]
+        self.calls += 1
+        for ch in response:
+            await asyncio.sleep(self.chunk_delay)
+            yield ch
+        yield 10
+
+    async def invoke(self, messages):
+        return "".join([ch async for ch in self.stream(messages) if isinstance(ch, str)])
+
+
+TOOL_ROUND = 'Thought：需要查天气\nAction：get_weather\nInput：{"city": "北京"}'
+ANSWER = "北京今天天气晴朗，适合出行。" * 8
+
+
+@pytest.mark.asyncio
+async def test_final_round_streamed_without_regeneration():
+    llm = ScriptedLLM([TOOL_ROUND, ANSWER])
+    orchestrator = ToolOrchestrator([get_weather])
+
+    start = time.monotonic()
+    first_token_at = None
+    events = []
+    async for item in orchestrator.stream(llm.stream, "北京天气怎么样", []):
+        if isinstance(item, str) and first_token_at is None:
+            first_token_at = time.monotonic() - start
+        events.append(item)
+    total = time.monotonic() - start
+
+    # 工具调用块不会泄露给客户端，回答直接来自最后一轮
+    texts = [e for e in events if isinstance(e, str)]
+    assert "".join(texts) == ANSWER
+    assert [e["type"] for e in events if isinstance(e, dict)] == ["tool_start", "tool_end", "node_executions"]
+    assert events[-1] == 20
+    assert orchestrator.final_answer == ANSWER
+    assert orchestrator.node_executions[0]["output"] == "北京：晴"
+    assert "Observation：北京：晴" in llm.received[1][-1]["content"]
+
+    # 每轮对话只调用模型 2 次（工具轮 + 回答轮），不再额外重新生成
+    assert llm.calls == 2
+    # 首个 token 在回答轮开始输出时即到达，而不是整个循环结束后
+    assert first_token_at < total - 0.1
+
+
+@pytest.mark.asyncio
+async def test_preamble_of_tool_round_not_streamed():
+    preamble = "好的，我先帮你查一下北京的天气。\n"
+    llm = ScriptedLLM([preamble + TOOL_ROUND, "晴。"], chunk_delay=0)
+    orchestrator = ToolOrchestrator([get_weather])
+
+    events = [item async for item in orchestrator.stream(llm.stream, "北京天气怎么样", [])]
+
+    # 工具调用轮标记前的铺垫不会推送给客户端；短回答在轮次结束时放行
+    assert [e for e in events if isinstance(e, str)] == ["晴。"]
+    assert orchestrator.node_executions[0]["output"] == "北京：晴"
+
+
+def test_streaming_llm_keeps_answer_params(monkeypatch):
+    import app.core.models as models
+
+    monkeypatch.setattr(models, "RedBearLLM", lambda config, type: SimpleNamespace(_config=config))
+    api_key_config = {
+        "model_name": "qwen-plus", "api_key": "sk-test", "provider": "dashscope",
+        "capability": ["thinking", "json_output"],
+    }
+    params = {"temperature": 0.2, "max_tokens": 512, "deep_thinking": True,
+              "thinking_budget_tokens": 1024, "json_output": True}
+    model_config = SimpleNamespace(type="chat")
+
+    config = ToolOrchestrator._build_llm(api_key_config, model_config, params)._config
+    assert (config.deep_thinking, config.thinking_budget_tokens, config.json_output) == (True, 1024, True)
+    assert config.extra_params == {"temperature": 0.2, "max_tokens": 512}
+    # 只收集工具结果的轮次不启用回答参数
+    config = ToolOrchestrator._build_llm(api_key_config, model_config, params, answer_params=False)._config
+    assert (config.deep_thinking, config.json_output) == (False, False)
+
+
+@pytest.mark.asyncio
+async def test_first_token_earlier_than_run_then_regenerate():
+    orchestrator = ToolOrchestrator([get_weather])
+
+    # 旧流程：先跑完整个 ReAct 循环，再调用模型重新生成回答
+    legacy = ScriptedLLM([TOOL_ROUND, ANSWER, ANSWER])
+    start = time.monotonic()
+    await orchestrator.run(legacy.invoke, "北京天气怎么样", [])
+    async for _ in legacy.stream([]):
+        break
+    legacy_first_token = time.monotonic() - start
+
+    streaming = ScriptedLLM([TOOL_ROUND, ANSWER])
+    start = time.monotonic()
+    async for item in ToolOrchestrator([get_weather]).stream(streaming.stream, "北京天气怎么样", []):
+        if isinstance(item, str):
+            break
+    first_token = time.monotonic() - start
+
+    assert legacy.calls == 3 and streaming.calls == 2
+    assert first_token < legacy_first_token
+
+
+@pytest.mark.asyncio
+async def test_independent_actions_run_concurrently():
+    two_actions = (
+        'Thought：分别查询两个城市\nAction：get_weather\nInput：{"city": "北京"}\n'
+        'Thought：再查上海\nAction：get_weather\nInput：{"city": "上海"}'
+    )
+    llm = ScriptedLLM([two_actions, "两地都是晴天。"], chunk_delay=0)
+    orchestrator = ToolOrchestrator([get_weather])
+
+    start = time.monotonic()
+    final_answer, trajectory, node_executions = await orchestrator.run(llm.invoke, "北京和上海天气", [])
+    elapsed = time.monotonic() - start
+
+    assert final_answer == "两地都是晴天。"
+    assert [n["output"] for n in node_executions] == ["北京：晴", "上海：晴"]
+    assert "上海：晴" in trajectory
+    assert "Observation（get_weather）：上海：晴" in llm.received[1][-1]["content"]
+    # 两次 0.3s 的工具调用并发执行
+    assert elapsed < 0.55
+    assert llm.calls == 2
@@ -0,0 +1,303 @@
+# -*- coding: UTF-8 -*-
+"""工作流节点执行记录 write-behind：请求路径不写库、读取一致、批量落库与大字段转存
+
+需要可用的 Redis，环境不可用时跳过。
+"""
+import contextlib
+import datetime
+import json
+import uuid
+
+import pytest
+import redis
+from sqlalchemy import create_engine, event, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core.config import settings
+from app.core.workflow.node_record_writer import (
+    PAYLOAD_REF_KEY,
+    WorkflowNodeRecordWriter,
+    resolve_payload_refs,
+)
+from app.db import Base
+from app.models.workflow_model import WorkflowNodeExecution
+
+APP_ID = uuid.uuid4()
+CONFIG_ID = uuid.uuid4()
+NODE_COUNT = 60
+
+
+@compiles(JSONB, "sqlite")
+def _compile_json_sqlite(element, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def redis_client():
+    client = redis.StrictRedis(
+        host=settings.REDIS_HOST,
+        port=settings.REDIS_PORT,
+        db=settings.REDIS_DB_CELERY_BACKEND,
+        password=settings.REDIS_PASSWORD or None,
+        decode_responses=True,
+    )
+    try:
+        client.ping()
+    except Exception as e:
+        pytest.skip(f"Redis 不可用: {e}")
+    original = WorkflowNodeRecordWriter.PREFIX
+    WorkflowNodeRecordWriter.PREFIX = f"test_node_records:{uuid.uuid4().hex}"
+    yield client
+    keys = list(client.scan_iter(f"{WorkflowNodeRecordWriter.PREFIX}:*"))
+    if keys:
+        client.delete(*keys)
+    WorkflowNodeRecordWriter.PREFIX = original
+    client.close()
+
+
+class Database:
+    """SQLite 数据库，统计落库语句"""
+
+    def __init__(self):
+        self.engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+        Base.metadata.create_all(self.engine, tables=[WorkflowNodeExecution.__table__])
+        self.statements = []
+        self.commits = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        event.listen(self.engine, "commit", self._on_commit)
+        self.fail = False
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.split()[0].upper())
+
+    def _on_commit(self, conn):
+        self.commits += 1
+
+    @contextlib.contextmanager
+    def session(self):
+        if self.fail:
+            raise RuntimeError("database unavailable")
+        with Session(self.engine) as db:
+            yield db
+
+    def rows(self, execution_id):
+        with Session(self.engine) as db:
+            stmt = select(WorkflowNodeExecution).where(
+                WorkflowNodeExecution.execution_id == execution_id
+            ).order_by(WorkflowNodeExecution.execution_order)
+            return list(db.execute(stmt).scalars())
+
+
+@pytest.fixture
+def database():
+    database = Database()
+    yield database
+    database.engine.dispose()
+
+
+@pytest.fixture
+def writer(redis_client, database):
+    uploads = {}
+    writer = WorkflowNodeRecordWriter(
+        redis_client,
+        session_factory=database.session,
+        upload_payloads=lambda items: uploads.update(items),
+        schedule_flush=lambda: setattr(writer, "flush_requests", writer.flush_requests + 1),
+        batch_size=2,
+        payload_limit=4096,
+        preview_chars=64,
+    )
+    writer.flush_requests = 0
+    writer.uploads = uploads
+    return writer
+
+
+def _items(execution_id, count=NODE_COUNT, label="v1", big_node=None):
+    started = datetime.datetime(2026, 10, 1, 8, 0, 0)
+    items = []
+    for i in range(count):
+        output = {"output": {"text": f"{label}-{i}"}}
+        if i == big_node:
+            output = {"output": {"text": "长文本" * 5000}}
+        items.append({
+            "execution_id": execution_id,
+            "app_id": APP_ID,
+            "workflow_config_id": CONFIG_ID,
+            "node_id": f"node_{i}",
+            "node_type": "llm" if i % 2 else "code",
+            "node_name": f"节点{i}",
+            "execution_order": i + 1,
+            "retry_count": 0,
+            "input_data": {"query": f"q{i}"},
+            "output_data": output,
+            "status": "completed",
+            "error_message": None,
+            "started_at": started + datetime.timedelta(seconds=i),
+            "completed_at": started + datetime.timedelta(seconds=i + 1),
+            "elapsed_time": 1.0,
+            "token_usage": {"total_tokens": i},
+            "cache_hit": False,
+            "cache_key": None,
+            "meta_data": {"source": "workflow_execution", "debug": False},
+        })
+    return items
+
+
+def test_submit_defers_writes_and_reads_stay_consistent(writer, database):
+    execution_id = uuid.uuid4()
+    records = writer.submit(execution_id, APP_ID, _items(execution_id))
+
+    # 请求路径不访问数据库，只派发一次落库任务
+    assert database.statements == []
+    assert writer.flush_requests == 1
+    assert len(records) == NODE_COUNT
+
+    pending = writer.get_pending(execution_id)
+    assert [r.node_id for r in pending] == [f"node_{i}" for i in range(NODE_COUNT)]
+    assert [r.id for r in pending] == [r.id for r in records]
+    assert pending[5].output_data == {"output": {"text": "v1-5"}}
+    assert pending[5].completed_at == datetime.datetime(2026, 10, 1, 8, 0, 6)
+    latest = writer.get_latest_pending(APP_ID, "node_7", source="workflow_execution")
+    assert latest.output_data == {"output": {"text": "v1-7"}}
+    assert writer.get_latest_pending(APP_ID, "node_7", source="single_node_debug") is None
+
+    # 落库前重复提交以最新版本为准，并且不重复派发任务
+    writer.submit(execution_id, APP_ID, _items(execution_id, label="v2"))
+    assert writer.flush_requests == 1
+
+    assert writer.drain() == 1
+    rows = database.rows(execution_id)
+    assert len(rows) == NODE_COUNT
+    assert rows[5].output_data == {"output": {"text": "v2-5"}}
+    # 整批一个事务：一次 delete，节点行批量 insert
+    assert database.commits == 1
+    assert database.statements.count("DELETE") == 1
+    assert writer.get_pending(execution_id) is None
+    assert writer.get_latest_pending(APP_ID, "node_7") is None
+    assert writer.pending_count() == 0
+
+
+def test_drain_batches_executions(writer, database):
+    execution_ids = [uuid.uuid4() for _ in range(5)]
+    for execution_id in execution_ids:
+        writer.submit(execution_id, APP_ID, _items(execution_id, count=10))
+
+    assert writer.drain() == 5
+    # batch_size=2：5 个执行分 3 个事务落库
+    assert database.commits == 3
+    assert all(len(database.rows(execution_id)) == 10 for execution_id in execution_ids)
+
+
+def test_oversized_payload_offloaded_to_storage(writer, database):
+    execution_id = uuid.uuid4()
+    writer.submit(execution_id, APP_ID, _items(execution_id, count=3, big_node=1))
+    # 落库前读取完整内容
+    assert writer.get_pending(execution_id)[1].output_data["output"]["text"].startswith("长文本")
+
+    writer.drain()
+    rows = database.rows(execution_id)
+    ref = rows[1].output_data
+    assert set(ref) == {PAYLOAD_REF_KEY, "size", "preview"}
+    assert ref[PAYLOAD_REF_KEY] == f"workflow/{APP_ID}/{execution_id}/{rows[1].id}/output_data.json"
+    assert len(ref["preview"]) == 64
+    stored = writer.uploads[ref[PAYLOAD_REF_KEY]]
+    assert len(stored) == ref["size"]
+    assert json.loads(stored) == {"output": {"text": "长文本" * 5000}}
+    # 未超过阈值的字段保持原样
+    assert rows[0].output_data == {"output": {"text": "v1-0"}}
+    assert rows[1].input_data == {"query": "q1"}
+
+    # 读接口还原完整内容，且不会写回数据库
+    with database.session() as db:
+        records = db.execute(
+            select(WorkflowNodeExecution).where(WorkflowNodeExecution.execution_id == execution_id)
+            .order_by(WorkflowNodeExecution.execution_order)
+        ).scalars().all()
+        resolve_payload_refs(records, download=lambda keys: [writer.uploads.get(key) for key in keys])
+        assert records[1].output_data == {"output": {"text": "长文本" * 5000}}
+        assert not db.dirty
+        db.commit()
+    assert PAYLOAD_REF_KEY in database.rows(execution_id)[1].output_data
+
+    # 下载失败时返回引用与预览
+    rows = resolve_payload_refs(database.rows(execution_id), download=lambda keys: [None] * len(keys))
+    assert rows[1].output_data["preview"] == ref["preview"]
+
+
+def test_upload_failure_keeps_payload_inline(writer, database, monkeypatch):
+    def _fail(uploads):
+        raise RuntimeError("storage unavailable")
+
+    monkeypatch.setattr(writer, "upload_payloads", _fail)
+    execution_id = uuid.uuid4()
+    writer.submit(execution_id, APP_ID, _items(execution_id, count=3, big_node=2))
+    # 上传失败不阻塞落库队列
+    assert writer.drain() == 1
+    assert database.rows(execution_id)[2].output_data == {"output": {"text": "长文本" * 5000}}
+    assert writer.pending_count() == 0
+
+
+def test_resubmit_during_drain_is_not_lost(writer, database, monkeypatch):
+    execution_id = uuid.uuid4()
+    writer.submit(execution_id, APP_ID, _items(execution_id, count=3))
+    original_write = writer._write
+
+    def _write(jobs):
+        original_write(jobs)
+        if not hasattr(writer, "resubmitted"):
+            writer.resubmitted = True
+            writer.submit(execution_id, APP_ID, _items(execution_id, count=3, label="v2"))
+
+    monkeypatch.setattr(writer, "_write", _write)
+    writer.drain()
+    assert database.rows(execution_id)[0].output_data == {"output": {"text": "v2-0"}}
+    assert writer.get_pending(execution_id) is None
+
+
+def test_failed_writes_are_retried_then_dropped(writer, database):
+    execution_id = uuid.uuid4()
+    writer.submit(execution_id, APP_ID, _items(execution_id, count=3))
+
+    database.fail = True
+    assert writer.drain() == 0
+    # 失败的执行保留在队列中，读取仍然一致
+    assert writer.pending_count() == 1
+    assert len(writer.get_pending(execution_id)) == 3
+
+    database.fail = False
+    assert writer.drain() == 1
+    assert len(database.rows(execution_id)) == 3
+
+    other = uuid.uuid4()
+    writer.submit(other, APP_ID, _items(other, count=3))
+    database.fail = True
+    for _ in range(writer.max_attempts):
+        writer.drain()
+    assert writer.pending_count() == 0
+    assert writer.get_pending(other) is None
+
+
+class _WorkerKilled(BaseException):
+    """模拟落库进程在批次中途退出"""
+
+
+def test_interrupted_batch_is_replayed(writer, database, monkeypatch):
+    execution_id = uuid.uuid4()
+    writer.submit(execution_id, APP_ID, _items(execution_id, count=3))
+
+    def _crash(jobs):
+        raise _WorkerKilled()
+
+    monkeypatch.setattr(writer, "_write", _crash)
+    writer.submit(execution_id, APP_ID, _items(execution_id, count=3, big_node=2))
+    with pytest.raises(_WorkerKilled):
+        writer.drain()
+    assert database.rows(execution_id) == []
+
+    monkeypatch.undo()
+    assert writer.drain() == 1
+    assert PAYLOAD_REF_KEY in database.rows(execution_id)[2].output_data
+    assert writer.pending_count() == 0
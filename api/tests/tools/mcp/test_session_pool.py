@@ -0,0 +1,301 @@
+# -*- coding: UTF-8 -*-
+import asyncio
+import json
+import time
+
+import pytest
+from aiohttp import web
+
+from app.core.tools.mcp.client import MCPToolCallError, SimpleMCPClient
+from app.core.tools.mcp import pool as mcp_pool
+from app.core.tools.mcp.pool import MCPSessionPool, get_mcp_session_pool
+
+HANDSHAKE_DELAY = 0.02
+CALL_DELAY = 0.01
+
+
+class StubMCPServer:
+    """本地 Streamable HTTP MCP 桩服务，统计握手与调用次数"""
+
+    def __init__(self):
+        self.initialize_count = 0
+        self.call_count = 0
+        self.list_count = 0
+        self.max_concurrent_calls = 0
+        self._concurrent_calls = 0
+        self._runner = None
+        self.url = ""
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        method = body.get("method")
+        if method == "initialize":
+            self.initialize_count += 1
+            await asyncio.sleep(HANDSHAKE_DELAY)
+            return web.json_response(
+                {"jsonrpc": "2.0", "id": body["id"], "result": {"capabilities": {"tools": {}}}},
+                headers={"Mcp-Session-Id": f"session-{self.initialize_count}"}
+            )
+        if method == "notifications/initialized":
+            return web.Response(status=202)
+        if method == "ping":
+            return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": {}})
+        if method == "tools/list":
+            self.list_count += 1
+            tools = [{"name": "echo", "description": "echo", "inputSchema": {"type": "object"}}]
+            return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": {"tools": tools}})
+        if method == "tools/call":
+            params = body["params"]
+            if params["name"] != "echo":
+                return web.json_response(
+                    {"jsonrpc": "2.0", "id": body["id"], "error": {"code": -32602, "message": "unknown tool"}}
+                )
+            self.call_count += 1
+            self._concurrent_calls += 1
+            self.max_concurrent_calls = max(self.max_concurrent_calls, self._concurrent_calls)
+            await asyncio.sleep(CALL_DELAY)
+            self._concurrent_calls -= 1
+            content = [{"type": "text", "text": params["arguments"].get("text", "")}]
+            return web.json_response({"jsonrpc": "2.0", "id": body["id"], "result": {"content": content}})
+        return web.json_response({"jsonrpc": "2.0", "id": body.get("id"), "error": {"message": "unknown"}})
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/mcp", self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/mcp"
+
+    async def stop(self):
+        await self._runner.cleanup()
+
+
+@pytest.fixture
+async def stub_server():
+    server = StubMCPServer()
+    await server.start()
+    yield server
+    await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_initialized_session(stub_server):
+    """串行调用复用同一会话，只握手一次"""
+    pool = MCPSessionPool()
+    try:
+        for i in range(20):
+            result = await pool.call_tool(stub_server.url, {}, "echo", {"text": str(i)})
+            assert result["content"][0]["text"] == str(i)
+    finally:
+        await pool.close()
+
+    assert stub_server.call_count == 20
+    assert stub_server.initialize_count == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_caps_sessions_and_multiplexes(stub_server):
+    """并发调用受每服务器会话上限约束，同一会话上多路复用"""
+    pool = MCPSessionPool(max_sessions_per_server=2, max_concurrent_per_session=4)
+    try:
+        results = await asyncio.gather(*[
+            pool.call_tool(stub_server.url, {}, "echo", {"text": str(i)})
+            for i in range(32)
+        ])
+    finally:
+        await pool.close()
+
+    assert [r["content"][0]["text"] for r in results] == [str(i) for i in range(32)]
+    assert stub_server.initialize_count <= 2
+    assert 1 < stub_server.max_concurrent_calls <= 8
+
+
+@pytest.mark.asyncio
+async def test_pool_tool_error_keeps_session(stub_server):
+    """工具自身返回的错误不重试，也不丢弃会话"""
+    pool = MCPSessionPool()
+    try:
+        with pytest.raises(MCPToolCallError):
+            await pool.call_tool(stub_server.url, {}, "missing", {})
+        await pool.call_tool(stub_server.url, {}, "echo", {"text": "ok"})
+    finally:
+        await pool.close()
+
+    assert stub_server.initialize_count == 1
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_unhealthy_session(stub_server):
+    """空闲会话健康检查失败后重新连接"""
+    pool = MCPSessionPool(health_check_interval=0)
+    try:
+        await pool.call_tool(stub_server.url, {}, "echo", {"text": "a"})
+        slot = next(iter(pool._slots.values()))
+        # 模拟连接被对端关闭
+        await slot.sessions[0].client._session.close()
+        await pool.call_tool(stub_server.url, {}, "echo", {"text": "b"})
+    finally:
+        await pool.close()
+
+    assert stub_server.initialize_count == 2
+    assert stub_server.call_count == 2
+
+
+class StubSSEMCPServer:
+    """本地 SSE MCP 桩服务：每条 SSE 连接下发独立的 endpoint，连接断开后旧 endpoint 失效"""
+
+    def __init__(self):
+        self.initialize_count = 0
+        self.stale_posts = 0
+        self._streams = {}
+        self._next_id = 0
+        self._runner = None
+        self.url = ""
+
+    async def _sse(self, request: web.Request) -> web.StreamResponse:
+        self._next_id += 1
+        session_id = str(self._next_id)
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        queue = asyncio.Queue()
+        self._streams[session_id] = queue
+        await response.write(f"event: endpoint\ndata: /messages?session_id={session_id}\n\n".encode())
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    break
+                await response.write(f"event: message\ndata: {json.dumps(message)}\n\n".encode())
+        finally:
+            self._streams.pop(session_id, None)
+        return response
+
+    async def _message(self, request: web.Request) -> web.Response:
+        queue = self._streams.get(request.query.get("session_id"))
+        if queue is None:
+            self.stale_posts += 1
+            return web.Response(status=404, text="unknown session")
+        body = await request.json()
+        method = body.get("method")
+        if method == "initialize":
+            self.initialize_count += 1
+            await queue.put({"jsonrpc": "2.0", "id": body["id"], "result": {"capabilities": {"tools": {}}}})
+        elif method == "tools/call":
+            content = [{"type": "text", "text": body["params"]["arguments"].get("text", "")}]
+            await queue.put({"jsonrpc": "2.0", "id": body["id"], "result": {"content": content}})
+        elif "id" in body:
+            await queue.put({"jsonrpc": "2.0", "id": body["id"], "result": {}})
+        return web.Response(status=202)
+
+    def drop_sessions(self):
+        """模拟服务端重启：关闭全部 SSE 流，旧 endpoint 不再可用"""
+        for queue in list(self._streams.values()):
+            queue.put_nowait(None)
+        self._streams.clear()
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get("/sse", self._sse)
+        app.router.add_post("/messages", self._message)
+        self._runner = web.AppRunner(app, shutdown_timeout=0.1)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}/sse"
+
+    async def stop(self):
+        self.drop_sessions()
+        await self._runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_pool_reconnects_sse_session_with_new_endpoint():
+    """SSE 会话重连时重新获取 endpoint，不再向失效的旧 endpoint 发送请求"""
+    server = StubSSEMCPServer()
+    await server.start()
+    pool = MCPSessionPool(health_check_interval=0)
+    try:
+        await pool.call_tool(server.url, {"timeout": 2}, "echo", {"text": "a"})
+        client = next(iter(pool._slots.values())).sessions[0].client
+        first_endpoint = client._endpoint_url
+
+        server.drop_sessions()
+        result = await pool.call_tool(server.url, {"timeout": 2}, "echo", {"text": "b"})
+
+        assert result["content"][0]["text"] == "b"
+        assert client._endpoint_url != first_endpoint
+        assert server.initialize_count == 2
+    finally:
+        await pool.close()
+        await server.stop()
+
+
+@pytest.mark.asyncio
+async def test_list_tools_cached_with_ttl(stub_server):
+    pool = MCPSessionPool(tools_cache_ttl=60)
+    try:
+        for _ in range(5):
+            tools = await pool.list_tools(stub_server.url, {})
+            assert tools[0]["name"] == "echo"
+        await pool.list_tools(stub_server.url, {}, force_refresh=True)
+    finally:
+        await pool.close()
+
+    assert stub_server.list_count == 2
+
+
+@pytest.mark.asyncio
+async def test_benchmark_pooled_vs_per_call_connections(stub_server):
+    """重复调用基准：池化 vs 每次新建连接"""
+    rounds = 30
+
+    start = time.perf_counter()
+    for i in range(rounds):
+        async with SimpleMCPClient(stub_server.url, {}) as client:
+            await client.call_tool("echo", {"text": str(i)})
+    unpooled = time.perf_counter() - start
+    unpooled_handshakes = stub_server.initialize_count
+
+    pool = MCPSessionPool()
+    start = time.perf_counter()
+    try:
+        for i in range(rounds):
+            await pool.call_tool(stub_server.url, {}, "echo", {"text": str(i)})
+    finally:
+        await pool.close()
+    pooled = time.perf_counter() - start
+    pooled_handshakes = stub_server.initialize_count - unpooled_handshakes
+
+    print(f"\n[MCP] {rounds} calls: per-call connect {unpooled:.3f}s "
+          f"({unpooled_handshakes} handshakes), pooled {pooled:.3f}s ({pooled_handshakes} handshakes)")
+    assert unpooled_handshakes == rounds
+    assert pooled_handshakes == 1
+    assert pooled < unpooled
+
+
+def test_loop_pool_closed_when_asyncio_run_exits():
+    """Celery 任务中 asyncio.run 创建的循环结束时，该循环的会话池随之关闭"""
+    sessions = []
+
+    async def task():
+        server = StubMCPServer()
+        await server.start()
+        try:
+            pool = get_mcp_session_pool()
+            assert get_mcp_session_pool() is pool
+            result = await pool.call_tool(server.url, {}, "echo", {"text": "hi"})
+            sessions.extend(s for slot in pool._slots.values() for s in slot.sessions)
+            assert sessions and all(s.client.is_connected for s in sessions)
+            return pool, result
+        finally:
+            await server.stop()
+
+    pool, _ = asyncio.run(task())
+
+    assert pool._closed and not pool._slots
+    assert not any(s.client.is_connected for s in sessions)
+    assert pool not in mcp_pool._pools.values()
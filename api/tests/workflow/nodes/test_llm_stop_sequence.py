@@ -0,0 +1,174 @@
+# -*- coding: UTF-8 -*-
+"""LLM 节点停止序列：增量匹配、推理块内不截断、流式输出不被整体缓冲"""
+import random
+import re
+import time
+import uuid
+
+import pytest
+from langchain_core.messages import AIMessageChunk
+
+from app.core.workflow.nodes import LLMNode
+from app.core.workflow.nodes.llm.stop_sequence import (
+    REASONING_CLOSE,
+    REASONING_OPEN,
+    StopSequenceMatcher,
+    apply_stop_sequences,
+)
+
+STOPS = ["STOP", "\n\nUser:", "##"]
+
+
+def _inside_reasoning(text: str, pos: int) -> bool:
+    # 在完整文本上判定：位于成对的推理块内，或位于最后一个未闭合的开始标签之后
+    pattern = f"{re.escape(REASONING_OPEN)}(.*?){re.escape(REASONING_CLOSE)}"
+    end = 0
+    for match in re.finditer(pattern, text, re.DOTALL):
+        if match.start() <= pos < match.end():
+            return True
+        end = match.end()
+    unclosed = text.find(REASONING_OPEN, end)
+    return unclosed != -1 and pos >= unclosed
+
+
+def _reference(text: str, stops: list[str]) -> tuple[str, bool]:
+    for pos in range(len(text)):
+        for seq in stops:
+            if text.startswith(seq, pos) and not _inside_reasoning(text, pos):
+                return text[:pos], True
+    return text, False
+
+
+def _stream(chunks, stops):
+    matcher = StopSequenceMatcher(stops)
+    emitted, received, emitted_size = [], 0, 0
+    for chunk in chunks:
+        received += len(chunk)
+        output, stopped = matcher.feed(chunk)
+        emitted.append(output)
+        emitted_size += len(output)
+        if stopped:
+            break
+        # 只保留尾部窗口，其余内容已经输出
+        assert received - emitted_size <= max(matcher.window, len(REASONING_OPEN))
+    else:
+        emitted.append(matcher.finish()[0])
+    assert "".join(emitted) == matcher.text
+    return matcher.text, matcher.stopped
+
+
+def _split(text: str, rng: random.Random) -> list[str]:
+    chunks, pos = [], 0
+    while pos < len(text):
+        size = rng.randint(1, 6)
+        chunks.append(text[pos:pos + size])
+        pos += size
+    return chunks
+
+
+@pytest.mark.parametrize("chunks, expected", [
+    # 停止序列跨 chunk
+    (["Hello S", "T", "OP world"], ("Hello ", True)),
+    (["答案是 42\n", "\nUs", "er: 继续"], ("答案是 42", True)),
+    # 推理块内的停止序列不截断，块外的截断
+    (["<thi", "nk>先 STOP 想", "一想</th", "ink>答案 ST", "OP 多余"], ("<think>先 STOP 想一想</think>答案 ", True)),
+    # 未闭合的推理块内不截断
+    (["<think>推理 STOP", " 仍在推理"], ("<think>推理 STOP 仍在推理", False)),
+    # 多个停止序列取最早出现的位置
+    (["a ## b STOP"], ("a ", True)),
+    (["no stop here"], ("no stop here", False)),
+])
+def test_stream_matches(chunks, expected):
+    assert _stream(chunks, STOPS) == expected
+    assert apply_stop_sequences("".join(chunks), STOPS) == expected
+
+
+def test_matches_full_text_reference():
+    rng = random.Random(7)
+    pieces = ["文本", " ", "ST", "OP", "#", "\n", "User:", REASONING_OPEN, REASONING_CLOSE, "<thi", "nk>", "x"]
+    for _ in range(500):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 30)))
+        expected = _reference(text, STOPS)
+        assert apply_stop_sequences(text, STOPS) == expected, text
+        assert _stream(_split(text, rng), STOPS) == expected, text
+
+
+def test_short_stop_waits_for_longer_overlapping_stop():
+    # "S" 已收到，但更早的 "a" 可能补全为 "aST"，需等待后续内容
+    matcher = StopSequenceMatcher(["S", "aST"])
+    assert matcher.feed("xaaS") == ("xa", False)
+    assert matcher.feed("T")[0] == ""
+    assert matcher.finish() == ("", True)
+    assert matcher.text == apply_stop_sequences("xaaST", ["S", "aST"])[0] == "xa"
+
+
+def test_overlapping_stops_chunked_matches_full_text():
+    rng = random.Random(11)
+    stops = ["S", "aST", "STOP", "ab", "bbaS"]
+    pieces = ["a", "b", "S", "T", "O", "P", " ", "ST", "aS", REASONING_OPEN, REASONING_CLOSE]
+    for _ in range(1000):
+        text = "".join(rng.choice(pieces) for _ in range(rng.randint(0, 20)))
+        expected = _reference(text, stops)
+        assert apply_stop_sequences(text, stops) == expected, text
+        assert _stream(_split(text, rng), stops) == expected, text
+        assert _stream(list(text), stops) == expected, text
+
+
+def test_long_output_is_linear():
+    # 约 5 万个 token 的输出：推理块内夹杂停止序列，块外的停止序列出现在最后
+    rng = random.Random(0)
+    chunks = []
+    while len(chunks) < 50000:
+        if rng.random() < 0.01:
+            chunks.extend([REASONING_OPEN, "推理 S", "TOP", REASONING_CLOSE])
+        else:
+            chunks.append(rng.choice(["模型", "输出", "token", " ", "。", "\n", "S", "T"]))
+    chunks.append("结束 STOP 多余")
+
+    start = time.perf_counter()
+    text, stopped = _stream(chunks, STOPS)
+    elapsed = time.perf_counter() - start
+
+    assert stopped and text == "".join(chunks[:-1]) + "结束 "
+    assert elapsed < 2, f"{len(chunks)} chunks took {elapsed:.2f}s"
+
+
+class FakeStreamingLLM:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    async def astream(self, messages):
+        for chunk in self.chunks:
+            yield AIMessageChunk(content=chunk)
+
+
+@pytest.mark.asyncio
+async def test_llm_node_streams_before_stop(monkeypatch):
+    node = LLMNode({
+        "id": "llm_test",
+        "type": "llm",
+        "name": "LLM 问答",
+        "config": {
+            "model_id": str(uuid.uuid4()),
+            "prompt": "{{ sys.message }}",
+            "stop": {"enable": True, "value": ["STOP"]},
+        },
+    }, {}, [])
+    chunks = ["第一段内容，", "继续输出内容，", "<think>S", "TOP</think>", "第二段 S", "TOP 不应输出"]
+
+    async def _prepare_llm(state, variable_pool, stream):
+        return FakeStreamingLLM(chunks)
+
+    monkeypatch.setattr(node, "_prepare_llm", _prepare_llm)
+    outputs, result = [], None
+    async for event in node.execute_stream({}, None):
+        if event.get("__final__"):
+            result = event["result"]
+        elif event.get("field") == "output" and event.get("chunk"):
+            outputs.append(event["chunk"])
+
+    # 停止序列之前的内容随 chunk 逐步输出，而不是在结束时一次输出
+    assert outputs[:2] == ["第一段", "内容，继续输出"]
+    expected = "第一段内容，继续输出内容，<think>STOP</think>第二段 "
+    assert "".join(outputs) == expected
+    assert result["llm_result"].content == expected